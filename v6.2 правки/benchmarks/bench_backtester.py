@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк векторизованного ядра Backtester
+Файл: benchmarks/bench_backtester.py
+
+На эталонном наборе (синтетические 5m свечи + случайные сигналы с
+фиксированным seed) сравнивает:
+- run_backtest_legacy: построчный цикл с iloc и списками Trade
+- run_backtest: массивы NumPy + плотный цикл (numba, если установлена)
+
+Для нескольких конфигураций проверяет полное совпадение сделок,
+кривой equity и итоговых метрик.
+
+Запуск:
+    python benchmarks/bench_backtester.py --bars 20000
+"""
+import sys
+import time
+import argparse
+import warnings
+from dataclasses import asdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from src.ml.training.backtester import Backtester, BacktestConfig
+from src.ml.training.backtest_engine import HAS_NUMBA
+
+warnings.filterwarnings('ignore', category=FutureWarning)
+
+CONFIGS = {
+    'default': BacktestConfig(),
+    'trailing_stop': BacktestConfig(trailing_stop=True, trailing_stop_distance=0.005),
+    'long_only': BacktestConfig(enable_shorting=False, max_open_positions=1),
+    'leverage_no_tp': BacktestConfig(use_leverage=True, leverage=3.0, use_take_profit=False),
+    'no_stops': BacktestConfig(use_stop_loss=False, use_take_profit=False,
+                               trailing_stop=True, trailing_stop_distance=0.01),
+}
+
+
+def make_dataset(bars: int, seed: int = 7):
+    """Эталонный набор: свечи, признаки и предсказания"""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.003, bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.002, bars)) * close
+    index = pd.date_range('2021-01-01', periods=bars, freq='5min')
+
+    market_data = pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.uniform(1, 100, bars)
+    }, index=index)
+    features = pd.DataFrame({'returns': market_data['close'].pct_change()}, index=index)
+    predictions = pd.DataFrame({
+        'signal': rng.choice(['buy', 'sell', 'hold'], size=bars, p=[0.03, 0.03, 0.94]),
+        'confidence': rng.uniform(0.5, 1.0, bars),
+        'take_profit_percent': rng.uniform(0.5, 3.0, bars),
+        'stop_loss_percent': rng.uniform(0.3, 1.5, bars),
+        'strategy': rng.choice(['trend', 'mean_reversion', 'breakout'], size=bars)
+    }, index=index)
+    return market_data, features, predictions
+
+
+def compare(legacy, vectorized) -> None:
+    """Полное сравнение результатов двух движков"""
+    if len(legacy.trades) != len(vectorized.trades):
+        raise AssertionError(f"сделок {len(legacy.trades)} != {len(vectorized.trades)}")
+    for a, b in zip(legacy.trades, vectorized.trades):
+        if asdict(a) != asdict(b):
+            raise AssertionError(f"сделки отличаются:\n{a}\n{b}")
+    if not np.array_equal(legacy.equity_curve.to_numpy(), vectorized.equity_curve.to_numpy()):
+        raise AssertionError("кривая equity отличается")
+
+    for name in ('total_return', 'win_rate', 'profit_factor', 'max_drawdown',
+                 'sharpe_ratio', 'sortino_ratio', 'calmar_ratio', 'avg_ml_confidence'):
+        a, b = getattr(legacy, name), getattr(vectorized, name)
+        if not (a == b or (np.isnan(a) and np.isnan(b))):
+            raise AssertionError(f"{name}: {a} != {b}")
+    if legacy.strategy_performance != vectorized.strategy_performance:
+        raise AssertionError("strategy_performance отличается")
+
+
+def run(bars: int):
+    market_data, features, predictions = make_dataset(bars)
+    print(f"Баров: {bars}, numba: {'да' if HAS_NUMBA else 'нет'}")
+
+    for name, config in CONFIGS.items():
+        backtester = Backtester(config)
+
+        # Прогрев (компиляция numba, кэш pandas)
+        backtester.run_backtest(market_data.iloc[:500], features.iloc[:500], predictions.iloc[:500])
+
+        start = time.perf_counter()
+        legacy = backtester.run_backtest_legacy(market_data, features, predictions)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = backtester.run_backtest(market_data, features, predictions)
+        vectorized_time = time.perf_counter() - start
+
+        compare(legacy, vectorized)
+        print(f"  ✅ {name:15s} сделок {vectorized.total_trades:5d} | "
+              f"legacy {legacy_time:7.2f} с | массивы {vectorized_time:6.3f} с | "
+              f"{legacy_time / vectorized_time:5.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bars', type=int, default=20000)
+    args = parser.parse_args()
+    run(args.bars)
+
+
+if __name__ == '__main__':
+    main()
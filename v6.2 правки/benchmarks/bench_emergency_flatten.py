@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк экстренного закрытия позиций (src/exchange/emergency_flatten.py)
+Файл: benchmarks/bench_emergency_flatten.py
+
+Офлайн: async биржа-симулятор с позициями и открытыми ордерами,
+задержкой сети, лимитом ордеров Bybit (10/с, иначе 429) и сбоями:
+часть закрытий падает с сетевой ошибкой, одно исполняется частично,
+cancel_all_orders без символа - только с settleCoin (как у деривативов Bybit).
+
+Время до нулевой позиции (все позиции закрыты и ордера отменены):
+- прежний путь: по одной позиции - fetch_positions, проверка баланса,
+  ордер, пауза 0.5 с; затем отмена ордеров по символам
+- EmergencyFlattener через общий RateLimitScheduler
+
+Запуск:
+    python benchmarks/bench_emergency_flatten.py --positions 20 --latency-ms 50
+"""
+import sys
+import time
+import asyncio
+import argparse
+from collections import deque
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+import ccxt
+
+from src.exchange.emergency_flatten import EmergencyFlattener
+from src.exchange.rate_limiter import RateLimitScheduler, RateLimitedExchange
+
+
+class MockExchange:
+    """Позиции, ордера, лимит ордеров и сбои"""
+
+    def __init__(self, n_positions, latency, flaky=(), partial=(), orders_per_symbol=2):
+        self.latency = latency
+        self.positions = {
+            f'C{i}/USDT:USDT': {'symbol': f'C{i}/USDT:USDT', 'side': 'long' if i % 2 else 'short',
+                                'contracts': float(i + 1)}
+            for i in range(n_positions)
+        }
+        self.open_orders = {symbol: orders_per_symbol for symbol in self.positions}
+        self.flaky = set(flaky)          # первая попытка - сетевая ошибка
+        self.partial = set(partial)      # первое закрытие - половина
+        self.order_window = deque()
+        self.calls = {'create_order': 0, 'rejected_429': 0, 'network_errors': 0}
+        self.started = time.perf_counter()
+        self.flat_at = None
+
+    def _check_flat(self):
+        if self.flat_at is None and not any(p['contracts'] for p in self.positions.values()) \
+                and not any(self.open_orders.values()):
+            self.flat_at = time.perf_counter() - self.started
+
+    def _order_limit(self):
+        now = time.monotonic()
+        while self.order_window and now - self.order_window[0] > 1.0:
+            self.order_window.popleft()
+        if len(self.order_window) >= 10:
+            self.calls['rejected_429'] += 1
+            raise ccxt.RateLimitExceeded('429 Too Many Requests')
+        self.order_window.append(now)
+
+    async def fetch_positions(self, symbols=None, params={}):
+        await asyncio.sleep(self.latency)
+        return [dict(p) for p in self.positions.values()]
+
+    async def fetch_balance(self, params={}):
+        await asyncio.sleep(self.latency)
+        return {'USDT': {'free': 1e6}}
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        await asyncio.sleep(self.latency)
+        return [{'symbol': s} for s, n in self.open_orders.items() for _ in range(n)]
+
+    async def cancel_all_orders(self, symbol=None, params={}):
+        if symbol is None and 'settleCoin' not in params:
+            raise ccxt.ArgumentsRequired('cancelAllOrders() requires a symbol or settleCoin')
+        self._order_limit()
+        await asyncio.sleep(self.latency)
+        symbols = [symbol] if symbol else [s for s in self.open_orders if s.endswith(':' + params['settleCoin'])]
+        cancelled = [{'symbol': s} for s in symbols for _ in range(self.open_orders.get(s, 0))]
+        for s in symbols:
+            self.open_orders[s] = 0
+        self._check_flat()
+        return cancelled
+
+    async def create_order(self, symbol, type, side, amount, price=None, params={}):
+        self._order_limit()
+        await asyncio.sleep(self.latency)
+        self.calls['create_order'] += 1
+        if symbol in self.flaky:
+            self.flaky.discard(symbol)
+            self.calls['network_errors'] += 1
+            raise ccxt.NetworkError('connection reset')
+        position = self.positions[symbol]
+        if params.get('reduceOnly') and not position['contracts']:
+            raise ccxt.InvalidOrder('reduce-only order has same side with current position')
+        filled = min(amount, position['contracts'])
+        if symbol in self.partial:
+            self.partial.discard(symbol)
+            filled = filled / 2
+        position['contracts'] -= filled
+        self._check_flat()
+        return {'id': str(self.calls['create_order']), 'symbol': symbol, 'filled': filled}
+
+
+async def legacy_flatten(exchange):
+    """Прежний путь: закрытия по одной с паузой, затем отмена ордеров по символам"""
+    for symbol in list(exchange.positions):
+        positions = await exchange.fetch_positions()
+        position = next(p for p in positions if p['symbol'] == symbol)
+        if not position['contracts']:
+            continue
+        await exchange.fetch_balance()
+        side = 'sell' if position['side'] == 'long' else 'buy'
+        for _ in range(3):
+            try:
+                await exchange.create_order(symbol, 'market', side, position['contracts'])
+                break
+            except ccxt.NetworkError:
+                await asyncio.sleep(1.0)
+        await asyncio.sleep(0.5)
+    for symbol in list(exchange.open_orders):
+        await exchange.cancel_all_orders(symbol)
+        await asyncio.sleep(0.1)   # троттлинг ccxt (rateLimit 100 мс)
+    # Частично исполненные остаются - прежний путь не сверяет позиции
+    return sum(1 for p in exchange.positions.values() if not p['contracts'])
+
+
+async def main_async(n_positions, latency):
+    flaky = [f'C{i}/USDT:USDT' for i in range(0, n_positions, 7)]
+    partial = [f'C{n_positions - 1}/USDT:USDT']
+    print(f"Позиций: {n_positions}, ордеров на символ: 2, задержка биржи: {latency * 1000:.0f} мс, "
+          f"сбоев сети: {len(flaky)}, частичных исполнений: {len(partial)}")
+
+    legacy = MockExchange(n_positions, latency, flaky, partial)
+    started = time.perf_counter()
+    closed = await legacy_flatten(legacy)
+    legacy_time = time.perf_counter() - started
+    open_left = sum(1 for p in legacy.positions.values() if p['contracts'])
+    print(f"  прежний путь:      {legacy_time:6.2f} с, закрыто {closed}/{n_positions}, "
+          f"открыто {open_left}, 429: {legacy.calls['rejected_429']}")
+
+    mock = MockExchange(n_positions, latency, flaky, partial)
+    exchange = RateLimitedExchange(mock, RateLimitScheduler())
+    flattener = EmergencyFlattener(exchange, backoff=0.05)
+    report = await flattener.flatten()
+    assert report.flat and mock.flat_at is not None, report.to_dict()
+    flat_time = mock.flat_at
+    assert report.closed_count == n_positions and report.verified
+    assert report.cancelled_orders == 2 * n_positions and mock.calls['rejected_429'] == 0
+    retried = [r.symbol for r in report.results.values() if r.attempts > 1]
+    assert set(flaky) | set(partial) <= set(retried), retried
+    print(f"  EmergencyFlattener: {mock.flat_at:6.2f} с до нулевой позиции (отчет {report.seconds:.2f} с), "
+          f"раундов {report.rounds}, ордеров отменено {report.cancelled_orders}, "
+          f"429: {mock.calls['rejected_429']}")
+    slowest = max(report.results.values(), key=lambda r: r.seconds)
+    print(f"    повторы: {len(retried)} символов, последний закрыт {slowest.symbol} за {slowest.seconds:.2f} с "
+          f"({slowest.attempts} попыток)")
+
+    # Отказ биржи по существу не повторяется и попадает в отчет
+    mock = MockExchange(2, latency, orders_per_symbol=0)
+    symbol = 'C0/USDT:USDT'
+
+    async def reject(*args, **kwargs):
+        raise ccxt.InsufficientFunds('insufficient margin')
+    original = mock.create_order
+    mock.create_order = lambda s, *a, **k: reject() if s == symbol else original(s, *a, **k)
+    report = await EmergencyFlattener(mock, backoff=0.01).flatten()
+    assert report.remaining == [symbol] and report.results[symbol].status == 'rejected'
+    assert report.results[symbol].attempts == 1 and report.closed_count == 1
+    print(f"  ✅ до нулевой позиции в {legacy_time / flat_time:.1f}x быстрее, 0 ответов 429; "
+          f"отказ {symbol} не повторяется и остается в отчете")
+
+    # Позиции не получены - ордера все равно отменены, отчет не flat
+    mock = MockExchange(3, latency)
+
+    async def positions_down(*args, **kwargs):
+        raise ccxt.NetworkError('positions endpoint down')
+    mock.fetch_positions = positions_down
+    report = await EmergencyFlattener(mock, backoff=0.01).flatten()
+    assert not report.flat and report.positions_error and not report.results
+    assert report.cancelled_orders == 6 and not any(mock.open_orders.values())
+    print(f"  ✅ ошибка fetch_positions: ордера отменены ({report.cancelled_orders}), отчет не flat")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--positions', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.positions, args.latency_ms / 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк неблокирующего адаптера биржи
+Файл: benchmarks/bench_exchange_adapter.py
+
+Сравнивает N параллельных fetch_ticker:
+- старый путь: синхронный ccxt прямо из async-метода (запросы идут по очереди)
+- новый путь: RealExchangeClient через AsyncExchangeAdapter
+
+Запуск:
+    python benchmarks/bench_exchange_adapter.py --calls 8 --latency 0.2
+"""
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from src.exchange.client import RealExchangeClient
+
+
+class StubExchange:
+    """Локальная заглушка синхронного ccxt с фиксированной задержкой сети"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def fetch_time(self):
+        return int(time.time() * 1000)
+
+    def fetch_balance(self):
+        return {'USDT': {'free': 1000.0, 'used': 0.0, 'total': 1000.0}}
+
+    def fetch_ticker(self, symbol):
+        time.sleep(self.latency)  # Блокирующий HTTP-запрос
+        return {'symbol': symbol, 'last': 50000.0, 'timestamp': int(time.time() * 1000)}
+
+
+async def blocking_fetch_ticker(exchange: StubExchange, symbol: str):
+    """Поведение до адаптера: синхронный вызов внутри async def"""
+    return exchange.fetch_ticker(symbol)
+
+
+async def run(calls: int, latency: float):
+    exchange = StubExchange(latency)
+    client = RealExchangeClient(exchange=exchange)
+    symbols = [f'PAIR{i}/USDT' for i in range(calls)]
+
+    start = time.perf_counter()
+    await client.fetch_ticker(symbols[0])
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(blocking_fetch_ticker(exchange, s) for s in symbols))
+    blocking = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client.fetch_ticker(s) for s in symbols))
+    adapter = time.perf_counter() - start
+
+    await client.disconnect()
+
+    print(f"Вызовов: {calls}, задержка стаба: {latency * 1000:.0f} мс, "
+          f"потоков: {client.io.max_workers}")
+    print(f"  один вызов:             {single * 1000:8.1f} мс")
+    print(f"  синхронный ccxt (old):  {blocking * 1000:8.1f} мс  ({blocking / single:.1f}x)")
+    print(f"  AsyncExchangeAdapter:   {adapter * 1000:8.1f} мс  ({adapter / single:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.latency))
+
+
+if __name__ == '__main__':
+    main()
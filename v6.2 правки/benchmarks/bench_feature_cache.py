@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк кэша признаков (src/ml/features/feature_cache.py)
+Файл: benchmarks/bench_feature_cache.py
+
+На синтетических 5m свечах сравнивает FeatureEngineer.extract_features:
+- без кэша: полный пересчет окна на каждом баре
+- с кэшем: повторный вызов в том же баре и досчет только нового бара
+
+Проверяет:
+- холодный вызов с кэшем совпадает с вызовом без кэша
+- при warmup_bars >= окна досчитанная строка ядра совпадает с полным
+  пересчетом того же окна (время досчета меряется с warmup_bars из
+  конфигурации)
+- при warmup_bars < окна признаки, зависящие от всей истории окна (EWM,
+  OBV/VPT/VWAP), совпадают с полным пересчетом окна во всех строках
+- ядро, загруженное с диска, совпадает с ядром в памяти
+
+БД - временная SQLite (контекстные признаки читают MarketCondition/Trade).
+
+Запуск:
+    python benchmarks/bench_feature_cache.py --bars 3000 --lookback 500 --steps 30
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_features_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+
+from src.core.config import Config
+from src.core.database import db
+from src.ml.features import feature_cache as feature_cache_module
+from src.ml.features.feature_cache import FeatureCache
+from src.ml.features.feature_engineering import FeatureEngineer
+
+warnings.filterwarnings('ignore', category=FutureWarning)
+
+SYMBOL, TIMEFRAME = 'BTCUSDT', '5m'
+
+
+def make_candles(bars: int, seed: int = 5) -> pd.DataFrame:
+    """Свечи, последняя из которых - текущий (формирующийся) 5m бар"""
+    rng = np.random.default_rng(seed)
+    close = 40000 * np.exp(np.cumsum(rng.normal(0, 0.002, bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.001, bars)) * close
+    end = pd.Timestamp.utcnow().tz_localize(None).floor('5min')
+    index = pd.date_range(end=end, periods=bars, freq='5min', name='timestamp')
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.uniform(1, 100, bars)
+    }, index=index)
+
+
+class CandleFeed:
+    """Источник свечей для FeatureEngineer: сдвигаемый курсор по набору"""
+
+    def __init__(self, candles: pd.DataFrame, cursor: int):
+        self.candles = candles
+        self.cursor = cursor
+
+    async def __call__(self, symbol: str, timeframe: str, lookback_periods: int) -> pd.DataFrame:
+        return self.candles.iloc[:self.cursor].iloc[-lookback_periods * 2:].copy()
+
+
+def use_cache(cache):
+    Config.ENABLE_FEATURE_CACHE = cache is not None
+    feature_cache_module.feature_cache = cache
+
+
+async def extract(engineer: FeatureEngineer, lookback: int, seed: int = 0) -> pd.DataFrame:
+    np.random.seed(seed)  # микроструктура использует np.random
+    return await engineer.extract_features(SYMBOL, TIMEFRAME, lookback)
+
+
+async def run(bars: int, lookback: int, steps: int):
+    db.create_tables()
+    candles = make_candles(bars)
+    feed = CandleFeed(candles, bars - steps)
+    engineer = FeatureEngineer()
+    engineer._get_market_data = feed
+    window = lookback * 2
+    print(f"Баров: {bars}, окно: {window}, новых баров: {steps}")
+
+    # 1. Холодный вызов с кэшем == вызов без кэша
+    use_cache(None)
+    expected = await extract(engineer, lookback)
+    cache = FeatureCache(cache_dir=TMP_DIR)
+    use_cache(cache)
+    actual = await extract(engineer, lookback)
+    assert not actual.empty
+    pd.testing.assert_frame_equal(actual, expected)
+    print(f"  ✅ холодный вызов совпадает: {actual.shape[1]} признаков, {len(actual)} строк")
+
+    # 2. Новые бары: полный пересчет против досчета (warmup_bars из конфигурации).
+    #    Отдельный кэш с warmup_bars = окно сверяет досчитанную строку ядра с полным пересчетом
+    exact = FeatureCache(warmup_bars=window, cache_dir='')
+    short = FeatureCache(cache_dir='')  # warmup_bars из конфигурации
+    unrefreshed = FeatureCache(cache_dir='')
+    skip = 100  # Строки начала окна: у ядра кэша есть история до окна, у пересчета - NaN окон
+    path_diff = unrefreshed_diff = 0.0
+    full_time = cached_time = 0.0
+    for cursor in range(bars - steps, bars + 1):
+        feed.cursor = cursor
+        market_df = await feed(SYMBOL, TIMEFRAME, lookback)
+        core = exact.update_matrix(SYMBOL, TIMEFRAME, engineer.config_hash, market_df,
+                                   engineer._compute_core_features).core
+        if cursor == bars - steps:
+            continue
+        reference, _ = engineer._compute_core_features(market_df.copy())
+        pd.testing.assert_series_equal(core.iloc[-1], reference.iloc[-1], check_names=False)
+
+        # Колонки, зависящие от всей истории окна: кэш с коротким warmup против пересчета окна
+        path_columns = engineer.path_dependent_features(reference).columns
+        expected_path = reference[path_columns].iloc[skip:]
+        for target, refresh in ((short, engineer.path_dependent_features), (unrefreshed, None)):
+            window_core = target.update_matrix(SYMBOL, TIMEFRAME, engineer.config_hash, market_df,
+                                               engineer._compute_core_features, refresh=refresh).core
+            actual_path = window_core.loc[market_df.index[0]:, path_columns].iloc[skip:]
+            scale = expected_path.abs().max().clip(lower=1e-12)
+            diff = float(((actual_path - expected_path).abs().max() / scale).max())
+            if refresh is None:
+                unrefreshed_diff = max(unrefreshed_diff, diff)
+            else:
+                pd.testing.assert_frame_equal(actual_path, expected_path, check_dtype=False,
+                                              check_freq=False, rtol=1e-9)
+                path_diff = max(path_diff, diff)
+
+        use_cache(None)
+        start = time.perf_counter()
+        await extract(engineer, lookback)
+        full_time += time.perf_counter() - start
+
+        use_cache(cache)
+        start = time.perf_counter()
+        await extract(engineer, lookback)
+        cached_time += time.perf_counter() - start
+
+    stats = cache.get_stats()
+    print(f"  ✅ новый бар: полный пересчет {full_time / steps * 1000:7.1f} мс | "
+          f"досчет {cached_time / steps * 1000:7.1f} мс | {full_time / cached_time:4.1f}x "
+          f"(warmup {cache.warmup_bars}, инкрементальных: {stats['incremental_updates']}, "
+          f"строк: {stats['rows_appended']})")
+    print(f"  ✅ {len(path_columns)} колонок EWM/OBV/VPT/VWAP при warmup {short.warmup_bars} < окна {window}: "
+          f"отклонение от пересчета окна {path_diff:.1e} (без пересчета по окну было бы {unrefreshed_diff:.1e})")
+
+    # 3. Повторные вызовы в том же (текущем) баре
+    calls = 1000
+    start = time.perf_counter()
+    for _ in range(calls):
+        await engineer.extract_features(SYMBOL, TIMEFRAME, lookback)
+    same_bar = (time.perf_counter() - start) / calls
+    print(f"  ✅ тот же бар: {same_bar * 1e6:7.1f} мкс/вызов "
+          f"({full_time / steps / same_bar:,.0f}x к полному пересчету)")
+
+    # 4. Дисковый уровень: новый процесс подхватывает ядро без пересчета
+    restarted = FeatureCache(cache_dir=TMP_DIR)
+    market_df = await feed(SYMBOL, TIMEFRAME, lookback)
+    start = time.perf_counter()
+    matrix = restarted.update_matrix(SYMBOL, TIMEFRAME, engineer.config_hash, market_df,
+                                     engineer._compute_core_features)
+    load_time = time.perf_counter() - start
+    in_memory = cache.update_matrix(SYMBOL, TIMEFRAME, engineer.config_hash, market_df,
+                                    engineer._compute_core_features)
+    pd.testing.assert_frame_equal(matrix.core, in_memory.core, check_freq=False)
+    assert restarted.stats['disk_loads'] == 1 and restarted.stats['full_computes'] == 0
+    print(f"  ✅ загрузка ядра с диска: {load_time * 1000:6.1f} мс "
+          f"({matrix.core.shape[0]}x{matrix.core.shape[1]})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bars', type=int, default=3000)
+    parser.add_argument('--lookback', type=int, default=500)
+    parser.add_argument('--steps', type=int, default=30)
+    args = parser.parse_args()
+    asyncio.run(run(args.bars, args.lookback, args.steps))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк инкрементальных индикаторов
+Файл: benchmarks/bench_incremental_indicators.py
+
+Для каждого нового бара сравнивает:
+- старый путь: TechnicalIndicators.calculate_all по последним `window` барам
+- новый путь: IncrementalIndicatorSet.update (O(1) на бар)
+
+Дополнительно проверяет, что значения инкрементального движка совпадают
+с пакетным расчетом по всей истории (в пределах --tolerance).
+
+Стратегии (momentum, mean_reversion, swing, breakout) на скользящем окне
+свечей одного символа: индикаторы через общий движок
+(BaseStrategy.shared_indicators) против собственного расчета - значения
+совпадают, каждый бар учитывается движком один раз на все стратегии.
+
+Запуск:
+    python benchmarks/bench_incremental_indicators.py --bars 5000 --window 500
+"""
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from src.indicators import TechnicalIndicators
+from src.indicators.incremental import IncrementalIndicatorSet, get_indicator_engine
+
+
+def make_candles(bars: int, seed: int = 42) -> pd.DataFrame:
+    """Синтетические 5-минутные свечи (случайное блуждание)"""
+    rng = np.random.default_rng(seed)
+    close = 50000 * np.exp(np.cumsum(rng.normal(0, 0.002, bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.001, bars)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.uniform(10, 100, bars)
+    index = pd.date_range('2024-01-01', periods=bars, freq='5min', name='timestamp')
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low,
+                         'close': close, 'volume': volume}, index=index)
+
+
+def check_accuracy(df: pd.DataFrame, tolerance: float) -> float:
+    """Максимальное относительное отклонение от пакетного расчета"""
+    batch = TechnicalIndicators().calculate_all(df)
+    indicator_set = IncrementalIndicatorSet('BENCH/USDT', '5m')
+    ts_ms = df.index.astype('datetime64[ms]').astype(np.int64).to_numpy()
+    values = df[['open', 'high', 'low', 'close', 'volume']].to_numpy()
+
+    rows = []
+    for i, (ts, row) in enumerate(zip(ts_ms.tolist(), values.tolist())):
+        # Каждый бар сначала приходит "недоформированным", затем закрывается
+        indicator_set.update(ts, row[0], row[0], row[0], row[0], 0.0)
+        indicator_set.update(ts, *row)
+        rows.append(indicator_set.values())
+    incremental = pd.DataFrame(rows, index=df.index)
+
+    worst = 0.0
+    for column in incremental.columns:
+        expected = batch[column].to_numpy(dtype=float)
+        actual = incremental[column].to_numpy(dtype=float)
+        if not np.array_equal(np.isnan(expected), np.isnan(actual)):
+            raise AssertionError(f"{column}: не совпадают позиции NaN")
+        mask = ~np.isnan(expected)
+        scale = np.maximum(np.abs(expected[mask]), 1.0)
+        diff = float(np.max(np.abs(expected[mask] - actual[mask]) / scale)) if mask.any() else 0.0
+        status = '✅' if diff <= tolerance else '❌'
+        print(f"  {status} {column:12s} max rel diff {diff:.2e}")
+        worst = max(worst, diff)
+    return worst
+
+
+def check_strategies(df: pd.DataFrame, window: int, steps: int, tolerance: float):
+    """Стратегии на скользящем окне: общий движок против собственного расчета"""
+    from src.strategies.breakout import BreakoutStrategy
+    from src.strategies.mean_reversion import MeanReversionStrategy
+    from src.strategies.momentum import MomentumStrategy
+    from src.strategies.swing import SwingStrategy
+
+    strategies = {
+        'momentum': (MomentumStrategy(), 'atr', 'volume_ratio'),
+        'mean_reversion': (MeanReversionStrategy(), 'rsi', 'bb_upper', 'bb_lower', 'atr'),
+        'swing': (SwingStrategy(), 'rsi', 'bb_upper', 'bb_lower', 'atr', 'volume_ratio'),
+        'breakout': (BreakoutStrategy(), 'rsi', 'atr', 'volume_ratio'),
+    }
+
+    def calculate(strategy, frame, shared):
+        method = getattr(strategy, '_calculate_swing_indicators', None) or strategy._calculate_indicators
+        result = method(frame, shared)
+        return asyncio.run(result) if asyncio.iscoroutine(result) else result
+
+    engine = get_indicator_engine()
+    engine.reset()
+    frames = [df.iloc[i:i + window] for i in range(steps)]
+    own_time = shared_time = 0.0
+    worst = 0.0
+    for frame in frames:
+        for strategy, *columns in strategies.values():
+            start = time.perf_counter()
+            own = calculate(strategy, frame, None)
+            own_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            shared = strategy.shared_indicators(frame, 'BENCH/USDT')
+            result = calculate(strategy, frame, shared)
+            shared_time += time.perf_counter() - start
+
+            assert shared is not None
+            for column in columns:
+                expected, actual = float(own[column]), float(result[column])
+                worst = max(worst, abs(expected - actual) / max(abs(expected), 1.0))
+
+    stats = engine.get_stats()
+    calls = steps * len(strategies)
+    # Первый кадр - прогрев, дальше новый бар считается один раз на все
+    # стратегии; последний учтенный бар переучитывается на каждом вызове
+    # (формирующаяся свеча могла обновиться)
+    assert stats['bars_processed'] == window + (steps - 1) + (calls - 1), stats
+    print(f"\nСтратегии ({', '.join(strategies)}), {steps} баров, окно {window}:")
+    print(f"  {'✅' if worst <= tolerance else '❌'} значения через общий движок совпадают "
+          f"(max rel diff {worst:.2e}); движок учел {stats['bars_processed']} баров на {calls} вызовов")
+    print(f"  собственный расчет {own_time / calls * 1e3:7.3f} мс | через общий движок "
+          f"{shared_time / calls * 1e3:7.3f} мс на вызов стратегии")
+    return worst
+
+
+def run(bars: int, window: int, tolerance: float):
+    df = make_candles(bars + window)
+    history, stream = df.iloc[:window], df.iloc[window:]
+
+    print(f"Проверка точности ({len(df)} баров):")
+    worst = check_accuracy(df, tolerance)
+
+    # Старый путь: полный пересчет на каждом новом баре
+    ti = TechnicalIndicators()
+    sample = min(len(stream), 300)
+    start = time.perf_counter()
+    for i in range(sample):
+        ti.calculate_all(df.iloc[i + 1:window + i + 1])
+    recompute = (time.perf_counter() - start) / sample
+
+    # Новый путь: прогрев по истории + O(1) обновление на бар
+    indicator_set = IncrementalIndicatorSet('BENCH/USDT', '5m')
+    ts_ms = df.index.astype('datetime64[ms]').astype(np.int64).to_numpy()
+    values = df[['open', 'high', 'low', 'close', 'volume']].to_numpy()
+    indicator_set.update_many(ts_ms[:window], values[:window])
+
+    start = time.perf_counter()
+    for ts, row in zip(ts_ms[window:].tolist(), values[window:].tolist()):
+        indicator_set.update(ts, *row)
+        indicator_set.values()
+    incremental = (time.perf_counter() - start) / len(stream)
+
+    print(f"\nБаров в окне: {window}, новых баров: {len(stream)}")
+    print(f"  calculate_all (полный пересчет): {recompute * 1e6:10.1f} мкс/бар")
+    print(f"  инкрементальное обновление:      {incremental * 1e6:10.1f} мкс/бар")
+    print(f"  ускорение: {recompute / incremental:.0f}x")
+
+    worst = max(worst, check_strategies(df, 200, min(len(stream), 200), tolerance))
+
+    if worst > tolerance:
+        raise SystemExit(f"❌ Отклонение {worst:.2e} больше допуска {tolerance:.0e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bars', type=int, default=5000)
+    parser.add_argument('--window', type=int, default=500)
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    args = parser.parse_args()
+    run(args.bars, args.window, args.tolerance)
+
+
+if __name__ == '__main__':
+    main()
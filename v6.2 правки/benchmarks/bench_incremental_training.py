@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк инкрементального дообучения (src/ml/models/incremental.py)
+Файл: benchmarks/bench_incremental_training.py
+
+Синтетические OHLCV 5m, признаки FeatureEngineer; скользящее окно
+обучения --bars баров сдвигается на --step новых баров --steps раз,
+после каждого сдвига модель переобучается и проверяется на следующих
+--step барах:
+- DirectionClassifier: обучение с нуля (без подбора гиперпараметров -
+  по умолчанию train() еще и запускает Optuna) против train(incremental=True)
+- PriceLevelRegressor: то же для моделей TP/SL
+- дрейф: смена режима рынка (волатильность x4) - инкрементальный режим
+  сам переходит к полному переобучению
+
+Запуск:
+    python benchmarks/bench_incremental_training.py --bars 6000 --step 288 --steps 4
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_incremental_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+os.environ.setdefault('MODEL_REGISTRY_DIR', f"{TMP_DIR}/registry")
+os.environ.setdefault('ENABLE_HUMAN_MODE', 'false')
+
+from sklearn.metrics import accuracy_score, mean_absolute_error
+
+from src.core.config import Config
+from src.core.database import db
+from src.ml.features.feature_engineering import FeatureEngineer
+from src.ml.labeling import direction_labels
+from src.ml.models.classifier import DirectionClassifier
+from src.ml.models.regressor import PriceLevelRegressor
+
+warnings.simplefilter('ignore', category=Warning)  # PerformanceWarning pandas в признаках
+
+HORIZON = 5
+
+
+def make_ohlcv(bars, seed=0, shift_at=None):
+    """OHLCV; с бара shift_at - другой режим рынка (волатильность x4)"""
+    rng = np.random.default_rng(seed)
+    sigma = np.full(bars, 0.004)
+    if shift_at is not None:
+        sigma[shift_at:] *= 4
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 1, bars) * sigma))
+    spread = np.abs(rng.normal(0, 0.5, bars)) * sigma * close
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.uniform(100, 1000, bars)
+    }, index=pd.date_range('2024-01-01', periods=bars, freq='5min'))
+
+
+def make_features(data):
+    """Признаки всех баров (каждый бар - только по прошлым данным) и классы направления"""
+    engineer = FeatureEngineer()
+    frame, _ = engineer._compute_core_features(data.copy())
+    features = frame[engineer.get_feature_names(frame)].replace([np.inf, -np.inf], np.nan)
+    labels = pd.Series(direction_labels(data['close'], HORIZON), index=data.index)
+    valid = features.notna().all(axis=1) & labels.notna()
+    return features[valid], labels[valid].astype(int), data[valid]
+
+
+def classifier_window(features, labels, end, bars):
+    """Окно обучения до бара end: train 80% / validation 20%"""
+    X, y = features.iloc[end - bars:end - HORIZON], labels.iloc[end - bars:end - HORIZON]
+    split = int(len(X) * 0.8)
+    return X.iloc[:split], y.iloc[:split], X.iloc[split:], y.iloc[split:]
+
+
+def run_classifier(features, labels, args, incremental_model=None):
+    """Шаги скользящего окна: (время с нуля, время дообучения, точность с нуля, точность дообучения, режимы)"""
+    full_times, inc_times, full_acc, inc_acc, modes = [], [], [], [], []
+    model = incremental_model or DirectionClassifier(name='bench_incremental')
+    start = args.bars
+    for step in range(args.steps + 1):
+        end = start + step * args.step
+        X_train, y_train, X_val, y_val = classifier_window(features, labels, end, args.bars)
+        X_next, y_next = features.iloc[end:end + args.step], labels.iloc[end:end + args.step]
+
+        started = time.perf_counter()
+        model.train(X_train, y_train, X_val, y_val, optimize_params=False, incremental=True)
+        inc_time = time.perf_counter() - started
+        if step == 0:
+            continue  # первое обучение - полное в обоих вариантах
+        inc_times.append(inc_time)
+        modes.append(model.incremental_state['last_decision'])
+        inc_acc.append(accuracy_score(y_next, model.predict(X_next)))
+
+        scratch = DirectionClassifier(name='bench_full')
+        started = time.perf_counter()
+        scratch.train(X_train, y_train, X_val, y_val, optimize_params=False)
+        full_times.append(time.perf_counter() - started)
+        full_acc.append(accuracy_score(y_next, scratch.predict(X_next)))
+    return full_times, inc_times, full_acc, inc_acc, modes
+
+
+def run_regressor(features, data, args):
+    full_times, inc_times, full_mae, inc_mae, modes = [], [], [], [], []
+    model = PriceLevelRegressor()
+    start = args.bars
+    for step in range(args.steps + 1):
+        end = start + step * args.step
+        window_f, window_d = features.iloc[end - args.bars:end], data.iloc[end - args.bars:end]
+        # Цели следующих баров известны по полным данным (только для оценки)
+        tp_next, _ = PriceLevelRegressor().prepare_target_data(data.iloc[end:end + args.step + 100])
+        X_next = features.iloc[end:end + args.step]
+
+        started = time.perf_counter()
+        model.train(window_f, window_d, incremental=True)
+        inc_time = time.perf_counter() - started
+        if step == 0:
+            continue
+        inc_times.append(inc_time)
+        modes.append(model.incremental_state['last_decision'])
+        inc_mae.append(mean_absolute_error(tp_next[:len(X_next)], model.predict(X_next)['take_profit_percent']))
+        if modes[-1]['mode'] == 'incremental':
+            # Граница дообучения сохранена в реестре вместе с моделями
+            restored = PriceLevelRegressor()
+            restored.load_model()
+            assert restored.incremental_state == model.incremental_state
+
+        scratch = PriceLevelRegressor()
+        started = time.perf_counter()
+        scratch.train(window_f, window_d)
+        full_times.append(time.perf_counter() - started)
+        full_mae.append(mean_absolute_error(tp_next[:len(X_next)], scratch.predict(X_next)['take_profit_percent']))
+    return full_times, inc_times, full_mae, inc_mae, modes
+
+
+def report(name, metric, full_t, inc_t, full_q, inc_q, modes):
+    """Время и качество переобучений: с нуля против инкрементального режима"""
+    updates = [t for t, m in zip(inc_t, modes) if m['mode'] == 'incremental']
+    fallbacks = [f"{m['reason']}" for m in modes if m['mode'] == 'full']
+    print(f"{name}:")
+    print(f"  с нуля:                {np.mean(full_t) * 1000:7.0f} мс на переобучение, {metric} {np.mean(full_q):.3f}")
+    print(f"  инкрементальный режим: {np.mean(inc_t) * 1000:7.0f} мс на переобучение, {metric} {np.mean(inc_q):.3f}"
+          f" - в {np.mean(full_t) / np.mean(inc_t):.1f} раза быстрее")
+    print(f"  ✅ дообучений {len(updates)} из {len(modes)}: {np.mean(updates) * 1000:.0f} мс на "
+          f"{int(np.mean([m['bars'] for m in modes if m['mode'] == 'incremental']))} новых барах"
+          f" (в {np.mean(full_t) / np.mean(updates):.1f} раза быстрее полного); полных переобучений "
+          f"{len(fallbacks)}{' - ' + ', '.join(fallbacks) if fallbacks else ''}; дрейфующих признаков "
+          f"до {max(m['drift_share'] or 0 for m in modes):.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bars', type=int, default=6000)
+    parser.add_argument('--step', type=int, default=288)
+    parser.add_argument('--steps', type=int, default=4)
+    parser.add_argument('--skip-regressor', action='store_true')
+    args = parser.parse_args()
+
+    os.chdir(TMP_DIR)  # models/ - во временном каталоге
+    db.create_tables()
+    total = args.bars + (args.steps + 2) * args.step + 300  # + разгон индикаторов
+    features, labels, data = make_features(make_ohlcv(total))
+    print(f"Окно {args.bars} баров, сдвиг {args.step} баров x {args.steps}, признаков {features.shape[1]}")
+
+    # === DirectionClassifier ===
+    results = run_classifier(features, labels, args)
+    assert any(m['mode'] == 'incremental' for m in results[-1]), results[-1]
+    report("DirectionClassifier (xgboost)", "точность на следующих барах", *results)
+
+    # === PriceLevelRegressor ===
+    if not args.skip_regressor:
+        results = run_regressor(features, data, args)
+        assert any(m['mode'] == 'incremental' for m in results[-1]), results[-1]
+        report("PriceLevelRegressor (xgboost, TP/SL)", "MAE TP на следующих барах, %", *results)
+
+    # === Дрейф: смена режима рынка ===
+    # Сразу после обученной части первого окна (+ разгон индикаторов)
+    shift_at = int(args.bars * 0.8) + 250
+    features, labels, _ = make_features(make_ohlcv(total, shift_at=shift_at))
+    model = DirectionClassifier(name='bench_drift')
+    print(f"Смена режима рынка (волатильность x4 с бара {shift_at}):")
+    for end in (args.bars, args.bars + 2 * args.step):
+        X_train, y_train, X_val, y_val = classifier_window(features, labels, end, args.bars)
+        model.train(X_train, y_train, X_val, y_val, optimize_params=False, incremental=True)
+    decision = model.incremental_state['last_decision']
+    assert decision['mode'] == 'full' and decision['reason'] == 'feature_drift', decision
+    print(f"  ✅ {decision['bars']} баров окна обучены с нуля: дрейфующих признаков "
+          f"{decision['drift_share']:.0%} (порог {Config.INCREMENTAL_DRIFT_SHARE:.0%})")
+
+if __name__ == '__main__':
+    main()
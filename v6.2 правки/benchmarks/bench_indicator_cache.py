@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк кэша колонок индикаторов (src/ml/features/indicator_cache.py)
+Файл: benchmarks/bench_indicator_cache.py
+
+Параметры индикаторов (rsi_period, macd_fast, macd_slow, bb_period,
+atr_period) - из исследования Optuna с TPE, как в HyperparameterOptimizer;
+score trial - дешевая функция параметров, чтобы TPE сходился и параметры
+повторялись, как в настоящем подборе:
+- прежний путь: все признаки заново с параметрами trial
+- IndicatorFeatureMatrix: ядро один раз, колонки индикаторов из кэша
+- корректность: матрица каждого trial совпадает с полным пересчетом
+- доля признаков во времени trial: обучение RandomForest на тех же данных
+
+Запуск:
+    python benchmarks/bench_indicator_cache.py --bars 2000 --trials 60
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_indicators_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+os.environ.setdefault('ENABLE_HUMAN_MODE', 'false')
+
+import optuna
+from sklearn.ensemble import RandomForestClassifier
+
+from src.ml.features.feature_engineering import FeatureEngineer
+from src.ml.features.indicator_cache import IndicatorColumnCache, IndicatorFeatureMatrix
+from src.ml.labeling import direction_labels
+
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+warnings.simplefilter('ignore', category=Warning)  # PerformanceWarning pandas при полном пересчете
+
+
+def make_ohlcv(bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, bars)))
+    spread = np.abs(rng.normal(0, 0.002, bars)) * close
+    return pd.DataFrame({
+        'open': np.r_[close[0], close[:-1]],
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'volume': rng.uniform(100, 1000, bars)
+    }, index=pd.date_range('2024-01-01', periods=bars, freq='h'))
+
+
+def indicator_trials(n_trials):
+    """Параметры индикаторов в порядке trials TPE (пространство HyperparameterOptimizer)"""
+    params = []
+
+    def objective(trial):
+        p = {
+            'rsi_period': trial.suggest_int('rsi_period', 7, 21),
+            'macd_fast': trial.suggest_int('macd_fast', 8, 15),
+            'macd_slow': trial.suggest_int('macd_slow', 20, 30),
+            'bb_period': trial.suggest_int('bb_period', 15, 25),
+            'atr_period': trial.suggest_int('atr_period', 10, 20)
+        }
+        params.append(p)
+        return -((p['rsi_period'] - 10) ** 2 + (p['macd_fast'] - 12) ** 2
+                 + (p['macd_slow'] - 24) ** 2 + (p['bb_period'] - 18) ** 2 + (p['atr_period'] - 14) ** 2)
+
+    study = optuna.create_study(direction='maximize', sampler=optuna.samplers.TPESampler(seed=42))
+    study.optimize(objective, n_trials=n_trials)
+    return params
+
+
+def full_matrix(data, params):
+    engineer = FeatureEngineer()
+    for name, value in params.items():
+        setattr(engineer, name, value)
+    frame, _ = engineer._compute_core_features(data.copy())
+    matrix = frame[engineer.get_feature_names(frame)].to_numpy(dtype=np.float64)
+    matrix[~np.isfinite(matrix)] = np.nan
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bars', type=int, default=2000)
+    parser.add_argument('--trials', type=int, default=60)
+    args = parser.parse_args()
+
+    data = make_ohlcv(args.bars)
+    trials = indicator_trials(args.trials)
+    distinct = {name: len({p[name] for p in trials}) for name in trials[0]}
+
+    full_times, matrices = [], []
+    for params in trials:
+        started = time.perf_counter()
+        matrices.append(full_matrix(data, params))
+        full_times.append(time.perf_counter() - started)
+
+    cache = IndicatorColumnCache()
+    engineer = FeatureEngineer()
+    started = time.perf_counter()
+    builder = IndicatorFeatureMatrix(data, engineer, cache=cache)
+    setup = time.perf_counter() - started
+
+    cached_times = []
+    for params, reference in zip(trials, matrices):
+        for name, value in params.items():
+            setattr(engineer, name, value)
+        started = time.perf_counter()
+        matrix = builder.build(engineer.indicator_params())
+        cached_times.append(time.perf_counter() - started)
+        assert matrix.shape == reference.shape
+        assert np.array_equal(matrix, reference, equal_nan=True)
+
+    # Обучение модели на тех же признаках (средние параметры пространства поиска)
+    y = direction_labels(data['close'], 5, threshold=0.002)
+    mask = ~(np.isnan(matrices[0]).any(axis=1) | np.isnan(y))
+    model = RandomForestClassifier(n_estimators=175, max_depth=11, n_jobs=1, random_state=42)
+    started = time.perf_counter()
+    model.fit(matrices[0][mask], y[mask])
+    fit_time = time.perf_counter() - started
+
+    stats = cache.get_stats()
+    full_ms = np.mean(full_times) * 1000
+    cached_ms = (setup + sum(cached_times)) / len(trials) * 1000
+    print(f"Бары: {args.bars}, trials: {len(trials)}, признаков: {matrices[0].shape[1]}")
+    print(f"  разных значений в trials: {distinct}")
+    print(f"  прежний путь (все признаки заново): {full_ms:7.1f} мс на trial")
+    print(f"  кэш колонок индикаторов:           {cached_ms:7.1f} мс на trial "
+          f"(ядро {setup * 1000:.0f} мс один раз, сборка медиана {np.median(cached_times) * 1000:.1f} мс) "
+          f"- в {full_ms / cached_ms:.1f} раза быстрее")
+    print(f"  колонок из кэша {stats['column_hit_rate']:.0%} ({stats['column_computes']} расчетов), "
+          f"память {stats['memory_mb']:.1f} МБ")
+    print(f"  обучение RandomForest на фолде до {fit_time * 1000:.0f} мс: признаки - "
+          f"{full_ms / (full_ms + fit_time * 1000):.0%} времени trial прежде, "
+          f"{cached_ms / (cached_ms + fit_time * 1000):.0%} с кэшем")
+    print(f"  ✅ матрицы всех {len(trials)} trials совпадают с полным пересчетом бит в бит")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пакетного инференса (src/ml/training/inference_server.py)
+Файл: benchmarks/bench_inference_server.py
+
+Моделирует цикл бота: S символов x K стратегий, каждая стратегия
+запрашивает MLTrainer.predict(symbol, df) для своего символа со своим
+окном данных (последний бар общий, предсказываемая строка - своя).
+Символы делят M моделей (как общая модель группы монет): строки всех
+символов и стратегий одной модели считаются одним predict_proba.
+
+Сравнивает:
+- predict_direct: запросы по одному (как раньше)
+- predict: сервер инференса (микро-пакеты, один predict_proba на модель)
+- повторный цикл в том же баре (кэш предсказаний)
+- тот же сервер из другого цикла событий (отдельный asyncio.run)
+
+Проверяет, что ответы сервера совпадают с predict_direct, и печатает
+перцентили задержки запросов.
+
+Запуск:
+    python benchmarks/bench_inference_server.py --symbols 20 --strategies 5 --models 4
+"""
+import sys
+import time
+import asyncio
+import argparse
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from src.ml.training.trainer import MLTrainer, EnsembleModel
+
+warnings.filterwarnings('ignore')
+
+TIMEFRAME = '5m'
+
+
+def make_model(n_features: int, seed: int) -> EnsembleModel:
+    """Небольшой ансамбль (RF + логистическая регрессия) на случайных данных"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(2000, n_features))
+    y = np.digitize(X[:, 0] + rng.normal(0, 0.5, 2000), [-0.5, 0.5]) - 1
+    models = {
+        'random_forest': RandomForestClassifier(n_estimators=100, max_depth=8, n_jobs=1,
+                                                random_state=seed).fit(X, y),
+        'logistic': LogisticRegression(max_iter=500).fit(X, y)
+    }
+    return EnsembleModel(models=models, weights=[0.6, 0.4], name=f'bench_{seed}')
+
+
+def make_features(n_features: int, seed: int, periods: int = 3) -> pd.DataFrame:
+    """Признаки символа; последний бар - текущий"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.utcnow().tz_localize(None).floor('5min')
+    index = pd.date_range(end=end, periods=periods, freq='5min', name='timestamp')
+    return pd.DataFrame(rng.normal(size=(periods, n_features)), index=index,
+                        columns=[f'feature_{i}' for i in range(n_features)])
+
+
+def strip(result: dict) -> dict:
+    return {k: v for k, v in result.items() if k not in ('timestamp', 'probabilities', 'confidence')}
+
+
+def same(a: dict, b: dict) -> bool:
+    """Ответы совпадают (вероятности - до округления float: строки считаются в одной матрице)"""
+    return (strip(a) == strip(b) and np.isclose(a['confidence'], b['confidence'], rtol=1e-12)
+            and all(np.isclose(a['probabilities'][k], b['probabilities'][k], rtol=1e-12)
+                    for k in a['probabilities']))
+
+
+async def run(n_symbols: int, n_strategies: int, n_features: int, n_models: int, rounds: int):
+    trainer = MLTrainer()
+    symbols = [f'SYM{i}USDT' for i in range(n_symbols)]
+    models = [make_model(n_features, i) for i in range(n_models)]
+    frames = {}
+    for i, symbol in enumerate(symbols):
+        trainer.models[f'{symbol}_{TIMEFRAME}'] = models[i % n_models]
+        frames[symbol] = make_features(n_features, 1000 + i, periods=n_strategies + 2)
+
+    # Окна стратегий: последний бар общий, первая (предсказываемая) строка своя
+    requests = [(symbol, frames[symbol].iloc[k:]) for symbol in symbols for k in range(n_strategies)]
+    print(f"Символов: {n_symbols}, стратегий: {n_strategies}, моделей: {n_models}, "
+          f"запросов за цикл: {len(requests)}")
+
+    # Прогрев (joblib, BLAS)
+    await trainer.predict_direct(symbols[0], frames[symbols[0]], TIMEFRAME)
+
+    # 1. По одному запросу
+    start = time.perf_counter()
+    direct = []
+    for symbol, df in requests:
+        direct.append(await trainer.predict_direct(symbol, df, TIMEFRAME))
+    direct_time = time.perf_counter() - start
+
+    # 2. Сервер инференса: все стратегии запрашивают одновременно
+    start = time.perf_counter()
+    batched = await asyncio.gather(*(trainer.predict(symbol, df, TIMEFRAME) for symbol, df in requests))
+    batched_time = time.perf_counter() - start
+
+    for a, b in zip(direct, batched):
+        assert a['success'] and b['success'], (a, b)
+        assert same(a, b), (a, b)
+    stats = trainer.inference.get_stats()
+    assert stats['model_calls'] == n_models * stats['batches'], stats
+    assert stats['rows_predicted'] == len(requests), stats
+    print(f"  ✅ по одному {direct_time * 1000:8.1f} мс | пакетно {batched_time * 1000:8.1f} мс | "
+          f"{direct_time / batched_time:5.1f}x (пакетов: {stats['batches']}, "
+          f"вызовов моделей: {stats['model_calls']}, строк: {stats['rows_predicted']})")
+    print_latency('пакет', stats['latency_ms'])
+
+    # 3. Повторные циклы в том же баре - кэш предсказаний
+    start = time.perf_counter()
+    for _ in range(rounds):
+        cached = await asyncio.gather(*(trainer.predict(symbol, df, TIMEFRAME) for symbol, df in requests))
+    cached_time = (time.perf_counter() - start) / rounds
+    assert all(same(a, b) for a, b in zip(direct, cached))
+
+    stats = trainer.inference.get_stats()
+    assert stats['cache_hits'] == rounds * len(requests), stats
+    print(f"  ✅ тот же бар: {cached_time * 1000:8.2f} мс за цикл (попаданий в кэш: {stats['cache_hits']})")
+    print_latency('последние запросы', stats['latency_ms'])
+
+    # Формирующийся бар обновился: то же время строки, другие значения - пересчет
+    symbol, df = requests[-1]
+    updated = df.copy()
+    updated.iloc[0] = -updated.iloc[0]
+    fresh = await trainer.predict(symbol, updated, TIMEFRAME)
+    assert trainer.inference.get_stats()['cache_hits'] == stats['cache_hits']
+    assert same(fresh, await trainer.predict_direct(symbol, updated, TIMEFRAME))
+    print("  ✅ обновленный бар с тем же временем: предсказание пересчитано")
+    return trainer, requests, direct
+
+
+async def run_in_new_loop(trainer: MLTrainer, requests: list, direct: list):
+    """4. Пакеты того же сервера из другого цикла событий"""
+    trainer.inference.invalidate()
+    batches = trainer.inference.get_stats()['batches']
+    results = await asyncio.gather(*(trainer.predict(symbol, df, TIMEFRAME) for symbol, df in requests))
+    assert all(same(a, b) for a, b in zip(direct, results))
+    assert trainer.inference.get_stats()['batches'] > batches
+    print(f"  ✅ другой цикл событий (новый asyncio.run): {len(results)} предсказаний пакетами совпадают")
+
+
+def print_latency(title: str, latency: dict):
+    print(f"     задержка ({title}): p50 {latency['p50']:.3f} мс | p90 {latency['p90']:.3f} мс | "
+          f"p99 {latency['p99']:.3f} мс | max {latency['max']:.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--strategies', type=int, default=5)
+    parser.add_argument('--features', type=int, default=200)
+    parser.add_argument('--models', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    state = asyncio.run(run(args.symbols, args.strategies, args.features, args.models, args.rounds))
+    asyncio.run(run_in_new_loop(*state))
+
+
+if __name__ == '__main__':
+    main()
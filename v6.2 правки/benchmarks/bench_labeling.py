@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк векторизованной разметки (src/ml/labeling.py)
+Файл: benchmarks/bench_labeling.py
+
+Сравнивает прежние построчные реализации (циклы с .iloc, воспроизведены
+ниже как эталон) с текущими:
+- DataPipeline.create_labels ('classification' и 'regression')
+- PriceLevelRegressor.prepare_target_data
+
+Проверяет эквивалентность результатов и печатает время.
+
+Запуск:
+    python benchmarks/bench_labeling.py --bars 20000
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from src.ml.data_pipeline import DataPipeline
+from src.ml.models.regressor import PriceLevelRegressor
+
+
+# =================================================================
+# ЭТАЛОН: ПРЕЖНИЕ ЦИКЛЫ
+# =================================================================
+
+def legacy_create_labels(market_data: pd.DataFrame, label_window: int,
+                         label_type: str) -> pd.Series:
+    labels = []
+    if label_type == 'classification':
+        for i in range(len(market_data) - label_window):
+            current_price = market_data.iloc[i]['close']
+            future_prices = market_data.iloc[i+1:i+label_window+1]['close']
+            avg_change = (future_prices.mean() - current_price) / current_price
+            if avg_change < -0.002:
+                labels.append(0)
+            elif avg_change > 0.002:
+                labels.append(2)
+            else:
+                labels.append(1)
+        labels.extend([1] * label_window)
+    else:
+        for i in range(len(market_data) - label_window):
+            current_price = market_data.iloc[i]['close']
+            future_price = market_data.iloc[i + label_window]['close']
+            labels.append((future_price - current_price) / current_price * 100)
+        labels.extend([0.0] * label_window)
+    return pd.Series(labels, index=market_data.index)
+
+
+def legacy_prepare_target_data(df: pd.DataFrame):
+    tp_targets, sl_targets = [], []
+    for i in range(len(df) - 100):
+        current_price = df.iloc[i]['close']
+        future_highs = df.iloc[i+1:i+101]['high'].values
+        future_lows = df.iloc[i+1:i+101]['low'].values
+        max_profit = np.max((future_highs - current_price) / current_price) * 100
+        max_loss = np.min((future_lows - current_price) / current_price) * 100
+        volatility = df.iloc[max(0, i-20):i]['close'].pct_change().std() * 100
+        tp_targets.append(min(max_profit * 0.7, volatility * 2.5))
+        sl_targets.append(min(abs(max_loss) * 0.5, volatility * 1.5))
+    avg_tp, avg_sl = np.mean(tp_targets), np.mean(sl_targets)
+    tp_targets.extend([avg_tp] * 100)
+    sl_targets.extend([avg_sl] * 100)
+    return pd.Series(tp_targets), pd.Series(sl_targets)
+
+
+# =================================================================
+
+def make_candles(bars: int, seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 40000 * np.exp(np.cumsum(rng.normal(0, 0.002, bars)))
+    spread = np.abs(rng.normal(0, 0.001, bars)) * close
+    index = pd.date_range('2023-01-01', periods=bars, freq='5min')
+    return pd.DataFrame({
+        'open': close, 'high': close + spread, 'low': close - spread,
+        'close': close, 'volume': rng.uniform(1, 10, bars)
+    }, index=index)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(bars: int):
+    df = make_candles(bars)
+    pipeline = DataPipeline(['BTCUSDT'])
+    regressor = PriceLevelRegressor()
+    window = pipeline.params['label_window']
+    print(f"Баров: {bars}, label_window: {window}")
+
+    for label_type in ('classification', 'regression'):
+        expected, legacy_time = timed(legacy_create_labels, df, window, label_type)
+        actual, new_time = timed(pipeline.create_labels, df, label_type)
+        if label_type == 'classification':
+            mismatches = int((expected != actual).sum())
+            assert mismatches == 0, f"{mismatches} меток отличаются"
+            assert actual.dtype == expected.dtype
+        else:
+            np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=1e-12, atol=1e-12)
+        print(f"  ✅ create_labels[{label_type:14s}] legacy {legacy_time:7.3f} с | "
+              f"векторно {new_time * 1000:7.2f} мс | {legacy_time / new_time:6.0f}x")
+
+    (exp_tp, exp_sl), legacy_time = timed(legacy_prepare_target_data, df)
+    (tp, sl), new_time = timed(regressor.prepare_target_data, df)
+    np.testing.assert_allclose(tp.to_numpy(), exp_tp.to_numpy(), rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(sl.to_numpy(), exp_sl.to_numpy(), rtol=1e-9, atol=1e-12)
+    print(f"  ✅ prepare_target_data          legacy {legacy_time:7.3f} с | "
+          f"векторно {new_time * 1000:7.2f} мс | {legacy_time / new_time:6.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bars', type=int, default=20000)
+    args = parser.parse_args()
+    run(args.bars)
+
+
+if __name__ == '__main__':
+    main()
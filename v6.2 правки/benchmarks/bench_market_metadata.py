@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк метаданных рынков (src/exchange/market_metadata.py)
+Файл: benchmarks/bench_market_metadata.py
+
+Офлайн: N синтетических спотовых рынков Bybit в режиме TICK_SIZE
+(как в ccxt 4.x), биржа-заглушка с задержкой сети на load_markets
+(по запросу на категорию) и fetch_ticker.
+
+- расчет размера позиции: прежний (load_markets + fetch_ticker на каждый
+  вызов) против MarketMetadata + тикер из кэша чтений
+- нормализация ордера: прежний разбор precision как числа знаков против
+  шага из метаданных (прежний в TICK_SIZE режиме падал и не округлял)
+- старт: load_markets с биржи против снимка с диска
+- округление: скалярное и векторное совпадают с эталоном ccxt
+  amount_to_precision (количество) и Decimal ROUND_DOWN (цена)
+
+Запуск:
+    python benchmarks/bench_market_metadata.py --markets 500 --latency-ms 50
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from decimal import Decimal, ROUND_DOWN
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+os.environ.setdefault('MARKET_METADATA_PATH', '')   # общий экземпляр - без снимка в рабочем каталоге
+os.environ.setdefault('ENABLE_HUMAN_MODE', 'false')
+
+import ccxt
+import numpy as np
+
+from src.exchange.client import RealExchangeClient
+from src.exchange.market_metadata import MarketMetadata, get_market_metadata, market_key
+
+STEPS = [1.0, 0.1, 0.01, 0.001, 0.0001, 0.00001, 0.000001]
+TICKS = [0.1, 0.01, 0.001, 0.0001, 0.00001, 0.0000001]
+
+
+def build_markets(n):
+    rng = random.Random(7)
+    markets = {}
+    for i in range(n):
+        base = f'C{i}'
+        step = rng.choice(STEPS)
+        markets[f'{base}/USDT'] = {
+            'id': f'{base}USDT', 'symbol': f'{base}/USDT', 'base': base, 'quote': 'USDT',
+            'baseId': base, 'quoteId': 'USDT', 'type': 'spot', 'spot': True, 'active': True,
+            'precision': {'amount': step, 'price': rng.choice(TICKS)},
+            'limits': {
+                'amount': {'min': step * rng.choice([1, 5, 10]), 'max': 1e6},
+                'price': {'min': None, 'max': None},
+                'cost': {'min': 1.0, 'max': 2e6}
+            }
+        }
+    return markets
+
+
+class StubBybit(ccxt.bybit):
+    """Синхронный ccxt.bybit без сети: задержка на загрузку рынков и тикер"""
+
+    def __init__(self, markets, latency):
+        super().__init__()
+        self._source = markets
+        self.latency = latency
+        self.calls = {'load_markets': 0, 'fetch_ticker': 0}
+
+    def load_markets(self, reload=False, params={}):
+        self.calls['load_markets'] += 1
+        if reload or not self.markets:
+            time.sleep(self.latency * 4)   # spot, linear, inverse, option
+            self.set_markets(self._source)
+        return self.markets
+
+    def fetch_ticker(self, symbol, params={}):
+        self.calls['fetch_ticker'] += 1
+        time.sleep(self.latency)
+        return {'symbol': symbol, 'last': 100.0 + len(symbol)}
+
+    def fetch_tickers(self, symbols=None, params={}):
+        time.sleep(self.latency)
+        return {s: {'symbol': s, 'last': 100.0 + len(s)} for s in symbols}
+
+    def fetch_time(self, params={}):
+        return int(time.time() * 1000)
+
+    def fetch_balance(self, params={}):
+        return {'USDT': {'free': 1000.0, 'used': 0.0, 'total': 1000.0}}
+
+
+def legacy_position_size(exchange, symbol, balance, risk_percent):
+    """Прежний RealExchangeClient.calculate_position_size"""
+    try:
+        markets = exchange.load_markets()
+        market = markets[symbol]
+        ticker = exchange.fetch_ticker(symbol)
+        quantity = balance * (risk_percent / 100) / ticker['last']
+        precision = market['precision']['amount']
+        quantity = float(Decimal(str(quantity)).quantize(Decimal('0.' + '0' * precision), rounding=ROUND_DOWN))
+        return max(quantity, market['limits']['amount']['min'])
+    except Exception:
+        return 0.001   # в TICK_SIZE режиме precision - шаг, '0' * 0.001 падает
+
+
+def legacy_normalize(market, amount):
+    """Прежний _normalize_order_params: precision как число знаков"""
+    try:
+        amount_precision = market.get('precision', {}).get('amount', 8)
+        return float(Decimal(str(amount)).quantize(
+            Decimal('0.' + '0' * (amount_precision - 1) + '1'), rounding=ROUND_DOWN
+        ))
+    except Exception:
+        return amount
+
+
+def floor_reference(value, step):
+    return float(Decimal(repr(value)).quantize(Decimal(repr(step)), rounding=ROUND_DOWN)) \
+        if step < 1 else float(int(value // step) * step)
+
+
+async def main_async(n_markets, latency, n_calls, n_orders):
+    markets = build_markets(n_markets)
+    symbols = list(markets)
+    print(f"Рынков: {n_markets}, задержка биржи: {latency * 1000:.0f} мс")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, 'market_metadata.json')
+
+        # ---------- старт: биржа против снимка ----------
+        exchange = StubBybit(markets, latency)
+        metadata = MarketMetadata(snapshot_path=snapshot_path, exchange_id='bybit')
+        started = time.perf_counter()
+        metadata.refresh_sync(exchange)
+        cold = time.perf_counter() - started
+
+        restarted = MarketMetadata(snapshot_path=snapshot_path, exchange_id='bybit')
+        fresh_exchange = StubBybit(markets, latency)
+        started = time.perf_counter()
+        restarted.ensure_loaded_sync(fresh_exchange)
+        warm = time.perf_counter() - started
+        assert fresh_exchange.calls['load_markets'] == 0 and len(fresh_exchange.markets) == n_markets
+        assert restarted.markets == metadata.markets and restarted.source == 'snapshot'
+        print(f"  старт: load_markets {cold * 1000:7.1f} мс | снимок с диска {warm * 1000:7.1f} мс "
+              f"(рынки переданы в ccxt без запроса)")
+
+        # Снимок другой биржи или сети не загружается; экземпляры - свои на биржу и сеть
+        assert not MarketMetadata(snapshot_path=snapshot_path, exchange_id='binance').load_snapshot()
+        assert not MarketMetadata(snapshot_path=snapshot_path, exchange_id='bybit', sandbox=True).load_snapshot()
+        testnet = ccxt.bybit({'sandbox': True})
+        assert market_key(fresh_exchange) == ('bybit', False) and market_key(testnet) == ('bybit', True)
+        assert get_market_metadata('bybit') is not get_market_metadata('bybit', True)
+        assert get_market_metadata('bybit') is not get_market_metadata('binance')
+        print("  ✅ снимок bybit не загружен для binance и testnet; кэш - на биржу и сеть")
+
+        # ---------- расчет размера позиции ----------
+        sample = [random.Random(i).choice(symbols) for i in range(n_calls)]
+        legacy_exchange = StubBybit(markets, latency)
+        started = time.perf_counter()
+        legacy_sizes = [legacy_position_size(legacy_exchange, symbol, 1000.0, 2.0) for symbol in sample]
+        legacy_time = time.perf_counter() - started
+
+        client = RealExchangeClient(exchange=StubBybit(markets, latency))
+        client.market_metadata = restarted
+        await client.fetch_tickers(sample)   # цикл торговли уже прочитал тикеры
+        client.exchange.calls = {'load_markets': 0, 'fetch_ticker': 0}
+        started = time.perf_counter()
+        sizes = [await client.calculate_position_size(symbol, 1000.0, 2.0) for symbol in sample]
+        new_time = time.perf_counter() - started
+        assert client.exchange.calls == {'load_markets': 0, 'fetch_ticker': 0}
+        for symbol, size in zip(sample, sizes):
+            step = restarted.step_size(symbol)
+            assert size >= restarted.get(symbol).min_amount
+            assert abs(size / step - round(size / step)) < 1e-6, (symbol, size, step)
+        print(f"  размер позиции x{n_calls}: прежний {legacy_time * 1000:8.1f} мс "
+              f"({legacy_exchange.calls['fetch_ticker']} fetch_ticker) | метаданные "
+              f"{new_time * 1000:6.2f} мс (0 запросов)")
+        print(f"    прежний вернул заглушку 0.001 в {legacy_sizes.count(0.001)} из {n_calls} "
+              f"(precision - шаг, а не число знаков)")
+        await client.disconnect()
+
+        # ---------- нормализация ордера ----------
+        ccxt_markets = exchange.markets
+        symbol = symbols[0]
+        amount = 12.3456789
+        legacy = legacy_normalize(ccxt_markets[symbol], amount)
+        print(f"  нормализация {symbol} {amount} (шаг {restarted.step_size(symbol)}): "
+              f"прежняя -> {legacy}, метаданные -> {restarted.round_amount(symbol, amount)}")
+
+    # ---------- эквивалентность и векторное округление ----------
+    rng = np.random.default_rng(3)
+    order_symbols = [symbols[i] for i in rng.integers(0, n_markets, n_orders)]
+    amounts = rng.uniform(1, 5000, n_orders)   # не меньше шага: ccxt на меньших бросает InvalidOrder
+    # цена - от 10^3 до 10^6 шагов цены, как на реальных рынках (float точен до ~10^11 шагов)
+    prices = np.array([restarted.tick_size(s) for s in order_symbols]) * rng.uniform(1e3, 1e6, n_orders)
+    # значения точно на шаге - проверка хвостов float
+    amounts[:50] = [restarted.step_size(s) * 3 for s in order_symbols[:50]]
+
+    started = time.perf_counter()
+    scalar_amounts = [restarted.round_amount(s, a) for s, a in zip(order_symbols, amounts)]
+    scalar_time = time.perf_counter() - started
+    started = time.perf_counter()
+    vector_amounts = restarted.round_amounts(order_symbols, amounts)
+    vector_prices = restarted.round_prices(order_symbols, prices)
+    vector_time = time.perf_counter() - started
+
+    reference_amounts = [float(exchange.amount_to_precision(s, a)) for s, a in zip(order_symbols, amounts)]
+    reference_prices = [floor_reference(p, restarted.tick_size(s)) for s, p in zip(order_symbols, prices)]
+    scalar_prices = [restarted.round_price(s, p) for s, p in zip(order_symbols, prices)]
+    assert scalar_amounts == reference_amounts == vector_amounts.tolist()
+    assert scalar_prices == reference_prices == vector_prices.tolist()
+    unknown = restarted.round_amounts(['UNKNOWN/USDT'], [1.23456])
+    assert unknown[0] == 1.23456
+    print(f"  ✅ {n_orders} ордеров: скалярное и векторное округление совпадают с ccxt "
+          f"amount_to_precision и Decimal ROUND_DOWN")
+    print(f"     скалярно (количество) {scalar_time * 1000:6.1f} мс | векторно (количество + цена) "
+          f"{vector_time * 1000:6.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--markets', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--orders', type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.markets, args.latency_ms / 1000, args.calls, args.orders))
+
+
+if __name__ == '__main__':
+    main()
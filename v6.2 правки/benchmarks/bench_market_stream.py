@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк потока цен для PositionManager (src/market_data/stream.py)
+Файл: benchmarks/bench_market_stream.py
+
+Офлайн: биржевой WebSocket заменяет ReplayServer, REST - симулятор
+с задержкой ответа. БД - временная SQLite.
+
+Сравнивает:
+- цены позиций через REST: тикеры по одному (как раньше) и из потока
+- реакцию stop-loss: от публикации цены до закрытия позиции
+
+Проверяет:
+- stop-loss срабатывает по тику, без цикла опроса
+- трейлинг стоп двигается на тиках и записывается в БД в цикле мониторинга
+- закрытие позиции в приватном потоке убирает ее из мониторинга
+- свечи из потока попадают в CandleStore
+- запись потока воспроизводится ReplayServer с теми же ценами
+
+Запуск:
+    python benchmarks/bench_market_stream.py --positions 20 --latency-ms 80
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import contextlib
+import tempfile
+import statistics
+from collections import Counter
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_stream_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+
+from src.core.database import db, SessionLocal
+from src.core.models import Trade, TradeStatus
+from src.exchange.position_manager import PositionManager
+from src.exchange.real_client import PositionInfo as ExchangePosition
+from src.market_data.candle_store import get_candle_store
+from src.market_data.replay_server import ReplayServer
+from src.market_data.stream import MarketDataStream
+
+ENTRY, STOP_LOSS, TAKE_PROFIT, TRAILING = 100.0, 95.0, 130.0, 2.0
+
+
+class SimulatedExchange:
+    """REST биржи с задержкой ответа: позиции, тикеры, закрытие"""
+
+    def __init__(self, symbols, latency: float):
+        self.latency = latency
+        self.positions = {
+            symbol: ExchangePosition(symbol, 'long', 1.0, ENTRY, 0.0, 0.0, ENTRY) for symbol in symbols
+        }
+        self.prices = {symbol: ENTRY for symbol in symbols}
+        self.calls = Counter()
+        self.closed_at = {}
+
+    async def fetch_positions(self):
+        self.calls['fetch_positions'] += 1
+        await asyncio.sleep(self.latency)
+        return list(self.positions.values())
+
+    async def fetch_ticker(self, symbol):
+        self.calls['fetch_ticker'] += 1
+        await asyncio.sleep(self.latency)
+        return {'last': self.prices[symbol]}
+
+    async def fetch_tickers(self, symbols):
+        self.calls['fetch_tickers'] += 1
+        await asyncio.sleep(self.latency)
+        return {symbol: {'last': self.prices[symbol]} for symbol in symbols}
+
+    async def close_position(self, symbol):
+        self.closed_at[symbol] = time.perf_counter()
+        self.positions.pop(symbol, None)
+        return True
+
+    async def fetch_balance(self):
+        return {'total': {'USDT': 1_000_000}}
+
+
+def create_trades(symbols):
+    session = SessionLocal()
+    for symbol in symbols:
+        session.add(Trade(
+            user_id=1, symbol=symbol, side='BUY', quantity=1.0, price=ENTRY, total=ENTRY,
+            status=TradeStatus.OPEN, stop_loss=STOP_LOSS, take_profit=TAKE_PROFIT
+        ))
+    session.commit()
+    session.close()
+
+
+async def wait_until(condition, timeout: float = 5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError('условие не выполнено')
+        await asyncio.sleep(0.0005)
+
+
+async def run(n_positions: int, latency: float):
+    db.create_tables()
+    symbols = [f'SYM{i}USDT' for i in range(n_positions)]
+    create_trades(symbols)
+    exchange = SimulatedExchange(symbols, latency)
+
+    server = ReplayServer()
+    url = await server.start()
+    record_path = f'{TMP_DIR}/stream.jsonl'
+    stream = MarketDataStream(url=url, private_url=url, api_key='bench', api_secret='bench',
+                              record_path=record_path)
+
+    manager = PositionManager(check_interval=3600)
+    manager.exchange = exchange
+    manager.stream = stream
+    monitor = asyncio.create_task(manager.start_monitoring())
+
+    # Первая сверка: потока еще нет - цены через REST (параллельно)
+    await wait_until(lambda: len(manager.positions) == n_positions and manager.ledger.open_trades())
+    subscribed = lambda: sum(len(t) for t in server._clients.values()) >= n_positions + 1
+    await wait_until(subscribed)
+    for symbol in symbols:
+        await server.publish(ReplayServer.ticker_message(symbol, ENTRY))
+    await wait_until(lambda: all(stream.latest_price(s) == ENTRY for s in symbols))
+    print(f"Позиций: {n_positions}, задержка REST: {latency * 1000:.0f} мс")
+
+    # 1. Цены позиций: тикеры по одному (как раньше) против потока
+    start = time.perf_counter()
+    for symbol in symbols:
+        await exchange.fetch_ticker(symbol)
+    sequential = time.perf_counter() - start
+
+    calls_before = exchange.calls['fetch_ticker']
+    start = time.perf_counter()
+    await manager._update_positions()
+    streamed = time.perf_counter() - start
+    assert exchange.calls['fetch_ticker'] == calls_before
+    print(f"  ✅ сверка позиций: тикеры по одному {sequential * 1000:7.1f} мс ({n_positions} запросов) | "
+          f"с потоком {streamed * 1000:6.1f} мс (0 запросов тикеров)")
+
+    # 2. Трейлинг стоп на тиках
+    trailing = symbols[0]
+    assert await manager.set_trailing_stop(trailing, TRAILING)
+    for price in (105.0, 110.0):
+        await server.publish(ReplayServer.ticker_message(trailing, price))
+        await wait_until(lambda: manager.positions[trailing].max_price == price)
+    expected_stop = 110.0 * (1 - TRAILING / 100)
+    assert abs(manager.positions[trailing].stop_loss - expected_stop) < 1e-9
+    await manager._monitoring_cycle()
+    await manager.ledger.flush()
+    session = SessionLocal()
+    stored = session.query(Trade).filter(Trade.symbol == trailing).first().stop_loss
+    session.close()
+    assert abs(stored - expected_stop) < 1e-9, stored
+    print(f"  ✅ трейлинг стоп: {manager.positions[trailing].stop_loss:.2f} после тиков, записан в БД журналом сделок")
+
+    # 3. Реакция stop-loss: публикация цены -> закрытие позиции
+    reactions = []
+    for symbol in symbols[1:-1]:
+        published = time.perf_counter()
+        await server.publish(ReplayServer.ticker_message(symbol, STOP_LOSS - 1))
+        await wait_until(lambda: symbol in exchange.closed_at)
+        reactions.append(exchange.closed_at[symbol] - published)
+        assert symbol not in manager.positions
+    print(f"  ✅ реакция stop-loss по тику: медиана {statistics.median(reactions) * 1000:.2f} мс, "
+          f"max {max(reactions) * 1000:.2f} мс "
+          f"(опрос: до {30 + n_positions * latency:.1f} с при интервале 30 с)")
+
+    # 4. Закрытие в приватном потоке
+    last = symbols[-1]
+    await server.publish(ReplayServer.position_message(last, None, 0, ENTRY))
+    await wait_until(lambda: last not in manager.positions)
+    print(f"  ✅ поток позиций: {last} закрыта на бирже - снята с мониторинга")
+
+    # 5. Свечи из потока -> CandleStore
+    await stream.subscribe_klines([trailing], '5m')
+    await wait_until(lambda: any(f'kline.5.{trailing}' in t for t in server._clients.values()))
+    bar_start = int(time.time() // 300 * 300 * 1000)
+    await server.publish(ReplayServer.kline_message(trailing, '5m', bar_start, 100, 111, 99, 110, 42))
+    series = get_candle_store().series(trailing, '5m')
+    await wait_until(lambda: series.last_timestamp == bar_start)
+    print(f"  ✅ свеча из потока в CandleStore: {trailing} 5m, close {series.frame().iloc[-1]['close']}")
+
+    # Цикл мониторинга спит check_interval - прерываем сон
+    manager.stop_monitoring()
+    monitor.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await monitor
+    await server.stop()
+
+    # 6. Воспроизведение записи потока
+    replay = ReplayServer.from_recording(record_path, speed=0)
+    replay_url = await replay.start()
+    replayed = MarketDataStream(url=replay_url, private_url=replay_url, api_key='', api_secret='',
+                                record_path='')
+    await replayed.start()
+    await replayed.subscribe_tickers(symbols)
+    await replay.wait_subscribed()
+    await wait_until(lambda: sum(len(t) for t in replay._clients.values()) >= n_positions)
+    sent = await replay.replay()
+    last_prices = {}
+    for _, message in replay.messages:
+        if message.get('topic', '').startswith('tickers.'):
+            last_prices[message['data']['symbol']] = float(message['data']['lastPrice'])
+    await wait_until(lambda: all(replayed.prices.get(s) and replayed.prices[s].price == p
+                                 for s, p in last_prices.items()))
+    print(f"  ✅ воспроизведение записи: {len(replay.messages)} сообщений, доставлено {sent}, "
+          f"цены {len(last_prices)} символов совпали")
+    await replayed.stop()
+    await replay.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--positions', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    args = parser.parse_args()
+    asyncio.run(run(args.positions, args.latency_ms / 1000))
+
+
+if __name__ == '__main__':
+    main()
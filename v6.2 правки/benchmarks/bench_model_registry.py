@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк реестра моделей (src/ml/models/registry.py)
+Файл: benchmarks/bench_model_registry.py
+
+Сравнивает загрузку модели MLTrainer:
+- старый путь: pickle.load файла {symbol}_{timeframe}_model.pkl
+- реестр: pickle 5 с буферами в памяти и через mmap; по умолчанию
+  mmap только для буферов от MODEL_REGISTRY_MMAP_MIN_MB
+- повторное обращение (LRU кэш)
+
+Проверяет:
+- модель из реестра предсказывает так же, как исходная
+- версия записана в ml_models (временная SQLite) и активна одна
+- прогрев загружает активные модели параллельно, первое предсказание
+  после прогрева не читает диск
+- лимит памяти соблюдается (лишние модели вытесняются)
+- блокировки загрузки не копятся: ни после успешной загрузки, ни после
+  отсутствующей версии или поврежденного артефакта
+
+Запуск:
+    python benchmarks/bench_model_registry.py --models 8 --features 200
+"""
+import os
+import sys
+import time
+import pickle
+import asyncio
+import argparse
+import tempfile
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_registry_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+
+from src.core.database import db, SessionLocal
+from src.core.models import MLModel
+from src.ml.models.registry import ModelRegistry
+from src.ml.training.trainer import MLTrainer, EnsembleModel
+
+warnings.filterwarnings('ignore')
+
+TIMEFRAME = '5m'
+
+
+def make_model_data(symbol: str, n_features: int, seed: int) -> dict:
+    """Данные модели в формате MLTrainer (ансамбль RF + логистическая регрессия)"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(3000, n_features))
+    y = np.digitize(X[:, 0] + rng.normal(0, 0.5, 3000), [-0.5, 0.5]) - 1
+    models = {
+        'random_forest': RandomForestClassifier(n_estimators=150, max_depth=12, n_jobs=1,
+                                                random_state=seed).fit(X, y),
+        'logistic': LogisticRegression(max_iter=300).fit(X, y)
+    }
+    ensemble = EnsembleModel(models=models, weights=[0.6, 0.4], name=f'{symbol}_ensemble')
+    return {
+        'ensemble': ensemble,
+        'best_single': models['random_forest'],
+        'trained_models': models,
+        'feature_columns': [f'feature_{i}' for i in range(n_features)],
+        'results': {'ensemble': {'test_accuracy': 0.5}},
+        'training_date': datetime.utcnow().isoformat(),
+        'symbol': symbol,
+        'timeframe': TIMEFRAME,
+        'data_info': {'train_size': len(X), 'val_size': 0, 'test_size': 0, 'feature_count': n_features}
+    }
+
+
+def save(registry: ModelRegistry, symbol: str, model_data: dict):
+    registry.save(
+        f"{symbol}_{TIMEFRAME}", model_data, model_type='ensemble',
+        metrics={'accuracy': 0.5},
+        metadata={
+            'symbol': symbol, 'timeframe': TIMEFRAME,
+            'training_date': model_data['training_date'],
+            'models_included': list(model_data['trained_models']),
+            'test_accuracy': 0.5, 'data_info': model_data['data_info']
+        },
+        training_data_size=model_data['data_info']['train_size']
+    )
+
+
+def timed(func, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def run(n_models: int, n_features: int):
+    db.create_tables()
+    symbols = [f'SYM{i}USDT' for i in range(n_models)]
+    registry = ModelRegistry(root=f"{TMP_DIR}/registry")
+    legacy_dir = Path(TMP_DIR) / 'trained'
+    legacy_dir.mkdir()
+
+    X_check = np.random.default_rng(0).normal(size=(50, n_features))
+    expected, expected_last = {}, {}
+    for i, symbol in enumerate(symbols):
+        model_data = make_model_data(symbol, n_features, i)
+        expected[symbol] = model_data['ensemble'].predict_proba(X_check)
+        expected_last[symbol] = model_data['ensemble'].predict_proba(X_check[-1:])
+        with open(legacy_dir / f"{symbol}_{TIMEFRAME}_model.pkl", 'wb') as f:
+            pickle.dump(model_data, f)
+        save(registry, symbol, model_data)
+    # Повторное сохранение - новая версия, старая деактивируется
+    save(registry, symbols[0], make_model_data(symbols[0], n_features, 0))
+
+    info = registry.get_version(f"{symbols[0]}_{TIMEFRAME}")
+    print(f"Моделей: {n_models}, признаков: {n_features}, артефакт: {info.size_bytes / 1024 / 1024:.1f} МБ")
+
+    session = SessionLocal()
+    rows = session.query(MLModel).filter(MLModel.name == f"{symbols[0]}_{TIMEFRAME}").all()
+    session.close()
+    assert len(rows) == 2 and sum(r.is_active for r in rows) == 1, rows
+    assert len(registry.versions(f"{symbols[0]}_{TIMEFRAME}")) == 2
+    print(f"  ✅ ml_models: {len(rows)} версии {symbols[0]}, активна {[r.version for r in rows if r.is_active][0]}")
+
+    # 1. Холодная загрузка одной модели
+    name = f"{symbols[1]}_{TIMEFRAME}"
+    legacy_path = legacy_dir / f"{symbols[1]}_{TIMEFRAME}_model.pkl"
+
+    def load_pickle():
+        with open(legacy_path, 'rb') as f:
+            return pickle.load(f)
+
+    pickle_time = timed(load_pickle)
+    registry_time = timed(lambda: registry.load(name, mmap=False))
+    mmap_time = timed(lambda: registry.load(name, mmap=True))
+    registry.evict()
+    registry.get(name)
+    hit_time = timed(lambda: registry.get(name), repeat=1000)
+
+    loaded = registry.load(name, mmap=True)
+    np.testing.assert_array_equal(loaded['ensemble'].predict_proba(X_check), expected[symbols[1]])
+    print(f"  ✅ загрузка: старый pickle {pickle_time * 1000:7.1f} мс | реестр {registry_time * 1000:7.1f} мс | "
+          f"mmap {mmap_time * 1000:7.1f} мс | кэш {hit_time * 1e6:5.1f} мкс")
+
+    # Выбор пути по размеру буферов: типичный ансамбль - чтение в память
+    info_1 = registry.get_version(name)
+    assert not registry._use_mmap(info_1)
+    assert ModelRegistry(root=f"{TMP_DIR}/registry", mmap_min_mb=0)._use_mmap(info_1)
+    print(f"  ✅ mmap от {registry.mmap_min_bytes / 1024 / 1024:.0f} МБ буферов, "
+          f"у модели {len(info_1.buffers)} буферов, {sum(size for _, size in info_1.buffers) / 1024:.1f} КБ - чтение в память")
+
+    # 2. Прогрев: последовательно против параллельно
+    timings = {}
+    for concurrency in (1, 4):
+        registry.evict()
+        start = time.perf_counter()
+        result = await registry.warm_up(concurrency=concurrency)
+        timings[concurrency] = time.perf_counter() - start
+        assert result['loaded'] == n_models, result
+    print(f"  ✅ прогрев {n_models} моделей: по одной {timings[1] * 1000:7.1f} мс | "
+          f"параллельно {timings[4] * 1000:7.1f} мс")
+
+    # 3. Первое предсказание после рестарта: без прогрева и после него
+    features = X_check[-1:]
+    first_call = {}
+    for warm in (False, True):
+        trainer = MLTrainer()
+        trainer.registry = ModelRegistry(root=f"{TMP_DIR}/registry")
+        trainer.models_dir = legacy_dir
+        if warm:
+            await trainer.registry.warm_up()
+        start = time.perf_counter()
+        model = trainer._load_model(symbols[1], TIMEFRAME)
+        first_call[warm] = time.perf_counter() - start
+        prediction, proba, _ = trainer._predict_rows(model, features)
+        np.testing.assert_array_equal(proba, expected_last[symbols[1]])
+    print(f"  ✅ модель для первого предсказания: без прогрева {first_call[False] * 1000:7.1f} мс | "
+          f"после прогрева {first_call[True] * 1e6:7.1f} мкс")
+
+    # 4. Лимит памяти
+    limit_mb = info.size_bytes * 2.5 / 1024 / 1024
+    small = ModelRegistry(root=f"{TMP_DIR}/registry", memory_mb=limit_mb)
+    for symbol in symbols:
+        small.get(f"{symbol}_{TIMEFRAME}")
+    stats = small.get_stats()
+    assert stats['cached_models'] == 2 and stats['memory_mb'] <= limit_mb, stats
+    assert stats['evictions'] == n_models - 2
+    print(f"  ✅ лимит {limit_mb:.1f} МБ: в памяти {stats['cached_models']} модели, "
+          f"вытеснено {stats['evictions']}")
+
+    # 5. Блокировки загрузки: успешная, нет версии, поврежденный артефакт
+    broken = f"{symbols[-1]}_{TIMEFRAME}"
+    broken_info = registry.get_version(broken)
+    broken_info.path.write_bytes(b'not a pickle')
+    registry.evict()
+    assert registry.get(name) is not None
+    assert registry.get(name, 'v_missing') is None
+    assert registry.get(broken) is None and registry.stats['load_errors'] == 1
+    assert not registry._load_locks, registry._load_locks
+    print("  ✅ блокировки загрузки освобождаются после успеха, отсутствующей версии и ошибки")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--models', type=int, default=8)
+    parser.add_argument('--features', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.models, args.features))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк оптимизатора гиперпараметров (src/ml/training/optimizer.py)
+Файл: benchmarks/bench_optuna_optimizer.py
+
+Синтетические OHLCV с инерцией доходностей, классификатор (RandomForest):
+- прежний objective: признаки на каждом фолде заново, все фолды до конца,
+  исследование в памяти
+- HyperparameterOptimizer: признаки один раз на датасет, pruner по фолдам,
+  исследование в файле журнала; те же trials и тот же seed сэмплера -
+  время всех trials и время до лучшего score
+- общее исследование: 2 процесса-воркера, бюджет trials общий
+- падение: процесс-воркер убит посреди trial, повторный запуск продолжает
+  исследование - брошенный trial повторяется, бюджет не превышен; trial
+  живого воркера при этом не трогается
+
+Запуск:
+    python benchmarks/bench_optuna_optimizer.py --bars 2000 --trials 24
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_optuna_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+os.environ.setdefault('ENABLE_HUMAN_MODE', 'false')
+
+import optuna
+from optuna.trial import TrialState
+from sklearn.model_selection import TimeSeriesSplit
+
+from src.core.database import db
+from src.ml.features.feature_engineering import FeatureEngineer
+from src.ml.labeling import direction_labels
+from src.ml.training import optimizer as optimizer_module
+from src.ml.training.optimizer import FINISHED_STATES, HyperparameterOptimizer, StudyTask
+
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+
+def make_ohlcv(bars, seed=0):
+    """Цены с инерцией доходностей: направление частично предсказуемо"""
+    rng = np.random.default_rng(seed)
+    returns = np.zeros(bars)
+    noise = rng.normal(0, 0.004, bars)
+    for i in range(1, bars):
+        returns[i] = 0.35 * returns[i - 1] + noise[i]
+    close = 100 * np.exp(np.cumsum(returns))
+    spread = np.abs(rng.normal(0, 0.002, bars)) * close
+    return pd.DataFrame({
+        'open': np.r_[close[0], close[:-1]],
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'volume': rng.uniform(100, 1000, bars)
+    }, index=pd.date_range('2024-01-01', periods=bars, freq='h'))
+
+
+def legacy_objective(optimizer, trial, data, feature_engineer):
+    """
+    Прежний objective: признаки заново на каждом фолде, без промежуточных score
+
+    Признаки фолда считаются по истории до конца валидации: отдельный срез
+    валидации короче прогрева индикаторов и целиком состоит из NaN.
+    """
+    params = optimizer.get_search_space(trial)
+    scores = []
+    for train_idx, val_idx in TimeSeriesSplit(n_splits=optimizer.n_splits).split(data):
+        history = data.iloc[:val_idx[-1] + 1]
+        frame, _ = feature_engineer._compute_core_features(history.copy())
+        features = frame[feature_engineer.get_feature_names(frame)].to_numpy(dtype=np.float64)
+        features[~np.isfinite(features)] = np.nan
+        y = direction_labels(history['close'], params['prediction_horizon'],
+                             threshold=params['min_price_change'])
+        parts = []
+        for idx in (train_idx, val_idx):
+            mask = ~(np.isnan(features[idx]).any(axis=1) | np.isnan(y[idx]))
+            parts.append((features[idx][mask], y[idx][mask]))
+        (X_train, y_train), (X_val, y_val) = parts
+        model = optimizer._train_model(optimizer._create_model(params), X_train, y_train,
+                                       X_val, y_val, params)
+        scores.append(optimizer._evaluate_model(model, X_val, y_val, params))
+    return float(np.mean(scores))
+
+
+def time_to_score(study, target):
+    """Секунды от начала исследования и число trials, когда лучший score впервые достиг target"""
+    trials = study.get_trials(deepcopy=False, states=FINISHED_STATES)
+    started = min(t.datetime_start for t in trials).timestamp()
+    best = -np.inf
+    for count, trial in enumerate(sorted(trials, key=lambda t: t.datetime_complete), 1):
+        if trial.state == TrialState.COMPLETE:
+            best = max(best, trial.value)
+        if best >= target:
+            return trial.datetime_complete.timestamp() - started, count
+    return None, None
+
+
+def bench_pruning(data, n_trials):
+    feature_engineer = FeatureEngineer()
+
+    legacy = HyperparameterOptimizer('classifier')
+    legacy.model_n_jobs = 1
+    legacy_study = optuna.create_study(direction='maximize',
+                                       sampler=optuna.samplers.TPESampler(seed=42))
+    started = time.time()
+    legacy_study.optimize(lambda t: legacy_objective(legacy, t, data, feature_engineer),
+                          n_trials=n_trials)
+    budget = time.time() - started
+
+    # То же процессорное время: сколько trials успевает оптимизатор и когда доходит до того же score
+    optimizer = HyperparameterOptimizer('classifier')
+    optimizer.storage = f"{TMP_DIR}/pruning.journal"
+    optimizer.model_n_jobs = 1
+    optimizer.timeout = budget
+    results = asyncio.run(optimizer.optimize(data, feature_engineer, n_trials=n_trials * 10, n_jobs=1))
+
+    target = legacy_study.best_value
+    legacy_s, legacy_n = time_to_score(legacy_study, target)
+    new_s, new_n = time_to_score(optimizer.study, target)
+
+    print(f"Бары: {len(data)}, фолдов: {optimizer.n_splits}, 1 процесс, бюджет {budget:.0f} с")
+    print(f"  прежний objective: {n_trials} trials, лучший F1 {target:.4f} "
+          f"на {legacy_n}-м trial ({legacy_s:.0f} с)")
+    print(f"  с pruner:          {results['n_trials']} trials "
+          f"({results['n_pruned']} остановлены), лучший F1 {results['best_score']:.4f}")
+    if new_s is None:
+        print(f"  F1 {target:.4f} за бюджет не достигнут")
+    else:
+        print(f"  ✅ F1 {target:.4f}: {new_n}-й trial, {new_s:.0f} с - в {legacy_s / new_s:.1f} раза быстрее; "
+              f"trials за бюджет - в {results['n_trials'] / n_trials:.1f} раза больше")
+    assert results['n_pruned'] > 0
+
+
+def bench_shared_study(data, n_trials):
+    optimizer = HyperparameterOptimizer('classifier')
+    optimizer.storage = f"{TMP_DIR}/shared.journal"
+    started = time.time()
+    results = asyncio.run(optimizer.optimize(data, FeatureEngineer(), n_trials=n_trials, n_jobs=2))
+    finished = optimizer.study.get_trials(deepcopy=False, states=FINISHED_STATES)
+    # MaxTrialsCallback проверяется после trial: второй воркер может дописать начатый
+    assert n_trials <= len(finished) <= n_trials + 1, len(finished)
+    assert len(results['optimization_history']) == results['n_complete']
+    print(f"  ✅ 2 процесса, одно исследование: {len(finished)} trials при бюджете {n_trials} "
+          f"за {time.time() - started:.1f} с (1 ядро - без ускорения, проверка общего хранилища)")
+
+
+def _crashing_worker(task):
+    optimizer_module._run_study_worker(task)
+
+
+def bench_crash_resume(data, n_trials):
+    storage = f"{TMP_DIR}/crash.journal"
+    optimizer = HyperparameterOptimizer('classifier')
+    optimizer.storage = storage
+    study_name = 'crash_test'
+    task = StudyTask(
+        model_type='classifier', study_name=study_name, storage=storage,
+        n_trials=10_000, timeout=None, seed=7, settings=optimizer._worker_settings(),
+        feature_engineer=FeatureEngineer(), data=data
+    )
+    process = multiprocessing.get_context('spawn').Process(target=_crashing_worker, args=(task,))
+    process.start()
+
+    study = None
+    while study is None or len(study.get_trials(deepcopy=False, states=FINISHED_STATES)) < 3:
+        assert process.is_alive(), process.exitcode
+        time.sleep(0.5)
+        try:
+            study = optuna.load_study(study_name=study_name,
+                                      storage=optimizer_module.create_storage(storage))
+        except KeyError:
+            pass
+    # Ждем начатый trial с параметрами и убиваем процесс посреди него
+    while not any(t.params for t in study.get_trials(deepcopy=False, states=(TrialState.RUNNING,))):
+        time.sleep(0.05)
+    # Trial живого воркера не считается брошенным
+    assert optimizer_module.recover_stale_trials(study) == 0
+    assert process.is_alive()
+    process.kill()
+    process.join()
+
+    stale = study.get_trials(deepcopy=False, states=(TrialState.RUNNING,))
+    done_before = len(study.get_trials(deepcopy=False, states=FINISHED_STATES))
+    assert len(stale) == 1
+
+    results = asyncio.run(optimizer.optimize(data, FeatureEngineer(), n_trials=n_trials,
+                                             study_name=study_name, n_jobs=1))
+    trials = optimizer.study.get_trials(deepcopy=False)
+    assert not [t for t in trials if t.state == TrialState.RUNNING]
+    assert len([t for t in trials if t.state in FINISHED_STATES]) == n_trials
+    # Процесс мог погибнуть посреди выбора параметров - сравниваются выбранные
+    retried = [t for t in trials if t.number > stale[0].number
+               and all(t.params.get(name) == value for name, value in stale[0].params.items())]
+    assert retried and retried[0].state in (TrialState.COMPLETE, TrialState.PRUNED)
+    print(f"  ✅ падение: процесс убит после {done_before} trials посреди trial #{stale[0].number}; "
+          f"продолжение - trial повторен (#{retried[0].number}), итого {n_trials} trials, "
+          f"лучший F1 {results['best_score']:.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bars', type=int, default=2000)
+    parser.add_argument('--trials', type=int, default=24)
+    args = parser.parse_args()
+
+    os.chdir(TMP_DIR)  # models/optimization/ - во временном каталоге
+    db.create_tables()
+    data = make_ohlcv(args.bars)
+    bench_pruning(data, args.trials)
+    bench_shared_study(data, max(args.trials // 2, 6))
+    bench_crash_resume(data, max(args.trials // 2, 8))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк локального стакана L2 (src/market_data/order_book.py)
+Файл: benchmarks/bench_order_book.py
+
+Офлайн:
+- корректность: снимок + случайные дельты против эталона (dict уровней,
+  сортировка на каждый запрос) - глубина, VWAP, проскальзывание
+- скорость: применение дельт, запросы глубины и VWAP; стоимость дельты
+  в зависимости от глубины (вставка/удаление уровня - сдвиг списка O(n))
+- поток: сообщения orderbook Bybit v5 через MarketDataStream.handle_message,
+  пропуск дельты - стакан не синхронизирован до нового снимка
+- проверка ликвидности OrderExecutionEngine: локальный стакан против
+  fetch_order_book через REST (биржа-заглушка с задержкой сети)
+
+Запуск:
+    python benchmarks/bench_order_book.py --levels 200 --deltas 200000 --latency-ms 50
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_book_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+os.environ.setdefault('ENABLE_HUMAN_MODE', 'false')
+
+from src.market_data.order_book import L2Book
+from src.market_data.stream import MarketDataStream
+
+SYMBOL = 'BTC/USDT'
+TICK = 0.1
+
+
+class ReferenceBook:
+    """Эталон: dict цена -> объем, сортировка на каждый запрос"""
+
+    def __init__(self):
+        self.sides = {'bids': {}, 'asks': {}}
+
+    def apply(self, side, levels):
+        for price, size in levels:
+            if size > 0:
+                self.sides[side][price] = size
+            else:
+                self.sides[side].pop(price, None)
+
+    def levels(self, side):
+        return sorted(self.sides[side].items(), reverse=(side == 'bids'))
+
+    def depth(self, side, n=5):
+        return sum(size for _, size in self.levels(side)[:n])
+
+    def vwap(self, order_side, quantity):
+        left, cost = quantity, 0.0
+        for price, size in self.levels('asks' if order_side == 'buy' else 'bids'):
+            take = min(left, size)
+            cost += take * price
+            left -= take
+            if left <= 0:
+                break
+        filled = quantity - left
+        return (cost / filled if filled else None), filled
+
+
+def snapshot_levels(levels, mid=60000.0, rng=None):
+    rng = rng or random.Random(0)
+    bids = [[round(mid - TICK * (i + 1), 1), round(rng.uniform(0.1, 5), 3)] for i in range(levels)]
+    asks = [[round(mid + TICK * (i + 1), 1), round(rng.uniform(0.1, 5), 3)] for i in range(levels)]
+    return bids, asks
+
+
+def random_deltas(n, levels, rng, mid=60000.0):
+    """Дельты как у биржи: в основном у верха стакана, часть - удаление уровня"""
+    deltas = []
+    for _ in range(n):
+        side = 'bids' if rng.random() < 0.5 else 'asks'
+        offset = int(abs(rng.gauss(0, levels / 6))) + 1
+        price = round(mid - TICK * offset if side == 'bids' else mid + TICK * offset, 1)
+        size = 0.0 if rng.random() < 0.3 else round(rng.uniform(0.1, 5), 3)
+        deltas.append((side, [[price, size]]))
+    return deltas
+
+
+def check_correctness(levels):
+    rng = random.Random(1)
+    bids, asks = snapshot_levels(levels, rng=rng)
+    book, ref = L2Book(SYMBOL), ReferenceBook()
+    book.apply_snapshot(bids, asks, update_id=1)
+    ref.apply('bids', bids)
+    ref.apply('asks', asks)
+    for i, (side, delta) in enumerate(random_deltas(20000, levels, rng), start=2):
+        book.apply_delta(delta if side == 'bids' else [], delta if side == 'asks' else [], update_id=i)
+        ref.apply(side, delta)
+        if i % 50 == 0:
+            for side_name in ('bids', 'asks'):
+                assert abs(book.depth(side_name, 5) - ref.depth(side_name, 5)) < 1e-9
+            for order_side in ('buy', 'sell'):
+                quantity = rng.uniform(0.01, 40)
+                price, filled = book.vwap(order_side, quantity)
+                ref_price, ref_filled = ref.vwap(order_side, quantity)
+                assert abs(filled - ref_filled) < 1e-9 and abs(price - ref_price) < 1e-6, (price, ref_price)
+    assert book.best_bid == ref.levels('bids')[0][0] and book.best_ask == ref.levels('asks')[0][0]
+    slippage = book.slippage('buy', 10.0)
+    assert slippage is not None and slippage > 0
+
+    # Пропуск в последовательности - не синхронизирован, дельты не применяются
+    assert not book.apply_delta([[1.0, 1.0]], [], update_id=book.update_id + 2)
+    assert not book.synced and book.gaps == 1
+    print("  ✅ глубина, VWAP и лучшие цены совпадают с эталоном на 20000 дельтах; пропуск дельты обнаружен")
+
+
+def bench_updates(levels, n_deltas):
+    rng = random.Random(2)
+    bids, asks = snapshot_levels(levels, rng=rng)
+    deltas = random_deltas(n_deltas, levels, rng)
+    book, ref = L2Book(SYMBOL), ReferenceBook()
+    book.apply_snapshot(bids, asks, update_id=1)
+    ref.apply('bids', bids)
+    ref.apply('asks', asks)
+
+    started = time.perf_counter()
+    for i, (side, delta) in enumerate(deltas, start=2):
+        if side == 'bids':
+            book.apply_delta(delta, (), update_id=i)
+        else:
+            book.apply_delta((), delta, update_id=i)
+    update_us = (time.perf_counter() - started) / n_deltas * 1e6
+
+    queries = 20000
+    started = time.perf_counter()
+    for i in range(queries):
+        book.depth('asks', 5)
+        book.vwap('buy', 12.5)
+    query_us = (time.perf_counter() - started) / queries * 1e6
+
+    # Запросы между дельтами: накопленные суммы пересчитываются после каждой
+    started = time.perf_counter()
+    for i, (side, delta) in enumerate(deltas[:queries], start=n_deltas + 2):
+        book.apply_delta(delta if side == 'bids' else (), delta if side == 'asks' else (), update_id=i)
+        book.vwap('buy', 12.5)
+    mixed_us = (time.perf_counter() - started) / queries * 1e6
+
+    for side, delta in deltas:
+        ref.apply(side, delta)
+    started = time.perf_counter()
+    for _ in range(2000):
+        ref.depth('asks', 5)
+        ref.vwap('buy', 12.5)
+    ref_us = (time.perf_counter() - started) / 2000 * 1e6
+
+    print(f"  дельта: {update_us:.2f} мкс ({1e6 / update_us:,.0f}/с) при {levels} уровнях на сторону")
+    print(f"  глубина 5 + VWAP: {query_us:.2f} мкс (между дельтами {mixed_us:.2f} мкс); "
+          f"эталон с сортировкой {ref_us:.1f} мкс")
+
+
+def bench_depth_scaling(n_deltas=50000, depths=(50, 200, 1000, 10000)):
+    """Дельта при разной глубине: bisect O(log n) + сдвиг списка O(n)"""
+    timings = []
+    for levels in depths:
+        rng = random.Random(3)
+        bids, asks = snapshot_levels(levels, rng=rng)
+        deltas = random_deltas(n_deltas, levels, rng)
+        book = L2Book(SYMBOL)
+        book.apply_snapshot(bids, asks, update_id=1)
+        started = time.perf_counter()
+        for i, (side, delta) in enumerate(deltas, start=2):
+            book.apply_delta(delta if side == 'bids' else (), delta if side == 'asks' else (), update_id=i)
+        timings.append(f"{levels}: {(time.perf_counter() - started) / n_deltas * 1e6:.2f}")
+    print(f"  дельта по глубине (уровней: мкс): {', '.join(timings)}")
+
+
+def bybit_message(kind, update_id, bids, asks, ts):
+    return {
+        'topic': 'orderbook.50.BTCUSDT', 'type': kind, 'ts': ts,
+        'data': {'s': 'BTCUSDT', 'b': [[str(p), str(s)] for p, s in bids],
+                 'a': [[str(p), str(s)] for p, s in asks], 'u': update_id, 'seq': update_id}
+    }
+
+
+class RestExchange:
+    """ccxt-заглушка: fetch_order_book с задержкой сети"""
+
+    def __init__(self, latency, bids, asks):
+        self.latency = latency
+        self.book = {'bids': bids, 'asks': asks}
+        self.calls = 0
+
+    async def fetch_order_book(self, symbol, limit=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return {'bids': self.book['bids'][:limit], 'asks': self.book['asks'][:limit]}
+
+
+async def bench_liquidity(latency):
+    from src.exchange.execution_engine import OrderExecutionEngine
+    from src.exchange.real_client import RealExchangeClient
+
+    rng = random.Random(3)
+    bids, asks = snapshot_levels(50, rng=rng)
+
+    stream = MarketDataStream(url='ws://offline', api_key='', api_secret='')
+    await stream.subscribe_order_books([SYMBOL], depth=50)
+    stream.handle_message(bybit_message('snapshot', 100, bids, asks, 1))
+    stream.handle_message(bybit_message('delta', 101, [[bids[0][0], 9.0]], [], 2))
+    book = stream.order_book(SYMBOL)
+    assert book is not None and book.sides['bids'].sizes[0] == 9.0
+
+    # Пропуск дельты: стакан недоступен до снимка, затем снова доступен
+    stream.handle_message(bybit_message('delta', 105, [], [[asks[0][0], 0]], 3))
+    assert stream.order_book(SYMBOL) is None and stream.stats['book_resyncs'] == 1
+    stream.handle_message(bybit_message('snapshot', 200, bids, asks, 4))
+    assert stream.order_book(SYMBOL) is not None
+
+    client = RealExchangeClient()
+    client.stream = stream
+    client.is_connected = True
+    client.exchange = RestExchange(latency, bids, asks)
+    client.reads.exchange = client.exchange
+    engine = OrderExecutionEngine()
+    engine.exchange = client
+
+    class Signal:
+        symbol, action, confidence, price = SYMBOL, 'BUY', 0.9, 60000.0
+
+    n = 200
+    started = time.perf_counter()
+    for _ in range(n):
+        local = await engine._fetch_liquidity(Signal)
+    local_us = (time.perf_counter() - started) / n * 1e6
+    assert client.exchange.calls == 0 and local['available_volume'] == sum(s for _, s in asks[:5])
+
+    ccxt_book = await client.fetch_order_book(SYMBOL, 20)
+    assert ccxt_book['bids'] == [[p, s] for p, s in bids[:20]] and client.exchange.calls == 0
+
+    # Стакан устарел - проверка идет через REST (как раньше)
+    book = stream.order_books['orderbook.50.BTCUSDT']
+    book.received_at -= 3600
+    started = time.perf_counter()
+    rest = await engine._fetch_liquidity(Signal)
+    rest_ms = (time.perf_counter() - started) * 1000
+    assert client.exchange.calls == 1 and rest['available_volume'] == local['available_volume']
+    book.received_at += 3600
+
+    class Request:
+        signal, quantity, expected_slippage = Signal, 0.5, None
+    assert engine._check_liquidity(Request, local)['sufficient'] and Request.expected_slippage > 0
+
+    print(f"  проверка ликвидности: локальный стакан {local_us:.1f} мкс, REST {rest_ms:.1f} мс "
+          f"(задержка {latency * 1000:.0f} мс); проскальзывание 0.5 BTC {Request.expected_slippage * 1e4:.3f} б.п.")
+    print(f"  ✅ поток: снимок, дельты, пропуск -> переподписка ({stream.stats['book_resyncs']}), "
+          f"стакан в формате ccxt без запроса")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--levels', type=int, default=200)
+    parser.add_argument('--deltas', type=int, default=200000)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    check_correctness(args.levels)
+    bench_updates(args.levels, args.deltas)
+    bench_depth_scaling()
+    asyncio.run(bench_liquidity(args.latency_ms / 1000))
+
+
+if __name__ == '__main__':
+    main()
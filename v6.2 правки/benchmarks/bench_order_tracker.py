@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк ожидания исполнения ордеров (src/exchange/order_tracker.py)
+Файл: benchmarks/bench_order_tracker.py
+
+Офлайн: REST биржи - симулятор с задержкой ответа, ордера исполняются
+через fill_ms после создания; приватный поток ордеров - ReplayServer.
+
+Сравнивает для N одновременных ордеров:
+- старое ожидание: sleep(1) + fetch_order в цикле на каждый ордер
+- OrderTracker без потока: общий опрос open/closed ордеров
+- OrderTracker с потоком ордеров
+
+Проверяет:
+- исполнение, отмену и таймаут (с cancel_order) через _wait_for_order_execution
+- ордер, отмененный на бирже (как у Bybit - его нет в fetch_closed_orders),
+  находится через fetch_canceled_orders или fetch_order, в том числе
+  последним опросом перед таймаутом - без лишнего cancel_order
+- устаревший REST ответ не откатывает исполненный по потоку ордер
+- частичное исполнение переходит в FILLED
+
+Запуск:
+    python benchmarks/bench_order_tracker.py --orders 10 --fill-ms 150 --latency-ms 60
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from collections import Counter
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_orders_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+
+from src.exchange.order_tracker import OrderState, OrderTracker
+from src.exchange.real_client import RealExchangeClient
+from src.market_data.replay_server import ReplayServer
+from src.market_data.stream import MarketDataStream
+
+
+class SimulatedExchange:
+    """ccxt-подобная биржа: ордер исполняется через fill_delay после создания"""
+
+    def __init__(self, latency: float, fill_delay: float, server: ReplayServer = None,
+                 cancel_new: bool = False, fetch_canceled: bool = True):
+        self.latency = latency
+        self.fill_delay = fill_delay
+        self.server = server
+        self.cancel_new = cancel_new  # биржа сразу отменяет новые ордера (например, post-only)
+        self.has = {'fetchCanceledOrders': fetch_canceled}
+        self.orders = {}
+        self.calls = Counter()
+        self.filled_at = {}
+        self._ids = 0
+
+    def _view(self, order):
+        filled = time.perf_counter() >= order['fill_at'] and order['status'] != 'canceled'
+        if filled and order['id'] not in self.filled_at:
+            self.filled_at[order['id']] = order['fill_at']
+        status = 'closed' if filled else order['status']
+        return {
+            'id': order['id'], 'clientOrderId': order['clientOrderId'], 'symbol': order['symbol'],
+            'status': status, 'amount': order['amount'], 'filled': order['amount'] if filled else 0.0,
+            'average': 100.0 if filled else None, 'price': None, 'fee': {'cost': 0.01} if filled else None
+        }
+
+    async def create_order(self, symbol, type, side, amount, price=None, params=None):
+        self.calls['create_order'] += 1
+        await asyncio.sleep(self.latency)
+        self._ids += 1
+        order_id = str(self._ids)
+        order = {
+            'id': order_id, 'clientOrderId': (params or {}).get('clientOrderId'), 'symbol': symbol,
+            'amount': amount, 'status': 'canceled' if self.cancel_new else 'open',
+            'fill_at': time.perf_counter() + self.fill_delay
+        }
+        self.orders[order_id] = order
+        if self.server is not None and self.fill_delay != float('inf'):
+            asyncio.get_running_loop().call_later(self.fill_delay, lambda: asyncio.ensure_future(
+                self.server.publish(ReplayServer.order_message(
+                    symbol, order_id, order['clientOrderId'], 'Filled', amount, amount, 100.0, 0.01
+                ))
+            ))
+        return {'id': order_id, 'clientOrderId': order['clientOrderId'], 'status': None}
+
+    async def fetch_order(self, order_id, symbol):
+        self.calls['fetch_order'] += 1
+        await asyncio.sleep(self.latency)
+        return self._view(self.orders[order_id])
+
+    async def fetch_open_orders(self, symbol=None):
+        self.calls['fetch_open_orders'] += 1
+        await asyncio.sleep(self.latency)
+        views = [self._view(o) for o in self.orders.values() if symbol in (None, o['symbol'])]
+        return [v for v in views if v['status'] == 'open']
+
+    async def fetch_closed_orders(self, symbol, since=None):
+        self.calls['fetch_closed_orders'] += 1
+        await asyncio.sleep(self.latency)
+        views = [self._view(o) for o in self.orders.values() if o['symbol'] == symbol]
+        return [v for v in views if v['status'] == 'closed']
+
+    async def fetch_canceled_orders(self, symbol, since=None):
+        self.calls['fetch_canceled_orders'] += 1
+        await asyncio.sleep(self.latency)
+        views = [self._view(o) for o in self.orders.values() if o['symbol'] == symbol]
+        return [v for v in views if v['status'] == 'canceled']
+
+    async def cancel_order(self, order_id, symbol):
+        self.calls['cancel_order'] += 1
+        await asyncio.sleep(self.latency)
+        self.orders[order_id]['status'] = 'canceled'
+
+
+async def old_wait(exchange, order_id, symbol, timeout=30):
+    """Прежний RealExchangeClient._wait_for_order_execution"""
+    start = time.time()
+    while time.time() - start < timeout:
+        await asyncio.sleep(1)
+        order = await exchange.fetch_order(order_id, symbol)
+        if order['status'] == 'closed':
+            return True
+    return False
+
+
+async def run_old(n_orders, latency, fill_delay):
+    exchange = SimulatedExchange(latency, fill_delay)
+
+    async def one(i):
+        symbol = f'SYM{i % 3}/USDT'
+        order = await exchange.create_order(symbol, 'market', 'buy', 1.0)
+        assert await old_wait(exchange, order['id'], symbol)
+        return time.perf_counter() - exchange.filled_at[order['id']]
+
+    lags = await asyncio.gather(*(one(i) for i in range(n_orders)))
+    return lags, exchange.calls
+
+
+async def place(client, exchange, symbol, amount=1.0):
+    """Путь RealExchangeClient.create_order без валидации и задержек"""
+    cid = client.order_tracker.new_client_order_id()
+    client.order_tracker.track(symbol, cid, amount)
+    try:
+        order = await exchange.create_order(symbol, 'market', 'buy', amount, params={'clientOrderId': cid})
+        client.order_tracker.apply_exchange_order({**order, 'clientOrderId': cid})
+        result = await client._wait_for_order_execution(cid, symbol)
+    finally:
+        client.order_tracker.forget(cid)
+    return order['id'], result
+
+
+def make_client(exchange, stream=None, timeout=30):
+    client = RealExchangeClient()
+    client.exchange = exchange
+    client.is_connected = True
+    client.order_timeout = timeout
+    client.order_tracker = OrderTracker(exchange=exchange, stream=stream)
+    return client
+
+
+async def run_tracker(n_orders, latency, fill_delay, stream=None, server=None):
+    exchange = SimulatedExchange(latency, fill_delay, server)
+    client = make_client(exchange, stream)
+
+    async def one(i):
+        order_id, result = await place(client, exchange, f'SYM{i % 3}/USDT')
+        assert result.success and result.filled_quantity == 1.0 and result.average_price == 100.0, result
+        if order_id not in exchange.filled_at:
+            exchange.filled_at[order_id] = exchange.orders[order_id]['fill_at']
+        return time.perf_counter() - exchange.filled_at[order_id]
+
+    lags = await asyncio.gather(*(one(i) for i in range(n_orders)))
+    await client.order_tracker.stop()
+    return lags, exchange.calls
+
+
+def report(name, lags, calls):
+    rest = sum(v for k, v in calls.items() if k != 'create_order')
+    print(f"  {name:28s} задержка после исполнения: медиана {statistics.median(lags) * 1000:7.1f} мс, "
+          f"max {max(lags) * 1000:7.1f} мс | REST запросов статуса: {rest:3d}")
+
+
+async def check_states(latency):
+    """Отмена, таймаут, устаревшие обновления, частичное исполнение"""
+    # Таймаут: ордер не исполняется - отмена на бирже
+    exchange = SimulatedExchange(latency, float('inf'))
+    client = make_client(exchange, timeout=0.5)
+    _, result = await place(client, exchange, 'BTC/USDT')
+    assert not result.success and 'Таймаут' in result.error_message
+    assert exchange.calls['cancel_order'] == 1
+    await client.order_tracker.stop()
+
+    # Отменен биржей: опросом (fetch_canceled_orders или fetch_order) и
+    # последним опросом перед таймаутом (первый опрос позже таймаута)
+    for fetch_canceled, timeout in ((True, 5), (False, 5), (True, 0.1), (False, 0.1)):
+        exchange = SimulatedExchange(latency, float('inf'), cancel_new=True, fetch_canceled=fetch_canceled)
+        client = make_client(exchange, timeout=timeout)
+        _, result = await place(client, exchange, 'BTC/USDT')
+        assert not result.success and result.error_message == "Ордер был отменен", result
+        assert exchange.calls['cancel_order'] == 0
+        assert exchange.calls['fetch_canceled_orders' if fetch_canceled else 'fetch_order'] >= 1
+        await client.order_tracker.stop()
+
+    # Отмена на бирже
+    tracker = OrderTracker()
+    order = tracker.track('BTC/USDT', 'c1')
+    tracker.apply_exchange_order({'id': '1', 'clientOrderId': 'c1', 'status': 'open', 'filled': 0})
+    tracker.apply_exchange_order({'id': '1', 'clientOrderId': 'c1', 'status': 'canceled', 'filled': 0})
+    assert (await tracker.wait_for_fill('c1', 1)).state == OrderState.CANCELED
+
+    # Частичное исполнение -> исполнен; устаревший REST "open" после потока игнорируется
+    order = tracker.track('BTC/USDT', 'c2', 2.0)
+    tracker.apply(order_id='2', client_order_id='c2', state=OrderState.PARTIALLY_FILLED, filled=0.5)
+    tracker.apply(order_id='2', state=OrderState.PARTIALLY_FILLED, filled=1.5)
+    tracker.apply(order_id='2', state=OrderState.FILLED, filled=2.0, average_price=101.0)
+    tracker.apply_exchange_order({'id': '2', 'status': 'open', 'filled': 1.5})
+    done = await tracker.wait_for_fill('c2', 1)
+    assert done.state == OrderState.FILLED and done.filled == 2.0 and done.average_price == 101.0
+    assert done.history == [OrderState.PENDING, OrderState.PARTIALLY_FILLED,
+                            OrderState.PARTIALLY_FILLED, OrderState.FILLED]
+    assert tracker.stats['stale_updates'] == 1
+    print("  ✅ таймаут с отменой, отмена (в том числе биржей перед таймаутом), "
+          "частичное исполнение, устаревший REST ответ")
+
+
+async def main_async(n_orders, latency, fill_delay):
+    print(f"Ордеров: {n_orders}, исполнение через {fill_delay * 1000:.0f} мс, задержка REST {latency * 1000:.0f} мс")
+
+    lags, calls = await run_old(n_orders, latency, fill_delay)
+    report('fetch_order на каждый', lags, calls)
+
+    lags, calls = await run_tracker(n_orders, latency, fill_delay)
+    report('OrderTracker, общий опрос', lags, calls)
+
+    server = ReplayServer()
+    url = await server.start()
+    stream = MarketDataStream(url=url, private_url=url, api_key='bench', api_secret='bench', record_path='')
+    await stream.start()
+    await stream.wait_connected(private=True)
+    await server.wait_subscribed()
+    lags, calls = await run_tracker(n_orders, latency, fill_delay, stream, server)
+    report('OrderTracker, поток ордеров', lags, calls)
+    await stream.stop()
+    await server.stop()
+
+    await check_states(latency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=10)
+    parser.add_argument('--fill-ms', type=float, default=150)
+    parser.add_argument('--latency-ms', type=float, default=60)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.orders, args.latency_ms / 1000, args.fill_ms / 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк журнала сделок с отложенной записью (src/exchange/position_ledger.py)
+Файл: benchmarks/bench_position_ledger.py
+
+Временная SQLite БД, N открытых сделок с позициями:
+- прежний цикл мониторинга: чтение всех открытых Trade, запись трейлинг
+  стопов и PnL синхронными сессиями в цикле событий
+- PositionManager с журналом: те же шаги в памяти, запись - фоновой пачкой
+  в потоке; задержка цикла событий во время записи
+- объединение: много трейлинг стопов между записями - одна строка на сделку
+- корректность: закрытие по стопу, новая сделка от OrderExecutionEngine
+  (id после записи), ошибка записи и повтор, загрузка журнала заново
+
+Запуск:
+    python benchmarks/bench_position_ledger.py --trades 200 --ticks 50
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_ledger_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+os.environ.setdefault('ENABLE_MARKET_STREAM', 'false')
+os.environ.setdefault('ENABLE_HUMAN_MODE', 'false')
+
+from src.core.database import SessionLocal, db
+from src.core.models import Trade, TradeStatus, User
+from src.exchange.position_ledger import PositionLedger, TradeRecord
+from src.exchange.position_manager import PositionInfo, PositionManager
+
+
+def seed(n_trades):
+    db.create_tables()
+    session = SessionLocal()
+    try:
+        if not session.query(User).filter(User.id == 1).first():
+            session.add(User(id=1, username='bench', password_hash='x'))
+        for i in range(n_trades):
+            session.add(Trade(
+                user_id=1, symbol=f'PAIR{i}/USDT', side='BUY', quantity=1.0, price=100.0,
+                total=100.0, status=TradeStatus.OPEN.value, stop_loss=90.0, take_profit=150.0
+            ))
+        session.commit()
+    finally:
+        session.close()
+
+
+def make_positions(n_trades, price):
+    return {
+        f'PAIR{i}/USDT': PositionInfo(
+            symbol=f'PAIR{i}/USDT', side='long', size=1.0, entry_price=100.0,
+            current_price=price, unrealized_pnl=price - 100.0,
+            unrealized_pnl_percent=price - 100.0, trailing_stop=True, trailing_distance=5.0
+        )
+        for i in range(n_trades)
+    }
+
+
+def legacy_cycle(positions, pending_stops):
+    """Прежние шаги цикла: _load_active_trades, _flush_stop_updates, _update_trades_pnl"""
+    session = SessionLocal()
+    try:
+        for trade in session.query(Trade).filter(Trade.id.in_(list(pending_stops))).all():
+            trade.stop_loss = pending_stops[trade.id]
+            trade.updated_at = datetime.utcnow()
+        session.commit()
+    finally:
+        session.close()
+
+    session = SessionLocal()
+    try:
+        trades = session.query(Trade).filter(Trade.status == TradeStatus.OPEN).all()
+        by_symbol = {trade.symbol: trade for trade in trades}
+    finally:
+        session.close()
+
+    session = SessionLocal()
+    try:
+        for symbol in positions:
+            trade = by_symbol.get(symbol)
+            if trade:
+                trade.updated_at = datetime.utcnow()
+                session.merge(trade)
+        session.commit()
+    finally:
+        session.close()
+
+
+class Exchange:
+    async def close_position(self, symbol):
+        return True
+
+
+async def loop_lag(stop, samples):
+    """Задержка цикла событий: шаг 1 мс"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        samples.append(time.perf_counter() - started - 0.001)
+
+
+async def main_async(args):
+    seed(args.trades)
+
+    # Прежний цикл: все в цикле событий
+    positions = make_positions(args.trades, 120.0)
+    legacy = []
+    for cycle in range(args.cycles):
+        pending = {trade_id: 100.0 + cycle for trade_id in range(1, args.trades + 1)}
+        started = time.perf_counter()
+        legacy_cycle(positions, pending)
+        legacy.append(time.perf_counter() - started)
+
+    # PositionManager с журналом
+    manager = PositionManager()
+    manager.exchange = Exchange()
+    manager.ledger = ledger = PositionLedger(flush_interval=3600)
+    await ledger.start()
+    manager.positions = make_positions(args.trades, 120.0)
+
+    staged, lag = [], []
+    for cycle in range(args.cycles):
+        # Тики между циклами: цена растет, трейлинг стоп подтягивается на каждом
+        for tick in range(args.ticks):
+            price = 120.0 + cycle + tick * 0.01
+            for position in manager.positions.values():
+                manager._apply_price(position, price)
+            await manager._update_trailing_stops()
+        started = time.perf_counter()
+        await manager._load_active_trades()
+        await manager._update_trades_pnl()
+        staged.append(time.perf_counter() - started)
+        # Задержка цикла событий - только на время записи
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(loop_lag(stop, lag))
+        written = await ledger.flush()
+        stop.set()
+        await lag_task
+        assert written == args.trades, written
+
+    session = SessionLocal()
+    try:
+        stored = {t.symbol: t.stop_loss for t in session.query(Trade).all()}
+    finally:
+        session.close()
+    for symbol, position in manager.positions.items():
+        assert abs(stored[symbol] - position.stop_loss) < 1e-9
+    changes_per_flush = ledger.stats['changes'] / ledger.stats['flushes']
+
+    print(f"Сделок: {args.trades}, тиков между циклами: {args.ticks}")
+    print(f"  прежний цикл (БД в цикле событий): {statistics.median(legacy) * 1000:7.2f} мс")
+    print(f"  журнал, те же шаги (в памяти):       {statistics.median(staged) * 1000:7.2f} мс")
+    print(f"  запись пачкой в потоке: {ledger.stats['last_flush_ms']:.1f} мс, "
+          f"задержка цикла событий во время записи до {max(lag) * 1000:.2f} мс")
+    print(f"  ✅ {changes_per_flush:,.0f} изменений стопов -> {args.trades} строк за запись, "
+          f"в БД последние значения")
+
+    # Закрытие по стопу: сделка уходит из открытых, в БД CLOSED после записи
+    symbol = 'PAIR0/USDT'
+    position = manager.positions[symbol]
+    manager._apply_price(position, position.stop_loss - 1)
+    await manager._check_stop_loss_take_profit([symbol])
+    assert ledger.by_symbol(symbol) is None and ledger.pending == 1
+    await ledger.flush()
+
+    # Новая сделка от движка исполнения
+    from src.exchange import execution_engine as engine_module
+    from src.exchange.execution_engine import ExecutionRequest, ExecutionResult, ExecutionStatus
+    engine_module.get_position_ledger = lambda: ledger
+
+    class Signal:
+        symbol, action, stop_loss, take_profit = 'NEW/USDT', 'BUY', 95.0, 110.0
+
+    request = ExecutionRequest(signal=Signal, strategy_name='bench', confidence=0.9,
+                               market_conditions={}, risk_params={}, quantity=2.0)
+    engine = engine_module.OrderExecutionEngine()
+    await engine._save_trade_to_db(ExecutionResult(
+        request=request, status=ExecutionStatus.COMPLETED, order_id='42',
+        executed_price=100.0, executed_quantity=2.0))
+    new_trade = ledger.by_symbol('NEW/USDT')
+    assert new_trade is not None and new_trade.id is None
+
+    # Ошибка записи: изменения не теряются, повтор записывает
+    ledger.update(new_trade, stop_loss=96.0)
+    factory = ledger.session_factory
+
+    def broken():
+        raise RuntimeError('db down')
+    ledger.session_factory = broken
+    assert await ledger.flush() == 0 and ledger.pending == 1
+    ledger.session_factory = factory
+    await ledger.stop()
+    assert new_trade.id is not None and ledger.pending == 0
+
+    reloaded = PositionLedger()
+    await reloaded.ensure_loaded()
+    assert reloaded.by_symbol(symbol) is None
+    assert reloaded.by_symbol('NEW/USDT').stop_loss == 96.0
+    assert reloaded.by_symbol('NEW/USDT').id == new_trade.id
+    assert len(reloaded.open_trades()) == args.trades
+    session = SessionLocal()
+    try:
+        closed = session.query(Trade).filter(Trade.symbol == symbol).one()
+        assert closed.status == TradeStatus.CLOSED.value and closed.close_price is not None
+    finally:
+        session.close()
+    print(f"  ✅ закрытие по стопу, новая сделка (id {new_trade.id} после записи), "
+          f"ошибка записи ({ledger.stats['flush_errors']}) и повтор, загрузка заново")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trades', type=int, default=200)
+    parser.add_argument('--ticks', type=int, default=50)
+    parser.add_argument('--cycles', type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк предторговых проверок (src/exchange/pretrade_checks.py)
+Файл: benchmarks/bench_pretrade_checks.py
+
+OrderExecutionEngine.execute_signal с компонентами-заглушками:
+- риск-менеджер: validate_signal и calculate_position_size (синхронные,
+  с задержкой расчета)
+- биржа: fetch_order_book с задержкой сети, create_order фиксирует момент
+- PositionManager: открытые позиции в памяти
+
+Задержка сигнал -> ордер:
+- прежний порядок: проверки одна за другой (сумма)
+- PreTradeStage: одновременно (самая медленная), повтор того же сигнала
+  в том же баре из кэша, ранний отказ, дедлайн зависшего стакана
+
+Решения (отказ и причина, размер позиции) совпадают с прежним порядком.
+
+Запуск:
+    python benchmarks/bench_pretrade_checks.py --validate-ms 40 --sizing-ms 30 --book-ms 80
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_pretrade_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+
+from src.exchange.execution_engine import OrderExecutionEngine, ExecutionStatus
+from src.exchange.real_client import OrderResult
+
+
+@dataclass
+class Signal:
+    symbol: str
+    action: str
+    confidence: float
+    price: float = 100.0
+
+
+@dataclass
+class Position:
+    symbol: str
+
+
+class RiskManager:
+    def __init__(self, validate_delay, sizing_delay):
+        self.validate_delay = validate_delay
+        self.sizing_delay = sizing_delay
+        self.calls = 0
+
+    def validate_signal(self, signal, market_conditions):
+        self.calls += 1
+        time.sleep(self.validate_delay)
+        if signal.symbol.startswith('RISKY'):
+            return {'approved': False, 'reason': 'volatility limit'}
+        return {'approved': True}
+
+    def calculate_position_size(self, signal, market_conditions):
+        self.calls += 1
+        time.sleep(self.sizing_delay)
+        return {'position_size': 0.5 if not signal.symbol.startswith('BIG') else 50.0,
+                'expected_slippage': 0.001}
+
+
+class Exchange:
+    def __init__(self, book_delay):
+        self.book_delay = book_delay
+        self.hang = set()
+        self.order_times = []
+
+    async def fetch_order_book(self, symbol):
+        await asyncio.sleep(60 if symbol in self.hang else self.book_delay)
+        levels = [[100.0 + i, 2.0] for i in range(5)]
+        return {'bids': levels, 'asks': levels}
+
+    async def create_order(self, symbol, order_type, side, amount, price=None):
+        self.order_times.append(time.perf_counter())
+        return OrderResult(success=True, order_id=str(len(self.order_times)),
+                           filled_quantity=amount, average_price=100.0)
+
+
+class PositionManager:
+    def __init__(self, symbols):
+        self.positions = {s: Position(s) for s in symbols}
+
+
+def make_engine(args):
+    engine = OrderExecutionEngine()
+    engine.exchange = Exchange(args.book_ms / 1000)
+    engine.risk_manager = RiskManager(args.validate_ms / 1000, args.sizing_ms / 1000)
+    engine.position_manager = PositionManager(['HELD/USDT'])
+
+    async def skip_db(result):
+        pass
+    engine._save_trade_to_db = skip_db     # запись в БД - после ордера, вне замера
+    return engine
+
+
+async def legacy_decision(engine, signal, market_conditions):
+    """Прежний порядок: проверки одна за другой"""
+    validation = await engine._validate_signal(signal, market_conditions)
+    if not validation['valid']:
+        return 'rejected', validation['reason'], None
+    validation = await engine._validate_with_risk_manager(signal, market_conditions)
+    if not validation['valid']:
+        return 'rejected', validation['reason'], None
+    correlation = await engine._check_position_correlation(signal)
+    if correlation['high_correlation']:
+        return 'rejected', f"High correlation with existing positions: {correlation['correlation']}", None
+    params = await engine._calculate_risk_parameters(signal, market_conditions)
+    liquidity = await engine._fetch_liquidity(signal)
+    if not liquidity['sufficient']:
+        return 'rejected', liquidity['reason'], params['position_size']
+
+    class Request:
+        quantity = params['position_size']
+    check = engine._check_liquidity(Request, liquidity)
+    if not check['sufficient']:
+        return 'rejected', f"Insufficient liquidity: {check['reason']}", params['position_size']
+    return 'completed', None, params['position_size']
+
+
+def live_conditions(symbol, bar_open_ms):
+    """market_conditions в форме TradingBotWithRealTrading._analyze_market_for_symbol"""
+    candles = [{'timestamp': bar_open_ms - 300_000 * k, 'open': 100.0, 'high': 101.0,
+                'low': 99.0, 'close': 100.0, 'volume': 10.0} for k in range(199, -1, -1)]
+    return {
+        'symbol': symbol,
+        'current_price': 100.0,
+        'candles': candles,
+        'timestamp': datetime.utcnow()
+    }
+
+
+async def timed_signal(engine, signal, market_conditions):
+    """Время от сигнала до create_order (или до отказа)"""
+    before = len(engine.exchange.order_times)
+    started = time.perf_counter()
+    result = await engine.execute_signal(signal, 'bench', market_conditions)
+    placed = engine.exchange.order_times[before] if len(engine.exchange.order_times) > before else time.perf_counter()
+    return result, placed - started
+
+
+async def main_async(args):
+    engine = make_engine(args)
+    signals = [Signal(f'PAIR{i}/USDT', 'BUY', 0.8) for i in range(args.signals)]
+    signals += [Signal('RISKY/USDT', 'BUY', 0.9), Signal('HELD/USDT', 'BUY', 0.9),
+                Signal('LOW/USDT', 'BUY', 0.3), Signal('BIG/USDT', 'SELL', 0.9)]
+
+    # Решения совпадают с прежним порядком
+    for i, signal in enumerate(signals):
+        conditions = {'bar_timestamp': 1000 + i}
+        status, reason, size = await legacy_decision(engine, signal, conditions)
+        result = await engine.execute_signal(signal, 'bench', {'bar_timestamp': 2000 + i})
+        assert result.status.value == status, (signal, result.status, status)
+        assert result.error_message == reason, (result.error_message, reason)
+        if size is not None:
+            assert result.request.quantity == size
+    print(f"  ✅ решения {len(signals)} сигналов совпадают с прежним порядком "
+          f"(отказы риск-менеджера, корреляции, уверенности, ликвидности)")
+
+    print(f"Задержки: validate {args.validate_ms:.0f} мс, sizing {args.sizing_ms:.0f} мс, "
+          f"стакан {args.book_ms:.0f} мс")
+    legacy, staged = [], []
+    for i, signal in enumerate(signals[:args.signals]):
+        conditions = {'bar_timestamp': 5000 + i}
+        started = time.perf_counter()
+        await legacy_decision(engine, signal, conditions)
+        legacy.append(time.perf_counter() - started)
+        result, latency = await timed_signal(engine, signal, conditions)
+        assert result.status == ExecutionStatus.COMPLETED
+        staged.append(latency)
+
+    print(f"  прежний порядок:        {statistics.median(legacy) * 1000:6.1f} мс (медиана)")
+    print(f"  PreTradeStage:          {statistics.median(staged) * 1000:6.1f} мс")
+
+    # Повторные сигналы в том же баре (отказ по ликвидности - сделки нет, кэш жив)
+    engine.risk_manager.calls = 0
+    for _ in range(5):
+        result = await engine.execute_signal(Signal('BIG/USDT', 'SELL', 0.9), 'bench', {'bar_timestamp': 9000})
+        assert result.status == ExecutionStatus.REJECTED
+    print(f"  5 сигналов в одном баре: вызовов риск-менеджера {engine.risk_manager.calls} вместо 10 "
+          f"(кэш бара)")
+    assert engine.risk_manager.calls == 2
+
+    # Тот же бар, другая уверенность - вердикт и размер считаются заново
+    await engine.execute_signal(Signal('BIG/USDT', 'SELL', 0.95), 'bench', {'bar_timestamp': 9000})
+    assert engine.risk_manager.calls == 4
+    # Ордер по любому символу сбрасывает весь кэш (баланс изменился)
+    result = await engine.execute_signal(Signal('PAIR0/USDT', 'BUY', 0.8), 'bench', {'bar_timestamp': 9000})
+    assert result.status == ExecutionStatus.COMPLETED
+    assert engine.pretrade.get_stats()['cache_entries'] == 0
+    print("  ✅ другая уверенность в том же баре - пересчет; ордер сбрасывает кэш всех символов")
+
+    # Условия как в боевом цикле: timestamp анализа новый каждый раз, бар - по последней свече
+    engine.risk_manager.calls = 0
+    for _ in range(5):
+        result = await engine.execute_signal(Signal('BIG/USDT', 'SELL', 0.9), 'bench',
+                                             live_conditions('BIG/USDT', 1_700_000_000_000))
+        assert result.status == ExecutionStatus.REJECTED
+    assert engine.risk_manager.calls == 2, engine.risk_manager.calls
+    await engine.execute_signal(Signal('BIG/USDT', 'SELL', 0.9), 'bench',
+                                live_conditions('BIG/USDT', 1_700_000_300_000))
+    assert engine.risk_manager.calls == 4, engine.risk_manager.calls
+    print("  ✅ боевые market_conditions: 5 анализов одного бара - 2 вызова риск-менеджера, новая свеча - пересчет")
+
+    # Ранний отказ: корреляция отвечает сразу, стакан и риск-менеджер не ждем
+    _, reject_latency = await timed_signal(engine, Signal('HELD/USDT', 'BUY', 0.9), {'bar_timestamp': 9001})
+    assert reject_latency < args.sizing_ms / 1000, reject_latency
+    print(f"  ранний отказ:           {reject_latency * 1000:6.1f} мс (остальные проверки отменены)")
+
+    # Дедлайн: зависший стакан не задерживает решение дольше дедлайна
+    engine.exchange.hang.add('SLOW/USDT')
+    result, latency = await timed_signal(engine, Signal('SLOW/USDT', 'BUY', 0.9), {'bar_timestamp': 9002})
+    assert result.status == ExecutionStatus.COMPLETED and latency < 1.5
+    stats = engine.get_execution_stats()['pretrade']
+    print(f"  зависший стакан:        {latency * 1000:6.1f} мс (дедлайн, проверка пропускает как при ошибке)")
+    print(f"  ✅ статистика стадии: запусков {stats['runs']}, отказов {stats['rejected']}, "
+          f"дедлайнов {stats['timeouts']}, отменено {stats['cancelled']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--validate-ms', type=float, default=40)
+    parser.add_argument('--sizing-ms', type=float, default=30)
+    parser.add_argument('--book-ms', type=float, default=80)
+    parser.add_argument('--signals', type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
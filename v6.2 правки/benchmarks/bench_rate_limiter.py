@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк общего планировщика лимитов (src/exchange/rate_limiter.py)
+Файл: benchmarks/bench_rate_limiter.py
+
+Офлайн: биржа-симулятор считает запросы в скользящих окнах с лимитами
+Bybit (IP 600/5 с, ордера 10/с на UID) и отвечает 429 при превышении.
+
+Нагрузка: несколько клиентов одновременно, каждый - чтения рыночных
+данных и ордера вперемешку; затем всплеск ордеров (закрытие всего)
+сразу из всех клиентов.
+- прежний темп: троттлинг ccxt в каждом экземпляре (rateLimit 100 мс),
+  клиенты друг о друге не знают
+- RateLimitScheduler: один на все клиенты, ордера в приоритетной полосе
+
+Запуск:
+    python benchmarks/bench_rate_limiter.py --clients 3 --reads 100 --orders 10
+"""
+import sys
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+from collections import Counter, deque
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from src.exchange.rate_limiter import RateLimitScheduler, RateLimitedExchange
+
+LATENCY = 0.02
+
+
+class TooManyRequests(Exception):
+    pass
+
+
+class LimitedExchange:
+    """Async биржа со скользящими окнами лимитов Bybit"""
+
+    LIMITS = {'ip': (600, 5.0), 'order': (10, 1.0)}
+
+    def __init__(self):
+        self.windows = {name: deque() for name in self.LIMITS}
+        self.calls = Counter()
+        self.rejected = 0
+
+    def _hit(self, name):
+        limit, window = self.LIMITS[name]
+        now = time.monotonic()
+        hits = self.windows[name]
+        while hits and now - hits[0] > window:
+            hits.popleft()
+        if len(hits) >= limit:
+            self.rejected += 1
+            raise TooManyRequests(name)
+        hits.append(now)
+
+    async def fetch_ticker(self, symbol):
+        self._hit('ip')
+        self.calls['fetch_ticker'] += 1
+        await asyncio.sleep(LATENCY)
+        return {'symbol': symbol, 'last': 1.0}
+
+    async def create_order(self, symbol, type, side, amount):
+        self._hit('ip')
+        self._hit('order')
+        self.calls['create_order'] += 1
+        await asyncio.sleep(LATENCY)
+        return {'id': str(self.calls['create_order'])}
+
+
+class CcxtThrottled:
+    """Прежнее поведение: свой троттлинг ccxt у каждого экземпляра клиента"""
+
+    def __init__(self, exchange, rate_limit_ms=100):
+        self.exchange = exchange
+        self.interval = rate_limit_ms / 1000
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self.exchange, name)
+
+        async def _throttled(*args, **kwargs):
+            async with self._lock:
+                delay = self._next - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self._next = time.monotonic() + self.interval
+            return await method(*args, **kwargs)
+        return _throttled
+
+
+async def client_workload(client, n_reads, n_orders, order_waits):
+    """Чтения данных и ордера вперемешку; ордер - каждые n_reads // n_orders чтений"""
+    step = max(1, n_reads // n_orders)
+    tasks = []
+
+    async def read(i):
+        try:
+            await client.fetch_ticker(f'PAIR{i}/USDT')
+        except TooManyRequests:
+            return 1
+        return 0
+
+    async def order():
+        started = time.perf_counter()
+        try:
+            await client.create_order('BTC/USDT', 'market', 'buy', 0.001)
+        except TooManyRequests:
+            return 1
+        order_waits.append(time.perf_counter() - started - LATENCY)
+        return 0
+
+    for i in range(n_reads):
+        tasks.append(asyncio.create_task(read(i)))
+        if i % step == step - 1 and len(tasks) - i - 1 < n_orders:
+            tasks.append(asyncio.create_task(order()))
+        await asyncio.sleep(0)
+    return sum(await asyncio.gather(*tasks))
+
+
+async def order_burst(client, n_orders, order_waits):
+    """Все ордера клиента сразу"""
+    async def order():
+        started = time.perf_counter()
+        try:
+            await client.create_order('BTC/USDT', 'market', 'sell', 0.001)
+        except TooManyRequests:
+            return 1
+        order_waits.append(time.perf_counter() - started - LATENCY)
+        return 0
+
+    return sum(await asyncio.gather(*(order() for _ in range(n_orders))))
+
+
+async def run(mode, n_clients, n_reads, n_orders, burst=False):
+    exchange = LimitedExchange()
+    limiter = RateLimitScheduler()
+    if mode == 'ccxt':
+        clients = [CcxtThrottled(exchange) for _ in range(n_clients)]
+    else:
+        clients = [RateLimitedExchange(exchange, limiter) for _ in range(n_clients)]
+
+    order_waits = []
+    start = time.perf_counter()
+    if burst:
+        workloads = [order_burst(c, n_orders, order_waits) for c in clients]
+    else:
+        workloads = [client_workload(c, n_reads, n_orders, order_waits) for c in clients]
+    errors = sum(await asyncio.gather(*workloads))
+    elapsed = time.perf_counter() - start
+    return elapsed, errors, exchange, order_waits, limiter.get_stats()
+
+
+async def main_async(n_clients, n_reads, n_orders):
+    total = n_clients * (n_reads + n_orders)
+    print(f"Клиентов: {n_clients}, на клиента: {n_reads} чтений + {n_orders} ордеров "
+          f"(всего {total} запросов)")
+
+    for mode, name in (('ccxt', 'троттлинг ccxt на клиента'), ('scheduler', 'RateLimitScheduler')):
+        elapsed, errors, exchange, waits, stats = await run(mode, n_clients, n_reads, n_orders)
+        done = sum(exchange.calls.values())
+        order_wait = f"{statistics.median(waits) * 1000:7.1f} мс" if waits else "      -"
+        print(f"  {name:28s} {elapsed:6.2f} с | {done / elapsed:6.1f} запр/с | 429: {errors:3d} | "
+              f"ожидание ордера (медиана): {order_wait}")
+        if mode == 'scheduler':
+            assert errors == 0 and done == total
+            print(f"    использование лимита IP за окно: {stats['ip_usage']:.0%}, "
+                  f"ордера: {stats['group_usage']['order']:.0%}, "
+                  f"в очереди было: {stats['queued']}, max ожидание {stats['max_wait_seconds']:.2f} с")
+
+    print(f"Всплеск: {n_clients} клиентов x {n_orders} ордеров сразу")
+    for mode, name in (('ccxt', 'троттлинг ccxt на клиента'), ('scheduler', 'RateLimitScheduler')):
+        elapsed, errors, exchange, waits, stats = await run(mode, n_clients, 0, n_orders, burst=True)
+        print(f"  {name:28s} {elapsed:6.2f} с | исполнено {exchange.calls['create_order']:3d} | 429: {errors:3d}")
+        if mode == 'scheduler':
+            assert errors == 0
+
+    # Приоритет: ордер при полной очереди данных выходит раньше нее
+    limiter = RateLimitScheduler(ip_limit=50, ip_window=1.0, order_reserve=2)
+    exchange = LimitedExchange()
+    client = RateLimitedExchange(exchange, limiter)
+    reads = [asyncio.create_task(client.fetch_ticker(f'P{i}')) for i in range(200)]
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await client.create_order('BTC/USDT', 'market', 'buy', 0.001)
+    order_wait = time.perf_counter() - started - LATENCY
+    pending = sum(1 for t in reads if not t.done())
+    await asyncio.gather(*reads)
+    assert pending > 100, pending
+    print(f"  ✅ приоритет: ордер за {order_wait * 1000:.1f} мс при {pending} чтениях в очереди")
+
+    # Другой event loop (поток веб-запросов) не сбрасывает очередь бота
+    limiter = RateLimitScheduler(group_limits={'order': (2, 1.0)})
+    exchange = LimitedExchange()
+    client = RateLimitedExchange(exchange, limiter)
+    orders = [asyncio.create_task(client.create_order('BTC/USDT', 'market', 'buy', 0.001))
+              for _ in range(8)]
+    await asyncio.sleep(0.05)
+    web = threading.Thread(target=lambda: asyncio.run(client.fetch_ticker('BTC/USDT')))
+    web.start()
+    await asyncio.wait_for(asyncio.gather(*orders), timeout=30)
+    await asyncio.to_thread(web.join)
+    assert exchange.calls == {'create_order': 8, 'fetch_ticker': 1}, exchange.calls
+    print(f"  ✅ запрос из другого event loop: исполнены все {len(orders)} ордеров из очереди")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=3)
+    parser.add_argument('--reads', type=int, default=100)
+    parser.add_argument('--orders', type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.clients, args.reads, args.orders))
+
+
+if __name__ == '__main__':
+    main()
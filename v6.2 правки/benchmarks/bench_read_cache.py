@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк кэша чтений с биржи (src/exchange/read_cache.py)
+Файл: benchmarks/bench_read_cache.py
+
+Один торговый цикл на N символов, как в боте:
+- анализ рынка: тикер каждого символа
+- PositionManager: тикеры символов с позициями
+- проверка цены перед ордером (_get_current_price) для части символов
+- WebSocket рассылка и API: баланс дважды, одновременно
+
+Сравнивает число запросов к бирже и время цикла без кэша (TTL 0,
+объединяются только одновременные запросы) и с кэшем. Проверяет, что
+ответы совпадают, TTL, invalidate, fetch_tickers одним запросом и
+передачу ошибки всем ожидающим.
+
+Запуск:
+    python benchmarks/bench_read_cache.py --symbols 20 --latency-ms 50
+"""
+import sys
+import time
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from src.exchange.client import RealExchangeClient
+from src.exchange.read_cache import ExchangeReadCache
+
+
+class StubExchange:
+    """Синхронный ccxt с задержкой сети и счетчиком запросов"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        time.sleep(self.latency)
+
+    def fetch_time(self):
+        return int(time.time() * 1000)
+
+    def fetch_balance(self):
+        self._count('fetch_balance')
+        return {'USDT': {'free': 1000.0, 'used': 0.0, 'total': 1000.0}}
+
+    def fetch_ticker(self, symbol):
+        self._count('fetch_ticker')
+        return {'symbol': symbol, 'last': 100.0 + len(symbol)}
+
+    def fetch_tickers(self, symbols):
+        self._count('fetch_tickers')
+        return {s: {'symbol': s, 'last': 100.0 + len(s)} for s in symbols}
+
+
+async def trading_cycle(client, symbols):
+    """Чтения одного цикла из разных компонентов, одновременно"""
+    positions = symbols[::3]
+    orders = symbols[::5]
+    results = await asyncio.gather(
+        *(client.fetch_ticker(s) for s in symbols),            # анализ рынка
+        client.fetch_tickers(positions),                        # PositionManager
+        *(client._get_current_price(s) for s in orders),        # проверка цены ордера
+        client.fetch_balance(), client.fetch_balance()          # рассылка и API баланса
+    )
+    analysis = results[:len(symbols)]
+    return {t['symbol']: t['last'] for t in analysis}, results[len(symbols)]
+
+
+async def run_cycles(latency, symbols, cycles, ttls):
+    exchange = StubExchange(latency)
+    client = RealExchangeClient(exchange=exchange)
+    exchange.calls.clear()
+    client.reads = ExchangeReadCache(client.io, ttls=ttls)
+
+    start = time.perf_counter()
+    prices = None
+    for _ in range(cycles):
+        prices, _ = await trading_cycle(client, symbols)
+    elapsed = time.perf_counter() - start
+    await client.disconnect()
+    return prices, exchange.calls, elapsed, client.reads.get_stats()
+
+
+async def check_semantics():
+    """TTL, invalidate, bulk, ошибки"""
+    calls = Counter()
+
+    class Backend:
+        fail = False
+
+        async def fetch_ticker(self, symbol):
+            calls['ticker'] += 1
+            await asyncio.sleep(0.01)
+            if self.fail:
+                raise ConnectionError('биржа недоступна')
+            return {'last': 1.0}
+
+        async def fetch_tickers(self, symbols):
+            calls['tickers'] += 1
+            await asyncio.sleep(0.01)
+            return {s: {'last': 2.0} for s in symbols if s != 'MISSING'}
+
+        async def fetch_balance(self):
+            calls['balance'] += 1
+            return {'USDT': {'free': 1.0}}
+
+    backend = Backend()
+    cache = ExchangeReadCache(backend, ttls={'ticker': 0.05, 'balance': 60})
+
+    await asyncio.gather(*(cache.fetch_ticker('A') for _ in range(10)))
+    assert calls['ticker'] == 1
+    await cache.fetch_ticker('A')
+    assert calls['ticker'] == 1
+    await asyncio.sleep(0.06)
+    await cache.fetch_ticker('A')
+    assert calls['ticker'] == 2, 'TTL истек - новый запрос'
+
+    await cache.fetch_balance()
+    cache.invalidate('balance')
+    await cache.fetch_balance()
+    assert calls['balance'] == 2
+
+    # Одновременные fetch_ticker присоединяются к bulk запросу
+    bulk, single = await asyncio.gather(cache.fetch_tickers(['B', 'C', 'MISSING']), cache.fetch_ticker('B'))
+    assert calls['tickers'] == 1 and set(bulk) == {'B', 'C'} and single['last'] == 2.0
+    assert calls['ticker'] == 2
+
+    backend.fail = True
+    results = await asyncio.gather(*(cache.fetch_ticker('D') for _ in range(5)), return_exceptions=True)
+    assert all(isinstance(r, ConnectionError) for r in results) and calls['ticker'] == 3
+    backend.fail = False
+    assert (await cache.fetch_ticker('D'))['last'] == 1.0, 'ошибка не кэшируется'
+    print("  ✅ TTL, invalidate, bulk + одиночные запросы, ошибка всем ожидающим и не кэшируется")
+
+
+async def main_async(n_symbols, latency, cycles):
+    symbols = [f'PAIR{i}/USDT' for i in range(n_symbols)]
+    print(f"Символов: {n_symbols}, циклов: {cycles} подряд, задержка биржи: {latency * 1000:.0f} мс")
+
+    no_cache = {'ticker': 0, 'balance': 0, 'order_book': 0}
+    base_prices, base_calls, base_time, _ = await run_cycles(latency, symbols, cycles, no_cache)
+    prices, calls, cached_time, stats = await run_cycles(latency, symbols, cycles, None)
+    assert prices == base_prices
+
+    print(f"  без кэша (TTL 0):  запросов {sum(base_calls.values()):4d} {dict(base_calls)}, {base_time * 1000:7.1f} мс")
+    print(f"  кэш чтений:        запросов {sum(calls.values()):4d} {dict(calls)}, {cached_time * 1000:7.1f} мс")
+    for endpoint, counters in stats['endpoints'].items():
+        print(f"    {endpoint:8s} hits {counters['hits']:3d}  misses {counters['misses']:3d}  "
+              f"coalesced {counters['coalesced']:3d}  requests {counters['requests']:3d}  "
+              f"hit_rate {counters['hit_rate']:.0%}")
+    await check_semantics()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--cycles', type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.symbols, args.latency_ms / 1000, args.cycles))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк батча RL сред (src/ml/models/rl_environment.py)
+Файл: benchmarks/bench_rl_environment.py
+
+Синтетические OHLCV 5m с rsi/macd, цена ~30000 при балансе 10000 -
+в эпизодах со случайными действиями есть просадки и банкротства:
+- эквивалентность: --envs эпизодов TradingEnvironment и
+  VectorizedTradingEnvironment с одними действиями - состояния, награды,
+  завершение и балансы на каждом шаге
+- время эпизода: TradingEnvironment (окно .iloc и статистика pandas на
+  каждом шаге) против батча --envs эпизодов
+- обучение ReinforcementTradingAgent (DQN и PPO): прежний цикл по одному
+  эпизоду против train_on_history батчами (только если установлен torch)
+
+Запуск:
+    python benchmarks/bench_rl_environment.py --bars 2000 --envs 16 --episodes 32
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_rl_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+os.environ.setdefault('MODEL_REGISTRY_DIR', f"{TMP_DIR}/registry")
+os.environ.setdefault('ENABLE_HUMAN_MODE', 'false')
+
+from src.ml.models.rl_environment import TradingEnvironment, VectorizedTradingEnvironment
+
+
+def make_ohlcv(bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    spread = np.abs(rng.normal(0, 0.005, bars)) * close
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.uniform(100, 1000, bars),
+        'rsi': rng.uniform(0, 100, bars),
+        'macd': rng.normal(0, 50, bars)
+    }, index=pd.date_range('2024-01-01', periods=bars, freq='5min'))
+
+
+def check_equivalence(data, n_envs, seed=1):
+    """Шаги батча и отдельных сред с одними действиями: (шагов, max расхождение состояний, банкротств)"""
+    rng = np.random.default_rng(seed)
+    vectorized = VectorizedTradingEnvironment(data, n_envs)
+    legacy = [TradingEnvironment(data) for _ in range(n_envs)]
+    states = vectorized.reset()
+    legacy_states = np.stack([env.reset() for env in legacy])
+    max_diff = np.abs(states - legacy_states).max()
+    steps = 0
+
+    while not vectorized.done.all():
+        actions = rng.integers(0, 3, n_envs)
+        states, rewards, dones, _ = vectorized.step(actions)
+        results = [env.step(int(action)) for env, action in zip(legacy, actions)]
+        legacy_states = np.stack([r[0] for r in results])
+        assert np.isfinite(states).all()
+        assert np.array_equal(dones, [r[2] for r in results]), steps
+        assert np.allclose(rewards, [r[1] for r in results], rtol=1e-9, atol=1e-9), steps
+        max_diff = max(max_diff, np.abs(states - legacy_states).max())
+        steps += 1
+
+    assert np.allclose(vectorized.balance, [env.balance for env in legacy], rtol=1e-12)
+    assert max_diff < 1e-4, max_diff
+    bankrupt = int(np.sum(vectorized.balance <= vectorized.initial_balance * 0.5))
+    return steps, max_diff, bankrupt
+
+
+def time_legacy_episodes(data, episodes, seed=2):
+    rng = np.random.default_rng(seed)
+    env = TradingEnvironment(data)
+    started = time.perf_counter()
+    for _ in range(episodes):
+        env.reset()
+        while not env.done:
+            env.step(int(rng.integers(0, 3)))
+    return (time.perf_counter() - started) / episodes
+
+
+def time_vectorized_episodes(data, n_envs, seed=2):
+    """Время эпизода в батче n_envs, включая расчет таблицы состояний"""
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    env = VectorizedTradingEnvironment(data, n_envs)
+    env.reset()
+    while not env.done.all():
+        env.step(rng.integers(0, 3, n_envs))
+    return (time.perf_counter() - started) / n_envs
+
+
+def legacy_train_on_history(agent, data, episodes):
+    """Прежний train_on_history: один эпизод, одно действие и один replay/переход за раз"""
+    env = TradingEnvironment(data)
+    for episode in range(episodes):
+        state = env.reset()
+        trajectories = []
+        while not env.done:
+            action = agent.act(state, training=True)
+            next_state, reward, done, _ = env.step(action)
+            if agent.algorithm == 'DQN':
+                agent.remember(state, action, reward, next_state, done)
+                if len(agent.memory) > agent.batch_size:
+                    agent.replay()
+            else:
+                trajectories.append({'state': state, 'action': action, 'reward': reward,
+                                     'next_state': next_state, 'done': done})
+            state = next_state
+        if agent.algorithm == 'PPO':
+            agent.train_ppo(trajectories)
+        if agent.algorithm == 'DQN' and episode % 10 == 0:
+            agent.update_target_network()
+
+
+def bench_agents(data, args):
+    try:
+        from src.ml.models.reinforcement import ReinforcementTradingAgent
+    except ImportError as e:
+        print(f"Обучение агента пропущено: {e} (нужен torch)")
+        return
+
+    import torch
+    torch.manual_seed(0)
+    random.seed(0)
+    np.random.seed(0)
+    for algorithm in ('DQN', 'PPO'):
+        legacy = ReinforcementTradingAgent(algorithm=algorithm)
+        started = time.perf_counter()
+        legacy_train_on_history(legacy, data, args.legacy_episodes)
+        legacy_s = (time.perf_counter() - started) / args.legacy_episodes
+
+        agent = ReinforcementTradingAgent(algorithm=algorithm)
+        started = time.perf_counter()
+        agent.train_on_history(data, episodes=args.episodes, n_envs=args.envs)
+        batched_s = (time.perf_counter() - started) / args.episodes
+
+        metrics = agent.get_performance_metrics()
+        assert metrics['total_episodes'] == args.episodes
+        network = agent.q_network if algorithm == 'DQN' else agent.actor
+        assert all(torch.isfinite(p).all() for p in network.parameters())  # NaN первого шага не попал в сеть
+        print(f"{algorithm}: прежний цикл {legacy_s * 1000:8.0f} мс на эпизод, "
+              f"батч {args.envs} эпизодов {batched_s * 1000:8.0f} мс на эпизод - "
+              f"в {legacy_s / batched_s:.0f} раз быстрее; "
+              f"✅ средняя награда {metrics['avg_reward']:.2f}, веса сети конечны")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bars', type=int, default=2000)
+    parser.add_argument('--envs', type=int, default=16)
+    parser.add_argument('--episodes', type=int, default=32)
+    parser.add_argument('--legacy-episodes', type=int, default=2)
+    args = parser.parse_args()
+
+    data = make_ohlcv(args.bars)
+    print(f"Баров {args.bars}, эпизодов в батче {args.envs}")
+
+    # === Эквивалентность ===
+    steps, max_diff, bankrupt = check_equivalence(data, args.envs)
+    print(f"  ✅ {steps} шагов x {args.envs} эпизодов: награды, завершение и балансы совпадают, "
+          f"расхождение состояний до {max_diff:.1e} (float32); банкротств {bankrupt}")
+
+    # === Время эпизода ===
+    legacy_s = time_legacy_episodes(data, args.legacy_episodes)
+    batched_s = time_vectorized_episodes(data, args.envs)
+    print(f"  TradingEnvironment:           {legacy_s * 1000:9.2f} мс на эпизод")
+    print(f"  VectorizedTradingEnvironment: {batched_s * 1000:9.2f} мс на эпизод - "
+          f"в {legacy_s / batched_s:.0f} раз быстрее")
+
+    # === Обучение агента ===
+    bench_agents(data, args)
+
+
+if __name__ == '__main__':
+    main()
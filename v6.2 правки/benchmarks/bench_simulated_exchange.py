@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк симулятора биржи (src/exchange/simulated_exchange.py)
+Файл: benchmarks/bench_simulated_exchange.py
+
+Офлайн, без testnet:
+- матчинг: пропускная способность create_order / cancel_order без задержки
+- правила: приоритет цены и времени, место в очереди при обновлении
+  стакана, исполнение лимитного ордера свечой, комиссии, reduce-only,
+  InsufficientFunds, повтор clientOrderId
+- путь исполнения: RealExchangeClient.connect('simulated') -> OrderTracker,
+  одновременные рыночные ордера с задержкой сети - ордеров в секунду и
+  задержка исполнения (p50/p99); проскальзывание от размера ордера
+- воспроизведение: свечи с синтетическим стаканом и лимитные ордера стратегии
+
+Запуск:
+    python benchmarks/bench_simulated_exchange.py --orders 50000 --concurrent 2000 --in-flight 200 --latency-ms 20
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_simex_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+os.environ.setdefault('ENABLE_HUMAN_MODE', 'false')
+os.environ.setdefault('ENABLE_MARKET_STREAM', 'false')
+
+import ccxt
+
+from src.exchange import simulated_exchange as simulated
+from src.exchange.simulated_exchange import SimulatedExchange
+from src.exchange.real_client import RealExchangeClient
+
+SYMBOL = 'BTC/USDT'
+
+
+def random_walk(n, start=60000.0, seed=7, timeframe_ms=300_000):
+    """Свечи [ts, o, h, l, c, v] со случайным блужданием"""
+    rng = random.Random(seed)
+    candles, price = [], start
+    for i in range(n):
+        close = price * (1 + rng.gauss(0, 0.002))
+        high = max(price, close) * (1 + abs(rng.gauss(0, 0.001)))
+        low = min(price, close) * (1 - abs(rng.gauss(0, 0.001)))
+        candles.append([1_700_000_000_000 + i * timeframe_ms, price, high, low, close, rng.uniform(50, 150)])
+        price = close
+    return candles
+
+
+def book_snapshot(timestamp, mid, levels=50, size=5.0, tick=0.1):
+    return {
+        'timestamp': timestamp,
+        'bids': [[round(mid - tick * (i + 1), 1), size] for i in range(levels)],
+        'asks': [[round(mid + tick * (i + 1), 1), size] for i in range(levels)]
+    }
+
+
+def check_rules():
+    """Правила матчинга и учета"""
+    async def run():
+        ex = SimulatedExchange(balances={'USDT': 1_000_000.0}, latency=0.0, maker_fee=0.0002, taker_fee=0.0005)
+        ex.add_market(SYMBOL, tick_size=0.1, step_size=0.001)
+        ex.load_order_books(SYMBOL, [book_snapshot(1000, 60000.0), book_snapshot(2000, 60000.0, size=3.0)])
+        ex.step()
+
+        # Приоритет времени на одном уровне: первый поставленный исполняется первым
+        first = await ex.create_order(SYMBOL, 'limit', 'sell', 1.0, 60000.0)
+        second = await ex.create_order(SYMBOL, 'limit', 'sell', 1.0, 60000.0)
+        assert first['status'] == second['status'] == 'open'
+        taker = await ex.create_order(SYMBOL, 'limit', 'buy', 1.5, 60000.0)
+        assert taker['filled'] == 1.5 and taker['average'] == 60000.0
+        assert (await ex.fetch_order(first['id']))['status'] == 'closed'
+        assert (await ex.fetch_order(second['id']))['remaining'] == 0.5
+        await ex.cancel_order(second['id'])
+
+        # Место в очереди: внешний уровень 59999.9 обновился (5 -> 3), ордер за ним остается вторым
+        queued = await ex.create_order(SYMBOL, 'limit', 'buy', 1.0, 59999.9)
+        ex.step()
+        sell = await ex.create_order(SYMBOL, 'market', 'sell', 3.5)
+        assert sell['filled'] == 3.5 and (await ex.fetch_order(queued['id']))['filled'] == 0.5
+
+        # Комиссия: taker-покупка уменьшает USDT на стоимость + комиссию
+        before = ex.balances['USDT']
+        buy = await ex.create_order(SYMBOL, 'market', 'buy', 2.0)
+        assert abs(before - ex.balances['USDT'] - buy['cost'] * 1.0005) < 1e-6
+        assert buy['average'] > 60000.0   # прошел несколько уровней - проскальзывание
+
+        # reduce-only не увеличивает и не переворачивает позицию
+        position = (await ex.fetch_positions([SYMBOL]))[0]
+        close_side = 'sell' if position['side'] == 'long' else 'buy'
+        close = await ex.create_order(SYMBOL, 'market', close_side, 100.0, None, {'reduceOnly': True})
+        assert close['amount'] == position['contracts'] and not await ex.fetch_positions()
+        try:
+            await ex.create_order(SYMBOL, 'market', close_side, 1.0, None, {'reduceOnly': True})
+            raise AssertionError('reduce-only без позиции')
+        except ccxt.InvalidOrder:
+            pass
+
+        # Повтор с тем же clientOrderId - тот же ордер
+        a = await ex.create_order(SYMBOL, 'limit', 'buy', 0.1, 59000.0, {'clientOrderId': 'x1'})
+        b = await ex.create_order(SYMBOL, 'limit', 'buy', 0.1, 59000.0, {'clientOrderId': 'x1'})
+        assert a['id'] == b['id'] and len(ex.open_orders) == 2
+
+        # Резерв: лимитные ордера занимают USDT, отмена освобождает
+        balance = await ex.fetch_balance()
+        assert balance['USDT']['used'] > 0
+        await ex.cancel_all_orders(SYMBOL)
+        assert (await ex.fetch_balance())['USDT']['used'] < 1e-6
+
+        poor = SimulatedExchange(balances={'USDT': 100.0}, latency=0.0)
+        poor.add_market(SYMBOL, tick_size=0.1, step_size=0.001)
+        poor.load_order_books(SYMBOL, [book_snapshot(1000, 60000.0)])
+        poor.step()
+        try:
+            await poor.create_order(SYMBOL, 'market', 'buy', 1.0)
+            raise AssertionError('покупка без средств')
+        except ccxt.InsufficientFunds:
+            pass
+
+        # Свеча проходит цену лимитного ордера - исполнение по цене ордера (maker)
+        replay = SimulatedExchange(balances={'USDT': 1_000_000.0}, latency=0.0)
+        replay.load_ohlcv(SYMBOL, [[0, 100, 101, 99, 100, 10], [300_000, 100, 100.5, 97, 98, 10]])
+        replay.step()
+        limit = await replay.create_order(SYMBOL, 'limit', 'buy', 1.0, 98.5)
+        assert limit['status'] == 'open'
+        assert len(await replay.fetch_ohlcv(SYMBOL)) == 1      # вторая свеча еще не закрылась
+        replay.step()
+        filled = await replay.fetch_order(limit['id'])
+        assert filled['status'] == 'closed' and filled['average'] == 98.5
+        assert abs(filled['fee']['cost'] - 98.5 * replay.maker_fee) < 1e-9
+
+        # Пересеченный снимок не теряет снятый уровень в следующих снимках
+        crossed = SimulatedExchange(latency=0.0)
+        crossed.add_market(SYMBOL, tick_size=0.1, step_size=0.001)
+        crossed.load_order_books(SYMBOL, [
+            {'timestamp': 1000, 'bids': [[100.0, 1.0]], 'asks': [[99.0, 1.0]]},
+            {'timestamp': 2000, 'bids': [[98.0, 1.0]], 'asks': [[99.0, 1.0], [101.0, 1.0]]}
+        ])
+        crossed.step()
+        crossed.step()
+        assert crossed.books[SYMBOL].depth('sell') == [[99.0, 1.0], [101.0, 1.0]]
+
+    asyncio.run(run())
+    print("  ✅ правила: цена-время, место в очереди, свеча, комиссии, reduce-only, средства, clientOrderId, "
+          "пересеченный снимок")
+
+
+def bench_matching(n_orders):
+    """create_order / cancel_order без задержки"""
+    async def run():
+        ex = SimulatedExchange(balances={'USDT': 1e12, 'BTC': 1e6}, latency=0.0)
+        ex.add_market(SYMBOL, tick_size=0.1, step_size=0.001)
+        ex.load_order_books(SYMBOL, [book_snapshot(1000, 60000.0, levels=200, size=50.0)])
+        ex.step()
+        rng = random.Random(1)
+        resting = []
+        started = time.perf_counter()
+        for i in range(n_orders):
+            side = 'buy' if rng.random() < 0.5 else 'sell'
+            roll = rng.random()
+            if roll < 0.3:
+                await ex.create_order(SYMBOL, 'market', side, round(rng.uniform(0.001, 0.5), 3))
+            elif roll < 0.85:
+                offset = rng.randint(-5, 40) * 0.1
+                price = round(60000.0 - offset if side == 'buy' else 60000.0 + offset, 1)
+                order = await ex.create_order(SYMBOL, 'limit', side, round(rng.uniform(0.001, 0.5), 3), price)
+                if order['status'] == 'open':
+                    resting.append(order['id'])
+            elif resting:
+                order_id = resting.pop(rng.randrange(len(resting)))
+                if order_id in ex.open_orders:
+                    await ex.cancel_order(order_id)
+        return time.perf_counter() - started, ex.get_stats()
+
+    seconds, stats = asyncio.run(run())
+    print(f"  матчинг: {n_orders} запросов за {seconds:.2f} с - {n_orders / seconds:,.0f} ордеров/с, "
+          f"сделок {stats['fills']}, в стакане {stats['open_orders']}")
+    assert n_orders / seconds > 5000
+
+
+def bench_execution_path(n_orders, in_flight, latency):
+    """RealExchangeClient -> SimulatedExchange: одновременные рыночные ордера"""
+    async def run():
+        ex = SimulatedExchange(balances={'USDT': 1e9, 'BTC': 1e6}, latency=latency)
+        ex.add_market(SYMBOL, tick_size=0.1, step_size=0.001)
+        ex.load_order_books(SYMBOL, [book_snapshot(1000, 60000.0, levels=1000, size=5.0)])
+        ex.step()
+        simulated.simulated_exchange = ex
+        client = RealExchangeClient()
+        assert await client.connect('simulated')
+
+        rng = random.Random(3)
+        semaphore = asyncio.Semaphore(in_flight)
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                result = await client.create_order(SYMBOL, 'market', rng.choice(['buy', 'sell']), 0.1)
+                latencies.append(time.perf_counter() - started)
+                assert result.success, result.error_message
+
+        async def refresh_book():
+            # Снимки стакана 100 раз в секунду: ликвидность восстанавливается
+            snapshot = book_snapshot(0, 60000.0, levels=1000, size=5.0)
+            while True:
+                await asyncio.sleep(0.01)
+                ex.books[SYMBOL].set_external('buy', snapshot['bids'], ex._seq, 0)
+                ex.books[SYMBOL].set_external('sell', snapshot['asks'], ex._seq, 0)
+
+        refresher = asyncio.create_task(refresh_book())
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n_orders)))
+        seconds = time.perf_counter() - started
+        refresher.cancel()
+        await client.disconnect()
+        return seconds, sorted(latencies)
+
+    seconds, latencies = asyncio.run(run())
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"  путь исполнения: {n_orders} ордеров ({in_flight} в полете) за {seconds:.2f} с - "
+          f"{n_orders / seconds:,.0f} ордеров/с, исполнение p50 {p50:.1f} мс, p99 {p99:.1f} мс "
+          f"(задержка сети {latency * 1000:.0f} мс)")
+    assert n_orders / seconds > 500
+
+
+def bench_slippage():
+    """Проскальзывание рыночного ордера от размера (стакан 5 BTC на уровень, шаг 0.1)"""
+    async def run():
+        ex = SimulatedExchange(balances={'USDT': 1e9}, latency=0.0)
+        ex.add_market(SYMBOL, tick_size=0.1, step_size=0.001)
+        snapshot = book_snapshot(1000, 60000.0, levels=1000, size=5.0)
+        ex.load_order_books(SYMBOL, [snapshot])
+        ex.step()
+        result = {}
+        for size in (0.01, 1.0, 10.0, 50.0, 200.0):
+            order = await ex.create_order(SYMBOL, 'market', 'buy', size)
+            mid = order['info']['arrivalMid']
+            result[size] = (order['average'] - mid) / mid * 10_000
+            ex.books[SYMBOL].set_external('sell', snapshot['asks'], ex._seq, 0)
+        return result
+
+    result = asyncio.run(run())
+    print("  проскальзывание от середины спреда: " +
+          ", ".join(f"{size:g} BTC {bps:.2f} б.п." for size, bps in result.items()))
+    values = list(result.values())
+    assert values == sorted(values)
+
+
+def bench_replay(n_candles):
+    """Свечи + лимитные ордера стратегии на каждой свече"""
+    async def run():
+        ex = SimulatedExchange(balances={'USDT': 1e9}, latency=0.0)
+        ex.load_ohlcv(SYMBOL, random_walk(n_candles))
+        placed = 0
+        started = time.perf_counter()
+        async for event in ex.replay():
+            ticker = await ex.fetch_ticker(SYMBOL)
+            await ex.create_order(SYMBOL, 'limit', 'buy', 0.01, round(ticker['last'] * 0.998, 1))
+            await ex.create_order(SYMBOL, 'limit', 'sell', 0.01, round(ticker['last'] * 1.002, 1))
+            placed += 2
+        return time.perf_counter() - started, placed, ex.get_stats()
+
+    seconds, placed, stats = asyncio.run(run())
+    filled = stats['fills']
+    print(f"  воспроизведение: {n_candles} свечей за {seconds:.2f} с ({n_candles / seconds:,.0f} свечей/с), "
+          f"лимитных ордеров {placed}, исполнено свечами {filled}, PnL {stats['realized_pnl']:.2f}")
+    assert filled > 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument('--concurrent', type=int, default=2000)
+    parser.add_argument('--in-flight', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--candles', type=int, default=5000)
+    args = parser.parse_args()
+
+    check_rules()
+    bench_matching(args.orders)
+    bench_execution_path(args.concurrent, args.in_flight, args.latency_ms / 1000)
+    bench_slippage()
+    bench_replay(args.candles)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк планировщика обучения (src/ml/training/training_scheduler.py)
+Файл: benchmarks/bench_training_scheduler.py
+
+Временные SQLite БД и реестр моделей, синтетические OHLCV на N символов;
+все время обучения работает "торговый цикл" - задача с шагом 10 мс,
+которая меряет свое опоздание, и поток предсказаний по первому символу:
+- прежний путь: символы по одному в цикле событий (признаки, модели,
+  сохранение)
+- MLTrainer.train_all_models через планировщик: пул процессов с
+  пониженным приоритетом; опоздания торгового цикла, предсказания во
+  время обучения и после подмены модели
+- приоритеты: нет модели, много ошибок, устаревшая, свежая
+- плановое переобучение после --step новых баров: дообучение активной
+  версии против обучения с нуля
+- сбои: процесс-воркер убит посреди обучения, лимит памяти воркера
+
+Запуск:
+    python benchmarks/bench_training_scheduler.py --symbols 3 --bars 3000
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import warnings
+from functools import partial
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+TMP_DIR = tempfile.mkdtemp(prefix='bench_training_')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{TMP_DIR}/bench.db")
+os.environ.setdefault('MODEL_REGISTRY_DIR', f"{TMP_DIR}/registry")
+os.environ.setdefault('ENABLE_FEATURE_CACHE', 'false')
+os.environ.setdefault('ENABLE_HUMAN_MODE', 'false')
+
+from src.core.config import Config
+from src.core.database import SessionLocal, db
+from src.core.models import MLPrediction
+from src.ml.training.trainer import MLTrainer
+from src.ml.training.training_scheduler import TrainingScheduler
+
+warnings.simplefilter('ignore', category=Warning)  # PerformanceWarning pandas в признаках
+
+TICK = 0.01
+
+
+def make_ohlcv(bars, seed=0, revert=0.0):
+    """OHLCV 5m; revert > 0 - возврат лог-цены к 100 (диапазон цен окна не меняется)"""
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, 0.004, bars)
+    log_price = noise.copy()
+    for i in range(1, bars):
+        log_price[i] = (1 - revert) * log_price[i - 1] + noise[i]
+    close = 100 * np.exp(log_price)
+    spread = np.abs(rng.normal(0, 0.002, bars)) * close
+    return pd.DataFrame({
+        'open': np.r_[close[0], close[:-1]],
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'volume': rng.uniform(100, 1000, bars)
+    }, index=pd.date_range('2024-01-01', periods=bars, freq='5min'))
+
+
+async def market_data(symbol, timeframe, lookback_periods, shift=0, revert=0.0):
+    """Источник OHLCV вместо биржи и хранилища свечей (shift - новых баров с прошлого обучения)"""
+    return make_ohlcv(lookback_periods + shift, seed=int(symbol[3:-4]), revert=revert).iloc[shift:]
+
+
+def make_trainer(symbols, bars):
+    trainer = MLTrainer()
+    trainer.feature_engineer._get_market_data = market_data
+    trainer.training_config['symbols'] = symbols
+    trainer.training_config['lookback_periods'] = bars
+    return trainer
+
+
+async def trading_loop(stop, lags):
+    """Торговый цикл: шаг TICK, опоздание каждого шага"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def prediction_loop(trainer, symbol, row, stop, log):
+    """Предсказания по символу во время обучения: (успех, модель)"""
+    while not stop.is_set():
+        result = await trainer.predict(symbol, row)
+        log.append((result['success'], id(trainer.models.get(f"{symbol}_5m"))))
+        await asyncio.sleep(0.1)
+
+
+async def observed(coro, predict=None):
+    """Выполнить coro под наблюдением торгового цикла (и потока предсказаний)"""
+    stop, lags, log = asyncio.Event(), [], []
+    tasks = [asyncio.create_task(trading_loop(stop, lags))]
+    if predict is not None:
+        tasks.append(asyncio.create_task(prediction_loop(*predict, stop, log)))
+    started = time.perf_counter()
+    result = await coro
+    duration = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*tasks)
+    return result, duration, lags, log
+
+
+async def legacy_train_all(trainer):
+    """Прежний train_all_models: символы по одному в цикле событий"""
+    for symbol in trainer.training_config['symbols']:
+        df = await trainer.feature_engineer.extract_features(
+            symbol, '5m', trainer.training_config['lookback_periods'])
+        model_data = trainer.fit_models(df, symbol, '5m')
+        trainer.save_model(model_data)
+        trainer.models[f"{symbol}_5m"] = model_data['ensemble']
+        await asyncio.sleep(0)
+
+
+def lag_line(lags, duration):
+    lags_ms = np.array(lags) * 1000
+    return (f"шагов торгового цикла {len(lags)} из {duration / TICK:.0f}, "
+            f"опоздание p99 {np.percentile(lags_ms, 99):7.1f} мс, max {lags_ms.max():7.1f} мс")
+
+
+def set_training_date(trainer, key, hours_ago):
+    """Сдвинуть дату обучения активной версии (метаданные реестра)"""
+    info = trainer.registry.get_version(key)
+    path = info.path.parent / 'metadata.json'
+    data = json.loads(path.read_text())
+    data['metadata']['training_date'] = (datetime.utcnow() - timedelta(hours=hours_ago)).isoformat()
+    path.write_text(json.dumps(data))
+
+
+def add_predictions(symbol, n, wrong):
+    session = SessionLocal()
+    try:
+        for i in range(n):
+            session.add(MLPrediction(symbol=symbol, prediction='BUY', confidence=0.6,
+                                     is_correct=i >= wrong, created_at=datetime.utcnow()))
+        session.commit()
+    finally:
+        session.close()
+
+
+async def main_async(args):
+    os.chdir(TMP_DIR)  # reports/ и models/ - во временном каталоге
+    db.create_tables()
+    symbols = [f'SYM{i}USDT' for i in range(args.symbols)]
+
+    # === Прежний путь ===
+    legacy = make_trainer(symbols, args.bars)
+    _, legacy_s, legacy_lags, _ = await observed(legacy_train_all(legacy))
+
+    # Строка признаков для потока предсказаний
+    features = await legacy.feature_engineer.extract_features(symbols[0], '5m', args.bars)
+    X, _ = legacy.feature_engineer.prepare_training_data(features)
+    row = pd.DataFrame(X[-1:])
+
+    # === Планировщик ===
+    # Модели прежнего пути уже в реестре: сравнение с ним - обучение с нуля
+    Config.ML_INCREMENTAL_RETRAIN = False
+    trainer = make_trainer(symbols, args.bars)
+    trainer.models[f"{symbols[0]}_5m"] = legacy.models[f"{symbols[0]}_5m"]
+    old_model = id(trainer.models[f"{symbols[0]}_5m"])
+    summary, new_s, new_lags, predictions = await observed(
+        trainer.train_all_models(), predict=(trainer, symbols[0], row))
+    stats = trainer.scheduler.get_stats()
+    assert summary['successful_models'] == len(symbols), summary['results']
+    assert all(ok for ok, _ in predictions), 'предсказание не выполнено во время обучения'
+    models_seen = [model for _, model in predictions]
+    assert models_seen[0] == old_model and models_seen[-1] != old_model
+    # Подмена атомарна: модель сменилась ровно один раз, дальше только новая
+    assert sum(1 for a, b in zip(models_seen, models_seen[1:]) if a != b) == 1
+
+    print(f"Символов: {len(symbols)}, баров: {args.bars}, "
+          f"процессов обучения: {stats['workers']} (ядер: {os.cpu_count()})")
+    print(f"  прежний путь (в цикле событий): {legacy_s:6.1f} с, {lag_line(legacy_lags, legacy_s)}")
+    print(f"  планировщик (пул процессов):   {new_s:6.1f} с, {lag_line(new_lags, new_s)}")
+    version = summary['results'][f"{symbols[0]}_5m"]['version']
+    assert trainer.registry.active_version(f"{symbols[0]}_5m") == version
+    print(f"  ✅ {len(predictions)} предсказаний во время обучения без ошибок; модель подменена "
+          f"один раз, версия {version} активна в реестре")
+
+    # === Приоритеты ===
+    if len(symbols) >= 3:
+        keys = [(symbol, '5m') for symbol in symbols] + [('NEW0USDT', '5m')]
+        set_training_date(trainer, f"{symbols[1]}_5m", 2)   # свежая, но 80% ошибок
+        add_predictions(symbols[1], 50, wrong=40)
+        set_training_date(trainer, f"{symbols[2]}_5m", 30)  # устарела (интервал 24 ч)
+        jobs = await trainer.scheduler.prioritize(keys)
+        order = [job.key for job in jobs if job.due]
+        expected = ['NEW0USDT_5m', f"{symbols[1]}_5m", f"{symbols[2]}_5m"]
+        assert order == expected, order
+        print(f"  ✅ приоритеты: " + ", ".join(
+            f"{job.key} {job.priority:.2f}{'' if job.due else ' (не пора)'}" for job in jobs))
+
+    # === Плановое переобучение: дообучение ===
+    # Цена с возвратом к среднему: новые бары в диапазоне окна, проверка дрейфа
+    # не требует обучения с нуля (у случайного блуждания уровни цены уходят из него)
+    Config.ML_INCREMENTAL_RETRAIN = True
+    key = f"{symbols[0]}_5m"
+    # FeatureEngineer уходит в процесс-воркер - источник данных без замыканий
+    trainer.feature_engineer._get_market_data = partial(market_data, revert=0.02)
+    started = time.perf_counter()
+    result = await trainer.scheduler.train(symbols[0])
+    full_s = time.perf_counter() - started
+    assert result['success'] and result['training_mode'] == 'full', result
+
+    trainer.feature_engineer._get_market_data = partial(market_data, shift=args.step, revert=0.02)
+    jobs = await trainer.scheduler.prioritize([(symbols[0], '5m')])
+    started = time.perf_counter()
+    summary = await trainer.train_all_models(jobs)
+    incremental_s = time.perf_counter() - started
+    result = summary['results'][key]
+    assert result['success'] and result['training_mode'] == 'incremental', result
+    state = trainer.registry.load(key)['incremental']
+    assert state['updates'] == 1 and state['last_decision']['bars'] >= Config.INCREMENTAL_MIN_BARS, state
+    print(f"  ✅ плановое переобучение после {args.step} новых баров: дообучение на "
+          f"{state['last_decision']['bars']} новых барах обучающей выборки {incremental_s:5.1f} с "
+          f"против {full_s:5.1f} с с нуля; версия {result['version']} активна")
+
+    # === Сбои ===
+    scheduler = trainer.scheduler
+    task = asyncio.create_task(scheduler.train(symbols[0]))
+    while not scheduler._executor or not scheduler._executor._processes or not scheduler._running:
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(1.0)
+    for process in list(scheduler._executor._processes.values()):
+        process.kill()
+    killed = await task
+    assert not killed['success'] and stats['pool_restarts'] + 1 == scheduler.stats['pool_restarts']
+    retried = await scheduler.train(symbols[0])
+    assert retried['success'], retried
+    print(f"  ✅ воркер убит посреди обучения: задание завершилось ошибкой, пул пересоздан, "
+          f"повтор успешен (версия {retried['version']})")
+
+    capped = TrainingScheduler(trainer, workers=1, memory_mb=args.memory_cap_mb)
+    result = await capped.train(symbols[0])
+    capped.shutdown()
+    assert not result['success'], result
+    print(f"  ✅ лимит памяти {args.memory_cap_mb} МБ: обучение остановлено ({result['error']}), "
+          f"основной процесс работает")
+    scheduler.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--symbols', type=int, default=3)
+    parser.add_argument('--bars', type=int, default=3000)
+    parser.add_argument('--memory-cap-mb', type=int, default=580)
+    parser.add_argument('--step', type=int, default=400)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк параллельного walk-forward анализа
+Файл: benchmarks/bench_walk_forward.py
+
+Сравнивает run_walk_forward_analysis с n_jobs=1 (последовательно,
+в одном процессе) и с пулом процессов на разделяемой памяти:
+- время анализа
+- совпадение результатов по окнам при одинаковом seed
+- объем данных, передаваемых воркеру (spec вместо pickle DataFrame)
+
+Запуск:
+    python benchmarks/bench_walk_forward.py --bars 200000 --jobs 1 2 4
+"""
+import os
+import sys
+import time
+import pickle
+import argparse
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from src.ml.training.backtester import Backtester, BacktestConfig
+from src.ml.training.walk_forward import SharedFrame, attach_frame
+
+warnings.filterwarnings('ignore', category=FutureWarning)
+
+
+def make_dataset(bars: int, n_features: int, seed: int = 11):
+    """Синтетические 5m свечи и признаки"""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.003, bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.002, bars)) * close
+    index = pd.date_range('2020-01-01', periods=bars, freq='5min')
+
+    market_data = pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.uniform(1, 100, bars)
+    }, index=index)
+    features = pd.DataFrame(
+        rng.normal(size=(bars, n_features)), index=index,
+        columns=[f'feature_{i}' for i in range(n_features)]
+    )
+    return market_data, features
+
+
+def run(bars: int, n_features: int, window_size: int, step_size: int, jobs):
+    market_data, features = make_dataset(bars, n_features)
+    backtester = Backtester(BacktestConfig(enable_shorting=False, max_open_positions=1))
+
+    with SharedFrame(features) as shared:
+        spec_size = len(pickle.dumps(shared.spec))
+    frame_size = len(pickle.dumps(features)) + len(pickle.dumps(market_data))
+    print(f"Баров: {bars}, признаков: {n_features}, ядер: {os.cpu_count()}")
+    print(f"  pickle market_data+features: {frame_size / 1e6:.1f} МБ, "
+          f"spec разделяемой памяти: {spec_size} байт")
+
+    # Нечисловые колонки и целые типы доходят до воркеров как есть
+    mixed = features.iloc[:100].assign(
+        regime=np.where(features['feature_0'].iloc[:100] > 0, 'trend', 'flat'),
+        is_up=features['feature_1'].iloc[:100] > 0,
+        bucket=np.arange(100) % 7
+    )
+    with SharedFrame(mixed) as shared:
+        handle, attached = attach_frame(shared.spec)
+        pd.testing.assert_frame_equal(attached, mixed, check_freq=False)
+        del attached
+        handle.close()
+    print("  ✅ строковые, bool и int колонки в воркере совпадают с исходным кадром")
+
+    # Прогрев (компиляция numba, кэш pandas)
+    backtester.run_walk_forward_analysis(
+        market_data.iloc[:window_size + 3 * step_size], features.iloc[:window_size + 3 * step_size],
+        ml_models={}, window_size=window_size, step_size=step_size, n_jobs=1, seed=0
+    )
+
+    baseline = None
+    for n_jobs in jobs:
+        streamed = []
+        start = time.perf_counter()
+        analysis = backtester.run_walk_forward_analysis(
+            market_data, features, ml_models={},
+            window_size=window_size, step_size=step_size,
+            n_jobs=n_jobs, seed=42,
+            on_result=lambda number, result: streamed.append(number)
+        )
+        elapsed = time.perf_counter() - start
+
+        returns = [p['return'] for p in analysis['period_results']]
+        if baseline is None:
+            baseline = (elapsed, returns)
+        elif returns != baseline[1]:
+            raise AssertionError(f"n_jobs={n_jobs}: результаты окон отличаются от n_jobs={jobs[0]}")
+
+        print(f"  ✅ n_jobs={n_jobs:2d}: окон {analysis['total_periods']:4d} | "
+              f"{elapsed:7.2f} с | ускорение {baseline[0] / elapsed:4.1f}x | "
+              f"первые готовые окна: {streamed[:5]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bars', type=int, default=200000)
+    parser.add_argument('--features', type=int, default=50)
+    parser.add_argument('--window-size', type=int, default=20000)
+    parser.add_argument('--step-size', type=int, default=5000)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+    run(args.bars, args.features, args.window_size, args.step_size, args.jobs)
+
+
+if __name__ == '__main__':
+    main()
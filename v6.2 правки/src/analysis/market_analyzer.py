@@ -29,8 +29,8 @@ except ImportError:
     logging.warning("⚠️ TA-Lib не установлен, используем базовые вычисления")
 
 from ..core.config import config
-from ..core.database import SessionLocal
-from ..core.models import Candle, MarketCondition
+from ..core.models import MarketCondition
+from ..market_data.candle_store import get_candle_store
 
 logger = logging.getLogger(__name__)
 
@@ -170,33 +170,12 @@ class MarketAnalyzer:
             return self._get_default_conditions(symbol)
     
     async def _get_market_data(self, symbol: str, timeframe: str) -> Optional[pd.DataFrame]:
-        """Получение рыночных данных из БД или API"""
+        """Получение рыночных данных из общего хранилища свечей"""
         try:
-            # Пытаемся получить из базы данных
-            db = SessionLocal()
-            
-            # Получаем данные за последние 200 периодов
-            candles = db.query(Candle).filter(
-                Candle.symbol == symbol,
-                Candle.timeframe == timeframe
-            ).order_by(Candle.timestamp.desc()).limit(200).all()
-            
-            if candles:
-                # Конвертируем в DataFrame
-                data = []
-                for candle in reversed(candles):  # Сортируем по возрастанию времени
-                    data.append({
-                        'timestamp': candle.timestamp,
-                        'open': float(candle.open),
-                        'high': float(candle.high),
-                        'low': float(candle.low),
-                        'close': float(candle.close),
-                        'volume': float(candle.volume)
-                    })
-                
-                df = pd.DataFrame(data)
-                df.set_index('timestamp', inplace=True)
-                
+            # Последние 200 периодов; из БД догружаются только новые бары
+            df = await get_candle_store().get_frame(symbol, timeframe, limit=200)
+            
+            if not df.empty:
                 logger.debug(f"📈 Получено {len(df)} свечей для {symbol}")
                 return df
             else:
@@ -206,11 +185,6 @@ class MarketAnalyzer:
         except Exception as e:
             logger.error(f"❌ Ошибка получения данных для {symbol}: {e}")
             return None
-        finally:
-            try:
-                db.close()
-            except:
-                pass
     
     def _analyze_trend(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Анализ трендов на разных таймфреймах"""
@@ -38,6 +38,7 @@ from ..core.config import config
 from ..exchange.client import ExchangeClient
 from ..strategies.base import TradingSignal
 from ..analysis.market_analyzer import MarketAnalyzer
+from ..market_data.candle_store import get_candle_store
 from ..ml.models.price_predictor import PricePredictor
 from ..ml.models.sentiment_analyzer import SentimentAnalyzer
 from ..notifications.telegram import telegram_notifier
@@ -113,6 +114,7 @@ class AdvancedTradingBot:
         self.blacklisted_pairs = set()       # Заблокированные пары
         self.opportunities = {}              # Текущие возможности
         self.positions = {}                  # Открытые позиции
+        self.symbol_index = {}               # id и символ рынка -> унифицированный символ
         
         # Стратегии и модели
         self.available_strategies = [
@@ -244,20 +246,27 @@ class AdvancedTradingBot:
         try:
             # Получаем все рынки с биржи
             markets = await self.exchange.fetch_markets()
+            self._index_markets(markets)
+            
+            # Проверяем базовые требования
+            candidates = [
+                market for market in markets
+                if (market['quote'] == 'USDT' and 
+                    market['active'] and 
+                    not market.get('spot', True) == False)
+            ]
+            
+            # Статистика 24ч всех кандидатов одним запросом
+            tickers = await self._fetch_tickers([market['symbol'] for market in candidates])
             
             # Фильтруем по критериям
             filtered_pairs = []
-            for market in markets:
+            for market in candidates:
                 symbol = market['symbol']
                 
-                # Проверяем базовые требования
-                if (market['quote'] == 'USDT' and 
-                    market['active'] and 
-                    not market.get('spot', True) == False):
-                    
+                if symbol in tickers:
                     try:
-                        # Получаем статистику 24ч
-                        ticker = await self.exchange.fetch_ticker(symbol)
+                        ticker = tickers[symbol]
                         volume_24h = float(ticker.get('quoteVolume', 0))
                         
                         # Фильтр по объему
@@ -294,6 +303,62 @@ class AdvancedTradingBot:
             # Fallback к стандартным парам
             self.active_pairs = ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'SOLUSDT']
 
+    def _index_markets(self, markets: List[Dict]):
+        """Индекс id ('BTCUSDT') и символов рынков; при совпадении id - спот"""
+        index = {}
+        for market in sorted(markets, key=lambda m: m.get('spot', True) is False):
+            if not market.get('active', True):
+                continue
+            index.setdefault(market['symbol'], market['symbol'])
+            if market.get('id'):
+                index.setdefault(market['id'], market['symbol'])
+        self.symbol_index = index
+
+    async def _resolve_symbols(self, symbols: List[str]) -> Dict[str, str]:
+        """Унифицированные символы ccxt; неизвестные и делистингованные отбрасываются"""
+        if not self.symbol_index:
+            try:
+                self._index_markets(await self.exchange.fetch_markets())
+            except Exception as e:
+                logger.warning(f"⚠️ Рынки не загружены, символы не проверены: {e}")
+                return {symbol: symbol for symbol in symbols}
+        
+        resolved = {symbol: self.symbol_index[symbol] for symbol in symbols if symbol in self.symbol_index}
+        unknown = [symbol for symbol in symbols if symbol not in resolved]
+        if unknown:
+            logger.debug(f"Пропущены неизвестные символы: {unknown}")
+        return resolved
+
+    async def _fetch_tickers(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Тикеры одним запросом по запрошенным символам
+        
+        При ошибке общего запроса - по одному символу через кэш чтений:
+        сбой одного символа не срывает весь цикл.
+        """
+        resolved = await self._resolve_symbols(list(dict.fromkeys(symbols)))
+        unified = list(dict.fromkeys(resolved.values()))
+        if not unified:
+            return {}
+        
+        try:
+            tickers = await self.exchange.fetch_tickers(unified)
+        except Exception as e:
+            logger.warning(f"⚠️ Общий запрос тикеров не прошел, запрашиваем по одному: {e}")
+            results = await asyncio.gather(
+                *(self.exchange.fetch_ticker(symbol) for symbol in unified),
+                return_exceptions=True
+            )
+            tickers = {}
+            for symbol, result in zip(unified, results):
+                if isinstance(result, Exception):
+                    logger.debug(f"Ошибка получения тикера {symbol}: {result}")
+                else:
+                    tickers[symbol] = result
+        
+        return {symbol: tickers[unified_symbol] for symbol, unified_symbol in resolved.items()
+                if unified_symbol in tickers}
+
     async def _initialize_ml_models(self):
         """Инициализация машинного обучения"""
         try:
@@ -357,9 +422,11 @@ class AdvancedTradingBot:
             volumes = []
             changes_24h = []
             
+            tickers = await self._fetch_tickers(top_symbols)
+            
             for symbol in top_symbols:
                 try:
-                    ticker = await self.exchange.fetch_ticker(symbol)
+                    ticker = tickers[symbol]
                     change_24h = float(ticker.get('percentage', 0))
                     volume_24h = float(ticker.get('quoteVolume', 0))
                     
@@ -558,13 +625,14 @@ class AdvancedTradingBot:
     async def _get_market_data(self, symbol: str) -> Optional[Dict]:
         """Получение рыночных данных для символа"""
         try:
-            # Получаем OHLCV данные
-            candles = await self.exchange.fetch_ohlcv(symbol, '1h', limit=100)
-            if not candles:
-                return None
+            # Получаем OHLCV данные: с биржи запрашиваются только новые бары
+            store = get_candle_store()
+            await store.sync_from_exchange(self.exchange, symbol, '1h', limit=100)
             
-            df = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+            df = await store.get_frame(symbol, '1h', limit=100, copy=True, refresh=False)
+            df = df.reset_index()
+            if df.empty:
+                return None
             
             # Текущая цена и объем
             ticker = await self.exchange.fetch_ticker(symbol)
@@ -882,10 +950,13 @@ class AdvancedTradingBot:
             # Получаем открытые позиции
             open_trades = db.query(Trade).filter(Trade.status == TradeStatus.OPEN).all()
             
+            # Текущие цены всех позиций одним запросом
+            tickers = await self._fetch_tickers([trade.symbol for trade in open_trades])
+            
             for trade in open_trades:
                 try:
                     # Получаем текущую цену
-                    ticker = await self.exchange.fetch_ticker(trade.symbol)
+                    ticker = tickers[trade.symbol]
                     current_price = float(ticker['last'])
                     
                     # Рассчитываем текущую прибыль/убыток
@@ -687,15 +687,12 @@ class BotManager:
             self.status = BotStatus.EMERGENCY_STOP
             self.emergency_stop_triggered = True
             
-            # Мгновенно закрываем все позиции
-            await self._emergency_close_all_positions()
-            
-            # Отменяем все ордера
-            await self._cancel_all_orders()
-            
-            # Останавливаем все циклы
+            # Останавливаем все циклы - до обращений к бирже, которые могут упасть
             self._stop_event.set()
             
+            # Отмена ордеров и закрытие всех позиций - одновременно
+            await self._emergency_close_all_positions()
+            
             await self._send_emergency_notification()
             
             logger.critical("🚨 Экстренная остановка завершена")
@@ -1683,8 +1680,13 @@ class BotManager:
         pass
     
     async def _initialize_ml_system(self):
-        """Инициализация ML системы"""
-        pass
+        """Инициализация ML системы: прогрев активных моделей из реестра"""
+        try:
+            from ..ml.models.registry import get_model_registry
+            result = await get_model_registry().warm_up()
+            logger.info(f"✅ ML модели загружены в память: {result['loaded']} за {result['seconds']:.2f}с")
+        except Exception as e:
+            logger.warning(f"⚠️ Прогрев ML моделей не выполнен: {e}")
     
     async def _load_historical_data(self):
         """Загрузка исторических данных"""
@@ -1785,8 +1787,26 @@ class BotManager:
         pass
     
     async def _emergency_close_all_positions(self):
-        """Экстренное закрытие всех позиций"""
-        pass
+        """Экстренное закрытие всех позиций вместе с отменой ордеров"""
+        from ..exchange.real_client import get_real_exchange_client
+        
+        client = get_real_exchange_client()
+        # Клиент торгового пути подключается лениво - без подключения закрывать нечем
+        if not client.is_connected and not await client.connect('bybit', testnet=config.BYBIT_TESTNET):
+            logger.critical("🚨 Не удалось подключиться к бирже - позиции НЕ закрыты")
+            return None
+        
+        try:
+            report = await client.emergency_flatten()
+        except Exception as e:
+            logger.critical(f"🚨 Ошибка экстренного закрытия позиций: {e}")
+            return None
+        
+        if report.positions_error:
+            logger.critical(f"🚨 Позиции не получены, закрыть не удалось: {report.positions_error}")
+        elif not report.flat:
+            logger.critical(f"🚨 Не закрыты позиции: {report.remaining}")
+        return report
     
     async def _send_emergency_notification(self):
         """Отправка экстренного уведомления"""
@@ -10,7 +10,7 @@ TRADING BOT INTEGRATION - Интеграция реальной торговли
 ✅ Экстренные остановки и безопасность
 """
 import asyncio
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import logging
 
@@ -21,6 +21,8 @@ from ..logging.smart_logger import get_logger
 from ..exchange.real_client import get_real_exchange_client
 from ..exchange.position_manager import get_position_manager
 from ..exchange.execution_engine import get_execution_engine
+from ..core.config import settings
+from ..utils.fan_out import FanOutStage
 
 logger = get_logger(__name__)
 
@@ -75,6 +77,13 @@ class TradingBotWithRealTrading:
         self.trading_pairs = config.get('trading_pairs', ['BTCUSDT'])
         self.max_concurrent_trades = config.get('max_concurrent_trades', 3)
         
+        # Параллельный анализ пар: лимит конкурентности и таймаут на символ
+        self.analysis_stage = FanOutStage(
+            name='symbol_analysis',
+            concurrency=config.get('analysis_concurrency', settings.MAX_CONCURRENT_ANALYSIS),
+            timeout=config.get('symbol_timeout_seconds', 30)
+        )
+        
         # Статистика
         self.cycle_count = 0
         self.signals_generated = 0
@@ -189,29 +198,21 @@ class TradingBotWithRealTrading:
         self.cycle_count += 1
         
         try:
-            # 1. Анализ рынка для всех пар
-            market_analysis_results = {}
-            
-            for symbol in self.trading_pairs:
-                try:
-                    analysis = await self._analyze_market_for_symbol(symbol)
-                    market_analysis_results[symbol] = analysis
-                    
-                except Exception as e:
-                    logger.error(f"❌ Ошибка анализа {symbol}: {e}")
-                    continue
+            # 1-2. Анализ рынка и генерация сигналов - параллельно по всем парам
+            stage_results = await self.analysis_stage.run(
+                self.trading_pairs, self._analyze_and_generate_signals
+            )
             
-            # 2. Генерация сигналов
+            market_analysis_results = {}
             trading_signals = []
             
-            for symbol, analysis in market_analysis_results.items():
-                try:
-                    signals = await self._generate_signals_for_symbol(symbol, analysis)
-                    trading_signals.extend(signals)
-                    
-                except Exception as e:
-                    logger.error(f"❌ Ошибка генерации сигналов {symbol}: {e}")
+            for symbol, result in stage_results.items():
+                if not result.ok:
                     continue
+                
+                analysis, signals = result.value
+                market_analysis_results[symbol] = analysis
+                trading_signals.extend(signals)
             
             # 3. Обработка и исполнение сигналов
             if trading_signals and self.is_trading_enabled:
@@ -220,13 +221,18 @@ class TradingBotWithRealTrading:
             # 4. Обновление статистики
             cycle_time = (datetime.utcnow() - start_time).total_seconds()
             self.last_activity = datetime.utcnow()
+            stage_metrics = self.analysis_stage.get_metrics()
             
             logger.debug(
                 f"✅ Торговый цикл завершен",
                 category='bot',
                 cycle_count=self.cycle_count,
                 cycle_time=cycle_time,
+                analysis_time=stage_metrics['cycle_time'],
+                slowest_symbol_time=stage_metrics['slowest_item_time'],
                 symbols_analyzed=len(market_analysis_results),
+                symbols_failed=stage_metrics['errors'],
+                symbols_timed_out=stage_metrics['timeouts'],
                 signals_generated=len(trading_signals)
             )
             
@@ -263,6 +269,12 @@ class TradingBotWithRealTrading:
     # МЕТОДЫ АНАЛИЗА И ТОРГОВЛИ
     # =================================================================
     
+    async def _analyze_and_generate_signals(self, symbol: str) -> Tuple[Dict[str, Any], List]:
+        """Полный конвейер для одного символа: анализ рынка → сигналы"""
+        analysis = await self._analyze_market_for_symbol(symbol)
+        signals = await self._generate_signals_for_symbol(symbol, analysis)
+        return analysis, signals
+    
     async def _analyze_market_for_symbol(self, symbol: str) -> Dict[str, Any]:
         """Анализ рынка для конкретного символа"""
         try:
@@ -369,7 +381,6 @@ class TradingBotWithRealTrading:
                     result = await self.execution_engine.execute_signal(
                         signal=signal_data['signal'],
                         strategy_name=signal_data['strategy_name'],
-                        confidence=signal_data['confidence'],
                         market_conditions=signal_data['market_conditions']
                     )
                     
@@ -504,7 +515,8 @@ class TradingBotWithRealTrading:
             'trades_executed': self.trades_executed,
             'last_activity': self.last_activity,
             'trading_pairs_count': len(self.trading_pairs),
-            'execution_stats': exec_stats
+            'execution_stats': exec_stats,
+            'analysis_metrics': self.analysis_stage.get_metrics()
         }
     
     def enable_trading(self):
@@ -22,7 +22,8 @@ class BybitConfig:
         config = {
             'apiKey': os.getenv('BYBIT_API_KEY'),
             'secret': os.getenv('BYBIT_API_SECRET'),
-            'enableRateLimit': True,
+            # Лимиты соблюдает общий RateLimitScheduler; троттлинг ccxt - только без него
+            'enableRateLimit': os.getenv('RATE_LIMIT_ENABLED', 'true').lower() != 'true',
             'rateLimit': 50,  # Bybit позволяет 50 запросов в секунду
             'options': {
                 'defaultType': 'spot',  # 'spot', 'future', 'swap', 'option'
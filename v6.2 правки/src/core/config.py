@@ -61,7 +61,32 @@ class Config:
     BINANCE_API_KEY = os.getenv('BINANCE_API_KEY', '')
     BINANCE_API_SECRET = os.getenv('BINANCE_API_SECRET', '')
     BINANCE_TESTNET = os.getenv('BINANCE_TESTNET', 'true').lower() == 'true'
-    
+
+    # Потоковые рыночные данные (WebSocket Bybit v5)
+    ENABLE_MARKET_STREAM = os.getenv('ENABLE_MARKET_STREAM', 'true').lower() == 'true'
+    MARKET_STREAM_URL = os.getenv('MARKET_STREAM_URL', '')  # Пусто - публичный поток Bybit (по BYBIT_TESTNET)
+    MARKET_STREAM_PRIVATE_URL = os.getenv('MARKET_STREAM_PRIVATE_URL', '')  # Поток позиций
+    MARKET_STREAM_PING_SECONDS = float(os.getenv('MARKET_STREAM_PING_SECONDS', '20'))
+    MARKET_STREAM_STALE_SECONDS = float(os.getenv('MARKET_STREAM_STALE_SECONDS', '10'))  # Старше - цена через REST
+    MARKET_STREAM_RECORD_PATH = os.getenv('MARKET_STREAM_RECORD_PATH', '')  # JSONL для ReplayServer
+    ORDER_BOOK_DEPTH = int(os.getenv('ORDER_BOOK_DEPTH', '50'))  # Уровней стакана в потоке (Bybit spot: 1, 50, 200)
+    ORDER_BOOK_STALE_SECONDS = float(os.getenv('ORDER_BOOK_STALE_SECONDS', '5'))  # Старше - стакан через REST
+
+    # Отслеживание ордеров (поток ордеров + общий REST опрос)
+    ORDER_TRACKER_POLL_SECONDS = float(os.getenv('ORDER_TRACKER_POLL_SECONDS', '1'))
+    ORDER_TRACKER_STREAM_POLL_SECONDS = float(os.getenv('ORDER_TRACKER_STREAM_POLL_SECONDS', '5'))  # Сверка при живом потоке
+
+    # Экстренное закрытие позиций (отмена ордеров + параллельные reduce-only закрытия)
+    EMERGENCY_FLATTEN_CONCURRENCY = int(os.getenv('EMERGENCY_FLATTEN_CONCURRENCY', '10'))
+    EMERGENCY_FLATTEN_RETRIES = int(os.getenv('EMERGENCY_FLATTEN_RETRIES', '3'))
+    EMERGENCY_FLATTEN_BACKOFF_SECONDS = float(os.getenv('EMERGENCY_FLATTEN_BACKOFF_SECONDS', '0.2'))
+    EMERGENCY_FLATTEN_ROUNDS = int(os.getenv('EMERGENCY_FLATTEN_ROUNDS', '3'))  # Сверок позиций после закрытий
+
+    # Предторговые проверки (параллельная стадия execute_signal)
+    PRETRADE_CHECK_TIMEOUT_SECONDS = float(os.getenv('PRETRADE_CHECK_TIMEOUT_SECONDS', '2'))  # Дедлайн проверки по умолчанию
+    PRETRADE_LIQUIDITY_TIMEOUT_SECONDS = float(os.getenv('PRETRADE_LIQUIDITY_TIMEOUT_SECONDS', '1'))  # Дедлайн стакана
+    PRETRADE_BAR_SECONDS = int(os.getenv('PRETRADE_BAR_SECONDS', '300'))  # Бар для кэша, если в market_conditions нет свечей и времени бара
+
     # =================================================================
     # РЕЖИМЫ ТОРГОВЛИ - РАСШИРЕННЫЕ НАСТРОЙКИ
     # =================================================================
@@ -149,6 +174,8 @@ class Config:
     MARKET_DATA_UPDATE_INTERVAL_SECONDS = int(os.getenv('MARKET_DATA_UPDATE_INTERVAL_SECONDS', '30'))
     ANALYSIS_INTERVAL_SECONDS = int(os.getenv('ANALYSIS_INTERVAL_SECONDS', '60'))
     POSITION_CHECK_INTERVAL_SECONDS = int(os.getenv('POSITION_CHECK_INTERVAL_SECONDS', '30'))
+    POSITION_LEDGER_FLUSH_SECONDS = float(os.getenv('POSITION_LEDGER_FLUSH_SECONDS', '2'))  # Пауза фоновой записи журнала сделок в БД
+    TRADING_USER_ID = int(os.getenv('TRADING_USER_ID', '1'))  # Владелец сделок бота (trades.user_id)
     UPDATE_INTERVAL = int(os.getenv('UPDATE_INTERVAL', '60'))
     
     # =================================================================
@@ -245,6 +272,42 @@ class Config:
     ML_LOOKBACK_HOURS = int(os.getenv('ML_LOOKBACK_HOURS', '720'))
     ML_PREDICTION_HORIZON_HOURS = int(os.getenv('ML_PREDICTION_HORIZON_HOURS', '4'))
     ML_VALIDATION_SPLIT = float(os.getenv('ML_VALIDATION_SPLIT', '0.2'))
+
+    # Инференс
+    ML_BATCH_WINDOW_MS = float(os.getenv('ML_BATCH_WINDOW_MS', '5'))  # Окно сбора запросов в пакет
+    ML_BATCH_MAX_SIZE = int(os.getenv('ML_BATCH_MAX_SIZE', '64'))  # Полный пакет отправляется сразу
+
+    # Реестр моделей
+    MODEL_REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR', 'models/registry')
+    MODEL_REGISTRY_MEMORY_MB = int(os.getenv('MODEL_REGISTRY_MEMORY_MB', '1024'))  # Лимит загруженных моделей
+    MODEL_REGISTRY_MMAP = os.getenv('MODEL_REGISTRY_MMAP', 'false').lower() == 'true'  # Все массивы через mmap
+    MODEL_REGISTRY_MMAP_MIN_MB = float(os.getenv('MODEL_REGISTRY_MMAP_MIN_MB', '256'))  # Буферы от этого размера - через mmap
+    MODEL_REGISTRY_WARMUP_CONCURRENCY = int(os.getenv('MODEL_REGISTRY_WARMUP_CONCURRENCY', '4'))
+
+    # Планировщик обучения
+    ML_TRAINING_WORKERS = int(os.getenv('ML_TRAINING_WORKERS', '0'))  # Процессы обучения (0 - ядра минус одно)
+    ML_TRAINING_THREADS = int(os.getenv('ML_TRAINING_THREADS', '1'))  # Потоков BLAS/моделей на процесс
+    ML_TRAINING_MEMORY_MB = int(os.getenv('ML_TRAINING_MEMORY_MB', '4096'))  # Лимит памяти процесса (0 - без лимита)
+    ML_TRAINING_NICE = int(os.getenv('ML_TRAINING_NICE', '10'))  # Приоритет процессов обучения ниже торгового
+    RETRAIN_TIMEFRAMES = os.getenv('RETRAIN_TIMEFRAMES', '5m')  # Таймфреймы переобучения через запятую
+    RETRAIN_CHECK_MINUTES = float(os.getenv('RETRAIN_CHECK_MINUTES', '15'))  # Проверка устаревших моделей
+    RETRAIN_ERROR_WINDOW = int(os.getenv('RETRAIN_ERROR_WINDOW', '200'))  # Последних проверенных предсказаний
+    RETRAIN_ERROR_THRESHOLD = float(os.getenv('RETRAIN_ERROR_THRESHOLD', '0.6'))  # Доля ошибок - переобучение раньше срока
+    RETRAIN_ERROR_WEIGHT = float(os.getenv('RETRAIN_ERROR_WEIGHT', '2.0'))  # Вес ошибки в приоритете
+    RETRAIN_MIN_AGE_HOURS = float(os.getenv('RETRAIN_MIN_AGE_HOURS', '1'))  # Не переобучать по ошибке чаще
+
+    # Инкрементальное дообучение (train(..., incremental=True))
+    ML_INCREMENTAL_RETRAIN = os.getenv('ML_INCREMENTAL_RETRAIN', 'true').lower() == 'true'  # Плановое переобучение - дообучение активной версии
+    INCREMENTAL_MIN_BARS = int(os.getenv('INCREMENTAL_MIN_BARS', '100'))  # Меньше новых баров - модель не трогаем
+    INCREMENTAL_ROUNDS = int(os.getenv('INCREMENTAL_ROUNDS', '20'))  # Максимум новых деревьев за дообучение
+    INCREMENTAL_EPOCHS = int(os.getenv('INCREMENTAL_EPOCHS', '5'))  # Проходов partial_fit по новым барам
+    INCREMENTAL_MAX_UPDATES = int(os.getenv('INCREMENTAL_MAX_UPDATES', '10'))  # Дообучений до полного переобучения
+    INCREMENTAL_PSI_THRESHOLD = float(os.getenv('INCREMENTAL_PSI_THRESHOLD', '0.25'))  # Минимальный PSI дрейфа признака
+    INCREMENTAL_DRIFT_SHARE = float(os.getenv('INCREMENTAL_DRIFT_SHARE', '0.1'))  # Доля дрейфующих признаков - с нуля
+    INCREMENTAL_MAX_SCORE_DROP = float(os.getenv('INCREMENTAL_MAX_SCORE_DROP', '0.25'))  # Ухудшение метрики - с нуля
+
+    # RL агент (train_on_history)
+    RL_PARALLEL_ENVS = int(os.getenv('RL_PARALLEL_ENVS', '16'))  # Эпизодов обучения одновременно (батч сред)
     
     # =================================================================
     # АНАЛИЗ НОВОСТЕЙ И СОЦИАЛЬНЫХ СЕТЕЙ
@@ -281,10 +344,31 @@ class Config:
     REDIS_PORT = int(os.getenv('REDIS_PORT', '6379'))
     REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', '')
     CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', '300'))
+    CANDLE_STORE_CAPACITY = int(os.getenv('CANDLE_STORE_CAPACITY', '1000'))  # Баров на (symbol, timeframe)
+    CANDLE_STORE_REFRESH_SECONDS = float(os.getenv('CANDLE_STORE_REFRESH_SECONDS', '5'))
+    ENABLE_FEATURE_CACHE = os.getenv('ENABLE_FEATURE_CACHE', 'true').lower() == 'true'
+    FEATURE_CACHE_MAX_ENTRIES = int(os.getenv('FEATURE_CACHE_MAX_ENTRIES', '32'))  # Матриц (symbol, timeframe) в памяти
+    FEATURE_CACHE_WARMUP_BARS = int(os.getenv('FEATURE_CACHE_WARMUP_BARS', '500'))  # Баров истории при досчете новых
+    FEATURE_CACHE_DIR = os.getenv('FEATURE_CACHE_DIR', 'cache/features')  # Пусто - без дискового уровня
+    INDICATOR_CACHE_MAX_MB = float(os.getenv('INDICATOR_CACHE_MAX_MB', '256'))  # Колонки индикаторов trials оптимизатора
     
     # Многопоточность
     MAX_CONCURRENT_ANALYSIS = int(os.getenv('MAX_CONCURRENT_ANALYSIS', '10'))
     ENABLE_ASYNC_PROCESSING = os.getenv('ENABLE_ASYNC_PROCESSING', 'true').lower() == 'true'
+    EXCHANGE_IO_WORKERS = int(os.getenv('EXCHANGE_IO_WORKERS', '8'))  # Потоки для синхронного ccxt
+    EXCHANGE_CACHE_TICKER_TTL = float(os.getenv('EXCHANGE_CACHE_TICKER_TTL', '1'))  # Кэш чтений биржи, секунды
+    EXCHANGE_CACHE_BALANCE_TTL = float(os.getenv('EXCHANGE_CACHE_BALANCE_TTL', '5'))
+    EXCHANGE_CACHE_ORDER_BOOK_TTL = float(os.getenv('EXCHANGE_CACHE_ORDER_BOOK_TTL', '0.5'))
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'  # Общий планировщик лимитов вместо троттлинга ccxt
+    RATE_LIMIT_IP_REQUESTS = float(os.getenv('RATE_LIMIT_IP_REQUESTS', '600'))  # Bybit: 600 запросов за 5 секунд
+    RATE_LIMIT_IP_WINDOW = float(os.getenv('RATE_LIMIT_IP_WINDOW', '5'))
+    RATE_LIMIT_ORDER_RESERVE = float(os.getenv('RATE_LIMIT_ORDER_RESERVE', '10'))  # Токены только для ордеров
+    MARKET_METADATA_PATH = os.getenv('MARKET_METADATA_PATH', 'data/market_metadata.json')  # Снимок рынков, к имени добавляются биржа и сеть (пусто - без диска)
+    MARKET_METADATA_REFRESH_SECONDS = float(os.getenv('MARKET_METADATA_REFRESH_SECONDS', '3600'))
+    WALK_FORWARD_WORKERS = int(os.getenv('WALK_FORWARD_WORKERS', '0'))  # Процессы walk-forward (0 - по числу ядер)
+    OPTUNA_STORAGE = os.getenv('OPTUNA_STORAGE', 'models/optimization/optuna.journal')  # Исследования Optuna: файл журнала, URL БД или пусто (в памяти)
+    OPTUNA_WORKERS = int(os.getenv('OPTUNA_WORKERS', '0'))  # Процессы на исследование (0 - по числу ядер)
+    OPTUNA_STALE_TRIAL_SECONDS = float(os.getenv('OPTUNA_STALE_TRIAL_SECONDS', '21600'))  # RUNNING trial другого хоста старше - брошенный
     
     # API настройки
     API_RATE_LIMIT_PER_MINUTE = int(os.getenv('API_RATE_LIMIT_PER_MINUTE', '1200'))
@@ -458,6 +542,11 @@ class Config:
     MOCK_TRADING = os.getenv('MOCK_TRADING', 'false').lower() == 'true'
     SIMULATE_LATENCY = os.getenv('SIMULATE_LATENCY', 'false').lower() == 'true'
     
+    # Симулятор биржи (src/exchange/simulated_exchange.py, connect('simulated'))
+    SIMULATED_LATENCY_MS = float(os.getenv('SIMULATED_LATENCY_MS', '20'))  # Задержка запроса при SIMULATE_LATENCY
+    SIMULATED_MAKER_FEE = float(os.getenv('SIMULATED_MAKER_FEE', '0.0002'))  # Комиссия maker (доля)
+    SIMULATED_TAKER_FEE = float(os.getenv('SIMULATED_TAKER_FEE', '0.00055'))  # Комиссия taker (доля)
+    
     # Отладочные эндпоинты
     ENABLE_DEBUG_ENDPOINTS = os.getenv('ENABLE_DEBUG_ENDPOINTS', 'true').lower() == 'true'
     ENABLE_TEST_DATA = os.getenv('ENABLE_TEST_DATA', 'true').lower() == 'true'
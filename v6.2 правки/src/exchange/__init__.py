@@ -12,6 +12,46 @@ try:
 except ImportError:
     get_real_exchange_client = None
 
+try:
+    from .order_tracker import OrderTracker, OrderState
+except ImportError:
+    OrderTracker = OrderState = None
+
+try:
+    from .read_cache import ExchangeReadCache
+except ImportError:
+    ExchangeReadCache = None
+
+try:
+    from .rate_limiter import RateLimitScheduler, Priority, get_rate_limiter
+except ImportError:
+    RateLimitScheduler = Priority = get_rate_limiter = None
+
+try:
+    from .market_metadata import MarketMetadata, get_market_metadata
+except ImportError:
+    MarketMetadata = get_market_metadata = None
+
+try:
+    from .emergency_flatten import EmergencyFlattener, FlattenReport
+except ImportError:
+    EmergencyFlattener = FlattenReport = None
+
+try:
+    from .pretrade_checks import PreTradeStage, PreTradeCheck
+except ImportError:
+    PreTradeStage = PreTradeCheck = None
+
+try:
+    from .simulated_exchange import SimulatedExchange, get_simulated_exchange
+except ImportError:
+    SimulatedExchange = get_simulated_exchange = None
+
+try:
+    from .position_ledger import PositionLedger, TradeRecord, get_position_ledger
+except ImportError:
+    PositionLedger = TradeRecord = get_position_ledger = None
+
 try:
     from .position_manager import get_position_manager
 except ImportError:
@@ -25,6 +65,23 @@ except ImportError:
 __all__ = [
     'ExchangeClient',
     'get_real_exchange_client',
+    'OrderTracker',
+    'OrderState',
+    'ExchangeReadCache',
+    'RateLimitScheduler',
+    'Priority',
+    'get_rate_limiter',
+    'MarketMetadata',
+    'get_market_metadata',
+    'EmergencyFlattener',
+    'FlattenReport',
+    'PreTradeStage',
+    'PreTradeCheck',
+    'SimulatedExchange',
+    'get_simulated_exchange',
+    'PositionLedger',
+    'TradeRecord',
+    'get_position_ledger',
     'get_position_manager',
     'get_execution_engine'
 ]
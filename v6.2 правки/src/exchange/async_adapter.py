@@ -0,0 +1,93 @@
+"""
+НЕБЛОКИРУЮЩИЙ АДАПТЕР ДЛЯ СИНХРОННОГО CCXT
+Файл: src/exchange/async_adapter.py
+
+Синхронный ccxt.bybit выполняет HTTP-запрос прямо в вызывающем потоке.
+Если вызывать его из async-методов, то на время каждого запроса
+замирает весь event loop: торговый цикл, мониторинг позиций, websocket.
+
+Адаптер переносит вызовы в ограниченный пул потоков:
+✅ Тот же набор методов, что и у обернутой биржи, но awaitable
+✅ Ограниченное число одновременных запросов (max_workers)
+✅ Атрибуты (markets, id, rateLimit) читаются без изменений
+✅ Сетевые вызовы проходят через общий RateLimitScheduler
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from ..logging.smart_logger import get_logger
+from ..core.config import config
+from .rate_limiter import RateLimitScheduler, get_rate_limiter
+
+logger = get_logger(__name__)
+
+
+class AsyncExchangeAdapter:
+    """
+    Async-обертка над синхронным экземпляром ccxt
+
+    Пример:
+        io = AsyncExchangeAdapter(ccxt.bybit(params))
+        ticker = await io.fetch_ticker('BTC/USDT')
+    """
+
+    def __init__(self, exchange: Any, max_workers: Optional[int] = None):
+        """
+        Args:
+            exchange: Синхронный экземпляр биржи ccxt
+            max_workers: Лимит одновременных запросов к бирже
+        """
+        self.exchange = exchange
+        self.max_workers = max_workers or config.EXCHANGE_IO_WORKERS
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='ccxt-io'
+        )
+        self.limiter = get_rate_limiter() if config.RATE_LIMIT_ENABLED else None
+        self._in_flight = 0
+        self._total_calls = 0
+
+    async def call(self, method: str, *args, **kwargs) -> Any:
+        """Вызов метода биржи в пуле потоков"""
+        func = getattr(self.exchange, method)
+        loop = asyncio.get_running_loop()
+        if self.limiter is not None and RateLimitScheduler.is_request(method):
+            await self.limiter.acquire(method)
+
+        self._in_flight += 1
+        self._total_calls += 1
+        try:
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+        finally:
+            self._in_flight -= 1
+
+    def __getattr__(self, name: str) -> Any:
+        """Методы биржи возвращаются как корутины, остальные атрибуты - как есть"""
+        attr = getattr(self.exchange, name)
+        if not callable(attr):
+            return attr
+
+        async def _method(*args, **kwargs):
+            return await self.call(name, *args, **kwargs)
+
+        _method.__name__ = name
+        return _method
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика пула запросов"""
+        return {
+            'max_workers': self.max_workers,
+            'in_flight': self._in_flight,
+            'total_calls': self._total_calls
+        }
+
+    def shutdown(self, wait: bool = False):
+        """Остановка пула потоков"""
+        self._executor.shutdown(wait=wait)
+
+
+__all__ = ['AsyncExchangeAdapter']
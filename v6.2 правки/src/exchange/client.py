@@ -9,10 +9,14 @@ from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime, timedelta
 import logging
 import os
-from decimal import Decimal, ROUND_DOWN
 
 from ..logging.smart_logger import get_logger
 from ..core.bybit_config import BybitConfig
+from ..core.config import config as app_config
+from .async_adapter import AsyncExchangeAdapter
+from .read_cache import ExchangeReadCache
+from .market_metadata import get_market_metadata, market_key
+from .emergency_flatten import EmergencyFlattener, FlattenReport
 
 logger = get_logger(__name__)
 
@@ -58,30 +62,54 @@ class RealExchangeClient:
     2. Testnet включен для тестирования  
     3. Баланс достаточен
     4. Риски контролируются
+    
+    Синхронный ccxt вызывается через AsyncExchangeAdapter (self.io),
+    поэтому сетевые запросы не блокируют event loop. Тикеры и баланс
+    читаются через ExchangeReadCache (self.reads), точность и лимиты
+    рынков - из MarketMetadata (self.market_metadata).
     """
     
-    def __init__(self):
-        """Инициализация реального клиента"""
+    def __init__(self, exchange: Optional[Any] = None):
+        """
+        Инициализация реального клиента
+        
+        Args:
+            exchange: Готовый синхронный экземпляр ccxt (по умолчанию - Bybit из конфигурации)
+        """
         self.exchange = None
+        self.io = None
+        self.reads = None
+        self.market_metadata = get_market_metadata()
         self.is_connected = False
         self.last_request_time = {}
-        self._init_exchange()
+        self._init_exchange(exchange)
     
-    def _init_exchange(self):
+    def _init_exchange(self, exchange: Optional[Any] = None):
         """Инициализация подключения к бирже"""
         try:
             config = BybitConfig.get_exchange_config()
             
-            # Проверяем что API ключи есть
-            if not config.get('apiKey') or not config.get('secret'):
-                raise ValueError("❌ API ключи Bybit не настроены!")
+            if exchange is None:
+                # Проверяем что API ключи есть
+                if not config.get('apiKey') or not config.get('secret'):
+                    raise ValueError("❌ API ключи Bybit не настроены!")
+                
+                # Создаем подключение к Bybit
+                exchange = ccxt.bybit(config)
             
-            # Создаем подключение к Bybit
-            self.exchange = ccxt.bybit(config)
+            self.exchange = exchange
+            self.market_metadata = get_market_metadata(*market_key(exchange))
             
             # Проверяем подключение
             self._test_connection()
             
+            # Неблокирующий доступ к бирже из async-методов
+            self.io = AsyncExchangeAdapter(self.exchange)
+            self.reads = ExchangeReadCache(self.io)
+            
+            # Рынки один раз (снимок с диска или load_markets), дальше фоновое обновление
+            self.market_metadata.ensure_loaded_sync(self.exchange, self.io)
+            
             logger.info(
                 "✅ Bybit клиент инициализирован",
                 category='exchange',
@@ -115,15 +143,21 @@ class RealExchangeClient:
             self.is_connected = False
             raise
     
+    async def disconnect(self):
+        """Отключение от биржи и остановка пула запросов"""
+        if self.io:
+            self.io.shutdown()
+        self.is_connected = False
+    
     async def human_delay(self):
-        """Имитация человеческих задержек"""
-        delay = random.uniform(0.1, 0.3)
-        await asyncio.sleep(delay)
+        """Имитация человеческих задержек (ENABLE_HUMAN_MODE; лимиты - RateLimitScheduler)"""
+        if app_config.ENABLE_HUMAN_MODE:
+            await asyncio.sleep(random.uniform(0.1, 0.3))
     
     async def micro_delay(self):
-        """Микро-задержка между запросами"""
-        delay = random.uniform(0.01, 0.05)
-        await asyncio.sleep(delay)
+        """Микро-задержка между запросами (ENABLE_HUMAN_MODE)"""
+        if app_config.ENABLE_HUMAN_MODE:
+            await asyncio.sleep(random.uniform(0.01, 0.05))
     
     # =================================================================
     # РЕАЛЬНЫЕ ТОРГОВЫЕ ОПЕРАЦИИ
@@ -193,13 +227,14 @@ class RealExchangeClient:
                 price=price
             )
             
-            order = self.exchange.create_order(
+            order = await self.io.create_order(
                 symbol=symbol,
                 type=order_type,
                 side=side,
                 amount=amount,
                 price=price if order_type != 'market' else None
             )
+            self.reads.invalidate('balance')
             
             # 5. Размещаем стоп-лосс и тейк-профит если заданы
             if order and order.get('status') in ['closed', 'filled']:
@@ -245,17 +280,15 @@ class RealExchangeClient:
                                    price: Optional[float]) -> Dict:
         """Валидация параметров ордера"""
         try:
-            # Получаем информацию о рынке
-            markets = self.exchange.load_markets()
+            # Получаем информацию о рынке (без запроса к бирже)
+            market = self.market_metadata.get(symbol)
             
-            if symbol not in markets:
+            if market is None:
                 return {'valid': False, 'reason': f'Символ {symbol} не найден'}
             
-            market = markets[symbol]
-            
             # Проверяем минимальные лимиты
-            min_amount = market['limits']['amount']['min']
-            max_amount = market['limits']['amount']['max']
+            min_amount = market.min_amount
+            max_amount = market.max_amount
             
             if amount < min_amount:
                 return {'valid': False, 'reason': f'Слишком маленький размер: {amount} < {min_amount}'}
@@ -268,14 +301,17 @@ class RealExchangeClient:
                 return {'valid': False, 'reason': 'Цена обязательна для лимитного ордера'}
             
             if price:
-                min_price = market['limits']['price']['min']
-                max_price = market['limits']['price']['max']
+                min_price = market.min_price
+                max_price = market.max_price
                 
                 if min_price and price < min_price:
                     return {'valid': False, 'reason': f'Слишком низкая цена: {price} < {min_price}'}
                 
                 if max_price and price > max_price:
                     return {'valid': False, 'reason': f'Слишком высокая цена: {price} > {max_price}'}
+                
+                if market.min_notional and amount * price < market.min_notional:
+                    return {'valid': False, 'reason': f'Слишком маленькая стоимость: {amount * price} < {market.min_notional}'}
             
             return {'valid': True, 'reason': 'OK'}
             
@@ -345,7 +381,7 @@ class RealExchangeClient:
             # Размещаем стоп-лосс
             if stop_loss:
                 try:
-                    sl_order = self.exchange.create_order(
+                    sl_order = await self.io.create_order(
                         symbol=symbol,
                         type='stop_market',
                         side=close_side,
@@ -368,7 +404,7 @@ class RealExchangeClient:
             # Размещаем тейк-профит
             if take_profit:
                 try:
-                    tp_order = self.exchange.create_order(
+                    tp_order = await self.io.create_order(
                         symbol=symbol,
                         type='limit',
                         side=close_side,
@@ -400,9 +436,9 @@ class RealExchangeClient:
         
         try:
             if symbol:
-                orders = self.exchange.fetch_open_orders(symbol)
+                orders = await self.io.fetch_open_orders(symbol)
             else:
-                orders = self.exchange.fetch_open_orders()
+                orders = await self.io.fetch_open_orders()
             
             return orders
             
@@ -415,7 +451,8 @@ class RealExchangeClient:
         await self.human_delay()
         
         try:
-            result = self.exchange.cancel_order(order_id, symbol)
+            result = await self.io.cancel_order(order_id, symbol)
+            self.reads.invalidate('balance')
             
             logger.info(
                 f"✅ Ордер отменен",
@@ -461,7 +498,7 @@ class RealExchangeClient:
         await self.micro_delay()
         
         try:
-            positions = self.exchange.fetch_positions()
+            positions = await self.io.fetch_positions()
             # Фильтруем только открытые позиции
             open_positions = [pos for pos in positions if float(pos.get('contracts', 0)) > 0]
             
@@ -514,23 +551,23 @@ class RealExchangeClient:
             logger.error(f"❌ Ошибка закрытия позиции {symbol}: {e}")
             return False
     
+    async def emergency_flatten(self) -> FlattenReport:
+        """Отмена всех ордеров и параллельные reduce-only закрытия позиций"""
+        report = await EmergencyFlattener(self.io).flatten()
+        self.reads.invalidate()
+        return report
+    
     async def close_all_positions(self) -> int:
         """Закрытие всех позиций"""
         try:
-            positions = await self.fetch_positions()
-            closed_count = 0
-            
-            for position in positions:
-                symbol = position['symbol']
-                if await self.close_position(symbol):
-                    closed_count += 1
+            report = await self.emergency_flatten()
             
             logger.info(
-                f"✅ Закрыто позиций: {closed_count}",
+                f"✅ Закрыто позиций: {report.closed_count}",
                 category='trade'
             )
             
-            return closed_count
+            return report.closed_count
             
         except Exception as e:
             logger.error(f"❌ Ошибка закрытия всех позиций: {e}")
@@ -541,23 +578,37 @@ class RealExchangeClient:
     # =================================================================
     
     async def fetch_ticker(self, symbol: str) -> Dict:
-        """Получить тикер"""
-        await self.micro_delay()
+        """Получить тикер (кэш чтений; задержка - только при запросе к бирже)"""
+        async def load():
+            await self.micro_delay()
+            return await self.io.fetch_ticker(symbol)
         
         try:
-            ticker = self.exchange.fetch_ticker(symbol)
-            return ticker
+            return await self.reads.get('ticker', symbol, load)
         except Exception as e:
             logger.error(f"❌ Ошибка получения тикера {symbol}: {e}")
             raise
     
+    async def fetch_tickers(self, symbols: List[str]) -> Dict[str, Dict]:
+        """Получить тикеры нескольких символов одним запросом"""
+        async def load(missing):
+            await self.micro_delay()
+            return await self.io.fetch_tickers(missing)
+        
+        try:
+            return await self.reads.fetch_tickers(symbols, loader=load)
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения тикеров: {e}")
+            raise
+    
     async def fetch_balance(self) -> Dict:
-        """Получить баланс"""
-        await self.human_delay()
+        """Получить баланс (кэш чтений)"""
+        async def load():
+            await self.human_delay()
+            return await self.io.fetch_balance()
         
         try:
-            balance = self.exchange.fetch_balance()
-            return balance
+            return await self.reads.get('balance', None, load)
         except Exception as e:
             logger.error(f"❌ Ошибка получения баланса: {e}")
             raise
@@ -568,7 +619,7 @@ class RealExchangeClient:
         await self.micro_delay()
         
         try:
-            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+            ohlcv = await self.io.fetch_ohlcv(symbol, timeframe, limit=limit)
             candles = []
             
             for candle in ohlcv:
@@ -586,41 +637,38 @@ class RealExchangeClient:
             logger.error(f"❌ Ошибка получения свечей {symbol}: {e}")
             raise
 
-    def calculate_position_size(self, symbol: str, balance: float, 
-                              risk_percent: float) -> float:
-        """Расчет размера позиции"""
+    async def calculate_position_size(self, symbol: str, balance: float, 
+                                      risk_percent: float, price: Optional[float] = None) -> float:
+        """
+        Расчет размера позиции
+        
+        Шаг лота и минимум - из MarketMetadata, цена - переданная или
+        тикер через fetch_ticker (кэш чтений, запрос к бирже - в executor,
+        без блокировки цикла событий).
+        """
         try:
             # Получаем информацию о рынке
-            markets = self.exchange.load_markets()
+            market = self.market_metadata.get(symbol)
             
-            if symbol not in markets:
+            if market is None:
                 logger.error(f"❌ Символ {symbol} не найден")
                 return 0.001
             
-            market = markets[symbol]
-            
             # Рассчитываем размер позиции
             risk_amount = balance * (risk_percent / 100)
             
             # Получаем текущую цену
-            ticker = self.exchange.fetch_ticker(symbol)
-            current_price = ticker['last']
-            
-            # Рассчитываем количество
-            quantity = risk_amount / current_price
-            
-            # Учитываем минимальный размер позиции
-            min_amount = market['limits']['amount']['min']
+            current_price = price
+            if current_price is None:
+                ticker = await self.fetch_ticker(symbol)
+                current_price = ticker['last']
             
-            # Округляем до precision
-            precision = market['precision']['amount']
-            quantity = float(Decimal(str(quantity)).quantize(
-                Decimal('0.' + '0' * precision), rounding=ROUND_DOWN
-            ))
+            # Рассчитываем количество и округляем вниз до шага лота
+            quantity = self.market_metadata.round_amount(symbol, risk_amount / current_price)
             
             # Проверяем минимум
-            if quantity < min_amount:
-                quantity = min_amount
+            if quantity < market.min_amount:
+                quantity = market.min_amount
             
             return quantity
             
@@ -0,0 +1,287 @@
+"""
+ЭКСТРЕННОЕ ЗАКРЫТИЕ ВСЕХ ПОЗИЦИЙ
+Файл: src/exchange/emergency_flatten.py
+
+Раньше close_all_positions закрывал позиции по одной: на каждую -
+fetch_positions, проверка баланса, задержка "человека", ожидание
+исполнения, а отмена ордеров шла отдельно после закрытий. 20 позиций -
+больше 10 секунд, пока цена уходит.
+
+EmergencyFlattener:
+✅ Отмена всех ордеров одним запросом (по settleCoin или по символам -
+   если биржа требует) параллельно с закрытиями
+✅ Reduce-only рыночные закрытия одновременно, не больше
+   EMERGENCY_FLATTEN_CONCURRENCY в полете; темп - общий RateLimitScheduler
+   (полоса ордеров), без задержек имитации человека
+✅ Повтор ошибок с экспоненциальной задержкой; отказ биржи по существу
+   (InvalidOrder, InsufficientFunds) не повторяется
+✅ Сверка через fetch_positions: оставшиеся позиции закрываются в
+   следующем раунде
+✅ Ошибка получения позиций не срывает отмену ордеров - отчет не flat
+✅ Отчет по каждому символу и время до нулевой позиции
+"""
+import asyncio
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+import ccxt
+
+from ..core.config import config
+from ..logging.smart_logger import get_logger
+
+logger = get_logger(__name__)
+
+# Ошибки, которые повтор не исправит
+NON_RETRYABLE_ERRORS = (
+    ccxt.InvalidOrder,
+    ccxt.InsufficientFunds,
+    ccxt.AuthenticationError,
+    ccxt.BadSymbol,
+)
+
+
+@dataclass
+class SymbolFlattenResult:
+    """Результат закрытия позиции по символу"""
+    symbol: str
+    side: str
+    size: float
+    status: str = 'pending'          # closed / failed / rejected
+    attempts: int = 0
+    order_ids: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    seconds: float = 0.0             # от начала до подтверждения закрытия
+
+
+@dataclass
+class FlattenReport:
+    """Отчет экстренного закрытия"""
+    results: Dict[str, SymbolFlattenResult] = field(default_factory=dict)
+    cancelled_orders: int = 0
+    cancel_errors: List[str] = field(default_factory=list)
+    remaining: List[str] = field(default_factory=list)
+    rounds: int = 0
+    verified: bool = False           # позиции сверены с биржей
+    positions_error: Optional[str] = None  # позиции не получены - закрытия не было
+    seconds: float = 0.0             # до нулевых позиций и отмены ордеров
+
+    @property
+    def flat(self) -> bool:
+        return (self.positions_error is None and not self.remaining
+                and all(r.status == 'closed' for r in self.results.values()))
+
+    @property
+    def closed_count(self) -> int:
+        return sum(1 for r in self.results.values() if r.status == 'closed')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'flat': self.flat,
+            'closed_count': self.closed_count,
+            'cancelled_orders': self.cancelled_orders,
+            'cancel_errors': self.cancel_errors,
+            'remaining': self.remaining,
+            'rounds': self.rounds,
+            'verified': self.verified,
+            'positions_error': self.positions_error,
+            'seconds': self.seconds,
+            'results': {symbol: asdict(result) for symbol, result in self.results.items()}
+        }
+
+
+class EmergencyFlattener:
+    """
+    Параллельное закрытие всех позиций с отменой ордеров
+
+    Пример:
+        report = await EmergencyFlattener(exchange).flatten()
+        if not report.flat:
+            logger.critical(f"Не закрыты: {report.remaining}")
+    """
+
+    def __init__(self, exchange: Any, max_concurrency: Optional[int] = None,
+                 max_retries: Optional[int] = None, backoff: Optional[float] = None,
+                 max_rounds: Optional[int] = None):
+        """
+        Args:
+            exchange: Async-клиент биржи (ccxt.async_support, RateLimitedExchange или AsyncExchangeAdapter)
+            max_concurrency: Закрытий в полете одновременно
+            max_retries: Повторов одного закрытия после ошибки
+            backoff: Базовая задержка повтора, секунды (удваивается)
+            max_rounds: Раундов закрытие + сверка позиций
+        """
+        self.exchange = exchange
+        self.max_concurrency = max_concurrency or config.EMERGENCY_FLATTEN_CONCURRENCY
+        self.max_retries = config.EMERGENCY_FLATTEN_RETRIES if max_retries is None else max_retries
+        self.backoff = config.EMERGENCY_FLATTEN_BACKOFF_SECONDS if backoff is None else backoff
+        self.max_rounds = max_rounds or config.EMERGENCY_FLATTEN_ROUNDS
+
+    @staticmethod
+    def _open_positions(positions: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Открытые позиции ccxt по символу"""
+        return {
+            pos['symbol']: pos for pos in positions
+            if float(pos.get('contracts') or 0) > 0
+        }
+
+    # =================================================================
+    # ОТМЕНА ОРДЕРОВ
+    # =================================================================
+
+    async def cancel_all_orders(self, symbols: List[str], report: FlattenReport):
+        """Отмена всех ордеров: одним запросом, иначе по символам одновременно"""
+        try:
+            cancelled = await self.exchange.cancel_all_orders()
+            report.cancelled_orders += len(cancelled) if isinstance(cancelled, list) else 0
+            return
+        except Exception as e:
+            logger.warning(f"⚠️ Отмена всех ордеров одним запросом не прошла: {e}", category='trade')
+
+        # Bybit деривативы: без символа отменяет только с settleCoin ('BTC/USDT:USDT' -> USDT)
+        settle_coins = {symbol.split(':', 1)[1] for symbol in symbols if ':' in symbol}
+        if settle_coins:
+            results = await asyncio.gather(
+                *(self.exchange.cancel_all_orders(None, {'settleCoin': coin}) for coin in settle_coins),
+                return_exceptions=True
+            )
+            if not any(isinstance(result, Exception) for result in results):
+                report.cancelled_orders += sum(len(r) for r in results if isinstance(r, list))
+                return
+
+        symbols = set(symbols)
+        try:
+            symbols.update(order['symbol'] for order in await self.exchange.fetch_open_orders())
+        except Exception as e:
+            report.cancel_errors.append(f"fetch_open_orders: {e}")
+
+        results = await asyncio.gather(
+            *(self.exchange.cancel_all_orders(symbol) for symbol in symbols),
+            return_exceptions=True
+        )
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                report.cancel_errors.append(f"{symbol}: {result}")
+            elif isinstance(result, list):
+                report.cancelled_orders += len(result)
+
+    # =================================================================
+    # ЗАКРЫТИЕ ПОЗИЦИЙ
+    # =================================================================
+
+    async def _close(self, position: Dict[str, Any], result: SymbolFlattenResult,
+                     semaphore: asyncio.Semaphore, started: float):
+        """Reduce-only закрытие одной позиции с повторами"""
+        close_side = 'sell' if position.get('side', 'long') == 'long' else 'buy'
+        amount = float(position['contracts'])
+
+        for attempt in range(self.max_retries + 1):
+            result.attempts += 1
+            try:
+                async with semaphore:
+                    order = await self.exchange.create_order(
+                        position['symbol'], 'market', close_side, amount, None, {'reduceOnly': True}
+                    )
+                if order and order.get('id'):
+                    result.order_ids.append(str(order['id']))
+                result.status = 'closed'
+                result.error = None
+                result.seconds = time.perf_counter() - started
+                return
+            except NON_RETRYABLE_ERRORS as e:
+                result.status = 'rejected'
+                result.error = str(e)
+                return
+            except Exception as e:
+                result.status = 'failed'
+                result.error = str(e)
+                if attempt < self.max_retries:
+                    delay = self.backoff * 2 ** attempt
+                    await asyncio.sleep(delay + random.uniform(0, delay * 0.5))
+
+    async def flatten(self, positions: Optional[List[Dict[str, Any]]] = None) -> FlattenReport:
+        """
+        Отменить ордера и закрыть все позиции
+
+        Args:
+            positions: Позиции ccxt (по умолчанию - fetch_positions)
+
+        Returns:
+            FlattenReport по каждому символу
+        """
+        started = time.perf_counter()
+        report = FlattenReport()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if positions is None:
+            try:
+                positions = await self.exchange.fetch_positions()
+            except Exception as e:
+                # Ордера отменяем и без списка позиций
+                logger.critical(f"🚨 Позиции не получены, закрытие невозможно: {e}", category='trade')
+                report.positions_error = str(e)
+                positions = []
+        open_positions = self._open_positions(positions)
+
+        logger.critical(
+            f"🚨 Экстренное закрытие: позиций {len(open_positions)}",
+            category='trade'
+        )
+
+        # Отмена ордеров идет параллельно с закрытиями
+        cancel_task = asyncio.create_task(self.cancel_all_orders(list(open_positions), report))
+
+        while open_positions and report.rounds < self.max_rounds:
+            report.rounds += 1
+            for symbol, position in open_positions.items():
+                report.results.setdefault(symbol, SymbolFlattenResult(
+                    symbol=symbol,
+                    side=position.get('side', 'long'),
+                    size=float(position['contracts'])
+                ))
+            await asyncio.gather(*(
+                self._close(position, report.results[symbol], semaphore, started)
+                for symbol, position in open_positions.items()
+            ))
+
+            # Сверка: что осталось открытым после закрытий
+            try:
+                open_positions = self._open_positions(await self.exchange.fetch_positions())
+                report.verified = True
+            except Exception as e:
+                logger.error(f"❌ Сверка позиций после закрытия не удалась: {e}", category='trade')
+                report.verified = False
+                break
+            for symbol, result in report.results.items():
+                if symbol not in open_positions:
+                    if result.status != 'closed':
+                        result.status, result.seconds = 'closed', time.perf_counter() - started
+                elif result.status == 'closed':
+                    # Ордер принят, но позиция осталась (частичное исполнение)
+                    result.status, result.error = 'failed', 'позиция открыта после закрытия'
+            # Отказ по существу в следующем раунде не повторяем
+            open_positions = {
+                symbol: position for symbol, position in open_positions.items()
+                if symbol not in report.results or report.results[symbol].status != 'rejected'
+            }
+
+        report.remaining = sorted(
+            symbol for symbol, result in report.results.items() if result.status != 'closed'
+        )
+        await cancel_task
+        report.seconds = time.perf_counter() - started
+
+        log = logger.critical if report.remaining or report.positions_error else logger.info
+        log(
+            f"🚨 Экстренное закрытие завершено: {report.closed_count}/{len(report.results)} "
+            f"за {report.seconds:.2f}с",
+            category='trade',
+            cancelled_orders=report.cancelled_orders,
+            remaining=report.remaining,
+            rounds=report.rounds
+        )
+        return report
+
+
+__all__ = ['EmergencyFlattener', 'FlattenReport', 'SymbolFlattenResult']
@@ -51,12 +51,28 @@ except ImportError:
     import logging
     logger = logging.getLogger(__name__)
 
+from ..core.config import config
+from .pretrade_checks import CheckResult, PreTradeCheck, PreTradeStage
+
 try:
     from .real_client import get_real_exchange_client
 except ImportError:
     def get_real_exchange_client():
         return None
 
+try:
+    from .simulated_exchange import get_simulated_exchange
+except ImportError:
+    get_simulated_exchange = None
+
+# Префикс order_id сделок, исполненных в симуляторе без биржи
+SIMULATED_ORDER_PREFIX = 'sim-'
+
+try:
+    from .position_ledger import TradeRecord, get_position_ledger
+except ImportError:
+    TradeRecord = get_position_ledger = None
+
 try:
     from .position_manager import get_position_manager, PositionInfo
 except ImportError:
@@ -126,6 +142,15 @@ class OrderExecutionEngine:
     └─────────────────┘    └──────────────────┘    └─────────────────┘
     """
     
+    # Параметры риска, если риск-менеджер недоступен или не ответил
+    DEFAULT_RISK_PARAMS = {
+        'position_size': 0.01,
+        'stop_loss': 0.02,  # 2%
+        'take_profit': 0.04,  # 4%
+        'expected_slippage': 0.001,  # 0.1%
+        'max_risk_per_trade': 0.02  # 2% от депозита
+    }
+    
     def __init__(self, max_concurrent_executions: int = 3):
         """
         Инициализация движка исполнения
@@ -149,6 +174,9 @@ class OrderExecutionEngine:
         self.average_execution_time = 0.0
         self.emergency_stop = False
         
+        # Предторговые проверки - одновременно, с дедлайнами и кэшем в пределах бара
+        self.pretrade = PreTradeStage()
+        
         # Настройки валидации
         self.validation_settings = {
             'min_confidence': 0.6,      # Минимальная уверенность сигнала
@@ -172,9 +200,10 @@ class OrderExecutionEngine:
         Основной метод исполнения торгового сигнала
         
         Полный пайплайн:
-        1. Валидация сигнала через риск-менеджер
-        2. Расчет оптимального размера позиции
-        3. Проверка ликвидности и рыночных условий
+        1. Проверка уверенности сигнала
+        2. Одновременно: валидация риск-менеджером, корреляция позиций,
+           расчет размера позиции, стакан (PreTradeStage)
+        3. Проверка ликвидности под рассчитанный размер
         4. Размещение ордера на бирже
         5. Мониторинг исполнения
         6. Создание записи в БД
@@ -220,8 +249,12 @@ class OrderExecutionEngine:
                     error_message=validation_result['reason']
                 )
             
-            # 2. РАСЧЕТ РАЗМЕРА ПОЗИЦИИ
-            risk_params = await self._calculate_risk_parameters(signal, market_conditions)
+            # 2. НЕЗАВИСИМЫЕ ПРОВЕРКИ И РАСЧЕТ РАЗМЕРА ПОЗИЦИИ - ОДНОВРЕМЕННО
+            passed, checks = await self.pretrade.run(
+                self._pretrade_checks(signal, market_conditions),
+                cache_key=self._pretrade_cache_key(signal, market_conditions)
+            )
+            risk_params = checks['risk_params'].data if 'risk_params' in checks else {}
             
             execution_request = ExecutionRequest(
                 signal=signal,
@@ -233,8 +266,16 @@ class OrderExecutionEngine:
                 expected_slippage=risk_params.get('expected_slippage', 0.0)
             )
             
-            # 3. ПРОВЕРКА ЛИКВИДНОСТИ
-            liquidity_check = await self._check_liquidity(execution_request)
+            if not passed:
+                rejection = next(result for result in checks.values() if not result.passed)
+                return ExecutionResult(
+                    request=execution_request,
+                    status=ExecutionStatus.REJECTED,
+                    error_message=rejection.reason
+                )
+            
+            # 3. ПРОВЕРКА ЛИКВИДНОСТИ (стакан уже получен)
+            liquidity_check = self._check_liquidity(execution_request, checks['liquidity'].data)
             if not liquidity_check['sufficient']:
                 return ExecutionResult(
                     request=execution_request,
@@ -246,6 +287,10 @@ class OrderExecutionEngine:
             execution_result = await self._execute_order(execution_request)
             
             # 5. ЗАПИСЬ В БД
+            if execution_result.order_id is not None:
+                # Ордер ушел на биржу (возможно, частично исполнен): баланс и
+                # экспозиция изменились - решения риск-менеджера по всем символам устарели
+                self.pretrade.invalidate()
             if execution_result.status == ExecutionStatus.COMPLETED:
                 await self._save_trade_to_db(execution_result)
             
@@ -273,21 +318,84 @@ class OrderExecutionEngine:
                 error_message=str(e)
             )
     
+    @staticmethod
+    def _pretrade_cache_key(signal: TradingSignal, market_conditions: Dict[str, Any]) -> Tuple[Any, Any, Any]:
+        """
+        Ключ кэша PreTradeStage: (symbol, action, бар и входные данные расчета)
+        
+        Вердикт риск-менеджера и размер позиции зависят не только от бара:
+        сигнал того же бара с другой уверенностью, ценой, стоп-лоссом или
+        балансом считается заново.
+        """
+        inputs = (
+            PreTradeStage.bar_id(market_conditions),
+            signal.confidence,
+            getattr(signal, 'price', None),
+            getattr(signal, 'stop_loss', None),
+            market_conditions.get('balance')
+        )
+        return signal.symbol, signal.action, inputs
+    
+    def _pretrade_checks(self, signal: TradingSignal, 
+                         market_conditions: Dict[str, Any]) -> List[PreTradeCheck]:
+        """
+        Независимые проверки сигнала для PreTradeStage
+        
+        При дедлайне или ошибке проверка ведет себя как раньше при ошибке:
+        риск-менеджер и корреляция пропускают, размер - по умолчанию,
+        ликвидность - пропускает.
+        """
+        async def risk_validation():
+            result = await self._validate_with_risk_manager(signal, market_conditions)
+            return CheckResult(result['valid'], result.get('reason', ''))
+        
+        async def correlation():
+            result = await self._check_position_correlation(signal)
+            if result['high_correlation']:
+                return CheckResult(
+                    False, f"High correlation with existing positions: {result['correlation']}"
+                )
+            return CheckResult(True)
+        
+        async def risk_params():
+            return CheckResult(True, data=await self._calculate_risk_parameters(signal, market_conditions))
+        
+        async def liquidity():
+            snapshot = await self._fetch_liquidity(signal)
+            return CheckResult(snapshot['sufficient'], snapshot.get('reason', ''), snapshot)
+        
+        return [
+            PreTradeCheck('risk_validation', risk_validation, CheckResult(True), cacheable=True),
+            PreTradeCheck('correlation', correlation, CheckResult(True)),
+            PreTradeCheck('risk_params', risk_params, CheckResult(True, data=dict(self.DEFAULT_RISK_PARAMS)),
+                          cacheable=True),
+            PreTradeCheck('liquidity', liquidity,
+                          CheckResult(True, 'Check failed, proceeding', {'available_volume': None}),
+                          timeout=config.PRETRADE_LIQUIDITY_TIMEOUT_SECONDS),
+        ]
+    
     async def _validate_signal(self, signal: TradingSignal, 
                              market_conditions: Dict[str, Any]) -> Dict[str, Any]:
-        """Валидация торгового сигнала"""
+        """Базовая валидация торгового сигнала (без запросов)"""
         
-        # Базовая валидация
         if signal.confidence < self.validation_settings['min_confidence']:
             return {
                 'valid': False,
                 'reason': f"Low confidence: {signal.confidence} < {self.validation_settings['min_confidence']}"
             }
         
-        # Валидация через риск-менеджер
+        return {'valid': True}
+    
+    async def _validate_with_risk_manager(self, signal: TradingSignal, 
+                                          market_conditions: Dict[str, Any]) -> Dict[str, Any]:
+        """Валидация сигнала через риск-менеджер"""
+        
         if self.risk_manager:
             try:
-                risk_check = self.risk_manager.validate_signal(signal, market_conditions)
+                # Синхронный риск-менеджер - в потоке, чтобы дедлайн проверки работал
+                risk_check = await asyncio.to_thread(
+                    self.risk_manager.validate_signal, signal, market_conditions
+                )
                 if not risk_check.get('approved', True):
                     return {
                         'valid': False,
@@ -296,72 +404,72 @@ class OrderExecutionEngine:
             except Exception as e:
                 logger.warning(f"⚠️ Ошибка валидации через риск-менеджер: {e}")
         
-        # Проверка корреляции с открытыми позициями
-        if self.position_manager:
-            try:
-                correlation_check = await self._check_position_correlation(signal)
-                if correlation_check['high_correlation']:
-                    return {
-                        'valid': False,
-                        'reason': f"High correlation with existing positions: {correlation_check['correlation']}"
-                    }
-            except Exception as e:
-                logger.warning(f"⚠️ Ошибка проверки корреляции: {e}")
-        
         return {'valid': True}
     
     async def _calculate_risk_parameters(self, signal: TradingSignal, 
                                        market_conditions: Dict[str, Any]) -> Dict[str, Any]:
         """Расчет параметров риска и размера позиции"""
         
-        default_params = {
-            'position_size': 0.01,
-            'stop_loss': 0.02,  # 2%
-            'take_profit': 0.04,  # 4%
-            'expected_slippage': 0.001,  # 0.1%
-            'max_risk_per_trade': 0.02  # 2% от депозита
-        }
-        
         if self.risk_manager:
             try:
-                risk_params = self.risk_manager.calculate_position_size(
-                    signal, market_conditions
+                risk_params = await asyncio.to_thread(
+                    self.risk_manager.calculate_position_size, signal, market_conditions
                 )
                 if risk_params:
                     return risk_params
             except Exception as e:
                 logger.warning(f"⚠️ Ошибка расчета риск-параметров: {e}")
         
-        return default_params
+        return dict(self.DEFAULT_RISK_PARAMS)
     
-    async def _check_liquidity(self, request: ExecutionRequest) -> Dict[str, Any]:
-        """Проверка ликвидности для ордера"""
+    async def _fetch_liquidity(self, signal: TradingSignal) -> Dict[str, Any]:
+        """Стакан по стороне сигнала: объем первых 5 уровней"""
         
         if not self.exchange:
-            return {'sufficient': True, 'reason': 'Exchange not available for check'}
+            return {'sufficient': True, 'reason': 'Exchange not available for check', 'available_volume': None}
         
-        try:
-            # Получаем стакан ордеров
-            orderbook = await self.exchange.fetch_order_book(request.signal.symbol)
-            
-            if not orderbook or not orderbook.get('bids') or not orderbook.get('asks'):
-                return {'sufficient': False, 'reason': 'Empty orderbook'}
-            
-            # Проверяем достаточность ликвидности
-            side = 'asks' if request.signal.action in ['BUY', 'LONG'] else 'bids'
-            available_volume = sum([price_level[1] for price_level in orderbook[side][:5]])
-            
-            if available_volume < request.quantity * 10:  # 10x запас
-                return {
-                    'sufficient': False,
-                    'reason': f'Low liquidity: {available_volume} < {request.quantity * 10}'
-                }
-            
-            return {'sufficient': True}
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Ошибка проверки ликвидности: {e}")
-            return {'sufficient': True, 'reason': 'Check failed, proceeding'}
+        side = 'asks' if signal.action in ['BUY', 'LONG'] else 'bids'
+        
+        # Локальный стакан из потока - без сетевого запроса
+        get_local_order_book = getattr(self.exchange, 'get_local_order_book', None)
+        book = await get_local_order_book(signal.symbol) if get_local_order_book else None
+        if book is not None:
+            if book.best_bid is None or book.best_ask is None:
+                return {'sufficient': False, 'reason': 'Insufficient liquidity: Empty orderbook'}
+            return {'sufficient': True, 'available_volume': book.depth(side, 5), 'book': book}
+        
+        # Получаем стакан ордеров (ошибка - запасной результат проверки)
+        orderbook = await self.exchange.fetch_order_book(signal.symbol)
+        
+        if not orderbook or not orderbook.get('bids') or not orderbook.get('asks'):
+            return {'sufficient': False, 'reason': 'Insufficient liquidity: Empty orderbook'}
+        
+        return {
+            'sufficient': True,
+            'available_volume': sum([price_level[1] for price_level in orderbook[side][:5]])
+        }
+    
+    def _check_liquidity(self, request: ExecutionRequest, liquidity: Dict[str, Any]) -> Dict[str, Any]:
+        """Проверка ликвидности для ордера рассчитанного размера"""
+        
+        available_volume = liquidity.get('available_volume')
+        if available_volume is None:
+            return {'sufficient': True, 'reason': liquidity.get('reason', 'Check skipped')}
+        
+        if available_volume < request.quantity * 10:  # 10x запас
+            return {
+                'sufficient': False,
+                'reason': f'Low liquidity: {available_volume} < {request.quantity * 10}'
+            }
+        
+        # Проскальзывание под рассчитанный размер - по локальному стакану
+        book = liquidity.get('book')
+        if book is not None and request.quantity:
+            slippage = book.slippage(request.signal.action, request.quantity)
+            if slippage is not None:
+                request.expected_slippage = slippage
+        
+        return {'sufficient': True}
     
     async def _check_position_correlation(self, signal: TradingSignal) -> Dict[str, Any]:
         """Проверка корреляции с существующими позициями"""
@@ -370,7 +478,8 @@ class OrderExecutionEngine:
             return {'high_correlation': False}
         
         try:
-            open_positions = await self.position_manager.get_all_positions()
+            # Позиции PositionManager - в памяти, обновляются потоком и сверкой
+            open_positions = list(getattr(self.position_manager, 'positions', {}).values())
             
             # Простая проверка на одинаковые активы
             for position in open_positions:
@@ -390,70 +499,52 @@ class OrderExecutionEngine:
     async def _execute_order(self, request: ExecutionRequest) -> ExecutionResult:
         """Исполнение ордера на бирже"""
         
-        if not self.exchange:
-            # Если биржа недоступна, возвращаем успешный результат для тестирования
-            logger.warning("⚠️ Exchange недоступен, возвращаем мок результат")
-            return ExecutionResult(
-                request=request,
-                status=ExecutionStatus.COMPLETED,
-                order_id="mock_order_123",
-                executed_price=request.signal.price,
-                executed_quantity=request.quantity,
-                slippage=0.001,
-                execution_time=datetime.utcnow()
-            )
-        
         try:
             # Определяем сторону ордера
             side = 'buy' if request.signal.action in ['BUY', 'LONG'] else 'sell'
             
-            # Размещаем ордер
+            if not self.exchange:
+                # Симулятор - только явно (MOCK_TRADING), иначе сделка попала бы в журнал как реальная
+                if config.MOCK_TRADING and get_simulated_exchange:
+                    return await self._execute_simulated(request, side)
+                logger.error("❌ Exchange недоступен, ордер не исполнен", category='execution')
+                return ExecutionResult(
+                    request=request,
+                    status=ExecutionStatus.FAILED,
+                    error_message="Exchange not available"
+                )
+            
+            # Размещаем ордер; create_order ждет исполнения через OrderTracker
             order_result = await self.exchange.create_order(
                 symbol=request.signal.symbol,
-                type='market',  # Пока только рыночные ордера
+                order_type='market',  # Пока только рыночные ордера
                 side=side,
                 amount=request.quantity,
                 price=None  # Для рыночных ордеров
             )
             
-            if order_result and order_result.get('id'):
-                # Ждем исполнения ордера
-                await asyncio.sleep(1)  # Небольшая задержка
+            if order_result.success:
+                executed_price = order_result.average_price or request.signal.price
+                executed_quantity = order_result.filled_quantity or request.quantity
                 
-                # Проверяем статус ордера
-                order_status = await self.exchange.fetch_order(
-                    order_result['id'], 
-                    request.signal.symbol
-                )
+                # Рассчитываем проскальзывание
+                slippage = abs(executed_price - request.signal.price) / request.signal.price
                 
-                if order_status.get('status') == 'closed':
-                    executed_price = float(order_status.get('average', request.signal.price))
-                    executed_quantity = float(order_status.get('filled', request.quantity))
-                    
-                    # Рассчитываем проскальзывание
-                    slippage = abs(executed_price - request.signal.price) / request.signal.price
-                    
-                    return ExecutionResult(
-                        request=request,
-                        status=ExecutionStatus.COMPLETED,
-                        order_id=order_result['id'],
-                        executed_price=executed_price,
-                        executed_quantity=executed_quantity,
-                        slippage=slippage,
-                        execution_time=datetime.utcnow()
-                    )
-                else:
-                    return ExecutionResult(
-                        request=request,
-                        status=ExecutionStatus.FAILED,
-                        order_id=order_result['id'],
-                        error_message=f"Order not filled: {order_status.get('status')}"
-                    )
+                return ExecutionResult(
+                    request=request,
+                    status=ExecutionStatus.COMPLETED,
+                    order_id=order_result.order_id,
+                    executed_price=executed_price,
+                    executed_quantity=executed_quantity,
+                    slippage=slippage,
+                    execution_time=datetime.utcnow()
+                )
             else:
                 return ExecutionResult(
                     request=request,
                     status=ExecutionStatus.FAILED,
-                    error_message="Failed to create order"
+                    order_id=order_result.order_id,
+                    error_message=order_result.error_message or "Failed to create order"
                 )
                 
         except Exception as e:
@@ -464,55 +555,68 @@ class OrderExecutionEngine:
                 error_message=str(e)
             )
     
+    async def _execute_simulated(self, request: ExecutionRequest, side: str) -> ExecutionResult:
+        """
+        Рыночный ордер в симуляторе (get_simulated_exchange) - реальный результат сопоставления
+
+        order_id с префиксом SIMULATED_ORDER_PREFIX: в журнале и БД такие
+        сделки не смешиваются с реальными.
+        """
+        order = await get_simulated_exchange().create_order(
+            request.signal.symbol, 'market', side, request.quantity
+        )
+        
+        if not order['filled']:
+            return ExecutionResult(
+                request=request,
+                status=ExecutionStatus.FAILED,
+                order_id=SIMULATED_ORDER_PREFIX + order['id'],
+                error_message=f"Simulated order not filled: {order['status']}"
+            )
+        
+        executed_price = order['average']
+        return ExecutionResult(
+            request=request,
+            status=ExecutionStatus.COMPLETED,
+            order_id=SIMULATED_ORDER_PREFIX + order['id'],
+            executed_price=executed_price,
+            executed_quantity=order['filled'],
+            slippage=abs(executed_price - request.signal.price) / request.signal.price,
+            execution_time=datetime.utcnow()
+        )
+    
     async def _save_trade_to_db(self, result: ExecutionResult):
-        """Сохранение сделки в базу данных"""
+        """Сделка в журнал позиций; в БД - фоновой записью журнала"""
         
-        if not CORE_AVAILABLE or not Trade or not SessionLocal:
+        if not CORE_AVAILABLE or not get_position_ledger:
             logger.warning("⚠️ БД недоступна для сохранения сделки")
             return
         
         try:
-            db = SessionLocal()
-            try:
-                # Определяем статус сделки
-                if OrderSide:
-                    side = OrderSide.BUY if result.request.signal.action in ['BUY', 'LONG'] else OrderSide.SELL
-                else:
-                    side = 'BUY' if result.request.signal.action in ['BUY', 'LONG'] else 'SELL'
-                
-                # Создаем запись о сделке
-                trade = Trade(
-                    symbol=result.request.signal.symbol,
-                    side=side,
-                    quantity=result.executed_quantity or 0,
-                    price=result.executed_price or 0,
-                    strategy=result.request.strategy_name,
-                    status=TradeStatus.OPEN if TradeStatus else 'OPEN',
-                    created_at=datetime.utcnow(),
-                    exchange_order_id=result.order_id,
-                    slippage=result.slippage,
-                    confidence=result.request.confidence
-                )
-                
-                db.add(trade)
-                db.commit()
-                
-                # Обновляем результат с ID сделки
-                result.trade_id = trade.id
-                
-                logger.info(
-                    f"✅ Сделка сохранена в БД: {trade.id}",
-                    category='execution',
-                    trade_id=trade.id,
-                    symbol=trade.symbol,
-                    side=trade.side
-                )
-                
-            finally:
-                db.close()
-                
+            signal = result.request.signal
+            side = 'BUY' if signal.action in ['BUY', 'LONG'] else 'SELL'
+            
+            trade = get_position_ledger().add(TradeRecord(
+                symbol=signal.symbol,
+                side=side,
+                quantity=result.executed_quantity or 0,
+                price=result.executed_price or 0,
+                strategy=result.request.strategy_name,
+                order_id=result.order_id,
+                stop_loss=getattr(signal, 'stop_loss', None),
+                take_profit=getattr(signal, 'take_profit', None)
+            ))
+            
+            logger.info(
+                f"✅ Сделка в журнале позиций: {trade.symbol} {trade.side}",
+                category='execution',
+                symbol=trade.symbol,
+                side=trade.side,
+                order_id=trade.order_id
+            )
+            
         except Exception as e:
-            logger.error(f"❌ Ошибка сохранения сделки в БД: {e}")
+            logger.error(f"❌ Ошибка сохранения сделки: {e}")
     
     async def _update_execution_stats(self, result: ExecutionResult, execution_time: float):
         """Обновление статистики исполнения"""
@@ -554,7 +658,8 @@ class OrderExecutionEngine:
                 'success_rate': 0.0,
                 'failure_rate': 0.0,
                 'avg_execution_time_seconds': 0.0,
-                'emergency_stop': self.emergency_stop
+                'emergency_stop': self.emergency_stop,
+                'pretrade': self.pretrade.get_stats()
             }
         
         success_rate = self.successful_executions / self.total_executions
@@ -567,7 +672,8 @@ class OrderExecutionEngine:
             'success_rate': success_rate,
             'failure_rate': failure_rate,
             'avg_execution_time_seconds': self.average_execution_time,
-            'emergency_stop': self.emergency_stop
+            'emergency_stop': self.emergency_stop,
+            'pretrade': self.pretrade.get_stats()
         }
     
     def activate_emergency_stop(self, reason: str = "Manual activation"):
@@ -0,0 +1,437 @@
+"""
+МЕТАДАННЫЕ РЫНКОВ: ТОЧНОСТЬ, ШАГ ЛОТА, ЛИМИТЫ
+Файл: src/exchange/market_metadata.py
+
+Раньше calculate_position_size вызывал load_markets() при каждом расчете,
+а нормализация ордера разбирала market['precision'] как число знаков -
+при TICK_SIZE режиме ccxt (Bybit) это падало и ордер уходил без округления.
+
+MarketMetadata:
+✅ Список рынков загружается один раз; снимок на диске - быстрый
+   перезапуск без запроса к бирже (рынки передаются в ccxt через set_markets)
+✅ Фоновое обновление раз в MARKET_METADATA_REFRESH_SECONDS
+✅ O(1) доступ к tick size, step size, min notional и лимитам
+✅ Векторное округление количеств и цен (numpy) для пакетов ордеров
+✅ Понимает оба режима точности ccxt: TICK_SIZE и DECIMAL_PLACES
+✅ Отдельный экземпляр и снимок на каждую биржу и сеть (mainnet/testnet) -
+   снимок другой биржи отклоняется
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import config
+from ..logging.smart_logger import get_logger
+
+logger = get_logger(__name__)
+
+# Режимы точности ccxt (ccxt.DECIMAL_PLACES, ccxt.SIGNIFICANT_DIGITS, ccxt.TICK_SIZE)
+DECIMAL_PLACES = 2
+TICK_SIZE = 4
+
+
+@dataclass(frozen=True)
+class MarketInfo:
+    """Параметры рынка для нормализации ордеров"""
+    symbol: str
+    base: str
+    quote: str
+    tick_size: float            # шаг цены
+    step_size: float            # шаг количества
+    min_amount: float
+    max_amount: Optional[float]
+    min_notional: float         # минимальная стоимость ордера в quote
+    min_price: Optional[float]
+    max_price: Optional[float]
+    active: bool
+
+
+def _step(value: Any, precision_mode: int, default: float) -> float:
+    """Шаг из market['precision'][...] с учетом режима точности"""
+    if value is None:
+        return default
+    if precision_mode == DECIMAL_PLACES:
+        return 10.0 ** -int(value)
+    return float(value)
+
+
+def market_key(exchange) -> Tuple[Optional[str], bool]:
+    """Ключ метаданных для экземпляра ccxt (и оберток): (id биржи, testnet)"""
+    urls = getattr(exchange, 'urls', None) or {}
+    sandbox = bool(getattr(exchange, 'isSandboxModeEnabled', False)) or 'testnet' in str(urls.get('api', ''))
+    return getattr(exchange, 'id', None), sandbox
+
+
+def snapshot_path_for(exchange_id: Optional[str], sandbox: bool = False) -> Optional[str]:
+    """Файл снимка биржи и сети: data/market_metadata.json -> data/market_metadata_bybit_testnet.json"""
+    if not config.MARKET_METADATA_PATH or not exchange_id:
+        return None
+    path = Path(config.MARKET_METADATA_PATH)
+    suffix = f"_{exchange_id}" + ('_testnet' if sandbox else '')
+    return str(path.with_name(f"{path.stem}{suffix}{path.suffix}"))
+
+
+def _divisor(step: float) -> float:
+    """
+    Целое 1/step для дробных шагов (0.01 -> 100), иначе 0
+
+    units / 100 дает ближайший к 12.34 float, а units * 0.01 - 12.340000000000002.
+    """
+    if 0 < step < 1:
+        inverse = 1.0 / step
+        if abs(inverse - round(inverse)) < 1e-9 * inverse:
+            return float(round(inverse))
+    return 0.0
+
+
+class MarketMetadata:
+    """
+    Кэш метаданных рынков с O(1) доступом и снимком на диске
+
+    Пример:
+        metadata = get_market_metadata('bybit', sandbox=True)
+        await metadata.ensure_loaded(exchange)
+        amount = metadata.round_amount('BTC/USDT', 0.0012345)
+        amounts = metadata.round_amounts(symbols, raw_amounts)
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None, refresh_seconds: Optional[float] = None,
+                 exchange_id: Optional[str] = None, sandbox: bool = False):
+        """
+        Args:
+            snapshot_path: Файл снимка (None - по бирже и сети, пусто - без диска)
+            refresh_seconds: Интервал фонового обновления
+            exchange_id: Биржа ccxt (снимок другой биржи не загружается)
+            sandbox: Тестовая сеть
+        """
+        self.exchange_id = exchange_id
+        self.sandbox = sandbox
+        path = snapshot_path_for(exchange_id, sandbox) if snapshot_path is None else snapshot_path
+        self.snapshot_path = Path(path) if path else None
+        self.refresh_seconds = refresh_seconds or config.MARKET_METADATA_REFRESH_SECONDS
+
+        self.markets: Dict[str, MarketInfo] = {}
+        self.raw_markets: Dict[str, Dict[str, Any]] = {}
+        self.loaded_at: float = 0.0
+        self.source: Optional[str] = None
+
+        # Индекс символа и массивы шагов для векторного округления
+        self._index: Dict[str, int] = {}
+        self._steps = np.empty(0)
+        self._ticks = np.empty(0)
+        self._step_divisors = np.empty(0)
+        self._tick_divisors = np.empty(0)
+
+        self._exchange = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.stats = {'refreshes': 0, 'snapshot_loads': 0, 'refresh_errors': 0, 'lookups': 0}
+
+    @property
+    def is_loaded(self) -> bool:
+        return bool(self.markets)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.loaded_at if self.loaded_at else float('inf')
+
+    # =================================================================
+    # ЗАГРУЗКА
+    # =================================================================
+
+    def update_from_markets(self, markets: Dict[str, Dict[str, Any]], precision_mode: int = TICK_SIZE,
+                            loaded_at: Optional[float] = None, source: str = 'exchange'):
+        """Построить индекс из словаря рынков ccxt"""
+        parsed = {}
+        for symbol, market in markets.items():
+            precision = market.get('precision') or {}
+            limits = market.get('limits') or {}
+            amount_limits = limits.get('amount') or {}
+            price_limits = limits.get('price') or {}
+            cost_limits = limits.get('cost') or {}
+            parsed[symbol] = MarketInfo(
+                symbol=symbol,
+                base=market.get('base', ''),
+                quote=market.get('quote', ''),
+                tick_size=_step(precision.get('price'), precision_mode, 1e-8),
+                step_size=_step(precision.get('amount'), precision_mode, 1e-8),
+                min_amount=float(amount_limits.get('min') or 0),
+                max_amount=float(amount_limits['max']) if amount_limits.get('max') else None,
+                min_notional=float(cost_limits.get('min') or 0),
+                min_price=float(price_limits['min']) if price_limits.get('min') else None,
+                max_price=float(price_limits['max']) if price_limits.get('max') else None,
+                active=market.get('active') is not False
+            )
+
+        # Подмена целиком - читатели не видят частично построенный индекс
+        symbols = list(parsed)
+        steps = np.array([parsed[s].step_size for s in symbols], dtype=np.float64)
+        ticks = np.array([parsed[s].tick_size for s in symbols], dtype=np.float64)
+        self._step_divisors = np.array([_divisor(s) for s in steps], dtype=np.float64)
+        self._tick_divisors = np.array([_divisor(t) for t in ticks], dtype=np.float64)
+        self._steps, self._ticks = steps, ticks
+        self._index = {symbol: i for i, symbol in enumerate(symbols)}
+        self.markets = parsed
+        self.raw_markets = markets
+        self.loaded_at = loaded_at or time.time()
+        self.source = source
+
+    def load_snapshot(self) -> bool:
+        """Загрузить снимок с диска"""
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return False
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            stored = (snapshot.get('exchange_id'), bool(snapshot.get('sandbox', False)))
+            if self.exchange_id is not None and stored != (self.exchange_id, self.sandbox):
+                logger.warning(
+                    f"⚠️ Снимок метаданных рынков другой биржи: {stored}, нужен "
+                    f"{(self.exchange_id, self.sandbox)} - не загружен",
+                    category='exchange'
+                )
+                return False
+            self.update_from_markets(
+                snapshot['markets'], snapshot.get('precision_mode', TICK_SIZE),
+                loaded_at=snapshot.get('saved_at'), source='snapshot'
+            )
+            self.stats['snapshot_loads'] += 1
+            logger.info(
+                f"📦 Метаданные рынков из снимка: {len(self.markets)}",
+                category='exchange',
+                age_minutes=round(self.age / 60, 1)
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Снимок метаданных рынков не прочитан: {e}", category='exchange')
+            return False
+
+    def save_snapshot(self, precision_mode: int = TICK_SIZE):
+        """Сохранить снимок на диск (атомарно)"""
+        if self.snapshot_path is None or not self.raw_markets:
+            return
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.snapshot_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'exchange_id': self.exchange_id,
+                    'sandbox': self.sandbox,
+                    'saved_at': self.loaded_at,
+                    'precision_mode': precision_mode,
+                    'markets': self.raw_markets
+                }, f, default=str)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Снимок метаданных рынков не сохранен: {e}", category='exchange')
+
+    @staticmethod
+    def _precision_mode(exchange) -> int:
+        return getattr(exchange, 'precisionMode', TICK_SIZE)
+
+    async def refresh(self, exchange=None) -> bool:
+        """Перезагрузить рынки с биржи (async-клиент) и сохранить снимок"""
+        exchange = exchange or self._exchange
+        if exchange is None:
+            return False
+        try:
+            markets = await exchange.load_markets(True)
+            precision_mode = self._precision_mode(exchange)
+            self.update_from_markets(markets, precision_mode)
+            self.save_snapshot(precision_mode)
+            self.stats['refreshes'] += 1
+            logger.info(f"🔄 Метаданные рынков обновлены: {len(self.markets)}", category='exchange')
+            return True
+        except Exception as e:
+            self.stats['refresh_errors'] += 1
+            logger.warning(f"⚠️ Ошибка обновления метаданных рынков: {e}", category='exchange')
+            return False
+
+    def refresh_sync(self, exchange) -> bool:
+        """Загрузка рынков синхронным ccxt (при инициализации клиента)"""
+        try:
+            markets = exchange.load_markets(True)
+            precision_mode = self._precision_mode(exchange)
+            self.update_from_markets(markets, precision_mode)
+            self.save_snapshot(precision_mode)
+            self.stats['refreshes'] += 1
+            return True
+        except Exception as e:
+            self.stats['refresh_errors'] += 1
+            logger.warning(f"⚠️ Ошибка загрузки метаданных рынков: {e}", category='exchange')
+            return False
+
+    def attach(self, exchange, ccxt_exchange=None):
+        """
+        Привязать клиент для фоновых обновлений и передать рынки в ccxt
+
+        Args:
+            exchange: Async-клиент для load_markets (ccxt.async_support или AsyncExchangeAdapter)
+            ccxt_exchange: Экземпляр ccxt, которому нужны рынки без запроса (set_markets)
+        """
+        self._exchange = exchange
+        set_markets = getattr(ccxt_exchange, 'set_markets', None)
+        if set_markets is not None and self.raw_markets and not getattr(ccxt_exchange, 'markets', None):
+            set_markets(self.raw_markets)
+
+    async def ensure_loaded(self, exchange, ccxt_exchange=None) -> bool:
+        """Снимок с диска, иначе загрузка с биржи; затем фоновое обновление"""
+        if not self.is_loaded:
+            self.load_snapshot()
+        self.attach(exchange, ccxt_exchange)
+        if not self.is_loaded:
+            await self.refresh(exchange)
+        self.start_background_refresh()
+        return self.is_loaded
+
+    def ensure_loaded_sync(self, sync_exchange, async_exchange=None) -> bool:
+        """То же для синхронного ccxt: рынки в ccxt передаются из снимка"""
+        if not self.is_loaded:
+            self.load_snapshot()
+        if self.is_loaded:
+            self.attach(async_exchange, sync_exchange)
+        else:
+            self.refresh_sync(sync_exchange)
+            self.attach(async_exchange)
+        return self.is_loaded
+
+    def start_background_refresh(self):
+        """Запустить фоновое обновление (нужен работающий event loop)"""
+        if self._exchange is None or (self._refresh_task is not None and not self._refresh_task.done()):
+            return
+        try:
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop())
+        except RuntimeError:
+            pass  # без event loop - обновится при первом обращении из async-кода
+
+    async def _refresh_loop(self):
+        while True:
+            delay = max(0.0, self.refresh_seconds - self.age)
+            await asyncio.sleep(delay)
+            if not await self.refresh():
+                await asyncio.sleep(min(60.0, self.refresh_seconds))
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    # =================================================================
+    # ДОСТУП И ОКРУГЛЕНИЕ
+    # =================================================================
+
+    def get(self, symbol: str) -> Optional[MarketInfo]:
+        """Параметры рынка (None - символ неизвестен)"""
+        self.stats['lookups'] += 1
+        if self._refresh_task is None:
+            self.start_background_refresh()
+        return self.markets.get(symbol)
+
+    def tick_size(self, symbol: str) -> Optional[float]:
+        market = self.markets.get(symbol)
+        return market.tick_size if market else None
+
+    def step_size(self, symbol: str) -> Optional[float]:
+        market = self.markets.get(symbol)
+        return market.step_size if market else None
+
+    def min_notional(self, symbol: str) -> float:
+        market = self.markets.get(symbol)
+        return market.min_notional if market else 0.0
+
+    @staticmethod
+    def _floor(values: np.ndarray, steps: np.ndarray, divisors: np.ndarray) -> np.ndarray:
+        # round(q, 8) убирает ошибку float у значений, кратных шагу (0.3 / 0.1 = 2.9999999999999996);
+        # точно до ~10^11 шагов - больше, чем у любого реального рынка
+        units = np.floor(np.round(values / steps, 8))
+        return np.where(divisors > 0, units / np.where(divisors > 0, divisors, 1.0), units * steps)
+
+    @staticmethod
+    def _floor_one(value: float, step: float, divisor: float) -> float:
+        units = math.floor(round(value / step, 8))
+        return units / divisor if divisor > 0 else units * step
+
+    def round_amount(self, symbol: str, amount: float) -> float:
+        """Количество вниз до шага лота (неизвестный символ - без изменений)"""
+        i = self._index.get(symbol)
+        if i is None:
+            return amount
+        return self._floor_one(amount, self._steps[i], self._step_divisors[i])
+
+    def round_price(self, symbol: str, price: float) -> float:
+        """Цена вниз до шага цены (неизвестный символ - без изменений)"""
+        i = self._index.get(symbol)
+        if i is None:
+            return price
+        return self._floor_one(price, self._ticks[i], self._tick_divisors[i])
+
+    def _indices(self, symbols: Iterable[str]) -> np.ndarray:
+        return np.array([self._index.get(s, -1) for s in symbols], dtype=np.int64)
+
+    def round_amounts(self, symbols: Iterable[str], amounts) -> np.ndarray:
+        """Векторное округление количеств (неизвестные символы - без изменений)"""
+        amounts = np.asarray(amounts, dtype=np.float64)
+        idx = self._indices(symbols)
+        known = idx >= 0
+        result = amounts.copy()
+        result[known] = self._floor(amounts[known], self._steps[idx[known]], self._step_divisors[idx[known]])
+        return result
+
+    def round_prices(self, symbols: Iterable[str], prices) -> np.ndarray:
+        """Векторное округление цен (неизвестные символы - без изменений)"""
+        prices = np.asarray(prices, dtype=np.float64)
+        idx = self._indices(symbols)
+        known = idx >= 0
+        result = prices.copy()
+        result[known] = self._floor(prices[known], self._ticks[idx[known]], self._tick_divisors[idx[known]])
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика метаданных"""
+        return {
+            **self.stats,
+            'markets': len(self.markets),
+            'source': self.source,
+            'age_seconds': self.age if self.loaded_at else None,
+            'background_refresh': self._refresh_task is not None and not self._refresh_task.done()
+        }
+
+
+# =================================================================
+# ГЛОБАЛЬНЫЕ ФУНКЦИИ
+# =================================================================
+
+# Глобальные экземпляры по (бирже, testnet)
+market_metadata: Dict[Tuple[Optional[str], bool], MarketMetadata] = {}
+
+def get_market_metadata(exchange_id: Optional[str] = None, sandbox: bool = False) -> MarketMetadata:
+    """
+    Получить общий кэш метаданных рынков биржи
+
+    Args:
+        exchange_id: Биржа ccxt (None - пустой кэш без снимка, до подключения)
+        sandbox: Тестовая сеть - свой кэш и свой снимок
+    """
+    key = (exchange_id, bool(sandbox))
+    if key not in market_metadata:
+        market_metadata[key] = MarketMetadata(exchange_id=exchange_id, sandbox=bool(sandbox))
+
+    return market_metadata[key]
+
+# Экспорты
+__all__ = [
+    'MarketMetadata',
+    'MarketInfo',
+    'get_market_metadata',
+    'market_key'
+]
@@ -0,0 +1,435 @@
+"""
+ОТСЛЕЖИВАНИЕ ЖИЗНЕННОГО ЦИКЛА ОРДЕРОВ
+Файл: src/exchange/order_tracker.py
+
+Раньше каждый ожидающий ордер сам опрашивал fetch_order раз в секунду
+до 30 секунд: N одновременных исполнений - N запросов в секунду и
+около секунды задержки на каждое исполнение.
+
+OrderTracker:
+✅ Машина состояний на каждый ордер по client order id
+   (PENDING -> OPEN -> PARTIALLY_FILLED -> FILLED / CANCELED / REJECTED)
+✅ Обновления из приватного потока ордеров (MarketDataStream) - без опроса
+✅ Один общий REST опрос на всех ожидающих: fetch_open_orders и
+   fetch_closed_orders по символам, частый без потока и редкий (сверка) с ним
+✅ Отмененные ордера (Bybit отдает в closed только исполненные):
+   fetch_canceled_orders или fetch_order по пропавшим; перед таймаутом -
+   последний опрос, чтобы не отменять уже отмененный ордер
+✅ Устаревшие обновления (REST ответ после потока) не откатывают состояние
+✅ await wait_for_fill(client_order_id, timeout)
+"""
+import asyncio
+import itertools
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from ..core.config import config
+from ..logging.smart_logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class OrderState(Enum):
+    """Состояние ордера"""
+    PENDING = "pending"                    # отправлен, биржа еще не подтвердила
+    OPEN = "open"
+    PARTIALLY_FILLED = "partially_filled"
+    FILLED = "filled"
+    CANCELED = "canceled"
+    REJECTED = "rejected"
+
+
+TERMINAL_STATES = {OrderState.FILLED, OrderState.CANCELED, OrderState.REJECTED}
+
+# Допустимые переходы; остальные - устаревшие обновления
+TRANSITIONS = {
+    OrderState.PENDING: {OrderState.OPEN, OrderState.PARTIALLY_FILLED, *TERMINAL_STATES},
+    OrderState.OPEN: {OrderState.PARTIALLY_FILLED, *TERMINAL_STATES},
+    OrderState.PARTIALLY_FILLED: {OrderState.PARTIALLY_FILLED, OrderState.FILLED, OrderState.CANCELED},
+}
+
+# Статусы ccxt (REST)
+CCXT_STATES = {
+    'open': OrderState.OPEN,
+    'closed': OrderState.FILLED,
+    'canceled': OrderState.CANCELED,
+    'cancelled': OrderState.CANCELED,
+    'expired': OrderState.CANCELED,
+    'rejected': OrderState.REJECTED,
+}
+
+# Статусы приватного потока Bybit v5
+STREAM_STATES = {
+    'Created': OrderState.OPEN,
+    'New': OrderState.OPEN,
+    'Untriggered': OrderState.OPEN,
+    'Triggered': OrderState.OPEN,
+    'PartiallyFilled': OrderState.PARTIALLY_FILLED,
+    'Filled': OrderState.FILLED,
+    'Cancelled': OrderState.CANCELED,
+    'PartiallyFilledCanceled': OrderState.CANCELED,
+    'Deactivated': OrderState.CANCELED,
+    'Rejected': OrderState.REJECTED,
+}
+
+# Первый опрос после нового ордера; дальше интервал удваивается до ORDER_TRACKER_POLL_SECONDS
+FIRST_POLL_DELAY = 0.25
+
+_client_ids = itertools.count()
+
+
+@dataclass
+class TrackedOrder:
+    """Отслеживаемый ордер"""
+    client_order_id: str
+    symbol: str
+    order_id: Optional[str] = None
+    amount: float = 0.0
+    state: OrderState = OrderState.PENDING
+    filled: float = 0.0
+    average_price: float = 0.0
+    fee: float = 0.0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    history: List[OrderState] = field(default_factory=lambda: [OrderState.PENDING])
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+
+    @property
+    def is_done(self) -> bool:
+        return self.state in TERMINAL_STATES
+
+
+class OrderTracker:
+    """
+    Состояния ордеров по client order id для всех ожидающих исполнения
+
+    Источники обновлений: приватный поток ордеров и общий REST опрос.
+    Опрос идет, только пока есть незавершенные ордера.
+    """
+
+    def __init__(self, exchange=None, stream=None,
+                 poll_interval: Optional[float] = None,
+                 stream_poll_interval: Optional[float] = None):
+        """
+        Args:
+            exchange: ccxt биржа (fetch_open_orders, fetch_closed_orders,
+                fetch_canceled_orders или fetch_order)
+            stream: MarketDataStream с приватным потоком (None - только опрос)
+            poll_interval: Интервал опроса без потока
+            stream_poll_interval: Интервал сверки при подключенном потоке
+        """
+        self.exchange = exchange
+        self.stream = stream
+        self.poll_interval = poll_interval or config.ORDER_TRACKER_POLL_SECONDS
+        self.stream_poll_interval = stream_poll_interval or config.ORDER_TRACKER_STREAM_POLL_SECONDS
+
+        self.orders: Dict[str, TrackedOrder] = {}
+        self._by_order_id: Dict[str, str] = {}
+        self._poll_task: Optional[asyncio.Task] = None
+        self._stream_task: Optional[asyncio.Task] = None
+        self._subscription = None
+        self._poll_delay = FIRST_POLL_DELAY
+
+        self.stats = {
+            'tracked': 0,
+            'filled': 0,
+            'canceled': 0,
+            'rejected': 0,
+            'polls': 0,
+            'rest_calls': 0,
+            'stream_updates': 0,
+            'rest_updates': 0,
+            'stale_updates': 0,
+            'fill_seconds_total': 0.0
+        }
+
+    @staticmethod
+    def new_client_order_id() -> str:
+        """Уникальный client order id (Bybit orderLinkId / Binance newClientOrderId, до 36 символов)"""
+        return f"cb{int(time.time() * 1000)}{next(_client_ids) % 100000:05d}"
+
+    @property
+    def stream_live(self) -> bool:
+        return self.stream is not None and self.stream.private_connected
+
+    # =================================================================
+    # РЕГИСТРАЦИЯ И ОЖИДАНИЕ
+    # =================================================================
+
+    def track(self, symbol: str, client_order_id: str, amount: float = 0.0) -> TrackedOrder:
+        """Начать отслеживание ордера (до отправки - чтобы не пропустить быстрые обновления потока)"""
+        order = TrackedOrder(
+            client_order_id=client_order_id,
+            symbol=symbol,
+            amount=amount,
+            future=asyncio.get_running_loop().create_future()
+        )
+        self.orders[client_order_id] = order
+        self.stats['tracked'] += 1
+        self._ensure_tasks()
+        return order
+
+    async def wait_for_fill(self, client_order_id: str, timeout: Optional[float] = None) -> TrackedOrder:
+        """
+        Ожидание завершения ордера (исполнен, отменен или отклонен)
+
+        По таймауту - последний опрос биржи (ордер мог быть отменен или
+        исполнен без обновления потока), затем ордер в текущем состоянии:
+        если он не завершен, отмена остается за вызывающим.
+        """
+        order = self.orders[client_order_id]
+        if not order.is_done:
+            timeout = config.ORDER_TIMEOUT_SECONDS if timeout is None else timeout
+            try:
+                await asyncio.wait_for(asyncio.shield(order.future), timeout)
+            except asyncio.TimeoutError:
+                if self.exchange is not None:
+                    try:
+                        await self.poll_once()
+                    except Exception as e:
+                        logger.warning(f"⚠️ Ошибка опроса ордеров перед таймаутом: {e}", category='exchange')
+        return order
+
+    def forget(self, client_order_id: str):
+        """Прекратить отслеживание ордера"""
+        order = self.orders.pop(client_order_id, None)
+        if order is not None and order.order_id:
+            self._by_order_id.pop(order.order_id, None)
+
+    def pending_orders(self) -> List[TrackedOrder]:
+        return [order for order in self.orders.values() if not order.is_done]
+
+    # =================================================================
+    # ОБНОВЛЕНИЯ СОСТОЯНИЯ
+    # =================================================================
+
+    def apply(self, client_order_id: Optional[str] = None, order_id: Optional[str] = None,
+              state: Optional[OrderState] = None, filled: Optional[float] = None,
+              average_price: Optional[float] = None, fee: Optional[float] = None,
+              amount: Optional[float] = None) -> Optional[TrackedOrder]:
+        """
+        Применить обновление ордера
+
+        Returns:
+            Ордер или None, если он не отслеживается
+        """
+        if not client_order_id or client_order_id not in self.orders:
+            client_order_id = self._by_order_id.get(order_id or '')
+        order = self.orders.get(client_order_id) if client_order_id else None
+        if order is None:
+            return None
+
+        if order_id and not order.order_id:
+            order.order_id = order_id
+            self._by_order_id[order_id] = order.client_order_id
+        if state is None or (state == order.state and (filled is None or filled <= order.filled)):
+            return order
+
+        if state not in TRANSITIONS.get(order.state, ()) or (filled is not None and filled < order.filled):
+            self.stats['stale_updates'] += 1
+            return order
+
+        order.state = state
+        order.history.append(state)
+        order.updated_at = time.time()
+        if filled is not None:
+            order.filled = filled
+        if average_price:
+            order.average_price = average_price
+        if fee is not None:
+            order.fee = fee
+        if amount:
+            order.amount = amount
+
+        if order.is_done:
+            self.stats[state.value] += 1
+            if state == OrderState.FILLED:
+                self.stats['fill_seconds_total'] += order.updated_at - order.created_at
+            if not order.future.done():
+                order.future.set_result(order)
+        return order
+
+    def apply_exchange_order(self, order: Dict[str, Any]) -> Optional[TrackedOrder]:
+        """Применить ордер в формате ccxt (ответ create_order, fetch_*_orders)"""
+        filled = float(order.get('filled') or 0)
+        state = CCXT_STATES.get(order.get('status'))
+        if state == OrderState.OPEN and filled > 0:
+            state = OrderState.PARTIALLY_FILLED
+        return self.apply(
+            client_order_id=order.get('clientOrderId'),
+            order_id=str(order['id']) if order.get('id') else None,
+            state=state,
+            filled=filled if state is not None else None,
+            average_price=float(order.get('average') or order.get('price') or 0),
+            fee=float((order.get('fee') or {}).get('cost') or 0),
+            amount=float(order.get('amount') or 0)
+        )
+
+    # =================================================================
+    # ИСТОЧНИКИ ОБНОВЛЕНИЙ
+    # =================================================================
+
+    def _ensure_tasks(self):
+        if self.stream is not None and (self._stream_task is None or self._stream_task.done()):
+            self._subscription = self.stream.subscribe('order')
+            self._stream_task = asyncio.create_task(self._stream_loop())
+
+        self._poll_delay = self.stream_poll_interval if self.stream_live else FIRST_POLL_DELAY
+        if self.exchange is not None and (self._poll_task is None or self._poll_task.done()):
+            self._poll_task = asyncio.create_task(self._poll_loop())
+
+    async def _stream_loop(self):
+        """Обновления приватного потока ордеров"""
+        while True:
+            updates = await self._subscription.get()
+            for update in updates.values():
+                tracked = self.apply(
+                    client_order_id=update.client_order_id,
+                    order_id=update.order_id,
+                    state=STREAM_STATES.get(update.status),
+                    filled=update.filled,
+                    average_price=update.average_price,
+                    fee=update.fee,
+                    amount=update.amount
+                )
+                if tracked is not None:
+                    self.stats['stream_updates'] += 1
+
+    async def _poll_loop(self):
+        """Общий опрос, пока есть незавершенные ордера"""
+        while self.pending_orders():
+            limit = self.stream_poll_interval if self.stream_live else self.poll_interval
+            delay = min(self._poll_delay, limit)
+            self._poll_delay = min(delay * 2, limit)
+            await asyncio.sleep(delay)
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка опроса ордеров: {e}", category='exchange')
+
+    async def poll_once(self):
+        """Один опрос на всех: открытые ордера, затем закрытые и отмененные по символам пропавших"""
+        pending = self.pending_orders()
+        if not pending:
+            return
+        self.stats['polls'] += 1
+
+        seen = set()
+        for order in await self._fetch_open_orders({o.symbol for o in pending}):
+            tracked = self.apply_exchange_order(order)
+            if tracked is not None:
+                seen.add(tracked.client_order_id)
+                self.stats['rest_updates'] += 1
+
+        # Не найденные среди открытых - исполнены или отменены
+        missing = defaultdict(list)
+        for order in pending:
+            if order.client_order_id not in seen and not order.is_done:
+                missing[order.symbol].append(order)
+        if not missing:
+            return
+
+        symbols = list(missing)
+        results = await asyncio.gather(*(
+            self.exchange.fetch_closed_orders(symbol, int(min(o.created_at for o in missing[symbol]) * 1000) - 1000)
+            for symbol in symbols
+        ), return_exceptions=True)
+        self.stats['rest_calls'] += len(symbols)
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Ошибка запроса закрытых ордеров {symbol}: {result}", category='exchange')
+                continue
+            for order in result:
+                if self.apply_exchange_order(order) is not None:
+                    self.stats['rest_updates'] += 1
+
+        # Не исполненные - отменены (Bybit не отдает их в fetch_closed_orders)
+        canceled = [order for orders in missing.values() for order in orders if not order.is_done]
+        if canceled:
+            await self._fetch_canceled_orders(canceled)
+
+    async def _fetch_canceled_orders(self, orders: List[TrackedOrder]):
+        """Отмененные ордера: fetch_canceled_orders по символам, без него - fetch_order по id"""
+        if (getattr(self.exchange, 'has', None) or {}).get('fetchCanceledOrders'):
+            by_symbol = defaultdict(list)
+            for order in orders:
+                by_symbol[order.symbol].append(order)
+            symbols = list(by_symbol)
+            requests = [
+                self.exchange.fetch_canceled_orders(symbol, int(min(o.created_at for o in by_symbol[symbol]) * 1000) - 1000)
+                for symbol in symbols
+            ]
+        else:
+            # Без order id (create_order еще не ответил) запрашивать нечего
+            orders = [order for order in orders if order.order_id]
+            symbols = [order.symbol for order in orders]
+            requests = [self.exchange.fetch_order(order.order_id, order.symbol) for order in orders]
+        if not requests:
+            return
+
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        self.stats['rest_calls'] += len(requests)
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Ошибка запроса отмененных ордеров {symbol}: {result}", category='exchange')
+                continue
+            for order in result if isinstance(result, list) else [result]:
+                if self.apply_exchange_order(order) is not None:
+                    self.stats['rest_updates'] += 1
+
+    async def _fetch_open_orders(self, symbols) -> List[Dict[str, Any]]:
+        """Открытые ордера одним запросом; если биржа требует символ - по символам параллельно"""
+        try:
+            self.stats['rest_calls'] += 1
+            return await self.exchange.fetch_open_orders()
+        except Exception as e:
+            logger.debug(f"fetch_open_orders без символа недоступен: {e}", category='exchange')
+
+        symbols = list(symbols)
+        results = await asyncio.gather(
+            *(self.exchange.fetch_open_orders(symbol) for symbol in symbols), return_exceptions=True
+        )
+        self.stats['rest_calls'] += len(symbols)
+        orders = []
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Ошибка запроса открытых ордеров {symbol}: {result}", category='exchange')
+            else:
+                orders.extend(result)
+        return orders
+
+    async def stop(self):
+        """Остановка опроса и подписки на поток"""
+        for task in (self._poll_task, self._stream_task):
+            if task is not None:
+                task.cancel()
+        for task in (self._poll_task, self._stream_task):
+            if task is not None:
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._poll_task = self._stream_task = None
+        if self._subscription is not None:
+            self._subscription.close()
+            self._subscription = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика отслеживания"""
+        filled = self.stats['filled']
+        return {
+            **self.stats,
+            'pending': len(self.pending_orders()),
+            'avg_fill_seconds': self.stats['fill_seconds_total'] / filled if filled else 0.0,
+            'stream_live': self.stream_live
+        }
+
+
+__all__ = [
+    'OrderTracker',
+    'OrderState',
+    'TrackedOrder'
+]
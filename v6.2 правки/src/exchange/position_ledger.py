@@ -0,0 +1,350 @@
+"""
+ЖУРНАЛ ОТКРЫТЫХ СДЕЛОК В ПАМЯТИ (WRITE-BEHIND)
+Файл: src/exchange/position_ledger.py
+
+Раньше PositionManager каждые 30 секунд перечитывал все открытые Trade
+из БД, а стопы, частичные закрытия и PnL писал отдельными синхронными
+сессиями прямо в цикле событий.
+
+PositionLedger - источник истины об открытых сделках:
+✅ Загружается из БД один раз, дальше обновляется исполнениями
+   (OrderExecutionEngine) и решениями PositionManager
+✅ Сделка по символу - O(1), без запросов
+✅ Изменение помечает поля сделки; фоновая задача пишет помеченное
+   пачкой в одной транзакции в потоке (asyncio.to_thread). Десять
+   трейлинг стопов между записями - один UPDATE с последним значением
+✅ Закрытие и новая сделка будят запись сразу, не дожидаясь паузы
+✅ Ошибка записи - поля снова помечены и уйдут в следующую пачку
+"""
+import asyncio
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..core.config import config
+from ..core.database import SessionLocal
+from ..core.models import Trade, TradeStatus
+from ..logging.smart_logger import get_logger
+
+logger = get_logger(__name__)
+
+# Колонки trades, которые журнал пишет в БД (id назначает БД)
+PERSISTED_FIELDS = tuple(name for name in Trade.__table__.columns.keys() if name != 'id')
+
+
+@dataclass(eq=False)
+class TradeRecord:
+    """
+    Сделка в журнале
+
+    Поля из PERSISTED_FIELDS пишутся в trades; остальные (текущая цена,
+    трейлинг, флаг частичного закрытия) живут только в памяти - колонок
+    для них в trades нет.
+    """
+    symbol: str
+    side: str
+    quantity: float
+    price: float
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    signal_id: Optional[int] = None
+    total: Optional[float] = None
+    fee: float = 0.0
+    fee_asset: Optional[str] = None
+    status: str = TradeStatus.OPEN.value
+    order_id: Optional[str] = None
+    strategy: Optional[str] = None
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+    profit_loss: Optional[float] = None
+    profit_loss_percent: Optional[float] = None
+    close_price: Optional[float] = None
+    close_time: Optional[datetime] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = None
+
+    # Только в памяти
+    current_price: Optional[float] = None
+    unrealized_pnl: float = 0.0
+    trailing_stop: bool = False
+    trailing_distance: Optional[float] = None
+    partial_closed: bool = False
+
+    def __post_init__(self):
+        if self.total is None:
+            self.total = self.quantity * self.price
+
+    @classmethod
+    def from_trade(cls, trade: Trade) -> 'TradeRecord':
+        known = {f.name for f in fields(cls)}
+        values = {name: getattr(trade, name) for name in ('id',) + PERSISTED_FIELDS if name in known}
+        if isinstance(values.get('status'), TradeStatus):
+            values['status'] = values['status'].value
+        return cls(**values)
+
+    @property
+    def is_open(self) -> bool:
+        return self.status == TradeStatus.OPEN.value
+
+    def row(self, names: Iterable[str]) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in names}
+
+
+class PositionLedger:
+    """
+    Открытые сделки в памяти с отложенной пакетной записью в БД
+
+    Пример:
+        ledger = get_position_ledger()
+        await ledger.start()                  # загрузка + фоновая запись
+        trade = ledger.by_symbol('BTC/USDT')
+        ledger.update(trade, stop_loss=59000)  # в БД - следующей пачкой
+        ledger.close(trade, exit_price=61000, profit=12.5)
+        await ledger.stop()                   # последняя запись
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None, session_factory=None):
+        self.flush_interval = (config.POSITION_LEDGER_FLUSH_SECONDS
+                               if flush_interval is None else flush_interval)
+        self.session_factory = session_factory or SessionLocal
+        self.loaded = False
+
+        # Открытые сделки: symbol -> [сделки в порядке открытия]
+        self._open: Dict[str, List[TradeRecord]] = {}
+        # Сделки с несохраненными полями: запись -> имена полей
+        self._dirty: Dict[TradeRecord, Set[str]] = {}
+
+        self._load_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._running = False
+
+        self.stats = {
+            'flushes': 0,
+            'rows_written': 0,
+            'changes': 0,
+            'flush_errors': 0,
+            'last_flush_ms': 0.0
+        }
+
+    # =================================================================
+    # ЗАГРУЗКА И ФОНОВАЯ ЗАПИСЬ
+    # =================================================================
+
+    def load(self):
+        """Открытые сделки из БД (синхронно; из цикла событий - ensure_loaded)"""
+        db = self.session_factory()
+        try:
+            trades = db.query(Trade).filter(Trade.status == TradeStatus.OPEN).order_by(Trade.id).all()
+            records = [TradeRecord.from_trade(trade) for trade in trades]
+        finally:
+            db.close()
+
+        # Сделки, открытые до загрузки, не теряются
+        pending = [record for records_ in self._open.values() for record in records_ if record.id is None]
+        self._open = {}
+        for record in records + pending:
+            self._open.setdefault(record.symbol, []).append(record)
+        self.loaded = True
+
+        logger.info(
+            f"📒 Журнал сделок загружен: {len(records)} открытых",
+            category='position',
+            symbols=list(self._open)
+        )
+
+    async def ensure_loaded(self):
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                await asyncio.to_thread(self.load)
+
+    async def start(self):
+        """Загрузка и запуск фоновой записи"""
+        await self.ensure_loaded()
+        if self._writer is None or self._writer.done():
+            self._running = True
+            self._writer = asyncio.create_task(self._writer_loop())
+
+    async def stop(self):
+        """Остановка фоновой записи и запись всего накопленного"""
+        if self._writer is not None:
+            # Флаг, а не cancel: wait_for в 3.11 теряет отмену, если событие
+            # пришло одновременно с ней
+            self._running = False
+            self._wake.set()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        await self.flush()
+
+    async def _writer_loop(self):
+        while self._running:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            # После ошибки записи поля снова помечены - повтор через паузу
+            if self._running and self._dirty:
+                await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Записать помеченные поля одной транзакцией
+
+        Returns:
+            Количество записанных сделок
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+
+            # Снимок значений берется в цикле событий: поток видит согласованные данные,
+            # а изменения во время записи помечаются заново и уйдут следующей пачкой
+            dirty, self._dirty = self._dirty, {}
+            now = datetime.utcnow()
+            inserts: List[Tuple[TradeRecord, Dict[str, Any]]] = []
+            updates: List[Dict[str, Any]] = []
+            for record, names in dirty.items():
+                if record.id is None:
+                    record.updated_at = now
+                    inserts.append((record, record.row(PERSISTED_FIELDS)))
+                else:
+                    row = record.row(names)
+                    row['id'] = record.id
+                    row['updated_at'] = now
+                    updates.append(row)
+
+            started = asyncio.get_running_loop().time()
+            try:
+                ids = await asyncio.to_thread(self._write, [row for _, row in inserts], updates)
+            except Exception as e:
+                for record, names in dirty.items():
+                    self._dirty.setdefault(record, set()).update(names)
+                self.stats['flush_errors'] += 1
+                logger.error(f"❌ Ошибка записи журнала сделок: {e}", category='position')
+                return 0
+
+            for (record, _), trade_id in zip(inserts, ids):
+                record.id = trade_id
+
+            self.stats['flushes'] += 1
+            self.stats['rows_written'] += len(dirty)
+            self.stats['last_flush_ms'] = (asyncio.get_running_loop().time() - started) * 1000
+            logger.debug(
+                f"💾 Журнал сделок записан: {len(inserts)} новых, {len(updates)} обновлений",
+                category='position'
+            )
+            return len(dirty)
+
+    def _write(self, inserts: List[Dict[str, Any]], updates: List[Dict[str, Any]]) -> List[int]:
+        """Одна транзакция: новые сделки и обновления (в потоке)"""
+        db = self.session_factory()
+        try:
+            trades = [Trade(**row) for row in inserts]
+            db.add_all(trades)
+            if updates:
+                db.bulk_update_mappings(Trade, updates)
+            db.commit()
+            return [trade.id for trade in trades]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    # =================================================================
+    # ИЗМЕНЕНИЯ
+    # =================================================================
+
+    def _mark(self, record: TradeRecord, names: Iterable[str], urgent: bool = False):
+        names = [name for name in names if name in PERSISTED_FIELDS]
+        if not names:
+            return
+        self._dirty.setdefault(record, set()).update(names)
+        self.stats['changes'] += 1
+        if urgent:
+            self._wake.set()
+
+    def add(self, record: TradeRecord) -> TradeRecord:
+        """Новая сделка (исполнение): сразу в журнале, в БД - ближайшей записью"""
+        if record.user_id is None:
+            record.user_id = config.TRADING_USER_ID
+        if record.is_open:
+            self._open.setdefault(record.symbol, []).append(record)
+        self._mark(record, PERSISTED_FIELDS, urgent=True)
+        return record
+
+    def update(self, record: TradeRecord, **changes):
+        """Изменить поля сделки; сохраняемые уйдут в БД следующей пачкой"""
+        for name, value in changes.items():
+            setattr(record, name, value)
+        self._mark(record, changes)
+
+    def close(self, record: TradeRecord, exit_price: Optional[float] = None,
+              profit: Optional[float] = None, status: str = TradeStatus.CLOSED.value):
+        """Закрыть сделку: из открытых сразу, в БД - без ожидания паузы записи"""
+        changes: Dict[str, Any] = {'status': status, 'close_time': datetime.utcnow()}
+        if exit_price:
+            changes['close_price'] = exit_price
+        if profit is not None:
+            changes['profit_loss'] = profit
+            if record.total:
+                changes['profit_loss_percent'] = profit / record.total * 100
+        for name, value in changes.items():
+            setattr(record, name, value)
+
+        trades = self._open.get(record.symbol, [])
+        if record in trades:
+            trades.remove(record)
+            if not trades:
+                del self._open[record.symbol]
+        self._mark(record, changes, urgent=True)
+
+    # =================================================================
+    # ЗАПРОСЫ
+    # =================================================================
+
+    def by_symbol(self, symbol: str) -> Optional[TradeRecord]:
+        """Самая ранняя открытая сделка по символу"""
+        trades = self._open.get(symbol)
+        return trades[0] if trades else None
+
+    def get(self, trade_id: int) -> Optional[TradeRecord]:
+        for record in self.open_trades():
+            if record.id == trade_id:
+                return record
+        return None
+
+    def open_trades(self) -> List[TradeRecord]:
+        return [record for trades in self._open.values() for record in trades]
+
+    @property
+    def pending(self) -> int:
+        """Сделок с несохраненными изменениями"""
+        return len(self._dirty)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'open_trades': sum(len(trades) for trades in self._open.values()),
+            'pending': self.pending,
+            'loaded': self.loaded
+        }
+
+
+# Глобальный экземпляр
+_position_ledger: Optional[PositionLedger] = None
+
+
+def get_position_ledger() -> PositionLedger:
+    """Получить глобальный журнал сделок"""
+    global _position_ledger
+    if _position_ledger is None:
+        _position_ledger = PositionLedger()
+    return _position_ledger
+
+
+__all__ = ['PositionLedger', 'TradeRecord', 'get_position_ledger']
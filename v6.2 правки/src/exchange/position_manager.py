@@ -4,20 +4,25 @@ POSITION MANAGER - Управление торговыми позициями
 
 🎯 ФУНКЦИИ:
 ✅ Автоматический мониторинг всех открытых позиций 24/7
-✅ Stop-loss/take-profit исполнение без участия человека
+✅ Stop-loss/take-profit исполнение без участия человека на каждом тике
+   потока цен (MarketDataStream), а не раз в цикл опроса
 ✅ Трейлинг стопы для максимизации прибыли
 ✅ Экстренное закрытие при критических условиях
 ✅ Обновление PnL в реальном времени
+✅ Сделки - в журнале в памяти (PositionLedger): цикл мониторинга не ходит
+   в БД, изменения пишутся фоновой пачкой
 """
 import asyncio
-from typing import Dict, List, Optional, Tuple, Any
-from datetime import datetime, timedelta
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Any
 from dataclasses import dataclass
 import logging
 
-from ..core.database import SessionLocal
-from ..core.models import Trade, TradeStatus, OrderSide
+from ..core.config import config
+from ..core.models import TradeStatus
 from ..logging.smart_logger import get_logger
+from ..market_data.stream import PositionUpdate, Tick, get_market_stream
+from .position_ledger import TradeRecord, get_position_ledger
 from .real_client import get_real_exchange_client
 
 logger = get_logger(__name__)
@@ -47,14 +52,15 @@ class TradeUpdate:
     exit_price: Optional[float] = None
     profit: Optional[float] = None
     exit_reason: Optional[str] = None
+    symbol: Optional[str] = None  # Сделка еще не записана в БД (trade_id нет) - по символу
 
 class PositionManager:
     """
     Менеджер торговых позиций
     
     🔥 АВТОМАТИЧЕСКОЕ УПРАВЛЕНИЕ ПОЗИЦИЯМИ:
-    1. Мониторинг открытых позиций каждые 30 секунд
-    2. Автоматический stop-loss/take-profit без участия человека
+    1. Сверка открытых позиций с биржей каждые 30 секунд
+    2. Автоматический stop-loss/take-profit на каждом тике цены
     3. Трейлинг стопы для увеличения прибыли
     4. Partial close логика для фиксации прибыли
     5. Экстренное закрытие при критической просадке
@@ -71,17 +77,29 @@ class PositionManager:
         self.check_interval = check_interval
         self.is_running = False
         self.positions: Dict[str, PositionInfo] = {}
-        self.active_trades: Dict[int, Trade] = {}
+        # Открытые сделки - в памяти, запись в БД - фоновой пачкой
+        self.ledger = get_position_ledger()
+        
+        # Поток цен: SL/TP и трейлинг стопы проверяются на каждом тике
+        self.stream = get_market_stream() if config.ENABLE_MARKET_STREAM else None
+        self._stream_tasks: List[asyncio.Task] = []
+        self._owns_stream = False
+        # Проверки тиков и цикла мониторинга не пересекаются
+        self._check_lock = asyncio.Lock()
+        # Последняя неудачная попытка закрытия: symbol -> time.monotonic()
+        self._close_failed_at: Dict[str, float] = {}
         
         # Настройки риск-менеджмента
         self.max_slippage_percent = 0.5  # Максимальное проскальзывание
         self.emergency_stop_drawdown = 0.15  # 15% просадка для экстренной остановки
         self.partial_close_profit_threshold = 0.05  # 5% прибыли для частичного закрытия
+        self.close_retry_seconds = 5  # Пауза перед повторным закрытием по тику
         
         logger.info(
             "Position Manager инициализирован",
             category='position',
-            check_interval=check_interval
+            check_interval=check_interval,
+            streaming=self.stream is not None
         )
     
     async def start_monitoring(self):
@@ -97,37 +115,156 @@ class PositionManager:
             category='position'
         )
         
-        while self.is_running:
-            try:
-                await self._monitoring_cycle()
-                await asyncio.sleep(self.check_interval)
-                
-            except Exception as e:
-                logger.error(
-                    f"❌ Ошибка в цикле мониторинга позиций: {e}",
-                    category='position'
-                )
-                await asyncio.sleep(5)  # Короткая пауза при ошибке
+        await self.ledger.start()
+        await self._start_streaming()
+        try:
+            while self.is_running:
+                try:
+                    await self._monitoring_cycle()
+                    await asyncio.sleep(self.check_interval)
+                    
+                except Exception as e:
+                    logger.error(
+                        f"❌ Ошибка в цикле мониторинга позиций: {e}",
+                        category='position'
+                    )
+                    await asyncio.sleep(5)  # Короткая пауза при ошибке
+        finally:
+            await self._stop_streaming()
+            await self.ledger.stop()
     
     def stop_monitoring(self):
         """Остановка мониторинга"""
         self.is_running = False
+        for task in self._stream_tasks:
+            task.cancel()
         logger.info("⏹️ Мониторинг позиций остановлен", category='position')
     
+    # =================================================================
+    # ПОТОК ЦЕН
+    # =================================================================
+    
+    async def _start_streaming(self):
+        """Подписка на тики и позиции из потока (без потока работает только опрос)"""
+        if self.stream is None:
+            return
+        
+        try:
+            self._owns_stream = not self.stream.is_running
+            await self.stream.start()
+            ticks = self.stream.subscribe('ticker')
+            position_updates = self.stream.subscribe('position')
+            self._stream_tasks = [
+                asyncio.create_task(self._tick_loop(ticks)),
+                asyncio.create_task(self._position_stream_loop(position_updates))
+            ]
+        except Exception as e:
+            logger.error(f"❌ Поток цен недоступен, только опрос REST: {e}", category='position')
+            self.stream = None
+    
+    async def _stop_streaming(self):
+        for task in self._stream_tasks:
+            task.cancel()
+        await asyncio.gather(*self._stream_tasks, return_exceptions=True)
+        self._stream_tasks = []
+        if self.stream is not None and self._owns_stream:
+            await self.stream.stop()
+    
+    async def _tick_loop(self, ticks):
+        """SL/TP и трейлинг стопы на каждом обновлении цены"""
+        try:
+            while self.is_running:
+                updates = await ticks.get()
+                try:
+                    await self.on_ticks(updates)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка обработки тиков: {e}", category='position')
+        finally:
+            ticks.close()
+    
+    async def on_ticks(self, ticks: Dict[str, Tick]):
+        """Применить новые цены и проверить стопы по изменившимся символам"""
+        async with self._check_lock:
+            changed = []
+            for symbol, tick in ticks.items():
+                position = self.positions.get(symbol)
+                if position is None:
+                    continue
+                self._apply_price(position, tick.price)
+                changed.append(symbol)
+            
+            if changed:
+                await self._check_stop_loss_take_profit(changed)
+                await self._update_trailing_stops(changed)
+    
+    @staticmethod
+    def _apply_price(position: PositionInfo, price: float):
+        """Новая цена позиции и PnL от цены входа"""
+        direction = 1 if position.side == 'long' else -1
+        position.current_price = price
+        position.unrealized_pnl = (price - position.entry_price) * position.size * direction
+        if position.entry_price:
+            position.unrealized_pnl_percent = (price / position.entry_price - 1) * 100 * direction
+    
+    async def _position_stream_loop(self, position_updates):
+        """Открытие/закрытие позиций из приватного потока - без ожидания сверки"""
+        try:
+            while self.is_running:
+                updates = await position_updates.get()
+                try:
+                    async with self._check_lock:
+                        await self._apply_position_updates(updates)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка обработки потока позиций: {e}", category='position')
+        finally:
+            position_updates.close()
+    
+    async def _apply_position_updates(self, updates: Dict[str, PositionUpdate]):
+        closed = []
+        for symbol, update in updates.items():
+            if update.size <= 0 or update.side is None:
+                if self.positions.pop(symbol, None) is not None:
+                    closed.append(symbol)
+                continue
+            
+            position = self.positions.get(symbol)
+            if position is None:
+                price = update.mark_price or self.stream.latest_price(symbol) or update.entry_price
+                position = PositionInfo(
+                    symbol=symbol,
+                    side=update.side,
+                    size=update.size,
+                    entry_price=update.entry_price,
+                    current_price=price,
+                    unrealized_pnl=update.unrealized_pnl,
+                    unrealized_pnl_percent=0.0
+                )
+                self.positions[symbol] = position
+                self._apply_price(position, price)
+                await self.stream.subscribe_tickers([symbol])
+            else:
+                position.side = update.side
+                position.size = update.size
+                position.entry_price = update.entry_price
+        
+        if closed:
+            await self.stream.unsubscribe_tickers(closed)
+    
     async def _monitoring_cycle(self):
         """Один цикл мониторинга"""
         try:
             # 1. Обновляем информацию о позициях
             await self._update_positions()
             
-            # 2. Загружаем активные сделки из БД
-            await self._load_active_trades()
-            
-            # 3. Проверяем stop-loss/take-profit
-            await self._check_stop_loss_take_profit()
-            
-            # 4. Обновляем трейлинг стопы
-            await self._update_trailing_stops()
+            async with self._check_lock:
+                # 2. Стопы сделок из журнала (в памяти, без запроса к БД)
+                await self._load_active_trades()
+                
+                # 3. Проверяем stop-loss/take-profit
+                await self._check_stop_loss_take_profit()
+                
+                # 4. Обновляем трейлинг стопы
+                await self._update_trailing_stops()
             
             # 5. Проверяем условия для частичного закрытия
             await self._check_partial_close()
@@ -135,40 +272,77 @@ class PositionManager:
             # 6. Проверяем экстренные условия
             await self._check_emergency_conditions()
             
-            # 7. Обновляем PnL в базе данных
+            # 7. Обновляем PnL сделок в журнале
             await self._update_trades_pnl()
             
         except Exception as e:
             logger.error(f"❌ Ошибка в цикле мониторинга: {e}")
     
     async def _update_positions(self):
-        """Обновление информации о позициях с биржи"""
+        """Сверка позиций с биржей; цены из потока, REST тикер - только без свежей цены"""
         try:
             # Получаем позиции с биржи
             exchange_positions = await self.exchange.fetch_positions()
+            open_positions = [pos for pos in exchange_positions if pos.size > 0]  # Только открытые позиции
+            symbols = [pos.symbol for pos in open_positions]
             
-            # Обновляем наш кэш
-            self.positions.clear()
+            if self.stream is not None:
+                await self.stream.subscribe_tickers(symbols)
             
-            for pos in exchange_positions:
-                if pos.size > 0:  # Только открытые позиции
-                    symbol = pos.symbol
-                    
-                    # Получаем текущую цену
-                    ticker = await self.exchange.fetch_ticker(symbol)
-                    current_price = ticker['last']
-                    
-                    position_info = PositionInfo(
-                        symbol=symbol,
-                        side=pos.side,
-                        size=pos.size,
-                        entry_price=pos.entry_price,
-                        current_price=current_price,
-                        unrealized_pnl=pos.unrealized_pnl,
-                        unrealized_pnl_percent=pos.percentage
-                    )
-                    
-                    self.positions[symbol] = position_info
+            # Текущие цены: поток, для остальных - тикеры одним запросом
+            prices = {}
+            for symbol in symbols:
+                price = self.stream.latest_price(symbol) if self.stream is not None else None
+                if price is not None:
+                    prices[symbol] = price
+            
+            missing = [symbol for symbol in symbols if symbol not in prices]
+            if missing:
+                try:
+                    tickers = await self.exchange.fetch_tickers(missing)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка получения цен {missing}: {e}")
+                    tickers = {}
+                for symbol in missing:
+                    if symbol in tickers:
+                        prices[symbol] = tickers[symbol]['last']
+                    else:
+                        logger.error(f"❌ Нет цены для {symbol}")
+            
+            # Новый кэш собирается целиком и подменяется без await:
+            # обработчик тиков не видит частично обновленный словарь
+            positions = {}
+            for pos in open_positions:
+                if pos.symbol not in prices:
+                    continue
+                
+                position_info = PositionInfo(
+                    symbol=pos.symbol,
+                    side=pos.side,
+                    size=pos.size,
+                    entry_price=pos.entry_price,
+                    current_price=prices[pos.symbol],
+                    unrealized_pnl=pos.unrealized_pnl,
+                    unrealized_pnl_percent=pos.percentage
+                )
+                
+                # Экстремумы трейлинг стопа и стопы сохраняются между сверками
+                previous = self.positions.get(pos.symbol)
+                if previous is not None:
+                    position_info.stop_loss = previous.stop_loss
+                    position_info.take_profit = previous.take_profit
+                    position_info.trailing_stop = previous.trailing_stop
+                    position_info.trailing_distance = previous.trailing_distance
+                    position_info.max_price = previous.max_price
+                    position_info.min_price = previous.min_price
+                
+                positions[pos.symbol] = position_info
+            
+            removed = [symbol for symbol in self.positions if symbol not in positions]
+            self.positions = positions
+            
+            if removed and self.stream is not None:
+                await self.stream.unsubscribe_tickers(removed)
             
             if self.positions:
                 logger.debug(
@@ -181,33 +355,26 @@ class PositionManager:
             logger.error(f"❌ Ошибка обновления позиций: {e}")
     
     async def _load_active_trades(self):
-        """Загрузка активных сделок из БД"""
-        db = SessionLocal()
-        try:
-            active_trades = db.query(Trade).filter(
-                Trade.status == TradeStatus.OPEN
-            ).all()
-            
-            self.active_trades.clear()
-            for trade in active_trades:
-                self.active_trades[trade.id] = trade
-                
-                # Добавляем информацию о stop-loss/take-profit к позициям
-                if trade.symbol in self.positions:
-                    position = self.positions[trade.symbol]
-                    position.stop_loss = trade.stop_loss
-                    position.take_profit = trade.take_profit
-                    position.trailing_stop = trade.trailing_stop or False
-                    position.trailing_distance = trade.trailing_distance
-            
-        finally:
-            db.close()
+        """Stop-loss/take-profit активных сделок к позициям (БД читается один раз при старте журнала)"""
+        await self.ledger.ensure_loaded()
+        
+        for symbol, position in self.positions.items():
+            trade = self.ledger.by_symbol(symbol)
+            if trade is None:
+                continue
+            position.stop_loss = trade.stop_loss
+            position.take_profit = trade.take_profit
+            position.trailing_stop = trade.trailing_stop or position.trailing_stop
+            position.trailing_distance = trade.trailing_distance or position.trailing_distance
     
-    async def _check_stop_loss_take_profit(self):
-        """Проверка условий stop-loss и take-profit"""
+    async def _check_stop_loss_take_profit(self, symbols: Optional[Iterable[str]] = None):
+        """Проверка условий stop-loss и take-profit (по умолчанию - всех позиций)"""
         updates = []
         
-        for symbol, position in self.positions.items():
+        for symbol in list(self.positions if symbols is None else symbols):
+            position = self.positions.get(symbol)
+            if position is None or not self._can_close(symbol):
+                continue
             try:
                 # Проверяем stop-loss
                 if position.stop_loss:
@@ -235,8 +402,10 @@ class PositionManager:
                                 status=TradeStatus.CLOSED,
                                 exit_price=position.current_price,
                                 profit=position.unrealized_pnl,
-                                exit_reason="Stop-Loss"
+                                exit_reason="Stop-Loss",
+                                symbol=symbol
                             ))
+                            continue
                 
                 # Проверяем take-profit
                 if position.take_profit:
@@ -264,20 +433,22 @@ class PositionManager:
                                 status=TradeStatus.CLOSED,
                                 exit_price=position.current_price,
                                 profit=position.unrealized_pnl,
-                                exit_reason="Take-Profit"
+                                exit_reason="Take-Profit",
+                                symbol=symbol
                             ))
                 
             except Exception as e:
                 logger.error(f"❌ Ошибка проверки SL/TP для {symbol}: {e}")
         
-        # Обновляем сделки в БД
+        # Закрываем сделки в журнале
         if updates:
             await self._update_trades_in_db(updates)
     
-    async def _update_trailing_stops(self):
-        """Обновление трейлинг стопов"""
-        for symbol, position in self.positions.items():
-            if not position.trailing_stop or not position.trailing_distance:
+    async def _update_trailing_stops(self, symbols: Optional[Iterable[str]] = None):
+        """Обновление трейлинг стопов (по умолчанию - всех позиций)"""
+        for symbol in list(self.positions if symbols is None else symbols):
+            position = self.positions.get(symbol)
+            if position is None or not position.trailing_stop or not position.trailing_distance:
                 continue
             
             try:
@@ -296,8 +467,8 @@ class PositionManager:
                         if not position.stop_loss or new_stop > position.stop_loss:
                             position.stop_loss = new_stop
                             
-                            # Обновляем в БД
-                            await self._update_trade_stop_loss(trade.id, new_stop)
+                            # В БД - фоновой пачкой (не на каждом тике)
+                            self.ledger.update(trade, stop_loss=new_stop)
                             
                             logger.info(
                                 f"📈 Трейлинг стоп обновлен для {symbol}",
@@ -317,8 +488,8 @@ class PositionManager:
                         if not position.stop_loss or new_stop < position.stop_loss:
                             position.stop_loss = new_stop
                             
-                            # Обновляем в БД
-                            await self._update_trade_stop_loss(trade.id, new_stop)
+                            # В БД - фоновой пачкой (не на каждом тике)
+                            self.ledger.update(trade, stop_loss=new_stop)
                             
                             logger.info(
                                 f"📉 Трейлинг стоп обновлен для {symbol}",
@@ -333,12 +504,13 @@ class PositionManager:
     
     async def _check_partial_close(self):
         """Проверка условий для частичного закрытия позиций"""
-        for symbol, position in self.positions.items():
+        # Снимок: обработчик тиков может закрыть позицию, пока ждем ордер
+        for symbol, position in list(self.positions.items()):
             try:
                 # Если прибыль достигла порога, закрываем 50% позиции
                 if position.unrealized_pnl_percent >= self.partial_close_profit_threshold * 100:
                     trade = self._get_trade_by_symbol(symbol)
-                    if trade and not hasattr(trade, 'partial_closed'):
+                    if trade and not trade.partial_closed:
                         
                         partial_size = position.size * 0.5
                         
@@ -360,8 +532,8 @@ class PositionManager:
                                 profit_percent=position.unrealized_pnl_percent
                             )
                             
-                            # Помечаем в БД что частично закрыто
-                            await self._mark_partial_closed(trade.id)
+                            # Помечаем что частично закрыто
+                            await self._mark_partial_closed(trade)
                 
             except Exception as e:
                 logger.error(f"❌ Ошибка частичного закрытия {symbol}: {e}")
@@ -395,38 +567,36 @@ class PositionManager:
             logger.error(f"❌ Ошибка проверки экстренных условий: {e}")
     
     async def _update_trades_pnl(self):
-        """Обновление PnL сделок в БД"""
-        if not self.positions:
-            return
-        
-        db = SessionLocal()
-        try:
-            for symbol, position in self.positions.items():
-                trade = self._get_trade_by_symbol(symbol)
-                if trade:
-                    trade.current_price = position.current_price
-                    trade.unrealized_pnl = position.unrealized_pnl
-                    trade.updated_at = datetime.utcnow()
-                    
-                    db.merge(trade)
-            
-            db.commit()
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка обновления PnL в БД: {e}")
-        finally:
-            db.close()
+        """Обновление PnL сделок в журнале (колонок нереализованного PnL в trades нет)"""
+        for symbol, position in self.positions.items():
+            trade = self._get_trade_by_symbol(symbol)
+            if trade:
+                self.ledger.update(
+                    trade,
+                    current_price=position.current_price,
+                    unrealized_pnl=position.unrealized_pnl
+                )
     
     # =================================================================
     # ВСПОМОГАТЕЛЬНЫЕ МЕТОДЫ
     # =================================================================
     
+    def _can_close(self, symbol: str) -> bool:
+        """После неудачного закрытия повтор не раньше чем через close_retry_seconds"""
+        failed_at = self._close_failed_at.get(symbol)
+        return failed_at is None or time.monotonic() - failed_at >= self.close_retry_seconds
+    
     async def _close_position_with_reason(self, symbol: str, reason: str) -> bool:
         """Закрытие позиции с указанием причины"""
         try:
             success = await self.exchange.close_position(symbol)
             
             if success:
+                # Следующие тики по символу больше не проверяются
+                self.positions.pop(symbol, None)
+                self._close_failed_at.pop(symbol, None)
+                if self.stream is not None:
+                    await self.stream.unsubscribe_tickers([symbol])
                 logger.info(
                     f"✅ Позиция {symbol} закрыта: {reason}",
                     category='position',
@@ -434,6 +604,7 @@ class PositionManager:
                     reason=reason
                 )
             else:
+                self._close_failed_at[symbol] = time.monotonic()
                 logger.error(
                     f"❌ Не удалось закрыть позицию {symbol}: {reason}",
                     category='position',
@@ -444,83 +615,39 @@ class PositionManager:
             return success
             
         except Exception as e:
+            self._close_failed_at[symbol] = time.monotonic()
             logger.error(f"❌ Ошибка закрытия позиции {symbol}: {e}")
             return False
     
-    def _get_trade_by_symbol(self, symbol: str) -> Optional[Trade]:
+    def _get_trade_by_symbol(self, symbol: str) -> Optional[TradeRecord]:
         """Получение сделки по символу"""
-        for trade in self.active_trades.values():
-            if trade.symbol == symbol:
-                return trade
-        return None
+        return self.ledger.by_symbol(symbol)
     
     def _get_trade_id_by_symbol(self, symbol: str) -> Optional[int]:
         """Получение ID сделки по символу"""
         trade = self._get_trade_by_symbol(symbol)
         return trade.id if trade else None
     
-    async def _update_trade_stop_loss(self, trade_id: int, new_stop_loss: float):
-        """Обновление stop-loss сделки в БД"""
-        db = SessionLocal()
-        try:
-            trade = db.query(Trade).filter(Trade.id == trade_id).first()
-            if trade:
-                trade.stop_loss = new_stop_loss
-                trade.updated_at = datetime.utcnow()
-                db.commit()
-                
-        except Exception as e:
-            logger.error(f"❌ Ошибка обновления stop-loss: {e}")
-        finally:
-            db.close()
-    
-    async def _mark_partial_closed(self, trade_id: int):
-        """Пометить сделку как частично закрытую"""
-        db = SessionLocal()
-        try:
-            trade = db.query(Trade).filter(Trade.id == trade_id).first()
-            if trade:
-                # Добавляем флаг частичного закрытия
-                if not trade.notes:
-                    trade.notes = "partial_closed"
-                else:
-                    trade.notes += ",partial_closed"
-                trade.updated_at = datetime.utcnow()
-                db.commit()
-                
-        except Exception as e:
-            logger.error(f"❌ Ошибка пометки частичного закрытия: {e}")
-        finally:
-            db.close()
+    async def _mark_partial_closed(self, trade: TradeRecord):
+        """Пометить сделку как частично закрытую (флаг в журнале: колонки в trades нет)"""
+        self.ledger.update(trade, partial_closed=True)
     
     async def _update_trades_in_db(self, updates: List[TradeUpdate]):
-        """Обновление сделок в БД"""
-        db = SessionLocal()
-        try:
-            for update in updates:
-                trade = db.query(Trade).filter(Trade.id == update.trade_id).first()
-                if trade:
-                    trade.status = update.status
-                    if update.exit_price:
-                        trade.exit_price = update.exit_price
-                    if update.profit is not None:
-                        trade.profit = update.profit
-                    if update.exit_reason:
-                        trade.exit_reason = update.exit_reason
-                    trade.closed_at = datetime.utcnow()
-                    trade.updated_at = datetime.utcnow()
-            
-            db.commit()
-            
-            logger.info(
-                f"✅ Обновлено сделок в БД: {len(updates)}",
-                category='position'
-            )
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка обновления сделок в БД: {e}")
-        finally:
-            db.close()
+        """Закрытие сделок в журнале; в БД - фоновой записью без ожидания паузы"""
+        for update in updates:
+            if update.trade_id is not None:
+                trade = self.ledger.get(update.trade_id)
+            else:
+                trade = self.ledger.by_symbol(update.symbol) if update.symbol else None
+            if trade is None:
+                continue
+            self.ledger.close(trade, exit_price=update.exit_price, profit=update.profit,
+                              status=update.status.value)
+        
+        logger.info(
+            f"✅ Обновлено сделок: {len(updates)}",
+            category='position'
+        )
     
     # =================================================================
     # ПУБЛИЧНЫЕ МЕТОДЫ
@@ -571,15 +698,9 @@ class PositionManager:
             
             if closed_count > 0:
                 # Обновляем статус всех активных сделок
-                updates = []
-                for trade_id in self.active_trades.keys():
-                    updates.append(TradeUpdate(
-                        trade_id=trade_id,
-                        status=TradeStatus.CLOSED,
-                        exit_reason="Emergency Stop"
-                    ))
-                
-                await self._update_trades_in_db(updates)
+                for trade in self.ledger.open_trades():
+                    self.ledger.close(trade)
+                await self.ledger.flush()
                 
                 logger.critical(
                     f"🚨 Экстренно закрыто позиций: {closed_count}",
@@ -602,32 +723,23 @@ class PositionManager:
                 logger.error(f"❌ Сделка для {symbol} не найдена")
                 return False
             
-            # Обновляем в БД
-            db = SessionLocal()
-            try:
-                trade.trailing_stop = True
-                trade.trailing_distance = trailing_distance_percent
-                trade.updated_at = datetime.utcnow()
-                db.merge(trade)
-                db.commit()
-                
-                # Обновляем в позиции
-                if symbol in self.positions:
-                    self.positions[symbol].trailing_stop = True
-                    self.positions[symbol].trailing_distance = trailing_distance_percent
-                
-                logger.info(
-                    f"✅ Трейлинг стоп установлен для {symbol}: {trailing_distance_percent}%",
-                    category='position',
-                    symbol=symbol,
-                    trailing_distance=trailing_distance_percent
-                )
-                
-                return True
-                
-            finally:
-                db.close()
-                
+            # Обновляем в журнале
+            self.ledger.update(trade, trailing_stop=True, trailing_distance=trailing_distance_percent)
+            
+            # Обновляем в позиции
+            if symbol in self.positions:
+                self.positions[symbol].trailing_stop = True
+                self.positions[symbol].trailing_distance = trailing_distance_percent
+            
+            logger.info(
+                f"✅ Трейлинг стоп установлен для {symbol}: {trailing_distance_percent}%",
+                category='position',
+                symbol=symbol,
+                trailing_distance=trailing_distance_percent
+            )
+            
+            return True
+            
         except Exception as e:
             logger.error(f"❌ Ошибка установки трейлинг стопа для {symbol}: {e}")
             return False
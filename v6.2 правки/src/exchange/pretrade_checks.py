@@ -0,0 +1,212 @@
+"""
+ПРЕДТОРГОВЫЕ ПРОВЕРКИ: ПАРАЛЛЕЛЬНАЯ СТАДИЯ ПАЙПЛАЙНА
+Файл: src/exchange/pretrade_checks.py
+
+Раньше execute_signal выполнял проверки по очереди: валидация сигнала,
+расчет риска, стакан (fetch_order_book), корреляция позиций. Задержка
+сигнал -> ордер была суммой всех проверок.
+
+PreTradeStage:
+✅ Независимые проверки запускаются одновременно - задержка равна самой
+   медленной, а не сумме
+✅ Дедлайн на каждую проверку: по истечении - запасной результат
+   проверки (как при ее ошибке), стадия не ждет зависший запрос
+✅ Выход по первому жесткому отказу: остальные проверки отменяются
+✅ Кэш результатов в пределах бара (symbol, action, bar) для проверок,
+   которые от бара и зависят; bar может включать входные данные проверки
+   (уверенность, цена, баланс), invalidate() после ордера
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..core.config import config
+from ..logging.smart_logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class CheckResult:
+    """Результат одной проверки"""
+    passed: bool
+    reason: str = ''
+    data: Dict[str, Any] = field(default_factory=dict)
+    seconds: float = 0.0
+    timed_out: bool = False
+    fallback_used: bool = False           # дедлайн или ошибка - в кэш не попадает
+    cached: bool = False
+
+
+@dataclass
+class PreTradeCheck:
+    """Описание проверки стадии"""
+    name: str
+    run: Callable[[], Awaitable[CheckResult]]
+    fallback: CheckResult                 # результат при дедлайне или ошибке
+    timeout: Optional[float] = None       # по умолчанию PRETRADE_CHECK_TIMEOUT_SECONDS
+    cacheable: bool = False               # результат постоянен в пределах бара
+
+
+def _last_candle_open(candles: Any) -> Optional[Any]:
+    """Время открытия последней свечи: список dict / [ts, o, h, l, c, v] или DataFrame"""
+    if candles is None or len(candles) == 0:
+        return None
+    if hasattr(candles, 'iloc'):
+        if 'timestamp' in candles.columns:
+            return candles['timestamp'].iloc[-1]
+        return candles.index[-1]
+    last = candles[-1]
+    if isinstance(last, dict):
+        return last.get('timestamp')
+    return last[0]
+
+
+class PreTradeStage:
+    """
+    Параллельные предторговые проверки с дедлайнами и ранним отказом
+
+    Пример:
+        passed, results = await stage.run([
+            PreTradeCheck('signal', validate, fallback=CheckResult(True)),
+            PreTradeCheck('liquidity', check_book, fallback=CheckResult(True), timeout=1.0),
+        ], cache_key=(symbol, action, bar))
+    """
+
+    def __init__(self, default_timeout: Optional[float] = None):
+        self.default_timeout = default_timeout or config.PRETRADE_CHECK_TIMEOUT_SECONDS
+
+        # (имя проверки, symbol, action) -> (bar, результат)
+        self._cache: Dict[Tuple[str, Any, Any], Tuple[Any, CheckResult]] = {}
+        self.stats = {
+            'runs': 0,
+            'rejected': 0,
+            'timeouts': 0,
+            'errors': 0,
+            'cache_hits': 0,
+            'cancelled': 0,
+            'last_seconds': 0.0,
+            'total_seconds': 0.0
+        }
+
+    @staticmethod
+    def bar_id(market_conditions: Dict[str, Any]) -> Any:
+        """
+        Бар сигнала
+
+        По порядку: bar_timestamp, время открытия последней свечи из
+        candles, иначе время (timestamp анализа или текущее), округленное
+        вниз до PRETRADE_BAR_SECONDS. Время анализа как есть ключом бара
+        не служит - оно новое на каждом цикле.
+        """
+        if market_conditions.get('bar_timestamp') is not None:
+            return market_conditions['bar_timestamp']
+
+        opened = _last_candle_open(market_conditions.get('candles'))
+        if opened is not None:
+            return opened
+
+        moment = market_conditions.get('timestamp')
+        seconds = moment.timestamp() if hasattr(moment, 'timestamp') else time.time()
+        return int(seconds // config.PRETRADE_BAR_SECONDS)
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Сбросить кэш: весь или по символу"""
+        if symbol is None:
+            self._cache.clear()
+        else:
+            for key in [k for k in self._cache if k[1] == symbol]:
+                del self._cache[key]
+
+    async def _guarded(self, check: PreTradeCheck) -> CheckResult:
+        """Проверка с дедлайном; ошибка или дедлайн - запасной результат"""
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(check.run(), timeout=check.timeout or self.default_timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            logger.warning(f"⚠️ Проверка {check.name}: дедлайн истек", category='execution')
+            result = CheckResult(check.fallback.passed, check.fallback.reason or 'deadline exceeded',
+                                 dict(check.fallback.data), timed_out=True, fallback_used=True)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning(f"⚠️ Ошибка проверки {check.name}: {e}", category='execution')
+            result = CheckResult(check.fallback.passed, check.fallback.reason or str(e),
+                                 dict(check.fallback.data), fallback_used=True)
+        result.seconds = time.perf_counter() - started
+        return result
+
+    async def run(self, checks: List[PreTradeCheck],
+                  cache_key: Optional[Tuple[Any, Any, Any]] = None) -> Tuple[bool, Dict[str, CheckResult]]:
+        """
+        Выполнить проверки одновременно
+
+        Args:
+            checks: Независимые проверки
+            cache_key: (symbol, action, bar) для кэшируемых проверок; bar -
+                любое хешируемое значение, результат берется из кэша при равенстве
+
+        Returns:
+            (все прошли, результаты по именам; при отказе - только завершенные)
+        """
+        started = time.perf_counter()
+        self.stats['runs'] += 1
+        results: Dict[str, CheckResult] = {}
+        to_run: List[PreTradeCheck] = []
+
+        for check in checks:
+            if check.cacheable and cache_key is not None:
+                symbol, action, bar = cache_key
+                entry = self._cache.get((check.name, symbol, action))
+                if entry is not None and entry[0] == bar:
+                    self.stats['cache_hits'] += 1
+                    cached = entry[1]
+                    results[check.name] = CheckResult(cached.passed, cached.reason, cached.data,
+                                                      cached=True)
+                    continue
+            to_run.append(check)
+
+        # Отказ из кэша - без запуска остальных проверок
+        passed = all(result.passed for result in results.values())
+        tasks: Dict[asyncio.Task, PreTradeCheck] = {
+            asyncio.create_task(self._guarded(check)): check for check in to_run
+        } if passed else {}
+        pending = set(tasks)
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                check = tasks[task]
+                result = task.result()
+                results[check.name] = result
+                if check.cacheable and cache_key is not None and not result.fallback_used:
+                    symbol, action, bar = cache_key
+                    self._cache[(check.name, symbol, action)] = (bar, result)
+                if not result.passed:
+                    passed = False
+            if not passed and pending:
+                # Жесткий отказ - остальные проверки не нужны
+                self.stats['cancelled'] += len(pending)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                pending = set()
+
+        if not passed:
+            self.stats['rejected'] += 1
+        elapsed = time.perf_counter() - started
+        self.stats['last_seconds'] = elapsed
+        self.stats['total_seconds'] += elapsed
+        return passed, results
+
+    def get_stats(self) -> Dict[str, Any]:
+        runs = self.stats['runs']
+        return {
+            **self.stats,
+            'avg_seconds': self.stats['total_seconds'] / runs if runs else 0.0,
+            'cache_entries': len(self._cache)
+        }
+
+
+__all__ = ['PreTradeStage', 'PreTradeCheck', 'CheckResult']
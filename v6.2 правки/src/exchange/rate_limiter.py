@@ -0,0 +1,377 @@
+"""
+ОБЩИЙ ПЛАНИРОВЩИК ЛИМИТОВ ЗАПРОСОВ К БИРЖЕ
+Файл: src/exchange/rate_limiter.py
+
+Раньше темп запросов задавали паузы в коде: sleep(0.5) между символами
+и позициями, случайные задержки перед каждым чтением, отдельный
+троттлинг ccxt в каждом экземпляре клиента. Под лимитом пропускная
+способность терялась, а всплески от нескольких клиентов все равно
+получали 429.
+
+RateLimitScheduler:
+✅ Token bucket на лимит IP (Bybit: 600 запросов за 5 секунд) и на
+   группы эндпоинтов с лимитами по UID (ордера, запросы ордеров,
+   позиции, баланс), с весами методов ccxt
+✅ Один экземпляр на процесс - общий для всех клиентов (get_rate_limiter)
+✅ Приоритетные полосы: ордера и отмены идут раньше данных; для них
+   держится резерв токенов, который данные не расходуют
+✅ Статистика: доля используемого лимита, очереди, ожидание
+✅ Потокобезопасность: ведра и очередь под threading.Lock; у каждого
+   event loop (бот, поток веб-запросов, asyncio.run в API) свой
+   диспетчер, разрешения ожидающим из чужих loop выдаются через
+   call_soon_threadsafe
+
+Ведра считаются с запасом: скорость пополнения 80% лимита, емкость 20% -
+за любое окно лимита уходит не больше лимита.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+import weakref
+from collections import deque
+from enum import IntEnum
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.config import config
+from ..logging.smart_logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Priority(IntEnum):
+    """Полосы приоритета (меньше - раньше)"""
+    ORDER = 0       # размещение и отмена ордеров
+    ACCOUNT = 1     # позиции, баланс, статусы ордеров
+    DATA = 2        # рыночные данные
+
+
+# Лимиты Bybit v5 по UID: группа -> (запросов, окно в секундах)
+GROUP_LIMITS = {
+    'order': (10, 1.0),          # create / amend / cancel
+    'order_query': (50, 1.0),    # realtime / history
+    'execution': (50, 1.0),
+    'position': (50, 1.0),
+    'account': (50, 1.0),        # wallet-balance
+}
+
+# Метод ccxt -> (группа или None - только лимит IP, полоса, вес)
+METHOD_LIMITS: Dict[str, Tuple[Optional[str], Priority, float]] = {
+    'create_order': ('order', Priority.ORDER, 1),
+    'edit_order': ('order', Priority.ORDER, 1),
+    'cancel_order': ('order', Priority.ORDER, 1),
+    'cancel_all_orders': ('order', Priority.ORDER, 1),
+    'set_leverage': ('position', Priority.ORDER, 1),
+    'fetch_order': ('order_query', Priority.ACCOUNT, 1),
+    'fetch_open_orders': ('order_query', Priority.ACCOUNT, 1),
+    'fetch_closed_orders': ('order_query', Priority.ACCOUNT, 1),
+    'fetch_orders': ('order_query', Priority.ACCOUNT, 1),
+    'fetch_my_trades': ('execution', Priority.ACCOUNT, 1),
+    'fetch_positions': ('position', Priority.ACCOUNT, 1),
+    'fetch_balance': ('account', Priority.ACCOUNT, 1),
+    # Загрузка рынков - по запросу на каждую категорию (spot, linear, inverse, option)
+    'load_markets': (None, Priority.DATA, 4),
+    'fetch_markets': (None, Priority.DATA, 4),
+}
+DEFAULT_LIMIT = (None, Priority.DATA, 1)
+
+# Методы ccxt, которые ходят в сеть (остальные - без лимита)
+REQUEST_PREFIXES = (
+    'fetch', 'create', 'cancel', 'edit', 'load_markets',
+    'set_leverage', 'set_margin_mode', 'set_position_mode'   # set_markets - локальный, без сети
+)
+
+
+class TokenBucket:
+    """Ведро токенов для лимита `limit` запросов за `window` секунд"""
+
+    def __init__(self, name: str, limit: float, window: float):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.rate = 0.8 * limit / window
+        self.capacity = max(1.0, limit - self.rate * window)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._history: deque = deque()   # (время, вес) за последнее окно
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, weight: float, reserve: float = 0.0) -> float:
+        """Секунд до появления weight токенов сверх reserve"""
+        missing = weight + reserve - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def consume(self, weight: float, now: float):
+        self.tokens -= weight
+        self._history.append((now, weight))
+
+    def usage(self, now: float) -> float:
+        """Доля лимита, израсходованная за последнее окно"""
+        while self._history and now - self._history[0][0] > self.window:
+            self._history.popleft()
+        return sum(w for _, w in self._history) / self.limit
+
+
+class _LoopState:
+    """Диспетчер и сигнал пробуждения одного event loop"""
+
+    __slots__ = ('wakeup', 'dispatcher')
+
+    def __init__(self):
+        self.wakeup = asyncio.Event()
+        self.dispatcher: Optional[asyncio.Task] = None
+
+
+def _set_pending(future: asyncio.Future):
+    """Разрешить ожидающего, если его еще не отменили"""
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimitScheduler:
+    """
+    Планировщик запросов к бирже с общими лимитами и приоритетами
+
+    Пример:
+        await get_rate_limiter().acquire('create_order')
+        order = await exchange.create_order(...)
+    """
+
+    def __init__(self, ip_limit: Optional[float] = None, ip_window: Optional[float] = None,
+                 group_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 order_reserve: Optional[float] = None):
+        """
+        Args:
+            ip_limit: Запросов за окно на IP (по умолчанию RATE_LIMIT_IP_REQUESTS)
+            ip_window: Окно лимита IP, секунды
+            group_limits: Лимиты групп эндпоинтов (по умолчанию GROUP_LIMITS Bybit)
+            order_reserve: Токены IP, недоступные полосе данных
+        """
+        self.ip = TokenBucket(
+            'ip',
+            ip_limit or config.RATE_LIMIT_IP_REQUESTS,
+            ip_window or config.RATE_LIMIT_IP_WINDOW
+        )
+        self.groups = {
+            name: TokenBucket(name, limit, window)
+            for name, (limit, window) in (group_limits or GROUP_LIMITS).items()
+        }
+        self.order_reserve = config.RATE_LIMIT_ORDER_RESERVE if order_reserve is None else order_reserve
+
+        # Общая очередь ожидающих всех loop: (приоритет, порядок, вес, группа, future, loop)
+        self._queue: list = []
+        self._sequence = itertools.count()
+        self._loops: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]' = \
+            weakref.WeakKeyDictionary()
+        # Ведра, очередь и статистика - из любых потоков
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'requests': 0,
+            'queued': 0,
+            'wait_seconds_total': 0.0,
+            'max_wait_seconds': 0.0,
+            'by_priority': {p.name: 0 for p in Priority}
+        }
+
+    @staticmethod
+    def is_request(method: str) -> bool:
+        return method.startswith(REQUEST_PREFIXES)
+
+    # =================================================================
+    # ПОЛУЧЕНИЕ РАЗРЕШЕНИЯ
+    # =================================================================
+
+    def _ready(self, weight: float, group: Optional[str], priority: Priority, now: float) -> Tuple[float, bool]:
+        """(секунд до готовности, блокирует ли лимит IP)"""
+        reserve = self.order_reserve if priority > Priority.ORDER else 0.0
+        self.ip.refill(now)
+        ip_wait = self.ip.wait_time(weight, reserve)
+        group_wait = 0.0
+        if group in self.groups:
+            self.groups[group].refill(now)
+            group_wait = self.groups[group].wait_time(weight)
+        return max(ip_wait, group_wait), ip_wait > 0
+
+    def _consume(self, weight: float, group: Optional[str], now: float):
+        self.ip.consume(weight, now)
+        if group in self.groups:
+            self.groups[group].consume(weight, now)
+
+    async def acquire(self, method: str, priority: Optional[Priority] = None,
+                      weight: Optional[float] = None):
+        """
+        Дождаться разрешения на запрос
+
+        Args:
+            method: Метод ccxt (определяет группу, полосу и вес)
+            priority: Переопределить полосу
+            weight: Переопределить вес
+        """
+        group, default_priority, default_weight = METHOD_LIMITS.get(method, DEFAULT_LIMIT)
+        priority = default_priority if priority is None else priority
+        weight = default_weight if weight is None else weight
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['by_priority'][priority.name] += 1
+
+            now = time.monotonic()
+            # Без очереди впереди с тем же или более высоким приоритетом - сразу
+            if not any(entry[0] <= priority for entry in self._queue):
+                wait, _ = self._ready(weight, group, priority, now)
+                if wait <= 0:
+                    self._consume(weight, group, now)
+                    return
+
+            future = loop.create_future()
+            heapq.heappush(self._queue, (priority, next(self._sequence), weight, group, future, loop))
+            self.stats['queued'] += 1
+            state = self._loops.get(loop)
+            if state is None:
+                state = self._loops[loop] = _LoopState()
+
+        if state.dispatcher is None or state.dispatcher.done():
+            state.dispatcher = loop.create_task(self._dispatch(loop, state))
+        state.wakeup.set()
+
+        started = time.monotonic()
+        await future
+        waited = time.monotonic() - started
+        with self._lock:
+            self.stats['wait_seconds_total'] += waited
+            self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], waited)
+
+    async def _dispatch(self, loop: asyncio.AbstractEventLoop, state: _LoopState):
+        """Выдача разрешений в порядке приоритета, пока в очереди есть ожидающие этого loop"""
+        while True:
+            state.wakeup.clear()
+            with self._lock:
+                next_wait, own_pending = self._grant(loop)
+            if not own_pending:
+                break
+            try:
+                await asyncio.wait_for(state.wakeup.wait(), timeout=next_wait or 0.001)
+            except asyncio.TimeoutError:
+                pass
+
+    def _grant(self, loop: asyncio.AbstractEventLoop) -> Tuple[Optional[float], bool]:
+        """
+        Один проход по общей очереди (под self._lock)
+
+        Разрешает всех готовых, в том числе ожидающих из других loop.
+
+        Returns:
+            (секунд до следующей готовности, остались ли ожидающие loop)
+        """
+        now = time.monotonic()
+        next_wait = None
+        remaining = []
+        ip_blocked = False
+        own_pending = False
+        for entry in sorted(self._queue):
+            priority, _, weight, group, future, owner = entry
+            if future.done() or owner.is_closed():
+                continue
+            if not ip_blocked:
+                wait, by_ip = self._ready(weight, group, priority, now)
+                if wait <= 0:
+                    self._consume(weight, group, now)
+                    self._release(future, owner, loop)
+                    continue
+                next_wait = wait if next_wait is None else min(next_wait, wait)
+                # Лимит IP общий: младшие полосы не обгоняют ждущую старшую
+                ip_blocked = by_ip
+            remaining.append(entry)
+            own_pending = own_pending or owner is loop
+
+        self._queue = remaining
+        heapq.heapify(self._queue)
+        return next_wait, own_pending
+
+    @staticmethod
+    def _release(future: asyncio.Future, owner: asyncio.AbstractEventLoop,
+                 loop: asyncio.AbstractEventLoop):
+        """Разрешить ожидающего в его собственном loop"""
+        if owner is loop:
+            _set_pending(future)
+            return
+        try:
+            owner.call_soon_threadsafe(_set_pending, future)
+        except RuntimeError:
+            # loop закрылся между проверкой и вызовом - ждать некому
+            pass
+
+    # =================================================================
+    # СТАТИСТИКА
+    # =================================================================
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Доля лимитов в использовании, очередь и ожидание"""
+        with self._lock:
+            now = time.monotonic()
+            self.ip.refill(now)
+            requests = self.stats['requests']
+            return {
+                **self.stats,
+                'by_priority': dict(self.stats['by_priority']),
+                'ip_usage': self.ip.usage(now),
+                'ip_tokens': self.ip.tokens,
+                'group_usage': {name: bucket.usage(now) for name, bucket in self.groups.items()},
+                'pending': {p.name: sum(1 for e in self._queue if e[0] == p) for p in Priority},
+                'avg_wait_seconds': self.stats['wait_seconds_total'] / requests if requests else 0.0
+            }
+
+
+class RateLimitedExchange:
+    """
+    Обертка async-клиента ccxt: сетевые методы идут через планировщик
+
+    Остальные атрибуты (markets, id, close) - без изменений.
+    """
+
+    def __init__(self, exchange: Any, limiter: Optional[RateLimitScheduler] = None):
+        self.exchange = exchange
+        self.limiter = limiter or get_rate_limiter()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.exchange, name)
+        if not callable(attr) or not RateLimitScheduler.is_request(name):
+            return attr
+
+        async def _method(*args, **kwargs):
+            await self.limiter.acquire(name)
+            return await attr(*args, **kwargs)
+
+        _method.__name__ = name
+        return _method
+
+
+# =================================================================
+# ГЛОБАЛЬНЫЕ ФУНКЦИИ
+# =================================================================
+
+# Глобальный экземпляр
+rate_limiter = None
+
+def get_rate_limiter() -> RateLimitScheduler:
+    """Получить общий планировщик лимитов"""
+    global rate_limiter
+
+    if rate_limiter is None:
+        rate_limiter = RateLimitScheduler()
+
+    return rate_limiter
+
+# Экспорты
+__all__ = [
+    'RateLimitScheduler',
+    'RateLimitedExchange',
+    'Priority',
+    'get_rate_limiter'
+]
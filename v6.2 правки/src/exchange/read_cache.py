@@ -0,0 +1,222 @@
+"""
+КЭШ ЧТЕНИЙ С БИРЖИ (тикеры, баланс, стакан)
+Файл: src/exchange/read_cache.py
+
+За один цикл один и тот же fetch_ticker(symbol) запрашивали торговый
+бот, PositionManager и проверка цены ордера, а fetch_balance - рассылка
+WebSocket каждые 5 секунд и API баланса. Каждый вызов - отдельный запрос
+к бирже и расход лимита запросов.
+
+ExchangeReadCache:
+✅ Read-through кэш с TTL на каждый тип запроса (EXCHANGE_CACHE_*_TTL)
+✅ Single-flight: одновременные одинаковые запросы ждут один ответ биржи
+✅ fetch_tickers(symbols) - один запрос на все символы без свежего кэша
+✅ invalidate() после ордеров (баланс меняется сразу)
+✅ Счетчики hits/misses/coalesced по типам запросов
+
+Ответы общие для всех вызывающих - изменять их нельзя.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from ..core.config import config
+from ..logging.smart_logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ExchangeReadCache:
+    """
+    Кэш чтений перед async-клиентом биржи
+
+    Пример:
+        reads = ExchangeReadCache(ccxt_async_exchange)
+        ticker = await reads.fetch_ticker('BTC/USDT')
+        tickers = await reads.fetch_tickers(['BTC/USDT', 'ETH/USDT'])
+    """
+
+    def __init__(self, exchange: Any, ttls: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            exchange: Async-клиент биржи (ccxt.async_support или AsyncExchangeAdapter)
+            ttls: Переопределение TTL по типу запроса (ticker, balance, order_book), секунды
+        """
+        self.exchange = exchange
+        self.ttls = {
+            'ticker': config.EXCHANGE_CACHE_TICKER_TTL,
+            'balance': config.EXCHANGE_CACHE_BALANCE_TTL,
+            'order_book': config.EXCHANGE_CACHE_ORDER_BOOK_TTL,
+        }
+        self.ttls.update(ttls or {})
+
+        # (тип, ключ) -> (время получения, ответ)
+        self._entries: Dict[Tuple[str, Any], Tuple[float, Any]] = {}
+        self._in_flight: Dict[Tuple[str, Any], asyncio.Future] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    # =================================================================
+    # ОБЩИЙ МЕХАНИЗМ
+    # =================================================================
+
+    def _count(self, endpoint: str, counter: str, n: int = 1):
+        counters = self.stats.setdefault(
+            endpoint, {'hits': 0, 'misses': 0, 'coalesced': 0, 'requests': 0}
+        )
+        counters[counter] += n
+
+    def _fresh(self, key: Tuple[str, Any]) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= self.ttls.get(key[0], 0):
+            return entry[1]
+        return None
+
+    def _begin(self, key: Tuple[str, Any]) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        # Ошибка без ожидающих не должна давать "exception was never retrieved"
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+        return future
+
+    def _finish(self, key: Tuple[str, Any], future: asyncio.Future, value: Any = None,
+                error: Optional[BaseException] = None):
+        self._in_flight.pop(key, None)
+        if future.done():
+            return
+        if isinstance(error, asyncio.CancelledError):
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            self._entries[key] = (time.monotonic(), value)
+            future.set_result(value)
+
+    async def get(self, endpoint: str, key: Any, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ответ из кэша или через loader (один на все одновременные вызовы)
+
+        Args:
+            endpoint: Тип запроса - определяет TTL
+            key: Ключ внутри типа (символ, параметры)
+            loader: Корутина-функция запроса к бирже
+        """
+        cache_key = (endpoint, key)
+        value = self._fresh(cache_key)
+        if value is not None:
+            self._count(endpoint, 'hits')
+            return value
+
+        future = self._in_flight.get(cache_key)
+        if future is not None:
+            self._count(endpoint, 'coalesced')
+            return await asyncio.shield(future)
+
+        self._count(endpoint, 'misses')
+        self._count(endpoint, 'requests')
+        future = self._begin(cache_key)
+        try:
+            value = await loader()
+        except BaseException as e:
+            self._finish(cache_key, future, error=e)
+            raise
+        self._finish(cache_key, future, value)
+        return value
+
+    def peek(self, endpoint: str, key: Any = None) -> Optional[Any]:
+        """Свежий ответ из кэша без запроса к бирже (для синхронного кода)"""
+        return self._fresh((endpoint, key))
+
+    def invalidate(self, endpoint: Optional[str] = None, key: Any = None):
+        """Сбросить кэш: всё, один тип запроса или один ключ"""
+        if endpoint is None:
+            self._entries.clear()
+        elif key is None:
+            for cache_key in [k for k in self._entries if k[0] == endpoint]:
+                del self._entries[cache_key]
+        else:
+            self._entries.pop((endpoint, key), None)
+
+    # =================================================================
+    # ЗАПРОСЫ БИРЖИ
+    # =================================================================
+
+    async def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        return await self.get('ticker', symbol, lambda: self.exchange.fetch_ticker(symbol))
+
+    async def fetch_balance(self) -> Dict[str, Any]:
+        return await self.get('balance', None, self.exchange.fetch_balance)
+
+    async def fetch_order_book(self, symbol: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        return await self.get(
+            'order_book', (symbol, limit), lambda: self.exchange.fetch_order_book(symbol, limit)
+        )
+
+    async def fetch_tickers(self, symbols: Iterable[str],
+                            loader: Optional[Callable[[list], Awaitable[Dict[str, Any]]]] = None
+                            ) -> Dict[str, Dict[str, Any]]:
+        """
+        Тикеры нескольких символов: свежие из кэша, остальные одним запросом
+
+        Кэш общий с fetch_ticker. Символов, которых нет в ответе биржи,
+        нет и в результате.
+
+        Args:
+            loader: Запрос тикеров списка символов (по умолчанию exchange.fetch_tickers)
+        """
+        result: Dict[str, Dict[str, Any]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        missing = []
+        for symbol in dict.fromkeys(symbols):
+            cache_key = ('ticker', symbol)
+            value = self._fresh(cache_key)
+            if value is not None:
+                result[symbol] = value
+                self._count('ticker', 'hits')
+            elif cache_key in self._in_flight:
+                waiting[symbol] = self._in_flight[cache_key]
+                self._count('ticker', 'coalesced')
+            else:
+                missing.append(symbol)
+
+        if missing:
+            self._count('ticker', 'misses', len(missing))
+            self._count('ticker', 'requests')
+            futures = {symbol: self._begin(('ticker', symbol)) for symbol in missing}
+            try:
+                tickers = await (loader or self.exchange.fetch_tickers)(missing)
+            except BaseException as e:
+                for symbol, future in futures.items():
+                    self._finish(('ticker', symbol), future, error=e)
+                raise
+            for symbol, future in futures.items():
+                ticker = tickers.get(symbol)
+                if ticker is None:
+                    self._finish(('ticker', symbol), future, error=KeyError(symbol))
+                else:
+                    result[symbol] = ticker
+                    self._finish(('ticker', symbol), future, ticker)
+
+        for symbol, future in waiting.items():
+            try:
+                result[symbol] = await asyncio.shield(future)
+            except Exception:
+                pass
+        return result
+
+    def __getattr__(self, name: str) -> Any:
+        """Остальные методы и атрибуты биржи - без кэша"""
+        return getattr(self.exchange, name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счетчики по типам запросов и доля попаданий"""
+        stats = {}
+        for endpoint, counters in self.stats.items():
+            served = counters['hits'] + counters['misses'] + counters['coalesced']
+            stats[endpoint] = {
+                **counters,
+                'hit_rate': (counters['hits'] + counters['coalesced']) / served if served else 0.0
+            }
+        return {'endpoints': stats, 'entries': len(self._entries), 'in_flight': len(self._in_flight)}
+
+
+__all__ = ['ExchangeReadCache']
@@ -18,12 +18,19 @@ from typing import Dict, List, Optional, Tuple, Any, Union
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 import logging
-from decimal import Decimal, ROUND_DOWN
 
 from ..core.database import SessionLocal
 from ..core.models import Trade, TradeStatus, OrderSide
 from ..logging.smart_logger import get_logger
 from ..core.config import config
+from ..market_data.stream import get_market_stream
+from ..market_data.order_book import L2Book
+from .order_tracker import OrderState, OrderTracker
+from .read_cache import ExchangeReadCache
+from .rate_limiter import RateLimitedExchange
+from .market_metadata import get_market_metadata, market_key
+from .emergency_flatten import EmergencyFlattener, FlattenReport
+from .simulated_exchange import get_simulated_exchange
 
 logger = get_logger(__name__)
 
@@ -37,6 +44,7 @@ class OrderResult:
     commission: float = 0.0
     error_message: Optional[str] = None
     timestamp: datetime = None
+    client_order_id: Optional[str] = None
 
 @dataclass
 class PositionInfo:
@@ -79,9 +87,20 @@ class RealExchangeClient:
         
         # Настройки ордеров
         self.order_retry_attempts = 3
-        self.order_timeout = 30
+        self.order_timeout = config.ORDER_TIMEOUT_SECONDS
         self.slippage_tolerance = 0.5  # 0.5%
         
+        # Исполнение ордеров - поток ордеров и общий опрос вместо fetch_order на каждый
+        self.stream = get_market_stream() if config.ENABLE_MARKET_STREAM else None
+        self.order_tracker = OrderTracker(stream=self.stream)
+        
+        # Тикеры, баланс и стакан - через кэш с TTL и объединением одинаковых запросов
+        self.reads = ExchangeReadCache(None)
+        
+        # Точность, шаг лота и лимиты рынков - без запроса к бирже на горячем пути
+        # (свой кэш на биржу и сеть - выбирается при подключении)
+        self.market_metadata = get_market_metadata()
+        
         logger.info("🔗 RealExchangeClient инициализирован", category='exchange')
     
     async def connect(self, exchange_name: str = 'bybit', testnet: bool = True) -> bool:
@@ -89,22 +108,34 @@ class RealExchangeClient:
         Подключение к реальной бирже
         
         Args:
-            exchange_name: Название биржи ('bybit', 'binance', 'okex')
+            exchange_name: Название биржи ('bybit', 'binance', 'simulated')
             testnet: Использовать тестовую сеть (рекомендуется для начала)
         """
         try:
-            if exchange_name.lower() == 'bybit':
+            if exchange_name.lower() == 'simulated' or config.MOCK_TRADING:
+                # Симулятор в процессе: рынки и история загружены в get_simulated_exchange()
+                self.exchange = get_simulated_exchange()
+                self.market_metadata = get_market_metadata('simulated')
+                self.market_metadata.update_from_markets(
+                    await self.exchange.load_markets(), self.exchange.precisionMode
+                )
+                exchange_name = 'simulated'
+            
+            elif exchange_name.lower() == 'bybit':
                 self.exchange = ccxt.bybit({
                     'apiKey': config.BYBIT_API_KEY,
                     'secret': config.BYBIT_SECRET_KEY,
                     'sandbox': testnet,  # True для testnet
-                    'enableRateLimit': True,
+                    # Лимиты Bybit соблюдает общий RateLimitScheduler
+                    'enableRateLimit': not config.RATE_LIMIT_ENABLED,
                     'rateLimit': 100,  # Миллисекунды между запросами
                     'options': {
                         'defaultType': 'spot',  # spot или future
                         'adjustForTimeDifference': True
                     }
                 })
+                if config.RATE_LIMIT_ENABLED:
+                    self.exchange = RateLimitedExchange(self.exchange)
             
             elif exchange_name.lower() == 'binance':
                 self.exchange = ccxt.binance({
@@ -121,11 +152,16 @@ class RealExchangeClient:
             else:
                 raise ValueError(f"Неподдерживаемая биржа: {exchange_name}")
             
+            # Рынки: снимок с диска (без запроса) или load_markets, затем фоновое обновление
+            if exchange_name != 'simulated':
+                self.market_metadata = get_market_metadata(*market_key(self.exchange))
+                await self.market_metadata.ensure_loaded(self.exchange, self.exchange)
             # Проверяем подключение
-            await self.exchange.load_markets()
             balance = await self.exchange.fetch_balance()
             
             self.is_connected = True
+            self.order_tracker.exchange = self.exchange
+            self.reads.exchange = self.exchange
             
             logger.info(
                 f"✅ Подключение к {exchange_name} установлено",
@@ -144,6 +180,7 @@ class RealExchangeClient:
     async def disconnect(self):
         """Отключение от биржи"""
         if self.exchange:
+            await self.order_tracker.stop()
             await self.exchange.close()
             self.is_connected = False
             logger.info("🔌 Отключение от биржи", category='exchange')
@@ -209,35 +246,44 @@ class RealExchangeClient:
                 price=price
             )
             
-            # Размещаем РЕАЛЬНЫЙ ордер на бирже
+            # Размещаем РЕАЛЬНЫЙ ордер на бирже. Один client order id на все
+            # попытки: повтор после сетевой ошибки не создаст второй ордер,
+            # а обновления потока найдут ордер даже до ответа create_order
+            client_order_id = self.order_tracker.new_client_order_id()
+            self.order_tracker.track(symbol, client_order_id, amount)
             order = None
-            for attempt in range(self.order_retry_attempts):
-                try:
-                    order = await self.exchange.create_order(
-                        symbol=symbol,
-                        type=order_type,
-                        side=side,
-                        amount=amount,
-                        price=price,
-                        params={}
+            try:
+                for attempt in range(self.order_retry_attempts):
+                    try:
+                        order = await self.exchange.create_order(
+                            symbol=symbol,
+                            type=order_type,
+                            side=side,
+                            amount=amount,
+                            price=price,
+                            params={'clientOrderId': client_order_id}
+                        )
+                        break
+                        
+                    except ccxt.NetworkError as e:
+                        if attempt < self.order_retry_attempts - 1:
+                            await asyncio.sleep(2 ** attempt)  # Экспоненциальная задержка
+                            continue
+                        else:
+                            raise e
+                
+                if not order:
+                    return OrderResult(
+                        success=False,
+                        error_message="Не удалось разместить ордер после всех попыток"
                     )
-                    break
-                    
-                except ccxt.NetworkError as e:
-                    if attempt < self.order_retry_attempts - 1:
-                        await asyncio.sleep(2 ** attempt)  # Экспоненциальная задержка
-                        continue
-                    else:
-                        raise e
-            
-            if not order:
-                return OrderResult(
-                    success=False,
-                    error_message="Не удалось разместить ордер после всех попыток"
-                )
-            
-            # Ждем исполнения ордера
-            order_result = await self._wait_for_order_execution(order['id'], symbol)
+                
+                # Ждем исполнения ордера
+                self.order_tracker.apply_exchange_order({**order, 'clientOrderId': client_order_id})
+                order_result = await self._wait_for_order_execution(client_order_id, symbol)
+            finally:
+                self.order_tracker.forget(client_order_id)
+                self.reads.invalidate('balance')
             
             # Устанавливаем stop-loss и take-profit если указаны
             if order_result.success and (stop_loss or take_profit):
@@ -277,21 +323,26 @@ class RealExchangeClient:
         """Валидация параметров ордера"""
         try:
             # Проверяем существование пары
-            if symbol not in self.exchange.markets:
+            market = self.market_metadata.get(symbol)
+            if market is None:
                 return OrderResult(
                     success=False,
                     error_message=f"Торговая пара {symbol} не найдена"
                 )
             
-            market = self.exchange.markets[symbol]
-            
             # Проверяем минимальные размеры
-            if amount < market.get('limits', {}).get('amount', {}).get('min', 0):
+            if amount < market.min_amount:
                 return OrderResult(
                     success=False,
                     error_message=f"Размер ордера меньше минимального: {amount}"
                 )
             
+            if price and market.min_notional and amount * price < market.min_notional:
+                return OrderResult(
+                    success=False,
+                    error_message=f"Стоимость ордера меньше минимальной: {amount * price:.4f} < {market.min_notional}"
+                )
+            
             # Проверяем цену для лимитного ордера
             if order_type == 'limit' and price is None:
                 return OrderResult(
@@ -323,7 +374,7 @@ class RealExchangeClient:
                     required_amount = amount * price
                 else:
                     # Для рыночного ордера берем текущую цену с запасом
-                    ticker = await self.exchange.fetch_ticker(symbol)
+                    ticker = await self.fetch_ticker(symbol)
                     required_amount = amount * ticker['ask'] * 1.01  # +1% запас
                 
                 if available_balance < required_amount:
@@ -353,24 +404,11 @@ class RealExchangeClient:
     
     async def _normalize_order_params(self, symbol: str, amount: float, 
                                     price: Optional[float]) -> Dict[str, float]:
-        """Нормализация параметров ордера согласно требованиям биржи"""
+        """Нормализация параметров ордера согласно требованиям биржи (шаг лота и шаг цены)"""
         try:
-            market = self.exchange.markets[symbol]
-            
-            # Нормализуем количество
-            amount_precision = market.get('precision', {}).get('amount', 8)
-            amount = float(Decimal(str(amount)).quantize(
-                Decimal('0.' + '0' * (amount_precision - 1) + '1'),
-                rounding=ROUND_DOWN
-            ))
-            
-            # Нормализуем цену
+            amount = self.market_metadata.round_amount(symbol, amount)
             if price:
-                price_precision = market.get('precision', {}).get('price', 8)
-                price = float(Decimal(str(price)).quantize(
-                    Decimal('0.' + '0' * (price_precision - 1) + '1'),
-                    rounding=ROUND_DOWN
-                ))
+                price = self.market_metadata.round_price(symbol, price)
             
             return {
                 'amount': amount,
@@ -381,38 +419,43 @@ class RealExchangeClient:
             logger.error(f"❌ Ошибка нормализации параметров: {e}")
             return {'amount': amount, 'price': price}
     
-    async def _wait_for_order_execution(self, order_id: str, symbol: str, 
-                                      timeout: int = 30) -> OrderResult:
-        """Ожидание исполнения ордера"""
+    async def _wait_for_order_execution(self, client_order_id: str, symbol: str, 
+                                      timeout: Optional[float] = None) -> OrderResult:
+        """Ожидание исполнения ордера через OrderTracker (поток ордеров или общий опрос)"""
         try:
-            start_time = time.time()
+            timeout = self.order_timeout if timeout is None else timeout
+            order = await self.order_tracker.wait_for_fill(client_order_id, timeout)
             
-            while time.time() - start_time < timeout:
-                await asyncio.sleep(1)
-                
-                order = await self.exchange.fetch_order(order_id, symbol)
-                
-                if order['status'] == 'closed':
-                    return OrderResult(
-                        success=True,
-                        order_id=order_id,
-                        filled_quantity=float(order['filled']),
-                        average_price=float(order['average']) if order['average'] else float(order['price']),
-                        commission=float(order.get('fee', {}).get('cost', 0)),
-                        timestamp=datetime.utcnow()
-                    )
-                
-                elif order['status'] == 'canceled':
-                    return OrderResult(
-                        success=False,
-                        error_message="Ордер был отменен"
-                    )
+            if order.state == OrderState.FILLED:
+                return OrderResult(
+                    success=True,
+                    order_id=order.order_id,
+                    filled_quantity=order.filled,
+                    average_price=order.average_price,
+                    commission=order.fee,
+                    timestamp=datetime.utcnow(),
+                    client_order_id=client_order_id
+                )
+            
+            elif order.state in (OrderState.CANCELED, OrderState.REJECTED):
+                return OrderResult(
+                    success=False,
+                    order_id=order.order_id,
+                    filled_quantity=order.filled,
+                    average_price=order.average_price,
+                    error_message="Ордер был отменен" if order.state == OrderState.CANCELED else "Ордер отклонен биржей",
+                    client_order_id=client_order_id
+                )
             
             # Timeout - отменяем ордер
-            await self.exchange.cancel_order(order_id, symbol)
+            if order.order_id:
+                await self.exchange.cancel_order(order.order_id, symbol)
             return OrderResult(
                 success=False,
-                error_message=f"Таймаут исполнения ордера ({timeout}с)"
+                order_id=order.order_id,
+                filled_quantity=order.filled,
+                error_message=f"Таймаут исполнения ордера ({timeout:.0f}с)",
+                client_order_id=client_order_id
             )
             
         except Exception as e:
@@ -511,22 +554,22 @@ class RealExchangeClient:
             logger.error(f"❌ Ошибка закрытия позиции {symbol}: {e}")
             return False
     
+    async def emergency_flatten(self) -> FlattenReport:
+        """
+        Экстренное закрытие: отмена всех ордеров и параллельные reduce-only
+        закрытия под общим лимитом запросов, с повторами и сверкой позиций
+        """
+        report = await EmergencyFlattener(self.exchange).flatten()
+        self.reads.invalidate()
+        return report
+    
     async def close_all_positions(self) -> int:
         """Экстренное закрытие всех позиций"""
         try:
-            positions = await self.fetch_positions()
-            closed_count = 0
+            report = await self.emergency_flatten()
             
-            for position in positions:
-                success = await self.close_position(position.symbol)
-                if success:
-                    closed_count += 1
-                    
-                # Задержка между закрытиями
-                await asyncio.sleep(0.5)
-            
-            logger.info(f"🚨 Закрыто позиций: {closed_count}/{len(positions)}")
-            return closed_count
+            logger.info(f"🚨 Закрыто позиций: {report.closed_count}/{len(report.results)}")
+            return report.closed_count
             
         except Exception as e:
             logger.error(f"❌ Ошибка экстренного закрытия позиций: {e}")
@@ -536,20 +579,48 @@ class RealExchangeClient:
     # ПОЛУЧЕНИЕ РЫНОЧНЫХ ДАННЫХ
     # =================================================================
     
-    async def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
-        """Получение тикера"""
+    async def _fetch_data(self, method: str, *args) -> Any:
+        """Запрос данных к бирже (кэш вызывает только при промахе)"""
         await self._human_delay('data')
-        return await self.exchange.fetch_ticker(symbol)
+        return await getattr(self.exchange, method)(*args)
+    
+    async def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        """Получение тикера (кэш чтений)"""
+        return await self.reads.get('ticker', symbol, lambda: self._fetch_data('fetch_ticker', symbol))
+    
+    async def fetch_tickers(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Тикеры нескольких символов одним запросом (свежие - из кэша)"""
+        return await self.reads.fetch_tickers(
+            symbols, loader=lambda missing: self._fetch_data('fetch_tickers', missing)
+        )
     
     async def fetch_balance(self) -> Dict[str, Any]:
-        """Получение баланса"""
-        await self._human_delay('data')
-        return await self.exchange.fetch_balance()
+        """Получение баланса (кэш чтений)"""
+        return await self.reads.get('balance', None, lambda: self._fetch_data('fetch_balance'))
+    
+    async def get_local_order_book(self, symbol: str) -> Optional[L2Book]:
+        """
+        Локальный стакан L2 из потока (без запроса к бирже)
+        
+        Первое обращение по символу подписывает поток на стакан; пока снимок
+        не пришел или стакан устарел - None, вызывающий идет через REST.
+        """
+        if self.stream is None:
+            return None
+        book = self.stream.order_book(symbol)
+        if book is None and self.stream.is_running:
+            await self.stream.subscribe_order_books([symbol])
+        return book
     
     async def fetch_order_book(self, symbol: str, limit: int = 20) -> Dict[str, Any]:
-        """Получение стакана заявок"""
-        await self._human_delay('data')
-        return await self.exchange.fetch_order_book(symbol, limit)
+        """Получение стакана заявок (локальный стакан потока, иначе кэш чтений)"""
+        if limit <= config.ORDER_BOOK_DEPTH:
+            book = await self.get_local_order_book(symbol)
+            if book is not None:
+                return book.to_ccxt(limit)
+        return await self.reads.get(
+            'order_book', (symbol, limit), lambda: self._fetch_data('fetch_order_book', symbol, limit)
+        )
     
     async def get_candles(self, symbol: str, timeframe: str = '5m', 
                          limit: int = 100) -> List[Dict]:
@@ -576,7 +647,15 @@ class RealExchangeClient:
     # =================================================================
     
     async def _human_delay(self, operation_type: str = 'default'):
-        """Имитация человеческих задержек для безопасности"""
+        """
+        Имитация человеческих задержек для безопасности (ENABLE_HUMAN_MODE)
+        
+        Лимиты запросов соблюдает RateLimitScheduler, а не эти паузы.
+        """
+        self.api_calls_count += 1
+        if not config.ENABLE_HUMAN_MODE:
+            return
+        
         delays = {
             'order': self.human_delays['order_delay'],
             'data': random.uniform(self.human_delays['min_delay'], self.human_delays['max_delay']),
@@ -588,22 +667,35 @@ class RealExchangeClient:
         delay += random.uniform(0, delay * 0.3)  # Добавляем случайность
         
         await asyncio.sleep(delay)
-        self.api_calls_count += 1
     
     def calculate_position_size(self, symbol: str, balance: float, 
-                              risk_percent: float = 2.0) -> float:
-        """Расчет размера позиции на основе риска"""
+                              risk_percent: float = 2.0,
+                              price: Optional[float] = None) -> float:
+        """
+        Расчет размера позиции на основе риска
+        
+        Args:
+            price: Цена входа (по умолчанию - тикер из кэша чтений)
+        """
         try:
             # Простой расчет: используем процент от баланса
             risk_amount = balance * (risk_percent / 100)
             
-            # Получаем текущую цену (синхронно для простоты)
-            # В реальности лучше передавать цену как параметр
-            price = 50000  # Заглушка, в реальности получать с биржи
+            # Цена без запроса к бирже: переданная или свежий тикер из кэша
+            if price is None:
+                ticker = self.reads.peek('ticker', symbol)
+                price = ticker.get('last') if ticker else None
+            if not price:
+                logger.warning(f"⚠️ Нет цены {symbol} для расчета размера позиции", category='exchange')
+                return 0.0
+            
+            position_size = self.market_metadata.round_amount(symbol, risk_amount / price)
             
-            position_size = risk_amount / price
+            market = self.market_metadata.get(symbol)
+            if market and (position_size < market.min_amount or position_size * price < market.min_notional):
+                return 0.0
             
-            return round(position_size, 6)
+            return position_size
             
         except Exception as e:
             logger.error(f"❌ Ошибка расчета размера позиции: {e}")
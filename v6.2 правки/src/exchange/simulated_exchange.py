@@ -0,0 +1,889 @@
+"""
+СИМУЛЯТОР БИРЖИ С МАТЧИНГОМ ДЛЯ ОФЛАЙН ТЕСТОВ ИСПОЛНЕНИЯ
+Файл: src/exchange/simulated_exchange.py
+
+Раньше путь исполнения (OrderExecutionEngine -> RealExchangeClient ->
+OrderTracker -> PositionManager) можно было проверить только на testnet
+Bybit, а без биржи _execute_order возвращал "mock_order_123" - без
+стакана, проскальзывания и частичных исполнений.
+
+SimulatedExchange - биржа в процессе с async API как у ccxt.async_support:
+✅ Матчинг по приоритету цены и времени: лимитные ордера стоят в очереди
+   уровня, рыночные и пересекающие лимитные исполняются по стакану
+✅ Внешняя ликвидность из истории: снимки стакана (очередь на уровне
+   сохраняется при обновлении) или синтетический стакан вокруг закрытия
+   свечи; лимитные ордера исполняются, когда свеча проходит их цену
+✅ Задержка сети (с разбросом) и комиссии maker/taker
+✅ Баланс с резервом под лимитные ордера, позиции с неттингом,
+   reduce-only, clientOrderId (повтор с тем же id не создает второй ордер)
+✅ Ошибки ccxt: InsufficientFunds, InvalidOrder, OrderNotFound, BadSymbol
+✅ Тысячи ордеров в секунду: уровни в dict + отсортированные цены (bisect)
+
+Пример:
+    exchange = SimulatedExchange(latency=0.02)
+    exchange.load_ohlcv('BTC/USDT', candles, timeframe='5m')
+    async for event in exchange.replay():
+        order = await exchange.create_order('BTC/USDT', 'market', 'buy', 0.01)
+"""
+import asyncio
+import bisect
+import heapq
+import itertools
+import math
+import random
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import ccxt
+
+from ..core.config import config
+from ..logging.smart_logger import get_logger
+
+logger = get_logger(__name__)
+
+EPSILON = 1e-12
+TICK_SIZE = 4   # precisionMode ccxt: шаги в market['precision']
+
+TIMEFRAME_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '1d': 86_400_000
+}
+
+
+@dataclass(eq=False)
+class SimOrder:
+    """Ордер в симуляторе (внешняя ликвидность - тоже ордер, external=True)"""
+    id: str
+    symbol: str
+    side: str                            # buy / sell
+    type: str                            # market / limit
+    price: Optional[float]
+    amount: float
+    seq: int                             # порядок поступления - приоритет времени
+    timestamp: int
+    client_order_id: Optional[str] = None
+    filled: float = 0.0
+    cost: float = 0.0
+    fee: float = 0.0
+    status: str = 'open'
+    reduce_only: bool = False
+    external: bool = False
+    reserve_rate: float = 0.0            # резерв баланса на единицу остатка
+    arrival_mid: Optional[float] = None  # середина спреда при поступлении
+    updated: int = 0
+
+    @property
+    def remaining(self) -> float:
+        return self.amount - self.filled
+
+    @property
+    def average(self) -> Optional[float]:
+        return self.cost / self.filled if self.filled > EPSILON else None
+
+
+@dataclass
+class Fill:
+    """Сделка: maker - ордер из стакана, taker - входящий (None - касание свечой)"""
+    price: float
+    amount: float
+    maker: SimOrder
+    taker: Optional[SimOrder] = None
+
+
+class OrderBook:
+    """
+    Стакан одного символа: приоритет цены, затем времени
+
+    Уровни - dict цена -> очередь ордеров, цены - отсортированные списки
+    (лучшая покупка - последняя, лучшая продажа - первая).
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.levels: Dict[str, Dict[float, Deque[SimOrder]]] = {'buy': {}, 'sell': {}}
+        self.prices: Dict[str, List[float]] = {'buy': [], 'sell': []}
+        self.external: Dict[str, Dict[float, SimOrder]] = {'buy': {}, 'sell': {}}
+
+    def best(self, side: str) -> Optional[float]:
+        prices = self.prices[side]
+        if not prices:
+            return None
+        return prices[-1] if side == 'buy' else prices[0]
+
+    def mid(self) -> Optional[float]:
+        bid, ask = self.best('buy'), self.best('sell')
+        if bid is None or ask is None:
+            return bid if ask is None else ask
+        return (bid + ask) / 2
+
+    def add(self, order: SimOrder):
+        """Поставить ордер в конец очереди уровня"""
+        level = self.levels[order.side].get(order.price)
+        if level is None:
+            level = self.levels[order.side][order.price] = deque()
+            bisect.insort(self.prices[order.side], order.price)
+        level.append(order)
+
+    def remove(self, order: SimOrder) -> bool:
+        level = self.levels[order.side].get(order.price)
+        if level is None:
+            return False
+        try:
+            level.remove(order)
+        except ValueError:
+            return False
+        if not level:
+            self._drop_level(order.side, order.price)
+        return True
+
+    def _drop_level(self, side: str, price: float):
+        del self.levels[side][price]
+        prices = self.prices[side]
+        del prices[bisect.bisect_left(prices, price)]
+
+    def _consume(self, maker: SimOrder, level: Deque[SimOrder], amount: float):
+        maker.filled += amount
+        if maker.remaining <= EPSILON:
+            level.popleft()
+            if maker.external:
+                self.external[maker.side].pop(maker.price, None)
+
+    @staticmethod
+    def _crosses(side: str, price: float, limit_price: Optional[float]) -> bool:
+        if limit_price is None:
+            return True
+        return price <= limit_price if side == 'buy' else price >= limit_price
+
+    def _walk(self, side: str):
+        """Уровни встречной стороны от лучшего"""
+        opposite = 'sell' if side == 'buy' else 'buy'
+        prices = self.prices[opposite]
+        return opposite, (prices if opposite == 'sell' else reversed(prices))
+
+    def quote(self, side: str, amount: float, limit_price: Optional[float] = None) -> Tuple[float, float]:
+        """Сколько исполнится и за какую стоимость - без изменения стакана"""
+        opposite, prices = self._walk(side)
+        left, cost = amount, 0.0
+        for price in prices:
+            if left <= EPSILON or not self._crosses(side, price, limit_price):
+                break
+            for order in self.levels[opposite][price]:
+                qty = min(left, order.remaining)
+                cost += qty * price
+                left -= qty
+                if left <= EPSILON:
+                    break
+        return amount - left, cost
+
+    def match(self, taker: SimOrder, amount: float, limit_price: Optional[float] = None) -> List[Fill]:
+        """Исполнить входящий ордер по стакану (цена, затем время)"""
+        opposite = 'sell' if taker.side == 'buy' else 'buy'
+        prices = self.prices[opposite]
+        levels = self.levels[opposite]
+        fills: List[Fill] = []
+        left = amount
+
+        while left > EPSILON and prices:
+            price = prices[0] if opposite == 'sell' else prices[-1]
+            if not self._crosses(taker.side, price, limit_price):
+                break
+            level = levels[price]
+            while left > EPSILON and level:
+                maker = level[0]
+                qty = min(left, maker.remaining)
+                fills.append(Fill(price, qty, maker, taker))
+                left -= qty
+                self._consume(maker, level, qty)
+            if not level:
+                self._drop_level(opposite, price)
+
+        taker.filled += amount - left
+        return fills
+
+    def set_external(self, side: str, levels: Iterable[Iterable[float]], seq: Iterator[int], timestamp: int):
+        """
+        Обновить внешнюю ликвидность стороны
+
+        Уровень, который уже был, сохраняет место в очереди: ордера,
+        поставленные позже, по-прежнему стоят за ним.
+        """
+        current = self.external[side]
+        updated: Dict[float, SimOrder] = {}
+        for price, amount, *_ in levels:
+            price, amount = float(price), float(amount)
+            if amount <= 0:
+                continue
+            order = current.pop(price, None)
+            if order is None:
+                order = SimOrder(id='', symbol=self.symbol, side=side, type='limit', price=price,
+                                 amount=amount, seq=next(seq), timestamp=timestamp, external=True)
+                self.add(order)
+            else:
+                order.amount, order.filled = amount, 0.0
+            updated[price] = order
+        for order in current.values():
+            self.remove(order)
+        self.external[side] = updated
+
+    def uncross(self) -> List[Fill]:
+        """После обновления внешней ликвидности: исполнить пересекшиеся ордера"""
+        fills: List[Fill] = []
+        while self.prices['buy'] and self.prices['sell'] and self.prices['buy'][-1] >= self.prices['sell'][0]:
+            bid_price, ask_price = self.prices['buy'][-1], self.prices['sell'][0]
+            bids, asks = self.levels['buy'][bid_price], self.levels['sell'][ask_price]
+            bid, ask = bids[0], asks[0]
+            if bid.external and ask.external:
+                # Пересеченный снимок истории - внешние уровни между собой не торгуют;
+                # снятый уровень следующий снимок поставит заново
+                stale = bid if bid.seq > ask.seq else ask
+                self.remove(stale)
+                self.external[stale.side].pop(stale.price, None)
+                continue
+            maker, taker = (bid, ask) if bid.seq < ask.seq else (ask, bid)
+            qty = min(bid.remaining, ask.remaining)
+            fills.append(Fill(maker.price, qty, maker, taker))
+            self._consume(bid, bids, qty)
+            self._consume(ask, asks, qty)
+            if not bids:
+                self._drop_level('buy', bid_price)
+            if not asks:
+                self._drop_level('sell', ask_price)
+        return fills
+
+    def sweep_range(self, low: float, high: float) -> List[Fill]:
+        """Свеча прошла цены: исполнить лимитные ордера пользователя внутри [low, high]"""
+        fills: List[Fill] = []
+        for side, touched in (('buy', lambda p: p >= low), ('sell', lambda p: p <= high)):
+            prices = self.prices[side]
+            for price in list(reversed(prices) if side == 'buy' else prices):
+                if not touched(price):
+                    break
+                level = self.levels[side][price]
+                for order in [o for o in level if not o.external]:
+                    fills.append(Fill(price, order.remaining, order))
+                    order.filled = order.amount
+                    level.remove(order)
+                if not level:
+                    self._drop_level(side, price)
+        return fills
+
+    def depth(self, side: str, limit: Optional[int] = None) -> List[List[float]]:
+        """Агрегированные уровни [цена, объем] от лучшего"""
+        prices = self.prices[side]
+        result = []
+        for price in (reversed(prices) if side == 'buy' else prices):
+            result.append([price, sum(order.remaining for order in self.levels[side][price])])
+            if limit and len(result) >= limit:
+                break
+        return result
+
+
+class SimulatedExchange:
+    """
+    Биржа в процессе с API ccxt.async_support
+
+    Подключается вместо ccxt-клиента: RealExchangeClient.connect('simulated'),
+    EmergencyFlattener, OrderTracker, MarketMetadata работают без изменений.
+    """
+
+    id = 'simulated'
+    precisionMode = TICK_SIZE
+
+    def __init__(self, balances: Optional[Dict[str, float]] = None,
+                 latency: Optional[float] = None, latency_jitter: float = 0.2,
+                 maker_fee: Optional[float] = None, taker_fee: Optional[float] = None,
+                 allow_short: bool = True, book_levels: int = 20,
+                 book_level_share: float = 0.02, spread_ticks: int = 1):
+        """
+        Args:
+            balances: Начальный баланс по валютам (по умолчанию BACKTEST_INITIAL_CAPITAL USDT)
+            latency: Задержка запроса туда и обратно, секунды (по умолчанию SIMULATED_LATENCY_MS
+                при SIMULATE_LATENCY, иначе 0)
+            latency_jitter: Разброс задержки, доля
+            maker_fee / taker_fee: Комиссии, доля от стоимости
+            allow_short: Продажа без базовой валюты (маржинальный счет)
+            book_levels: Уровней синтетического стакана на сторону
+            book_level_share: Объем уровня синтетического стакана - доля объема свечи
+            spread_ticks: Полуспред синтетического стакана в шагах цены
+        """
+        if latency is None:
+            latency = config.SIMULATED_LATENCY_MS / 1000 if config.SIMULATE_LATENCY else 0.0
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.maker_fee = config.SIMULATED_MAKER_FEE if maker_fee is None else maker_fee
+        self.taker_fee = config.SIMULATED_TAKER_FEE if taker_fee is None else taker_fee
+        self.allow_short = allow_short
+        self.book_levels = book_levels
+        self.book_level_share = book_level_share
+        self.spread_ticks = spread_ticks
+
+        self.markets: Dict[str, Dict[str, Any]] = {}
+        self.books: Dict[str, OrderBook] = {}
+        self.balances: Dict[str, float] = defaultdict(float, balances or {'USDT': config.BACKTEST_INITIAL_CAPITAL})
+        self.used: Dict[str, float] = defaultdict(float)
+        self.positions: Dict[str, Dict[str, float]] = {}
+
+        self.orders: Dict[str, SimOrder] = {}
+        self.open_orders: Dict[str, SimOrder] = {}
+        self.closed_orders: Dict[str, List[SimOrder]] = defaultdict(list)
+        self.client_order_ids: Dict[str, str] = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count(1)
+
+        # История для воспроизведения: события (время, приоритет, номер, символ, тип, данные)
+        self.candles: Dict[str, List[List[float]]] = defaultdict(list)
+        self.timeframes: Dict[str, str] = {}
+        self.last_candle: Dict[str, List[float]] = {}
+        self.last_price: Dict[str, float] = {}
+        self._visible_candles: Dict[str, int] = defaultdict(int)
+        self._events: List[Tuple[int, int, int, str, str, Any]] = []
+        self._event_ids = itertools.count()
+        self._book_feeds: set = set()       # символы со снимками стакана
+        self._clock: Optional[int] = None
+
+        self.stats = {
+            'orders': 0,
+            'fills': 0,
+            'rejected': 0,
+            'canceled': 0,
+            'volume': 0.0,
+            'fees': 0.0,
+            'replay_events': 0,
+            'match_seconds': 0.0
+        }
+
+    # =================================================================
+    # РЫНКИ И ИСТОРИЯ
+    # =================================================================
+
+    def milliseconds(self) -> int:
+        """Время биржи: часы воспроизведения, без истории - реальное"""
+        return self._clock if self._clock is not None else int(time.time() * 1000)
+
+    def add_market(self, symbol: str, tick_size: Optional[float] = None, step_size: Optional[float] = None,
+                   min_amount: Optional[float] = None, min_notional: float = 5.0,
+                   price: Optional[float] = None) -> Dict[str, Any]:
+        """Рынок в формате ccxt; шаги по умолчанию - от порядка цены"""
+        if symbol in self.markets:
+            return self.markets[symbol]
+        magnitude = math.floor(math.log10(price)) if price and price > 0 else 0
+        tick_size = tick_size or 10.0 ** (magnitude - 4)
+        step_size = step_size or min(1.0, 10.0 ** (1 - magnitude))
+        base, quote = symbol.split(':')[0].split('/')
+        self.markets[symbol] = {
+            'id': symbol.replace('/', '').split(':')[0],
+            'symbol': symbol,
+            'base': base,
+            'quote': quote,
+            'active': True,
+            'type': 'swap' if ':' in symbol else 'spot',
+            'precision': {'price': tick_size, 'amount': step_size},
+            'limits': {
+                'amount': {'min': min_amount or step_size, 'max': None},
+                'price': {'min': tick_size, 'max': None},
+                'cost': {'min': min_notional, 'max': None}
+            },
+            'maker': self.maker_fee,
+            'taker': self.taker_fee
+        }
+        self.books.setdefault(symbol, OrderBook(symbol))
+        return self.markets[symbol]
+
+    def load_ohlcv(self, symbol: str, ohlcv: Any, timeframe: str = '5m'):
+        """
+        Свечи для воспроизведения: [[ts, o, h, l, c, v], ...] или DataFrame
+        (колонки open/high/low/close/volume, время - колонка timestamp или индекс)
+
+        Свеча видна и двигает цену после закрытия (ts + timeframe) - без заглядывания вперед.
+        """
+        rows = self._ohlcv_rows(ohlcv)
+        if not rows:
+            return
+        self.add_market(symbol, price=rows[0][4])
+        self.timeframes[symbol] = timeframe
+        duration = TIMEFRAME_MS.get(timeframe, 300_000)
+        start = len(self.candles[symbol])
+        self.candles[symbol].extend(rows)
+        for index, row in enumerate(rows, start):
+            heapq.heappush(self._events, (int(row[0]) + duration, 1, next(self._event_ids), symbol, 'candle', index))
+
+    def load_order_books(self, symbol: str, snapshots: Iterable[Dict[str, Any]]):
+        """Снимки стакана для воспроизведения: {'timestamp', 'bids', 'asks'}"""
+        self._book_feeds.add(symbol)
+        for snapshot in snapshots:
+            if symbol not in self.markets:
+                levels = snapshot.get('bids') or snapshot.get('asks')
+                self.add_market(symbol, price=levels[0][0] if levels else None)
+            heapq.heappush(self._events, (int(snapshot['timestamp']), 0, next(self._event_ids), symbol, 'book', snapshot))
+
+    @staticmethod
+    def _ohlcv_rows(ohlcv: Any) -> List[List[float]]:
+        if hasattr(ohlcv, 'itertuples'):
+            frame = ohlcv
+            if 'timestamp' in frame.columns:
+                stamps = frame['timestamp']
+            else:
+                stamps = frame.index
+            if hasattr(stamps, 'dtype') and str(stamps.dtype).startswith('datetime64'):
+                stamps = stamps.astype('int64') // 1_000_000
+            columns = frame[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=float)
+            return [[int(ts), *map(float, row)] for ts, row in zip(stamps, columns)]
+        return [[int(row[0]), *map(float, row[1:6])] for row in ohlcv]
+
+    def step(self) -> Optional[Dict[str, Any]]:
+        """Следующее событие истории; None - история закончилась"""
+        if not self._events:
+            return None
+        timestamp, _, _, symbol, kind, data = heapq.heappop(self._events)
+        self._clock = timestamp
+        self.stats['replay_events'] += 1
+        book = self.books[symbol]
+
+        if kind == 'book':
+            book.set_external('buy', data.get('bids') or [], self._seq, timestamp)
+            book.set_external('sell', data.get('asks') or [], self._seq, timestamp)
+            self._settle(symbol, book.uncross())
+            mid = book.mid()
+            if mid is not None and symbol not in self.timeframes:
+                self.last_price[symbol] = mid
+        else:
+            candle = self.candles[symbol][data]
+            self._visible_candles[symbol] = data + 1
+            self.last_candle[symbol] = candle
+            self.last_price[symbol] = candle[4]
+            self._settle(symbol, book.sweep_range(candle[3], candle[2]))
+            if symbol not in self._book_feeds:
+                self._synthesize_book(symbol, candle)
+        return {'timestamp': timestamp, 'symbol': symbol, 'type': kind}
+
+    async def replay(self, speed: Optional[float] = None, until: Optional[int] = None):
+        """
+        Воспроизвести историю: async-итератор по событиям
+
+        Args:
+            speed: Ускорение относительно реального времени (None - без пауз)
+            until: Остановиться на времени (мс)
+        """
+        previous = None
+        while self._events and (until is None or self._events[0][0] <= until):
+            event = self.step()
+            if speed and previous is not None:
+                await asyncio.sleep(max(0, event['timestamp'] - previous) / 1000 / speed)
+            previous = event['timestamp']
+            yield event
+
+    def _synthesize_book(self, symbol: str, candle: List[float]):
+        """Стакан вокруг закрытия свечи, если снимков стакана нет"""
+        close, volume = candle[4], candle[5]
+        tick = self.markets[symbol]['precision']['price']
+        size = volume * self.book_level_share if volume > 0 else 1.0
+        center = round(close / tick)
+        bids = [[(center - self.spread_ticks - i) * tick, size] for i in range(self.book_levels)]
+        asks = [[(center + self.spread_ticks + i) * tick, size] for i in range(self.book_levels)]
+        book = self.books[symbol]
+        book.set_external('buy', [level for level in bids if level[0] > 0], self._seq, self._clock)
+        book.set_external('sell', asks, self._seq, self._clock)
+        self._settle(symbol, book.uncross())
+
+    # =================================================================
+    # ИСПОЛНЕНИЕ И УЧЕТ
+    # =================================================================
+
+    async def _network(self):
+        """Половина задержки запроса туда и обратно"""
+        if self.latency > 0:
+            half = self.latency / 2
+            await asyncio.sleep(half * random.uniform(1 - self.latency_jitter, 1 + self.latency_jitter))
+
+    def _market(self, symbol: str) -> Dict[str, Any]:
+        market = self.markets.get(symbol)
+        if market is None:
+            raise ccxt.BadSymbol(f"{self.id} does not have market symbol {symbol}")
+        return market
+
+    def _free(self, currency: str) -> float:
+        return self.balances[currency] - self.used[currency]
+
+    def _apply_fill(self, order: SimOrder, price: float, amount: float, maker: bool):
+        """Баланс, комиссия, позиция и резерв по исполнению ордера пользователя"""
+        market = self.markets[order.symbol]
+        base, quote = market['base'], market['quote']
+        cost = price * amount
+        fee = cost * (self.maker_fee if maker else self.taker_fee)
+        order.cost += cost
+        order.fee += fee
+        order.updated = self.milliseconds()
+
+        sign = 1.0 if order.side == 'buy' else -1.0
+        self.balances[base] += sign * amount
+        self.balances[quote] -= sign * cost + fee
+        if order.reserve_rate:
+            currency = quote if order.side == 'buy' else base
+            self.used[currency] = max(0.0, self.used[currency] - amount * order.reserve_rate)
+
+        self._update_position(order.symbol, sign * amount, price)
+        self.last_price[order.symbol] = price
+        self.stats['fills'] += 1
+        self.stats['volume'] += cost
+        self.stats['fees'] += fee
+        if order.status == 'open' and order.remaining <= EPSILON:
+            self._close_order(order, 'closed')
+
+    def _settle(self, symbol: str, fills: List[Fill]):
+        """Учесть сделки стакана: у внешней ликвидности учета нет"""
+        for fill in fills:
+            if not fill.maker.external:
+                self._apply_fill(fill.maker, fill.price, fill.amount, maker=True)
+            if fill.taker is not None and not fill.taker.external:
+                self._apply_fill(fill.taker, fill.price, fill.amount, maker=False)
+
+    def _update_position(self, symbol: str, signed_amount: float, price: float):
+        """Неттинг позиции: средняя цена входа и реализованный PnL"""
+        position = self.positions.setdefault(symbol, {'net': 0.0, 'entry': 0.0, 'realized': 0.0})
+        net, entry = position['net'], position['entry']
+        new_net = net + signed_amount
+        if abs(net) <= EPSILON or (net > 0) == (signed_amount > 0):
+            position['entry'] = (abs(net) * entry + abs(signed_amount) * price) / abs(new_net)
+        else:
+            closing = min(abs(signed_amount), abs(net))
+            position['realized'] += closing * (price - entry) * (1 if net > 0 else -1)
+            if abs(new_net) <= EPSILON:
+                new_net, position['entry'] = 0.0, 0.0
+            elif (new_net > 0) != (net > 0):
+                position['entry'] = price
+        position['net'] = new_net
+
+    def _close_order(self, order: SimOrder, status: str):
+        """Терминальный статус: снять резерв, перенести в закрытые"""
+        order.status = status
+        order.updated = self.milliseconds()
+        if order.reserve_rate and order.remaining > EPSILON:
+            market = self.markets[order.symbol]
+            currency = market['quote'] if order.side == 'buy' else market['base']
+            self.used[currency] = max(0.0, self.used[currency] - order.remaining * order.reserve_rate)
+        order.reserve_rate = 0.0
+        self.open_orders.pop(order.id, None)
+        self.closed_orders[order.symbol].append(order)
+
+    def _reject(self, error: Exception):
+        self.stats['rejected'] += 1
+        raise error
+
+    def _place(self, symbol: str, type: str, side: str, amount: float,
+               price: Optional[float], params: Dict[str, Any]) -> SimOrder:
+        """Прием ордера матчинг-движком (синхронно, без задержки сети)"""
+        market = self._market(symbol)
+        side, type = side.lower(), type.lower()
+        client_order_id = params.get('clientOrderId')
+        if client_order_id and client_order_id in self.client_order_ids:
+            # Повтор после сетевой ошибки - тот же ордер
+            return self.orders[self.client_order_ids[client_order_id]]
+        if side not in ('buy', 'sell') or type not in ('market', 'limit'):
+            self._reject(ccxt.InvalidOrder(f"unsupported order {type} {side}"))
+        if type == 'limit' and not price:
+            self._reject(ccxt.InvalidOrder('limit order requires a price'))
+
+        amount = float(amount)
+        reduce_only = bool(params.get('reduceOnly'))
+        if reduce_only:
+            net = self.positions.get(symbol, {}).get('net', 0.0)
+            if abs(net) <= EPSILON or (net > 0) == (side == 'buy'):
+                self._reject(ccxt.InvalidOrder('reduce-only order has same side with current position'))
+            amount = min(amount, abs(net))
+        if amount < market['limits']['amount']['min'] - EPSILON:
+            self._reject(ccxt.InvalidOrder(f"amount {amount} below minimum {market['limits']['amount']['min']}"))
+
+        book = self.books[symbol]
+        limit_price = float(price) if type == 'limit' else None
+        post_only = type == 'limit' and (params.get('postOnly') or params.get('timeInForce') == 'PO')
+        if post_only and book.quote(side, amount, limit_price)[0] > EPSILON:
+            self._reject(ccxt.OrderImmediatelyFillable('post-only order would take liquidity'))
+
+        # Средства: покупка - котируемая валюта, продажа без шорта - базовая
+        base, quote = market['base'], market['quote']
+        taker_qty, taker_cost = book.quote(side, amount, limit_price)
+        rests = type == 'limit' and params.get('timeInForce') not in ('IOC', 'FOK')
+        if not reduce_only:
+            if side == 'buy':
+                required = taker_cost * (1 + self.taker_fee)
+                if rests:
+                    required += (amount - taker_qty) * limit_price * (1 + self.taker_fee)
+                if required > self._free(quote) + EPSILON:
+                    self._reject(ccxt.InsufficientFunds(
+                        f"insufficient {quote}: required {required:.4f}, free {self._free(quote):.4f}"
+                    ))
+            elif not self.allow_short and amount > self._free(base) + EPSILON:
+                self._reject(ccxt.InsufficientFunds(f"insufficient {base}: required {amount}, free {self._free(base)}"))
+        if params.get('timeInForce') == 'FOK' and taker_qty < amount - EPSILON:
+            self._reject(ccxt.InvalidOrder('fill-or-kill order cannot be filled completely'))
+
+        order = SimOrder(
+            id=str(next(self._ids)), symbol=symbol, side=side, type=type, price=limit_price,
+            amount=amount, seq=next(self._seq), timestamp=self.milliseconds(),
+            client_order_id=client_order_id, reduce_only=reduce_only, arrival_mid=book.mid()
+        )
+        self.orders[order.id] = order
+        if client_order_id:
+            self.client_order_ids[client_order_id] = order.id
+        self.stats['orders'] += 1
+
+        self._settle(symbol, book.match(order, amount, limit_price))
+        if order.status == 'open':
+            if rests and order.remaining > EPSILON:
+                # Остаток - в очередь уровня, под него резерв
+                if side == 'buy':
+                    order.reserve_rate = limit_price * (1 + self.taker_fee)
+                    self.used[quote] += order.remaining * order.reserve_rate
+                elif not self.allow_short:
+                    order.reserve_rate = 1.0
+                    self.used[base] += order.remaining
+                book.add(order)
+                self.open_orders[order.id] = order
+            else:
+                # Рыночный / IOC: неисполненный остаток отменяется
+                self._close_order(order, 'closed' if order.filled > EPSILON and order.type == 'market' else 'canceled')
+        return order
+
+    def _order_dict(self, order: SimOrder) -> Dict[str, Any]:
+        """Ордер в формате ccxt"""
+        market = self.markets[order.symbol]
+        return {
+            'id': order.id,
+            'clientOrderId': order.client_order_id,
+            'timestamp': order.timestamp,
+            'datetime': None,
+            'lastTradeTimestamp': order.updated or None,
+            'symbol': order.symbol,
+            'type': order.type,
+            'side': order.side,
+            'price': order.price,
+            'amount': order.amount,
+            'filled': order.filled,
+            'remaining': order.remaining,
+            'average': order.average,
+            'cost': order.cost,
+            'status': order.status,
+            'reduceOnly': order.reduce_only,
+            'fee': {'cost': order.fee, 'currency': market['quote']},
+            'info': {'arrivalMid': order.arrival_mid}
+        }
+
+    # =================================================================
+    # API CCXT: ОРДЕРА
+    # =================================================================
+
+    async def create_order(self, symbol: str, type: str, side: str, amount: float,
+                           price: Optional[float] = None, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        await self._network()
+        started = time.perf_counter()
+        try:
+            order = self._place(symbol, type, side, amount, price, params or {})
+        finally:
+            self.stats['match_seconds'] += time.perf_counter() - started
+        result = self._order_dict(order)
+        await self._network()
+        return result
+
+    async def cancel_order(self, id: str, symbol: Optional[str] = None,
+                           params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        await self._network()
+        order = self.open_orders.get(id)
+        if order is None:
+            raise ccxt.OrderNotFound(f"order {id} not found or already closed")
+        self.books[order.symbol].remove(order)
+        self._close_order(order, 'canceled')
+        self.stats['canceled'] += 1
+        result = self._order_dict(order)
+        await self._network()
+        return result
+
+    async def cancel_all_orders(self, symbol: Optional[str] = None,
+                                params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        await self._network()
+        settle = (params or {}).get('settleCoin')
+        cancelled = []
+        for order in list(self.open_orders.values()):
+            if symbol and order.symbol != symbol:
+                continue
+            if settle and not order.symbol.endswith(':' + settle):
+                continue
+            self.books[order.symbol].remove(order)
+            self._close_order(order, 'canceled')
+            cancelled.append(self._order_dict(order))
+        self.stats['canceled'] += len(cancelled)
+        await self._network()
+        return cancelled
+
+    async def fetch_order(self, id: str, symbol: Optional[str] = None,
+                          params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        await self._network()
+        order = self.orders.get(id)
+        if order is None:
+            raise ccxt.OrderNotFound(f"order {id} not found")
+        await self._network()
+        return self._order_dict(order)
+
+    async def fetch_open_orders(self, symbol: Optional[str] = None, since: Optional[int] = None,
+                                limit: Optional[int] = None, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        await self._network()
+        orders = [self._order_dict(o) for o in self.open_orders.values() if symbol is None or o.symbol == symbol]
+        await self._network()
+        return orders[-limit:] if limit else orders
+
+    async def fetch_closed_orders(self, symbol: Optional[str] = None, since: Optional[int] = None,
+                                  limit: Optional[int] = None, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        await self._network()
+        closed = self.closed_orders[symbol] if symbol else [o for orders in self.closed_orders.values() for o in orders]
+        orders = []
+        for order in reversed(closed):
+            if since is not None and order.updated < since:
+                break
+            orders.append(self._order_dict(order))
+        orders.reverse()
+        await self._network()
+        return orders[-limit:] if limit else orders
+
+    # =================================================================
+    # API CCXT: СЧЕТ И РЫНОЧНЫЕ ДАННЫЕ
+    # =================================================================
+
+    async def load_markets(self, reload: bool = False, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.markets
+
+    def set_markets(self, markets: Dict[str, Dict[str, Any]], currencies=None):
+        for symbol, market in markets.items():
+            self.markets.setdefault(symbol, market)
+            self.books.setdefault(symbol, OrderBook(symbol))
+
+    async def fetch_balance(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        await self._network()
+        balance: Dict[str, Any] = {'free': {}, 'used': {}, 'total': {}, 'info': {}}
+        for currency, total in self.balances.items():
+            used = self.used[currency]
+            balance[currency] = {'free': total - used, 'used': used, 'total': total}
+            balance['free'][currency] = total - used
+            balance['used'][currency] = used
+            balance['total'][currency] = total
+        await self._network()
+        return balance
+
+    async def fetch_positions(self, symbols: Optional[List[str]] = None,
+                              params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        await self._network()
+        positions = []
+        for symbol, position in self.positions.items():
+            if abs(position['net']) <= EPSILON or (symbols and symbol not in symbols):
+                continue
+            contracts = abs(position['net'])
+            mark = self.last_price.get(symbol, position['entry'])
+            direction = 1 if position['net'] > 0 else -1
+            unrealized = (mark - position['entry']) * contracts * direction
+            positions.append({
+                'symbol': symbol,
+                'side': 'long' if direction > 0 else 'short',
+                'contracts': contracts,
+                'entryPrice': position['entry'],
+                'markPrice': mark,
+                'notional': contracts * mark,
+                'unrealizedPnl': unrealized,
+                'realizedPnl': position['realized'],
+                'percentage': unrealized / (contracts * position['entry']) * 100 if position['entry'] else 0.0,
+                'timestamp': self.milliseconds()
+            })
+        await self._network()
+        return positions
+
+    def _ticker(self, symbol: str) -> Dict[str, Any]:
+        self._market(symbol)
+        book = self.books[symbol]
+        candle = self.last_candle.get(symbol)
+        last = self.last_price.get(symbol, book.mid())
+        return {
+            'symbol': symbol,
+            'timestamp': self.milliseconds(),
+            'bid': book.best('buy'),
+            'ask': book.best('sell'),
+            'last': last,
+            'close': last,
+            'open': candle[1] if candle else None,
+            'high': candle[2] if candle else None,
+            'low': candle[3] if candle else None,
+            'baseVolume': candle[5] if candle else None
+        }
+
+    async def fetch_ticker(self, symbol: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        await self._network()
+        ticker = self._ticker(symbol)
+        await self._network()
+        return ticker
+
+    async def fetch_tickers(self, symbols: Optional[List[str]] = None,
+                            params: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        await self._network()
+        tickers = {symbol: self._ticker(symbol) for symbol in (symbols or self.markets)}
+        await self._network()
+        return tickers
+
+    async def fetch_order_book(self, symbol: str, limit: Optional[int] = None,
+                               params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        await self._network()
+        self._market(symbol)
+        book = self.books[symbol]
+        result = {
+            'symbol': symbol,
+            'bids': book.depth('buy', limit),
+            'asks': book.depth('sell', limit),
+            'timestamp': self.milliseconds()
+        }
+        await self._network()
+        return result
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str = '5m', since: Optional[int] = None,
+                          limit: Optional[int] = None, params: Optional[Dict[str, Any]] = None) -> List[List[float]]:
+        """Закрытые к текущему времени воспроизведения свечи (таймфрейм - загруженный)"""
+        await self._network()
+        self._market(symbol)
+        candles = self.candles[symbol][:self._visible_candles[symbol]]
+        if since is not None:
+            candles = [c for c in candles if c[0] >= since]
+        await self._network()
+        return [list(c) for c in (candles[-limit:] if limit else candles)]
+
+    async def close(self):
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'open_orders': len(self.open_orders),
+            'positions': sum(1 for p in self.positions.values() if abs(p['net']) > EPSILON),
+            'realized_pnl': sum(p['realized'] for p in self.positions.values()),
+            'pending_events': len(self._events)
+        }
+
+
+# =================================================================
+# ГЛОБАЛЬНЫЕ ФУНКЦИИ
+# =================================================================
+
+# Глобальный экземпляр
+simulated_exchange = None
+
+def get_simulated_exchange() -> SimulatedExchange:
+    """Получить общий симулятор (RealExchangeClient.connect('simulated'))"""
+    global simulated_exchange
+
+    if simulated_exchange is None:
+        simulated_exchange = SimulatedExchange()
+
+    return simulated_exchange
+
+# Экспорты
+__all__ = [
+    'SimulatedExchange',
+    'OrderBook',
+    'SimOrder',
+    'get_simulated_exchange'
+]
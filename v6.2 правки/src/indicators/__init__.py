@@ -3,8 +3,14 @@
 """
 from .technical_indicators import TechnicalIndicators, indicators
 from .ta_wrapper import *
+from .incremental import (
+    IncrementalIndicatorEngine, IncrementalIndicatorSet, get_indicator_engine
+)
 
-__all__ = ['TechnicalIndicators', 'indicators']
+__all__ = [
+    'TechnicalIndicators', 'indicators',
+    'IncrementalIndicatorEngine', 'IncrementalIndicatorSet', 'get_indicator_engine'
+]
 
 # Экспортируем все функции из ta_wrapper для обратной совместимости
 from .ta_wrapper import __all__ as ta_all
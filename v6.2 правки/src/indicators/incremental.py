@@ -0,0 +1,748 @@
+"""
+Инкрементальные (потоковые) технические индикаторы
+Файл: src/indicators/incremental.py
+
+TechnicalIndicators.calculate_all и функции ta_wrapper пересчитывают
+каждый индикатор по всей истории при появлении новой свечи, и каждая
+стратегия повторяет эту работу заново.
+
+Здесь каждый индикатор хранит свое состояние и обновляется за O(1) на бар:
+✅ EMA / MACD - рекуррентная формула (как ewm(adjust=False))
+✅ SMA / RSI / ATR / Bollinger / Stochastic - скользящие окна с
+   накопленными mean/M2 (Welford), без прохода по истории
+✅ min/max окна (Stochastic) - монотонные очереди, O(1) амортизированно
+✅ OBV - накопительная сумма
+✅ Обновление формирующегося бара (тот же timestamp) без искажения состояния
+✅ Один набор состояний на (symbol, timeframe) для всех стратегий:
+   BaseStrategy.shared_indicators -> engine.latest(symbol, timeframe, df) -
+   первая стратегия досчитывает новый бар, остальные берут готовые значения
+
+Значения совпадают с ручными реализациями ta_wrapper (в пределах
+погрешности float64), имена полей - с колонками calculate_all.
+"""
+import abc
+import math
+import threading
+import logging
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+
+
+# =================================================================
+# БАЗОВЫЕ СОСТОЯНИЯ
+# =================================================================
+
+class _WindowExtremum:
+    """
+    Минимум (или максимум) скользящего окна - монотонная очередь
+
+    В очереди (номер значения, ключ) с возрастающими ключами: новое
+    значение вытесняет с конца все не меньшие, с начала уходят вышедшие из
+    окна. O(1) амортизированно на push; undo() откатывает последний push
+    (формирующийся бар). Максимум - минимум ключей -x. NaN в очередь не
+    попадает: пока NaN в окне, RollingWindow все равно не ready.
+    """
+
+    def __init__(self, period: int, is_max: bool):
+        self.period = period
+        self.sign = -1.0 if is_max else 1.0
+        self.queue: deque = deque()
+        self._undo = None
+
+    def push(self, index: int, x: float):
+        added = not math.isnan(x)
+        popped, evicted = [], []
+        if added:
+            key = self.sign * x
+            while self.queue and self.queue[-1][1] >= key:
+                popped.append(self.queue.pop())
+            self.queue.append((index, key))
+        while self.queue and self.queue[0][0] <= index - self.period:
+            evicted.append(self.queue.popleft())
+        self._undo = (added, popped, evicted)
+
+    def undo(self) -> bool:
+        """Откатить последний push; False - откатывать нечего (очередь надо собрать заново)"""
+        if self._undo is None:
+            return False
+        added, popped, evicted = self._undo
+        self.queue.extendleft(evicted)
+        if added:
+            self.queue.pop()
+        self.queue.extend(reversed(popped))
+        self._undo = None
+        return True
+
+    def value(self) -> float:
+        return self.sign * self.queue[0][1] if self.queue else NAN
+
+
+class RollingWindow:
+    """
+    Скользящее окно фиксированной длины с O(1) mean/std/min/max
+
+    Семантика как у pandas rolling(window).mean()/std(): пока окно не
+    заполнено или в нем есть NaN - результат NaN. Последнее значение можно
+    заменить (replace_last) - нужно для формирующегося бара. Очереди
+    min/max заводятся при первом вызове min()/max() - окна SMA/RSI/ATR
+    их не ведут.
+    """
+
+    # Через сколько вытеснений пересчитывать mean/M2 точно (накопленная погрешность)
+    RESYNC_EVERY = 1000
+
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.values: deque = deque()
+        self._evicted = None
+        self._nan_count = 0
+        self._n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._since_resync = 0
+        self._index = 0  # Номер последнего добавленного значения
+        self._low: Optional[_WindowExtremum] = None
+        self._high: Optional[_WindowExtremum] = None
+
+    def _add(self, x: float):
+        if math.isnan(x):
+            self._nan_count += 1
+            return
+        self._n += 1
+        delta = x - self._mean
+        self._mean += delta / self._n
+        self._m2 += delta * (x - self._mean)
+
+    def _remove(self, x: float):
+        if math.isnan(x):
+            self._nan_count -= 1
+            return
+        self._n -= 1
+        if self._n == 0:
+            self._mean = 0.0
+            self._m2 = 0.0
+            return
+        delta = x - self._mean
+        self._mean -= delta / self._n
+        self._m2 -= delta * (x - self._mean)
+
+    def push(self, x: float):
+        """Добавить новое значение"""
+        self.values.append(x)
+        self._add(x)
+        self._evicted = None
+        self._index += 1
+        for extremum in (self._low, self._high):
+            if extremum is not None:
+                extremum.push(self._index, x)
+
+        if len(self.values) > self.period:
+            self._evicted = self.values.popleft()
+            self._remove(self._evicted)
+            self._since_resync += 1
+            if self._since_resync >= self.RESYNC_EVERY:
+                self._resync()
+
+    def replace_last(self, x: float):
+        """Заменить последнее добавленное значение"""
+        if not self.values:
+            self.push(x)
+            return
+
+        self._remove(self.values.pop())
+        self._index -= 1
+        if self._low is not None and not self._low.undo():
+            self._low = None
+        if self._high is not None and not self._high.undo():
+            self._high = None
+        if self._evicted is not None:
+            self.values.appendleft(self._evicted)
+            self._add(self._evicted)
+            self._evicted = None
+        self.push(x)
+
+    def _resync(self):
+        """Точный пересчет mean/M2 по содержимому окна"""
+        self._since_resync = 0
+        valid = [v for v in self.values if not math.isnan(v)]
+        self._n = len(valid)
+        self._nan_count = len(self.values) - self._n
+        if not valid:
+            self._mean = self._m2 = 0.0
+            return
+        self._mean = math.fsum(valid) / self._n
+        self._m2 = math.fsum((v - self._mean) ** 2 for v in valid)
+
+    @property
+    def ready(self) -> bool:
+        return len(self.values) == self.period and self._nan_count == 0
+
+    def mean(self) -> float:
+        return self._mean if self.ready else NAN
+
+    def std(self) -> float:
+        """Выборочное стандартное отклонение (ddof=1, как pandas)"""
+        if not self.ready or self.period < 2:
+            return NAN
+        return math.sqrt(max(self._m2, 0.0) / (self.period - 1))
+
+    def _extremum(self, is_max: bool) -> _WindowExtremum:
+        """Очередь min/max; первый вызов собирает ее по текущему окну"""
+        extremum = _WindowExtremum(self.period, is_max)
+        first = self._index - len(self.values) + 1
+        for i, x in enumerate(self.values):
+            extremum.push(first + i, x)
+        extremum._undo = None  # Откат push, сделанного до очереди, невозможен
+        return extremum
+
+    def min(self) -> float:
+        if not self.ready:
+            return NAN
+        if self._low is None:
+            self._low = self._extremum(is_max=False)
+        return self._low.value()
+
+    def max(self) -> float:
+        if not self.ready:
+            return NAN
+        if self._high is None:
+            self._high = self._extremum(is_max=True)
+        return self._high.value()
+
+
+class IncrementalIndicator(abc.ABC):
+    """
+    Базовый класс инкрементального индикатора
+
+    Наследники реализуют _step(bar, prev) -> value, где prev - состояние
+    до текущего бара. Для формирующегося бара update(..., replace=True)
+    повторяет шаг от того же prev.
+    """
+
+    def __init__(self):
+        self.value: Any = NAN
+        self.count = 0
+
+    @abc.abstractmethod
+    def update(self, *args, replace: bool = False):
+        """Новый бар (replace=True - обновление формирующегося бара)"""
+
+
+class IncrementalSMA(IncrementalIndicator):
+    """Simple Moving Average (как ta_wrapper.SMA)"""
+
+    def __init__(self, period: int):
+        super().__init__()
+        self.window = RollingWindow(period)
+
+    def update(self, x: float, replace: bool = False) -> float:
+        if replace and self.count:
+            self.window.replace_last(x)
+        else:
+            self.window.push(x)
+            self.count += 1
+        self.value = self.window.mean()
+        return self.value
+
+
+class IncrementalEMA(IncrementalIndicator):
+    """Exponential Moving Average (как ewm(span=period, adjust=False))"""
+
+    def __init__(self, period: int):
+        super().__init__()
+        self.alpha = 2.0 / (period + 1)
+        self._prev = NAN
+
+    def update(self, x: float, replace: bool = False) -> float:
+        if not (replace and self.count):
+            self._prev = self.value
+            self.count += 1
+
+        if math.isnan(self._prev):
+            self.value = x
+        else:
+            self.value = self._prev + self.alpha * (x - self._prev)
+        return self.value
+
+
+class IncrementalRSI(IncrementalIndicator):
+    """RSI на простых скользящих средних прироста/падения (как ta_wrapper.RSI)"""
+
+    def __init__(self, period: int = 14):
+        super().__init__()
+        self.gains = RollingWindow(period)
+        self.losses = RollingWindow(period)
+        self._last_close = NAN
+        self._prev_close = NAN
+
+    def update(self, close: float, replace: bool = False) -> float:
+        if replace and self.count:
+            push_gain, push_loss = self.gains.replace_last, self.losses.replace_last
+        else:
+            self._prev_close = self._last_close
+            self.count += 1
+            push_gain, push_loss = self.gains.push, self.losses.push
+        self._last_close = close
+
+        # Первый бар: diff = NaN -> прирост и падение считаются нулевыми
+        delta = close - self._prev_close if not math.isnan(self._prev_close) else 0.0
+        push_gain(delta if delta > 0 else 0.0)
+        push_loss(-delta if delta < 0 else 0.0)
+
+        gain, loss = self.gains.mean(), self.losses.mean()
+        if math.isnan(gain) or math.isnan(loss) or (loss == 0 and gain == 0):
+            self.value = NAN
+        elif loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + gain / loss)
+        return self.value
+
+
+class IncrementalATR(IncrementalIndicator):
+    """ATR как скользящее среднее True Range (как ta_wrapper.ATR)"""
+
+    def __init__(self, period: int = 14):
+        super().__init__()
+        self.window = RollingWindow(period)
+        self._last_close = NAN
+        self._prev_close = NAN
+
+    def update(self, high: float, low: float, close: float, replace: bool = False) -> float:
+        replace = replace and self.count
+        if not replace:
+            self._prev_close = self._last_close
+            self.count += 1
+        self._last_close = close
+
+        tr = high - low
+        if not math.isnan(self._prev_close):
+            tr = max(tr, abs(high - self._prev_close), abs(low - self._prev_close))
+
+        if replace:
+            self.window.replace_last(tr)
+        else:
+            self.window.push(tr)
+        self.value = self.window.mean()
+        return self.value
+
+
+class IncrementalMACD(IncrementalIndicator):
+    """MACD: (macd, signal, histogram)"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        super().__init__()
+        self.fast = IncrementalEMA(fast)
+        self.slow = IncrementalEMA(slow)
+        self.signal = IncrementalEMA(signal)
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, close: float, replace: bool = False) -> Tuple[float, float, float]:
+        replace = bool(replace and self.count)
+        if not replace:
+            self.count += 1
+        macd = self.fast.update(close, replace) - self.slow.update(close, replace)
+        signal = self.signal.update(macd, replace)
+        self.value = (macd, signal, macd - signal)
+        return self.value
+
+
+class IncrementalBollinger(IncrementalIndicator):
+    """Bollinger Bands: (upper, middle, lower)"""
+
+    def __init__(self, period: int = 20, nbdev: float = 2):
+        super().__init__()
+        self.nbdev = nbdev
+        self.window = RollingWindow(period)
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, close: float, replace: bool = False) -> Tuple[float, float, float]:
+        if replace and self.count:
+            self.window.replace_last(close)
+        else:
+            self.window.push(close)
+            self.count += 1
+
+        middle, std = self.window.mean(), self.window.std()
+        self.value = (middle + std * self.nbdev, middle, middle - std * self.nbdev)
+        return self.value
+
+
+class IncrementalStochastic(IncrementalIndicator):
+    """Stochastic Oscillator: (%K сглаженный, %D) (как ta_wrapper.STOCH)"""
+
+    def __init__(self, k_period: int = 14, d_period: int = 3):
+        super().__init__()
+        self.highs = RollingWindow(k_period)
+        self.lows = RollingWindow(k_period)
+        self.k_smooth = RollingWindow(d_period)
+        self.d_smooth = RollingWindow(d_period)
+        self.value = (NAN, NAN)
+
+    def update(self, high: float, low: float, close: float,
+               replace: bool = False) -> Tuple[float, float]:
+        if replace and self.count:
+            step = [w.replace_last for w in (self.highs, self.lows, self.k_smooth, self.d_smooth)]
+        else:
+            step = [w.push for w in (self.highs, self.lows, self.k_smooth, self.d_smooth)]
+            self.count += 1
+
+        step[0](high)
+        step[1](low)
+        highest, lowest = self.highs.max(), self.lows.min()
+        price_range = highest - lowest
+        raw_k = 100.0 * (close - lowest) / price_range if price_range else NAN
+
+        step[2](raw_k)
+        k = self.k_smooth.mean()
+        step[3](k)
+        self.value = (k, self.d_smooth.mean())
+        return self.value
+
+
+class IncrementalOBV(IncrementalIndicator):
+    """On Balance Volume (как ta_wrapper.OBV: неизменная цена уменьшает OBV)"""
+
+    def __init__(self):
+        super().__init__()
+        self.value = 0.0
+        self._prev_value = 0.0
+        self._last_close = NAN
+        self._prev_close = NAN
+
+    def update(self, close: float, volume: float, replace: bool = False) -> float:
+        if not (replace and self.count):
+            self._prev_value = self.value
+            self._prev_close = self._last_close
+            self.count += 1
+        self._last_close = close
+
+        if math.isnan(self._prev_close) or close > self._prev_close:
+            self.value = self._prev_value + volume
+        else:
+            self.value = self._prev_value - volume
+        return self.value
+
+
+# =================================================================
+# НАБОР ИНДИКАТОРОВ ОДНОГО (symbol, timeframe)
+# =================================================================
+
+class IncrementalIndicatorSet:
+    """
+    Все индикаторы calculate_all для одной серии свечей
+
+    Бары подаются по порядку; бар с тем же timestamp, что и последний,
+    обновляет формирующуюся свечу, более старые бары игнорируются.
+    """
+
+    # Как в calculate_all: раньше 30 баров индикаторы не выдаются
+    MIN_BARS = 30
+
+    def __init__(self, symbol: str, timeframe: str):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Сбросить состояние всех индикаторов (вызывать под self.lock)"""
+        self.sma_10 = IncrementalSMA(10)
+        self.sma_20 = IncrementalSMA(20)
+        self.sma_50 = IncrementalSMA(50)
+        self.ema_12 = IncrementalEMA(12)
+        self.ema_26 = IncrementalEMA(26)
+        self.rsi = IncrementalRSI(14)
+        self.macd = IncrementalMACD(12, 26, 9)
+        self.bollinger = IncrementalBollinger(20, 2)
+        self.atr = IncrementalATR(14)
+        self.stochastic = IncrementalStochastic(14, 3)
+        self.volume_sma = IncrementalSMA(20)
+        self.obv = IncrementalOBV()
+
+        self.bars = 0
+        self.last_timestamp: Optional[int] = None
+        self.bar_ms: Optional[int] = None  # Шаг баров кадров стратегий (latest)
+
+    def update(self, timestamp: int, open: float, high: float, low: float,
+               close: float, volume: float) -> bool:
+        """
+        Учесть один бар
+
+        Returns:
+            bool: False, если бар старее последнего и был пропущен
+        """
+        timestamp = int(timestamp)
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            return False
+
+        replace = timestamp == self.last_timestamp
+        if not replace:
+            self.bars += 1
+            self.last_timestamp = timestamp
+
+        self.sma_10.update(close, replace)
+        self.sma_20.update(close, replace)
+        self.sma_50.update(close, replace)
+        self.ema_12.update(close, replace)
+        self.ema_26.update(close, replace)
+        self.rsi.update(close, replace)
+        self.macd.update(close, replace)
+        self.bollinger.update(close, replace)
+        self.atr.update(high, low, close, replace)
+        self.stochastic.update(high, low, close, replace)
+        self.volume_sma.update(volume, replace)
+        self.obv.update(close, volume, replace)
+        return True
+
+    def update_many(self, timestamps: np.ndarray, ohlcv: np.ndarray) -> int:
+        """
+        Учесть пачку баров (timestamps_ms, блок open/high/low/close/volume)
+
+        Returns:
+            int: Количество учтенных баров
+        """
+        applied = 0
+        for ts, row in zip(timestamps.tolist(), ohlcv.tolist()):
+            if self.update(ts, *row):
+                applied += 1
+        return applied
+
+    @property
+    def ready(self) -> bool:
+        return self.bars >= self.MIN_BARS
+
+    def values(self) -> Dict[str, float]:
+        """Текущие значения с именами колонок calculate_all"""
+        macd, macd_signal, macd_hist = self.macd.value
+        bb_upper, bb_middle, bb_lower = self.bollinger.value
+        stoch_k, stoch_d = self.stochastic.value
+
+        return {
+            'sma_10': self.sma_10.value,
+            'sma_20': self.sma_20.value,
+            'sma_50': self.sma_50.value,
+            'ema_12': self.ema_12.value,
+            'ema_26': self.ema_26.value,
+            'rsi': self.rsi.value,
+            'macd': macd,
+            'macd_signal': macd_signal,
+            'macd_hist': macd_hist,
+            'bb_upper': bb_upper,
+            'bb_middle': bb_middle,
+            'bb_lower': bb_lower,
+            'atr': self.atr.value,
+            'stoch_k': stoch_k,
+            'stoch_d': stoch_d,
+            'volume_sma': self.volume_sma.value,
+            'obv': self.obv.value
+        }
+
+
+# =================================================================
+# ДВИЖОК: ОБЩИЕ СОСТОЯНИЯ ДЛЯ ВСЕХ СТРАТЕГИЙ
+# =================================================================
+
+class IncrementalIndicatorEngine:
+    """
+    Реестр наборов индикаторов, ключ - (symbol, timeframe)
+
+    Стратегии, запрашивающие индикаторы одной пары и таймфрейма,
+    получают один и тот же набор состояний. sync() досчитывает только
+    бары общего хранилища свечей новее последнего учтенного.
+    """
+
+    def __init__(self):
+        self._sets: Dict[Tuple[str, str], IncrementalIndicatorSet] = {}
+        self._registry_lock = threading.Lock()
+
+        self.stats = {
+            'bars_processed': 0,
+            'syncs': 0,
+            'frame_syncs': 0,
+            'stale_frames': 0,
+            'resets': 0
+        }
+
+    def get(self, symbol: str, timeframe: str) -> IncrementalIndicatorSet:
+        """Получить (или создать) набор индикаторов"""
+        key = (symbol, timeframe)
+        with self._registry_lock:
+            indicator_set = self._sets.get(key)
+            if indicator_set is None:
+                indicator_set = IncrementalIndicatorSet(symbol, timeframe)
+                self._sets[key] = indicator_set
+        return indicator_set
+
+    def update(self, symbol: str, timeframe: str, timestamp: int,
+               open: float, high: float, low: float, close: float,
+               volume: float) -> Dict[str, float]:
+        """Учесть один бар и вернуть текущие значения"""
+        indicator_set = self.get(symbol, timeframe)
+        with indicator_set.lock:
+            if indicator_set.update(timestamp, open, high, low, close, volume):
+                self.stats['bars_processed'] += 1
+            return indicator_set.values()
+
+    def warm_up(self, symbol: str, timeframe: str, df: pd.DataFrame) -> IncrementalIndicatorSet:
+        """
+        Прогрев состояния по истории (DataFrame с индексом timestamp или колонкой timestamp)
+
+        Существующее состояние серии сбрасывается.
+        """
+        indicator_set = self.get(symbol, timeframe)
+        ts_ms, values = self._frame_arrays(df)
+
+        with indicator_set.lock:
+            self._reset_locked(indicator_set)
+            self.stats['bars_processed'] += indicator_set.update_many(ts_ms, values)
+        return indicator_set
+
+    @staticmethod
+    def _frame_arrays(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """Время баров (мс) и блок open/high/low/close/volume кадра"""
+        if 'timestamp' in df.columns:
+            timestamps = pd.to_datetime(df['timestamp'])
+        else:
+            timestamps = pd.to_datetime(df.index)
+        ts_ms = np.asarray(timestamps.astype('datetime64[ms]').astype(np.int64))
+        values = df[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=np.float64)
+        return ts_ms, values
+
+    def latest(self, symbol: str, timeframe: str, df: pd.DataFrame) -> Optional[Dict[str, float]]:
+        """
+        Значения на последнем баре кадра стратегии
+
+        Учитываются только бары кадра с timestamp >= последнего учтенного:
+        для нескольких стратегий одной пары новый бар считается один раз.
+        Разрыв между состоянием и кадром - пересчет по кадру.
+
+        Returns:
+            Значения (имена колонок calculate_all) или None: кадр старее
+            состояния, шаг баров другой или баров меньше MIN_BARS -
+            стратегия считает индикаторы сама
+        """
+        ts_ms, values = self._frame_arrays(df)
+        if len(ts_ms) < 2:
+            return None
+        bar_ms = int(ts_ms[-1] - ts_ms[-2])
+        indicator_set = self.get(symbol, timeframe)
+
+        with indicator_set.lock:
+            last = indicator_set.last_timestamp
+            if indicator_set.bar_ms not in (None, bar_ms) or (last is not None and ts_ms[-1] < last):
+                self.stats['stale_frames'] += 1
+                return None
+
+            if last is None or ts_ms[0] > last:
+                # Новая серия или разрыв - пересчет по кадру
+                if last is not None:
+                    self._reset_locked(indicator_set)
+            else:
+                start = int(np.searchsorted(ts_ms, last, side='left'))
+                ts_ms, values = ts_ms[start:], values[start:]
+
+            indicator_set.bar_ms = bar_ms
+            self.stats['bars_processed'] += indicator_set.update_many(ts_ms, values)
+            self.stats['frame_syncs'] += 1
+            return indicator_set.values() if indicator_set.ready else None
+
+    def sync(self, symbol: str, timeframe: str, store: Any = None) -> Dict[str, float]:
+        """
+        Досчитать индикаторы по общему хранилищу свечей
+
+        Берутся только бары с timestamp >= последнего учтенного
+        (последний - на случай, если формирующаяся свеча обновилась).
+        """
+        if store is None:
+            from ..market_data.candle_store import get_candle_store
+            store = get_candle_store()
+
+        series = store.series(symbol, timeframe)
+        indicator_set = self.get(symbol, timeframe)
+
+        with series.lock:
+            ts, values = series.arrays()
+            ts, values = ts.copy(), values.copy()
+
+        with indicator_set.lock:
+            last = indicator_set.last_timestamp
+            if last is not None and len(ts) and ts[0] > last:
+                # Между состоянием и хранилищем разрыв (например, после
+                # полной перезагрузки) - пересчитываем с нуля
+                self._reset_locked(indicator_set)
+                last = None
+
+            if last is not None:
+                start = int(np.searchsorted(ts, last, side='left'))
+                ts, values = ts[start:], values[start:]
+
+            self.stats['bars_processed'] += indicator_set.update_many(ts, values)
+            self.stats['syncs'] += 1
+            return indicator_set.values()
+
+    def reset(self, symbol: Optional[str] = None, timeframe: Optional[str] = None):
+        """Сброс состояний (всех или одной серии)"""
+        with self._registry_lock:
+            if symbol is None:
+                self._sets.clear()
+            else:
+                self._sets.pop((symbol, timeframe), None)
+        self.stats['resets'] += 1
+
+    def _reset_locked(self, indicator_set: IncrementalIndicatorSet):
+        """
+        Сброс серии на месте, под уже взятым indicator_set.lock
+
+        Набор в реестре не подменяется: кто ждет его lock, увидит
+        сброшенное состояние, а не устаревший объект.
+        """
+        indicator_set.clear()
+        self.stats['resets'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика движка"""
+        return {
+            **self.stats,
+            'series': len(self._sets)
+        }
+
+
+# =================================================================
+# ГЛОБАЛЬНЫЕ ФУНКЦИИ
+# =================================================================
+
+# Глобальный экземпляр
+indicator_engine = None
+
+def get_indicator_engine() -> IncrementalIndicatorEngine:
+    """Получить глобальный движок инкрементальных индикаторов"""
+    global indicator_engine
+
+    if indicator_engine is None:
+        indicator_engine = IncrementalIndicatorEngine()
+
+    return indicator_engine
+
+# Экспорт
+__all__ = [
+    'RollingWindow',
+    'IncrementalSMA',
+    'IncrementalEMA',
+    'IncrementalRSI',
+    'IncrementalATR',
+    'IncrementalMACD',
+    'IncrementalBollinger',
+    'IncrementalStochastic',
+    'IncrementalOBV',
+    'IncrementalIndicatorSet',
+    'IncrementalIndicatorEngine',
+    'get_indicator_engine'
+]
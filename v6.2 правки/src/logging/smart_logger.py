@@ -454,7 +454,9 @@ class SmartLogger:
         
         # Записываем в стандартный логгер
         log_level = getattr(logging, level)
-        extra_context = {k: v for k, v in context.items() if isinstance(v, (str, int, float, bool))}
+        # exc_info - аргумент logging, а не поле записи (иначе KeyError в makeRecord)
+        extra_context = {k: v for k, v in context.items()
+                         if k != 'exc_info' and isinstance(v, (str, int, float, bool))}
         
         # Обработка исключений
         exc_info = context.get('exc_info')
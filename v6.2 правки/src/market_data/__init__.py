@@ -0,0 +1,34 @@
+"""
+Модули рыночных данных: общее хранилище свечей и потоковые данные
+"""
+
+try:
+    from .candle_store import CandleStore, get_candle_store
+except ImportError:
+    CandleStore = None
+    get_candle_store = None
+
+try:
+    from .order_book import L2Book
+except ImportError:
+    L2Book = None
+
+try:
+    from .stream import MarketDataStream, get_market_stream
+except ImportError:
+    MarketDataStream = None
+    get_market_stream = None
+
+try:
+    from .replay_server import ReplayServer
+except ImportError:
+    ReplayServer = None
+
+__all__ = [
+    'CandleStore',
+    'get_candle_store',
+    'L2Book',
+    'MarketDataStream',
+    'get_market_stream',
+    'ReplayServer'
+]
@@ -0,0 +1,463 @@
+"""
+ОБЩЕЕ ХРАНИЛИЩЕ СВЕЧЕЙ (OHLCV) ДЛЯ ВСЕГО ПРОЦЕССА
+Файл: src/market_data/candle_store.py
+
+Раньше каждый модуль (MarketAnalyzer, FeatureEngineer, DataPipeline,
+AdvancedTradingBot, графики) сам запрашивал свечи из БД и собирал
+DataFrame из списка словарей на каждом вызове.
+
+Хранилище держит по одной серии на (symbol, timeframe):
+✅ Колоночные NumPy буферы (время + блок OHLCV float64)
+✅ Догрузка только баров новее последнего закэшированного
+✅ DataFrame-представления без копирования данных (read-only)
+✅ Догрузка с биржи через fetch_ohlcv(since=...)
+"""
+import asyncio
+import time
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..core.config import config
+from ..logging.smart_logger import get_logger
+
+logger = get_logger(__name__)
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+class CandleSeries:
+    """
+    Кольцевой буфер свечей одного (symbol, timeframe)
+
+    Физически буфер длиннее capacity на запас `slack`: новые бары пишутся
+    в конец, а при заполнении последние capacity баров переносятся в НОВЫЙ
+    массив. Поэтому уже выданные представления никогда не перезаписываются
+    (кроме последнего, еще формирующегося бара с тем же временем открытия).
+    """
+
+    def __init__(self, symbol: str, timeframe: str, capacity: int):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.capacity = int(capacity)
+        self.slack = max(self.capacity // 4, 64)
+
+        self._allocate(self.capacity + self.slack)
+        self._start = 0
+        self._end = 0
+
+        self.last_refresh = 0.0
+        self.needs_full_reload = False
+        self.lock = threading.Lock()            # Короткая блокировка на изменение буфера
+        self.refresh_lock = threading.Lock()    # Один запрос к источнику на серию
+
+    def _allocate(self, size: int):
+        self._ts = np.empty(size, dtype=np.int64)              # open_time, мс UTC
+        self._values = np.empty((size, len(OHLCV_COLUMNS)), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        """Время открытия последнего бара (мс) или None"""
+        return int(self._ts[self._end - 1]) if len(self) else None
+
+    def ensure_capacity(self, capacity: int):
+        """Увеличение глубины истории (со следующей полной перезагрузкой)"""
+        if capacity <= self.capacity:
+            return
+        self.capacity = int(capacity)
+        self.slack = max(self.capacity // 4, 64)
+        self.needs_full_reload = True
+
+    def clear(self):
+        """Очистка серии с выделением нового буфера"""
+        self._allocate(self.capacity + self.slack)
+        self._start = self._end = 0
+
+    def append(self, timestamps: np.ndarray, values: np.ndarray) -> int:
+        """
+        Добавление баров, отсортированных по времени
+
+        Бары старее последнего пропускаются, бар с тем же временем
+        открытия обновляет последний (формирующаяся свеча).
+
+        Returns:
+            int: Количество новых баров
+        """
+        if len(timestamps) == 0:
+            return 0
+
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(timestamps), len(OHLCV_COLUMNS))
+
+        last = self.last_timestamp
+        if last is not None:
+            same = timestamps == last
+            if same.any():
+                self._values[self._end - 1] = values[same][-1]
+            newer = timestamps > last
+            timestamps, values = timestamps[newer], values[newer]
+
+        n = len(timestamps)
+        if n == 0:
+            return 0
+
+        if n >= self.capacity:
+            # Поток длиннее окна - оставляем только хвост
+            self.clear()
+            timestamps, values = timestamps[-self.capacity:], values[-self.capacity:]
+            n = len(timestamps)
+        elif self._end + n > len(self._ts):
+            self._compact(n)
+
+        self._ts[self._end:self._end + n] = timestamps
+        self._values[self._end:self._end + n] = values
+        self._end += n
+
+        if len(self) > self.capacity:
+            self._start = self._end - self.capacity
+
+        return n
+
+    def _compact(self, incoming: int):
+        """Перенос хвоста в новый буфер (старые представления остаются валидными)"""
+        keep = min(len(self), self.capacity - incoming)
+        old_ts = self._ts[self._end - keep:self._end]
+        old_values = self._values[self._end - keep:self._end]
+
+        self._allocate(self.capacity + self.slack)
+        self._ts[:keep] = old_ts
+        self._values[:keep] = old_values
+        self._start, self._end = 0, keep
+
+    def arrays(self, limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Представления (timestamps_ms, ohlcv) последних limit баров без копирования"""
+        start = self._start if not limit else max(self._start, self._end - limit)
+        ts = self._ts[start:self._end]
+        values = self._values[start:self._end]
+        ts.flags.writeable = False
+        values.flags.writeable = False
+        return ts, values
+
+    def frame(self, limit: Optional[int] = None, copy: bool = False) -> pd.DataFrame:
+        """
+        DataFrame последних limit баров с индексом timestamp
+
+        Args:
+            limit: Количество последних баров (None - все)
+            copy: False - read-only представление буфера,
+                  True - независимая копия для кода, изменяющего DataFrame
+        """
+        ts, values = self.arrays(limit)
+        if copy:
+            ts, values = ts.copy(), values.copy()
+
+        index = pd.DatetimeIndex(ts.view('datetime64[ms]'), name='timestamp')
+        return pd.DataFrame(values, index=index, columns=OHLCV_COLUMNS, copy=False)
+
+
+class CandleStore:
+    """
+    Хранилище свечей для всего процесса, ключ - (symbol, timeframe)
+
+    Источник по умолчанию - таблица candles (модель Candle). Каждое
+    обновление запрашивает только бары новее последнего в кэше и не
+    чаще, чем раз в min_refresh_seconds.
+    """
+
+    def __init__(self, capacity: Optional[int] = None,
+                 min_refresh_seconds: Optional[float] = None):
+        self.capacity = capacity or config.CANDLE_STORE_CAPACITY
+        self.min_refresh_seconds = (
+            min_refresh_seconds if min_refresh_seconds is not None
+            else config.CANDLE_STORE_REFRESH_SECONDS
+        )
+
+        self._series: Dict[Tuple[str, str], CandleSeries] = {}
+        self._registry_lock = threading.Lock()
+
+        self.stats = {
+            'db_queries': 0,
+            'exchange_requests': 0,
+            'bars_loaded': 0,
+            'frames_served': 0
+        }
+
+    # =================================================================
+    # ДОСТУП К СЕРИЯМ
+    # =================================================================
+
+    def series(self, symbol: str, timeframe: str,
+               capacity: Optional[int] = None) -> CandleSeries:
+        """Получить (или создать) серию"""
+        key = (symbol, timeframe)
+        with self._registry_lock:
+            series = self._series.get(key)
+            if series is None:
+                series = CandleSeries(symbol, timeframe, max(capacity or 0, self.capacity))
+                self._series[key] = series
+            elif capacity:
+                series.ensure_capacity(capacity)
+        return series
+
+    async def get_frame(self, symbol: str, timeframe: str,
+                        limit: Optional[int] = None, copy: bool = False,
+                        refresh: bool = True) -> pd.DataFrame:
+        """
+        DataFrame свечей из кэша с догрузкой новых баров из БД
+
+        Args:
+            symbol: Торговая пара
+            timeframe: Таймфрейм ('5m', '1h', ...)
+            limit: Количество последних баров
+            copy: Вернуть изменяемую копию вместо представления
+            refresh: Догрузить новые бары перед чтением
+        """
+        series = self.series(symbol, timeframe, capacity=limit)
+        if refresh:
+            await self.refresh(symbol, timeframe)
+
+        self.stats['frames_served'] += 1
+        with series.lock:
+            return series.frame(limit, copy=copy)
+
+    def get_frame_sync(self, symbol: str, timeframe: str,
+                       limit: Optional[int] = None, copy: bool = False,
+                       refresh: bool = True) -> pd.DataFrame:
+        """Синхронный вариант get_frame (для Flask-маршрутов)"""
+        series = self.series(symbol, timeframe, capacity=limit)
+        if refresh:
+            self.refresh_sync(symbol, timeframe)
+
+        self.stats['frames_served'] += 1
+        with series.lock:
+            return series.frame(limit, copy=copy)
+
+    async def load_range(self, symbol: str, timeframe: str,
+                         start: Optional[datetime] = None,
+                         end: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        Свечи за период прямо из БД, мимо кэша
+
+        Для периодов глубже окна серии (capacity последних баров):
+        кэш такие бары не держит и ими не пополняется.
+        """
+        rows = await asyncio.to_thread(self._query_range, symbol, timeframe, start, end)
+        timestamps = np.array([_datetime_to_ms(row[0]) for row in rows], dtype=np.int64)
+        values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+        index = pd.DatetimeIndex(timestamps.view('datetime64[ms]'), name='timestamp')
+        return pd.DataFrame(values, index=index, columns=OHLCV_COLUMNS)
+
+    # =================================================================
+    # ОБНОВЛЕНИЕ ИЗ БД
+    # =================================================================
+
+    async def refresh(self, symbol: str, timeframe: str, force: bool = False) -> int:
+        """Догрузка новых баров из БД без блокировки event loop"""
+        return await asyncio.to_thread(self.refresh_sync, symbol, timeframe, force)
+
+    def refresh_sync(self, symbol: str, timeframe: str, force: bool = False) -> int:
+        """
+        Догрузка новых баров из БД
+
+        Returns:
+            int: Количество новых баров
+        """
+        series = self.series(symbol, timeframe)
+
+        with series.refresh_lock:
+            now = time.monotonic()
+            if (not force and not series.needs_full_reload
+                    and now - series.last_refresh < self.min_refresh_seconds):
+                return 0
+
+            full_reload = series.needs_full_reload
+            last = None if full_reload else series.last_timestamp
+            try:
+                rows = self._query_candles(symbol, timeframe, last, series.capacity)
+            except Exception as e:
+                logger.error(f"❌ Ошибка загрузки свечей {symbol} {timeframe}: {e}")
+                return 0
+
+            series.last_refresh = now
+            if not rows:
+                return 0
+
+            timestamps = np.array([_datetime_to_ms(row[0]) for row in rows], dtype=np.int64)
+            values = np.array([row[1:] for row in rows], dtype=np.float64)
+
+            with series.lock:
+                if full_reload:
+                    series.clear()
+                    series.needs_full_reload = False
+                added = series.append(timestamps, values)
+
+            self.stats['bars_loaded'] += added
+            return added
+
+    def _query_candles(self, symbol: str, timeframe: str,
+                       after_ms: Optional[int], limit: int) -> List[Sequence[Any]]:
+        """Запрос к таблице candles: только бары новее after_ms, по возрастанию времени"""
+        from ..core.database import SessionLocal
+        from ..core.models import Candle
+
+        db = SessionLocal()
+        try:
+            query = db.query(
+                Candle.open_time, Candle.open, Candle.high,
+                Candle.low, Candle.close, Candle.volume
+            ).filter(
+                Candle.symbol == symbol,
+                Candle.interval == timeframe
+            )
+
+            if after_ms is not None:
+                query = query.filter(Candle.open_time > datetime.utcfromtimestamp(after_ms / 1000))
+
+            rows = query.order_by(Candle.open_time.desc()).limit(limit).all()
+            self.stats['db_queries'] += 1
+            rows.reverse()
+            return rows
+        finally:
+            db.close()
+
+    def _query_range(self, symbol: str, timeframe: str,
+                     start: Optional[datetime], end: Optional[datetime]) -> List[Sequence[Any]]:
+        """Запрос к таблице candles за период [start, end], по возрастанию времени"""
+        from ..core.database import SessionLocal
+        from ..core.models import Candle
+
+        db = SessionLocal()
+        try:
+            query = db.query(
+                Candle.open_time, Candle.open, Candle.high,
+                Candle.low, Candle.close, Candle.volume
+            ).filter(
+                Candle.symbol == symbol,
+                Candle.interval == timeframe
+            )
+
+            if start is not None:
+                query = query.filter(Candle.open_time >= start)
+            if end is not None:
+                query = query.filter(Candle.open_time <= end)
+
+            rows = query.order_by(Candle.open_time.asc()).all()
+            self.stats['db_queries'] += 1
+            return rows
+        finally:
+            db.close()
+
+    # =================================================================
+    # ОБНОВЛЕНИЕ С БИРЖИ
+    # =================================================================
+
+    def ingest_ohlcv(self, symbol: str, timeframe: str, ohlcv: List[List[float]],
+                     replace: bool = False) -> int:
+        """
+        Добавление свечей в формате ccxt: [[timestamp_ms, o, h, l, c, v], ...]
+
+        Args:
+            replace: Заменить содержимое серии (полная загрузка окна)
+
+        Returns:
+            int: Количество новых баров
+        """
+        if not ohlcv:
+            return 0
+
+        data = np.asarray(ohlcv, dtype=np.float64)
+        series = self.series(symbol, timeframe)
+        with series.lock:
+            if replace:
+                series.clear()
+                series.needs_full_reload = False
+            added = series.append(data[:, 0].astype(np.int64), data[:, 1:6])
+        self.stats['bars_loaded'] += added
+        return added
+
+    async def sync_from_exchange(self, exchange: Any, symbol: str, timeframe: str,
+                                 limit: int = 100) -> int:
+        """
+        Догрузка с биржи только недостающих баров (since = последний бар)
+
+        Args:
+            exchange: Объект с async fetch_ohlcv(symbol, timeframe, since=None, limit=None)
+        """
+        series = self.series(symbol, timeframe, capacity=limit)
+
+        # Если кэш достаточно свежий - только бары начиная с последнего
+        since = None
+        last = series.last_timestamp
+        if last is not None and len(series) >= limit:
+            if time.time() * 1000 - last < limit * _timeframe_ms(timeframe):
+                since = last
+
+        ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+        self.stats['exchange_requests'] += 1
+        return self.ingest_ohlcv(symbol, timeframe, ohlcv, replace=since is None)
+
+    # =================================================================
+    # СЛУЖЕБНЫЕ МЕТОДЫ
+    # =================================================================
+
+    def invalidate(self, symbol: Optional[str] = None, timeframe: Optional[str] = None):
+        """Сброс кэша (всего или по символу/таймфрейму)"""
+        with self._registry_lock:
+            for key in list(self._series):
+                if (symbol is None or key[0] == symbol) and (timeframe is None or key[1] == timeframe):
+                    del self._series[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика хранилища"""
+        with self._registry_lock:
+            series = list(self._series.values())
+        return {
+            **self.stats,
+            'series': len(series),
+            'bars_cached': sum(len(s) for s in series),
+            'memory_mb': sum(s._ts.nbytes + s._values.nbytes for s in series) / 1024 / 1024
+        }
+
+
+def _datetime_to_ms(value: datetime) -> int:
+    """datetime из БД (naive = UTC) -> миллисекунды"""
+    if value.tzinfo is not None:
+        return int(value.timestamp() * 1000)
+    return int((value - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def _timeframe_ms(timeframe: str) -> int:
+    """Длительность таймфрейма ccxt ('5m', '1h', '1d') в миллисекундах"""
+    units = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    return int(timeframe[:-1]) * units.get(timeframe[-1], 60) * 1000
+
+
+# =================================================================
+# ГЛОБАЛЬНЫЕ ФУНКЦИИ
+# =================================================================
+
+# Глобальный экземпляр
+candle_store = None
+
+def get_candle_store() -> CandleStore:
+    """Получить глобальное хранилище свечей"""
+    global candle_store
+
+    if candle_store is None:
+        candle_store = CandleStore()
+
+    return candle_store
+
+# Экспорты
+__all__ = [
+    'CandleSeries',
+    'CandleStore',
+    'OHLCV_COLUMNS',
+    'get_candle_store'
+]
@@ -0,0 +1,268 @@
+"""
+ЛОКАЛЬНЫЙ СТАКАН L2 ИЗ ПОТОКА
+Файл: src/market_data/order_book.py
+
+Раньше проверка ликвидности перед каждым ордером запрашивала полный
+снимок fetch_order_book и суммировала первые 5 уровней: сетевой запрос
+на ордер и стакан возрастом в его задержку.
+
+L2Book - стакан символа в памяти: один снимок, затем дельты потока
+(orderbook.{depth}.{symbol} Bybit v5):
+✅ Стороны - отсортированные списки ключей и объемов от лучшей цены:
+   поиск уровня bisect O(log n), вставка и удаление - сдвиг списка O(n)
+   (memmove). Глубина потока ограничена (ORDER_BOOK_DEPTH, до 200 у Bybit
+   spot), на ней сдвиг дешевле дерева или кучи на Python
+✅ Верх стакана (WALK_LEVELS уровней) - прямым проходом без подготовки;
+   глубже - накопленные объем и стоимость (numpy), пересчитанные один раз
+   после изменений: глубина O(1), VWAP и проскальзывание O(log n)
+   (searchsorted)
+✅ Проверка последовательности дельт: пропуск - стакан не синхронизирован,
+   запросы получают None и идут через REST, пока не придет новый снимок
+"""
+import bisect
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SIDES = ('bids', 'asks')
+
+# Столько уровней от лучшего проходим циклом; глубже - накопленные суммы (numpy)
+WALK_LEVELS = 16
+
+
+class _BookSide:
+    """
+    Сторона стакана: ключи по возрастанию от лучшей цены
+
+    asks - ключ = цена, bids - ключ = -цена: уровень i от лучшего - индекс i.
+    """
+
+    def __init__(self, sign: float):
+        self.sign = sign
+        self.keys: List[float] = []
+        self.sizes: List[float] = []
+        self._cum_size: Optional[np.ndarray] = None
+        self._cum_cost: Optional[np.ndarray] = None
+
+    def clear(self):
+        self.keys, self.sizes = [], []
+        self._cum_size = self._cum_cost = None
+
+    def set(self, price: float, size: float):
+        """Уровень с новым объемом; 0 - удалить (изменение объема O(log n), новый/удаленный уровень O(n))"""
+        key = self.sign * price
+        index = bisect.bisect_left(self.keys, key)
+        exists = index < len(self.keys) and self.keys[index] == key
+        if size > 0:
+            if exists:
+                self.sizes[index] = size
+            else:
+                self.keys.insert(index, key)
+                self.sizes.insert(index, size)
+        elif exists:
+            del self.keys[index]
+            del self.sizes[index]
+        self._cum_size = None
+
+    def best(self) -> Optional[float]:
+        return self.sign * self.keys[0] if self.keys else None
+
+    def price(self, index: int) -> float:
+        return self.sign * self.keys[index]
+
+    def cumulative(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Накопленные объем и стоимость от лучшего уровня (кэш до изменения)"""
+        if self._cum_size is None:
+            sizes = np.asarray(self.sizes, dtype=float)
+            prices = np.abs(np.asarray(self.keys, dtype=float))
+            self._cum_size = np.cumsum(sizes)
+            self._cum_cost = np.cumsum(sizes * prices)
+        return self._cum_size, self._cum_cost
+
+    def walk(self, quantity: float, max_levels: int) -> Tuple[float, float, bool]:
+        """Проход от лучшего уровня: (объем, стоимость, ордер покрыт)"""
+        left, cost = quantity, 0.0
+        for index in range(min(max_levels, len(self.keys))):
+            take = min(left, self.sizes[index])
+            cost += take * abs(self.keys[index])
+            left -= take
+            if left <= 0:
+                return quantity, cost, True
+        return quantity - left, cost, len(self.keys) <= max_levels
+
+    def levels(self, limit: Optional[int] = None) -> List[List[float]]:
+        count = len(self.keys) if limit is None else min(limit, len(self.keys))
+        return [[self.sign * self.keys[i], self.sizes[i]] for i in range(count)]
+
+
+class L2Book:
+    """
+    Стакан L2 символа: снимок + дельты
+
+    Пример:
+        book = L2Book('BTC/USDT')
+        book.apply_snapshot(bids, asks, update_id=1)
+        book.apply_delta(bids=[[60000.1, 0]], asks=[], update_id=2)
+        book.depth('asks', 5); book.vwap('buy', 2.5); book.slippage('buy', 2.5)
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.sides = {'bids': _BookSide(-1.0), 'asks': _BookSide(1.0)}
+        self.update_id: Optional[int] = None
+        self.exchange_ts = 0
+        self.received_at = 0.0
+        self.synced = False
+        self.updates = 0
+        self.gaps = 0
+
+    # =================================================================
+    # ОБНОВЛЕНИЯ
+    # =================================================================
+
+    def _apply(self, side: str, levels: Iterable[Iterable[Any]]):
+        book_side = self.sides[side]
+        for price, size, *_ in levels:
+            book_side.set(float(price), float(size))
+
+    def apply_snapshot(self, bids: Iterable[Iterable[Any]], asks: Iterable[Iterable[Any]],
+                       update_id: Optional[int] = None, exchange_ts: int = 0,
+                       received_at: Optional[float] = None):
+        """Полный снимок: стакан заменяется"""
+        for side, levels in (('bids', bids), ('asks', asks)):
+            self.sides[side].clear()
+            self._apply(side, levels)
+        self.update_id = update_id
+        self.exchange_ts = exchange_ts
+        self.received_at = received_at or time.time()
+        self.synced = True
+        self.updates += 1
+
+    def apply_delta(self, bids: Iterable[Iterable[Any]], asks: Iterable[Iterable[Any]],
+                    update_id: Optional[int] = None, exchange_ts: int = 0,
+                    received_at: Optional[float] = None) -> bool:
+        """
+        Дельта: объем 0 удаляет уровень
+
+        Returns:
+            False - пропуск в последовательности (нужен новый снимок)
+        """
+        if not self.synced:
+            return False
+        if update_id is not None and self.update_id is not None and update_id != self.update_id + 1:
+            self.synced = False
+            self.gaps += 1
+            return False
+        self._apply('bids', bids)
+        self._apply('asks', asks)
+        self.update_id = update_id if update_id is not None else self.update_id
+        self.exchange_ts = exchange_ts or self.exchange_ts
+        self.received_at = received_at or time.time()
+        self.updates += 1
+        return True
+
+    # =================================================================
+    # ЗАПРОСЫ
+    # =================================================================
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.received_at
+
+    def is_fresh(self, max_age: float) -> bool:
+        return self.synced and self.age <= max_age
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return self.sides['bids'].best()
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return self.sides['asks'].best()
+
+    @property
+    def mid(self) -> Optional[float]:
+        bid, ask = self.best_bid, self.best_ask
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    @property
+    def spread(self) -> Optional[float]:
+        bid, ask = self.best_bid, self.best_ask
+        if bid is None or ask is None:
+            return None
+        return ask - bid
+
+    @staticmethod
+    def _side_for(order_side: str) -> str:
+        """Сторона стакана, которую забирает ордер: покупка - asks"""
+        return 'asks' if order_side.lower() in ('buy', 'long') else 'bids'
+
+    def depth(self, side: str, levels: int = 5) -> float:
+        """Объем первых levels уровней стороны ('bids' / 'asks')"""
+        book_side = self.sides[side]
+        if levels <= WALK_LEVELS:
+            return float(sum(book_side.sizes[:levels]))
+        cum_size, _ = book_side.cumulative()
+        if not len(cum_size):
+            return 0.0
+        return float(cum_size[min(levels, len(cum_size)) - 1])
+
+    def vwap(self, order_side: str, quantity: float) -> Tuple[Optional[float], float]:
+        """
+        Средняя цена исполнения рыночного ордера объема quantity
+
+        Returns:
+            (VWAP, исполнимый объем); объем меньше quantity - стакана не хватает
+        """
+        side = self.sides[self._side_for(order_side)]
+        if not side.keys or quantity <= 0:
+            return None, 0.0
+        if side._cum_size is None:
+            filled, cost, complete = side.walk(quantity, WALK_LEVELS)
+            if complete:
+                return (cost / filled if filled else None), filled
+        cum_size, cum_cost = side.cumulative()
+        # Первый уровень, на котором накопленный объем покрывает ордер
+        index = int(np.searchsorted(cum_size, quantity, side='left'))
+        if index >= len(cum_size):
+            return float(cum_cost[-1] / cum_size[-1]), float(cum_size[-1])
+        before_size = cum_size[index - 1] if index else 0.0
+        before_cost = cum_cost[index - 1] if index else 0.0
+        cost = before_cost + (quantity - before_size) * side.price(index)
+        return float(cost / quantity), float(quantity)
+
+    def slippage(self, order_side: str, quantity: float) -> Optional[float]:
+        """Проскальзывание от середины спреда (доля, >0 - хуже середины); None - не хватает стакана"""
+        price, filled = self.vwap(order_side, quantity)
+        mid = self.mid
+        if price is None or mid is None or filled < quantity:
+            return None
+        sign = 1.0 if self._side_for(order_side) == 'asks' else -1.0
+        return sign * (price - mid) / mid
+
+    def to_ccxt(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Стакан в формате ccxt fetch_order_book"""
+        return {
+            'symbol': self.symbol,
+            'bids': self.sides['bids'].levels(limit),
+            'asks': self.sides['asks'].levels(limit),
+            'timestamp': self.exchange_ts or int(self.received_at * 1000),
+            'nonce': self.update_id
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'symbol': self.symbol,
+            'synced': self.synced,
+            'bid_levels': len(self.sides['bids'].keys),
+            'ask_levels': len(self.sides['asks'].keys),
+            'updates': self.updates,
+            'gaps': self.gaps,
+            'age': self.age if self.received_at else None
+        }
+
+
+__all__ = ['L2Book']
@@ -0,0 +1,231 @@
+"""
+ЛОКАЛЬНЫЙ СЕРВЕР ВОСПРОИЗВЕДЕНИЯ ПОТОКА (замена WebSocket биржи)
+Файл: src/market_data/replay_server.py
+
+Говорит на подмножестве протокола Bybit v5, которое использует
+MarketDataStream: subscribe/unsubscribe, ping, auth и сообщения
+tickers.*, kline.*, position, order.
+
+✅ Воспроизведение записи MarketDataStream (MARKET_STREAM_RECORD_PATH)
+   с исходными интервалами или ускоренно
+✅ publish() - отправка своих сообщений подписанным клиентам
+✅ Построители сообщений ticker/kline/position/order для офлайн-сценариев
+
+Пример:
+    server = ReplayServer.from_recording('stream.jsonl', speed=10)
+    url = await server.start()
+    stream = MarketDataStream(url=url, private_url=url, api_key='x', api_secret='y')
+    await stream.start()
+    await server.replay()
+"""
+import asyncio
+import json
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from aiohttp import WSMsgType, web
+
+from ..logging.smart_logger import get_logger
+from .stream import KLINE_INTERVALS, stream_symbol
+
+logger = get_logger(__name__)
+
+
+class ReplayServer:
+    """WebSocket сервер, воспроизводящий сообщения биржи для офлайн-проверок"""
+
+    def __init__(self, messages: Optional[Iterable[Tuple[float, Dict[str, Any]]]] = None,
+                 host: str = '127.0.0.1', port: int = 0, speed: float = 1.0):
+        """
+        Args:
+            messages: Пары (время получения в секундах, сообщение)
+            port: 0 - свободный порт
+            speed: Ускорение воспроизведения (0 - без пауз)
+        """
+        self.messages: List[Tuple[float, Dict[str, Any]]] = list(messages or [])
+        self.host = host
+        self.port = port
+        self.speed = speed
+
+        self._runner: Optional[web.AppRunner] = None
+        # Клиент -> топики, на которые он подписан
+        self._clients: Dict[web.WebSocketResponse, Set[str]] = {}
+        self._subscribed = asyncio.Event()
+        self.stats = {'connections': 0, 'sent': 0, 'requests': 0}
+
+    @classmethod
+    def from_recording(cls, path: str, **kwargs) -> 'ReplayServer':
+        """Сервер по записи MarketDataStream (JSONL: {"t": время, "msg": сообщение})"""
+        messages = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    messages.append((record['t'], record['msg']))
+        return cls(messages, **kwargs)
+
+    # =================================================================
+    # СЕРВЕР
+    # =================================================================
+
+    @property
+    def url(self) -> str:
+        return f'ws://{self.host}:{self.port}/'
+
+    async def start(self) -> str:
+        """Запуск сервера; возвращает URL для MarketDataStream"""
+        app = web.Application()
+        app.router.add_get('/', self._handle)
+        app.router.add_get('/{path:.*}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"🔁 Replay сервер запущен: {self.url}", category='market')
+        return self.url
+
+    async def stop(self):
+        """Остановка сервера и отключение клиентов"""
+        for ws in list(self._clients):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._clients[ws] = set()
+        self.stats['connections'] += 1
+        try:
+            async for message in ws:
+                if message.type == WSMsgType.TEXT:
+                    await self._on_request(ws, json.loads(message.data))
+        finally:
+            self._clients.pop(ws, None)
+        return ws
+
+    async def _on_request(self, ws: web.WebSocketResponse, request: Dict[str, Any]):
+        self.stats['requests'] += 1
+        op = request.get('op')
+        topics = request.get('args') or []
+        if op == 'subscribe':
+            self._clients[ws].update(topics)
+            self._subscribed.set()
+        elif op == 'unsubscribe':
+            self._clients[ws].difference_update(topics)
+
+        response = {'success': True, 'ret_msg': 'pong' if op == 'ping' else '', 'op': op}
+        await ws.send_json(response)
+
+    async def wait_subscribed(self, timeout: float = 10.0) -> bool:
+        """Ожидание первой подписки клиента"""
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    # =================================================================
+    # ОТПРАВКА
+    # =================================================================
+
+    async def publish(self, message: Dict[str, Any]) -> int:
+        """Отправить сообщение клиентам, подписанным на его топик; возвращает число получателей"""
+        topic = message.get('topic')
+        text = json.dumps(message)
+        receivers = [ws for ws, topics in self._clients.items() if topic in topics and not ws.closed]
+        for ws in receivers:
+            await ws.send_str(text)
+        self.stats['sent'] += len(receivers)
+        return len(receivers)
+
+    async def replay(self, wait_for_subscribers: bool = True) -> int:
+        """Воспроизвести записанные сообщения с исходными интервалами (деленными на speed)"""
+        if wait_for_subscribers:
+            await self.wait_subscribed()
+        if not self.messages:
+            return 0
+
+        sent = 0
+        first_t = self.messages[0][0]
+        start = time.monotonic()
+        for t, message in self.messages:
+            if self.speed > 0:
+                delay = (t - first_t) / self.speed - (time.monotonic() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            sent += await self.publish(message)
+        return sent
+
+    # =================================================================
+    # ПОСТРОИТЕЛИ СООБЩЕНИЙ
+    # =================================================================
+
+    @staticmethod
+    def ticker_message(symbol: str, price: float, ts: Optional[int] = None) -> Dict[str, Any]:
+        """Сообщение тикера (snapshot)"""
+        raw = stream_symbol(symbol)
+        return {
+            'topic': f'tickers.{raw}',
+            'ts': ts if ts is not None else int(time.time() * 1000),
+            'type': 'snapshot',
+            'data': {'symbol': raw, 'lastPrice': str(price)}
+        }
+
+    @staticmethod
+    def kline_message(symbol: str, timeframe: str, start_ms: int, open_: float, high: float,
+                      low: float, close: float, volume: float, confirm: bool = False) -> Dict[str, Any]:
+        """Сообщение свечи"""
+        raw = stream_symbol(symbol)
+        interval = KLINE_INTERVALS[timeframe]
+        return {
+            'topic': f'kline.{interval}.{raw}',
+            'ts': int(time.time() * 1000),
+            'type': 'snapshot',
+            'data': [{
+                'start': start_ms, 'interval': interval,
+                'open': str(open_), 'high': str(high), 'low': str(low),
+                'close': str(close), 'volume': str(volume), 'confirm': confirm
+            }]
+        }
+
+    @staticmethod
+    def position_message(symbol: str, side: Optional[str], size: float, entry_price: float,
+                         unrealized_pnl: float = 0.0, mark_price: Optional[float] = None) -> Dict[str, Any]:
+        """Сообщение приватного потока позиций (side: long/short/None)"""
+        return {
+            'topic': 'position',
+            'creationTime': int(time.time() * 1000),
+            'data': [{
+                'symbol': stream_symbol(symbol),
+                'side': {'long': 'Buy', 'short': 'Sell'}.get(side, ''),
+                'size': str(size),
+                'entryPrice': str(entry_price),
+                'unrealisedPnl': str(unrealized_pnl),
+                'markPrice': str(mark_price) if mark_price is not None else ''
+            }]
+        }
+
+
+    @staticmethod
+    def order_message(symbol: str, order_id: str, client_order_id: str, status: str, amount: float,
+                      filled: float = 0.0, average_price: float = 0.0, fee: float = 0.0) -> Dict[str, Any]:
+        """Сообщение приватного потока ордеров (status Bybit: New, PartiallyFilled, Filled, Cancelled)"""
+        return {
+            'topic': 'order',
+            'creationTime': int(time.time() * 1000),
+            'data': [{
+                'symbol': stream_symbol(symbol),
+                'orderId': order_id,
+                'orderLinkId': client_order_id,
+                'orderStatus': status,
+                'qty': str(amount),
+                'cumExecQty': str(filled),
+                'avgPrice': str(average_price) if average_price else '',
+                'cumExecFee': str(fee)
+            }]
+        }
+
+__all__ = ['ReplayServer']
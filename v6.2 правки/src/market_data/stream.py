@@ -0,0 +1,619 @@
+"""
+ПОТОКОВЫЕ РЫНОЧНЫЕ ДАННЫЕ (WebSocket)
+Файл: src/market_data/stream.py
+
+Раньше PositionManager раз в 30 секунд запрашивал позиции и по одному
+тикеру на каждую позицию через REST: stop-loss/take-profit проверялись
+по цене возрастом до 30 секунд, каждая проверка стоила N запросов.
+
+Поток (протокол Bybit v5):
+✅ Подписки на тикеры, свечи (kline), позиции и ордера (приватный поток)
+✅ Стаканы L2 (orderbook): снимок + дельты в локальный L2Book, пропуск
+   дельты - переподписка за новым снимком; order_book() без запросов
+✅ Последняя цена по символу - latest_price() без запросов к бирже
+✅ Подписчики внутри процесса: subscribe() с прореживанием - медленный
+   подписчик получает последнее значение по символу, а не очередь
+✅ Свечи из потока сразу пишутся в CandleStore
+✅ Переподключение с экспоненциальной задержкой и повторной подпиской
+✅ Запись сообщений в JSONL для ReplayServer (офлайн-воспроизведение)
+
+Клиент и ReplayServer - на aiohttp: одна библиотека дает и WebSocket-
+клиент, и локальный сервер. websockets (тоже в requirements) не нужен.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import aiohttp
+
+from ..core.config import config
+from ..logging.smart_logger import get_logger
+from .candle_store import get_candle_store
+from .order_book import L2Book
+
+logger = get_logger(__name__)
+
+PUBLIC_URLS = {
+    False: 'wss://stream.bybit.com/v5/public/spot',
+    True: 'wss://stream-testnet.bybit.com/v5/public/spot'
+}
+PRIVATE_URLS = {
+    False: 'wss://stream.bybit.com/v5/private',
+    True: 'wss://stream-testnet.bybit.com/v5/private'
+}
+
+# Таймфрейм -> интервал kline Bybit
+KLINE_INTERVALS = {
+    '1m': '1', '3m': '3', '5m': '5', '15m': '15', '30m': '30',
+    '1h': '60', '2h': '120', '4h': '240', '6h': '360', '12h': '720',
+    '1d': 'D', '1w': 'W', '1M': 'M'
+}
+
+# Bybit принимает не больше 10 топиков в одном запросе подписки
+SUBSCRIBE_CHUNK = 10
+
+
+def stream_symbol(symbol: str) -> str:
+    """Символ биржевого потока: 'BTC/USDT:USDT' -> 'BTCUSDT'"""
+    return symbol.split(':')[0].replace('/', '').upper()
+
+
+@dataclass
+class Tick:
+    """Последняя цена символа из потока"""
+    symbol: str
+    price: float
+    exchange_ts: int                # мс, время биржи
+    received_at: float              # time.time() получения
+    bid: Optional[float] = None
+    ask: Optional[float] = None
+
+
+@dataclass
+class PositionUpdate:
+    """Состояние позиции из приватного потока"""
+    symbol: str
+    side: Optional[str]             # long/short, None - позиции нет
+    size: float
+    entry_price: float
+    unrealized_pnl: float
+    mark_price: Optional[float]
+    received_at: float
+
+
+@dataclass
+class OrderUpdate:
+    """Состояние ордера из приватного потока (накопленные значения)"""
+    symbol: str
+    order_id: str
+    client_order_id: str            # orderLinkId
+    status: str                     # статус Bybit: New, PartiallyFilled, Filled, Cancelled...
+    amount: float
+    filled: float
+    average_price: float
+    fee: float
+    received_at: float
+
+
+class StreamSubscription:
+    """
+    Подписка на обновления потока с прореживанием по символу
+
+    get() ждет хотя бы одно обновление и отдает последние значения всех
+    символов, изменившихся с прошлого вызова.
+    """
+
+    def __init__(self, stream: 'MarketDataStream', kind: str, symbols: Optional[Iterable[str]] = None):
+        self.stream = stream
+        self.kind = kind
+        self.symbols: Optional[Set[str]] = set(symbols) if symbols is not None else None
+        self.conflated = 0
+        self._pending: Dict[str, Any] = {}
+        self._event = asyncio.Event()
+
+    def _push(self, symbol: str, value: Any):
+        if self.symbols is not None and symbol not in self.symbols:
+            return
+        if symbol in self._pending:
+            self.conflated += 1
+        self._pending[symbol] = value
+        self._event.set()
+
+    async def get(self) -> Dict[str, Any]:
+        """Обновления по символам с прошлого вызова"""
+        while not self._pending:
+            self._event.clear()
+            await self._event.wait()
+        updates, self._pending = self._pending, {}
+        self._event.clear()
+        return updates
+
+    def close(self):
+        """Отписаться от обновлений"""
+        self.stream._subscriptions.discard(self)
+
+
+class MarketDataStream:
+    """
+    Клиент WebSocket потоков биржи
+
+    Символы подписчиков могут быть в формате ccxt ('BTC/USDT') или биржи
+    ('BTCUSDT'): обновления публикуются под тем символом, под которым
+    на него подписались.
+    """
+
+    def __init__(self, url: Optional[str] = None, private_url: Optional[str] = None,
+                 api_key: Optional[str] = None, api_secret: Optional[str] = None,
+                 ping_seconds: Optional[float] = None, record_path: Optional[str] = None):
+        testnet = config.BYBIT_TESTNET
+        self.url = url or config.MARKET_STREAM_URL or PUBLIC_URLS[testnet]
+        self.private_url = private_url or config.MARKET_STREAM_PRIVATE_URL or PRIVATE_URLS[testnet]
+        self.api_key = api_key if api_key is not None else config.BYBIT_API_KEY
+        self.api_secret = api_secret if api_secret is not None else config.BYBIT_API_SECRET
+        self.ping_seconds = ping_seconds or config.MARKET_STREAM_PING_SECONDS
+        self.record_path = record_path if record_path is not None else config.MARKET_STREAM_RECORD_PATH
+
+        self.is_running = False
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks: List[asyncio.Task] = []
+        self._ws: Dict[bool, Optional[aiohttp.ClientWebSocketResponse]] = {False: None, True: None}
+        self._connected: Dict[bool, asyncio.Event] = {}
+        self._record_file = None
+
+        # Топик -> символы подписчиков ('tickers.BTCUSDT' -> {'BTC/USDT'})
+        self._topics: Dict[str, Set[str]] = {}
+        # Топик kline -> таймфрейм
+        self._kline_timeframes: Dict[str, str] = {}
+        self._subscriptions: Set[StreamSubscription] = set()
+
+        self.prices: Dict[str, Tick] = {}
+        self.positions: Dict[str, PositionUpdate] = {}
+        # Топик orderbook -> стакан; символ -> топик стакана
+        self.order_books: Dict[str, L2Book] = {}
+        self._book_topics: Dict[str, str] = {}
+        self._resyncing: Set[str] = set()
+        self.stats = {
+            'messages': 0,
+            'ticks': 0,
+            'klines': 0,
+            'book_updates': 0,
+            'book_resyncs': 0,
+            'position_updates': 0,
+            'order_updates': 0,
+            'connects': 0,
+            'reconnects': 0,
+            'errors': 0,
+            'last_message_at': None
+        }
+
+    # =================================================================
+    # ЗАПУСК И ОСТАНОВКА
+    # =================================================================
+
+    @property
+    def has_private(self) -> bool:
+        return bool(self.api_key and self.api_secret)
+
+    @property
+    def private_connected(self) -> bool:
+        return self._ws[True] is not None
+
+    async def start(self):
+        """Подключение к потокам (повторный вызов ничего не делает)"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._session = aiohttp.ClientSession()
+        self._connected = {False: asyncio.Event(), True: asyncio.Event()}
+        if self.record_path:
+            self._record_file = open(self.record_path, 'a', encoding='utf-8')
+
+        self._tasks = [asyncio.create_task(self._run_connection(private=False))]
+        if self.has_private:
+            self._tasks.append(asyncio.create_task(self._run_connection(private=True)))
+
+        logger.info(
+            "📡 Запуск потока рыночных данных",
+            category='market',
+            url=self.url,
+            private=self.has_private
+        )
+
+    async def stop(self):
+        """Отключение от потоков"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._record_file is not None:
+            self._record_file.close()
+            self._record_file = None
+        logger.info("⏹️ Поток рыночных данных остановлен", category='market')
+
+    async def wait_connected(self, timeout: float = 10.0, private: bool = False) -> bool:
+        """Ожидание подключения (для запуска и проверок)"""
+        event = self._connected.get(private)
+        if event is None:
+            return False
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _run_connection(self, private: bool):
+        """Соединение с переподключением; после переподключения подписки восстанавливаются"""
+        url = self.private_url if private else self.url
+        delay = 1.0
+        while self.is_running:
+            try:
+                async with self._session.ws_connect(url) as ws:
+                    self._ws[private] = ws
+                    if private:
+                        await ws.send_json(self._auth_message())
+                        await self._send(ws, 'subscribe', ['position', 'order'])
+                    else:
+                        await self._send(ws, 'subscribe', list(self._topics))
+
+                    self.stats['connects'] += 1
+                    self._connected[private].set()
+                    delay = 1.0
+                    ping_task = asyncio.create_task(self._ping_loop(ws))
+                    try:
+                        async for message in ws:
+                            if message.type == aiohttp.WSMsgType.TEXT:
+                                self._on_text(message.data)
+                            elif message.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+                                break
+                    finally:
+                        ping_task.cancel()
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(
+                    f"⚠️ Поток {'позиций' if private else 'рынка'} прерван: {e}",
+                    category='market',
+                    url=url
+                )
+            finally:
+                self._ws[private] = None
+                if self._connected:
+                    self._connected[private].clear()
+                if not private:
+                    # Дельты за время разрыва потеряны - ждем снимки после переподписки
+                    for book in self.order_books.values():
+                        book.synced = False
+
+            if self.is_running:
+                self.stats['reconnects'] += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    async def _ping_loop(self, ws: aiohttp.ClientWebSocketResponse):
+        while not ws.closed:
+            await asyncio.sleep(self.ping_seconds)
+            await ws.send_json({'op': 'ping'})
+
+    def _auth_message(self) -> Dict[str, Any]:
+        expires = int((time.time() + 10) * 1000)
+        signature = hmac.new(
+            self.api_secret.encode(), f'GET/realtime{expires}'.encode(), hashlib.sha256
+        ).hexdigest()
+        return {'op': 'auth', 'args': [self.api_key, expires, signature]}
+
+    @staticmethod
+    async def _send(ws: aiohttp.ClientWebSocketResponse, op: str, topics: List[str]):
+        for i in range(0, len(topics), SUBSCRIBE_CHUNK):
+            await ws.send_json({'op': op, 'args': topics[i:i + SUBSCRIBE_CHUNK]})
+
+    # =================================================================
+    # ПОДПИСКИ
+    # =================================================================
+
+    def subscribe(self, kind: str = 'ticker', symbols: Optional[Iterable[str]] = None) -> StreamSubscription:
+        """
+        Подписка внутри процесса на обновления потока
+
+        Args:
+            kind: 'ticker' (Tick), 'position' (PositionUpdate) или
+                'order' (OrderUpdate, ключ - client_order_id или order_id)
+            symbols: Только эти символы/ордера (None - все)
+        """
+        if kind not in ('ticker', 'position', 'order'):
+            raise ValueError(f"Неизвестный тип подписки: {kind}")
+        subscription = StreamSubscription(self, kind, symbols)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    async def subscribe_tickers(self, symbols: Iterable[str]):
+        """Подписка на тикеры символов"""
+        await self._add_topics([
+            (symbol, f'tickers.{stream_symbol(symbol)}') for symbol in symbols
+        ])
+
+    async def unsubscribe_tickers(self, symbols: Iterable[str]):
+        """Отписка от тикеров (топик закрывается, когда на него не подписан ни один символ)"""
+        await self._remove_topics([
+            (symbol, f'tickers.{stream_symbol(symbol)}') for symbol in symbols
+        ])
+
+    async def subscribe_klines(self, symbols: Iterable[str], timeframe: str):
+        """Подписка на свечи: обновления пишутся в CandleStore"""
+        interval = KLINE_INTERVALS.get(timeframe)
+        if interval is None:
+            raise ValueError(f"Таймфрейм {timeframe} не поддерживается потоком")
+        pairs = []
+        for symbol in symbols:
+            topic = f'kline.{interval}.{stream_symbol(symbol)}'
+            self._kline_timeframes[topic] = timeframe
+            pairs.append((symbol, topic))
+        await self._add_topics(pairs)
+
+    async def subscribe_order_books(self, symbols: Iterable[str], depth: Optional[int] = None):
+        """Подписка на стаканы L2: снимок и дельты в локальный L2Book"""
+        depth = depth or config.ORDER_BOOK_DEPTH
+        pairs = []
+        for symbol in symbols:
+            topic = f'orderbook.{depth}.{stream_symbol(symbol)}'
+            self._book_topics[symbol] = topic
+            self.order_books.setdefault(topic, L2Book(symbol))
+            pairs.append((symbol, topic))
+        await self._add_topics(pairs)
+
+    async def unsubscribe_order_books(self, symbols: Iterable[str]):
+        """Отписка от стаканов"""
+        await self._remove_topics([
+            (symbol, self._book_topics.pop(symbol)) for symbol in symbols if symbol in self._book_topics
+        ])
+
+    async def _resync_order_book(self, topic: str):
+        """Пропуск дельты: переподписка - Bybit пришлет новый снимок"""
+        ws = self._ws[False]
+        if ws is None or ws.closed:
+            return  # после переподключения подписка восстановится со снимком
+        try:
+            await self._send(ws, 'unsubscribe', [topic])
+            await self._send(ws, 'subscribe', [topic])
+        except Exception as e:
+            self._resyncing.discard(topic)
+            logger.warning(f"⚠️ Переподписка на стакан {topic} не удалась: {e}", category='market')
+
+    async def _add_topics(self, pairs: List[tuple]):
+        new_topics = []
+        for symbol, topic in pairs:
+            if topic not in self._topics:
+                self._topics[topic] = set()
+                new_topics.append(topic)
+            self._topics[topic].add(symbol)
+
+        ws = self._ws[False]
+        if new_topics and ws is not None and not ws.closed:
+            await self._send(ws, 'subscribe', new_topics)
+
+    async def _remove_topics(self, pairs: List[tuple]):
+        closed_topics = []
+        for symbol, topic in pairs:
+            symbols = self._topics.get(topic)
+            if symbols is None or symbol not in symbols:
+                continue
+            symbols.discard(symbol)
+            if topic.startswith('tickers.'):
+                self.prices.pop(symbol, None)
+            if not symbols:
+                del self._topics[topic]
+                self._kline_timeframes.pop(topic, None)
+                self.order_books.pop(topic, None)
+                closed_topics.append(topic)
+
+        ws = self._ws[False]
+        if closed_topics and ws is not None and not ws.closed:
+            await self._send(ws, 'unsubscribe', closed_topics)
+
+    # =================================================================
+    # ОБРАБОТКА СООБЩЕНИЙ
+    # =================================================================
+
+    def _on_text(self, text: str):
+        now = time.time()
+        self.stats['messages'] += 1
+        self.stats['last_message_at'] = now
+        if self._record_file is not None:
+            self._record_file.write(f'{{"t": {now:.6f}, "msg": {text}}}\n')
+        try:
+            self.handle_message(json.loads(text), now)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"❌ Ошибка обработки сообщения потока: {e}", category='market')
+
+    def handle_message(self, message: Dict[str, Any], received_at: Optional[float] = None):
+        """Разбор сообщения Bybit v5 (публичного или приватного)"""
+        received_at = received_at or time.time()
+        topic = message.get('topic')
+        if topic is None:
+            # Ответы на subscribe/auth/ping
+            if message.get('success') is False:
+                logger.warning(
+                    f"⚠️ Поток отклонил запрос {message.get('op')}: {message.get('ret_msg')}",
+                    category='market'
+                )
+            return
+
+        if topic.startswith('tickers.'):
+            self._handle_ticker(message, received_at)
+        elif topic.startswith('kline.'):
+            self._handle_kline(topic, message)
+        elif topic.startswith('orderbook.'):
+            self._handle_order_book(topic, message, received_at)
+        elif topic == 'position':
+            self._handle_positions(message, received_at)
+        elif topic == 'order':
+            self._handle_orders(message, received_at)
+
+    def _handle_ticker(self, message: Dict[str, Any], received_at: float):
+        data = message.get('data') or {}
+        if 'lastPrice' not in data:
+            return  # дельта без изменения цены
+        price = float(data['lastPrice'])
+        bid = float(data['bid1Price']) if data.get('bid1Price') else None
+        ask = float(data['ask1Price']) if data.get('ask1Price') else None
+
+        for symbol in self._topics.get(message['topic'], ()):
+            tick = Tick(symbol, price, int(message.get('ts', 0)), received_at, bid, ask)
+            self.prices[symbol] = tick
+            self._publish('ticker', symbol, tick)
+        self.stats['ticks'] += 1
+
+    def _handle_kline(self, topic: str, message: Dict[str, Any]):
+        timeframe = self._kline_timeframes.get(topic)
+        if timeframe is None:
+            return
+        candles = [
+            [int(k['start']), float(k['open']), float(k['high']), float(k['low']),
+             float(k['close']), float(k['volume'])]
+            for k in message.get('data', [])
+        ]
+        store = get_candle_store()
+        for symbol in self._topics.get(topic, ()):
+            store.ingest_ohlcv(symbol, timeframe, candles)
+        self.stats['klines'] += len(candles)
+
+    def _handle_order_book(self, topic: str, message: Dict[str, Any], received_at: float):
+        book = self.order_books.get(topic)
+        if book is None:
+            return
+        data = message.get('data') or {}
+        update_id = int(data['u']) if data.get('u') is not None else None
+        exchange_ts = int(message.get('ts', 0))
+        # u=1 - снимок после перезапуска сервиса биржи
+        if message.get('type') == 'snapshot' or update_id == 1:
+            book.apply_snapshot(data.get('b', []), data.get('a', []), update_id, exchange_ts, received_at)
+            self._resyncing.discard(topic)
+        elif not book.apply_delta(data.get('b', []), data.get('a', []), update_id, exchange_ts, received_at):
+            if topic not in self._resyncing:
+                self._resyncing.add(topic)
+                self.stats['book_resyncs'] += 1
+                logger.warning(f"⚠️ Пропуск в дельтах стакана {topic} - запрос нового снимка", category='market')
+                try:
+                    asyncio.get_running_loop().create_task(self._resync_order_book(topic))
+                except RuntimeError:
+                    pass  # без event loop (воспроизведение) - ждем следующий снимок
+            return
+        self.stats['book_updates'] += 1
+        for symbol in self._topics.get(topic, ()):
+            self._publish('order_book', symbol, book)
+
+    def _handle_positions(self, message: Dict[str, Any], received_at: float):
+        for data in message.get('data', []):
+            size = float(data.get('size') or 0)
+            side = {'Buy': 'long', 'Sell': 'short'}.get(data.get('side'))
+            raw_symbol = data.get('symbol', '')
+            # Под символом подписчика тикера, если он есть
+            for symbol in self._topics.get(f'tickers.{raw_symbol}') or {raw_symbol}:
+                update = PositionUpdate(
+                    symbol=symbol,
+                    side=side if size > 0 else None,
+                    size=size,
+                    entry_price=float(data.get('entryPrice') or data.get('avgPrice') or 0),
+                    unrealized_pnl=float(data.get('unrealisedPnl') or 0),
+                    mark_price=float(data['markPrice']) if data.get('markPrice') else None,
+                    received_at=received_at
+                )
+                self.positions[symbol] = update
+                self._publish('position', symbol, update)
+            self.stats['position_updates'] += 1
+
+    def _handle_orders(self, message: Dict[str, Any], received_at: float):
+        for data in message.get('data', []):
+            update = OrderUpdate(
+                symbol=data.get('symbol', ''),
+                order_id=str(data.get('orderId', '')),
+                client_order_id=data.get('orderLinkId') or '',
+                status=data.get('orderStatus', ''),
+                amount=float(data.get('qty') or 0),
+                filled=float(data.get('cumExecQty') or 0),
+                average_price=float(data.get('avgPrice') or 0),
+                fee=float(data.get('cumExecFee') or 0),
+                received_at=received_at
+            )
+            # Прореживание по ордеру: накопленное состояние не теряет исполнений
+            self._publish('order', update.client_order_id or update.order_id, update)
+            self.stats['order_updates'] += 1
+
+    def _publish(self, kind: str, symbol: str, value: Any):
+        for subscription in self._subscriptions:
+            if subscription.kind == kind:
+                subscription._push(symbol, value)
+
+    # =================================================================
+    # ДАННЫЕ
+    # =================================================================
+
+    def latest_price(self, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        """Последняя цена, если она не старше max_age секунд (None - нет свежей цены)"""
+        tick = self.prices.get(symbol)
+        if tick is None:
+            return None
+        max_age = config.MARKET_STREAM_STALE_SECONDS if max_age is None else max_age
+        if time.time() - tick.received_at > max_age:
+            return None
+        return tick.price
+
+    def order_book(self, symbol: str, max_age: Optional[float] = None) -> Optional[L2Book]:
+        """Локальный стакан, если он синхронизирован и не старше max_age секунд"""
+        book = self.order_books.get(self._book_topics.get(symbol, ''))
+        if book is None:
+            return None
+        max_age = config.ORDER_BOOK_STALE_SECONDS if max_age is None else max_age
+        return book if book.is_fresh(max_age) else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика потока"""
+        return {
+            **self.stats,
+            'running': self.is_running,
+            'connected': self._ws[False] is not None,
+            'private_connected': self.private_connected,
+            'topics': len(self._topics),
+            'order_books': len(self.order_books),
+            'subscribers': len(self._subscriptions)
+        }
+
+
+# =================================================================
+# ГЛОБАЛЬНЫЕ ФУНКЦИИ
+# =================================================================
+
+# Глобальный экземпляр
+market_stream = None
+
+def get_market_stream() -> MarketDataStream:
+    """Получить глобальный поток рыночных данных"""
+    global market_stream
+
+    if market_stream is None:
+        market_stream = MarketDataStream()
+
+    return market_stream
+
+# Экспорты
+__all__ = [
+    'MarketDataStream',
+    'StreamSubscription',
+    'Tick',
+    'PositionUpdate',
+    'OrderUpdate',
+    'stream_symbol',
+    'get_market_stream'
+]
@@ -14,9 +14,11 @@ from sqlalchemy import and_, or_, func
 from sqlalchemy.orm import Session
 
 from ..core.database import SessionLocal
-from ..core.models import Trade, Signal, MarketData
+from ..core.models import Trade, Signal
 from ..logging.smart_logger import SmartLogger
-from .features.feature_engineering import FeatureEngineering
+from ..market_data.candle_store import get_candle_store
+from .features import FeatureEngineering
+from .labeling import LABEL_NEUTRAL, forward_return, mean_change_labels
 
 
 class DataPipeline:
@@ -41,6 +43,7 @@ class DataPipeline:
         # Параметры pipeline
         self.params = {
             'min_history_candles': 500,
+            'max_history_candles': 20000,  # глубина истории в хранилище свечей
             'feature_window': 100,
             'label_window': 20,
             'validation_split': 0.2,
@@ -66,31 +69,34 @@ class DataPipeline:
         """
         cache_key = f"{symbol}_{timeframe}"
         
-        # Проверяем кеш
-        if cache_key in self.cache['market_data']:
-            last_update = self.cache['last_update'].get(cache_key, datetime.min)
-            if (datetime.now() - last_update).seconds < 300:  # 5 минут
-                return self.cache['market_data'][cache_key]
-        
-        db = SessionLocal()
         try:
-            query = db.query(MarketData).filter(
-                and_(
-                    MarketData.symbol == symbol,
-                    MarketData.timeframe == timeframe
-                )
+            # Общее хранилище свечей: из БД догружаются только новые бары
+            store = get_candle_store()
+            df = await store.get_frame(
+                symbol, timeframe, limit=self.params['max_history_candles']
             )
             
+            # Хранилище держит последние max_history_candles баров; период,
+            # начинающийся раньше, читается из БД целиком
+            if start_date and (df.empty or start_date < df.index[0]):
+                self.logger.info(
+                    f"Период {symbol} {timeframe} старше окна хранилища - загрузка из БД",
+                    category='data',
+                    symbol=symbol,
+                    timeframe=timeframe
+                )
+                df = await store.load_range(symbol, timeframe, start_date, end_date)
+            
+            mask = np.ones(len(df), dtype=bool)
             if start_date:
-                query = query.filter(MarketData.timestamp >= start_date)
+                mask &= df.index >= start_date
             if end_date:
-                query = query.filter(MarketData.timestamp <= end_date)
-            
-            query = query.order_by(MarketData.timestamp.asc())
+                mask &= df.index <= end_date
             
-            data = query.all()
+            # Булева выборка возвращает копию - clean_data изменяет данные на месте
+            df = df[mask]
             
-            if not data:
+            if df.empty:
                 self.logger.warning(
                     f"Нет данных для {symbol} {timeframe}",
                     category='data',
@@ -99,19 +105,7 @@ class DataPipeline:
                 )
                 return pd.DataFrame()
             
-            # Преобразуем в DataFrame
-            df = pd.DataFrame([{
-                'timestamp': d.timestamp,
-                'open': d.open,
-                'high': d.high,
-                'low': d.low,
-                'close': d.close,
-                'volume': d.volume
-            } for d in data])
-            
-            df.set_index('timestamp', inplace=True)
-            
-            # Кешируем
+            # Последняя выборка нужна при подготовке меток
             self.cache['market_data'][cache_key] = df
             self.cache['last_update'][cache_key] = datetime.now()
             
@@ -132,8 +126,6 @@ class DataPipeline:
                 error=str(e)
             )
             return pd.DataFrame()
-        finally:
-            db.close()
     
     def clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -294,43 +286,23 @@ class DataPipeline:
         Returns:
             Series с метками
         """
+        window = self.params['label_window']
+        close = market_data['close'].to_numpy(dtype=np.float64)
+        
         if label_type == 'classification':
-            # Метки для классификации направления
-            labels = []
+            # Метки для классификации направления: 0 - down, 1 - neutral, 2 - up
+            # по среднему изменению цены за следующие window баров (порог 0.2%)
+            labels = mean_change_labels(close, window, threshold=0.002)
             
-            for i in range(len(market_data) - self.params['label_window']):
-                current_price = market_data.iloc[i]['close']
-                future_prices = market_data.iloc[i+1:i+self.params['label_window']+1]['close']
-                
-                # Среднее изменение цены
-                avg_change = (future_prices.mean() - current_price) / current_price
-                
-                # Классификация: 0 - down, 1 - neutral, 2 - up
-                if avg_change < -0.002:  # < -0.2%
-                    labels.append(0)
-                elif avg_change > 0.002:  # > 0.2%
-                    labels.append(2)
-                else:
-                    labels.append(1)
-            
-            # Дополняем последние значения
-            for _ in range(self.params['label_window']):
-                labels.append(1)  # neutral
+            # Последние window значений - neutral
+            labels = np.nan_to_num(labels, nan=LABEL_NEUTRAL).astype(np.int64)
                 
         elif label_type == 'regression':
-            # Метки для регрессии (процентное изменение)
-            labels = []
-            
-            for i in range(len(market_data) - self.params['label_window']):
-                current_price = market_data.iloc[i]['close']
-                future_price = market_data.iloc[i + self.params['label_window']]['close']
-                
-                pct_change = (future_price - current_price) / current_price * 100
-                labels.append(pct_change)
+            # Метки для регрессии (процентное изменение через window баров)
+            labels = forward_return(close, window) * 100
             
-            # Дополняем последние значения
-            for _ in range(self.params['label_window']):
-                labels.append(0.0)
+            # Последние window значений - 0
+            labels = np.nan_to_num(labels, nan=0.0)
         
         return pd.Series(labels, index=market_data.index)
     
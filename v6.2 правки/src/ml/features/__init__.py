@@ -6,8 +6,11 @@ Feature engineering для ML моделей - ИСПРАВЛЕННАЯ ВЕРС
 # Попытка импорта с защитой от отсутствия модулей
 try:
     from .feature_engineering import FeatureEngineer
+    # Кэш колонок индикаторов использует параметры FeatureEngineer
+    from .indicator_cache import IndicatorColumnCache, IndicatorFeatureMatrix, get_indicator_cache
     # Создаем алиас для обратной совместимости
     FeatureEngineering = FeatureEngineer
+    _INDICATOR_CACHE_EXPORTS = ['IndicatorColumnCache', 'IndicatorFeatureMatrix', 'get_indicator_cache']
 except ImportError as e:
     print(f"⚠️ Не удалось импортировать FeatureEngineer: {e}")
     
@@ -27,6 +30,12 @@ except ImportError as e:
     
     # Алиас для обратной совместимости
     FeatureEngineering = FeatureEngineer
+    _INDICATOR_CACHE_EXPORTS = []
+
+from .feature_cache import FeatureCache, get_feature_cache
 
 # Экспортируем оба имени для совместимости
-__all__ = ['FeatureEngineering', 'FeatureEngineer']
\ No newline at end of file
+__all__ = [
+    'FeatureEngineering', 'FeatureEngineer', 'FeatureCache', 'get_feature_cache',
+    *_INDICATOR_CACHE_EXPORTS
+]
\ No newline at end of file
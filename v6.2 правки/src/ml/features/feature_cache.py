@@ -0,0 +1,415 @@
+"""
+Кэш матриц признаков FeatureEngineer
+Файл: src/ml/features/feature_cache.py
+
+Раньше extract_features на каждом вызове заново считал ~250 признаков
+по всему окну (lookback_periods * 2 баров), даже если с прошлого вызова
+не появилось ни одного нового бара.
+
+Кэш держит два уровня в памяти и один на диске:
+✅ Готовые признаки по ключу (symbol, timeframe, config_hash, lookback) с
+   временем последнего бара - повторный вызов в пределах того же бара
+   стоит одного поиска в словаре
+✅ "Ядро" - детерминированные признаки по (symbol, timeframe, config_hash).
+   С новым баром досчитываются только новые строки (по хвосту истории
+   длиной warmup_bars), старые строки не пересчитываются
+✅ Дисковый колоночный уровень (.npy): после рестарта ядро подхватывается
+   с диска и сразу досчитывается инкрементально
+
+config_hash - хеш конфигурации признаков: при изменении набора признаков
+кэш автоматически перестает совпадать.
+
+Строки ядра считаются один раз, когда бар был последним (point-in-time).
+Исключение - признаки, зависящие от всей истории окна (EWM, накопительные
+суммы OBV/VPT/VWAP): досчитанные по хвосту warmup_bars, они скачком
+отличались бы от сохраненных строк. Их пересчитывает по всему окну
+refresh (FeatureEngineer.path_dependent_features) - значения те же, что
+у полного пересчета по lookback_periods * 2 барам.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ...core.config import config
+from ...logging.smart_logger import get_logger
+from ...market_data.candle_store import OHLCV_COLUMNS, _timeframe_ms
+
+logger = get_logger(__name__)
+
+# compute(market_df) -> (признаки ядра, число колонок до контекстных признаков)
+ComputeFn = Callable[[pd.DataFrame], Tuple[pd.DataFrame, int]]
+# refresh(строки ядра окна) -> колонки, зависящие от всей истории окна, по этим строкам
+RefreshFn = Callable[[pd.DataFrame], pd.DataFrame]
+
+MatrixKey = Tuple[str, str, str]
+ResultKey = Tuple[str, str, str, int]
+
+
+def feature_config_hash(feature_config: Dict[str, Any]) -> str:
+    """Короткий стабильный хеш конфигурации признаков"""
+    payload = json.dumps(feature_config, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def timestamp_ms(index: pd.DatetimeIndex, position: int = -1) -> int:
+    """Время бара в миллисекундах UTC"""
+    return int(index[position].value // 1_000_000)
+
+
+@dataclass
+class FeatureMatrix:
+    """Ядро признаков одного (symbol, timeframe, config_hash)"""
+    core: pd.DataFrame
+    split: int  # Колонки core[:split] идут до контекстных признаков, core[split:] - после
+    window_start: Optional[pd.Timestamp] = None  # С этого бара колонки refresh посчитаны по окну
+
+    @property
+    def last_timestamp(self) -> pd.Timestamp:
+        return self.core.index[-1]
+
+
+class FeatureCache:
+    """
+    Кэш признаков для всего процесса
+
+    Возвращаемые DataFrame общие для всех вызывающих - их нельзя изменять
+    на месте (нужна копия - делайте .copy()).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None,
+                 warmup_bars: Optional[int] = None,
+                 cache_dir: Optional[str] = None):
+        self.max_entries = max_entries or config.FEATURE_CACHE_MAX_ENTRIES
+        self.warmup_bars = warmup_bars if warmup_bars is not None else config.FEATURE_CACHE_WARMUP_BARS
+        cache_dir = config.FEATURE_CACHE_DIR if cache_dir is None else cache_dir
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+        self._matrices: 'OrderedDict[MatrixKey, FeatureMatrix]' = OrderedDict()
+        self._results: 'OrderedDict[ResultKey, Tuple[int, int, pd.DataFrame]]' = OrderedDict()
+        self._dirty: Dict[MatrixKey, FeatureMatrix] = {}
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'bar_hits': 0,
+            'result_hits': 0,
+            'full_computes': 0,
+            'incremental_updates': 0,
+            'rows_appended': 0,
+            'window_refreshes': 0,
+            'disk_loads': 0,
+            'disk_writes': 0,
+            'disk_errors': 0
+        }
+
+    @property
+    def persistent(self) -> bool:
+        return self.cache_dir is not None
+
+    # =================================================================
+    # ГОТОВЫЕ ПРИЗНАКИ
+    # =================================================================
+
+    def lookup(self, symbol: str, timeframe: str, config_hash: str,
+               lookback: int, now_ms: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        Признаки, посчитанные в текущем (еще не закрытом) баре
+
+        Не требует рыночных данных: если бар, по которому считались
+        признаки, еще не закрылся, новых данных быть не может.
+        """
+        key = (symbol, timeframe, config_hash, lookback)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            _, bar_end_ms, frame = entry
+            if (now_ms if now_ms is not None else time.time() * 1000) >= bar_end_ms:
+                return None
+            self._results.move_to_end(key)
+            self.stats['bar_hits'] += 1
+            return frame
+
+    def get_result(self, symbol: str, timeframe: str, config_hash: str,
+                   lookback: int, last_ts_ms: int) -> Optional[pd.DataFrame]:
+        """Признаки для окна, последний бар которого last_ts_ms"""
+        key = (symbol, timeframe, config_hash, lookback)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None or entry[0] != last_ts_ms:
+                return None
+            self._results.move_to_end(key)
+            self.stats['result_hits'] += 1
+            return entry[2]
+
+    def put_result(self, symbol: str, timeframe: str, config_hash: str,
+                   lookback: int, last_ts_ms: int, frame: pd.DataFrame):
+        """Запомнить признаки окна до закрытия его последнего бара"""
+        key = (symbol, timeframe, config_hash, lookback)
+        bar_end_ms = last_ts_ms + _timeframe_ms(timeframe)
+        with self._lock:
+            self._results[key] = (last_ts_ms, bar_end_ms, frame)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries * 4:
+                self._results.popitem(last=False)
+
+    # =================================================================
+    # ЯДРО ПРИЗНАКОВ
+    # =================================================================
+
+    def update_matrix(self, symbol: str, timeframe: str, config_hash: str,
+                      market_df: pd.DataFrame, compute: ComputeFn,
+                      refresh: Optional[RefreshFn] = None) -> FeatureMatrix:
+        """
+        Ядро признаков, покрывающее все бары market_df
+
+        Args:
+            symbol: Торговая пара
+            timeframe: Таймфрейм
+            config_hash: Хеш конфигурации признаков
+            market_df: OHLCV с DatetimeIndex (по возрастанию, без дублей)
+            compute: Расчет ядра по OHLCV (получает изменяемую копию)
+            refresh: Пересчет колонок, зависящих от всей истории окна, по
+                строкам ядра начиная с market_df.index[0] (None - не нужен)
+        """
+        key = (symbol, timeframe, config_hash)
+        window_start = market_df.index[0] if len(market_df) else None
+        matrix = self._get_matrix(key)
+        start = self._first_stale_row(matrix, market_df) if matrix is not None else None
+
+        if start is not None and start >= len(market_df):
+            # Новых баров нет (ядро могло быть загружено с диска); окно могло сдвинуться
+            if refresh is not None and matrix.window_start != window_start:
+                matrix = self._refresh_window(matrix, window_start, refresh)
+                self._remember(key, matrix, dirty=self.persistent)
+            else:
+                self._remember(key, matrix, dirty=False)
+            return matrix
+
+        if start is not None:
+            chunk_start = max(0, start - self.warmup_bars)
+            chunk, split = compute(market_df.iloc[chunk_start:].copy())
+
+            if split == matrix.split and chunk.columns.equals(matrix.core.columns):
+                fresh = chunk.iloc[start - chunk_start:]
+                kept = matrix.core[matrix.core.index < market_df.index[start]]
+                capacity = max(len(market_df), len(matrix.core))
+                matrix = FeatureMatrix(pd.concat([kept, fresh]).iloc[-capacity:], split)
+                if refresh is not None:
+                    matrix = self._refresh_window(matrix, window_start, refresh)
+                self.stats['incremental_updates'] += 1
+                self.stats['rows_appended'] += len(fresh)
+            else:
+                # Набор колонок зависит от данных (например, нулевой объем) - пересчет целиком
+                start = None
+
+        if start is None:
+            core, split = compute(market_df.copy())
+            matrix = FeatureMatrix(core, split, window_start)
+            self.stats['full_computes'] += 1
+
+        self._remember(key, matrix, dirty=self.persistent)
+        return matrix
+
+    def _refresh_window(self, matrix: FeatureMatrix, window_start: pd.Timestamp,
+                        refresh: RefreshFn) -> FeatureMatrix:
+        """
+        Новое ядро с колонками refresh, пересчитанными по строкам окна
+
+        Прежнее ядро не меняется: его могут читать другие вызывающие.
+        """
+        first = int(matrix.core.index.searchsorted(window_start))
+        fresh = refresh(matrix.core.iloc[first:])
+        core = matrix.core.copy()
+        for column in fresh.columns:
+            values = core[column].to_numpy(copy=True)
+            values[first:] = fresh[column].to_numpy(dtype=values.dtype)
+            core[column] = values
+        self.stats['window_refreshes'] += 1
+        return FeatureMatrix(core, matrix.split, window_start)
+
+    def _remember(self, key: MatrixKey, matrix: FeatureMatrix, dirty: bool):
+        with self._lock:
+            self._matrices[key] = matrix
+            self._matrices.move_to_end(key)
+            while len(self._matrices) > self.max_entries:
+                self._matrices.popitem(last=False)
+            if dirty:
+                self._dirty[key] = matrix
+
+    def _get_matrix(self, key: MatrixKey) -> Optional[FeatureMatrix]:
+        with self._lock:
+            matrix = self._matrices.get(key)
+            if matrix is not None:
+                self._matrices.move_to_end(key)
+                return matrix
+        return self._load(key) if self.persistent else None
+
+    @staticmethod
+    def _first_stale_row(matrix: FeatureMatrix, market_df: pd.DataFrame) -> Optional[int]:
+        """
+        Позиция в market_df, с которой ядро нужно досчитать
+
+        None - ядро не подходит (нет нужной истории, разрыв), нужен
+        полный пересчет. len(market_df) - ядро полностью актуально.
+        """
+        core = matrix.core
+        index = market_df.index
+        if len(core) == 0 or len(index) == 0 or index[0] < core.index[0]:
+            return None
+        if any(column not in market_df.columns for column in OHLCV_COLUMNS):
+            return None
+
+        overlap = int(index.searchsorted(core.index[-1], side='right'))
+        if overlap == 0 or index[overlap - 1] != core.index[-1]:
+            return None
+
+        positions = core.index.get_indexer(index[:overlap])
+        if (positions < 0).any():
+            return None
+
+        cached = core[OHLCV_COLUMNS].to_numpy(dtype=np.float64)[positions]
+        fresh = market_df[OHLCV_COLUMNS].to_numpy(dtype=np.float64)[:overlap]
+        same = ((cached == fresh) | (np.isnan(cached) & np.isnan(fresh))).all(axis=1)
+        if not same.all():
+            # Например, формирующийся бар обновился - досчитываем с него
+            return int(np.argmin(same))
+        return overlap
+
+    # =================================================================
+    # ДИСКОВЫЙ УРОВЕНЬ
+    # =================================================================
+
+    def _path(self, key: MatrixKey) -> Path:
+        name = '_'.join(re.sub(r'[^A-Za-z0-9-]', '_', part) for part in key)
+        return self.cache_dir / name
+
+    def flush(self):
+        """Записать измененные ядра на диск (вызывать через asyncio.to_thread)"""
+        with self._lock:
+            pending, self._dirty = self._dirty, {}
+        for key, matrix in pending.items():
+            try:
+                self._save(key, matrix)
+                self.stats['disk_writes'] += 1
+            except Exception as e:
+                self.stats['disk_errors'] += 1
+                logger.warning(f"Не удалось сохранить признаки {key[0]} {key[1]}: {e}")
+
+    def _save(self, key: MatrixKey, matrix: FeatureMatrix):
+        path = self._path(key)
+        path.mkdir(parents=True, exist_ok=True)
+        core = matrix.core
+        index = core.index
+
+        meta = {
+            'rows': len(core),
+            'columns': list(core.columns),
+            'dtypes': [str(dtype) for dtype in core.dtypes],
+            'split': matrix.split,
+            'index_name': index.name,
+            'index_unit': index.unit,
+            'index_tz': str(index.tz) if index.tz is not None else None
+        }
+        # Колоночная раскладка (order='F'): каждый признак - непрерывный участок файла
+        values = np.asfortranarray(core.to_numpy(dtype=np.float64))
+
+        # Сначала данные, затем meta.json - по нему проверяется целостность набора
+        for name, array in (('index.npy', index.asi8), ('values.npy', values)):
+            tmp = path / f'{name}.tmp'
+            with open(tmp, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp, path / name)
+        tmp = path / 'meta.json.tmp'
+        tmp.write_text(json.dumps(meta), encoding='utf-8')
+        os.replace(tmp, path / 'meta.json')
+
+    def _load(self, key: MatrixKey) -> Optional[FeatureMatrix]:
+        path = self._path(key)
+        if not (path / 'meta.json').exists():
+            return None
+        try:
+            meta = json.loads((path / 'meta.json').read_text(encoding='utf-8'))
+            index_values = np.load(path / 'index.npy')
+            values = np.load(path / 'values.npy')
+            if values.shape != (meta['rows'], len(meta['columns'])) or len(index_values) != meta['rows']:
+                raise ValueError("размеры файлов не совпадают с meta.json")
+
+            index = pd.DatetimeIndex(
+                index_values.view(f"datetime64[{meta['index_unit']}]"), name=meta['index_name']
+            )
+            if meta['index_tz']:
+                index = index.tz_localize('UTC').tz_convert(meta['index_tz'])
+
+            core = pd.DataFrame(np.ascontiguousarray(values), index=index, columns=meta['columns'])
+            core = core.astype(dict(zip(meta['columns'], meta['dtypes'])))
+        except Exception as e:
+            self.stats['disk_errors'] += 1
+            logger.warning(f"Кэш признаков {path.name} поврежден, пересчитываем: {e}")
+            return None
+
+        self.stats['disk_loads'] += 1
+        return FeatureMatrix(core, meta['split'])
+
+    # =================================================================
+    # УПРАВЛЕНИЕ
+    # =================================================================
+
+    def invalidate(self, symbol: Optional[str] = None, timeframe: Optional[str] = None):
+        """Сбросить кэш в памяти (все или по symbol/timeframe)"""
+        def matches(key) -> bool:
+            return (symbol is None or key[0] == symbol) and (timeframe is None or key[1] == timeframe)
+
+        with self._lock:
+            for store in (self._matrices, self._results, self._dirty):
+                for key in [key for key in store if matches(key)]:
+                    del store[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        with self._lock:
+            matrices = list(self._matrices.values())
+            results = len(self._results)
+        return {
+            **self.stats,
+            'matrices': len(matrices),
+            'results': results,
+            'rows_cached': sum(len(m.core) for m in matrices),
+            'memory_mb': sum(m.core.memory_usage(index=True).sum() for m in matrices) / 1024 / 1024,
+            'cache_dir': str(self.cache_dir) if self.cache_dir else None
+        }
+
+
+# =================================================================
+# ГЛОБАЛЬНЫЕ ФУНКЦИИ
+# =================================================================
+
+# Глобальный экземпляр
+feature_cache = None
+
+def get_feature_cache() -> FeatureCache:
+    """Получить глобальный кэш признаков"""
+    global feature_cache
+
+    if feature_cache is None:
+        feature_cache = FeatureCache()
+
+    return feature_cache
+
+# Экспорты
+__all__ = [
+    'FeatureCache',
+    'FeatureMatrix',
+    'feature_config_hash',
+    'timestamp_ms',
+    'get_feature_cache'
+]
@@ -17,9 +17,34 @@ from ...core.database import SessionLocal
 from ...core.models import Candle, MarketCondition, Signal, Trade
 from ...core.config import Config
 from ...indicators.technical_indicators import TechnicalIndicators
+from ...market_data.candle_store import get_candle_store
+from .feature_cache import feature_config_hash, get_feature_cache, timestamp_ms
 
 logger = logging.getLogger(__name__)
 
+# Версия набора признаков: увеличить при изменении формул, чтобы кэш не совпадал
+FEATURE_SET_VERSION = 1
+
+# Параметры индикаторов по умолчанию (HyperparameterOptimizer подбирает их в trials)
+DEFAULT_INDICATOR_PARAMS = {
+    'rsi_period': 14,
+    'macd_fast': 12,
+    'macd_slow': 26,
+    'bb_period': 20,
+    'atr_period': 14
+}
+
+# Периоды SMA/EMA
+MA_PERIODS = [9, 12, 21, 26, 50, 200]
+
+# Индикатор -> параметры, от которых зависят его колонки (кроме OHLCV)
+INDICATOR_PARAMS = {
+    'rsi': ('rsi_period',),
+    'macd': ('macd_fast', 'macd_slow'),
+    'bb': ('bb_period',),
+    'atr': ('atr_period',)
+}
+
 
 class FeatureEngineer:
     """
@@ -63,6 +88,21 @@ class FeatureEngineer:
             'volume_at_bid', 'volume_at_ask', 'trades_per_minute'
         ]
         
+        # Параметры, от которых зависят значения признаков (ключ кэша)
+        self.feature_config = {
+            'version': FEATURE_SET_VERSION,
+            'lags': [1, 2, 3, 5, 10],
+            'rolling_windows': [5, 10, 20, 50],
+            'warmup_bars': Config.FEATURE_CACHE_WARMUP_BARS
+        }
+        
+        # Параметры индикаторов (входят в config_hash, если отличаются от умолчаний)
+        self.rsi_period = DEFAULT_INDICATOR_PARAMS['rsi_period']
+        self.macd_fast = DEFAULT_INDICATOR_PARAMS['macd_fast']
+        self.macd_slow = DEFAULT_INDICATOR_PARAMS['macd_slow']
+        self.bb_period = DEFAULT_INDICATOR_PARAMS['bb_period']
+        self.atr_period = DEFAULT_INDICATOR_PARAMS['atr_period']
+        
         # Статистика
         self.stats = {
             'features_extracted': 0,
@@ -70,6 +110,19 @@ class FeatureEngineer:
             'last_extraction': None
         }
     
+    @property
+    def config_hash(self) -> str:
+        """Хеш конфигурации признаков с текущими параметрами индикаторов"""
+        params = self.indicator_params()
+        if params == DEFAULT_INDICATOR_PARAMS:
+            # Хеш как до появления параметров - дисковый кэш остается действительным
+            return feature_config_hash(self.feature_config)
+        return feature_config_hash({**self.feature_config, 'indicators': params})
+    
+    def indicator_params(self) -> Dict[str, int]:
+        """Текущие параметры индикаторов"""
+        return {name: getattr(self, name) for name in DEFAULT_INDICATOR_PARAMS}
+    
     async def extract_features(self, symbol: str, timeframe: str = '5m', 
                               lookback_periods: int = 500) -> pd.DataFrame:
         """
@@ -84,6 +137,13 @@ class FeatureEngineer:
             DataFrame с признаками
         """
         try:
+            # Повторный вызов в пределах того же бара - готовые признаки из кэша
+            cache = get_feature_cache() if Config.ENABLE_FEATURE_CACHE else None
+            if cache is not None:
+                cached = cache.lookup(symbol, timeframe, self.config_hash, lookback_periods)
+                if cached is not None:
+                    return cached
+            
             logger.info(f"🔄 Начинаем экстракцию признаков для {symbol}")
             
             # === 1. ПОЛУЧЕНИЕ ИСТОРИЧЕСКИХ ДАННЫХ ===
@@ -94,28 +154,34 @@ class FeatureEngineer:
                 self.stats['extraction_errors'] += 1
                 return pd.DataFrame()
             
-            # === 2. ДОБАВЛЯЕМ ВСЕ ГРУППЫ ПРИЗНАКОВ ===
-            df = self._add_price_features(df)
-            df = self._add_technical_indicators(df)
-            df = self._add_momentum_features(df)
-            df = self._add_volatility_features(df)
-            df = self._add_volume_features(df)
-            df = self._add_support_resistance_levels(df)
-            df = self._add_candle_patterns(df)
-            df = self._add_time_features(df)
-            df = await self._add_market_microstructure(df, symbol)
-            df = await self._add_market_conditions(df, symbol, timeframe)
-            df = await self._add_historical_performance(df, symbol)
-            
-            # === 3. ДОБАВЛЯЕМ СЛОЖНЫЕ ПРИЗНАКИ ===
-            df = self._add_lag_features(df)
-            df = self._add_rolling_features(df)
-            df = self._add_interaction_features(df)
-            df = self._add_regime_features(df)
+            use_cache = cache is not None and isinstance(df.index, pd.DatetimeIndex)
+            if use_cache:
+                last_ts = timestamp_ms(df.index)
+                cached = cache.get_result(symbol, timeframe, self.config_hash, lookback_periods, last_ts)
+                if cached is not None:
+                    return cached
+                
+                # === 2. ДЕТЕРМИНИРОВАННЫЕ ПРИЗНАКИ (досчитываются только новые бары) ===
+                matrix = cache.update_matrix(
+                    symbol, timeframe, self.config_hash, df, self._compute_core_features,
+                    refresh=self.path_dependent_features
+                )
+                df = matrix.core.loc[df.index[0]:].copy()
+                split = matrix.split
+            else:
+                df, split = self._compute_core_features(df)
+            
+            # === 3. КОНТЕКСТНЫЕ ПРИЗНАКИ (случайность, БД) - на каждый новый бар ===
+            df = await self._add_context_features(df, symbol, timeframe, split)
             
             # === 4. ОЧИСТКА ДАННЫХ ===
             df = self._clean_features(df)
             
+            if use_cache:
+                cache.put_result(symbol, timeframe, self.config_hash, lookback_periods, last_ts, df)
+                if cache.persistent:
+                    await asyncio.to_thread(cache.flush)
+            
             # Статистика
             self.stats['features_extracted'] += 1
             self.stats['last_extraction'] = datetime.utcnow()
@@ -127,6 +193,52 @@ class FeatureEngineer:
             logger.error(f"❌ Ошибка экстракции признаков для {symbol}: {e}")
             self.stats['extraction_errors'] += 1
             return pd.DataFrame()
+
+    async def features_from_ohlcv(self, df: pd.DataFrame, symbol: str, timeframe: str) -> pd.DataFrame:
+        """
+        Признаки для уже полученных OHLCV (без запроса данных и кэша признаков)
+
+        Используется процессами-воркерами обучения: данные получает основной процесс.
+        """
+        df, split = self._compute_core_features(df.copy())
+        df = await self._add_context_features(df, symbol, timeframe, split)
+        return self._clean_features(df)
+
+    def _compute_core_features(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+        """
+        Детерминированные признаки - зависят только от OHLCV
+        
+        Returns:
+            (df, split): split - число колонок до контекстных признаков
+            (в итоговом наборе они идут после временных признаков)
+        """
+        df = self._add_price_features(df)
+        df = self._add_technical_indicators(df)
+        df = self._add_momentum_features(df)
+        df = self._add_volatility_features(df)
+        df = self._add_volume_features(df)
+        df = self._add_support_resistance_levels(df)
+        df = self._add_candle_patterns(df)
+        df = self._add_time_features(df)
+        split = len(df.columns)
+        
+        # === СЛОЖНЫЕ ПРИЗНАКИ ===
+        df = self._add_lag_features(df, self.feature_config['lags'])
+        df = self._add_rolling_features(df, self.feature_config['rolling_windows'])
+        df = self._add_interaction_features(df)
+        df = self._add_regime_features(df)
+        return df, split
+    
+    async def _add_context_features(self, df: pd.DataFrame, symbol: str, timeframe: str,
+                                    split: int) -> pd.DataFrame:
+        """Микроструктура, рыночные условия и история сделок - в исходном порядке колонок"""
+        core_columns = list(df.columns)
+        df = await self._add_market_microstructure(df, symbol)
+        df = await self._add_market_conditions(df, symbol, timeframe)
+        df = await self._add_historical_performance(df, symbol)
+        
+        context_columns = [col for col in df.columns if col not in core_columns]
+        return df[core_columns[:split] + context_columns + core_columns[split:]]
     
     async def _get_market_data(self, symbol: str, timeframe: str, lookback_periods: int) -> pd.DataFrame:
         """
@@ -144,33 +256,16 @@ class FeatureEngineer:
         except Exception as e:
             logger.warning(f"Exchange client недоступен: {e}")
         
-        # Fallback: получаем из базы данных
-        db = SessionLocal()
-        try:
-            candles = db.query(Candle).filter(
-                Candle.symbol == symbol,
-                Candle.timeframe == timeframe
-            ).order_by(Candle.timestamp.desc()).limit(lookback_periods * 2).all()
-            
-            if len(candles) < 50:  # Минимум данных
-                logger.warning(f"Недостаточно данных в БД для {symbol}: {len(candles)}")
-                return pd.DataFrame()
-            
-            # Конвертируем в DataFrame
-            df = pd.DataFrame([{
-                'timestamp': c.timestamp,
-                'open': float(c.open),
-                'high': float(c.high),
-                'low': float(c.low),
-                'close': float(c.close),
-                'volume': float(c.volume)
-            } for c in reversed(candles)])
-            
-            df.set_index('timestamp', inplace=True)
-            return df
-            
-        finally:
-            db.close()
+        # Fallback: общее хранилище свечей (из БД догружаются только новые бары)
+        df = await get_candle_store().get_frame(
+            symbol, timeframe, limit=lookback_periods * 2, copy=True
+        )
+        
+        if len(df) < 50:  # Минимум данных
+            logger.warning(f"Недостаточно данных в БД для {symbol}: {len(df)}")
+            return pd.DataFrame()
+        
+        return df
     
     def _add_price_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """РЕАЛЬНЫЕ ценовые признаки"""
@@ -212,61 +307,20 @@ class FeatureEngineer:
         """РЕАЛЬНЫЕ технические индикаторы"""
         
         # === MOVING AVERAGES ===
-        for period in [9, 12, 21, 26, 50, 200]:
+        emas = self._ema_columns(df)
+        for period in MA_PERIODS:
             df[f'sma_{period}'] = df['close'].rolling(period).mean()
-            df[f'ema_{period}'] = df['close'].ewm(span=period).mean()
+            df[f'ema_{period}'] = emas[f'ema_{period}']
         
         # EMA slopes (скорость изменения)
-        df['ema_9_slope'] = (df['ema_9'] - df['ema_9'].shift(5)) / 5
-        df['ema_21_slope'] = (df['ema_21'] - df['ema_21'].shift(5)) / 5
-        
-        # === RSI ===
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
-        
-        # RSI уровни
-        df['rsi_oversold'] = (df['rsi'] < 30).astype(int)
-        df['rsi_overbought'] = (df['rsi'] > 70).astype(int)
-        df['rsi_normalized'] = (df['rsi'] - 50) / 50  # От -1 до 1
-        
-        # === MACD ===
-        df['macd'] = df['ema_12'] - df['ema_26']
-        df['macd_signal'] = df['macd'].ewm(span=9).mean()
-        df['macd_hist'] = df['macd'] - df['macd_signal']
-        df['macd_histogram'] = df['macd_hist']  # Алиас
+        df['ema_9_slope'] = emas['ema_9_slope']
+        df['ema_21_slope'] = emas['ema_21_slope']
         
-        # MACD кроссоверы
-        df['macd_cross'] = np.where(
-            (df['macd'] > df['macd_signal']) & 
-            (df['macd'].shift(1) <= df['macd_signal'].shift(1)), 1,
-            np.where(
-                (df['macd'] < df['macd_signal']) & 
-                (df['macd'].shift(1) >= df['macd_signal'].shift(1)), -1, 0
-            )
-        )
-        
-        # === BOLLINGER BANDS ===
-        bb_period = 20
-        bb_std = 2
-        df['bb_middle'] = df['close'].rolling(bb_period).mean()
-        bb_std_val = df['close'].rolling(bb_period).std()
-        df['bb_upper'] = df['bb_middle'] + (bb_std_val * bb_std)
-        df['bb_lower'] = df['bb_middle'] - (bb_std_val * bb_std)
-        df['bb_width'] = df['bb_upper'] - df['bb_lower']
-        df['bb_percent'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
-        df['bb_position'] = df['bb_percent']  # Алиас
-        
-        # === ATR (Average True Range) ===
-        high_low = df['high'] - df['low']
-        high_close = abs(df['high'] - df['close'].shift())
-        low_close = abs(df['low'] - df['close'].shift())
-        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        df['atr'] = true_range.rolling(14).mean()
-        df['atr_pct'] = df['atr'] / df['close'] * 100
-        df['atr_percent'] = df['atr_pct']  # Алиас
+        # === RSI, MACD, BOLLINGER BANDS, ATR (параметры - indicator_params) ===
+        params = self.indicator_params()
+        for indicator in INDICATOR_PARAMS:
+            for name, column in self.indicator_columns(df, indicator, params).items():
+                df[name] = column
         
         # === STOCHASTIC ===
         high_14 = df['high'].rolling(14).max()
@@ -284,24 +338,117 @@ class FeatureEngineer:
         df['cci'] = (typical_price - sma_tp) / (0.015 * mean_deviation)
         
         # === ADX (Average Directional Index) ===
+        for name, column in self._adx_columns(df).items():
+            df[name] = column
+        
+        return df
+    
+    def _ema_columns(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
+        """EMA и их наклоны"""
+        columns = {f'ema_{period}': df['close'].ewm(span=period).mean() for period in MA_PERIODS}
+        columns['ema_9_slope'] = (columns['ema_9'] - columns['ema_9'].shift(5)) / 5
+        columns['ema_21_slope'] = (columns['ema_21'] - columns['ema_21'].shift(5)) / 5
+        return columns
+    
+    def _adx_columns(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """ADX, +DI, -DI"""
         try:
             # Попытка использовать pandas_ta если доступен
             adx = ta.adx(df['high'], df['low'], df['close'], length=14)
             if adx is not None and not adx.empty:
-                df['adx'] = adx['ADX_14']
-                df['plus_di'] = adx['DMP_14']
-                df['minus_di'] = adx['DMN_14']
-            else:
-                # Упрощенная версия ADX
-                df['adx'] = 50  # Нейтральное значение
-                df['plus_di'] = 25
-                df['minus_di'] = 25
-        except:
-            df['adx'] = 50
-            df['plus_di'] = 25
-            df['minus_di'] = 25
+                return {'adx': adx['ADX_14'], 'plus_di': adx['DMP_14'], 'minus_di': adx['DMN_14']}
+        except Exception:
+            pass
+        # Упрощенная версия ADX - нейтральные значения
+        return {'adx': 50, 'plus_di': 25, 'minus_di': 25}
+    
+    def indicator_columns(self, df: pd.DataFrame, indicator: str,
+                          params: Dict[str, int]) -> Dict[str, pd.Series]:
+        """
+        Колонки индикатора из INDICATOR_PARAMS с заданными параметрами
         
-        return df
+        Зависят только от OHLCV df и params - их можно кэшировать по
+        (данные, индикатор, параметры).
+        """
+        if indicator == 'rsi':
+            return self._rsi_columns(df, params['rsi_period'])
+        if indicator == 'macd':
+            return self._macd_columns(df, params['macd_fast'], params['macd_slow'])
+        if indicator == 'bb':
+            return self._bb_columns(df, params['bb_period'])
+        if indicator == 'atr':
+            return self._atr_columns(df, params['atr_period'])
+        raise ValueError(f"Неизвестный индикатор: {indicator}")
+    
+    def _rsi_columns(self, df: pd.DataFrame, period: int) -> Dict[str, pd.Series]:
+        """RSI"""
+        delta = df['close'].diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+        rs = gain / loss
+        rsi = 100 - (100 / (1 + rs))
+        
+        # RSI уровни
+        return {
+            'rsi': rsi,
+            'rsi_oversold': (rsi < 30).astype(int),
+            'rsi_overbought': (rsi > 70).astype(int),
+            'rsi_normalized': (rsi - 50) / 50  # От -1 до 1
+        }
+    
+    def _macd_columns(self, df: pd.DataFrame, fast: int, slow: int) -> Dict[str, pd.Series]:
+        """MACD"""
+        macd = df['close'].ewm(span=fast).mean() - df['close'].ewm(span=slow).mean()
+        signal = macd.ewm(span=9).mean()
+        hist = macd - signal
+        
+        # MACD кроссоверы
+        cross = np.where(
+            (macd > signal) & 
+            (macd.shift(1) <= signal.shift(1)), 1,
+            np.where(
+                (macd < signal) & 
+                (macd.shift(1) >= signal.shift(1)), -1, 0
+            )
+        )
+        return {
+            'macd': macd,
+            'macd_signal': signal,
+            'macd_hist': hist,
+            'macd_histogram': hist,  # Алиас
+            'macd_cross': pd.Series(cross, index=df.index)
+        }
+    
+    def _bb_columns(self, df: pd.DataFrame, period: int) -> Dict[str, pd.Series]:
+        """Bollinger Bands"""
+        bb_std = 2
+        middle = df['close'].rolling(period).mean()
+        bb_std_val = df['close'].rolling(period).std()
+        upper = middle + (bb_std_val * bb_std)
+        lower = middle - (bb_std_val * bb_std)
+        percent = (df['close'] - lower) / (upper - lower)
+        return {
+            'bb_middle': middle,
+            'bb_upper': upper,
+            'bb_lower': lower,
+            'bb_width': upper - lower,
+            'bb_percent': percent,
+            'bb_position': percent  # Алиас
+        }
+    
+    def _atr_columns(self, df: pd.DataFrame, period: int) -> Dict[str, pd.Series]:
+        """ATR (Average True Range)"""
+        high_low = df['high'] - df['low']
+        high_close = abs(df['high'] - df['close'].shift())
+        low_close = abs(df['low'] - df['close'].shift())
+        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+        atr = true_range.rolling(period).mean()
+        atr_pct = atr / df['close'] * 100
+        return {
+            'atr': atr,
+            'atr_pct': atr_pct,
+            'atr_percent': atr_pct  # Алиас
+        }
     
     def _add_momentum_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Индикаторы моментума"""
@@ -353,29 +500,38 @@ class FeatureEngineer:
         # Относительный объем
         df['volume_ratio'] = df['volume'] / df['volume_sma_20']
         
+        # VPT, OBV, VWAP - накопительные суммы
+        for name, column in self._cumulative_volume_columns(df).items():
+            df[name] = column
+        
+        # Volume trends
+        df['volume_trend_5'] = df['volume'].rolling(5).mean() / df['volume'].rolling(20).mean()
+        df['volume_price_trend'] = df['volume'] * np.sign(df['price_change_1'])
+        
+        return df
+    
+    def _cumulative_volume_columns(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
+        """VPT, OBV и VWAP"""
+        columns = {}
+        
         # Volume Price Trend (VPT)
         vpt = (df['volume'] * df['price_change_pct']).cumsum()
-        df['vpt'] = vpt
-        df['vpt_sma'] = vpt.rolling(10).mean()
+        columns['vpt'] = vpt
+        columns['vpt_sma'] = vpt.rolling(10).mean()
         
         # On-Balance Volume (OBV)
-        obv_change = df['volume'] * np.sign(df['close'].diff())
-        df['obv'] = obv_change.cumsum()
-        df['obv_ema'] = df['obv'].ewm(span=21).mean()
-        df['obv_signal'] = np.where(df['obv'] > df['obv_ema'], 1, -1)
+        obv = (df['volume'] * np.sign(df['close'].diff())).cumsum()
+        obv_ema = obv.ewm(span=21).mean()
+        columns['obv'] = obv
+        columns['obv_ema'] = obv_ema
+        columns['obv_signal'] = pd.Series(np.where(obv > obv_ema, 1, -1), index=df.index)
         
         # Volume-Weighted Average Price (VWAP)
         typical_price = (df['high'] + df['low'] + df['close']) / 3
-        vwap_num = (typical_price * df['volume']).cumsum()
-        vwap_den = df['volume'].cumsum()
-        df['vwap'] = vwap_num / vwap_den
-        df['price_vs_vwap'] = (df['close'] - df['vwap']) / df['vwap'] * 100
-        
-        # Volume trends
-        df['volume_trend_5'] = df['volume'].rolling(5).mean() / df['volume'].rolling(20).mean()
-        df['volume_price_trend'] = df['volume'] * np.sign(df['price_change_1'])
-        
-        return df
+        vwap = (typical_price * df['volume']).cumsum() / df['volume'].cumsum()
+        columns['vwap'] = vwap
+        columns['price_vs_vwap'] = (df['close'] - vwap) / vwap * 100
+        return columns
     
     def _add_support_resistance_levels(self, df: pd.DataFrame) -> pd.DataFrame:
         """Уровни поддержки и сопротивления"""
@@ -510,25 +666,24 @@ class FeatureEngineer:
         """Рыночные условия из БД"""
         db = SessionLocal()
         try:
-            # Получаем последние рыночные условия
+            # Получаем последние рыночные условия (таблица не хранит timeframe)
             market_condition = db.query(MarketCondition).filter(
-                MarketCondition.symbol == symbol,
-                MarketCondition.timeframe == timeframe
-            ).order_by(MarketCondition.timestamp.desc()).first()
-            
-            if market_condition:
-                trend_value = 1 if market_condition.trend == 'UPTREND' else (-1 if market_condition.trend == 'DOWNTREND' else 0)
-                df['market_trend'] = trend_value
-                df['market_volatility'] = market_condition.volatility_level
-                df['market_strength'] = market_condition.trend_strength
+                MarketCondition.symbol == symbol
+            ).order_by(MarketCondition.created_at.desc()).first()
+            
+            if market_condition and market_condition.trend:
+                trend = market_condition.trend.upper()
+                df['market_trend'] = 1 if trend in ('UPTREND', 'BULLISH') else (-1 if trend in ('DOWNTREND', 'BEARISH') else 0)
             else:
                 # Оценка трендов на основе данных
                 df['market_trend'] = np.where(
                     df['ema_21'] > df['ema_50'], 1,
                     np.where(df['ema_21'] < df['ema_50'], -1, 0)
                 )
-                df['market_volatility'] = df['atr_pct'] / df['atr_pct'].rolling(50).mean()
-                df['market_strength'] = abs(df['rsi'] - 50) / 50
+            
+            # Числовых оценок в таблице нет - волатильность и силу тренда считаем по данным
+            df['market_volatility'] = df['atr_pct'] / df['atr_pct'].rolling(50).mean()
+            df['market_strength'] = abs(df['rsi'] - 50) / 50
                 
         finally:
             db.close()
@@ -546,9 +701,9 @@ class FeatureEngineer:
             ).all()
             
             if recent_trades:
-                profitable_trades = [t for t in recent_trades if t.profit and t.profit > 0]
+                profitable_trades = [t for t in recent_trades if t.profit_loss and t.profit_loss > 0]
                 win_rate = len(profitable_trades) / len(recent_trades)
-                avg_profit = np.mean([t.profit for t in recent_trades if t.profit])
+                avg_profit = np.mean([t.profit_loss for t in recent_trades if t.profit_loss])
                 
                 df['recent_win_rate'] = win_rate
                 df['recent_avg_profit'] = avg_profit if not np.isnan(avg_profit) else 0
@@ -609,7 +764,7 @@ class FeatureEngineer:
         df['rsi_volume_interaction'] = df['rsi'] * df['volume_ratio']
         
         # MACD * ATR
-        df['macd_atr_interaction'] = df['macd'] * df['atr_pct']
+        df['macd_atr_interaction'] = self._macd_atr_interaction(df)
         
         # Bollinger position * Volume
         df['bb_volume_interaction'] = df['bb_percent'] * df['volume_ratio']
@@ -621,21 +776,68 @@ class FeatureEngineer:
     
     def _add_regime_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Признаки рыночных режимов"""
+        trend = self._trend_regime_columns(df)
+        
         # Trending vs ranging market
-        df['trend_strength'] = abs(df['ema_21_slope']) / df['atr_pct']
-        df['is_trending'] = (df['trend_strength'] > df['trend_strength'].rolling(50).quantile(0.7)).astype(int)
+        df['trend_strength'] = trend['trend_strength']
+        df['is_trending'] = trend['is_trending']
         
         # High vs low volatility regime
         vol_median = df['atr_pct'].rolling(100).median()
         df['is_high_vol'] = (df['atr_pct'] > vol_median * 1.5).astype(int)
         
         # Bull vs bear market
-        ma_ratio = df['ema_21'] / df['ema_50']
-        df['is_bull_market'] = (ma_ratio > 1.02).astype(int)
-        df['is_bear_market'] = (ma_ratio < 0.98).astype(int)
+        df['is_bull_market'] = trend['is_bull_market']
+        df['is_bear_market'] = trend['is_bear_market']
         
         return df
     
+    def _macd_atr_interaction(self, df: pd.DataFrame) -> pd.Series:
+        return df['macd'] * df['atr_pct']
+    
+    def _trend_regime_columns(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
+        """Режимы тренда по EMA: сила тренда, тренд, бычий/медвежий рынок"""
+        trend_strength = abs(df['ema_21_slope']) / df['atr_pct']
+        ma_ratio = df['ema_21'] / df['ema_50']
+        return {
+            'trend_strength': trend_strength,
+            'is_trending': (trend_strength > trend_strength.rolling(50).quantile(0.7)).astype(int),
+            'is_bull_market': (ma_ratio > 1.02).astype(int),
+            'is_bear_market': (ma_ratio < 0.98).astype(int)
+        }
+    
+    def path_dependent_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Признаки ядра, зависящие от всей истории окна, пересчитанные по df
+        
+        EWM (EMA, MACD, ADX) и накопительные суммы (VPT, OBV, VWAP) и все,
+        что из них выводится. Кэш признаков досчитывает новые строки ядра
+        по хвосту warmup_bars, а эти колонки пересчитывает по всему окну -
+        значения те же, что у расчета без кэша.
+        
+        Args:
+            df: Строки ядра окна (нужны OHLCV, price_change_pct, atr_pct)
+        """
+        work = df[['open', 'high', 'low', 'close', 'volume', 'price_change_pct', 'atr_pct']].copy()
+        base_columns = list(work.columns)
+        
+        for name, column in self._ema_columns(work).items():
+            work[name] = column
+        params = self.indicator_params()
+        for name, column in self._macd_columns(work, params['macd_fast'], params['macd_slow']).items():
+            work[name] = column
+        for name, column in self._adx_columns(work).items():
+            work[name] = column
+        for name, column in self._cumulative_volume_columns(work).items():
+            work[name] = column
+        for lag in self.feature_config['lags']:
+            work[f'macd_lag_{lag}'] = work['macd'].shift(lag)
+        work['macd_atr_interaction'] = self._macd_atr_interaction(work)
+        for name, column in self._trend_regime_columns(work).items():
+            work[name] = column
+        
+        return work.drop(columns=base_columns)
+    
     def _clean_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Очистка и финализация признаков"""
         # Заменяем inf на NaN
@@ -648,12 +850,12 @@ class FeatureEngineer:
         # Удаляем строки с NaN
         df = df.dropna()
         
-        # Обрезаем выбросы
+        # Обрезаем выбросы (квантили всех колонок одним вызовом)
         numeric_columns = df.select_dtypes(include=[np.number]).columns
-        for col in numeric_columns:
-            q1 = df[col].quantile(0.01)
-            q99 = df[col].quantile(0.99)
-            df[col] = df[col].clip(lower=q1, upper=q99)
+        bounds = df[numeric_columns].quantile([0.01, 0.99])
+        df[numeric_columns] = df[numeric_columns].clip(
+            lower=bounds.loc[0.01], upper=bounds.loc[0.99], axis=1
+        )
         
         return df
     
@@ -749,7 +951,8 @@ class FeatureEngineer:
                 'candle_patterns': len(self.candle_patterns),
                 'time_features': len(self.time_features),
                 'market_microstructure': len(self.market_microstructure)
-            }
+            },
+            'feature_cache': get_feature_cache().get_stats() if Config.ENABLE_FEATURE_CACHE else None
         }
 
 
@@ -0,0 +1,212 @@
+"""
+Кэш колонок индикаторов для подбора параметров
+Файл: src/ml/features/indicator_cache.py
+
+Раньше каждый trial HyperparameterOptimizer менял rsi_period, macd_fast,
+macd_slow, bb_period, atr_period у FeatureEngineer и заново считал все
+признаки, хотя значения параметров в trials в основном повторяются.
+
+✅ Колонки индикатора - по ключу (отпечаток данных, индикатор, параметры):
+   RSI(7) на датасете считается один раз, следующие trials берут его из кэша
+✅ Ядро признаков датасета считается один раз; матрица trial - ядро, в
+   котором заменены колонки индикаторов с другими параметрами и зависящие
+   от них лаги, взаимодействия и режимы
+✅ LRU по объему памяти (INDICATOR_CACHE_MAX_MB)
+
+Готовые матрицы не кэшируются: полный набор из пяти параметров в trials
+почти не повторяется, а матрица весит как все колонки индикаторов вместе.
+Колонки и матрица ядра общие для всех вызывающих - их нельзя изменять на месте.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ...core.config import config
+from ...logging.smart_logger import get_logger
+from .feature_cache import feature_config_hash
+from .feature_engineering import DEFAULT_INDICATOR_PARAMS, INDICATOR_PARAMS
+
+logger = get_logger(__name__)
+
+# (отпечаток данных, индикатор, значения параметров)
+ColumnKey = Tuple[str, str, Tuple[Any, ...]]
+
+
+def data_fingerprint(data: pd.DataFrame) -> str:
+    """Отпечаток датасета: другие бары или значения - другой отпечаток"""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:12]
+
+
+def _nbytes(columns: Dict[str, np.ndarray]) -> int:
+    return sum(column.nbytes for column in columns.values())
+
+
+class IndicatorColumnCache:
+    """
+    Колонки индикаторов для всего процесса (LRU по памяти)
+    """
+
+    def __init__(self, max_mb: Optional[float] = None):
+        self.max_bytes = int((max_mb or config.INDICATOR_CACHE_MAX_MB) * 1024 * 1024)
+
+        self._entries: 'OrderedDict[ColumnKey, Dict[str, np.ndarray]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'column_hits': 0,
+            'column_computes': 0,
+            'matrix_builds': 0,
+            'evictions': 0
+        }
+
+    def get(self, key: ColumnKey) -> Optional[Dict[str, np.ndarray]]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: ColumnKey, value: Dict[str, np.ndarray]):
+        size = _nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= _nbytes(self._entries.pop(key))
+            self._entries[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _nbytes(evicted)
+                self.stats['evictions'] += 1
+
+    def columns(self, key: ColumnKey,
+                compute: Callable[[], Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """Колонки индикатора: из кэша или compute() (один раз на ключ)"""
+        cached = self.get(key)
+        if cached is not None:
+            self.stats['column_hits'] += 1
+            return cached
+
+        columns = {name: np.asarray(column, dtype=np.float64) for name, column in compute().items()}
+        self.stats['column_computes'] += 1
+        self.put(key, columns)
+        return columns
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        with self._lock:
+            entries = len(self._entries)
+            memory = self._bytes
+        lookups = self.stats['column_hits'] + self.stats['column_computes']
+        return {
+            **self.stats,
+            'entries': entries,
+            'memory_mb': memory / 1024 / 1024,
+            'column_hit_rate': self.stats['column_hits'] / lookups if lookups else 0.0
+        }
+
+
+class IndicatorFeatureMatrix:
+    """
+    Матрицы признаков одного датасета под параметры индикаторов
+
+    Пример:
+        matrices = IndicatorFeatureMatrix(data, feature_engineer)
+        feature_engineer.rsi_period = 7
+        X = matrices.build(feature_engineer.indicator_params())
+    """
+
+    def __init__(self, data: pd.DataFrame, feature_engineer: Any,
+                 cache: Optional[IndicatorColumnCache] = None):
+        self.data = data
+        self.feature_engineer = feature_engineer
+        self.cache = cache or get_indicator_cache()
+
+        # Колонки зависят от данных и остальной конфигурации признаков
+        self.config_hash = feature_config_hash(feature_engineer.feature_config)
+        self.fingerprint = f"{data_fingerprint(data)}:{self.config_hash}"
+
+        # Ядро с текущими параметрами engineer: считается один раз на датасет
+        self.base_params = feature_engineer.indicator_params()
+        self.frame, _ = feature_engineer._compute_core_features(data.copy())
+        self.columns: List[str] = feature_engineer.get_feature_names(self.frame)
+        self.base = self._to_matrix(self.frame)
+
+    def matches(self, data: pd.DataFrame, feature_engineer: Any) -> bool:
+        """Матрицы подходят для этих данных и engineer"""
+        return (data is self.data
+                and feature_config_hash(feature_engineer.feature_config) == self.config_hash)
+
+    def _to_matrix(self, frame: pd.DataFrame) -> np.ndarray:
+        matrix = frame[self.columns].to_numpy(dtype=np.float64)
+        matrix[~np.isfinite(matrix)] = np.nan
+        return matrix
+
+    def build(self, params: Dict[str, int]) -> np.ndarray:
+        """
+        Матрица признаков (строки данных x self.columns) для параметров индикаторов
+
+        Считаются только колонки индикаторов с еще не встречавшимися
+        параметрами и зависящие от индикаторов производные признаки.
+        """
+        params = {**DEFAULT_INDICATOR_PARAMS, **params}
+        changed = [
+            indicator for indicator, names in INDICATOR_PARAMS.items()
+            if any(params[name] != self.base_params[name] for name in names)
+        ]
+        if not changed:
+            return self.base
+
+        engineer = self.feature_engineer
+        work = self.frame.copy()
+        for indicator in changed:
+            values = tuple(params[name] for name in INDICATOR_PARAMS[indicator])
+            columns = self.cache.columns(
+                (self.fingerprint, indicator, values),
+                lambda: engineer.indicator_columns(self.frame, indicator, params)
+            )
+            for name, column in columns.items():
+                work[name] = column
+
+        # Лаги, взаимодействия и режимы читают колонки индикаторов - пересчет по готовым
+        work = engineer._add_lag_features(work, engineer.feature_config['lags'])
+        work = engineer._add_interaction_features(work)
+        work = engineer._add_regime_features(work)
+
+        self.cache.stats['matrix_builds'] += 1
+        return self._to_matrix(work)
+
+
+# =================================================================
+# ГЛОБАЛЬНЫЕ ФУНКЦИИ
+# =================================================================
+
+# Глобальный экземпляр
+indicator_cache = None
+
+def get_indicator_cache() -> IndicatorColumnCache:
+    """Получить глобальный кэш колонок индикаторов"""
+    global indicator_cache
+
+    if indicator_cache is None:
+        indicator_cache = IndicatorColumnCache()
+
+    return indicator_cache
+
+# Экспорты
+__all__ = [
+    'IndicatorColumnCache',
+    'IndicatorFeatureMatrix',
+    'data_fingerprint',
+    'get_indicator_cache'
+]
@@ -0,0 +1,201 @@
+"""
+Векторизованные метки и целевые переменные по окнам "вперед"
+Файл: src/ml/labeling.py
+
+DataPipeline.create_labels и PriceLevelRegressor.prepare_target_data
+считали метки циклом Python со срезами .iloc на каждой строке - O(n·w)
+интерпретируемых операций, что занимало большую часть подготовки данных.
+
+Здесь те же величины считаются целиком по массивам:
+✅ Среднее следующих w баров - через кумулятивные суммы, O(n)
+✅ Максимум high / минимум low следующих w баров - через
+   sliding_window_view (страйды, без копирования)
+✅ Волатильность предыдущих баров - кумулятивные суммы доходностей
+✅ Классы направления по порогам
+
+Соглашение: значение в позиции i описывает бары i+1 ... i+window.
+Там, где будущих баров не хватает, возвращается NaN - вызывающий код
+сам решает, чем заполнять хвост.
+"""
+from typing import Tuple, Union
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+ArrayLike = Union[np.ndarray, pd.Series]
+
+# Классы направления (как в DataPipeline.create_labels)
+LABEL_DOWN = 0
+LABEL_NEUTRAL = 1
+LABEL_UP = 2
+
+
+def _as_float_array(values: ArrayLike) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+# =================================================================
+# ОКНА ВПЕРЕД
+# =================================================================
+
+def forward_mean(values: ArrayLike, window: int) -> np.ndarray:
+    """Среднее values[i+1 : i+window+1] для каждого i"""
+    values = _as_float_array(values)
+    n = len(values)
+    result = np.full(n, np.nan)
+    if window <= 0 or n <= window:
+        return result
+
+    # Центрирование уменьшает потерю точности в длинных кумулятивных суммах
+    base = values[0]
+    cumsum = np.concatenate(([0.0], np.cumsum(values - base)))
+    sums = cumsum[window + 1:] - cumsum[1:n - window + 1]
+    result[:n - window] = sums / window + base
+    return result
+
+
+def forward_max(values: ArrayLike, window: int) -> np.ndarray:
+    """Максимум values[i+1 : i+window+1] для каждого i"""
+    values = _as_float_array(values)
+    n = len(values)
+    result = np.full(n, np.nan)
+    if window <= 0 or n <= window:
+        return result
+
+    result[:n - window] = sliding_window_view(values[1:], window).max(axis=1)
+    return result
+
+
+def forward_min(values: ArrayLike, window: int) -> np.ndarray:
+    """Минимум values[i+1 : i+window+1] для каждого i"""
+    values = _as_float_array(values)
+    n = len(values)
+    result = np.full(n, np.nan)
+    if window <= 0 or n <= window:
+        return result
+
+    result[:n - window] = sliding_window_view(values[1:], window).min(axis=1)
+    return result
+
+
+def forward_value(values: ArrayLike, horizon: int) -> np.ndarray:
+    """values[i+horizon] для каждого i"""
+    values = _as_float_array(values)
+    n = len(values)
+    result = np.full(n, np.nan)
+    if horizon <= 0 or n <= horizon:
+        return result
+
+    result[:n - horizon] = values[horizon:]
+    return result
+
+
+def forward_return(close: ArrayLike, horizon: int) -> np.ndarray:
+    """Относительное изменение цены через horizon баров"""
+    close = _as_float_array(close)
+    return (forward_value(close, horizon) - close) / close
+
+
+# =================================================================
+# ОКНА НАЗАД
+# =================================================================
+
+def trailing_volatility(close: ArrayLike, lookback: int = 20) -> np.ndarray:
+    """
+    Стандартное отклонение доходностей по close[max(0, i-lookback) : i]
+
+    Совпадает с close.iloc[max(0, i-lookback):i].pct_change().std():
+    текущий бар не входит, нужно хотя бы 2 доходности (ddof=1).
+    """
+    close = _as_float_array(close)
+    n = len(close)
+    result = np.full(n, np.nan)
+    if n < 3:
+        return result
+
+    # returns[j] = close[j] / close[j-1] - 1, j >= 1
+    returns = np.zeros(n)
+    returns[1:] = close[1:] / close[:-1] - 1
+    cumsum = np.concatenate(([0.0], np.cumsum(returns)))
+    cumsum_sq = np.concatenate(([0.0], np.cumsum(returns * returns)))
+
+    # Доходности окна: returns[start : i], start = max(1, i - lookback + 1)
+    i = np.arange(n)
+    start = np.maximum(1, i - lookback + 1)
+    count = i - start
+    valid = count >= 2
+
+    i, start, count = i[valid], start[valid], count[valid]
+    total = cumsum[i] - cumsum[start]
+    total_sq = cumsum_sq[i] - cumsum_sq[start]
+    variance = (total_sq - total * total / count) / (count - 1)
+    result[i] = np.sqrt(np.maximum(variance, 0.0))
+    return result
+
+
+# =================================================================
+# МЕТКИ
+# =================================================================
+
+def classify_change(change: ArrayLike, threshold: float) -> np.ndarray:
+    """
+    Классы направления: 0 - down (< -threshold), 2 - up (> threshold), иначе 1
+
+    NaN в change остается NaN (хвост без будущих баров).
+    """
+    change = _as_float_array(change)
+    labels = np.where(change < -threshold, LABEL_DOWN,
+                      np.where(change > threshold, LABEL_UP, LABEL_NEUTRAL)).astype(np.float64)
+    labels[np.isnan(change)] = np.nan
+    return labels
+
+
+def mean_change_labels(close: ArrayLike, window: int, threshold: float = 0.002) -> np.ndarray:
+    """Классы по изменению среднего следующих window баров относительно текущей цены"""
+    close = _as_float_array(close)
+    return classify_change((forward_mean(close, window) - close) / close, threshold)
+
+
+def direction_labels(close: ArrayLike, horizon: int, threshold: float = 0.002) -> np.ndarray:
+    """Классы по изменению цены через horizon баров"""
+    return classify_change(forward_return(close, horizon), threshold)
+
+
+def price_level_targets(high: ArrayLike, low: ArrayLike, close: ArrayLike,
+                        window: int = 100, lookback: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Целевые уровни TP/SL (в %) для PriceLevelRegressor
+
+    TP = min(70% максимального роста high за window баров, 2.5 волатильности)
+    SL = min(50% максимального падения low за window баров, 1.5 волатильности)
+    Если волатильность не определена - используется только движение цены.
+    """
+    close = _as_float_array(close)
+    max_profit = (forward_max(high, window) - close) / close * 100
+    max_loss = (forward_min(low, window) - close) / close * 100
+    volatility = trailing_volatility(close, lookback) * 100
+
+    # min(a, b) в Python: b только если b < a (NaN волатильности -> a)
+    tp_move, tp_vol = max_profit * 0.7, volatility * 2.5
+    sl_move, sl_vol = np.abs(max_loss) * 0.5, volatility * 1.5
+    tp = np.where(tp_vol < tp_move, tp_vol, tp_move)
+    sl = np.where(sl_vol < sl_move, sl_vol, sl_move)
+    return tp, sl
+
+
+__all__ = [
+    'LABEL_DOWN',
+    'LABEL_NEUTRAL',
+    'LABEL_UP',
+    'forward_mean',
+    'forward_max',
+    'forward_min',
+    'forward_value',
+    'forward_return',
+    'trailing_volatility',
+    'classify_change',
+    'mean_change_labels',
+    'direction_labels',
+    'price_level_targets'
+]
@@ -35,4 +35,12 @@ try:
     from .reinforcement import TradingRLAgent
     __all__.append('TradingRLAgent')
 except ImportError:
-    TradingRLAgent = None
\ No newline at end of file
+    TradingRLAgent = None
+
+try:
+    from .registry import ModelRegistry, ModelVersion, get_model_registry
+    __all__.extend(['ModelRegistry', 'ModelVersion', 'get_model_registry'])
+except ImportError:
+    ModelRegistry = None
+    ModelVersion = None
+    get_model_registry = None
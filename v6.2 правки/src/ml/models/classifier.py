@@ -7,6 +7,7 @@ import pandas as pd
 from typing import Dict, List, Tuple, Optional, Any
 import joblib
 import json
+import time
 from datetime import datetime
 from pathlib import Path
 
@@ -20,8 +21,14 @@ import xgboost as xgb
 import optuna
 
 from sqlalchemy.orm import Session
+from ...core.config import Config
 from ...core.database import SessionLocal
 from ...logging.smart_logger import SmartLogger
+from .registry import get_model_registry
+from .incremental import (
+    FeatureDriftReference, can_continue, check_drift, continue_fit,
+    has_all_classes, index_label, new_rows_mask
+)
 
 
 class DirectionClassifier:
@@ -38,6 +45,8 @@ class DirectionClassifier:
         self.selected_features = None
         self.model_params = {}
         self.performance_metrics = {}
+        # Состояние для дообучения: последний обученный бар, эталон дрейфа
+        self.incremental_state = {}
         self.logger = SmartLogger(f"ml.{name}")
         
         # Директория для сохранения моделей
@@ -232,10 +241,20 @@ class DirectionClassifier:
     
     def train(self, X_train: pd.DataFrame, y_train: pd.Series,
               X_val: Optional[pd.DataFrame] = None, y_val: Optional[pd.Series] = None,
-              optimize_params: bool = True, select_features: bool = True) -> Dict[str, float]:
+              optimize_params: bool = True, select_features: bool = True,
+              incremental: bool = False) -> Dict[str, float]:
         """
         Обучение модели
+        
+        incremental=True: X_train - все окно обучения, модель дообучается
+        только на барах после последнего обучения (см. _train_incremental);
+        полное обучение - если проверка дрейфа требует переобучения с нуля
         """
+        if incremental:
+            metrics = self._train_incremental(X_train, y_train, X_val, y_val)
+            if metrics is not None:
+                return metrics
+        
         self.logger.info(
             f"Начинаем обучение модели {self.name}",
             category='ml',
@@ -263,6 +282,9 @@ class DirectionClassifier:
                 self.model = MLPClassifier(**self.model_params, activation='relu', 
                                          solver='adam', max_iter=500, random_state=42)
         
+        # Эталон дрейфа - по всем признакам: полное переобучение заново их отбирает
+        X_reference = X_train
+        
         # Выбор признаков
         if select_features:
             self.select_features(X_train, y_train)
@@ -276,17 +298,20 @@ class DirectionClassifier:
             X_val_scaled = self.scaler.transform(X_val)
         
         # Обучение
-        with self.logger.timer("model_training", category="ml"):
-            if self.model_type == 'xgboost' and X_val is not None:
-                # XGBoost с early stopping
-                self.model.fit(
-                    X_train_scaled, y_train,
-                    eval_set=[(X_val_scaled, y_val)],
-                    early_stopping_rounds=20,
-                    verbose=False
-                )
-            else:
-                self.model.fit(X_train_scaled, y_train)
+        start = time.perf_counter()
+        if self.model_type == 'xgboost' and X_val is not None:
+            # XGBoost с early stopping (в xgboost >= 2 - параметр модели, не fit)
+            self.model.set_params(early_stopping_rounds=20)
+            self.model.fit(
+                X_train_scaled, y_train,
+                eval_set=[(X_val_scaled, y_val)],
+                verbose=False
+            )
+        else:
+            if self.model_type == 'xgboost':
+                self.model.set_params(early_stopping_rounds=None)
+            self.model.fit(X_train_scaled, y_train)
+        training_seconds = round(time.perf_counter() - start, 3)
         
         # Оценка производительности
         train_metrics = self.evaluate(X_train, y_train)
@@ -300,20 +325,116 @@ class DirectionClassifier:
                 f"Обучение завершено. Val accuracy: {val_metrics['accuracy']:.4f}",
                 category='ml',
                 train_metrics=train_metrics,
-                val_metrics=val_metrics
+                val_metrics=val_metrics,
+                training_seconds=training_seconds
             )
         else:
             self.logger.info(
                 f"Обучение завершено. Train accuracy: {train_metrics['accuracy']:.4f}",
                 category='ml',
-                train_metrics=train_metrics
+                train_metrics=train_metrics,
+                training_seconds=training_seconds
             )
         
+        # Эталон для следующих дообучений
+        val_metrics = self.performance_metrics.get('validation', {})
+        self.performance_metrics.pop('incremental', None)
+        previous = self.incremental_state.get('last_decision', {}) if incremental else {}
+        self.incremental_state = {
+            'trained_until': index_label(X_train.index[-1]),
+            'updates': 0,
+            'bars': len(X_train),
+            'baseline_accuracy': val_metrics.get('accuracy'),
+            'drift_features': X_reference.columns.tolist(),
+            'drift_reference': FeatureDriftReference.fit(X_reference).to_dict(),
+            # Причина полного обучения - от проверки дрейфа (если была)
+            'last_decision': {**previous, 'mode': 'full', 'bars': len(X_train)}
+        }
+        
         # Сохраняем модель
         self.save_model()
         
         return self.performance_metrics
     
+    def _train_incremental(self, X: pd.DataFrame, y: pd.Series,
+                           X_val: Optional[pd.DataFrame] = None,
+                           y_val: Optional[pd.Series] = None) -> Optional[Dict[str, float]]:
+        """
+        Дообучение на барах после последнего обучения
+        
+        ✅ Отбор признаков и scaler - от полного обучения
+        ✅ Меньше INCREMENTAL_MIN_BARS новых баров - модель не меняется
+        ✅ Перед дообучением - проверка дрейфа (PSI всех признаков окна,
+           точность модели на новых барах против валидации полного обучения)
+        
+        Returns:
+            Метрики; None - нужно полное обучение на всем окне
+        """
+        state = self.incremental_state
+        if not state or not can_continue(self.model):
+            self.logger.info("Дообучение невозможно: нет обученной модели", category='ml')
+            return None
+        
+        mask = new_rows_mask(X.index, state.get('trained_until'))
+        X_new, y_new = X[mask], y[mask]
+        X_drift = X_new[state.get('drift_features') or X_new.columns]
+        if self.selected_features:
+            X_new = X_new[self.selected_features]
+        
+        decision = {'mode': 'skipped', 'bars': len(X_new)}
+        if len(X_new) < Config.INCREMENTAL_MIN_BARS or not has_all_classes(self.model, y_new):
+            state['last_decision'] = decision
+            self.logger.info(
+                f"Дообучение отложено: новых баров {len(X_new)}",
+                category='ml',
+                new_bars=len(X_new)
+            )
+            return self.performance_metrics
+        
+        # Качество текущей модели на новых барах (до дообучения)
+        baseline = state.get('baseline_accuracy')
+        score_drop = None
+        if baseline:
+            accuracy = accuracy_score(y_new, self.predict(X_new))
+            score_drop = (baseline - accuracy) / baseline
+        
+        drift = check_drift(
+            FeatureDriftReference.from_dict(state.get('drift_reference')),
+            X_drift, score_drop, state.get('updates', 0)
+        )
+        decision.update(drift)
+        if drift['full_retrain']:
+            state['last_decision'] = decision
+            self.logger.info(
+                f"Полное переобучение: {drift['reason']}",
+                category='ml',
+                **drift
+            )
+            return None
+        
+        start = time.perf_counter()
+        continue_fit(self.model, self.scaler.transform(X_new), np.asarray(y_new), state.get('bars'))
+        
+        decision['mode'] = 'incremental'
+        decision['training_seconds'] = round(time.perf_counter() - start, 3)
+        state['trained_until'] = index_label(X_new.index[-1])
+        state['updates'] = state.get('updates', 0) + 1
+        state['last_decision'] = decision
+        
+        self.performance_metrics['incremental'] = self.evaluate(X_new, y_new)
+        if X_val is not None:
+            self.performance_metrics['validation'] = self.evaluate(X_val, y_val)
+        
+        self.logger.info(
+            f"Модель дообучена на {len(X_new)} новых барах",
+            category='ml',
+            **decision
+        )
+        
+        self.save_model()
+        
+        return self.performance_metrics
+    
     def predict(self, X: pd.DataFrame) -> np.ndarray:
         """Предсказание классов"""
         if self.model is None:
@@ -388,48 +509,66 @@ class DirectionClassifier:
             return pd.DataFrame()
     
     def save_model(self, version: Optional[str] = None):
-        """Сохраняет модель и метаданные"""
-        if version is None:
-            version = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        model_path = self.models_dir / f"model_{version}.pkl"
-        scaler_path = self.models_dir / f"scaler_{version}.pkl"
-        metadata_path = self.models_dir / f"metadata_{version}.json"
-        
-        # Сохраняем модель и препроцессоры
-        joblib.dump(self.model, model_path)
-        joblib.dump(self.scaler, scaler_path)
-        if self.feature_selector:
-            selector_path = self.models_dir / f"selector_{version}.pkl"
-            joblib.dump(self.feature_selector, selector_path)
-        
-        # Сохраняем метаданные
-        metadata = {
-            'name': self.name,
-            'model_type': self.model_type,
-            'version': version,
-            'created_at': datetime.now().isoformat(),
-            'model_params': self.model_params,
-            'selected_features': self.selected_features,
-            'performance_metrics': self.performance_metrics,
-            'feature_importance': self.get_feature_importance().to_dict() if hasattr(self.model, 'feature_importances_') else {}
-        }
-        
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
-        
-        # Сохраняем в БД
-        self._save_to_database(version, metadata)
+        """Сохраняет модель, препроцессоры и метаданные в реестр моделей"""
+        val_metrics = self.performance_metrics.get('validation',
+                                                   self.performance_metrics.get('train', {}))
+        
+        info = get_model_registry().save(
+            self.name,
+            {
+                'model': self.model,
+                'scaler': self.scaler,
+                'feature_selector': self.feature_selector
+            },
+            model_type=self.model_type,
+            metrics=val_metrics,
+            params=self.model_params,
+            metadata={
+                'selected_features': self.selected_features,
+                'performance_metrics': self.performance_metrics,
+                'incremental': self.incremental_state
+            },
+            feature_importance=self.get_feature_importance().to_dict() if hasattr(self.model, 'feature_importances_') else {},
+            version=version
+        )
         
         self.logger.info(
-            f"Модель сохранена: {model_path}",
+            f"Модель сохранена: {info.path}",
             category='ml',
-            version=version,
+            version=info.version,
             metrics=self.performance_metrics
         )
     
     def load_model(self, version: Optional[str] = None):
-        """Загружает модель"""
+        """Загружает модель (из реестра, иначе из файлов старого формата)"""
+        registry = get_model_registry()
+        info = registry.get_version(self.name, version)
+        if info is None:
+            self._load_legacy_model(version)
+            return
+        
+        # Своя копия: train() дообучает self.model на месте
+        artifact = registry.load(self.name, info.version, mmap=False)
+        if artifact is None:
+            raise ValueError(f"Не удалось загрузить модель {self.name} версии {info.version}")
+        
+        self.model = artifact['model']
+        self.scaler = artifact['scaler']
+        self.feature_selector = artifact['feature_selector']
+        self.model_params = info.params
+        self.selected_features = info.metadata.get('selected_features', [])
+        self.performance_metrics = info.metadata.get('performance_metrics', {})
+        self.incremental_state = info.metadata.get('incremental', {})
+        
+        self.logger.info(
+            f"Модель загружена: версия {info.version}",
+            category='ml',
+            version=info.version,
+            metrics=self.performance_metrics
+        )
+    
+    def _load_legacy_model(self, version: Optional[str] = None):
+        """Загружает модель старого формата (model_/scaler_/metadata_{version} в models_dir)"""
         if version is None:
             # Загружаем последнюю версию
             model_files = list(self.models_dir.glob("model_*.pkl"))
@@ -464,67 +603,4 @@ class DirectionClassifier:
             category='ml',
             version=version,
             metrics=self.performance_metrics
-        )
-    
-    def _save_to_database(self, version: str, metadata: Dict):
-        """Сохраняет информацию о модели в БД"""
-        from ...core.models import Base
-        from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Boolean
-        
-        # Модель для БД (если еще не создана)
-        class MLModel(Base):
-            __tablename__ = "ml_models"
-            
-            id = Column(Integer, primary_key=True, index=True)
-            name = Column(String(100), nullable=False)
-            model_type = Column(String(50), nullable=False)
-            version = Column(String(50), nullable=False)
-            accuracy = Column(Float)
-            precision_score = Column(Float)
-            recall_score = Column(Float)
-            f1_score = Column(Float)
-            created_at = Column(DateTime, default=datetime.utcnow)
-            updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-            parameters = Column(JSON)
-            feature_importance = Column(JSON)
-            training_history = Column(JSON)
-            is_active = Column(Boolean, default=True)
-        
-        db = SessionLocal()
-        try:
-            # Деактивируем предыдущие версии
-            db.query(MLModel).filter(
-                MLModel.name == self.name,
-                MLModel.is_active == True
-            ).update({'is_active': False})
-            
-            # Создаем новую запись
-            val_metrics = metadata['performance_metrics'].get('validation', 
-                                                             metadata['performance_metrics'].get('train', {}))
-            
-            db_model = MLModel(
-                name=self.name,
-                model_type=self.model_type,
-                version=version,
-                accuracy=val_metrics.get('accuracy'),
-                precision_score=val_metrics.get('precision'),
-                recall_score=val_metrics.get('recall'),
-                f1_score=val_metrics.get('f1_score'),
-                parameters=self.model_params,
-                feature_importance=metadata.get('feature_importance', {}),
-                training_history=self.performance_metrics,
-                is_active=True
-            )
-            
-            db.add(db_model)
-            db.commit()
-            
-        except Exception as e:
-            db.rollback()
-            self.logger.error(
-                f"Ошибка сохранения модели в БД: {e}",
-                category='ml',
-                error=str(e)
-            )
-        finally:
-            db.close()
\ No newline at end of file
+        )
\ No newline at end of file
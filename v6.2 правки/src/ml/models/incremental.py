@@ -0,0 +1,296 @@
+"""
+Инкрементальное дообучение ML моделей
+Файл: src/ml/models/incremental.py
+
+Раньше DirectionClassifier.train и PriceLevelRegressor.train каждый раз
+обучали модели с нуля на всем окне ML_LOOKBACK_HOURS (и по умолчанию
+заново подбирали гиперпараметры), даже если с прошлого обучения
+добавилось несколько сотен баров.
+
+Инкрементальный режим:
+✅ Только бары после последнего обучения (trained_until в метаданных версии)
+✅ Продолжение бустинга от прежнего booster (XGBoost: xgb_model,
+   LightGBM: init_model), partial_fit для моделей с ним (MLP),
+   warm_start с новыми деревьями для ансамблей sklearn
+✅ Препроцессоры (масштабирование, отбор признаков) остаются от полного
+   обучения - новые деревья строятся в том же пространстве признаков
+✅ Проверка дрейфа решает, нужно ли полное переобучение: PSI признаков
+   новых баров относительно выборки полного обучения, падение качества
+   модели на новых барах, число дообучений подряд
+
+PSI короткого отрезка признаков с автокорреляцией (средние, уровни цены,
+волатильность) велик и без смены режима: отрезок в день занимает часть
+диапазона окна (уровни цены после пробоя - все в крайней корзине).
+Поэтому порог каждого признака - наибольший PSI отрезков той же длины
+внутри окна обучения: дрейф только там, где новые бары отличаются
+сильнее, чем любой отрезок истории. Признаки, у которых отрезки окна уже
+достигают максимума PSI (уровни цены, скользящие средние), о дрейфе не
+говорят ничего и в долю дрейфующих не входят.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ...core.config import Config
+
+PSI_BINS = 10
+PSI_EPSILON = 1e-4
+# Параметры, которые continue_fit меняет на время дообучения
+RESTORED_PARAMS = ('n_estimators', 'early_stopping_rounds', 'warm_start')
+# Запас над наибольшим PSI отрезков окна (уровни цены упираются в максимум PSI)
+PSI_LIMIT_MARGIN = 1.1
+
+
+# =================================================================
+# ДРЕЙФ ПРИЗНАКОВ
+# =================================================================
+
+class FeatureDriftReference:
+    """
+    Распределение признаков выборки полного обучения - эталон для PSI
+
+    Границы корзин - квантили каждого признака, limits - пороги PSI
+    признаков по отрезкам окна; хранится в метаданных версии модели
+    (to_dict/from_dict, только списки чисел).
+    """
+
+    def __init__(self, edges: List[List[float]], expected: List[List[float]],
+                 limits: Optional[List[float]] = None):
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        self.expected = [np.asarray(p, dtype=np.float64) for p in expected]
+        self.limits = np.asarray(limits if limits is not None else np.zeros(len(edges)), dtype=np.float64)
+
+    @classmethod
+    def fit(cls, X: Any, bins: int = PSI_BINS,
+            segment: Optional[int] = None) -> 'FeatureDriftReference':
+        """
+        Эталон по матрице признаков (строки - бары)
+
+        segment: длина отрезков окна для порогов PSI (по умолчанию
+        INCREMENTAL_MIN_BARS - самые короткие порции новых баров)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        segment = segment or Config.INCREMENTAL_MIN_BARS
+        n_segments = len(X) // segment
+        segment_ids = np.arange(n_segments * segment) // segment
+        quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+
+        edges, expected, limits = [], [], np.zeros(X.shape[1])
+        for i, column in enumerate(X.T):
+            finite = np.isfinite(column)
+            inner = np.unique(np.quantile(column[finite], quantiles)) if finite.any() else np.array([])
+            shares = _bin_shares(column[finite], inner)
+            edges.append(inner)
+            expected.append(shares)
+
+            # PSI всех отрезков окна разом: корзины баров считаются один раз
+            if n_segments:
+                n_bins = len(inner) + 1
+                codes = segment_ids * n_bins + np.searchsorted(inner, column[:len(segment_ids)], side='right')
+                counts = np.bincount(codes[finite[:len(segment_ids)]], minlength=n_segments * n_bins)
+                counts = counts.reshape(n_segments, n_bins)
+                actual = np.clip(counts / np.maximum(counts.sum(axis=1, keepdims=True), 1), PSI_EPSILON, None)
+                limits[i] = np.max(np.sum((actual - shares) * np.log(actual / shares), axis=1))
+        return cls(edges, expected, limits)
+
+    def psi(self, X: Any) -> np.ndarray:
+        """Population Stability Index каждого признака новых баров"""
+        X = np.asarray(X, dtype=np.float64)
+        values = np.zeros(len(self.edges))
+        for i, (inner, expected) in enumerate(zip(self.edges, self.expected)):
+            column = X[:, i]
+            actual = _bin_shares(column[np.isfinite(column)], inner)
+            values[i] = np.sum((actual - expected) * np.log(actual / expected))
+        return values
+
+    def max_psi(self) -> np.ndarray:
+        """Наибольший возможный PSI признака: все значения в одной корзине"""
+        values = np.zeros(len(self.expected))
+        for i, expected in enumerate(self.expected):
+            rest = np.sum((PSI_EPSILON - expected) * np.log(PSI_EPSILON / expected))
+            own = (1 - expected) * np.log(1 / expected) - (PSI_EPSILON - expected) * np.log(PSI_EPSILON / expected)
+            values[i] = rest + own.max()
+        return values
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'edges': [e.tolist() for e in self.edges],
+            'expected': [p.tolist() for p in self.expected],
+            'limits': self.limits.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional['FeatureDriftReference']:
+        if not data:
+            return None
+        return cls(data['edges'], data['expected'], data.get('limits'))
+
+
+def _bin_shares(values: np.ndarray, inner: np.ndarray) -> np.ndarray:
+    """Доли значений по корзинам (крайние корзины открыты)"""
+    counts = np.bincount(np.searchsorted(inner, values, side='right'), minlength=len(inner) + 1)
+    shares = counts / max(len(values), 1)
+    return np.clip(shares, PSI_EPSILON, None)
+
+
+def check_drift(reference: Optional[FeatureDriftReference], X_new: Any,
+                score_drop: Optional[float], updates: int) -> Dict[str, Any]:
+    """
+    Решение: дообучить на новых барах или переобучить с нуля
+
+    Args:
+        reference: Эталон признаков последнего полного обучения
+        X_new: Признаки новых баров (те же колонки, что в эталоне)
+        score_drop: Относительное ухудшение метрики модели на новых барах
+            по сравнению с валидацией полного обучения (None - не оценено)
+        updates: Дообучений после последнего полного обучения
+
+    Returns:
+        {'full_retrain', 'reason', 'drift_share', 'score_drop', 'updates'}
+    """
+    decision = {
+        'full_retrain': False,
+        'reason': None,
+        'drift_share': None,
+        'score_drop': score_drop,
+        'updates': updates
+    }
+
+    if reference is None:
+        decision.update(full_retrain=True, reason='no_reference')
+        return decision
+
+    psi = reference.psi(X_new)
+    limits = np.maximum(reference.limits * PSI_LIMIT_MARGIN, Config.INCREMENTAL_PSI_THRESHOLD)
+    informative = limits < reference.max_psi()
+    decision['drift_share'] = float(np.mean(psi[informative] > limits[informative])) if informative.any() else 0.0
+
+    if decision['drift_share'] > Config.INCREMENTAL_DRIFT_SHARE:
+        decision.update(full_retrain=True, reason='feature_drift')
+    elif score_drop is not None and score_drop > Config.INCREMENTAL_MAX_SCORE_DROP:
+        decision.update(full_retrain=True, reason='score_drop')
+    elif updates >= Config.INCREMENTAL_MAX_UPDATES:
+        decision.update(full_retrain=True, reason='max_updates')
+    return decision
+
+
+# =================================================================
+# НОВЫЕ БАРЫ
+# =================================================================
+
+def new_rows_mask(index: pd.Index, trained_until: Any) -> np.ndarray:
+    """Строки после последнего обученного бара (индекс упорядочен по времени)"""
+    if trained_until is None:
+        return np.ones(len(index), dtype=bool)
+    if isinstance(index, pd.DatetimeIndex):
+        trained_until = pd.Timestamp(trained_until)
+    return np.asarray(index > trained_until)
+
+
+def index_label(value: Any) -> Any:
+    """Метка бара для метаданных (JSON)"""
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+# =================================================================
+# ДООБУЧЕНИЕ
+# =================================================================
+
+def can_continue(model: Any) -> bool:
+    """Модель обучена и умеет продолжить обучение"""
+    if model is None:
+        return False
+    if hasattr(model, 'get_booster'):  # XGBoost
+        try:
+            model.get_booster()
+            return True
+        except Exception:
+            return False
+    if hasattr(model, 'booster_'):  # LightGBM
+        try:
+            return model.booster_ is not None
+        except Exception:
+            return False
+    if hasattr(model, 'partial_fit'):
+        return hasattr(model, 'n_iter_') or hasattr(model, 'coefs_')
+    return 'warm_start' in model.get_params() and hasattr(model, 'estimators_')
+
+
+def tree_count(model: Any) -> int:
+    """Деревьев (итераций бустинга) в модели; 0 - не ансамбль деревьев"""
+    if hasattr(model, 'get_booster'):
+        try:
+            return model.best_iteration + 1
+        except AttributeError:
+            return model.get_booster().num_boosted_rounds()
+    if hasattr(model, 'booster_'):
+        return model.booster_.current_iteration()
+    return len(getattr(model, 'estimators_', []))
+
+
+def continue_fit(model: Any, X: np.ndarray, y: np.ndarray,
+                 trained_bars: Optional[int] = None, epochs: Optional[int] = None) -> Any:
+    """
+    Дообучает модель только на новых данных
+
+    Новых деревьев - столько же на бар, сколько в полном обучении на
+    trained_bars барах (не больше INCREMENTAL_ROUNDS): стоимость
+    дообучения пропорциональна новым барам, а не числу раундов.
+
+    ✅ XGBoost: новые деревья поверх прежнего booster (после early stopping -
+       от лучшей итерации)
+    ✅ LightGBM: init_model - прежний booster
+    ✅ partial_fit: epochs проходов по новым данным
+    ✅ warm_start (RandomForest, GradientBoosting): новые деревья
+
+    Параметры модели (n_estimators, early stopping, warm_start) после
+    дообучения возвращаются прежние: следующее полное обучение той же
+    модели идет с исходными настройками.
+
+    Returns:
+        Та же модель (дообученная на месте)
+    """
+    params = model.get_params()
+    restore = {name: params[name] for name in RESTORED_PARAMS if name in params}
+    rounds = Config.INCREMENTAL_ROUNDS
+    if trained_bars:
+        rounds = int(np.clip(np.ceil(tree_count(model) * len(X) / trained_bars), 1, rounds))
+    epochs = epochs or Config.INCREMENTAL_EPOCHS
+
+    if hasattr(model, 'get_booster'):
+        booster = model.get_booster()
+        try:
+            booster = booster[:model.best_iteration + 1]
+        except AttributeError:
+            pass  # без early stopping - все деревья
+        model.set_params(n_estimators=rounds, early_stopping_rounds=None)
+        model.fit(X, y, xgb_model=booster, verbose=False)
+
+    elif hasattr(model, 'booster_'):
+        booster = model.booster_
+        model.set_params(n_estimators=rounds)
+        model.fit(X, y, init_model=booster)
+
+    elif hasattr(model, 'partial_fit'):
+        for _ in range(epochs):
+            model.partial_fit(X, y)
+
+    else:
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + rounds)
+        model.fit(X, y)
+
+    model.set_params(**restore)
+    return model
+
+
+def has_all_classes(model: Any, y: np.ndarray) -> bool:
+    """Новые бары содержат все классы модели (иначе бустинг не продолжить)"""
+    classes = getattr(model, 'classes_', None)
+    if classes is None:
+        return True
+    return set(np.asarray(classes).tolist()) <= set(np.unique(y).tolist())
@@ -0,0 +1,613 @@
+"""
+Реестр ML моделей
+Файл: src/ml/models/registry.py
+
+Раньше каждая модель сохранялась по-своему (pickle в MLTrainer,
+joblib в DirectionClassifier/PriceLevelRegressor, torch.save в RL агенте),
+а MLTrainer читал pickle с диска на пути первого предсказания.
+
+Реестр:
+✅ Единое хранилище: {MODEL_REGISTRY_DIR}/{name}/{version}/artifact.* + metadata.json
+✅ Версии и активная версия (файл ACTIVE), запись метаданных в таблицу ml_models
+✅ Артефакты pickle (протокол 5): крупные буферы numpy вынесены в buffers.bin
+   и читаются одним вызовом, мелкие - внутри pickle. Через mmap (лениво, без
+   копирования) - только буферы от MODEL_REGISTRY_MMAP_MIN_MB: на типичных
+   ансамблях (единицы МБ) отображение файла медленнее чтения в память.
+   joblib с mmap_mode на моделях-ансамблях (сотни мелких массивов деревьев)
+   загружался медленнее обычного pickle
+✅ LRU кэш загруженных моделей с лимитом памяти (MODEL_REGISTRY_MEMORY_MB)
+✅ Прогрев при старте: активные модели загружаются параллельно в потоках
+"""
+import asyncio
+import json
+import mmap as mmap_module
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ...core.config import Config
+from ...core.database import SessionLocal
+from ...core.models import MLModel
+from ...logging.smart_logger import SmartLogger
+
+logger = SmartLogger(__name__)
+
+ACTIVE_FILE = 'ACTIVE'
+METADATA_FILE = 'metadata.json'
+BUFFERS_FILE = 'buffers.bin'
+ARTIFACT_FILES = {
+    'pickle': 'artifact.pkl',
+    'torch': 'artifact.pt'
+}
+
+# Буферы меньше этого размера остаются внутри pickle
+MMAP_MIN_BYTES = 64 * 1024
+BUFFER_ALIGNMENT = 64
+
+# (name, version)
+ModelKey = Tuple[str, str]
+
+
+@dataclass
+class ModelVersion:
+    """Метаданные версии модели (содержимое metadata.json)"""
+    name: str
+    version: str
+    model_type: str
+    format: str
+    path: Path
+    size_bytes: int
+    created_at: str
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    params: Dict[str, Any] = field(default_factory=dict)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # (смещение, размер) внешних буферов в buffers.bin
+    buffers: List[List[int]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'version': self.version,
+            'model_type': self.model_type,
+            'format': self.format,
+            'path': str(self.path),
+            'size_bytes': self.size_bytes,
+            'created_at': self.created_at,
+            'metrics': self.metrics,
+            'params': self.params,
+            'metadata': self.metadata,
+            'buffers': self.buffers
+        }
+
+
+def _jsonable(value: Any) -> Any:
+    """Значение, которое можно записать в JSON (остальное - строкой)"""
+    return json.loads(json.dumps(value, default=str))
+
+
+def _new_version() -> str:
+    """Версия по времени: 20240101_120000_123 (влезает в ml_models.version)"""
+    now = datetime.utcnow()
+    return now.strftime('%Y%m%d_%H%M%S_') + f'{now.microsecond // 1000:03d}'
+
+
+class ModelRegistry:
+    """
+    Версионированное хранилище моделей с LRU кэшем в памяти
+
+    Объекты из get() общие для всех вызывающих: у загруженных через mmap
+    массивы numpy только для чтения. Для изменения модели на месте
+    используйте load(..., mmap=False).
+    """
+
+    def __init__(self, root: Optional[str] = None, memory_mb: Optional[float] = None,
+                 mmap: Optional[bool] = None, mmap_min_mb: Optional[float] = None,
+                 use_database: bool = True):
+        self.root = Path(root if root is not None else Config.MODEL_REGISTRY_DIR)
+        memory_mb = memory_mb if memory_mb is not None else Config.MODEL_REGISTRY_MEMORY_MB
+        self.memory_limit = int(memory_mb * 1024 * 1024)
+        self.mmap = Config.MODEL_REGISTRY_MMAP if mmap is None else mmap
+        mmap_min_mb = mmap_min_mb if mmap_min_mb is not None else Config.MODEL_REGISTRY_MMAP_MIN_MB
+        self.mmap_min_bytes = int(mmap_min_mb * 1024 * 1024)
+        self.use_database = use_database
+
+        # LRU: (name, version) -> (объект, размер артефакта)
+        self._cache: 'OrderedDict[ModelKey, Tuple[Any, int]]' = OrderedDict()
+        self._memory = 0
+        self._lock = threading.RLock()
+        self._load_locks: Dict[ModelKey, threading.Lock] = {}
+        # name -> (mtime_ns файла ACTIVE, версия): активная версия без чтения файла
+        self._active: Dict[str, Tuple[int, Optional[str]]] = {}
+
+        self.stats = {
+            'saves': 0,
+            'loads': 0,
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'load_errors': 0,
+            'load_seconds': 0.0
+        }
+
+    # =================================================================
+    # ПУТИ И ВЕРСИИ
+    # =================================================================
+
+    @staticmethod
+    def _dirname(name: str) -> str:
+        return re.sub(r'[^\w.-]', '_', name)
+
+    def _model_dir(self, name: str) -> Path:
+        return self.root / self._dirname(name)
+
+    def versions(self, name: str) -> List[str]:
+        """Сохраненные версии модели (от старых к новым)"""
+        model_dir = self._model_dir(name)
+        if not model_dir.is_dir():
+            return []
+        return sorted(p.name for p in model_dir.iterdir() if (p / METADATA_FILE).exists())
+
+    def active_version(self, name: str) -> Optional[str]:
+        """Активная версия (файл ACTIVE, иначе последняя сохраненная)"""
+        active_path = self._model_dir(name) / ACTIVE_FILE
+        try:
+            mtime = active_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            versions = self.versions(name)
+            return versions[-1] if versions else None
+
+        cached = self._active.get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        version = active_path.read_text().strip() or None
+        self._active[name] = (mtime, version)
+        return version
+
+    def names(self) -> List[str]:
+        """Имена моделей в реестре"""
+        if not self.root.is_dir():
+            return []
+        names = []
+        for model_dir in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            info = self._read_metadata(model_dir.name, self.active_version(model_dir.name))
+            if info is not None:
+                names.append(info.name)
+        return names
+
+    def get_version(self, name: str, version: Optional[str] = None) -> Optional[ModelVersion]:
+        """Метаданные версии (по умолчанию активной) без загрузки артефакта"""
+        version = version or self.active_version(name)
+        if version is None:
+            return None
+        return self._read_metadata(name, version)
+
+    def _read_metadata(self, name: str, version: Optional[str]) -> Optional[ModelVersion]:
+        if version is None:
+            return None
+        version_dir = self._model_dir(name) / version
+        try:
+            with open(version_dir / METADATA_FILE, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        data['path'] = version_dir / ARTIFACT_FILES[data['format']]
+        return ModelVersion(**data)
+
+    # =================================================================
+    # СОХРАНЕНИЕ
+    # =================================================================
+
+    def save(self, name: str, obj: Any, model_type: str,
+             metrics: Optional[Dict[str, Any]] = None,
+             params: Optional[Dict[str, Any]] = None,
+             metadata: Optional[Dict[str, Any]] = None,
+             feature_importance: Optional[Dict[str, Any]] = None,
+             training_data_size: Optional[int] = None,
+             version: Optional[str] = None,
+             format: str = 'pickle',
+             activate: bool = True) -> ModelVersion:
+        """
+        Сохраняет новую версию модели
+
+        Args:
+            name: Имя модели (например, 'BTCUSDT_5m')
+            obj: Сохраняемый объект (модель или словарь с моделью и препроцессорами)
+            model_type: Тип модели для ml_models.model_type
+            metrics: Метрики; accuracy/precision/recall/f1_score попадают в колонки ml_models
+            format: 'pickle' (крупные массивы через mmap) или 'torch' (state_dict сетей)
+            activate: Сделать версию активной
+
+        Returns:
+            Метаданные сохраненной версии
+        """
+        if format not in ARTIFACT_FILES:
+            raise ValueError(f"Неизвестный формат артефакта: {format}")
+
+        version = version or _new_version()
+        version_dir = self._model_dir(name) / version
+        version_dir.mkdir(parents=True, exist_ok=True)
+        path = version_dir / ARTIFACT_FILES[format]
+
+        # Запись через временный файл: читатели не увидят недописанный артефакт
+        tmp_path = path.with_name(path.name + '.tmp')
+        buffers: List[List[int]] = []
+        if format == 'torch':
+            import torch
+            torch.save(obj, tmp_path)
+        else:
+            buffers = self._dump_pickle(obj, tmp_path, version_dir / BUFFERS_FILE)
+        os.replace(tmp_path, path)
+
+        size_bytes = path.stat().st_size
+        if buffers:
+            size_bytes += (version_dir / BUFFERS_FILE).stat().st_size
+
+        info = ModelVersion(
+            name=name,
+            version=version,
+            model_type=model_type,
+            format=format,
+            path=path,
+            size_bytes=size_bytes,
+            created_at=datetime.utcnow().isoformat(),
+            metrics=_jsonable(metrics or {}),
+            params=_jsonable(params or {}),
+            metadata=_jsonable(metadata or {}),
+            buffers=buffers
+        )
+        data = info.to_dict()
+        del data['path']
+        self._write_file(version_dir / METADATA_FILE, json.dumps(data, indent=2, ensure_ascii=False))
+
+        if activate:
+            self._activate_on_disk(name, version)
+            with self._lock:
+                # Предыдущие версии больше не нужны в памяти
+                self._evict_name(name)
+                if format == 'pickle':
+                    self._remember((name, version), obj, info.size_bytes)
+
+        if self.use_database:
+            self._record_in_database(info, feature_importance, training_data_size, activate)
+
+        self.stats['saves'] += 1
+        logger.info(
+            f"💾 Модель {name} сохранена в реестр: версия {version}",
+            category='ml',
+            model=name,
+            version=version,
+            size_mb=round(info.size_bytes / 1024 / 1024, 2)
+        )
+        return info
+
+    @staticmethod
+    def _dump_pickle(obj: Any, path: Path, buffers_path: Path) -> List[List[int]]:
+        """Pickle протокола 5; крупные буферы - отдельным файлом с выравниванием"""
+        large = []
+
+        def buffer_callback(buffer: pickle.PickleBuffer) -> bool:
+            raw = buffer.raw()
+            if raw.nbytes < MMAP_MIN_BYTES:
+                return True  # внутри pickle
+            large.append(raw)
+            return False
+
+        with open(path, 'wb') as f:
+            pickle.dump(obj, f, protocol=5, buffer_callback=buffer_callback)
+        if not large:
+            return []
+
+        layout, position = [], 0
+        tmp_path = buffers_path.with_name(buffers_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            for raw in large:
+                padding = -position % BUFFER_ALIGNMENT
+                f.write(b'\0' * padding)
+                position += padding
+                layout.append([position, raw.nbytes])
+                f.write(raw)
+                position += raw.nbytes
+        os.replace(tmp_path, buffers_path)
+        return layout
+
+    def activate(self, name: str, version: str):
+        """Делает версию активной (например, откат на предыдущую)"""
+        if self._read_metadata(name, version) is None:
+            raise ValueError(f"Версия {version} модели {name} не найдена")
+        self._activate_on_disk(name, version)
+        with self._lock:
+            self._evict_name(name)
+
+        if self.use_database:
+            db = SessionLocal()
+            try:
+                db.query(MLModel).filter(MLModel.name == name).update(
+                    {'is_active': MLModel.version == version}, synchronize_session=False
+                )
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"⚠️ Не удалось обновить активную версию в БД: {e}", category='ml')
+            finally:
+                db.close()
+
+    def _activate_on_disk(self, name: str, version: str):
+        self._write_file(self._model_dir(name) / ACTIVE_FILE, version)
+        self._active.pop(name, None)
+
+    @staticmethod
+    def _write_file(path: Path, text: str):
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def _record_in_database(self, info: ModelVersion, feature_importance: Optional[Dict[str, Any]],
+                            training_data_size: Optional[int], activate: bool):
+        """Запись версии в ml_models; реестр на диске работает и без БД"""
+        db = SessionLocal()
+        try:
+            if activate:
+                db.query(MLModel).filter(
+                    MLModel.name == info.name,
+                    MLModel.is_active == True
+                ).update({'is_active': False})
+
+            db.add(MLModel(
+                name=info.name,
+                model_type=info.model_type,
+                version=info.version,
+                accuracy=info.metrics.get('accuracy'),
+                precision=info.metrics.get('precision'),
+                recall=info.metrics.get('recall'),
+                f1_score=info.metrics.get('f1_score'),
+                parameters=info.params,
+                feature_importance=_jsonable(feature_importance or {}),
+                training_data_size=training_data_size,
+                is_active=activate,
+                model_path=str(info.path)
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(
+                f"⚠️ Модель {info.name} не записана в БД: {e}",
+                category='ml',
+                model=info.name,
+                error=str(e)
+            )
+        finally:
+            db.close()
+
+    # =================================================================
+    # ЗАГРУЗКА
+    # =================================================================
+
+    def load(self, name: str, version: Optional[str] = None,
+             mmap: Optional[bool] = None) -> Optional[Any]:
+        """
+        Загружает артефакт с диска (без кэша); None - модели нет
+
+        mmap: True/False - принудительно, None - по размеру буферов
+        """
+        info = self.get_version(name, version)
+        if info is None:
+            return None
+        return self._load_artifact(info, mmap)
+
+    def _use_mmap(self, info: ModelVersion) -> bool:
+        """mmap для всех (MODEL_REGISTRY_MMAP) или для буферов от mmap_min_bytes"""
+        return self.mmap or sum(size for _, size in info.buffers) >= self.mmap_min_bytes
+
+    def _load_artifact(self, info: ModelVersion, mmap: Optional[bool] = None) -> Any:
+        if mmap is None:
+            mmap = self._use_mmap(info)
+        start = time.perf_counter()
+        if info.format == 'torch':
+            import torch
+            obj = torch.load(info.path, map_location='cpu')
+        else:
+            buffers = []
+            if info.buffers:
+                with open(info.path.with_name(BUFFERS_FILE), 'rb') as f:
+                    if mmap:
+                        # Массивы ссылаются на отображение файла: страницы читаются по мере обращения
+                        data = memoryview(mmap_module.mmap(f.fileno(), 0, access=mmap_module.ACCESS_READ))
+                    else:
+                        data = memoryview(bytearray(f.read()))
+                buffers = [data[offset:offset + size] for offset, size in info.buffers]
+            with open(info.path, 'rb') as f:
+                obj = pickle.load(f, buffers=buffers)
+        self.stats['loads'] += 1
+        self.stats['load_seconds'] += time.perf_counter() - start
+        return obj
+
+    def get(self, name: str, version: Optional[str] = None) -> Optional[Any]:
+        """
+        Модель из кэша или с диска (активная версия по умолчанию)
+
+        Потокобезопасно: параллельные запросы одной модели загружают ее один раз.
+        Ошибка загрузки логируется, возвращается None.
+        """
+        version = version or self.active_version(name)
+        if version is None:
+            return None
+        key = (name, version)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    self.stats['hits'] += 1
+                    return entry[0]
+
+            try:
+                info = self._read_metadata(name, version)
+                if info is None:
+                    return None
+                self.stats['misses'] += 1
+                try:
+                    obj = self._load_artifact(info)
+                except Exception as e:
+                    self.stats['load_errors'] += 1
+                    logger.error(
+                        f"❌ Ошибка загрузки модели {name} ({version}): {e}",
+                        category='ml',
+                        model=name,
+                        version=version,
+                        error=str(e)
+                    )
+                    return None
+
+                with self._lock:
+                    self._remember(key, obj, info.size_bytes)
+                return obj
+            finally:
+                # Блокировка нужна только на время загрузки - и при ошибке тоже
+                with self._lock:
+                    self._load_locks.pop(key, None)
+
+    # =================================================================
+    # ПАМЯТЬ
+    # =================================================================
+
+    def _remember(self, key: ModelKey, obj: Any, size: int):
+        """Кладет модель в LRU и вытесняет давно не используемые сверх лимита"""
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self._memory -= old[1]
+        self._cache[key] = (obj, size)
+        self._memory += size
+
+        while self._memory > self.memory_limit and len(self._cache) > 1:
+            evicted_key, (_, evicted_size) = self._cache.popitem(last=False)
+            self._memory -= evicted_size
+            self.stats['evictions'] += 1
+            logger.debug(f"Модель {evicted_key[0]} ({evicted_key[1]}) выгружена из памяти", category='ml')
+
+    def _evict_name(self, name: str):
+        for key in [k for k in self._cache if k[0] == name]:
+            self._memory -= self._cache.pop(key)[1]
+
+    def evict(self, name: Optional[str] = None):
+        """Выгрузить модель (или все модели) из памяти"""
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+                self._memory = 0
+            else:
+                self._evict_name(name)
+
+    # =================================================================
+    # ПРОГРЕВ
+    # =================================================================
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None,
+                      concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Загружает активные версии моделей в память до первых предсказаний
+
+        Самые свежие модели загружаются первыми; модели, не влезающие в
+        лимит памяти, пропускаются (загрузятся при первом обращении).
+        """
+        start = time.perf_counter()
+        names = list(names) if names is not None else await asyncio.to_thread(self.names)
+        infos = [info for info in (self.get_version(name) for name in names) if info is not None]
+        infos.sort(key=lambda info: info.created_at, reverse=True)
+
+        selected, skipped, budget = [], [], self.memory_limit
+        for info in infos:
+            if info.size_bytes > budget and selected:
+                skipped.append(info.name)
+                continue
+            budget -= info.size_bytes
+            selected.append(info)
+
+        semaphore = asyncio.Semaphore(concurrency or Config.MODEL_REGISTRY_WARMUP_CONCURRENCY)
+
+        async def _load(info: ModelVersion) -> bool:
+            async with semaphore:
+                return await asyncio.to_thread(self.get, info.name, info.version) is not None
+
+        loaded = await asyncio.gather(*(_load(info) for info in selected))
+        result = {
+            'loaded': sum(loaded),
+            'failed': len(loaded) - sum(loaded),
+            'skipped': skipped,
+            'memory_mb': round(self._memory / 1024 / 1024, 2),
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+        logger.info(
+            f"🔥 Прогрев моделей: загружено {result['loaded']} из {len(infos)} за {result['seconds']:.2f}с",
+            category='ml',
+            **result
+        )
+        return result
+
+    # =================================================================
+    # ИНФОРМАЦИЯ
+    # =================================================================
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """Активные версии всех моделей реестра"""
+        models = []
+        for name in self.names():
+            info = self.get_version(name)
+            if info is None:
+                continue
+            data = info.to_dict()
+            data['versions'] = len(self.versions(name))
+            data['loaded'] = (name, info.version) in self._cache
+            models.append(data)
+        return models
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша и загрузок"""
+        with self._lock:
+            return {
+                **self.stats,
+                'cached_models': len(self._cache),
+                'memory_mb': round(self._memory / 1024 / 1024, 2),
+                'memory_limit_mb': round(self.memory_limit / 1024 / 1024, 2),
+                'mmap': self.mmap,
+                'mmap_min_mb': round(self.mmap_min_bytes / 1024 / 1024, 2)
+            }
+
+
+# =================================================================
+# ГЛОБАЛЬНЫЕ ФУНКЦИИ
+# =================================================================
+
+# Глобальный экземпляр
+model_registry = None
+
+def get_model_registry() -> ModelRegistry:
+    """Получить глобальный реестр моделей"""
+    global model_registry
+
+    if model_registry is None:
+        model_registry = ModelRegistry()
+
+    return model_registry
+
+# Экспорты
+__all__ = [
+    'ModelRegistry',
+    'ModelVersion',
+    'get_model_registry'
+]
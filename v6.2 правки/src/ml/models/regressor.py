@@ -17,8 +17,15 @@ from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import xgboost as xgb
 
 from sqlalchemy.orm import Session
+from ...core.config import Config
 from ...core.database import SessionLocal
 from ...logging.smart_logger import SmartLogger
+from ..labeling import price_level_targets
+from .incremental import (
+    FeatureDriftReference, can_continue, check_drift, continue_fit,
+    index_label, new_rows_mask
+)
+from .registry import get_model_registry
 
 
 class PriceLevelRegressor:
@@ -26,6 +33,10 @@ class PriceLevelRegressor:
     Регрессор для предсказания оптимальных уровней TP/SL
     """
     
+    REGISTRY_NAME = 'price_level_regressor'
+    # Баров вперед для расчета оптимальных уровней (цели последних баров неизвестны)
+    TARGET_WINDOW = 100
+    
     def __init__(self, model_type: str = 'xgboost'):
         self.model_type = model_type
         self.models = {
@@ -40,6 +51,8 @@ class PriceLevelRegressor:
         self.feature_names = []
         self.model_params = {}
         self.performance_metrics = {}
+        # Состояние для дообучения: последний обученный бар, эталон дрейфа
+        self.incremental_state = {}
         self.logger = SmartLogger(__name__)
         
     def _create_model(self) -> Any:
@@ -93,46 +106,28 @@ class PriceLevelRegressor:
             tp_targets: Оптимальные уровни Take Profit (в %)
             sl_targets: Оптимальные уровни Stop Loss (в %)
         """
-        # Рассчитываем оптимальные уровни на основе исторических данных
-        tp_targets = []
-        sl_targets = []
-        
-        for i in range(len(df) - 100):  # Оставляем место для анализа
-            current_price = df.iloc[i]['close']
-            future_prices = df.iloc[i+1:i+101]['close'].values
-            future_highs = df.iloc[i+1:i+101]['high'].values
-            future_lows = df.iloc[i+1:i+101]['low'].values
-            
-            # Находим максимальное движение вверх
-            max_profit = np.max((future_highs - current_price) / current_price) * 100
-            
-            # Находим максимальное движение вниз
-            max_loss = np.min((future_lows - current_price) / current_price) * 100
-            
-            # Адаптивные уровни на основе волатильности
-            volatility = df.iloc[max(0, i-20):i]['close'].pct_change().std() * 100
-            
-            # TP: 70% от максимального движения с учетом волатильности
-            optimal_tp = min(max_profit * 0.7, volatility * 2.5)
-            
-            # SL: 150% от средней волатильности
-            optimal_sl = min(abs(max_loss) * 0.5, volatility * 1.5)
-            
-            tp_targets.append(optimal_tp)
-            sl_targets.append(optimal_sl)
+        # Рассчитываем оптимальные уровни на основе исторических данных:
+        # максимальное движение за следующие 100 баров и волатильность
+        # предыдущих 20 баров
+        tp_targets, sl_targets = price_level_targets(
+            df['high'], df['low'], df['close'], window=self.TARGET_WINDOW, lookback=20
+        )
+        
+        # Оставляем место для анализа, последние значения - средние
+        n_valid = max(len(df) - self.TARGET_WINDOW, 0)
+        tp_targets = tp_targets[:n_valid]
+        sl_targets = sl_targets[:n_valid]
         
-        # Дополняем последние значения средними
         avg_tp = np.mean(tp_targets)
         avg_sl = np.mean(sl_targets)
         
-        for _ in range(100):
-            tp_targets.append(avg_tp)
-            sl_targets.append(avg_sl)
+        tp_targets = np.concatenate([tp_targets, np.full(self.TARGET_WINDOW, avg_tp)])
+        sl_targets = np.concatenate([sl_targets, np.full(self.TARGET_WINDOW, avg_sl)])
         
         return pd.Series(tp_targets), pd.Series(sl_targets)
     
     def train(self, features: pd.DataFrame, market_data: pd.DataFrame,
-              validation_split: float = 0.2) -> Dict[str, float]:
+              validation_split: float = 0.2, incremental: bool = False) -> Dict[str, float]:
         """
         Обучает регрессионные модели для TP и SL
         
@@ -140,10 +135,18 @@ class PriceLevelRegressor:
             features: Признаки для обучения
             market_data: Исходные рыночные данные для расчета targets
             validation_split: Доля валидационной выборки
+            incremental: Дообучить на барах после последнего обучения
+                (features и market_data - все окно); полное обучение,
+                если проверка дрейфа требует переобучения с нуля
             
         Returns:
             Метрики обучения
         """
+        if incremental:
+            metrics = self._train_incremental(features, market_data)
+            if metrics is not None:
+                return metrics
+        
         self.logger.info(
             f"Начало обучения регрессора {self.model_type}",
             category='ml',
@@ -241,8 +244,117 @@ class PriceLevelRegressor:
             metrics=metrics
         )
         
+        # Эталон для следующих дообучений
+        previous = self.incremental_state.get('last_decision', {}) if incremental else {}
+        self.incremental_state = {
+            'trained_until': index_label(features.index[split_idx - 1]),
+            'updates': 0,
+            'bars': split_idx,
+            'baseline_mae': {'tp': metrics['tp_mae'], 'sl': metrics['sl_mae']},
+            'drift_reference': FeatureDriftReference.fit(features.iloc[:split_idx]).to_dict(),
+            # Причина полного обучения - от проверки дрейфа (если была)
+            'last_decision': {**previous, 'mode': 'full', 'bars': split_idx}
+        }
+        
         return metrics
     
+    def _train_incremental(self, features: pd.DataFrame,
+                           market_data: pd.DataFrame) -> Optional[Dict[str, float]]:
+        """
+        Дообучение моделей TP/SL на барах после последнего обучения
+        
+        ✅ Только бары с известными целями (старше TARGET_WINDOW баров)
+        ✅ Масштабирование признаков и целей - от полного обучения
+        ✅ Перед дообучением - проверка дрейфа (PSI признаков, MAE моделей
+           на новых барах против валидации полного обучения)
+        
+        Returns:
+            Метрики; None - нужно полное обучение на всем окне
+        """
+        state = self.incremental_state
+        if not state or not all(can_continue(m) for m in self.models.values()):
+            self.logger.info("Дообучение невозможно: нет обученных моделей", category='ml')
+            return None
+        
+        tp_targets, sl_targets = self.prepare_target_data(market_data)
+        min_len = min(len(features), len(tp_targets))
+        features = features.iloc[:min_len]
+        
+        n_known = max(len(market_data) - self.TARGET_WINDOW, 0)
+        mask = new_rows_mask(features.index, state.get('trained_until')) & (np.arange(min_len) < n_known)
+        X_new = features[mask][self.feature_names]
+        tp_new = tp_targets.values[:min_len][mask]
+        sl_new = sl_targets.values[:min_len][mask]
+        
+        decision = {'mode': 'skipped', 'bars': len(X_new)}
+        if len(X_new) < Config.INCREMENTAL_MIN_BARS:
+            state['last_decision'] = decision
+            self.logger.info(
+                f"Дообучение отложено: новых баров {len(X_new)}",
+                category='ml',
+                new_bars=len(X_new)
+            )
+            return self.performance_metrics
+        
+        X_scaled = self.scalers['features'].transform(X_new)
+        
+        def new_bars_mae():
+            return {
+                'tp': mean_absolute_error(tp_new, self._predict_target('tp', X_scaled)),
+                'sl': mean_absolute_error(sl_new, self._predict_target('sl', X_scaled))
+            }
+        
+        # Качество текущих моделей на новых барах (до дообучения)
+        baseline = state.get('baseline_mae') or {}
+        score_drop = None
+        if baseline.get('tp') and baseline.get('sl'):
+            mae = new_bars_mae()
+            score_drop = (mae['tp'] / baseline['tp'] + mae['sl'] / baseline['sl']) / 2 - 1
+        
+        drift = check_drift(
+            FeatureDriftReference.from_dict(state.get('drift_reference')),
+            X_new, score_drop, state.get('updates', 0)
+        )
+        decision.update(drift)
+        if drift['full_retrain']:
+            state['last_decision'] = decision
+            self.logger.info(
+                f"Полное переобучение: {drift['reason']}",
+                category='ml',
+                **drift
+            )
+            return None
+        
+        continue_fit(self.models['tp_model'], X_scaled,
+                     self.scalers['tp_target'].transform(tp_new.reshape(-1, 1)).ravel(), state.get('bars'))
+        continue_fit(self.models['sl_model'], X_scaled,
+                     self.scalers['sl_target'].transform(sl_new.reshape(-1, 1)).ravel(), state.get('bars'))
+        
+        decision['mode'] = 'incremental'
+        state['trained_until'] = index_label(X_new.index[-1])
+        state['updates'] = state.get('updates', 0) + 1
+        state['last_decision'] = decision
+        
+        mae = new_bars_mae()
+        self.performance_metrics['incremental'] = {'tp_mae': mae['tp'], 'sl_mae': mae['sl']}
+        
+        self.logger.info(
+            f"Модели TP/SL дообучены на {len(X_new)} новых барах",
+            category='ml',
+            **decision
+        )
+        
+        # Новая граница trained_until - в версии реестра, иначе после
+        # перезапуска те же бары дообучались бы повторно
+        self.save_model()
+        
+        return self.performance_metrics
+    
+    def _predict_target(self, target: str, X_scaled: np.ndarray) -> np.ndarray:
+        """Предсказание модели TP/SL в исходных единицах (без ограничений predict)"""
+        pred = self.models[f'{target}_model'].predict(X_scaled)
+        return self.scalers[f'{target}_target'].inverse_transform(pred.reshape(-1, 1)).ravel()
+    
     def predict(self, features: pd.DataFrame) -> Dict[str, np.ndarray]:
         """
         Предсказывает оптимальные уровни TP и SL
@@ -389,8 +501,8 @@ class PriceLevelRegressor:
         # Сохраняем для будущего переобучения
         self.model_params['feedback_data'] = feedback_data
     
-    def save_model(self, path: str):
-        """Сохраняет модель и параметры"""
+    def save_model(self, path: Optional[str] = None):
+        """Сохраняет модель и параметры (без path - новая версия в реестре моделей)"""
         model_data = {
             'model_type': self.model_type,
             'tp_model': self.models['tp_model'],
@@ -399,20 +511,37 @@ class PriceLevelRegressor:
             'feature_names': self.feature_names,
             'performance_metrics': self.performance_metrics,
             'model_params': self.model_params,
+            'incremental': self.incremental_state,
             'version': '1.0',
             'created_at': datetime.now().isoformat()
         }
         
-        joblib.dump(model_data, path)
+        if path is None:
+            path = get_model_registry().save(
+                self.REGISTRY_NAME,
+                model_data,
+                model_type=self.model_type,
+                metrics=self.performance_metrics,
+                params=self.model_params,
+                metadata={'feature_names': self.feature_names}
+            ).path
+        else:
+            joblib.dump(model_data, path)
         self.logger.info(
             f"Модель сохранена: {path}",
             category='ml',
             model_type=self.model_type
         )
     
-    def load_model(self, path: str):
-        """Загружает модель и параметры"""
-        model_data = joblib.load(path)
+    def load_model(self, path: Optional[str] = None):
+        """Загружает модель и параметры (без path - активная версия из реестра)"""
+        if path is None:
+            model_data = get_model_registry().load(self.REGISTRY_NAME, mmap=False)
+            if model_data is None:
+                raise ValueError(f"Модель {self.REGISTRY_NAME} не найдена в реестре")
+            path = self.REGISTRY_NAME
+        else:
+            model_data = joblib.load(path)
         
         self.model_type = model_data['model_type']
         self.models = {
@@ -423,6 +552,7 @@ class PriceLevelRegressor:
         self.feature_names = model_data['feature_names']
         self.performance_metrics = model_data['performance_metrics']
         self.model_params = model_data.get('model_params', {})
+        self.incremental_state = model_data.get('incremental', {})
         
         self.logger.info(
             f"Модель загружена: {path}",
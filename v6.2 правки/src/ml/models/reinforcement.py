@@ -1,11 +1,14 @@
 """
 Reinforcement Learning Agent для адаптивной торговли
 Файл: src/ml/models/reinforcement.py
+
+Обучение на истории идет батчами эпизодов (VectorizedTradingEnvironment):
+act, replay и train_ppo работают с батчами состояний одним проходом сети.
 """
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple, Optional, Any, Union
-from collections import deque
+from collections import defaultdict
 from datetime import datetime
 import random
 import json
@@ -17,162 +20,12 @@ import torch.nn.functional as F
 from torch.distributions import Categorical
 
 from ...logging.smart_logger import SmartLogger
+from ...core.config import Config
 from ...core.database import SessionLocal
+from .registry import get_model_registry
+from .rl_environment import TradingEnvironment, VectorizedTradingEnvironment
 
-
-class TradingEnvironment:
-    """
-    Среда для обучения RL агента
-    """
-    
-    def __init__(self, market_data: pd.DataFrame, initial_balance: float = 10000):
-        self.market_data = market_data
-        self.initial_balance = initial_balance
-        self.reset()
-        
-    def reset(self) -> np.ndarray:
-        """Сброс среды в начальное состояние"""
-        self.current_step = 0
-        self.balance = self.initial_balance
-        self.position = 0  # 0 - нет позиции, 1 - long, -1 - short
-        self.entry_price = 0
-        self.trades_history = []
-        self.done = False
-        
-        return self._get_state()
-    
-    def _get_state(self) -> np.ndarray:
-        """Получает текущее состояние среды"""
-        if self.current_step >= len(self.market_data) - 1:
-            return np.zeros(50)  # Пустое состояние
-        
-        # Берем последние 20 свечей
-        window = 20
-        start_idx = max(0, self.current_step - window + 1)
-        end_idx = self.current_step + 1
-        
-        price_data = self.market_data.iloc[start_idx:end_idx]
-        
-        # Признаки состояния
-        features = []
-        
-        # Нормализованные цены
-        current_price = price_data.iloc[-1]['close']
-        features.extend([
-            (price_data['close'].iloc[-1] - price_data['close'].mean()) / price_data['close'].std(),
-            (price_data['high'].iloc[-1] - price_data['high'].mean()) / price_data['high'].std(),
-            (price_data['low'].iloc[-1] - price_data['low'].mean()) / price_data['low'].std(),
-            (price_data['volume'].iloc[-1] - price_data['volume'].mean()) / (price_data['volume'].std() + 1e-8)
-        ])
-        
-        # Технические индикаторы (если есть)
-        if 'rsi' in price_data.columns:
-            features.append((price_data['rsi'].iloc[-1] - 50) / 50)
-        else:
-            features.append(0)
-            
-        if 'macd' in price_data.columns:
-            features.append(price_data['macd'].iloc[-1] / current_price)
-        else:
-            features.append(0)
-        
-        # Информация о позиции
-        features.extend([
-            self.position,  # Текущая позиция
-            (self.balance - self.initial_balance) / self.initial_balance,  # Нормализованная прибыль
-            (current_price - self.entry_price) / current_price if self.position != 0 else 0  # Текущий P&L
-        ])
-        
-        # Паттерны цены
-        returns = price_data['close'].pct_change().fillna(0)
-        features.extend([
-            returns.mean() * 100,
-            returns.std() * 100,
-            returns.iloc[-1] * 100
-        ])
-        
-        # Дополняем до нужного размера
-        while len(features) < 50:
-            features.append(0)
-        
-        return np.array(features[:50], dtype=np.float32)
-    
-    def step(self, action: int) -> Tuple[np.ndarray, float, bool, Dict]:
-        """
-        Выполняет действие в среде
-        
-        Args:
-            action: 0 - hold, 1 - buy, 2 - sell
-            
-        Returns:
-            state: Новое состояние
-            reward: Награда
-            done: Завершен ли эпизод
-            info: Дополнительная информация
-        """
-        if self.done:
-            return self._get_state(), 0, True, {}
-        
-        current_price = self.market_data.iloc[self.current_step]['close']
-        reward = 0
-        info = {}
-        
-        # Выполняем действие
-        if action == 1 and self.position <= 0:  # Buy
-            if self.position == -1:  # Закрываем short
-                profit = (self.entry_price - current_price) * abs(self.position)
-                self.balance += profit
-                reward += profit / self.initial_balance * 100
-                
-            self.position = 1
-            self.entry_price = current_price
-            info['action'] = 'buy'
-            
-        elif action == 2 and self.position >= 0:  # Sell
-            if self.position == 1:  # Закрываем long
-                profit = (current_price - self.entry_price) * self.position
-                self.balance += profit
-                reward += profit / self.initial_balance * 100
-                
-            self.position = -1
-            self.entry_price = current_price
-            info['action'] = 'sell'
-            
-        else:  # Hold
-            if self.position != 0:
-                # Награда за удержание прибыльной позиции
-                unrealized_pnl = (current_price - self.entry_price) * self.position
-                reward += unrealized_pnl / self.initial_balance * 10  # Меньше, чем за закрытие
-            info['action'] = 'hold'
-        
-        # Штраф за большую просадку
-        drawdown = (self.balance - self.initial_balance) / self.initial_balance
-        if drawdown < -0.1:  # Более 10% убытка
-            reward -= abs(drawdown) * 10
-        
-        # Переход к следующему шагу
-        self.current_step += 1
-        
-        # Проверка завершения
-        if self.current_step >= len(self.market_data) - 1:
-            self.done = True
-            # Закрываем открытую позицию
-            if self.position != 0:
-                final_price = self.market_data.iloc[-1]['close']
-                final_pnl = (final_price - self.entry_price) * self.position
-                self.balance += final_pnl
-                reward += final_pnl / self.initial_balance * 100
-        
-        # Банкротство
-        if self.balance <= self.initial_balance * 0.5:
-            self.done = True
-            reward -= 100  # Большой штраф за банкротство
-        
-        new_state = self._get_state()
-        info['balance'] = self.balance
-        info['position'] = self.position
-        
-        return new_state, reward, self.done, info
+PPO_KEYS = ('state', 'action', 'reward', 'next_state', 'done')
 
 
 class DQNNetwork(nn.Module):
@@ -238,6 +91,50 @@ class PPOCritic(nn.Module):
         return x
 
 
+class ReplayBuffer:
+    """
+    Кольцевой буфер опыта DQN на массивах NumPy
+
+    Батч для replay - выборка индексов, без сборки тензора из списка
+    кортежей; extend добавляет переходы всего батча эпизодов разом.
+    """
+
+    def __init__(self, capacity: int, state_size: int):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.float32)
+        self.position = 0
+        self.size = 0
+        self.rng = np.random.default_rng()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, state: np.ndarray, action: int, reward: float,
+               next_state: np.ndarray, done: bool):
+        self.extend(np.asarray(state)[None], [action], [reward], np.asarray(next_state)[None], [done])
+
+    def extend(self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray,
+               next_states: np.ndarray, dones: np.ndarray):
+        index = (self.position + np.arange(len(actions))) % self.capacity
+        self.states[index] = states
+        self.actions[index] = actions
+        self.rewards[index] = rewards
+        self.next_states[index] = next_states
+        self.dones[index] = dones
+        self.position = (self.position + len(actions)) % self.capacity
+        self.size = min(self.size + len(actions), self.capacity)
+
+    def sample(self, batch_size: int) -> Tuple[np.ndarray, ...]:
+        """Случайный батч без повторов: states, actions, rewards, next_states, dones"""
+        index = self.rng.choice(self.size, batch_size, replace=False)
+        return (self.states[index], self.actions[index], self.rewards[index],
+                self.next_states[index], self.dones[index])
+
+
 class ReinforcementTradingAgent:
     """
     RL агент для адаптивной торговли
@@ -249,6 +146,7 @@ class ReinforcementTradingAgent:
         self.action_size = action_size
         self.algorithm = algorithm
         self.learning_rate = learning_rate
+        self.gamma = 0.99  # Дисконт наград - общий для DQN и PPO
         
         # Инициализация сетей
         if algorithm == 'DQN':
@@ -257,9 +155,8 @@ class ReinforcementTradingAgent:
             self.optimizer = optim.Adam(self.q_network.parameters(), lr=learning_rate)
             
             # Replay buffer
-            self.memory = deque(maxlen=10000)
+            self.memory = ReplayBuffer(10000, state_size)
             self.batch_size = 32
-            self.gamma = 0.99
             self.epsilon = 1.0
             self.epsilon_decay = 0.995
             self.epsilon_min = 0.01
@@ -279,27 +176,32 @@ class ReinforcementTradingAgent:
         self.logger = SmartLogger(__name__)
         self.training_history = []
     
-    def act(self, state: np.ndarray, training: bool = True) -> int:
+    def act(self, state: np.ndarray, training: bool = True) -> Union[int, np.ndarray]:
         """
         Выбирает действие на основе текущего состояния
         
         Args:
-            state: Текущее состояние
+            state: Текущее состояние или батч состояний (n, state_size)
             training: Режим обучения или эксплуатации
             
         Returns:
-            Действие (0: hold, 1: buy, 2: sell)
+            Действие (0: hold, 1: buy, 2: sell); для батча - массив действий
         """
-        state_tensor = torch.FloatTensor(state).unsqueeze(0)
+        state = np.asarray(state, dtype=np.float32)
+        batched = state.ndim == 2
+        state_tensor = torch.from_numpy(state if batched else state[None])
         
         if self.algorithm == 'DQN':
-            # Epsilon-greedy policy
-            if training and random.random() <= self.epsilon:
+            # Epsilon-greedy policy (одно состояние - без прохода сети при случайном действии)
+            if not batched and training and random.random() <= self.epsilon:
                 return random.randint(0, self.action_size - 1)
             
             with torch.no_grad():
-                q_values = self.q_network(state_tensor)
-                return np.argmax(q_values.cpu().data.numpy())
+                actions = self.q_network(state_tensor).argmax(dim=1).numpy()
+            
+            if batched and training:
+                explore = np.random.random(len(actions)) <= self.epsilon
+                actions[explore] = np.random.randint(0, self.action_size, int(explore.sum()))
                 
         elif self.algorithm == 'PPO':
             with torch.no_grad():
@@ -307,30 +209,40 @@ class ReinforcementTradingAgent:
                 
                 if training:
                     # Сэмплируем из распределения
-                    dist = Categorical(probs)
-                    action = dist.sample()
-                    return action.item()
+                    actions = Categorical(probs).sample().numpy()
                 else:
                     # Выбираем наиболее вероятное действие
-                    return torch.argmax(probs).item()
+                    actions = probs.argmax(dim=1).numpy()
+        
+        return actions if batched else int(actions[0])
     
-    def remember(self, state: np.ndarray, action: int, reward: float, 
-                 next_state: np.ndarray, done: bool):
-        """Сохраняет опыт в памяти (для DQN)"""
+    def remember(self, state: np.ndarray, action: Union[int, np.ndarray], reward: Union[float, np.ndarray],
+                 next_state: np.ndarray, done: Union[bool, np.ndarray]):
+        """Сохраняет опыт в памяти (для DQN); state (n, state_size) - переходы батча эпизодов"""
         if self.algorithm == 'DQN':
-            self.memory.append((state, action, reward, next_state, done))
+            if np.ndim(state) == 2:
+                self.memory.extend(state, action, reward, next_state, done)
+            else:
+                self.memory.append(state, action, reward, next_state, done)
     
-    def replay(self):
-        """Обучение на батче из памяти (DQN)"""
-        if self.algorithm != 'DQN' or len(self.memory) < self.batch_size:
+    def replay(self, batch_size: Optional[int] = None):
+        """
+        Обучение на батче из памяти (DQN)
+        
+        batch_size кратный self.batch_size (шаг батча эпизодов) - один
+        проход сети вместо нескольких; epsilon затухает на столько же шагов.
+        """
+        if self.algorithm != 'DQN':
+            return
+        batch_size = batch_size or self.batch_size
+        if len(self.memory) < batch_size:
             return
         
-        batch = random.sample(self.memory, self.batch_size)
-        states = torch.FloatTensor([e[0] for e in batch])
-        actions = torch.LongTensor([e[1] for e in batch]).unsqueeze(1)
-        rewards = torch.FloatTensor([e[2] for e in batch]).unsqueeze(1)
-        next_states = torch.FloatTensor([e[3] for e in batch])
-        dones = torch.FloatTensor([e[4] for e in batch]).unsqueeze(1)
+        states, actions, rewards, next_states, dones = (
+            torch.from_numpy(array) for array in self.memory.sample(batch_size))
+        actions = actions.unsqueeze(1)
+        rewards = rewards.unsqueeze(1)
+        dones = dones.unsqueeze(1)
         
         current_q_values = self.q_network(states).gather(1, actions)
         
@@ -347,34 +259,41 @@ class ReinforcementTradingAgent:
         
         # Decay epsilon
         if self.epsilon > self.epsilon_min:
-            self.epsilon *= self.epsilon_decay
+            self.epsilon *= self.epsilon_decay ** (batch_size / self.batch_size)
     
     def update_target_network(self):
         """Обновляет target network (DQN)"""
         if self.algorithm == 'DQN':
             self.target_network.load_state_dict(self.q_network.state_dict())
     
-    def train_ppo(self, trajectories: List[Dict]):
+    def train_ppo(self, trajectories: Union[List[Dict], Dict[str, np.ndarray]]):
         """
         Обучение PPO на собранных траекториях
         
         Args:
-            trajectories: Список траекторий с состояниями, действиями, наградами
+            trajectories: Список переходов с состояниями, действиями, наградами
+                или словарь массивов тех же ключей (переходы батча эпизодов)
         """
-        if self.algorithm != 'PPO' or not trajectories:
+        if self.algorithm != 'PPO' or trajectories is None:
+            return
+        if not isinstance(trajectories, dict):
+            if not trajectories:
+                return
+            trajectories = {key: np.stack([t[key] for t in trajectories]) for key in PPO_KEYS}
+        if not len(trajectories['action']):
             return
         
         # Подготовка данных
-        states = torch.FloatTensor([t['state'] for t in trajectories])
-        actions = torch.LongTensor([t['action'] for t in trajectories])
-        rewards = torch.FloatTensor([t['reward'] for t in trajectories])
-        next_states = torch.FloatTensor([t['next_state'] for t in trajectories])
-        dones = torch.FloatTensor([t['done'] for t in trajectories])
+        states = torch.as_tensor(np.asarray(trajectories['state'], dtype=np.float32))
+        actions = torch.as_tensor(np.asarray(trajectories['action'], dtype=np.int64))
+        rewards = torch.as_tensor(np.asarray(trajectories['reward'], dtype=np.float32))
+        next_states = torch.as_tensor(np.asarray(trajectories['next_state'], dtype=np.float32))
+        dones = torch.as_tensor(np.asarray(trajectories['done'], dtype=np.float32))
         
         # Вычисляем преимущества (advantages)
         with torch.no_grad():
-            values = self.critic(states).squeeze()
-            next_values = self.critic(next_states).squeeze()
+            values = self.critic(states).squeeze(-1)
+            next_values = self.critic(next_states).squeeze(-1)
             
             # GAE (Generalized Advantage Estimation)
             advantages = rewards + self.gamma * next_values * (1 - dones) - values
@@ -383,6 +302,10 @@ class ReinforcementTradingAgent:
         # Нормализация преимуществ
         advantages = (advantages - advantages.mean()) / (advantages.std() + 1e-8)
         
+        # Log probabilities политики, собравшей траектории (до обновлений)
+        with torch.no_grad():
+            old_log_probs = Categorical(self.actor(states)).log_prob(actions)
+        
         # PPO обновления
         for _ in range(self.ppo_epochs):
             # Actor loss
@@ -390,12 +313,6 @@ class ReinforcementTradingAgent:
             dist = Categorical(probs)
             new_log_probs = dist.log_prob(actions)
             
-            # Сохраненные log probabilities
-            with torch.no_grad():
-                old_probs = self.actor(states)
-                old_dist = Categorical(old_probs)
-                old_log_probs = old_dist.log_prob(actions)
-            
             ratio = torch.exp(new_log_probs - old_log_probs)
             
             surr1 = ratio * advantages
@@ -412,7 +329,7 @@ class ReinforcementTradingAgent:
             self.actor_optimizer.step()
             
             # Critic loss
-            values = self.critic(states).squeeze()
+            values = self.critic(states).squeeze(-1)
             critic_loss = F.mse_loss(values, returns.detach())
             
             self.critic_optimizer.zero_grad()
@@ -420,70 +337,80 @@ class ReinforcementTradingAgent:
             torch.nn.utils.clip_grad_norm_(self.critic.parameters(), 0.5)
             self.critic_optimizer.step()
     
-    def train_on_history(self, market_data: pd.DataFrame, episodes: int = 100):
+    def train_on_history(self, market_data: pd.DataFrame, episodes: int = 100,
+                         n_envs: Optional[int] = None):
         """
         Обучение агента на исторических данных
         
+        Эпизоды идут батчами по n_envs в VectorizedTradingEnvironment:
+        одно действие сети и один шаг среды на весь батч. DQN - один
+        replay на шаг (батч пропорционален активным эпизодам), PPO - одно
+        обновление на траектории батча эпизодов.
+        
         Args:
             market_data: Исторические данные рынка
             episodes: Количество эпизодов обучения
+            n_envs: Эпизодов одновременно (по умолчанию RL_PARALLEL_ENVS)
         """
-        env = TradingEnvironment(market_data)
-        
-        for episode in range(episodes):
-            state = env.reset()
-            total_reward = 0
-            trajectories = []
+        n_envs = max(1, min(n_envs or Config.RL_PARALLEL_ENVS, episodes))
+        env = VectorizedTradingEnvironment(market_data, n_envs)
+        
+        for first in range(0, episodes, n_envs):
+            batch_episodes = range(first, min(first + n_envs, episodes))
+            states = env.reset(len(batch_episodes))
+            total_rewards = np.zeros(len(batch_episodes))
+            trajectories = {key: [] for key in PPO_KEYS}
             
-            while not env.done:
-                action = self.act(state, training=True)
-                next_state, reward, done, info = env.step(action)
+            while not env.done.all():
+                active = ~env.done
+                actions = self.act(states, training=True)
+                next_states, rewards, dones, info = env.step(actions)
                 
+                # Только эпизоды, сделавшие шаг (завершенные стоят на месте)
+                transition = (states[active], actions[active], rewards[active],
+                              next_states[active], dones[active])
                 if self.algorithm == 'DQN':
-                    self.remember(state, action, reward, next_state, done)
-                    if len(self.memory) > self.batch_size:
-                        self.replay()
+                    self.remember(*transition)
+                    batch_size = self.batch_size * int(active.sum())
+                    if len(self.memory) > batch_size:
+                        self.replay(batch_size)
                         
                 elif self.algorithm == 'PPO':
-                    trajectories.append({
-                        'state': state,
-                        'action': action,
-                        'reward': reward,
-                        'next_state': next_state,
-                        'done': done
-                    })
+                    for key, values in zip(PPO_KEYS, transition):
+                        trajectories[key].append(values)
                 
-                state = next_state
-                total_reward += reward
+                states = next_states
+                total_rewards += rewards
             
-            # Обучение PPO в конце эпизода
+            # Обучение PPO в конце батча эпизодов
             if self.algorithm == 'PPO':
-                self.train_ppo(trajectories)
+                self.train_ppo({key: np.concatenate(values) for key, values in trajectories.items()})
             
             # Обновление target network для DQN
-            if self.algorithm == 'DQN' and episode % 10 == 0:
+            if self.algorithm == 'DQN' and any(episode % 10 == 0 for episode in batch_episodes):
                 self.update_target_network()
             
             # Логирование
-            final_balance = env.balance
-            profit_percent = (final_balance - env.initial_balance) / env.initial_balance * 100
-            
-            self.training_history.append({
-                'episode': episode,
-                'total_reward': total_reward,
-                'final_balance': final_balance,
-                'profit_percent': profit_percent,
-                'epsilon': self.epsilon if self.algorithm == 'DQN' else 0
-            })
-            
-            if episode % 10 == 0:
-                self.logger.info(
-                    f"Episode {episode}: Reward={total_reward:.2f}, "
-                    f"Profit={profit_percent:.2f}%",
-                    category='ml',
-                    algorithm=self.algorithm,
-                    episode=episode
-                )
+            for i, episode in enumerate(batch_episodes):
+                final_balance = float(env.balance[i])
+                profit_percent = (final_balance - env.initial_balance) / env.initial_balance * 100
+                
+                self.training_history.append({
+                    'episode': episode,
+                    'total_reward': float(total_rewards[i]),
+                    'final_balance': final_balance,
+                    'profit_percent': profit_percent,
+                    'epsilon': self.epsilon if self.algorithm == 'DQN' else 0
+                })
+                
+                if episode % 10 == 0:
+                    self.logger.info(
+                        f"Episode {episode}: Reward={total_rewards[i]:.2f}, "
+                        f"Profit={profit_percent:.2f}%",
+                        category='ml',
+                        algorithm=self.algorithm,
+                        episode=episode
+                    )
     
     def predict_action(self, state: np.ndarray, market_context: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -543,8 +470,13 @@ class ReinforcementTradingAgent:
                                market_context.get('news_sentiment', 0) < -0.5
         }
     
-    def save_model(self, path: str):
-        """Сохраняет модель"""
+    @property
+    def registry_name(self) -> str:
+        """Имя агента в реестре моделей"""
+        return f"rl_{self.algorithm.lower()}_agent"
+    
+    def save_model(self, path: Optional[str] = None):
+        """Сохраняет модель (без path - новая версия в реестре моделей)"""
         model_data = {
             'algorithm': self.algorithm,
             'state_size': self.state_size,
@@ -564,12 +496,29 @@ class ReinforcementTradingAgent:
             model_data['actor_optimizer_state'] = self.actor_optimizer.state_dict()
             model_data['critic_optimizer_state'] = self.critic_optimizer.state_dict()
         
-        torch.save(model_data, path)
+        if path is None:
+            path = get_model_registry().save(
+                self.registry_name,
+                model_data,
+                model_type=self.algorithm,
+                metrics=self.get_performance_metrics(),
+                params={'state_size': self.state_size, 'action_size': self.action_size,
+                        'learning_rate': self.learning_rate},
+                format='torch'
+            ).path
+        else:
+            torch.save(model_data, path)
         self.logger.info(f"Модель сохранена: {path}", category='ml')
     
-    def load_model(self, path: str):
-        """Загружает модель"""
-        model_data = torch.load(path)
+    def load_model(self, path: Optional[str] = None):
+        """Загружает модель (без path - активная версия из реестра)"""
+        if path is None:
+            model_data = get_model_registry().load(self.registry_name)
+            if model_data is None:
+                raise ValueError(f"Модель {self.registry_name} не найдена в реестре")
+            path = self.registry_name
+        else:
+            model_data = torch.load(path)
         
         self.algorithm = model_data['algorithm']
         self.training_history = model_data.get('training_history', [])
@@ -670,6 +619,8 @@ TradingRLAgent = ReinforcementTradingAgent
 # Экспорт всех классов
 __all__ = [
     'TradingEnvironment',
+    'VectorizedTradingEnvironment',
+    'ReplayBuffer',
     'DQNNetwork', 
     'PPOActor',
     'PPOCritic',
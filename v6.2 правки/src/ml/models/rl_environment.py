@@ -0,0 +1,344 @@
+"""
+Торговые среды для обучения RL агента
+Файл: src/ml/models/rl_environment.py
+
+TradingEnvironment - один эпизод, состояние каждого шага собирается из
+окна 20 свечей через .iloc и статистики pandas.
+
+VectorizedTradingEnvironment - те же состояния и награды, но:
+✅ Рыночная часть состояния всех баров считается один раз при создании
+   среды (скользящие окна NumPy), шаг - только индексация
+✅ Батч независимых эпизодов по одним данным: позиции, балансы и
+   награды - массивы, step() принимает массив действий
+✅ Завершенные эпизоды батча (конец данных, банкротство) стоят на месте
+   с нулевой наградой, пока не закончатся остальные
+
+Модуль без torch: среды можно использовать и проверять отдельно от агента.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple, Any
+from numpy.lib.stride_tricks import sliding_window_view
+
+STATE_SIZE = 50
+STATE_WINDOW = 20  # Свечей в окне состояния
+PRICE_COLUMNS = ('close', 'high', 'low', 'volume')
+# Колонки состояния: позиция, нормализованная прибыль, текущий P&L
+POSITION_COLUMN, PROFIT_COLUMN, PNL_COLUMN = 6, 7, 8
+RETURNS_COLUMN = 9  # mean, std, последняя доходность окна
+
+
+class TradingEnvironment:
+    """
+    Среда для обучения RL агента
+    """
+    
+    def __init__(self, market_data: pd.DataFrame, initial_balance: float = 10000):
+        self.market_data = market_data
+        self.initial_balance = initial_balance
+        self.reset()
+        
+    def reset(self) -> np.ndarray:
+        """Сброс среды в начальное состояние"""
+        self.current_step = 0
+        self.balance = self.initial_balance
+        self.position = 0  # 0 - нет позиции, 1 - long, -1 - short
+        self.entry_price = 0
+        self.trades_history = []
+        self.done = False
+        
+        return self._get_state()
+    
+    def _get_state(self) -> np.ndarray:
+        """Получает текущее состояние среды"""
+        if self.current_step >= len(self.market_data) - 1:
+            return np.zeros(50)  # Пустое состояние
+        
+        # Берем последние 20 свечей
+        window = 20
+        start_idx = max(0, self.current_step - window + 1)
+        end_idx = self.current_step + 1
+        
+        price_data = self.market_data.iloc[start_idx:end_idx]
+        
+        # Признаки состояния
+        features = []
+        
+        # Нормализованные цены
+        current_price = price_data.iloc[-1]['close']
+        features.extend([
+            (price_data['close'].iloc[-1] - price_data['close'].mean()) / price_data['close'].std(),
+            (price_data['high'].iloc[-1] - price_data['high'].mean()) / price_data['high'].std(),
+            (price_data['low'].iloc[-1] - price_data['low'].mean()) / price_data['low'].std(),
+            (price_data['volume'].iloc[-1] - price_data['volume'].mean()) / (price_data['volume'].std() + 1e-8)
+        ])
+        
+        # Технические индикаторы (если есть)
+        if 'rsi' in price_data.columns:
+            features.append((price_data['rsi'].iloc[-1] - 50) / 50)
+        else:
+            features.append(0)
+            
+        if 'macd' in price_data.columns:
+            features.append(price_data['macd'].iloc[-1] / current_price)
+        else:
+            features.append(0)
+        
+        # Информация о позиции
+        features.extend([
+            self.position,  # Текущая позиция
+            (self.balance - self.initial_balance) / self.initial_balance,  # Нормализованная прибыль
+            (current_price - self.entry_price) / current_price if self.position != 0 else 0  # Текущий P&L
+        ])
+        
+        # Паттерны цены
+        returns = price_data['close'].pct_change().fillna(0)
+        features.extend([
+            returns.mean() * 100,
+            returns.std() * 100,
+            returns.iloc[-1] * 100
+        ])
+        
+        # Дополняем до нужного размера
+        while len(features) < 50:
+            features.append(0)
+        
+        # Окно из одного бара (первый шаг): std не определено - признак 0, а не NaN в сети
+        return np.nan_to_num(np.array(features[:50], dtype=np.float32), nan=0.0, posinf=0.0, neginf=0.0)
+    
+    def step(self, action: int) -> Tuple[np.ndarray, float, bool, Dict]:
+        """
+        Выполняет действие в среде
+        
+        Args:
+            action: 0 - hold, 1 - buy, 2 - sell
+            
+        Returns:
+            state: Новое состояние
+            reward: Награда
+            done: Завершен ли эпизод
+            info: Дополнительная информация
+        """
+        if self.done:
+            return self._get_state(), 0, True, {}
+        
+        current_price = self.market_data.iloc[self.current_step]['close']
+        reward = 0
+        info = {}
+        
+        # Выполняем действие
+        if action == 1 and self.position <= 0:  # Buy
+            if self.position == -1:  # Закрываем short
+                profit = (self.entry_price - current_price) * abs(self.position)
+                self.balance += profit
+                reward += profit / self.initial_balance * 100
+                
+            self.position = 1
+            self.entry_price = current_price
+            info['action'] = 'buy'
+            
+        elif action == 2 and self.position >= 0:  # Sell
+            if self.position == 1:  # Закрываем long
+                profit = (current_price - self.entry_price) * self.position
+                self.balance += profit
+                reward += profit / self.initial_balance * 100
+                
+            self.position = -1
+            self.entry_price = current_price
+            info['action'] = 'sell'
+            
+        else:  # Hold
+            if self.position != 0:
+                # Награда за удержание прибыльной позиции
+                unrealized_pnl = (current_price - self.entry_price) * self.position
+                reward += unrealized_pnl / self.initial_balance * 10  # Меньше, чем за закрытие
+            info['action'] = 'hold'
+        
+        # Штраф за большую просадку
+        drawdown = (self.balance - self.initial_balance) / self.initial_balance
+        if drawdown < -0.1:  # Более 10% убытка
+            reward -= abs(drawdown) * 10
+        
+        # Переход к следующему шагу
+        self.current_step += 1
+        
+        # Проверка завершения
+        if self.current_step >= len(self.market_data) - 1:
+            self.done = True
+            # Закрываем открытую позицию
+            if self.position != 0:
+                final_price = self.market_data.iloc[-1]['close']
+                final_pnl = (final_price - self.entry_price) * self.position
+                self.balance += final_pnl
+                reward += final_pnl / self.initial_balance * 100
+        
+        # Банкротство
+        if self.balance <= self.initial_balance * 0.5:
+            self.done = True
+            reward -= 100  # Большой штраф за банкротство
+        
+        new_state = self._get_state()
+        info['balance'] = self.balance
+        info['position'] = self.position
+        
+        return new_state, reward, self.done, info
+
+
+
+class VectorizedTradingEnvironment:
+    """
+    Батч эпизодов TradingEnvironment по одним рыночным данным
+
+    Состояния и награды совпадают с TradingEnvironment при тех же
+    действиях; reset/step работают сразу для n_envs эпизодов.
+    """
+
+    def __init__(self, market_data: pd.DataFrame, n_envs: int = 1,
+                 initial_balance: float = 10000):
+        self.market_data = market_data
+        self.initial_balance = initial_balance
+        self.n_envs = n_envs
+        self.close = market_data['close'].to_numpy(dtype=np.float64)
+        self.n_bars = len(market_data)
+        self.market_states = market_state_features(market_data)
+        self.reset()
+
+    def reset(self, n_envs: int = None) -> np.ndarray:
+        """Сброс всех эпизодов батча; n_envs - новый размер батча"""
+        self.n_envs = n_envs or self.n_envs
+        self.current_step = np.zeros(self.n_envs, dtype=np.int64)
+        self.balance = np.full(self.n_envs, float(self.initial_balance))
+        self.position = np.zeros(self.n_envs, dtype=np.int64)  # 0 - нет позиции, 1 - long, -1 - short
+        self.entry_price = np.zeros(self.n_envs)
+        self.done = np.zeros(self.n_envs, dtype=bool)
+
+        return self._get_states()
+
+    def _get_states(self) -> np.ndarray:
+        """Состояния эпизодов: рыночная часть из таблицы + информация о позиции"""
+        states = self.market_states[self.current_step]
+        live = self.current_step < self.n_bars - 1  # После последнего бара - пустое состояние
+        price = self.close[self.current_step]
+        in_position = live & (self.position != 0)
+
+        states[:, POSITION_COLUMN] = np.where(live, self.position, 0)
+        states[:, PROFIT_COLUMN] = np.where(live, (self.balance - self.initial_balance) / self.initial_balance, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            states[:, PNL_COLUMN] = np.where(in_position, (price - self.entry_price) / price, 0)
+        return np.nan_to_num(states.astype(np.float32), nan=0.0, posinf=0.0, neginf=0.0)
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, Any]]:
+        """
+        Выполняет действия всех эпизодов батча
+
+        Args:
+            actions: Массив действий (0 - hold, 1 - buy, 2 - sell) на эпизод
+
+        Returns:
+            states: Новые состояния (n_envs, STATE_SIZE)
+            rewards: Награды (0 у уже завершенных эпизодов)
+            done: Завершены ли эпизоды
+            info: balance, position и active (эпизоды, сделавшие этот шаг)
+        """
+        actions = np.asarray(actions)
+        active = ~self.done
+        init = self.initial_balance
+        price = self.close[self.current_step]
+        rewards = np.zeros(self.n_envs)
+
+        buy = active & (actions == 1) & (self.position <= 0)
+        sell = active & (actions == 2) & (self.position >= 0)
+        hold = active & ~buy & ~sell
+
+        # Разворот закрывает встречную позицию (short при buy, long при sell)
+        closing = (buy | sell) & (self.position != 0)
+        profit = np.where(closing, (price - self.entry_price) * self.position, 0)
+        self.balance += profit
+        rewards += profit / init * 100
+
+        self.position = np.where(buy, 1, np.where(sell, -1, self.position))
+        self.entry_price = np.where(buy | sell, price, self.entry_price)
+
+        # Награда за удержание позиции - меньше, чем за закрытие
+        unrealized_pnl = (price - self.entry_price) * self.position
+        rewards += np.where(hold, unrealized_pnl / init * 10, 0)
+
+        # Штраф за большую просадку (более 10% убытка)
+        drawdown = (self.balance - init) / init
+        rewards -= np.where(active & (drawdown < -0.1), np.abs(drawdown) * 10, 0)
+
+        # Переход к следующему шагу
+        self.current_step += active
+
+        # Конец данных: закрываем открытую позицию
+        finished = active & (self.current_step >= self.n_bars - 1)
+        final_pnl = np.where(finished, (self.close[-1] - self.entry_price) * self.position, 0)
+        self.balance += final_pnl
+        rewards += final_pnl / init * 100
+        self.done |= finished
+
+        # Банкротство
+        bankrupt = active & (self.balance <= init * 0.5)
+        self.done |= bankrupt
+        rewards -= np.where(bankrupt, 100, 0)
+
+        info = {
+            'balance': self.balance.copy(),
+            'position': self.position.copy(),
+            'active': active
+        }
+        return self._get_states(), rewards, self.done.copy(), info
+
+
+def market_state_features(market_data: pd.DataFrame) -> np.ndarray:
+    """
+    Рыночная часть состояния каждого бара (n_bars, STATE_SIZE)
+
+    Как TradingEnvironment._get_state: z-оценки последней свечи в окне
+    STATE_WINDOW баров (std с ddof=1, пропуски не учитываются), rsi и
+    macd, доходности окна (первая доходность окна - 0). Колонки позиции
+    и последняя строка (конец данных) - нули.
+    """
+    n_bars = len(market_data)
+    states = np.zeros((n_bars, STATE_SIZE))
+    if n_bars < 2:
+        return states
+
+    close = market_data['close'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i, column in enumerate(PRICE_COLUMNS):
+            values = market_data[column].to_numpy(dtype=np.float64)
+            mean, std = _window_stats(_trailing_windows(values))
+            if column == 'volume':
+                std = std + 1e-8
+            states[:, i] = (values - mean) / std
+
+        if 'rsi' in market_data.columns:
+            states[:, 4] = (market_data['rsi'].to_numpy(dtype=np.float64) - 50) / 50
+        if 'macd' in market_data.columns:
+            states[:, 5] = market_data['macd'].to_numpy(dtype=np.float64) / close
+
+        returns = np.r_[0.0, close[1:] / close[:-1] - 1]
+        windows = _trailing_windows(returns).copy()
+        windows[STATE_WINDOW - 1:, 0] = 0  # pct_change().fillna(0) внутри окна
+        mean, std = _window_stats(windows)
+        states[:, RETURNS_COLUMN] = mean * 100
+        states[:, RETURNS_COLUMN + 1] = std * 100
+        states[:, RETURNS_COLUMN + 2] = windows[:, -1] * 100
+
+    states[-1] = 0
+    return states
+
+
+def _trailing_windows(values: np.ndarray) -> np.ndarray:
+    """Окна STATE_WINDOW последних значений на каждый бар (в начале - короче, NaN слева)"""
+    padded = np.r_[np.full(STATE_WINDOW - 1, np.nan), values]
+    return sliding_window_view(padded, STATE_WINDOW)
+
+
+def _window_stats(windows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Среднее и std (ddof=1) строк без учета NaN - как mean()/std() pandas"""
+    count = np.sum(~np.isnan(windows), axis=1)
+    mean = np.nansum(windows, axis=1) / count
+    var = np.nansum((windows - mean[:, None]) ** 2, axis=1) / (count - 1)
+    return mean, np.sqrt(var)
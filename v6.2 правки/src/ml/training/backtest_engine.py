@@ -0,0 +1,399 @@
+"""
+Векторизованное ядро бэктестера на NumPy массивах
+Файл: src/ml/training/backtest_engine.py
+
+Старый Backtester.run_backtest на каждом баре делал market_data.iloc[i]
+(close/high/low), predictions.iloc[i] + .get(...) и работал со списками
+dataclass Trade - на многолетних 5m данных это минуты.
+
+Здесь:
+✅ Входы (OHLC, сигналы, уверенность, TP/SL) один раз векторно
+   превращаются в непрерывные float64/int8 массивы
+✅ Путезависимое состояние (баланс, до max_open_positions позиций,
+   SL/TP/трейлинг-стоп) считается в плотном цикле по примитивам,
+   пригодном для numba (@njit, если numba установлена)
+✅ Trade объекты создаются один раз в конце, только для сделок
+
+Порядок операций повторяет Backtester.run_backtest_legacy, поэтому
+результаты совпадают бит в бит.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# numba опциональна: без нее ядро работает как обычный Python по спискам
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+SIDE_LONG = 1
+SIDE_SHORT = -1
+
+EXIT_REASONS = {
+    1: 'stop_loss',
+    2: 'take_profit',
+    3: 'signal_reversal',
+    4: 'end_of_backtest'
+}
+
+# Колонки буфера сделок (float64): индекс -> имя
+_T_SIDE, _T_ENTRY_IDX, _T_ENTRY_PRICE, _T_SIZE = 0, 1, 2, 3
+_T_SL, _T_SL_SET, _T_TP, _T_TP_SET = 4, 5, 6, 7
+_T_COMMISSION, _T_MAX_PROFIT, _T_MAX_LOSS = 8, 9, 10
+_T_EXIT_IDX, _T_EXIT_PRICE, _T_PROFIT, _T_REASON = 11, 12, 13, 14
+_T_FIELDS = 15
+
+
+@dataclass
+class BacktestArrays:
+    """Входные данные бэктеста в виде непрерывных массивов"""
+    index: pd.Index
+    close: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    signal: np.ndarray        # int8: 1 buy, -1 sell, 0 прочее
+    confidence: np.ndarray
+    take_profit_percent: np.ndarray
+    stop_loss_percent: np.ndarray
+    strategy: np.ndarray      # object: имя стратегии на каждом баре
+    n_signals: int            # len(predictions): сигналы дальше не читаются
+
+
+@dataclass
+class SimulationOutput:
+    """Сырые результаты ядра"""
+    equity: np.ndarray
+    trades: np.ndarray        # (n_trades, _T_FIELDS)
+    trade_order: np.ndarray   # порядок добавления сделок в список trades
+    balance: float
+
+
+def prepare_arrays(market_data: pd.DataFrame, predictions: pd.DataFrame) -> BacktestArrays:
+    """
+    Векторное извлечение входов бэктеста
+
+    Значения по умолчанию - как в prediction.get(...) старого цикла.
+    """
+    n_signals = min(len(predictions), len(market_data))
+
+    def _column(name: str, default: float) -> np.ndarray:
+        if name in predictions.columns:
+            return predictions[name].to_numpy(dtype=np.float64)[:n_signals]
+        return np.full(n_signals, default, dtype=np.float64)
+
+    if 'signal' in predictions.columns:
+        raw_signal = predictions['signal'].to_numpy()[:n_signals]
+        signal = np.where(raw_signal == 'buy', SIDE_LONG,
+                          np.where(raw_signal == 'sell', SIDE_SHORT, 0)).astype(np.int8)
+    else:
+        signal = np.zeros(n_signals, dtype=np.int8)
+
+    if 'strategy' in predictions.columns:
+        strategy = predictions['strategy'].to_numpy(dtype=object)[:n_signals]
+    else:
+        strategy = np.full(n_signals, 'unknown', dtype=object)
+
+    return BacktestArrays(
+        index=market_data.index,
+        close=market_data['close'].to_numpy(dtype=np.float64),
+        high=market_data['high'].to_numpy(dtype=np.float64),
+        low=market_data['low'].to_numpy(dtype=np.float64),
+        signal=signal,
+        confidence=_column('confidence', 0.0),
+        take_profit_percent=_column('take_profit_percent', 2.0),
+        stop_loss_percent=_column('stop_loss_percent', 1.0),
+        strategy=strategy,
+        n_signals=n_signals
+    )
+
+
+# =================================================================
+# ЯДРО
+# =================================================================
+
+@njit(cache=True)
+def _close_trade(trades, t, price, bar, reason, commission, slippage):
+    """Закрытие сделки (повторяет Backtester._close_position)"""
+    if trades[t][_T_SIDE] == SIDE_LONG:
+        price *= (1 - slippage)
+    else:
+        price *= (1 + slippage)
+
+    size = trades[t][_T_SIZE]
+    entry = trades[t][_T_ENTRY_PRICE]
+    if trades[t][_T_SIDE] == SIDE_LONG:
+        profit = size * (price / entry - 1)
+    else:
+        profit = size * (1 - price / entry)
+
+    trades[t][_T_COMMISSION] += size * commission
+    trades[t][_T_EXIT_IDX] = bar
+    trades[t][_T_EXIT_PRICE] = price
+    trades[t][_T_PROFIT] = profit - trades[t][_T_COMMISSION]
+    trades[t][_T_REASON] = reason
+
+
+@njit(cache=True)
+def _simulate(close, high, low, signal, confidence, tp_pct, sl_pct, n_signals,
+              initial_balance, commission, slippage, max_position_size,
+              use_leverage, leverage, risk_per_trade, max_open, enable_shorting,
+              use_stop_loss, use_take_profit, trailing_stop, trailing_distance,
+              equity, trades, trade_order, open_ids, closing):
+    """
+    Путезависимая часть бэктеста
+
+    Все аргументы - примитивы и заранее выделенные буферы, поэтому функция
+    одинаково работает и как чистый Python, и под numba.
+
+    Returns:
+        (n_trades, n_closed, n_open, balance)
+    """
+    n = len(close)
+    balance = initial_balance
+    equity[0] = balance
+    n_trades = 0
+    n_closed = 0
+    n_open = 0
+
+    for i in range(1, n):
+        price = close[i]
+        bar_high = high[i]
+        bar_low = low[i]
+
+        # Проверяем открытые позиции
+        n_closing = 0
+        for k in range(n_open):
+            t = open_ids[k]
+            trade = trades[t]
+            is_long = trade[_T_SIDE] == SIDE_LONG
+
+            # Stop Loss (None и 0.0 в старом коде - "нет стопа")
+            if use_stop_loss and trade[_T_SL_SET] != 0 and trade[_T_SL] != 0:
+                if (is_long and bar_low <= trade[_T_SL]) or (not is_long and bar_high >= trade[_T_SL]):
+                    _close_trade(trades, t, trade[_T_SL], i, 1, commission, slippage)
+                    closing[n_closing] = k
+                    n_closing += 1
+                    continue
+
+            # Take Profit
+            if use_take_profit and trade[_T_TP_SET] != 0 and trade[_T_TP] != 0:
+                if (is_long and bar_high >= trade[_T_TP]) or (not is_long and bar_low <= trade[_T_TP]):
+                    _close_trade(trades, t, trade[_T_TP], i, 2, commission, slippage)
+                    closing[n_closing] = k
+                    n_closing += 1
+                    continue
+
+            # Максимальная прибыль/убыток
+            entry = trade[_T_ENTRY_PRICE]
+            if is_long:
+                current_profit = (price - entry) / entry
+            else:
+                current_profit = (entry - price) / entry
+
+            if current_profit > trade[_T_MAX_PROFIT]:
+                trade[_T_MAX_PROFIT] = current_profit
+            if current_profit < trade[_T_MAX_LOSS]:
+                trade[_T_MAX_LOSS] = current_profit
+
+            # Trailing Stop
+            if trailing_stop and current_profit > trailing_distance:
+                has_stop = trade[_T_SL_SET] != 0 and trade[_T_SL] != 0
+                if is_long:
+                    new_stop = price * (1 - trailing_distance)
+                    if not has_stop or new_stop > trade[_T_SL]:
+                        trade[_T_SL] = new_stop
+                else:
+                    new_stop = price * (1 + trailing_distance)
+                    if not has_stop or new_stop < trade[_T_SL]:
+                        trade[_T_SL] = new_stop
+                trade[_T_SL_SET] = 1
+
+        # Удаляем закрытые позиции (в обратном порядке, как sorted(..., reverse=True))
+        for c in range(n_closing - 1, -1, -1):
+            k = closing[c]
+            t = open_ids[k]
+            trade_order[n_closed] = t
+            n_closed += 1
+            balance += trades[t][_T_PROFIT]
+            for m in range(k, n_open - 1):
+                open_ids[m] = open_ids[m + 1]
+            n_open -= 1
+
+        # Новые позиции
+        if n_open < max_open and i < n_signals:
+            side = signal[i]
+            if side == SIDE_LONG or (side == SIDE_SHORT and enable_shorting):
+                sl_percent = sl_pct[i]
+                tp_percent = tp_pct[i]
+
+                # Размер позиции (Backtester._calculate_position_size)
+                risk_amount = balance * risk_per_trade
+                position_size = risk_amount / (sl_percent / 100)
+                position_size *= 0.5 + confidence[i] * 0.5
+                max_position = balance * max_position_size
+                if max_position < position_size:
+                    position_size = max_position
+                if use_leverage:
+                    position_size *= leverage
+
+                if position_size > 0:
+                    # Разворот: "закрываем" встречные позиции. Как и в старом
+                    # цикле, они остаются в списке открытых до SL/TP/конца теста
+                    if enable_shorting:
+                        for k in range(n_open):
+                            t = open_ids[k]
+                            if trades[t][_T_SIDE] == -side:
+                                _close_trade(trades, t, price, i, 3, commission, slippage)
+
+                    trade = trades[n_trades]
+                    trade[_T_SIDE] = side
+                    trade[_T_ENTRY_IDX] = i
+                    trade[_T_SIZE] = position_size
+                    trade[_T_COMMISSION] = position_size * commission
+                    trade[_T_MAX_PROFIT] = 0.0
+                    trade[_T_MAX_LOSS] = 0.0
+                    trade[_T_SL_SET] = 1 if use_stop_loss else 0
+                    trade[_T_TP_SET] = 1 if use_take_profit else 0
+                    if side == SIDE_LONG:
+                        entry = price * (1 + slippage)
+                        trade[_T_SL] = entry * (1 - sl_percent / 100) if use_stop_loss else 0.0
+                        trade[_T_TP] = entry * (1 + tp_percent / 100) if use_take_profit else 0.0
+                    else:
+                        entry = price * (1 - slippage)
+                        trade[_T_SL] = entry * (1 + sl_percent / 100) if use_stop_loss else 0.0
+                        trade[_T_TP] = entry * (1 - tp_percent / 100) if use_take_profit else 0.0
+                    trade[_T_ENTRY_PRICE] = entry
+
+                    open_ids[n_open] = n_trades
+                    n_open += 1
+                    n_trades += 1
+                    balance -= position_size + trade[_T_COMMISSION]
+
+        # Equity с учетом открытых позиций
+        current_equity = balance
+        for k in range(n_open):
+            trade = trades[open_ids[k]]
+            if trade[_T_SIDE] == SIDE_LONG:
+                current_equity += trade[_T_SIZE] * (price / trade[_T_ENTRY_PRICE])
+            else:
+                current_equity += trade[_T_SIZE] * (2 - price / trade[_T_ENTRY_PRICE])
+        equity[i] = current_equity
+
+    # Закрываем все открытые позиции
+    if n > 0:
+        for k in range(n_open):
+            t = open_ids[k]
+            _close_trade(trades, t, close[n - 1], n - 1, 4, commission, slippage)
+            trade_order[n_closed] = t
+            n_closed += 1
+            balance += trades[t][_T_PROFIT]
+
+    return n_trades, n_closed, n_open, balance
+
+
+def simulate(arrays: BacktestArrays, config: Any) -> SimulationOutput:
+    """
+    Прогон ядра по подготовленным массивам
+
+    Args:
+        arrays: Результат prepare_arrays
+        config: BacktestConfig
+    """
+    n = len(arrays.close)
+    # Сделка открывается только на баре с сигналом - это точная верхняя граница
+    capacity = int(np.count_nonzero(arrays.signal)) + 1
+    max_open = max(int(config.max_open_positions), 0)
+
+    equity = np.zeros(max(n, 1), dtype=np.float64)
+    trades = np.zeros((capacity, _T_FIELDS), dtype=np.float64)
+    trade_order = np.zeros(capacity, dtype=np.int64)
+    open_ids = np.zeros(max(max_open, 1), dtype=np.int64)
+    closing = np.zeros(max(max_open, 1), dtype=np.int64)
+
+    inputs = (arrays.close, arrays.high, arrays.low, arrays.signal, arrays.confidence,
+              arrays.take_profit_percent, arrays.stop_loss_percent)
+    buffers = (equity, trades, trade_order, open_ids, closing)
+    if not HAS_NUMBA:
+        # Для чистого Python списки Python float на порядок быстрее
+        # поэлементного доступа к numpy массивам
+        inputs = tuple(a.tolist() for a in inputs)
+        buffers = tuple(b.tolist() for b in buffers)
+
+    n_trades, n_closed, _, balance = _simulate(
+        *inputs, arrays.n_signals,
+        float(config.initial_balance), float(config.commission), float(config.slippage),
+        float(config.max_position_size), bool(config.use_leverage), float(config.leverage),
+        float(config.risk_per_trade), max_open, bool(config.enable_shorting),
+        bool(config.use_stop_loss), bool(config.use_take_profit),
+        bool(config.trailing_stop), float(config.trailing_stop_distance),
+        *buffers
+    )
+
+    if not HAS_NUMBA:
+        equity, trades, trade_order = (np.asarray(b) for b in buffers[:3])
+        trades = trades.reshape(capacity, _T_FIELDS)
+
+    return SimulationOutput(
+        equity=equity[:n],
+        trades=trades[:n_trades],
+        trade_order=trade_order[:n_closed].astype(np.int64),
+        balance=balance
+    )
+
+
+def build_trades(arrays: BacktestArrays, output: SimulationOutput, trade_cls: Any) -> List[Any]:
+    """Сделки ядра -> список Trade в порядке старого движка"""
+    index = arrays.index
+    trades = []
+    for t in output.trade_order.tolist():
+        row = output.trades[t]
+        entry_idx, exit_idx = int(row[_T_ENTRY_IDX]), int(row[_T_EXIT_IDX])
+        entry_time, exit_time = index[entry_idx], index[exit_idx]
+        size, profit = float(row[_T_SIZE]), float(row[_T_PROFIT])
+
+        trades.append(trade_cls(
+            entry_time=entry_time,
+            entry_price=float(row[_T_ENTRY_PRICE]),
+            position_size=size,
+            side='long' if row[_T_SIDE] == SIDE_LONG else 'short',
+            stop_loss=float(row[_T_SL]) if row[_T_SL_SET] else None,
+            take_profit=float(row[_T_TP]) if row[_T_TP_SET] else None,
+            exit_time=exit_time,
+            exit_price=float(row[_T_EXIT_PRICE]),
+            profit=profit,
+            profit_percent=(profit / size) * 100,
+            commission_paid=float(row[_T_COMMISSION]),
+            exit_reason=EXIT_REASONS[int(row[_T_REASON])],
+            ml_confidence=float(arrays.confidence[entry_idx]),
+            strategy=arrays.strategy[entry_idx],
+            max_profit=float(row[_T_MAX_PROFIT]),
+            max_loss=float(row[_T_MAX_LOSS]),
+            duration=exit_time - entry_time
+        ))
+    return trades
+
+
+def get_engine_info() -> Dict[str, Any]:
+    """Информация о режиме ядра"""
+    return {'numba': HAS_NUMBA}
+
+
+__all__ = [
+    'BacktestArrays',
+    'SimulationOutput',
+    'prepare_arrays',
+    'simulate',
+    'build_trades',
+    'get_engine_info',
+    'HAS_NUMBA'
+]
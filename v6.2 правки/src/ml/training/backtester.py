@@ -7,6 +7,7 @@ import pandas as pd
 from typing import Dict, List, Tuple, Optional, Any, Callable
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
+import os
 import json
 from collections import defaultdict
 
@@ -16,9 +17,12 @@ from scipy import stats
 
 from ...logging.smart_logger import SmartLogger
 from ...core.database import SessionLocal
+from ...core.config import settings
 from ..models.classifier import DirectionClassifier
 from ..models.regressor import PriceLevelRegressor
 from ..strategy_selector import MLStrategySelector
+from .backtest_engine import prepare_arrays, simulate, build_trades
+from .walk_forward import build_windows, run_window, run_windows_in_pool
 
 
 @dataclass
@@ -141,18 +145,41 @@ class Backtester:
             total_bars=len(market_data)
         )
         
-        # Фильтруем по датам
-        if start_date:
-            mask = market_data.index >= start_date
-            market_data = market_data[mask]
-            features = features[mask]
-            predictions = predictions[mask]
+        market_data, features, predictions = self._filter_period(
+            market_data, features, predictions, start_date, end_date
+        )
         
-        if end_date:
-            mask = market_data.index <= end_date
-            market_data = market_data[mask]
-            features = features[mask]
-            predictions = predictions[mask]
+        # Векторная подготовка входов + плотный цикл по массивам
+        arrays = prepare_arrays(market_data, predictions)
+        output = simulate(arrays, self.config)
+        trades = build_trades(arrays, output, Trade)
+        
+        # Рассчитываем результаты
+        result = self._calculate_results(trades, output.equity, market_data)
+        
+        self.logger.info(
+            f"Бэктест завершен: Return={result.total_return_percent:.2f}%, "
+            f"Trades={result.total_trades}, WinRate={result.win_rate:.2f}%",
+            category='backtest'
+        )
+        
+        return result
+    
+    def run_backtest_legacy(self,
+                           market_data: pd.DataFrame,
+                           features: pd.DataFrame,
+                           predictions: pd.DataFrame,
+                           start_date: Optional[datetime] = None,
+                           end_date: Optional[datetime] = None) -> BacktestResult:
+        """
+        Построчная реализация бэктеста (iloc на каждом баре)
+        
+        Эталон для сверки с векторизованным ядром в run_backtest:
+        результаты обоих методов должны совпадать.
+        """
+        market_data, features, predictions = self._filter_period(
+            market_data, features, predictions, start_date, end_date
+        )
         
         # Инициализация
         balance = self.config.initial_balance
@@ -288,15 +315,25 @@ class Backtester:
             balance += position.profit
         
         # Рассчитываем результаты
-        result = self._calculate_results(trades, equity, market_data)
+        return self._calculate_results(trades, equity, market_data)
+    
+    def _filter_period(self, market_data: pd.DataFrame, features: pd.DataFrame,
+                       predictions: pd.DataFrame, start_date: Optional[datetime],
+                       end_date: Optional[datetime]) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """Фильтрует данные по датам"""
+        if start_date:
+            mask = market_data.index >= start_date
+            market_data = market_data[mask]
+            features = features[mask]
+            predictions = predictions[mask]
         
-        self.logger.info(
-            f"Бэктест завершен: Return={result.total_return_percent:.2f}%, "
-            f"Trades={result.total_trades}, WinRate={result.win_rate:.2f}%",
-            category='backtest'
-        )
+        if end_date:
+            mask = market_data.index <= end_date
+            market_data = market_data[mask]
+            features = features[mask]
+            predictions = predictions[mask]
         
-        return result
+        return market_data, features, predictions
     
     def _open_position(self, side: str, entry_time: datetime, entry_price: float,
                       position_size: float, sl_percent: float, tp_percent: float,
@@ -483,10 +520,16 @@ class Backtester:
                                 ml_models: Dict[str, Any],
                                 window_size: int = 252,  # 1 год
                                 step_size: int = 21,     # 1 месяц
-                                retrain_frequency: int = 63) -> Dict[str, Any]:
+                                retrain_frequency: int = 63,
+                                n_jobs: Optional[int] = None,
+                                seed: Optional[int] = None,
+                                on_result: Optional[Callable[[int, BacktestResult], None]] = None) -> Dict[str, Any]:
         """
         Walk-forward анализ для проверки устойчивости стратегии
         
+        Окна считаются параллельно в пуле процессов, данные передаются
+        воркерам через разделяемую память (см. walk_forward.py).
+        
         Args:
             market_data: Рыночные данные
             features: Признаки
@@ -494,37 +537,32 @@ class Backtester:
             window_size: Размер окна обучения
             step_size: Шаг сдвига окна
             retrain_frequency: Частота переобучения модели
+            n_jobs: Количество процессов (None - WALK_FORWARD_WORKERS, 1 - без пула)
+            seed: Seed предсказаний-заглушек (None - случайный)
+            on_result: Callback (номер окна, результат) по мере готовности окон
             
         Returns:
             Результаты walk-forward анализа
         """
+        n_jobs = n_jobs or settings.WALK_FORWARD_WORKERS or os.cpu_count() or 1
+        
         self.logger.info(
             "Запуск walk-forward анализа",
             category='backtest',
             window_size=window_size,
-            step_size=step_size
+            step_size=step_size,
+            n_jobs=n_jobs
         )
         
-        results = []
-        periods = []
+        windows = build_windows(len(market_data), window_size, step_size)
+        # Независимый поток случайных чисел на каждое окно: при fork
+        # воркеры иначе унаследовали бы одинаковое состояние np.random
+        seeds = np.random.SeedSequence(seed).spawn(len(windows))
         
-        for start_idx in range(0, len(market_data) - window_size - step_size, step_size):
-            # Определяем периоды
-            train_start = start_idx
-            train_end = start_idx + window_size
-            test_start = train_end
-            test_end = min(test_start + step_size, len(market_data))
-            
-            # Данные для обучения
-            train_market = market_data.iloc[train_start:train_end]
-            train_features = features.iloc[train_start:train_end]
-            
-            # Данные для тестирования
-            test_market = market_data.iloc[test_start:test_end]
-            test_features = features.iloc[test_start:test_end]
-            
+        periods = []
+        for _, train_start, train_end, test_start, test_end in windows:
             # Переобучаем модели если необходимо
-            if start_idx % retrain_frequency == 0:
+            if train_start % retrain_frequency == 0:
                 for model_name, model in ml_models.items():
                     if hasattr(model, 'train'):
                         self.logger.info(
@@ -534,28 +572,35 @@ class Backtester:
                         # Здесь должен быть код обучения модели
                         # model.train(train_features, train_labels)
             
-            # Получаем предсказания для тестового периода
-            predictions = pd.DataFrame(index=test_features.index)
-            
-            # Заглушка для предсказаний
-            # В реальности здесь должны быть предсказания от ML моделей
-            predictions['signal'] = np.random.choice(['buy', 'sell', 'hold'], size=len(test_features))
-            predictions['confidence'] = np.random.uniform(0.5, 1.0, size=len(test_features))
-            predictions['take_profit_percent'] = np.random.uniform(1.0, 3.0, size=len(test_features))
-            predictions['stop_loss_percent'] = np.random.uniform(0.5, 1.5, size=len(test_features))
-            predictions['strategy'] = 'ml_ensemble'
-            
-            # Запускаем бэктест на тестовом периоде
-            period_result = self.run_backtest(test_market, test_features, predictions)
-            
-            results.append(period_result)
             periods.append({
-                'train_start': train_market.index[0],
-                'train_end': train_market.index[-1],
-                'test_start': test_market.index[0],
-                'test_end': test_market.index[-1]
+                'train_start': market_data.index[train_start],
+                'train_end': market_data.index[train_end - 1],
+                'test_start': market_data.index[test_start],
+                'test_end': market_data.index[test_end - 1]
             })
         
+        use_pool = n_jobs > 1 and len(windows) > 1
+        if use_pool and not all(isinstance(df.index, pd.DatetimeIndex) for df in (market_data, features)):
+            # Разделяемая память (SharedFrame) - только для DatetimeIndex
+            self.logger.warning(
+                "Walk-forward без DatetimeIndex - окна считаются последовательно",
+                category='backtest'
+            )
+            use_pool = False
+        
+        if use_pool:
+            results = run_windows_in_pool(
+                self.config, market_data, features, windows, seeds,
+                n_jobs=min(n_jobs, len(windows)), on_result=on_result
+            )
+        else:
+            results = []
+            for window, window_seed in zip(windows, seeds):
+                period_result = run_window(self, market_data, features, window, window_seed)
+                results.append(period_result)
+                if on_result:
+                    on_result(window[0], period_result)
+        
         # Анализируем результаты
         analysis = self._analyze_walk_forward_results(results, periods)
         
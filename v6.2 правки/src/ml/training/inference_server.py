@@ -0,0 +1,408 @@
+"""
+Пакетный инференс для MLTrainer.predict
+Файл: src/ml/training/inference_server.py
+
+Раньше каждая стратегия по каждому символу вызывала MLTrainer.predict
+отдельно: извлечение признаков и три прохода модели (predict,
+predict_proba, get_confidence) на одну строку.
+
+Сервер инференса:
+✅ Собирает запросы в течение короткого окна (ML_BATCH_WINDOW_MS) или
+   до ML_BATCH_MAX_SIZE запросов
+✅ Одинаковые запросы пакета (символ, таймфрейм, данные) считаются один раз
+✅ Группирует строки по модели - один predict_proba на модель (строки всех
+   символов и стратегий с этой моделью в одной матрице); все модели пакета
+   считаются в одном потоке, event loop не блокируется
+✅ Модели, которых нет в памяти, загружаются из реестра в потоке
+✅ Кэширует предсказание на бар: повторный запрос той же строки (время
+   и значения предсказанной строки) в том же баре - поиск в словаре;
+   обновленный формирующийся бар с тем же временем считается заново
+✅ Считает задержку каждого запроса (перцентили p50/p90/p99)
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ...core.config import Config
+from ...logging.smart_logger import SmartLogger
+from ...market_data.candle_store import _timeframe_ms
+
+logger = SmartLogger(__name__)
+
+# (symbol, timeframe, use_ensemble, время и отпечаток значений предсказанной строки
+#  переданных данных; None, None - последняя строка признаков FeatureEngineer)
+CacheKey = Tuple[str, str, bool, Optional[pd.Timestamp], Optional[bytes]]
+
+# Записей в кэше на бар (старые вытесняются первыми)
+BAR_CACHE_SIZE = 4096
+
+
+def row_digest(values: np.ndarray) -> bytes:
+    """Отпечаток значений строки (OHLCV и признаки) - по значениям, не по адресам объектов"""
+    values = np.asarray(values).ravel()
+    try:
+        hashed = pd.util.hash_array(values)
+    except TypeError:
+        # Смешанные типы в object-колонках
+        hashed = pd.util.hash_array(values.astype(str))
+    return hashlib.blake2b(hashed.tobytes(), digest_size=8).digest()
+
+
+def bar_cache_key(symbol: str, timeframe: str, use_ensemble: bool,
+                  current_data: Optional[pd.DataFrame]) -> Optional[CacheKey]:
+    """Ключ кэша на бар; None - данные без DatetimeIndex не кэшируются"""
+    if current_data is None:
+        return symbol, timeframe, use_ensemble, None, None
+    if isinstance(current_data.index, pd.DatetimeIndex) and len(current_data) > 0:
+        # Предсказывается первая строка переданных данных; время не меняется,
+        # пока бар формируется, - поэтому в ключе и ее значения
+        return (symbol, timeframe, use_ensemble, current_data.index[0],
+                row_digest(current_data.values[:1]))
+    return None
+
+
+@dataclass
+class InferenceRequest:
+    """Запрос предсказания, ожидающий пакет"""
+    symbol: str
+    timeframe: str
+    use_ensemble: bool
+    current_data: Optional[pd.DataFrame]
+    future: asyncio.Future
+    X: Optional[np.ndarray] = None
+    bar_time: Optional[pd.Timestamp] = None
+    model: Any = None
+    result: Optional[Dict[str, Any]] = field(default=None, repr=False)
+
+    @cached_property
+    def cache_key(self) -> Optional[CacheKey]:
+        return bar_cache_key(self.symbol, self.timeframe, self.use_ensemble, self.current_data)
+
+    @property
+    def input_key(self) -> Tuple:
+        """Запросы с одинаковым ключом получают одинаковую строку признаков"""
+        data_id = None if self.current_data is None else id(self.current_data)
+        return self.symbol, self.timeframe, data_id
+
+
+class LatencyTracker:
+    """Задержки последних запросов"""
+
+    def __init__(self, history: int = 1000):
+        self._samples: Deque[float] = deque(maxlen=history)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentiles(self) -> Dict[str, float]:
+        """p50/p90/p99/max в миллисекундах"""
+        if not self._samples:
+            return {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0, 'samples': 0}
+        samples = np.fromiter(self._samples, dtype=np.float64) * 1000
+        p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+        return {
+            'p50': float(p50),
+            'p90': float(p90),
+            'p99': float(p99),
+            'max': float(samples.max()),
+            'samples': len(samples)
+        }
+
+
+class InferenceServer:
+    """
+    Микро-пакетный инференс поверх MLTrainer
+
+    Модели, признаки и формат ответа берутся у тренера (_load_model,
+    _prediction_input, _predict_rows, _format_prediction).
+    """
+
+    def __init__(self, trainer: Any, window_ms: Optional[float] = None,
+                 max_batch: Optional[int] = None, latency_history: int = 1000):
+        self.trainer = trainer
+        self.window = (window_ms if window_ms is not None else Config.ML_BATCH_WINDOW_MS) / 1000
+        self.max_batch = max_batch or Config.ML_BATCH_MAX_SIZE
+
+        self._pending: List[InferenceRequest] = []
+        self._collector: Optional[asyncio.Task] = None
+        # Event/Lock привязаны к циклу событий - создаются в _bind_loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        # Пакеты выполняются по очереди: модели не вызываются из двух потоков сразу
+        self._batch_lock: Optional[asyncio.Lock] = None
+
+        # Кэш на бар: ключ -> (время бара, отпечаток строки признаков, конец бара в мс, результат)
+        self._bar_cache: 'OrderedDict[CacheKey, Tuple[pd.Timestamp, bytes, int, Dict[str, Any]]]' = OrderedDict()
+
+        self.latency = LatencyTracker(latency_history)
+        self.stats = {
+            'requests': 0,
+            'cache_hits': 0,
+            'batches': 0,
+            'batched_requests': 0,
+            'rows_predicted': 0,
+            'model_calls': 0,
+            'errors': 0
+        }
+
+    # =================================================================
+    # ЗАПРОСЫ
+    # =================================================================
+
+    async def predict(self, symbol: str, current_data: Optional[pd.DataFrame] = None,
+                      timeframe: str = '5m', use_ensemble: bool = True) -> Dict[str, Any]:
+        """Предсказание (формат MLTrainer.predict)"""
+        start = time.perf_counter()
+        self.stats['requests'] += 1
+        try:
+            cached = self._cached_before_batch(symbol, timeframe, use_ensemble, current_data)
+            if cached is not None:
+                return cached
+
+            self._bind_loop()
+            request = InferenceRequest(
+                symbol, timeframe, use_ensemble, current_data,
+                self._loop.create_future()
+            )
+            self._enqueue(request)
+            return await request.future
+        finally:
+            self.latency.add(time.perf_counter() - start)
+
+    def _cached_before_batch(self, symbol: str, timeframe: str, use_ensemble: bool,
+                             current_data: Optional[pd.DataFrame]) -> Optional[Dict[str, Any]]:
+        key = bar_cache_key(symbol, timeframe, use_ensemble, current_data)
+        entry = self._bar_cache.get(key) if key is not None else None
+        if entry is None:
+            return None
+
+        # Переданные данные: время и значения строки уже в ключе. Признаки:
+        # последний бар еще не закрыт - новых признаков быть не может
+        _, _, bar_end_ms, result = entry
+        if current_data is None and time.time() * 1000 >= bar_end_ms:
+            return None
+
+        self.stats['cache_hits'] += 1
+        return dict(result)
+
+    def _bind_loop(self):
+        """
+        Event/Lock пакетов для текущего цикла событий
+
+        Сервер живет дольше одного цикла (MLTrainer из разных asyncio.run):
+        при смене цикла примитивы создаются заново, а запросы и сборщик
+        прежнего цикла остаются с ним.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._batch_full = asyncio.Event()
+        self._batch_lock = asyncio.Lock()
+        self._pending = []
+        self._collector = None
+
+    def _enqueue(self, request: InferenceRequest):
+        self._pending.append(request)
+        if len(self._pending) >= self.max_batch:
+            self._batch_full.set()
+        if self._collector is None or self._collector.done():
+            self._collector = asyncio.create_task(self._collect())
+
+    async def _collect(self):
+        """Ждет окно (или полный пакет) и выполняет накопленные запросы"""
+        try:
+            await asyncio.wait_for(self._batch_full.wait(), timeout=self.window)
+        except asyncio.TimeoutError:
+            pass
+
+        batch, self._pending = self._pending, []
+        self._batch_full.clear()
+        # Следующие запросы собираются в новое окно, пока выполняется этот пакет
+        self._collector = None
+
+        async with self._batch_lock:
+            try:
+                await self._run_batch(batch)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ Ошибка пакета предсказаний: {e}", category='ml', error=str(e))
+                for request in batch:
+                    request.result = request.result or {'success': False, 'error': str(e)}
+            finally:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_result(
+                            request.result or {'success': False, 'error': 'Предсказание не выполнено'}
+                        )
+
+    # =================================================================
+    # ПАКЕТ
+    # =================================================================
+
+    async def _run_batch(self, batch: List[InferenceRequest]):
+        # Запросы, от которых уже отказались (таймаут стратегии), не считаем
+        batch = [request for request in batch if not request.future.done()]
+        if not batch:
+            return
+        self.stats['batches'] += 1
+        self.stats['batched_requests'] += len(batch)
+
+        # === 1. МОДЕЛИ (загрузка из реестра - в потоке) ===
+        model_keys = list(dict.fromkeys((r.symbol, r.timeframe, r.use_ensemble) for r in batch))
+        loaded = await asyncio.gather(*(
+            self._load_model(*key) for key in model_keys
+        ), return_exceptions=True)
+        models = dict(zip(model_keys, loaded))
+        for request in batch:
+            request.model = models[(request.symbol, request.timeframe, request.use_ensemble)]
+            if isinstance(request.model, BaseException):
+                request.result = {'success': False, 'error': str(request.model)}
+            elif request.model is None:
+                request.result = {
+                    'success': False,
+                    'error': f'Модель для {request.symbol} не найдена. Требуется обучение.'
+                }
+        batch = [request for request in batch if request.result is None]
+
+        # === 2. ПРИЗНАКИ (одинаковые входы - один раз, параллельно) ===
+        unique: Dict[Tuple, InferenceRequest] = {}
+        for request in batch:
+            unique.setdefault(request.input_key, request)
+        inputs = await asyncio.gather(*(
+            self.trainer._prediction_input(r.symbol, r.timeframe, r.current_data)
+            for r in unique.values()
+        ), return_exceptions=True)
+        resolved = dict(zip(unique.keys(), inputs))
+
+        pending = []
+        for request in batch:
+            value = resolved[request.input_key]
+            if isinstance(value, BaseException):
+                request.result = {'success': False, 'error': str(value)}
+                continue
+            request.X, request.bar_time = value
+            if request.X is None:
+                request.result = {'success': False, 'error': 'Нет данных для предсказания'}
+                continue
+
+            # Бар уже предсказан этой же моделью (данные строки не обновились)
+            entry = self._bar_cache.get(request.cache_key) if request.cache_key is not None else None
+            if (entry is not None and request.bar_time is not None and entry[0] == request.bar_time
+                    and entry[1] == row_digest(request.X)):
+                self.stats['cache_hits'] += 1
+                request.result = dict(entry[3])
+                continue
+            pending.append(request)
+
+        # === 3. ОДИН PREDICT_PROBA НА МОДЕЛЬ, ВСЕ МОДЕЛИ - В ОДНОМ ПОТОКЕ ===
+        groups: Dict[Tuple[int, int], List[InferenceRequest]] = {}
+        for request in pending:
+            groups.setdefault((id(request.model), request.X.shape[1]), []).append(request)
+        if not groups:
+            return
+
+        stacked = []
+        for requests in groups.values():
+            # Одинаковые входы (символ и данные) - одна строка матрицы модели
+            rows: Dict[Tuple, int] = {}
+            inputs = []
+            for request in requests:
+                if request.input_key not in rows:
+                    rows[request.input_key] = len(rows)
+                    inputs.append(request.X)
+            stacked.append((requests, rows, np.vstack(inputs)))
+
+        outputs = await asyncio.to_thread(
+            self._predict_stacked, [(requests[0].model, X) for requests, _, X in stacked]
+        )
+        for (requests, rows, X), output in zip(stacked, outputs):
+            self._finish_group(requests, rows, X, output)
+
+    async def _load_model(self, symbol: str, timeframe: str, use_ensemble: bool):
+        """Модель тренера: из памяти сразу, из реестра или с диска - в потоке"""
+        if f"{symbol}_{timeframe}" in self.trainer.models:
+            return self.trainer._load_model(symbol, timeframe, use_ensemble)
+        return await asyncio.to_thread(self.trainer._load_model, symbol, timeframe, use_ensemble)
+
+    def _predict_stacked(self, groups: List[Tuple[Any, np.ndarray]]) -> List[Any]:
+        """Предсказания всех групп (в потоке); ошибка группы не мешает остальным"""
+        outputs = []
+        for model, X in groups:
+            try:
+                outputs.append(self.trainer._predict_rows(model, X))
+            except Exception as e:
+                outputs.append(e)
+        return outputs
+
+    def _finish_group(self, requests: List[InferenceRequest], rows: Dict[Tuple, int],
+                      X: np.ndarray, output: Any):
+        """Ответы запросов одной модели и запись в кэш на бар"""
+        if isinstance(output, Exception):
+            self.stats['errors'] += 1
+            logger.error(
+                f"❌ Ошибка предсказания для {requests[0].symbol}: {output}",
+                category='ml',
+                symbol=requests[0].symbol,
+                error=str(output)
+            )
+            for request in requests:
+                request.result = {'success': False, 'error': str(output)}
+            return
+
+        prediction, proba, confidence = output
+        self.stats['model_calls'] += 1
+        self.stats['rows_predicted'] += len(X)
+
+        for request in requests:
+            row = rows[request.input_key]
+            request.result = self.trainer._format_prediction(
+                request.symbol, prediction[row], proba[row], confidence[row], request.use_ensemble
+            )
+            if request.bar_time is not None and request.cache_key is not None:
+                bar_end_ms = request.bar_time.value // 1_000_000 + _timeframe_ms(request.timeframe)
+                self._bar_cache[request.cache_key] = (
+                    request.bar_time, row_digest(request.X), bar_end_ms, request.result
+                )
+                self._bar_cache.move_to_end(request.cache_key)
+                while len(self._bar_cache) > BAR_CACHE_SIZE:
+                    self._bar_cache.popitem(last=False)
+            request.result = dict(request.result)
+
+    # =================================================================
+    # УПРАВЛЕНИЕ
+    # =================================================================
+
+    def invalidate(self, symbol: Optional[str] = None, timeframe: Optional[str] = None):
+        """Сбросить кэш предсказаний (например, после переобучения модели)"""
+        for key in list(self._bar_cache):
+            if (symbol is None or key[0] == symbol) and (timeframe is None or key[1] == timeframe):
+                del self._bar_cache[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика и перцентили задержки (мс)"""
+        batches = self.stats['batches']
+        return {
+            **self.stats,
+            'avg_batch_rows': self.stats['rows_predicted'] / max(self.stats['model_calls'], 1),
+            'avg_batch_requests': self.stats['batched_requests'] / batches if batches else 0.0,
+            'cached_bars': len(self._bar_cache),
+            'window_ms': self.window * 1000,
+            'latency_ms': self.latency.percentiles()
+        }
+
+
+__all__ = [
+    'bar_cache_key',
+    'row_digest',
+    'InferenceRequest',
+    'InferenceServer',
+    'LatencyTracker'
+]
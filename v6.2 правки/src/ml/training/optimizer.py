@@ -1,33 +1,184 @@
 """
 Оптимизатор гиперпараметров для ML моделей
 Файл: src/ml/training/optimizer.py
+
+✅ Исследования Optuna в постоянном хранилище (OPTUNA_STORAGE: файл
+   журнала или URL БД): несколько процессов работают над одним
+   исследованием, после падения оптимизация продолжается с места остановки
+✅ Средний score после каждого фолда TimeSeriesSplit уходит в pruner -
+   заведомо слабые trials останавливаются на первых, самых дешевых фолдах
+✅ Признаки считаются один раз на датасет, фолды - срезы готовой матрицы;
+   колонки индикаторов с параметрами trial - из кэша (IndicatorFeatureMatrix)
 """
 import optuna
 import numpy as np
 import pandas as pd
 from typing import Dict, Any, List, Tuple, Optional, Callable
 from datetime import datetime, timedelta
+from dataclasses import dataclass
+from pathlib import Path
 import json
+import os
+import socket
 import asyncio
 from concurrent.futures import ProcessPoolExecutor
 import joblib
 
+from optuna.storages import JournalStorage, RDBStorage, RetryFailedTrialCallback
+from optuna.storages.journal import JournalFileBackend
+from optuna.study import MaxTrialsCallback
+from optuna.trial import TrialState
 from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import xgboost as xgb
-from tensorflow.keras import backend as K
 
 from ..models.classifier import DirectionClassifier
 from ..models.regressor import PriceLevelRegressor
 from ..features.feature_engineering import FeatureEngineer
+from ..features.indicator_cache import IndicatorFeatureMatrix, data_fingerprint
 from .trainer import MLTrainer
-from .backtester import MLBacktester
+from ..labeling import direction_labels, forward_return
+from .walk_forward import SharedFrame, SharedFrameSpec, attach_frame
+from ...core.config import config
 from ...core.database import SessionLocal
 from ...logging.smart_logger import SmartLogger
 
 
 logger = SmartLogger(__name__)
 
+# Состояния trials, которые расходуют бюджет исследования
+FINISHED_STATES = (TrialState.COMPLETE, TrialState.PRUNED, TrialState.FAIL)
+
+# Пульс RUNNING trials в БД: trial без пульса дольше 2 интервалов - FAIL и повтор
+HEARTBEAT_INTERVAL = 60
+
+# system_attrs trial: процесс-владелец {'host', 'pid'} (журнал без пульса)
+TRIAL_OWNER_ATTR = 'owner'
+
+
+# =================================================================
+# ХРАНИЛИЩЕ ИССЛЕДОВАНИЙ
+# =================================================================
+
+def create_storage(url: Optional[str] = None):
+    """
+    Хранилище исследований Optuna
+
+    'sqlite:///...', 'postgresql://...' - RDBStorage с пульсом trials;
+    путь к файлу - JournalStorage (дозапись в файл с блокировкой, надежнее
+    SQLite при нескольких процессах); пустая строка - в памяти (None).
+    """
+    url = config.OPTUNA_STORAGE if url is None else url
+    if not url:
+        return None
+
+    if '://' in url:
+        return RDBStorage(
+            url,
+            heartbeat_interval=HEARTBEAT_INTERVAL,
+            grace_period=HEARTBEAT_INTERVAL * 2,
+            failed_trial_callback=RetryFailedTrialCallback(max_retry=1)
+        )
+
+    Path(url).parent.mkdir(parents=True, exist_ok=True)
+    return JournalStorage(JournalFileBackend(url))
+
+
+def claim_trial(trial: optuna.Trial):
+    """Записать в trial процесс-владелец (для recover_stale_trials)"""
+    trial.storage.set_trial_system_attr(
+        trial._trial_id, TRIAL_OWNER_ATTR, {'host': socket.gethostname(), 'pid': os.getpid()}
+    )
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # процесс есть, но чужой
+    return True
+
+
+def _is_stale(trial: optuna.trial.FrozenTrial, now: datetime) -> bool:
+    """
+    RUNNING trial брошен: владелец на этом хосте завершился; владелец на
+    другом хосте (или не записан) - trial старше OPTUNA_STALE_TRIAL_SECONDS
+    """
+    owner = trial.system_attrs.get(TRIAL_OWNER_ATTR)
+    if owner and owner.get('host') == socket.gethostname():
+        return not _process_alive(owner['pid'])
+    started = trial.datetime_start
+    return started is None or (now - started).total_seconds() > config.OPTUNA_STALE_TRIAL_SECONDS
+
+
+def recover_stale_trials(study: optuna.Study) -> int:
+    """
+    Trials, оставшиеся RUNNING после падения процесса: FAIL и повтор
+
+    Живые trials других воркеров и запусков не трогаются: брошенным
+    считается trial, владелец которого завершился (см. _is_stale).
+    В RDBStorage это делает пульс (heartbeat).
+    """
+    if isinstance(study._storage, RDBStorage):
+        return 0
+
+    now = datetime.now()
+    stale = [
+        trial for trial in study.get_trials(deepcopy=False, states=(TrialState.RUNNING,))
+        if _is_stale(trial, now)
+    ]
+    for trial in stale:
+        study._storage.set_trial_state_values(trial._trial_id, TrialState.FAIL)
+        if trial.params:
+            study.enqueue_trial(trial.params)
+
+    if stale:
+        logger.warning(
+            f"Исследование {study.study_name}: {len(stale)} брошенных trials повторяются",
+            category='ml'
+        )
+    return len(stale)
+
+
+# =================================================================
+# ПРОЦЕССЫ-ВОРКЕРЫ
+# =================================================================
+
+@dataclass
+class StudyTask:
+    """Задание процесса-воркера: все для работы над общим исследованием"""
+    model_type: str
+    study_name: str
+    storage: str
+    n_trials: int
+    timeout: Optional[float]
+    seed: int
+    settings: Dict[str, Any]
+    feature_engineer: Any
+    data: Any  # SharedFrameSpec или DataFrame
+
+
+# Блоки разделяемой памяти процесса-воркера живут до его завершения
+_worker_handles: List[Any] = []
+
+
+def _run_study_worker(task: StudyTask) -> List[Dict[str, Any]]:
+    """Trials общего исследования в процессе-воркере; результат - история trials"""
+    data = task.data
+    if isinstance(data, SharedFrameSpec):
+        handle, data = attach_frame(data)
+        _worker_handles.append(handle)
+
+    optimizer = HyperparameterOptimizer(task.model_type)
+    for name, value in task.settings.items():
+        setattr(optimizer, name, value)
+
+    study = optimizer._create_study(task.study_name, task.storage, task.seed)
+    optimizer._run_study(study, data, task.feature_engineer, task.n_trials, task.timeout)
+    return optimizer.optimization_history
+
 
 class HyperparameterOptimizer:
     """
@@ -42,15 +193,23 @@ class HyperparameterOptimizer:
         
         # Настройки оптимизации
         self.n_trials = 100
-        self.n_jobs = 4
+        self.n_jobs = config.OPTUNA_WORKERS or os.cpu_count() or 1  # Процессы на исследование
         self.timeout = 3600  # 1 час
+        self.storage = config.OPTUNA_STORAGE
+        
+        # Pruner: медиана промежуточных score прошлых trials на том же фолде
+        self.pruner_startup_trials = 5  # Первые trials доходят до конца
+        self.pruner_warmup_folds = 0  # Отсечение с первого фолда (самый короткий train - самый дешевый)
         
         # Настройки валидации
         self.n_splits = 5
         self.test_size = 0.2
         
-        # Пул процессов для параллельной оптимизации
-        self.executor = ProcessPoolExecutor(max_workers=self.n_jobs)
+        # Потоки модели (в процессах-воркерах - 1, параллельны сами процессы)
+        self.model_n_jobs = -1
+        
+        # Матрицы признаков последнего датасета под параметры индикаторов trials
+        self._matrices: Optional[IndicatorFeatureMatrix] = None
     
     def get_search_space(self, trial: optuna.Trial) -> Dict[str, Any]:
         """
@@ -169,8 +328,14 @@ class HyperparameterOptimizer:
                   feature_engineer: FeatureEngineer) -> float:
         """
         Целевая функция для оптимизации
+
+        После каждого фолда средний score готовых фолдов уходит в
+        trial.report: trial хуже медианы прошлых на том же фолде
+        останавливается (TrialPruned), остальные фолды не обучаются.
         """
         try:
+            claim_trial(trial)
+            
             # Получаем гиперпараметры
             params = self.get_search_space(trial)
             
@@ -181,26 +346,25 @@ class HyperparameterOptimizer:
                 params=params
             )
             
+            # Извлекаем признаки с оптимизированными параметрами
+            feature_params = {k: v for k, v in params.items() 
+                            if k in ['rsi_period', 'macd_fast', 'macd_slow', 
+                                    'bb_period', 'atr_period']}
+            
+            # Обновляем параметры feature engineer
+            for param, value in feature_params.items():
+                setattr(feature_engineer, param, value)
+            
+            # Подготавливаем данные один раз, фолды - срезы
+            X, y = self._prepare_data(data, feature_engineer, params)
+            
             # Временная валидация с TimeSeriesSplit
             tscv = TimeSeriesSplit(n_splits=self.n_splits)
             scores = []
             
-            for train_idx, val_idx in tscv.split(data):
-                train_data = data.iloc[train_idx]
-                val_data = data.iloc[val_idx]
-                
-                # Извлекаем признаки с оптимизированными параметрами
-                feature_params = {k: v for k, v in params.items() 
-                                if k in ['rsi_period', 'macd_fast', 'macd_slow', 
-                                        'bb_period', 'atr_period']}
-                
-                # Обновляем параметры feature engineer
-                for param, value in feature_params.items():
-                    setattr(feature_engineer, param, value)
-                
-                # Подготавливаем данные
-                X_train, y_train = self._prepare_data(train_data, feature_engineer, params)
-                X_val, y_val = self._prepare_data(val_data, feature_engineer, params)
+            for fold, (train_idx, val_idx) in enumerate(tscv.split(X)):
+                X_train, y_train = X[train_idx], y[train_idx]
+                X_val, y_val = X[val_idx], y[val_idx]
                 
                 # Обучаем модель
                 model = self._create_model(params)
@@ -213,7 +377,18 @@ class HyperparameterOptimizer:
                 # Освобождаем память
                 del model
                 if self.model_type == 'neural_network':
+                    from tensorflow.keras import backend as K
                     K.clear_session()
+                
+                # Промежуточное значение для pruner
+                trial.report(float(np.mean(scores)), step=fold)
+                if trial.should_prune():
+                    logger.info(
+                        f"Trial #{trial.number} остановлен после фолда {fold + 1}/{self.n_splits}",
+                        category='ml',
+                        score=float(np.mean(scores))
+                    )
+                    raise optuna.TrialPruned()
             
             # Средний score по всем фолдам
             avg_score = np.mean(scores)
@@ -235,44 +410,49 @@ class HyperparameterOptimizer:
             
             return avg_score
             
+        except optuna.TrialPruned:
+            raise
         except Exception as e:
             logger.error(
                 f"Ошибка в trial #{trial.number}: {str(e)}",
                 category='ml',
                 error=str(e)
             )
-            return 0.0
+            # FAIL в исследовании: 0.0 был бы лучшим score для регрессора (-MAE)
+            raise
     
     def _prepare_data(self, data: pd.DataFrame, feature_engineer: FeatureEngineer,
                      params: Dict) -> Tuple[np.ndarray, np.ndarray]:
         """Подготовка данных для обучения"""
         # Извлекаем признаки
-        features = feature_engineer.extract_features(
-            data,
-            include_volume=params.get('use_volume_features', True),
-            include_market=params.get('use_market_features', True)
-        )
+        features = self._feature_matrix(data, feature_engineer)
         
         # Создаем целевую переменную
+        horizon = params.get('prediction_horizon', 5)
         if self.model_type in ['classifier', 'xgboost']:
             min_change = params.get('min_price_change', 0.002)
-            y = feature_engineer.create_labels(
-                data,
-                min_price_change=min_change,
-                horizon=params.get('prediction_horizon', 5)
-            )
+            y = direction_labels(data['close'], horizon, threshold=min_change)
         else:
-            # Для регрессора - предсказываем уровни цен
-            y = feature_engineer.create_price_targets(
-                data,
-                horizon=params.get('prediction_horizon', 5)
-            )
+            # Для регрессора - предсказываем изменение цены (в %)
+            y = forward_return(data['close'], horizon) * 100
         
         # Убираем NaN
         mask = ~(np.isnan(features).any(axis=1) | np.isnan(y))
         
         return features[mask], y[mask]
     
+    def _feature_matrix(self, data: pd.DataFrame, feature_engineer: FeatureEngineer) -> np.ndarray:
+        """
+        Матрица признаков датасета под параметры индикаторов trial
+
+        Ядро признаков считается один раз на датасет; колонки индикаторов
+        с параметрами trial берутся из кэша - считаются только новые.
+        """
+        matrices = self._matrices
+        if matrices is None or not matrices.matches(data, feature_engineer):
+            matrices = self._matrices = IndicatorFeatureMatrix(data, feature_engineer)
+        return matrices.build(feature_engineer.indicator_params())
+    
     def _create_model(self, params: Dict):
         """Создает модель с заданными параметрами"""
         if self.model_type == 'classifier':
@@ -284,7 +464,7 @@ class HyperparameterOptimizer:
                 min_samples_leaf=params['min_samples_leaf'],
                 max_features=params['max_features'],
                 class_weight=params['class_weight'],
-                n_jobs=-1,
+                n_jobs=self.model_n_jobs,
                 random_state=42
             )
         
@@ -444,46 +624,149 @@ class HyperparameterOptimizer:
             y_pred = model.predict(X_val)
             return -mean_absolute_error(y_val, y_pred)
     
+    def _create_study(self, study_name: str, storage: Optional[str], seed: int) -> optuna.Study:
+        """Исследование в хранилище (существующее - продолжается)"""
+        return optuna.create_study(
+            study_name=study_name,
+            storage=create_storage(storage),
+            load_if_exists=True,
+            direction='maximize',
+            # constant_liar: параллельные воркеры не выбирают одни и те же точки
+            sampler=optuna.samplers.TPESampler(seed=seed, constant_liar=True),
+            pruner=optuna.pruners.MedianPruner(
+                n_startup_trials=self.pruner_startup_trials,
+                n_warmup_steps=self.pruner_warmup_folds
+            )
+        )
+    
+    def _run_study(self, study: optuna.Study, data: pd.DataFrame,
+                   feature_engineer: FeatureEngineer, n_trials: int,
+                   timeout: Optional[float]):
+        """
+        Trials до n_trials завершенных во всем исследовании
+
+        Бюджет общий для всех воркеров и запусков: продолженное после
+        падения исследование добирает только недостающие trials.
+        """
+        if len(study.get_trials(deepcopy=False, states=FINISHED_STATES)) >= n_trials:
+            return
+        
+        study.optimize(
+            lambda trial: self.objective(trial, data, feature_engineer),
+            timeout=timeout,
+            callbacks=[MaxTrialsCallback(n_trials, states=FINISHED_STATES)],
+            catch=(Exception,)
+        )
+    
+    def _worker_settings(self) -> Dict[str, Any]:
+        """Настройки экземпляра, которые получают процессы-воркеры"""
+        return {
+            'n_splits': self.n_splits,
+            'pruner_startup_trials': self.pruner_startup_trials,
+            'pruner_warmup_folds': self.pruner_warmup_folds,
+            'model_n_jobs': 1
+        }
+    
+    def _run_in_pool(self, jobs: List[Tuple[str, pd.DataFrame, FeatureEngineer]],
+                     n_trials: int, n_jobs: int) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Исследования jobs (имя, данные, FeatureEngineer) в одном пуле процессов
+
+        На каждое исследование n_jobs заданий: воркеры берут trials из общего
+        хранилища. Данные с DatetimeIndex передаются через разделяемую память.
+
+        Returns:
+            История trials по имени исследования
+        """
+        shared = []
+        tasks = []
+        try:
+            for study_name, data, feature_engineer in jobs:
+                try:
+                    frame = SharedFrame(data)
+                    shared.append(frame)
+                    payload = frame.spec
+                except ValueError:
+                    payload = data
+                for worker in range(n_jobs):
+                    tasks.append(StudyTask(
+                        model_type=self.model_type,
+                        study_name=study_name,
+                        storage=self.storage,
+                        n_trials=n_trials,
+                        timeout=self.timeout,
+                        seed=42 + worker,
+                        settings=self._worker_settings(),
+                        feature_engineer=feature_engineer,
+                        data=payload
+                    ))
+            
+            histories: Dict[str, List[Dict[str, Any]]] = {name: [] for name, _, _ in jobs}
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                futures = [(task.study_name, executor.submit(_run_study_worker, task)) for task in tasks]
+                for study_name, future in futures:
+                    try:
+                        histories[study_name].extend(future.result())
+                    except Exception as e:
+                        logger.error(f"Ошибка воркера исследования {study_name}: {e}", category='ml')
+            
+            for history in histories.values():
+                history.sort(key=lambda item: item['trial'])
+            return histories
+        finally:
+            for frame in shared:
+                frame.close()
+    
+    def _study_name(self, data: pd.DataFrame) -> str:
+        return f"{self.model_type}_{data_fingerprint(data)}"
+    
     async def optimize(self, data: pd.DataFrame, feature_engineer: FeatureEngineer,
-                      n_trials: Optional[int] = None) -> Dict[str, Any]:
+                      n_trials: Optional[int] = None, study_name: Optional[str] = None,
+                      n_jobs: Optional[int] = None) -> Dict[str, Any]:
         """
         Запускает процесс оптимизации
+        
+        Args:
+            data: OHLCV данные
+            feature_engineer: FeatureEngineer
+            n_trials: Завершенных trials во всем исследовании (None - self.n_trials)
+            study_name: Имя исследования (None - тип модели + отпечаток данных);
+                повторный запуск с тем же именем продолжает исследование
+            n_jobs: Процессов (None - self.n_jobs; без хранилища - один процесс)
         """
+        n_trials = n_trials or self.n_trials
+        n_jobs = n_jobs or self.n_jobs
+        study_name = study_name or self._study_name(data)
+        
         logger.info(
             f"Запуск оптимизации гиперпараметров для {self.model_type}",
             category='ml',
-            n_trials=n_trials or self.n_trials
+            n_trials=n_trials,
+            study=study_name,
+            n_jobs=n_jobs
         )
         
-        # Создаем исследование Optuna
-        self.study = optuna.create_study(
-            direction='maximize',
-            sampler=optuna.samplers.TPESampler(seed=42),
-            pruner=optuna.pruners.MedianPruner(
-                n_startup_trials=10,
-                n_warmup_steps=5
-            )
-        )
+        # Создаем (или продолжаем) исследование Optuna
+        self.study = self._create_study(study_name, self.storage, seed=42)
+        recover_stale_trials(self.study)
         
-        # Оптимизация
-        self.study.optimize(
-            lambda trial: self.objective(trial, data, feature_engineer),
-            n_trials=n_trials or self.n_trials,
-            timeout=self.timeout,
-            n_jobs=1  # Параллелизм внутри objective
-        )
-        
-        # Сохраняем лучшие параметры
-        self.best_params = self.study.best_params
+        # Оптимизация в потоке: цикл событий не блокируется
+        if n_jobs > 1 and self.storage:
+            histories = await asyncio.to_thread(
+                self._run_in_pool, [(study_name, data, feature_engineer)], n_trials, n_jobs
+            )
+            self.optimization_history.extend(histories[study_name])
+        else:
+            if n_jobs > 1:
+                logger.warning(
+                    "Исследование в памяти не делится между процессами - один процесс",
+                    category='ml'
+                )
+            await asyncio.to_thread(
+                self._run_study, self.study, data, feature_engineer, n_trials, self.timeout
+            )
         
-        # Результаты
-        results = {
-            'best_params': self.best_params,
-            'best_score': self.study.best_value,
-            'n_trials': len(self.study.trials),
-            'optimization_history': self.optimization_history,
-            'feature_importance': self._analyze_feature_importance()
-        }
+        results = self._collect_results()
         
         # Сохраняем результаты
         await self._save_optimization_results(results)
@@ -492,11 +775,29 @@ class HyperparameterOptimizer:
             "Оптимизация завершена",
             category='ml',
             best_score=self.study.best_value,
-            best_params=self.best_params
+            best_params=self.best_params,
+            pruned=results['n_pruned']
         )
         
         return results
     
+    def _collect_results(self) -> Dict[str, Any]:
+        """Результаты исследования self.study"""
+        # Сохраняем лучшие параметры
+        self.best_params = self.study.best_params
+        trials = self.study.get_trials(deepcopy=False)
+        
+        return {
+            'study_name': self.study.study_name,
+            'best_params': self.best_params,
+            'best_score': self.study.best_value,
+            'n_trials': len(trials),
+            'n_complete': sum(t.state == TrialState.COMPLETE for t in trials),
+            'n_pruned': sum(t.state == TrialState.PRUNED for t in trials),
+            'optimization_history': self.optimization_history,
+            'feature_importance': self._analyze_feature_importance()
+        }
+    
     def _analyze_feature_importance(self) -> Dict[str, float]:
         """Анализирует важность гиперпараметров"""
         if not self.study:
@@ -509,12 +810,17 @@ class HyperparameterOptimizer:
     
     async def _save_optimization_results(self, results: Dict[str, Any]):
         """Сохраняет результаты оптимизации"""
+        await asyncio.to_thread(self._write_optimization_results, results)
+    
+    def _write_optimization_results(self, results: Dict[str, Any]):
+        """Файл результатов и запись модели в БД (синхронно)"""
         db = SessionLocal()
         try:
             # Сохраняем в файл
             timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
             filename = f"optimization_{self.model_type}_{timestamp}.json"
             
+            Path('models/optimization').mkdir(parents=True, exist_ok=True)
             with open(f"models/optimization/{filename}", 'w') as f:
                 json.dump(results, f, indent=2, default=str)
             
@@ -540,24 +846,43 @@ class HyperparameterOptimizer:
             db.close()
     
     def parallel_optimize(self, datasets: List[pd.DataFrame],
-                         feature_engineers: List[FeatureEngineer]) -> List[Dict]:
+                         feature_engineers: List[FeatureEngineer],
+                         n_trials: Optional[int] = None) -> List[Dict]:
         """
         Параллельная оптимизация на нескольких датасетах
+        
+        Одно исследование на датасет, все - в одном пуле процессов
+        (n_jobs воркеров на исследование, без event loop в потоках).
         """
-        futures = []
+        n_trials = n_trials or self.n_trials
+        jobs = [
+            (self._study_name(data), data, fe)
+            for data, fe in zip(datasets, feature_engineers)
+        ]
         
-        for data, fe in zip(datasets, feature_engineers):
-            future = self.executor.submit(
-                self._optimize_single,
-                data, fe
-            )
-            futures.append(future)
+        studies: Dict[str, optuna.Study] = {}
+        for study_name, _, _ in jobs:
+            studies[study_name] = self._create_study(study_name, self.storage, seed=42)
+            recover_stale_trials(studies[study_name])
+        
+        if self.storage:
+            histories = self._run_in_pool(jobs, n_trials, self.n_jobs)
+        else:
+            # Исследования в памяти - по очереди в этом процессе
+            histories = {}
+            for study_name, data, fe in jobs:
+                self.optimization_history = []
+                self._run_study(studies[study_name], data, fe, n_trials, self.timeout)
+                histories[study_name] = self.optimization_history
         
         # Собираем результаты
         results = []
-        for future in futures:
+        for study_name, _, _ in jobs:
             try:
-                result = future.result(timeout=self.timeout)
+                self.study = studies[study_name]
+                self.optimization_history = histories[study_name]
+                result = self._collect_results()
+                self._write_optimization_results(result)
                 results.append(result)
             except Exception as e:
                 logger.error(f"Ошибка параллельной оптимизации: {e}")
@@ -565,20 +890,6 @@ class HyperparameterOptimizer:
         
         return results
     
-    def _optimize_single(self, data: pd.DataFrame,
-                        feature_engineer: FeatureEngineer) -> Dict:
-        """Оптимизация на одном датасете (для параллельного выполнения)"""
-        # Создаем новый event loop для процесса
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            return loop.run_until_complete(
-                self.optimize(data, feature_engineer)
-            )
-        finally:
-            loop.close()
-    
     def get_optimization_report(self) -> Dict[str, Any]:
         """Генерирует отчет по оптимизации"""
         if not self.study:
@@ -650,11 +961,6 @@ class HyperparameterOptimizer:
                 }
         
         return distributions
-    
-    def __del__(self):
-        """Cleanup"""
-        if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=False)
 
 
 # Класс для автоматической оптимизации всех моделей
@@ -26,6 +26,13 @@ from ...core.config import Config
 from ...logging.smart_logger import SmartLogger
 from ..features.feature_engineering import FeatureEngineer
 from ..models.classifier import DirectionClassifier
+from ..models.incremental import (
+    FeatureDriftReference, check_drift, can_continue, continue_fit,
+    has_all_classes, index_label, new_rows_mask
+)
+from ..models.registry import get_model_registry
+from .inference_server import InferenceServer
+from .training_scheduler import TrainingJob, TrainingScheduler
 
 
 class EnsembleModel:
@@ -91,11 +98,16 @@ class MLTrainer:
     def __init__(self):
         self.logger = SmartLogger("ml.trainer")
         self.feature_engineer = FeatureEngineer()
+        # Модели, обученные в этом процессе; загруженные с диска живут в LRU реестра
         self.models = {}
+        self.registry = get_model_registry()
+        self.inference = InferenceServer(self)
+        self.scheduler = TrainingScheduler(self)
+        self._age_checked = set()
         
         # Директории
         self.reports_dir = Path("reports/ml")
-        self.models_dir = Path("models/trained")
+        self.models_dir = Path("models/trained")  # Старый формат ({symbol}_{timeframe}_model.pkl)
         self.reports_dir.mkdir(parents=True, exist_ok=True)
         self.models_dir.mkdir(parents=True, exist_ok=True)
         
@@ -108,6 +120,7 @@ class MLTrainer:
             'model_types': ['random_forest', 'xgboost', 'lightgbm'],
             'symbols': [],
             'timeframes': ['5m', '15m', '1h'],
+            'retrain_timeframes': [tf.strip() for tf in Config.RETRAIN_TIMEFRAMES.split(',') if tf.strip()],
             'target_periods': 5,  # Предсказываем на 5 периодов вперед
             'lookback_periods': 2000
         }
@@ -184,191 +197,339 @@ class MLTrainer:
     async def train_symbol_model(self, symbol: str, timeframe: str = '5m') -> Dict[str, Any]:
         """
         РЕАЛЬНОЕ обучение модели для конкретного символа
+        
+        Обучение идет в процессе-воркере планировщика; новая модель
+        подменяет старую в инференсе после завершения.
         """
-        try:
-            self.logger.info(f"🚀 Начинаем обучение модели для {symbol}", category='ml', symbol=symbol)
-            
-            # === 1. ПОДГОТОВКА ДАННЫХ ===
-            df = await self.feature_engineer.extract_features(
-                symbol=symbol,
-                timeframe=timeframe,
-                lookback_periods=self.training_config['lookback_periods']
-            )
-            
-            if df.empty:
-                return {'success': False, 'error': 'Нет данных для обучения'}
-            
-            X, y = self.feature_engineer.prepare_training_data(
-                df,
-                target_type='direction',
-                target_periods=self.training_config['target_periods']
+        return await self.scheduler.train(symbol, timeframe)
+    
+    def fit_models(self, df: pd.DataFrame, symbol: str, timeframe: str,
+                   n_jobs: Optional[int] = None,
+                   previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Обучение моделей и ансамбля на готовых признаках (синхронно, нагрузка на CPU)
+        
+        Args:
+            df: Признаки (FeatureEngineer)
+            n_jobs: Потоков на модель (None - из model_configs)
+            previous: Текущая версия модели (model_data) - модели дообучаются
+                на новых барах (см. _fit_incremental); полное обучение, если
+                проверка дрейфа требует переобучения с нуля
+        
+        Returns:
+            model_data для реестра (ансамбль, лучшая модель, метрики)
+        
+        Raises:
+            ValueError: мало данных или не обучилась ни одна модель
+        """
+        self.logger.info(f"🚀 Начинаем обучение модели для {symbol}", category='ml', symbol=symbol)
+        
+        # === 1. ПОДГОТОВКА ДАННЫХ ===
+        if df.empty:
+            raise ValueError('Нет данных для обучения')
+        
+        X, y = self.feature_engineer.prepare_training_data(
+            df,
+            target_type='direction',
+            target_periods=self.training_config['target_periods']
+        )
+        
+        if len(X) < self.training_config['min_samples']:
+            raise ValueError(f'Недостаточно данных: {len(X)} < {self.training_config["min_samples"]}')
+        
+        # === 2. ВРЕМЕННОЕ РАЗДЕЛЕНИЕ ДАННЫХ ===
+        # Важно для временных рядов!
+        test_size = int(len(X) * self.training_config['test_split'])
+        X_temp, X_test = X[:-test_size], X[-test_size:]
+        y_temp, y_test = y[:-test_size], y[-test_size:]
+        
+        # Валидационная выборка
+        val_size = int(len(X_temp) * self.training_config['val_split'])
+        X_train, X_val = X_temp[:-val_size], X_temp[-val_size:]
+        y_train, y_val = y_temp[:-val_size], y_temp[-val_size:]
+        
+        classes, counts = np.unique(y_train, return_counts=True)
+        self.logger.info(
+            f"Данные подготовлены для {symbol}",
+            category='ml',
+            train_size=len(X_train),
+            val_size=len(X_val),
+            test_size=len(X_test),
+            class_distribution={int(c): int(n) for c, n in zip(classes, counts)}
+        )
+        
+        splits = (X_train, y_train, X_val, y_val, X_test, y_test)
+        # Метки баров обучающей выборки - граница следующего дообучения
+        rows = self._row_labels(df, len(X))
+        train_rows = rows[:len(X_train)] if rows is not None else None
+        
+        # === 3. ДООБУЧЕНИЕ ПРОШЛОЙ ВЕРСИИ ===
+        decision = {}
+        if previous is not None:
+            model_data, decision = self._fit_incremental(
+                previous, df, splits, train_rows, symbol, timeframe, n_jobs
             )
+            if model_data is not None:
+                return model_data
+        
+        # === 4. ОБУЧЕНИЕ МОДЕЛЕЙ ===
+        def params_of(model_name: str) -> Dict[str, Any]:
+            params = dict(self.model_configs[model_name]['params'])
+            if n_jobs is not None:
+                params['n_jobs'] = n_jobs
+            return params
+        
+        trained_models = {}
+        results = {}
+        
+        # Random Forest (всегда доступен)
+        try:
+            rf_model = self.model_configs['random_forest']['class'](**params_of('random_forest'))
+            rf_model.fit(X_train, y_train)
+            trained_models['random_forest'] = rf_model
             
-            if len(X) < self.training_config['min_samples']:
-                return {
-                    'success': False,
-                    'error': f'Недостаточно данных: {len(X)} < {self.training_config["min_samples"]}'
-                }
-            
-            # === 2. ВРЕМЕННОЕ РАЗДЕЛЕНИЕ ДАННЫХ ===
-            # Важно для временных рядов!
-            test_size = int(len(X) * self.training_config['test_split'])
-            X_temp, X_test = X[:-test_size], X[-test_size:]
-            y_temp, y_test = y[:-test_size], y[-test_size:]
-            
-            # Валидационная выборка
-            val_size = int(len(X_temp) * self.training_config['val_split'])
-            X_train, X_val = X_temp[:-val_size], X_temp[-val_size:]
-            y_train, y_val = y_temp[:-val_size], y_temp[-val_size:]
-            
-            self.logger.info(
-                f"Данные подготовлены для {symbol}",
-                category='ml',
-                train_size=len(X_train),
-                val_size=len(X_val),
-                test_size=len(X_test),
-                class_distribution=y_train.value_counts().to_dict()
+            # Оценка
+            results['random_forest'] = self._evaluate_model(
+                rf_model, X_train, y_train, X_val, y_val, X_test, y_test
             )
             
-            # === 3. ОБУЧЕНИЕ МОДЕЛЕЙ ===
-            trained_models = {}
-            results = {}
-            
-            # Random Forest (всегда доступен)
-            try:
-                rf_config = self.model_configs['random_forest']
-                rf_model = rf_config['class'](**rf_config['params'])
-                rf_model.fit(X_train, y_train)
-                trained_models['random_forest'] = rf_model
-                
-                # Оценка
-                results['random_forest'] = await self._evaluate_model(
-                    rf_model, X_train, y_train, X_val, y_val, X_test, y_test
-                )
-                
-            except Exception as e:
-                self.logger.error(f"Ошибка обучения Random Forest: {e}", category='ml')
-            
-            # XGBoost (опционально)
-            try:
-                import xgboost as xgb
-                xgb_config = self.model_configs['xgboost']
-                xgb_model = xgb.XGBClassifier(**xgb_config['params'])
-                xgb_model.fit(X_train, y_train)
-                trained_models['xgboost'] = xgb_model
-                
-                results['xgboost'] = await self._evaluate_model(
-                    xgb_model, X_train, y_train, X_val, y_val, X_test, y_test
-                )
-                
-            except ImportError:
-                self.logger.warning("XGBoost не установлен, пропускаем", category='ml')
-            except Exception as e:
-                self.logger.error(f"Ошибка обучения XGBoost: {e}", category='ml')
-            
-            # LightGBM (опционально)
-            try:
-                import lightgbm as lgb
-                lgb_config = self.model_configs['lightgbm']
-                lgb_model = lgb.LGBMClassifier(**lgb_config['params'])
-                lgb_model.fit(X_train, y_train)
-                trained_models['lightgbm'] = lgb_model
-                
-                results['lightgbm'] = await self._evaluate_model(
-                    lgb_model, X_train, y_train, X_val, y_val, X_test, y_test
-                )
-                
-            except ImportError:
-                self.logger.warning("LightGBM не установлен, пропускаем", category='ml')
-            except Exception as e:
-                self.logger.error(f"Ошибка обучения LightGBM: {e}", category='ml')
-            
-            if not trained_models:
-                return {'success': False, 'error': 'Не удалось обучить ни одной модели'}
-            
-            # === 4. СОЗДАНИЕ АНСАМБЛЯ ===
-            # Веса основаны на валидационной точности
-            weights = []
-            for model_name in trained_models.keys():
-                weights.append(results[model_name]['val_accuracy'])
-            
-            ensemble = EnsembleModel(
-                models=trained_models,
-                weights=weights,
-                name=f"{symbol}_ensemble"
-            )
-            ensemble.feature_columns = df.columns.tolist()
+        except Exception as e:
+            self.logger.error(f"Ошибка обучения Random Forest: {e}", category='ml')
+        
+        # XGBoost (опционально)
+        try:
+            import xgboost as xgb
+            xgb_model = xgb.XGBClassifier(**params_of('xgboost'))
+            xgb_model.fit(X_train, y_train)
+            trained_models['xgboost'] = xgb_model
             
-            # Оценка ансамбля
-            ensemble_results = await self._evaluate_model(
-                ensemble, X_train, y_train, X_val, y_val, X_test, y_test
+            results['xgboost'] = self._evaluate_model(
+                xgb_model, X_train, y_train, X_val, y_val, X_test, y_test
             )
-            results['ensemble'] = ensemble_results
             
-            # === 5. ВЫБОР ЛУЧШЕЙ МОДЕЛИ ===
-            best_model_name = max(results.keys(), key=lambda k: results[k]['val_accuracy'])
-            best_single_model = trained_models.get(best_model_name, list(trained_models.values())[0])
-            
-            # === 6. СОХРАНЕНИЕ МОДЕЛИ ===
-            model_data = {
-                'ensemble': ensemble,
-                'best_single': best_single_model,
-                'trained_models': trained_models,
-                'feature_columns': df.columns.tolist(),
-                'results': results,
-                'training_config': self.training_config,
-                'training_date': datetime.utcnow().isoformat(),
-                'symbol': symbol,
-                'timeframe': timeframe,
-                'data_info': {
-                    'train_size': len(X_train),
-                    'val_size': len(X_val),
-                    'test_size': len(X_test),
-                    'feature_count': len(df.columns)
-                }
-            }
-            
-            model_path = self.models_dir / f"{symbol}_{timeframe}_model.pkl"
-            with open(model_path, 'wb') as f:
-                pickle.dump(model_data, f)
-            
-            # Сохраняем в память
-            self.models[f"{symbol}_{timeframe}"] = ensemble
-            
-            # === 7. ГЕНЕРАЦИЯ ОТЧЕТОВ ===
-            await self.generate_symbol_report(symbol, timeframe, results, model_data)
+        except ImportError:
+            self.logger.warning("XGBoost не установлен, пропускаем", category='ml')
+        except Exception as e:
+            self.logger.error(f"Ошибка обучения XGBoost: {e}", category='ml')
+        
+        # LightGBM (опционально)
+        try:
+            import lightgbm as lgb
+            lgb_model = lgb.LGBMClassifier(**params_of('lightgbm'))
+            lgb_model.fit(X_train, y_train)
+            trained_models['lightgbm'] = lgb_model
             
-            self.logger.info(
-                f"✅ Модель для {symbol} обучена и сохранена",
-                category='ml',
-                symbol=symbol,
-                best_model=best_model_name,
-                best_accuracy=f"{results[best_model_name]['val_accuracy']:.3f}",
-                ensemble_accuracy=f"{results['ensemble']['val_accuracy']:.3f}"
+            results['lightgbm'] = self._evaluate_model(
+                lgb_model, X_train, y_train, X_val, y_val, X_test, y_test
             )
             
-            return {
-                'success': True,
-                'symbol': symbol,
-                'timeframe': timeframe,
-                'best_model': best_model_name,
-                'ensemble_accuracy': results['ensemble']['test_accuracy'],
-                'models_trained': list(trained_models.keys()),
-                'results': {k: {metric: v for metric, v in v.items() if metric not in ['model']} 
-                           for k, v in results.items()},
-                'model_path': str(model_path)
-            }
-            
+        except ImportError:
+            self.logger.warning("LightGBM не установлен, пропускаем", category='ml')
         except Exception as e:
-            self.logger.error(
-                f"❌ Ошибка обучения модели для {symbol}: {e}",
-                category='ml',
-                symbol=symbol,
-                error=str(e)
+            self.logger.error(f"Ошибка обучения LightGBM: {e}", category='ml')
+        
+        if not trained_models:
+            raise ValueError('Не удалось обучить ни одной модели')
+        
+        model_data = self._assemble(trained_models, results, df, splits, symbol, timeframe)
+        
+        # Эталон для следующих дообучений
+        model_data['incremental'] = {
+            'trained_until': index_label(train_rows[-1]),
+            'updates': 0,
+            'bars': len(X_train),
+            'baseline_accuracy': results['ensemble']['val_accuracy'],
+            'drift_reference': FeatureDriftReference.fit(X_train).to_dict(),
+            # Причина полного обучения - от проверки дрейфа (если была)
+            'last_decision': {**decision, 'mode': 'full', 'bars': len(X_train)}
+        } if train_rows is not None else {}
+        
+        return model_data
+    
+    def _fit_incremental(self, previous: Dict[str, Any], df: pd.DataFrame, splits: Tuple,
+                         train_rows: Optional[pd.Index], symbol: str, timeframe: str,
+                         n_jobs: Optional[int]) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Дообучение моделей прошлой версии на барах после ее обучения
+        
+        ✅ Новые бары - из обучающей выборки окна (валидация и тест - вне
+           дообучения, как при полном обучении)
+        ✅ Меньше INCREMENTAL_MIN_BARS новых баров - модели прежние, версия
+           с новой оценкой
+        ✅ Перед дообучением - проверка дрейфа (PSI признаков новых баров,
+           точность ансамбля на них против валидации полного обучения)
+        
+        Returns:
+            (model_data; None - нужно полное обучение, решение проверки дрейфа)
+        """
+        X_train, y_train = splits[0], splits[1]
+        state = dict(previous.get('incremental') or {})
+        trained_models = previous.get('trained_models') or {}
+        if (not state or train_rows is None or not trained_models
+                or previous.get('feature_columns') != df.columns.tolist()
+                or not all(can_continue(model) for model in trained_models.values())):
+            self.logger.info(f"Дообучение {symbol} невозможно: нет совместимой версии", category='ml')
+            return None, {}
+        
+        mask = new_rows_mask(train_rows, state.get('trained_until'))
+        X_new, y_new = X_train[mask], y_train[mask]
+        
+        decision = {'mode': 'skipped', 'bars': len(X_new)}
+        if len(X_new) >= Config.INCREMENTAL_MIN_BARS:
+            if not all(has_all_classes(model, y_new) for model in trained_models.values()):
+                return None, {**decision, 'full_retrain': True, 'reason': 'missing_classes'}
+            
+            # Качество текущего ансамбля на новых барах (до дообучения)
+            baseline = state.get('baseline_accuracy')
+            score_drop = None
+            if baseline:
+                score_drop = (baseline - accuracy_score(y_new, previous['ensemble'].predict(X_new))) / baseline
+            
+            drift = check_drift(
+                FeatureDriftReference.from_dict(state.get('drift_reference')),
+                X_new, score_drop, state.get('updates', 0)
             )
-            return {'success': False, 'error': str(e)}
+            decision.update(drift)
+            if drift['full_retrain']:
+                self.logger.info(f"Полное переобучение {symbol}: {drift['reason']}", category='ml', **drift)
+                return None, decision
+            
+            for model in trained_models.values():
+                if n_jobs is not None and 'n_jobs' in model.get_params():
+                    model.set_params(n_jobs=n_jobs)
+                continue_fit(model, X_new, y_new, state.get('bars'))
+            
+            decision['mode'] = 'incremental'
+            state['trained_until'] = index_label(train_rows[mask][-1])
+            state['updates'] = state.get('updates', 0) + 1
+        state['last_decision'] = decision
+        
+        results = {
+            name: self._evaluate_model(model, *splits)
+            for name, model in trained_models.items()
+        }
+        model_data = self._assemble(trained_models, results, df, splits, symbol, timeframe)
+        model_data['incremental'] = state
+        
+        self.logger.info(
+            f"Модели {symbol} дообучены на {len(X_new)} новых барах" if decision['mode'] == 'incremental'
+            else f"Дообучение {symbol} отложено: новых баров {len(X_new)}",
+            category='ml',
+            **decision
+        )
+        return model_data, decision
+    
+    @staticmethod
+    def _row_labels(df: pd.DataFrame, n_rows: int) -> Optional[pd.Index]:
+        """Бары строк prepare_training_data (строки без NaN в признаках); None - без времени баров"""
+        if not isinstance(df.index, pd.DatetimeIndex):
+            return None
+        features = df.drop(columns=['open', 'high', 'low', 'close', 'volume', 'timestamp'], errors='ignore')
+        rows = df.index[features.notna().all(axis=1).values]
+        return rows if len(rows) == n_rows else None
+    
+    def _assemble(self, trained_models: Dict[str, Any], results: Dict[str, Dict[str, Any]],
+                  df: pd.DataFrame, splits: Tuple, symbol: str, timeframe: str) -> Dict[str, Any]:
+        """Ансамбль, лучшая модель и model_data для реестра"""
+        X_train, y_train, X_val, y_val, X_test, y_test = splits
+        
+        # === СОЗДАНИЕ АНСАМБЛЯ ===
+        # Веса основаны на валидационной точности
+        weights = []
+        for model_name in trained_models.keys():
+            weights.append(results[model_name]['val_accuracy'])
+        
+        ensemble = EnsembleModel(
+            models=trained_models,
+            weights=weights,
+            name=f"{symbol}_ensemble"
+        )
+        ensemble.feature_columns = df.columns.tolist()
+        
+        # Оценка ансамбля
+        results['ensemble'] = self._evaluate_model(ensemble, *splits)
+        
+        # === ВЫБОР ЛУЧШЕЙ МОДЕЛИ ===
+        best_model_name = max(results.keys(), key=lambda k: results[k]['val_accuracy'])
+        best_single_model = trained_models.get(best_model_name, list(trained_models.values())[0])
+        
+        self.logger.info(
+            f"✅ Модель для {symbol} обучена",
+            category='ml',
+            symbol=symbol,
+            best_model=best_model_name,
+            best_accuracy=f"{results[best_model_name]['val_accuracy']:.3f}",
+            ensemble_accuracy=f"{results['ensemble']['val_accuracy']:.3f}"
+        )
+        
+        return {
+            'ensemble': ensemble,
+            'best_single': best_single_model,
+            'best_model': best_model_name,
+            'trained_models': trained_models,
+            'feature_columns': df.columns.tolist(),
+            'results': results,
+            'training_config': self.training_config,
+            'training_date': datetime.utcnow().isoformat(),
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'data_info': {
+                'train_size': len(X_train),
+                'val_size': len(X_val),
+                'test_size': len(X_test),
+                'feature_count': len(df.columns)
+            }
+        }
     
-    async def _evaluate_model(self, model, X_train, y_train, X_val, y_val, X_test, y_test):
+    def save_model(self, model_data: Dict[str, Any], activate: bool = True):
+        """
+        Версия модели в реестре
+        
+        activate=False - версию делает активной планировщик после подмены
+        модели в инференсе (процесс-воркер только сохраняет).
+        """
+        ensemble_results = model_data['results']['ensemble']
+        return self.registry.save(
+            f"{model_data['symbol']}_{model_data['timeframe']}",
+            model_data,
+            model_type='ensemble',
+            metrics={
+                'accuracy': ensemble_results['test_accuracy'],
+                'precision': ensemble_results['test_precision'],
+                'recall': ensemble_results['test_recall'],
+                'f1_score': ensemble_results['test_f1']
+            },
+            params=self.training_config,
+            metadata={
+                'symbol': model_data['symbol'],
+                'timeframe': model_data['timeframe'],
+                'training_date': model_data['training_date'],
+                'models_included': list(model_data['trained_models'].keys()),
+                'test_accuracy': ensemble_results['test_accuracy'],
+                'data_info': model_data['data_info']
+            },
+            training_data_size=model_data['data_info']['train_size'],
+            activate=activate
+        )
+    
+    @staticmethod
+    def training_result(model_data: Dict[str, Any], version: str) -> Dict[str, Any]:
+        """Результат обучения символа (без объектов моделей)"""
+        results = model_data['results']
+        return {
+            'success': True,
+            'symbol': model_data['symbol'],
+            'timeframe': model_data['timeframe'],
+            'best_model': model_data['best_model'],
+            'ensemble_accuracy': results['ensemble']['test_accuracy'],
+            'models_trained': list(model_data['trained_models'].keys()),
+            'training_mode': (model_data.get('incremental') or {}).get('last_decision', {}).get('mode', 'full'),
+            'results': {k: {metric: v for metric, v in v.items() if metric not in ['model']} 
+                       for k, v in results.items()},
+            'version': version
+        }
+    
+    def _evaluate_model(self, model, X_train, y_train, X_val, y_val, X_test, y_test):
         """Оценка модели на всех выборках"""
         try:
             # Предсказания
@@ -394,34 +555,30 @@ class MLTrainer:
                 'model': model
             }
     
-    async def train_all_models(self) -> Dict[str, Any]:
-        """Обучает модели для всех символов"""
-        self.logger.info("🚀 Начинаем массовое обучение моделей", category='ml')
+    def model_keys(self) -> List[Tuple[str, str]]:
+        """(symbol, timeframe) всех переобучаемых моделей"""
+        return [
+            (symbol, timeframe)
+            for symbol in self.training_config['symbols']
+            for timeframe in self.training_config['retrain_timeframes']
+        ]
+    
+    async def train_all_models(self, jobs: Optional[List[TrainingJob]] = None) -> Dict[str, Any]:
+        """
+        Обучает модели для всех символов (или jobs) в пуле процессов
         
-        all_results = {}
-        successful_models = 0
+        Порядок - по приоритету: сначала отсутствующие и самые устаревшие
+        модели, затем модели с большой ошибкой последних предсказаний.
+        """
+        self.logger.info("🚀 Начинаем массовое обучение моделей", category='ml')
         
-        for symbol in self.training_config['symbols']:
-            try:
-                result = await self.train_symbol_model(symbol)
-                all_results[symbol] = result
-                
-                if result.get('success'):
-                    successful_models += 1
-                
-                # Небольшая пауза между обучениями
-                await asyncio.sleep(1)
-                
-            except Exception as e:
-                self.logger.error(
-                    f"Критическая ошибка обучения для {symbol}: {e}",
-                    category='ml',
-                    symbol=symbol
-                )
-                all_results[symbol] = {'success': False, 'error': str(e)}
+        if jobs is None:
+            jobs = await self.scheduler.prioritize(self.model_keys())
+        all_results = await self.scheduler.run(jobs)
+        successful_models = sum(1 for result in all_results.values() if result.get('success'))
         
         # Общая статистика
-        total_symbols = len(self.training_config['symbols'])
+        total_symbols = len(all_results)
         success_rate = successful_models / total_symbols if total_symbols > 0 else 0
         
         summary = {
@@ -452,101 +609,155 @@ class MLTrainer:
                      timeframe: str = '5m', use_ensemble: bool = True) -> Dict[str, Any]:
         """
         Получение предсказания от обученной модели
+        
+        Запросы собираются сервером инференса в микро-пакеты: один
+        predict_proba на модель для всех символов/стратегий окна, кэш на бар.
         """
+        return await self.inference.predict(symbol, current_data, timeframe, use_ensemble)
+    
+    async def predict_direct(self, symbol: str, current_data: Optional[pd.DataFrame] = None,
+                             timeframe: str = '5m', use_ensemble: bool = True) -> Dict[str, Any]:
+        """Предсказание без пакетирования и кэша (по одному запросу)"""
         try:
-            model_key = f"{symbol}_{timeframe}"
-            
-            # Попытка загрузки из памяти
-            if model_key not in self.models:
-                # Загрузка с диска
-                model_path = self.models_dir / f"{symbol}_{timeframe}_model.pkl"
-                if not model_path.exists():
-                    return {
-                        'success': False,
-                        'error': f'Модель для {symbol} не найдена. Требуется обучение.'
-                    }
-                
-                with open(model_path, 'rb') as f:
-                    model_data = pickle.load(f)
-                
-                model_to_use = model_data['ensemble'] if use_ensemble else model_data['best_single']
-                self.models[model_key] = model_to_use
-                
-                # Проверяем возраст модели
-                training_date = datetime.fromisoformat(model_data['training_date'])
-                model_age_hours = (datetime.utcnow() - training_date).total_seconds() / 3600
-                
-                if model_age_hours > self.training_config['retrain_interval_hours']:
-                    self.logger.warning(
-                        f"Модель для {symbol} устарела",
-                        category='ml',
-                        symbol=symbol,
-                        age_hours=model_age_hours
-                    )
-            
-            model = self.models[model_key]
-            
-            # Подготовка данных для предсказания
-            if current_data is None:
-                # Извлекаем свежие данные
-                features_df = await self.feature_engineer.extract_features(
-                    symbol=symbol,
-                    timeframe=timeframe,
-                    lookback_periods=100  # Меньше данных для предсказания
-                )
-                
-                if features_df.empty:
-                    return {'success': False, 'error': 'Нет данных для предсказания'}
-                
-                # Берем последнюю строку
-                X = features_df.iloc[-1:].values
-            else:
-                X = current_data.values
+            model = self._load_model(symbol, timeframe, use_ensemble)
+            if model is None:
+                return {
+                    'success': False,
+                    'error': f'Модель для {symbol} не найдена. Требуется обучение.'
+                }
             
-            # Предсказание
-            prediction = model.predict(X)[0]
-            prediction_proba = model.predict_proba(X)[0]
-            confidence = model.get_confidence(X)[0] if hasattr(model, 'get_confidence') else max(prediction_proba)
+            X, _ = await self._prediction_input(symbol, timeframe, current_data)
+            if X is None:
+                return {'success': False, 'error': 'Нет данных для предсказания'}
             
-            # Интерпретация
-            direction_map = {-1: 'SELL', 0: 'HOLD', 1: 'BUY'}
-            direction = direction_map.get(prediction, 'HOLD')
+            prediction, proba, confidence = self._predict_rows(model, X)
+            return self._format_prediction(symbol, prediction[0], proba[0], confidence[0], use_ensemble)
             
-            result = {
-                'success': True,
-                'symbol': symbol,
-                'direction': direction,
-                'confidence': float(confidence),
-                'prediction_value': int(prediction),
-                'probabilities': {
-                    'bearish': float(prediction_proba[0]) if len(prediction_proba) > 0 else 0.0,
-                    'neutral': float(prediction_proba[1]) if len(prediction_proba) > 1 else 0.0,
-                    'bullish': float(prediction_proba[2]) if len(prediction_proba) > 2 else 0.0
-                },
-                'model_type': 'ensemble' if use_ensemble else 'single',
-                'timestamp': datetime.utcnow().isoformat()
-            }
+        except Exception as e:
+            self.logger.error(
+                f"❌ Ошибка предсказания для {symbol}: {e}",
+                category='ml',
+                symbol=symbol,
+                error=str(e)
+            )
+            return {'success': False, 'error': str(e)}
+    
+    def _load_model(self, symbol: str, timeframe: str, use_ensemble: bool = True):
+        """Модель из памяти, реестра (LRU, прогрев при старте) или старого pickle; None - модели нет"""
+        model_key = f"{symbol}_{timeframe}"
+        
+        if model_key in self.models:
+            return self.models[model_key]
+        
+        model_data = self.registry.get(model_key)
+        if model_data is None:
+            model_data = self._load_legacy_model(symbol, timeframe)
+            if model_data is None:
+                return None
+        
+        # Проверяем возраст модели (одно предупреждение на версию)
+        if (model_key, model_data['training_date']) not in self._age_checked:
+            self._age_checked.add((model_key, model_data['training_date']))
+            training_date = datetime.fromisoformat(model_data['training_date'])
+            model_age_hours = (datetime.utcnow() - training_date).total_seconds() / 3600
             
-            # Логируем важные предсказания
-            if confidence > 0.7:
-                self.logger.info(
-                    f"Сильный сигнал ML для {symbol}",
+            if model_age_hours > self.training_config['retrain_interval_hours']:
+                self.logger.warning(
+                    f"Модель для {symbol} устарела",
                     category='ml',
                     symbol=symbol,
-                    direction=direction,
-                    confidence=f"{confidence:.3f}"
+                    age_hours=model_age_hours
                 )
+        
+        return model_data['ensemble'] if use_ensemble else model_data['best_single']
+    
+    def _load_legacy_model(self, symbol: str, timeframe: str) -> Optional[Dict[str, Any]]:
+        """Модель старого формата (pickle в models/trained); остается в памяти"""
+        model_key = f"{symbol}_{timeframe}"
+        model_path = self.models_dir / f"{model_key}_model.pkl"
+        if not model_path.exists():
+            return None
+        
+        with open(model_path, 'rb') as f:
+            model_data = pickle.load(f)
+        self.models[model_key] = model_data['ensemble']
+        return model_data
+    
+    async def _prediction_input(self, symbol: str, timeframe: str,
+                                current_data: Optional[pd.DataFrame]) -> Tuple[Optional[np.ndarray], Optional[pd.Timestamp]]:
+        """
+        Строка признаков для предсказания и время этой строки
+        
+        Returns:
+            (X, bar_time): X - None, если данных нет; bar_time - None без DatetimeIndex
+        """
+        if current_data is None:
+            # Извлекаем свежие данные
+            features_df = await self.feature_engineer.extract_features(
+                symbol=symbol,
+                timeframe=timeframe,
+                lookback_periods=100  # Меньше данных для предсказания
+            )
             
-            return result
+            if features_df.empty:
+                return None, None
             
-        except Exception as e:
-            self.logger.error(
-                f"❌ Ошибка предсказания для {symbol}: {e}",
+            # Берем последнюю строку
+            row, X = features_df.index[-1:], features_df.iloc[-1:].values
+        else:
+            # Используется первая строка переданных данных
+            row, X = current_data.index[:1], current_data.values[:1]
+        
+        bar_time = row[0] if isinstance(row, pd.DatetimeIndex) and len(row) else None
+        return X, bar_time
+    
+    def _predict_rows(self, model, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Классы, вероятности и уверенность для всех строк X
+        
+        Для ансамбля - один predict_proba (классы и уверенность выводятся из него).
+        """
+        proba = np.asarray(model.predict_proba(X))
+        if isinstance(model, EnsembleModel):
+            prediction = np.argmax(proba, axis=1) - 1
+        else:
+            prediction = np.asarray(model.predict(X))
+        confidence = np.max(proba, axis=1)
+        return prediction, proba, confidence
+    
+    def _format_prediction(self, symbol: str, prediction, prediction_proba: np.ndarray,
+                           confidence: float, use_ensemble: bool) -> Dict[str, Any]:
+        """Результат предсказания в формате predict()"""
+        # Интерпретация
+        direction_map = {-1: 'SELL', 0: 'HOLD', 1: 'BUY'}
+        direction = direction_map.get(prediction, 'HOLD')
+        
+        result = {
+            'success': True,
+            'symbol': symbol,
+            'direction': direction,
+            'confidence': float(confidence),
+            'prediction_value': int(prediction),
+            'probabilities': {
+                'bearish': float(prediction_proba[0]) if len(prediction_proba) > 0 else 0.0,
+                'neutral': float(prediction_proba[1]) if len(prediction_proba) > 1 else 0.0,
+                'bullish': float(prediction_proba[2]) if len(prediction_proba) > 2 else 0.0
+            },
+            'model_type': 'ensemble' if use_ensemble else 'single',
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        
+        # Логируем важные предсказания
+        if confidence > 0.7:
+            self.logger.info(
+                f"Сильный сигнал ML для {symbol}",
                 category='ml',
                 symbol=symbol,
-                error=str(e)
+                direction=direction,
+                confidence=f"{confidence:.3f}"
             )
-            return {'success': False, 'error': str(e)}
+        
+        return result
     
     async def generate_symbol_report(self, symbol: str, timeframe: str, 
                                    results: Dict, model_data: Dict):
@@ -616,85 +827,121 @@ class MLTrainer:
             self.logger.error(f"Ошибка генерации общего отчета: {e}", category='ml')
     
     async def auto_retrain_loop(self):
-        """Автоматический цикл переобучения"""
+        """
+        Автоматический цикл переобучения
+        
+        Каждые RETRAIN_CHECK_MINUTES переобучаются модели, которым пора:
+        старше retrain_interval_hours или с долей ошибок последних
+        предсказаний выше RETRAIN_ERROR_THRESHOLD. Обучение идет в пуле
+        процессов, торговый цикл продолжает работать со старыми моделями.
+        """
         self.logger.info("🔄 Запуск автоматического цикла переобучения", category='ml')
         
-        while True:
-            try:
-                self.logger.info("Начинаем плановое переобучение", category='ml')
-                
-                # Обучаем все модели
-                results = await self.train_all_models()
-                
-                # Краткий анализ результатов
-                success_rate = results['success_rate']
-                if success_rate < 0.5:
-                    self.logger.warning(
-                        f"Низкий процент успешного обучения: {success_rate:.1%}",
-                        category='ml'
+        try:
+            while True:
+                try:
+                    jobs = await self.scheduler.due_jobs(self.model_keys())
+                    if jobs:
+                        self.logger.info(
+                            f"Начинаем плановое переобучение: {len(jobs)} моделей",
+                            category='ml',
+                            models=[job.key for job in jobs[:5]]
+                        )
+                        
+                        results = await self.train_all_models(jobs)
+                        
+                        # Краткий анализ результатов
+                        success_rate = results['success_rate']
+                        if success_rate < 0.5:
+                            self.logger.warning(
+                                f"Низкий процент успешного обучения: {success_rate:.1%}",
+                                category='ml'
+                            )
+                    
+                    await asyncio.sleep(Config.RETRAIN_CHECK_MINUTES * 60)
+                    
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.error(
+                        f"Ошибка в цикле переобучения: {e}",
+                        category='ml',
+                        error=str(e)
                     )
-                
-                # Ждем до следующего переобучения
-                interval_hours = self.training_config['retrain_interval_hours']
-                self.logger.info(
-                    f"Переобучение завершено. Следующее через {interval_hours}ч",
-                    category='ml',
-                    success_rate=f"{success_rate:.1%}"
-                )
-                
-                await asyncio.sleep(interval_hours * 3600)
-                
-            except Exception as e:
-                self.logger.error(
-                    f"Ошибка в цикле переобучения: {e}",
-                    category='ml',
-                    error=str(e)
-                )
-                # При ошибке ждем час и пробуем снова
-                await asyncio.sleep(3600)
+                    # При ошибке ждем час и пробуем снова
+                    await asyncio.sleep(3600)
+        finally:
+            self.scheduler.shutdown()
     
     def get_model_info(self, symbol: str, timeframe: str = '5m') -> Dict[str, Any]:
-        """Получение информации о модели"""
+        """Получение информации о модели (из метаданных реестра, без загрузки модели)"""
         try:
-            model_path = self.models_dir / f"{symbol}_{timeframe}_model.pkl"
-            if not model_path.exists():
-                return {'exists': False}
+            info = self.registry.get_version(f"{symbol}_{timeframe}")
+            if info is None:
+                return self._get_legacy_model_info(symbol, timeframe)
             
-            with open(model_path, 'rb') as f:
-                model_data = pickle.load(f)
-            
-            training_date = datetime.fromisoformat(model_data['training_date'])
+            training_date = datetime.fromisoformat(info.metadata['training_date'])
             age_hours = (datetime.utcnow() - training_date).total_seconds() / 3600
             
             return {
                 'exists': True,
                 'symbol': symbol,
                 'timeframe': timeframe,
-                'training_date': model_data['training_date'],
+                'version': info.version,
+                'training_date': info.metadata['training_date'],
                 'age_hours': age_hours,
-                'models_included': list(model_data['trained_models'].keys()),
-                'performance': model_data['results']['ensemble']['test_accuracy'],
-                'data_size': model_data['data_info']['train_size'],
-                'feature_count': model_data['data_info']['feature_count']
+                'models_included': info.metadata['models_included'],
+                'performance': info.metadata['test_accuracy'],
+                'data_size': info.metadata['data_info']['train_size'],
+                'feature_count': info.metadata['data_info']['feature_count']
             }
             
         except Exception as e:
             return {'exists': False, 'error': str(e)}
     
+    def _get_legacy_model_info(self, symbol: str, timeframe: str) -> Dict[str, Any]:
+        """Информация о модели старого формата"""
+        model_path = self.models_dir / f"{symbol}_{timeframe}_model.pkl"
+        if not model_path.exists():
+            return {'exists': False}
+        
+        with open(model_path, 'rb') as f:
+            model_data = pickle.load(f)
+        
+        training_date = datetime.fromisoformat(model_data['training_date'])
+        age_hours = (datetime.utcnow() - training_date).total_seconds() / 3600
+        
+        return {
+            'exists': True,
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'training_date': model_data['training_date'],
+            'age_hours': age_hours,
+            'models_included': list(model_data['trained_models'].keys()),
+            'performance': model_data['results']['ensemble']['test_accuracy'],
+            'data_size': model_data['data_info']['train_size'],
+            'feature_count': model_data['data_info']['feature_count']
+        }
+    
     def list_available_models(self) -> List[Dict[str, Any]]:
         """Список всех доступных моделей"""
-        models = []
+        candidates = set()
+        for model in self.registry.list_models():
+            if model['model_type'] == 'ensemble':
+                candidates.add((model['metadata']['symbol'], model['metadata']['timeframe']))
+        
         for model_file in self.models_dir.glob("*.pkl"):
+            # Парсим имя файла
+            parts = model_file.stem.split('_')
+            if len(parts) >= 3:
+                candidates.add(('_'.join(parts[:-2]), parts[-2]))
+        
+        models = []
+        for symbol, timeframe in candidates:
             try:
-                # Парсим имя файла
-                parts = model_file.stem.split('_')
-                if len(parts) >= 3:
-                    symbol = '_'.join(parts[:-2])
-                    timeframe = parts[-2]
-                    
-                    model_info = self.get_model_info(symbol, timeframe)
-                    if model_info.get('exists'):
-                        models.append(model_info)
+                model_info = self.get_model_info(symbol, timeframe)
+                if model_info.get('exists'):
+                    models.append(model_info)
             except:
                 continue
         
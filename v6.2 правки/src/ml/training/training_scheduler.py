@@ -0,0 +1,383 @@
+"""
+Планировщик обучения моделей в пуле процессов
+Файл: src/ml/training/training_scheduler.py
+
+Раньше MLTrainer.train_all_models обучал символы по одному прямо в цикле
+событий: признаки, три модели и оценка блокировали торговый цикл на все
+время переобучения.
+
+Планировщик:
+✅ Задание - пара (символ, таймфрейм); данные OHLCV получает основной
+   процесс (асинхронный ввод-вывод), признаки, обучение, сохранение в
+   реестр и отчет - процесс-воркер
+✅ Ограничения воркеров: число процессов (ML_TRAINING_WORKERS), потоки
+   BLAS и моделей (ML_TRAINING_THREADS), адресное пространство
+   (ML_TRAINING_MEMORY_MB), пониженный приоритет ОС (ML_TRAINING_NICE)
+✅ Порядок заданий: нет модели - первой, дальше по устареванию
+   (возраст / retrain_interval_hours) плюс RETRAIN_ERROR_WEIGHT x доля
+   ошибок проверенных предсказаний текущей модели (ml_predictions.is_correct)
+✅ Плановое переобучение существующей модели - дообучение активной
+   версии на новых барах (ML_INCREMENTAL_RETRAIN); с нуля - по решению
+   проверки дрейфа и для новых моделей
+✅ Горячая подмена: версия загружается в потоке, в инференс попадает
+   одним присваиванием в цикле событий и только после этого становится
+   активной в реестре
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from ...core.config import Config
+from ...core.database import SessionLocal
+from ...core.models import MLPrediction
+from ...logging.smart_logger import SmartLogger
+
+logger = SmartLogger(__name__)
+
+# Меньше проверенных предсказаний - доля ошибок не учитывается
+MIN_ERROR_SAMPLES = 20
+
+
+@dataclass
+class TrainingJob:
+    """Задание на обучение модели (символ, таймфрейм) с приоритетом"""
+    symbol: str
+    timeframe: str
+    age_hours: Optional[float] = None  # None - модели нет
+    error: Optional[float] = None  # Доля ошибок последних предсказаний
+    priority: float = 0.0
+    due: bool = True
+
+    @property
+    def key(self) -> str:
+        return f"{self.symbol}_{self.timeframe}"
+
+
+@dataclass
+class TrainingTask:
+    """Задание процесса-воркера: данные и настройки тренера"""
+    symbol: str
+    timeframe: str
+    data: Any  # OHLCV DataFrame
+    feature_engineer: Any
+    training_config: Dict[str, Any]
+    model_configs: Dict[str, Any]
+    threads: int
+    incremental: bool = False  # Дообучить активную версию из реестра
+
+
+# =================================================================
+# ПРОЦЕССЫ-ВОРКЕРЫ
+# =================================================================
+
+# Тренер процесса-воркера: создается при первом задании
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_training_worker(threads: int, memory_mb: int, nice: int):
+    if nice:
+        try:
+            os.nice(nice)
+        except (AttributeError, OSError):
+            pass
+    try:
+        # numpy уже импортирован - переменные окружения OMP/BLAS не подействуют
+        from threadpoolctl import threadpool_limits
+        _worker_state['threadpool_limits'] = threadpool_limits(limits=threads)
+    except ImportError:
+        pass
+    # Лимит после импортов: превышение - MemoryError в задании, а не сломанный пул
+    if memory_mb and resource is not None:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+async def _train_in_worker(task: TrainingTask) -> Dict[str, Any]:
+    from .trainer import MLTrainer
+
+    trainer = _worker_state.get('trainer')
+    if trainer is None:
+        trainer = _worker_state['trainer'] = MLTrainer()
+    trainer.feature_engineer = task.feature_engineer
+    trainer.training_config = task.training_config
+    trainer.model_configs = task.model_configs
+
+    features = await task.feature_engineer.features_from_ohlcv(task.data, task.symbol, task.timeframe)
+    previous = trainer.registry.load(f"{task.symbol}_{task.timeframe}") if task.incremental else None
+    model_data = trainer.fit_models(features, task.symbol, task.timeframe, n_jobs=task.threads, previous=previous)
+    # Активной версию делает основной процесс после подмены в инференсе
+    info = trainer.save_model(model_data, activate=False)
+    await trainer.generate_symbol_report(task.symbol, task.timeframe, model_data['results'], model_data)
+    return trainer.training_result(model_data, info.version)
+
+
+def _run_training_task(task: TrainingTask) -> Dict[str, Any]:
+    """Обучение в процессе-воркере; ошибки - результатом, а не исключением"""
+    try:
+        return asyncio.run(_train_in_worker(task))
+    except MemoryError:
+        return {'success': False, 'error': 'Превышен лимит памяти процесса обучения'}
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+# =================================================================
+# ПЛАНИРОВЩИК
+# =================================================================
+
+class TrainingScheduler:
+    """
+    Обучение моделей MLTrainer в пуле процессов с приоритетами
+
+    Пример:
+        jobs = await trainer.scheduler.due_jobs(trainer.model_keys())
+        results = await trainer.scheduler.run(jobs)  # модели уже в инференсе
+    """
+
+    def __init__(self, trainer: Any, workers: Optional[int] = None,
+                 threads: Optional[int] = None, memory_mb: Optional[int] = None,
+                 nice: Optional[int] = None):
+        self.trainer = trainer
+        # Одно ядро остается торговому циклу
+        self.workers = workers or Config.ML_TRAINING_WORKERS or max((os.cpu_count() or 1) - 1, 1)
+        self.threads = threads or Config.ML_TRAINING_THREADS
+        self.memory_mb = Config.ML_TRAINING_MEMORY_MB if memory_mb is None else memory_mb
+        self.nice = Config.ML_TRAINING_NICE if nice is None else nice
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._running: Set[str] = set()
+
+        self.stats = {
+            'jobs': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'swaps': 0,
+            'pool_restarts': 0,
+            'last_job_seconds': 0.0
+        }
+
+    # =================================================================
+    # ПРИОРИТЕТЫ
+    # =================================================================
+
+    async def prioritize(self, keys: Iterable[Tuple[str, str]]) -> List[TrainingJob]:
+        """Задания для (символ, таймфрейм) от самого срочного к наименее срочному"""
+        keys = list(keys)
+        if not keys:
+            return []
+        jobs = await asyncio.to_thread(self._build_jobs, keys)
+        return sorted(jobs, key=lambda job: job.priority, reverse=True)
+
+    async def due_jobs(self, keys: Iterable[Tuple[str, str]]) -> List[TrainingJob]:
+        """Задания, которым пора переобучаться (устарели или много ошибок)"""
+        return [job for job in await self.prioritize(keys) if job.due]
+
+    def _build_jobs(self, keys: List[Tuple[str, str]]) -> List[TrainingJob]:
+        """Возраст моделей и доля ошибок (в потоке: метаданные реестра и БД)"""
+        trained_at: Dict[Tuple[str, str], Optional[datetime]] = {}
+        for symbol, timeframe in keys:
+            info = self.trainer.get_model_info(symbol, timeframe)
+            trained_at[(symbol, timeframe)] = (
+                datetime.fromisoformat(info['training_date']) if info.get('exists') else None
+            )
+
+        outcomes = self._recent_outcomes([symbol for symbol, _ in keys])
+        interval = self.trainer.training_config['retrain_interval_hours']
+        now = datetime.utcnow()
+
+        jobs = []
+        for (symbol, timeframe), training_date in trained_at.items():
+            age_hours = error = None
+            if training_date is not None:
+                age_hours = (now - training_date).total_seconds() / 3600
+                # Ошибки только текущей модели: предсказания после ее обучения
+                checked = [correct for created_at, correct in outcomes.get(symbol, [])
+                           if created_at >= training_date][:Config.RETRAIN_ERROR_WINDOW]
+                if len(checked) >= MIN_ERROR_SAMPLES:
+                    error = 1 - sum(checked) / len(checked)
+
+            staleness = float('inf') if age_hours is None else age_hours / interval
+            jobs.append(TrainingJob(
+                symbol=symbol,
+                timeframe=timeframe,
+                age_hours=age_hours,
+                error=error,
+                priority=staleness + Config.RETRAIN_ERROR_WEIGHT * (error or 0.0),
+                due=(staleness >= 1 or (
+                    error is not None
+                    and error >= Config.RETRAIN_ERROR_THRESHOLD
+                    and age_hours >= Config.RETRAIN_MIN_AGE_HOURS
+                ))
+            ))
+        return jobs
+
+    def _recent_outcomes(self, symbols: List[str]) -> Dict[str, List[Tuple[datetime, bool]]]:
+        """Проверенные предсказания за интервал переобучения: symbol -> [(время, верно)], новые первыми"""
+        since = datetime.utcnow() - timedelta(hours=self.trainer.training_config['retrain_interval_hours'])
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                MLPrediction.symbol, MLPrediction.created_at, MLPrediction.is_correct
+            ).filter(
+                MLPrediction.symbol.in_(set(symbols)),
+                MLPrediction.is_correct.isnot(None),
+                MLPrediction.created_at >= since
+            ).order_by(MLPrediction.created_at.desc()).all()
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибки предсказаний недоступны: {e}", category='ml')
+            return {}
+        finally:
+            db.close()
+
+        outcomes: Dict[str, List[Tuple[datetime, bool]]] = {}
+        for symbol, created_at, correct in rows:
+            outcomes.setdefault(symbol, []).append((created_at, bool(correct)))
+        return outcomes
+
+    # =================================================================
+    # ВЫПОЛНЕНИЕ
+    # =================================================================
+
+    async def run(self, jobs: List[TrainingJob]) -> Dict[str, Dict[str, Any]]:
+        """
+        Выполняет задания в порядке приоритета, не больше self.workers сразу
+
+        Returns:
+            Результат обучения по ключу модели ('BTCUSDT_5m')
+        """
+        queue = deque(sorted(jobs, key=lambda job: job.priority, reverse=True))
+        results: Dict[str, Dict[str, Any]] = {}
+
+        async def _consume():
+            while queue:
+                job = queue.popleft()
+                results[job.key] = await self._run_job(job)
+
+        await asyncio.gather(*(_consume() for _ in range(min(self.workers, len(queue)))))
+        return results
+
+    async def train(self, symbol: str, timeframe: str = '5m') -> Dict[str, Any]:
+        """Обучение одной модели вне очереди"""
+        return await self._run_job(TrainingJob(symbol, timeframe))
+
+    async def _run_job(self, job: TrainingJob) -> Dict[str, Any]:
+        if job.key in self._running:
+            return {'success': False, 'error': f'Модель {job.key} уже обучается'}
+
+        self._running.add(job.key)
+        self.stats['jobs'] += 1
+        start = time.perf_counter()
+        try:
+            data = await self.trainer.feature_engineer._get_market_data(
+                job.symbol, job.timeframe, self.trainer.training_config['lookback_periods']
+            )
+            if data.empty:
+                result = {'success': False, 'error': 'Нет данных для обучения'}
+            else:
+                result = await self._submit(TrainingTask(
+                    symbol=job.symbol,
+                    timeframe=job.timeframe,
+                    data=data,
+                    feature_engineer=self.trainer.feature_engineer,
+                    training_config=self.trainer.training_config,
+                    model_configs=self.trainer.model_configs,
+                    threads=self.threads,
+                    # Модель уже есть - дообучение (train() вне очереди - с нуля)
+                    incremental=Config.ML_INCREMENTAL_RETRAIN and job.age_hours is not None
+                ))
+                if result.get('success'):
+                    await self._swap(job, result['version'])
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        finally:
+            self._running.discard(job.key)
+
+        duration = time.perf_counter() - start
+        self.stats['last_job_seconds'] = duration
+        if result.get('success'):
+            self.stats['succeeded'] += 1
+        else:
+            self.stats['failed'] += 1
+            logger.error(
+                f"❌ Ошибка обучения модели {job.key}: {result['error']}",
+                category='ml',
+                symbol=job.symbol,
+                error=result['error']
+            )
+        return result
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: воркеры не наследуют цикл событий, соединения БД и биржи
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_training_worker,
+                initargs=(self.threads, self.memory_mb, self.nice)
+            )
+        return self._executor
+
+    async def _submit(self, task: TrainingTask) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), _run_training_task, task)
+        except BrokenProcessPool:
+            # Процесс-воркер убит (например, OOM killer) - следующие задания в новом пуле
+            self.shutdown()
+            self.stats['pool_restarts'] += 1
+            raise
+
+    async def _swap(self, job: TrainingJob, version: str):
+        """Новая версия - в инференс, затем активной в реестре"""
+        registry = self.trainer.registry
+        model_data = await asyncio.to_thread(registry.load, job.key, version)
+        if model_data is None:
+            raise RuntimeError(f"Версия {version} модели {job.key} не найдена в реестре")
+
+        # Одно присваивание в цикле событий: пакет инференса берет модель один раз
+        # и предсказывает целиком старой или новой; кэш предсказаний старой сбрасывается
+        self.trainer.models[job.key] = model_data['ensemble']
+        self.trainer.inference.invalidate(job.symbol, job.timeframe)
+        self.stats['swaps'] += 1
+
+        await asyncio.to_thread(registry.activate, job.key, version)
+        logger.info(
+            f"🔁 Модель {job.key} обновлена в инференсе: версия {version}",
+            category='ml',
+            model=job.key,
+            version=version
+        )
+
+    def shutdown(self):
+        """Остановить пул процессов (запущенные обучения не дожидаются)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'running': sorted(self._running),
+            'workers': self.workers,
+            'threads': self.threads,
+            'memory_mb': self.memory_mb
+        }
+
+
+__all__ = [
+    'TrainingJob',
+    'TrainingScheduler',
+    'TrainingTask'
+]
@@ -0,0 +1,268 @@
+"""
+Параллельный walk-forward анализ
+Файл: src/ml/training/walk_forward.py
+
+Раньше Backtester.run_walk_forward_analysis проходил окна по очереди,
+каждый раз нарезая market_data/features через .iloc.
+
+Теперь:
+✅ market_data и features один раз кладутся в разделяемую память
+   (multiprocessing.shared_memory) - воркеры подключаются к ней без
+   копирования и без pickle данных на каждое окно
+✅ Окна раздаются пулу процессов, задача - только индексы окна и seed
+✅ Результаты возвращаются по мере готовности (as_completed)
+"""
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ...logging.smart_logger import SmartLogger
+
+logger = SmartLogger(__name__)
+
+# (номер окна, train_start, train_end, test_start, test_end)
+Window = Tuple[int, int, int, int, int]
+
+
+# =================================================================
+# РАЗДЕЛЯЕМАЯ ПАМЯТЬ
+# =================================================================
+
+@dataclass(frozen=True)
+class SharedFrameSpec:
+    """Описание DataFrame в разделяемой памяти (передается воркерам)"""
+    name: str
+    rows: int
+    columns: Tuple[str, ...]
+    tz: Optional[str] = None
+    index_name: Optional[str] = None
+    dtypes: Tuple[str, ...] = ()  # Исходные типы числовых колонок (в блоке - float64)
+    extra: Optional[pd.DataFrame] = None  # Нечисловые колонки (передаются pickle)
+    order: Tuple[str, ...] = ()  # Исходный порядок всех колонок
+
+
+class SharedFrame:
+    """
+    DataFrame с DatetimeIndex в одном блоке разделяемой памяти
+
+    Раскладка блока: [index int64 (rows)] [values float64 (rows x cols)].
+    Нечисловые колонки (строки, bool, категории) в блок не ложатся -
+    они едут в spec и возвращаются в кадр в attach_frame: воркер видит
+    те же колонки, типы и порядок, что и последовательный путь.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        if not isinstance(df.index, pd.DatetimeIndex):
+            raise ValueError("SharedFrame требует DatetimeIndex")
+
+        numeric = df.select_dtypes(include='number')
+        other = df.columns.difference(numeric.columns, sort=False)
+        rows, cols = numeric.shape
+        size = max(8 * rows * (cols + 1), 1)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        index_values, values = _layout(self._shm.buf, rows, cols)
+
+        index = df.index
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        index_values[:] = index.as_unit('ns').asi8
+        values[:] = numeric.to_numpy(dtype=np.float64)
+
+        self.spec = SharedFrameSpec(
+            name=self._shm.name,
+            rows=rows,
+            columns=tuple(numeric.columns),
+            tz=str(df.index.tz) if df.index.tz is not None else None,
+            index_name=df.index.name,
+            dtypes=tuple(str(dtype) for dtype in numeric.dtypes),
+            extra=df[other].reset_index(drop=True) if len(other) else None,
+            order=tuple(df.columns)
+        )
+
+    def close(self):
+        """Закрыть и удалить блок (вызывает владелец)"""
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _layout(buffer, rows: int, cols: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Представления индекса и значений поверх буфера"""
+    index_values = np.ndarray((rows,), dtype=np.int64, buffer=buffer)
+    values = np.ndarray((rows, cols), dtype=np.float64, buffer=buffer, offset=8 * rows)
+    return index_values, values
+
+
+def attach_frame(spec: SharedFrameSpec) -> Tuple[shared_memory.SharedMemory, pd.DataFrame]:
+    """
+    Подключиться к SharedFrame без копирования данных
+
+    Returns:
+        (shm, DataFrame): shm нужно держать живым, пока используется DataFrame
+    """
+    # Воркеры пула используют resource_tracker родителя, поэтому повторная
+    # регистрация блока безопасна: удаляет его только владелец (SharedFrame.close)
+    shm = shared_memory.SharedMemory(name=spec.name)
+
+    index_values, values = _layout(shm.buf, spec.rows, len(spec.columns))
+    values.flags.writeable = False
+
+    index = pd.DatetimeIndex(index_values.view('datetime64[ns]'), name=spec.index_name)
+    if spec.tz:
+        index = index.tz_localize('UTC').tz_convert(spec.tz)
+
+    frame = pd.DataFrame(values, index=index, columns=list(spec.columns), copy=False)
+
+    # Целые и прочие не-float64 колонки - к исходному типу (копируются только они)
+    restore = {column: dtype for column, dtype in zip(spec.columns, spec.dtypes) if dtype != 'float64'}
+    if restore:
+        frame = frame.astype(restore, copy=False)
+    if spec.extra is not None:
+        extra = spec.extra.set_axis(index)
+        frame = pd.concat([frame, extra], axis=1)[list(spec.order)]
+    return shm, frame
+
+
+# =================================================================
+# ОКНА
+# =================================================================
+
+def build_windows(total: int, window_size: int, step_size: int) -> List[Window]:
+    """Окна walk-forward (та же сетка, что и в последовательной версии)"""
+    windows = []
+    for number, start_idx in enumerate(range(0, total - window_size - step_size, step_size)):
+        train_end = start_idx + window_size
+        test_end = min(train_end + step_size, total)
+        windows.append((number, start_idx, train_end, train_end, test_end))
+    return windows
+
+
+def stub_predictions(index: pd.Index, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Заглушка предсказаний для тестового периода
+
+    В реальности здесь должны быть предсказания от ML моделей.
+    """
+    predictions = pd.DataFrame(index=index)
+    predictions['signal'] = rng.choice(['buy', 'sell', 'hold'], size=len(index))
+    predictions['confidence'] = rng.uniform(0.5, 1.0, size=len(index))
+    predictions['take_profit_percent'] = rng.uniform(1.0, 3.0, size=len(index))
+    predictions['stop_loss_percent'] = rng.uniform(0.5, 1.5, size=len(index))
+    predictions['strategy'] = 'ml_ensemble'
+    return predictions
+
+
+def run_window(backtester: Any, market_data: pd.DataFrame, features: pd.DataFrame,
+               window: Window, seed: np.random.SeedSequence) -> Any:
+    """Бэктест тестового периода одного окна"""
+    _, _, _, test_start, test_end = window
+    test_market = market_data.iloc[test_start:test_end]
+    test_features = features.iloc[test_start:test_end]
+
+    predictions = stub_predictions(test_market.index, np.random.default_rng(seed))
+    return backtester.run_backtest(test_market, test_features, predictions)
+
+
+# =================================================================
+# ПУЛ ПРОЦЕССОВ
+# =================================================================
+
+# Состояние процесса-воркера: подключается один раз в инициализаторе
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(market_spec: SharedFrameSpec, features_spec: SharedFrameSpec, config: Any):
+    from .backtester import Backtester
+
+    market_shm, market_data = attach_frame(market_spec)
+    features_shm, features = attach_frame(features_spec)
+    _worker_state.update(
+        handles=(market_shm, features_shm),
+        market_data=market_data,
+        features=features,
+        backtester=Backtester(config)
+    )
+
+
+def _run_window_in_worker(window: Window, seed: np.random.SeedSequence) -> Tuple[int, Any, float]:
+    start = time.perf_counter()
+    result = run_window(
+        _worker_state['backtester'],
+        _worker_state['market_data'],
+        _worker_state['features'],
+        window, seed
+    )
+    return window[0], result, time.perf_counter() - start
+
+
+def run_windows_in_pool(config: Any, market_data: pd.DataFrame, features: pd.DataFrame,
+                        windows: List[Window], seeds: List[np.random.SeedSequence],
+                        n_jobs: int,
+                        on_result: Optional[Callable[[int, Any], None]] = None) -> List[Any]:
+    """
+    Бэктест окон в пуле процессов
+
+    Args:
+        config: BacktestConfig
+        market_data: OHLCV данные
+        features: Признаки
+        windows: Окна (build_windows)
+        seeds: SeedSequence на каждое окно
+        n_jobs: Количество процессов
+        on_result: Вызывается в родительском процессе по мере готовности окон
+
+    Returns:
+        Результаты в порядке окон
+    """
+    results: List[Any] = [None] * len(windows)
+
+    with SharedFrame(market_data) as shared_market, SharedFrame(features) as shared_features:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            # spawn: воркеры не наследуют потоки, пулы и блокировки бота
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(shared_market.spec, shared_features.spec, config)
+        ) as executor:
+            futures = [
+                executor.submit(_run_window_in_worker, window, seed)
+                for window, seed in zip(windows, seeds)
+            ]
+
+            for done, future in enumerate(as_completed(futures), 1):
+                number, result, duration = future.result()
+                results[number] = result
+                logger.info(
+                    f"Окно {number + 1} готово ({done}/{len(windows)}) за {duration:.2f}с",
+                    category='backtest'
+                )
+                if on_result:
+                    on_result(number, result)
+
+    return results
+
+
+__all__ = [
+    'SharedFrame',
+    'SharedFrameSpec',
+    'attach_frame',
+    'build_windows',
+    'stub_predictions',
+    'run_window',
+    'run_windows_in_pool'
+]
@@ -622,9 +622,7 @@ class AutoStrategySelector:
         for symbol in pairs:
             strategy, confidence = await self.select_best_strategy(symbol)
             results[symbol] = (strategy, confidence)
-            
-            # Небольшая задержка чтобы не перегружать API
-            await asyncio.sleep(0.5)
+            # Темп запросов к бирже задает общий RateLimitScheduler
         
         return results
 
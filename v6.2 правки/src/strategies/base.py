@@ -11,6 +11,11 @@ from dataclasses import dataclass
 import logging
 import asyncio
 
+try:
+    from ..indicators.incremental import get_indicator_engine
+except ImportError:
+    get_indicator_engine = None
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -376,6 +381,27 @@ class BaseStrategy(ABC):
         else:
             return base_reason
     
+    def shared_indicators(self, df: pd.DataFrame, symbol: str) -> Optional[Dict[str, float]]:
+        """
+        Индикаторы последнего бара из общего инкрементального движка
+        
+        Одно состояние на (symbol, timeframe) для всех стратегий: новый бар
+        считается один раз, а не каждой стратегией по всей истории.
+        Формулы - как у ручных реализаций (RSI и ATR на простых средних,
+        Bollinger со std выборки, SMA).
+        
+        Returns:
+            Значения (rsi, atr, bb_upper, sma_50, volume_sma, ...) или None -
+            движок недоступен или кадр ему не подходит (стратегия считает сама)
+        """
+        if get_indicator_engine is None:
+            return None
+        try:
+            return get_indicator_engine().latest(symbol, self.timeframe, df)
+        except Exception as e:
+            logger.debug(f"Общий движок индикаторов недоступен для {symbol}: {e}")
+            return None
+    
     def validate_dataframe(self, df: pd.DataFrame) -> bool:
         """
         Валидация входных данных
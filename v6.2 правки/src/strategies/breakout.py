@@ -72,7 +72,7 @@ class BreakoutStrategy(BaseStrategy):
                 return TradingSignal('WAIT', 0, 0, reason='Не найдены уровни поддержки/сопротивления')
             
             # Рассчитываем индикаторы
-            indicators = self._calculate_indicators(df)
+            indicators = self._calculate_indicators(df, self.shared_indicators(df, symbol))
             if not indicators:
                 return TradingSignal('WAIT', 0, 0, reason='Ошибка расчета индикаторов')
             
@@ -141,8 +141,12 @@ class BreakoutStrategy(BaseStrategy):
             logger.error(f"Ошибка поиска уровней: {e}")
             return {}
     
-    def _calculate_indicators(self, df: pd.DataFrame) -> Dict:
-        """Расчет индикаторов для breakout стратегии"""
+    def _calculate_indicators(self, df: pd.DataFrame, shared: Optional[Dict] = None) -> Dict:
+        """
+        Расчет индикаторов для breakout стратегии
+        
+        shared - значения общего движка индикаторов (RSI 14, ATR 14, объем SMA 20)
+        """
         try:
             indicators = {}
             current_price = float(df['close'].iloc[-1])
@@ -176,21 +180,21 @@ class BreakoutStrategy(BaseStrategy):
                     indicators['obv_trend'] = self._calculate_obv_trend(obv.on_balance_volume())
                 
             else:
-                # Базовые вычисления без TA-Lib
-                indicators['rsi'] = self._calculate_rsi(df['close'])
+                # Базовые вычисления без TA-Lib (общий движок - если есть)
+                indicators['rsi'] = shared['rsi'] if shared else self._calculate_rsi(df['close'])
                 indicators['ema_20'] = df['close'].ewm(span=20).mean().iloc[-1]
                 indicators['ema_50'] = df['close'].ewm(span=50).mean().iloc[-1]
-                indicators['atr'] = self._calculate_atr(df)
+                indicators['atr'] = shared['atr'] if shared else self._calculate_atr(df)
                 indicators['adx'] = 30.0  # Предполагаем средний ADX
                 indicators['adx_pos'] = 25.0
                 indicators['adx_neg'] = 25.0
             
             # Анализ объема
             if 'volume' in df.columns:
-                volume_ma = df['volume'].rolling(20).mean()
+                volume_ma = shared['volume_sma'] if shared else df['volume'].rolling(20).mean().iloc[-1]
                 current_volume = df['volume'].iloc[-1]
-                indicators['volume_ratio'] = current_volume / volume_ma.iloc[-1]
-                indicators['average_volume'] = float(volume_ma.iloc[-1])
+                indicators['volume_ratio'] = current_volume / volume_ma
+                indicators['average_volume'] = float(volume_ma)
             else:
                 indicators['volume_ratio'] = 1.0
                 indicators['average_volume'] = 0
@@ -5,7 +5,7 @@
 import pandas as pd
 import numpy as np
 import ta
-from typing import Dict
+from typing import Dict, Optional
 import logging
 
 from .base import BaseStrategy, TradingSignal
@@ -32,7 +32,7 @@ class ConservativeStrategy(BaseStrategy):
         
         try:
             # Рассчитываем индикаторы
-            indicators = self._calculate_indicators(df)
+            indicators = self._calculate_indicators(df, self.shared_indicators(df, symbol))
             
             # Проверяем рыночные условия
             market_condition = self._check_market_conditions(indicators, df)
@@ -49,12 +49,12 @@ class ConservativeStrategy(BaseStrategy):
             logger.error(f"Ошибка консервативного анализа {symbol}: {e}")
             return TradingSignal('WAIT', 0, 0, reason='Ошибка анализа')
     
-    def _calculate_indicators(self, df: pd.DataFrame) -> Dict:
-        """Расчет надежных индикаторов"""
+    def _calculate_indicators(self, df: pd.DataFrame, shared: Optional[Dict] = None) -> Dict:
+        """Расчет надежных индикаторов (shared - общий движок: SMA 50)"""
         indicators = {}
         
         # Скользящие средние для определения тренда
-        indicators['sma_50'] = df['close'].rolling(window=50).mean().iloc[-1]
+        indicators['sma_50'] = shared['sma_50'] if shared else df['close'].rolling(window=50).mean().iloc[-1]
         indicators['sma_200'] = df['close'].rolling(window=200).mean().iloc[-1]
         
         # RSI для определения перекупленности/перепроданности
@@ -65,7 +65,7 @@ class MeanReversionStrategy(BaseStrategy):
             
         try:
             # Рассчитываем индикаторы
-            indicators = self._calculate_indicators(df)
+            indicators = self._calculate_indicators(df, self.shared_indicators(df, symbol))
             if not indicators:
                 return TradingSignal('WAIT', 0, 0, reason='Ошибка расчета индикаторов')
                 
@@ -82,8 +82,12 @@ class MeanReversionStrategy(BaseStrategy):
             logger.error(f"Ошибка анализа mean reversion для {symbol}: {e}")
             return TradingSignal('WAIT', 0, 0, reason=f'Ошибка анализа: {e}')
     
-    def _calculate_indicators(self, df: pd.DataFrame) -> Dict:
-        """Расчет индикаторов для mean reversion"""
+    def _calculate_indicators(self, df: pd.DataFrame, shared: Optional[Dict] = None) -> Dict:
+        """
+        Расчет индикаторов для mean reversion
+        
+        shared - значения общего движка индикаторов (RSI 14, Bollinger 20/2, ATR 14)
+        """
         try:
             indicators = {}
             current_price = float(df['close'].iloc[-1])
@@ -111,9 +115,13 @@ class MeanReversionStrategy(BaseStrategy):
                 indicators['atr'] = float(atr.average_true_range().iloc[-1])
                 
             else:
-                # Базовые вычисления без TA-Lib
-                indicators['rsi'] = self._calculate_rsi(df['close'])
-                bb_upper, bb_middle, bb_lower = self._calculate_bollinger_bands(df['close'])
+                # Базовые вычисления без TA-Lib (общий движок - если есть)
+                if shared:
+                    indicators['rsi'] = shared['rsi']
+                    bb_upper, bb_middle, bb_lower = shared['bb_upper'], shared['bb_middle'], shared['bb_lower']
+                else:
+                    indicators['rsi'] = self._calculate_rsi(df['close'])
+                    bb_upper, bb_middle, bb_lower = self._calculate_bollinger_bands(df['close'])
                 indicators['bb_upper'] = bb_upper
                 indicators['bb_lower'] = bb_lower
                 indicators['bb_middle'] = bb_middle
@@ -127,7 +135,7 @@ class MeanReversionStrategy(BaseStrategy):
                     
                 indicators['bb_width'] = bb_range / bb_middle if bb_middle > 0 else 0
                 indicators['ema'] = df['close'].ewm(span=self.ema_period).mean().iloc[-1]
-                indicators['atr'] = self._calculate_atr(df)
+                indicators['atr'] = shared['atr'] if shared else self._calculate_atr(df)
             
             # Дополнительные вычисления
             # Отклонение от EMA в процентах
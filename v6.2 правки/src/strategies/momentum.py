@@ -6,6 +6,7 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Optional
 import logging
+from datetime import datetime
 
 try:
     from ta.momentum import RSIIndicator, ROCIndicator
@@ -72,7 +73,7 @@ class MomentumStrategy(BaseStrategy):
         
         try:
             # Рассчитываем индикаторы
-            indicators = self._calculate_indicators(df)
+            indicators = await self._calculate_indicators(df, self.shared_indicators(df, symbol))
             
             # Проверяем корректность данных
             if not indicators:
@@ -88,8 +89,12 @@ class MomentumStrategy(BaseStrategy):
             logger.error(f"❌ Ошибка анализа momentum для {symbol}: {e}")
             return TradingSignal('WAIT', 0, 0, reason=f'Ошибка анализа: {e}')
     
-    async def _calculate_indicators(self, df: pd.DataFrame) -> Dict:
-        """Улучшенный расчет индикаторов с защитой от ошибок"""
+    async def _calculate_indicators(self, df: pd.DataFrame, shared: Optional[Dict] = None) -> Dict:
+        """
+        Улучшенный расчет индикаторов с защитой от ошибок
+        
+        shared - значения общего движка индикаторов (BaseStrategy.shared_indicators)
+        """
         
         try:
             current_price = df['close'].iloc[-1]
@@ -161,6 +166,8 @@ class MomentumStrategy(BaseStrategy):
             if TA_AVAILABLE:
                 atr = AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=14)
                 indicators['atr'] = atr.average_true_range().iloc[-1]
+            elif shared:
+                indicators['atr'] = shared['atr']
             else:
                 # Упрощенный ATR
                 high_low = df['high'] - df['low']
@@ -172,7 +179,7 @@ class MomentumStrategy(BaseStrategy):
             # === VOLUME ANALYSIS ===
             if 'volume' in df.columns:
                 # Средний объем за последние 20 периодов
-                avg_volume = df['volume'].rolling(window=20).mean().iloc[-1]
+                avg_volume = shared['volume_sma'] if shared else df['volume'].rolling(window=20).mean().iloc[-1]
                 current_volume = df['volume'].iloc[-1]
                 indicators['volume_ratio'] = current_volume / avg_volume if avg_volume > 0 else 1
                 
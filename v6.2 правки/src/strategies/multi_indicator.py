@@ -4,7 +4,7 @@
 """
 import pandas as pd
 import numpy as np
-from typing import Dict  # ✅ ИСПРАВЛЕНО: добавлен импорт Dict
+from typing import Dict, Optional  # ✅ ИСПРАВЛЕНО: добавлен импорт Dict
 from ta.momentum import RSIIndicator, StochasticOscillator
 from ta.trend import EMAIndicator, MACD, ADXIndicator
 from ta.volatility import BollingerBands, AverageTrueRange
@@ -45,7 +45,7 @@ class MultiIndicatorStrategy(BaseStrategy):
         
         try:
             # Рассчитываем все индикаторы
-            indicators = self._calculate_indicators(df)
+            indicators = self._calculate_indicators(df, self.shared_indicators(df, symbol))
             
             # ✅ УЛУЧШЕНИЕ: Проверяем корректность индикаторов
             if not indicators:
@@ -61,8 +61,8 @@ class MultiIndicatorStrategy(BaseStrategy):
             logger.error(f"Ошибка анализа {symbol}: {e}")
             return TradingSignal('WAIT', 0, 0, reason=f'Ошибка анализа: {e}')
     
-    def _calculate_indicators(self, df: pd.DataFrame) -> Dict:
-        """Расчет всех индикаторов"""
+    def _calculate_indicators(self, df: pd.DataFrame, shared: Optional[Dict] = None) -> Dict:
+        """Расчет всех индикаторов (shared - общий движок: объем SMA 20)"""
         try:
             indicators = {}
             
@@ -112,7 +112,8 @@ class MultiIndicatorStrategy(BaseStrategy):
             
             # Volume analysis
             if 'volume' in df.columns:
-                volume_ratio = df['volume'].iloc[-1] / df['volume'].rolling(20).mean().iloc[-1]
+                volume_sma = shared['volume_sma'] if shared else df['volume'].rolling(20).mean().iloc[-1]
+                volume_ratio = df['volume'].iloc[-1] / volume_sma
                 indicators['volume_ratio'] = float(volume_ratio)
             else:
                 indicators['volume_ratio'] = 1.0
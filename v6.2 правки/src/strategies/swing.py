@@ -76,7 +76,7 @@ class SwingStrategy(BaseStrategy):
                 return TradingSignal('WAIT', 0, 0, reason='Неопределенный тренд')
             
             # Рассчитываем индикаторы
-            indicators = self._calculate_swing_indicators(df)
+            indicators = self._calculate_swing_indicators(df, self.shared_indicators(df, symbol))
             if not indicators:
                 return TradingSignal('WAIT', 0, 0, reason='Ошибка расчета индикаторов')
                 
@@ -146,8 +146,12 @@ class SwingStrategy(BaseStrategy):
             logger.error(f"Ошибка анализа тренда: {e}")
             return {'trend': 'UNKNOWN'}
     
-    def _calculate_swing_indicators(self, df: pd.DataFrame) -> Dict:
-        """Расчет индикаторов для свинг-трейдинга"""
+    def _calculate_swing_indicators(self, df: pd.DataFrame, shared: Optional[Dict] = None) -> Dict:
+        """
+        Расчет индикаторов для свинг-трейдинга
+        
+        shared - значения общего движка индикаторов (RSI 14, Bollinger 20/2, ATR 14, объем SMA 20)
+        """
         try:
             indicators = {}
             current_price = float(df['close'].iloc[-1])
@@ -188,21 +192,24 @@ class SwingStrategy(BaseStrategy):
                     indicators['obv_trend'] = self._calculate_obv_trend(obv.on_balance_volume())
                 
             else:
-                # Базовые вычисления без TA-Lib
-                indicators['rsi'] = self._calculate_rsi(df['close'])
+                # Базовые вычисления без TA-Lib (общий движок - если есть)
+                indicators['rsi'] = shared['rsi'] if shared else self._calculate_rsi(df['close'])
                 macd, signal, hist = self._calculate_macd(df['close'])
                 indicators['macd'] = macd
                 indicators['macd_signal'] = signal
                 indicators['macd_diff'] = hist
                 indicators['adx'] = 30.0  # Предполагаем средний ADX
                 
-                bb_upper, bb_middle, bb_lower = self._calculate_bollinger_bands(df['close'])
+                if shared:
+                    bb_upper, bb_middle, bb_lower = shared['bb_upper'], shared['bb_middle'], shared['bb_lower']
+                else:
+                    bb_upper, bb_middle, bb_lower = self._calculate_bollinger_bands(df['close'])
                 indicators['bb_upper'] = bb_upper
                 indicators['bb_middle'] = bb_middle
                 indicators['bb_lower'] = bb_lower
                 indicators['bb_percent'] = (current_price - bb_lower) / (bb_upper - bb_lower) if bb_upper > bb_lower else 0.5
                 
-                indicators['atr'] = self._calculate_atr(df)
+                indicators['atr'] = shared['atr'] if shared else self._calculate_atr(df)
             
             # Дополнительные расчеты
             # Позиция цены относительно недавнего диапазона
@@ -215,9 +222,9 @@ class SwingStrategy(BaseStrategy):
             
             # Анализ объема
             if 'volume' in df.columns:
-                volume_ma = df['volume'].rolling(20).mean()
+                volume_ma = shared['volume_sma'] if shared else df['volume'].rolling(20).mean().iloc[-1]
                 current_volume = df['volume'].iloc[-1]
-                indicators['volume_ratio'] = current_volume / volume_ma.iloc[-1] if volume_ma.iloc[-1] > 0 else 1.0
+                indicators['volume_ratio'] = current_volume / volume_ma if volume_ma > 0 else 1.0
             else:
                 indicators['volume_ratio'] = 1.0
             
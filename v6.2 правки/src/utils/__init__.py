@@ -8,11 +8,14 @@ from .threading_compat import (
     safe_executor_shutdown,
     handle_threadpool_errors
 )
+from .fan_out import FanOutStage, FanOutResult
 
 __all__ = [
     'CompatibleThreadPoolExecutor',
     'AsyncRouteHandler', 
     'SystemdCompatibleService',
     'safe_executor_shutdown',
-    'handle_threadpool_errors'
+    'handle_threadpool_errors',
+    'FanOutStage',
+    'FanOutResult'
 ]
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Параллельная обработка набора ключей (символов) с ограничением конкурентности
+Путь: src/utils/fan_out.py
+
+Используется там, где раньше был последовательный цикл `for symbol in pairs: await ...`:
+- ограничение числа одновременных задач (семафор)
+- таймаут на каждый ключ
+- изоляция ошибок: падение одного символа не влияет на остальные
+- метрики времени цикла
+"""
+import asyncio
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FanOutResult:
+    """Результат обработки одного ключа"""
+    key: str
+    value: Any = None
+    error: Optional[str] = None
+    timed_out: bool = False
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.timed_out
+
+
+class FanOutStage:
+    """
+    Стадия параллельной обработки с ограниченной конкурентностью
+
+    Время цикла определяется самым медленным ключом (с учетом лимита
+    конкурентности), а не суммой по всем ключам.
+    """
+
+    def __init__(self, name: str, concurrency: int = 10, timeout: Optional[float] = 30.0):
+        """
+        Args:
+            name: Имя стадии (для логов и метрик)
+            concurrency: Максимум одновременно обрабатываемых ключей
+            timeout: Таймаут на один ключ в секундах (None - без таймаута)
+        """
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+
+        self.runs = 0
+        self.last_metrics: Dict[str, Any] = {}
+        self._total_cycle_time = 0.0
+
+    async def run(self, keys: Iterable[str],
+                  worker: Callable[[str], Awaitable[Any]]) -> Dict[str, FanOutResult]:
+        """
+        Обработка всех ключей
+
+        Args:
+            keys: Ключи (например, торговые пары)
+            worker: Корутина, обрабатывающая один ключ
+
+        Returns:
+            Dict[str, FanOutResult]: Результаты в порядке исходных ключей
+        """
+        keys = list(keys)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.perf_counter()
+
+        async def _run_one(key: str) -> FanOutResult:
+            async with semaphore:
+                item_start = time.perf_counter()
+                result = FanOutResult(key=key)
+                try:
+                    if self.timeout:
+                        result.value = await asyncio.wait_for(worker(key), self.timeout)
+                    else:
+                        result.value = await worker(key)
+                except asyncio.TimeoutError:
+                    result.timed_out = True
+                    logger.warning(f"⏱️ [{self.name}] Таймаут {key} ({self.timeout}с)")
+                except Exception as e:
+                    result.error = str(e)
+                    logger.error(f"❌ [{self.name}] Ошибка {key}: {e}")
+                result.duration = time.perf_counter() - item_start
+                return result
+
+        results = await asyncio.gather(*(_run_one(key) for key in keys))
+
+        self._record_metrics(results, time.perf_counter() - start)
+        return {result.key: result for result in results}
+
+    def _record_metrics(self, results, cycle_time: float):
+        """Сохранение метрик последнего цикла"""
+        durations = [r.duration for r in results]
+        total_item_time = sum(durations)
+
+        self.runs += 1
+        self._total_cycle_time += cycle_time
+
+        self.last_metrics = {
+            'stage': self.name,
+            'items': len(results),
+            'succeeded': sum(1 for r in results if r.ok),
+            'errors': sum(1 for r in results if r.error is not None),
+            'timeouts': sum(1 for r in results if r.timed_out),
+            'cycle_time': cycle_time,
+            'slowest_item_time': max(durations) if durations else 0.0,
+            'sum_item_time': total_item_time,
+            'speedup': total_item_time / cycle_time if cycle_time > 0 else 0.0,
+            'concurrency': self.concurrency
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Метрики стадии"""
+        return {
+            **self.last_metrics,
+            'runs': self.runs,
+            'avg_cycle_time': self._total_cycle_time / self.runs if self.runs else 0.0
+        }
+
+
+__all__ = ['FanOutStage', 'FanOutResult']
@@ -30,6 +30,11 @@ except ImportError as e:
     config = None
     CORE_AVAILABLE = False
 
+try:
+    from ..market_data.candle_store import get_candle_store
+except ImportError:
+    get_candle_store = None
+
 logger = logging.getLogger(__name__)
 
 def login_required(f):
@@ -96,6 +101,14 @@ def get_balance_from_db():
             'source': 'demo_fallback'
         }
 
+def _get_stored_candles(symbol: str, timeframe: str, limit: int):
+    """Массивы (timestamp_ms, ohlcv) из хранилища свечей"""
+    store = get_candle_store()
+    series = store.series(symbol, timeframe, capacity=limit)
+    store.refresh_sync(symbol, timeframe)
+    with series.lock:
+        return series.arrays(limit)
+
 def register_chart_routes(app, bot_manager=None, exchange_client=None):
     """
     Регистрирует все API роуты для графиков и данных
@@ -450,6 +463,25 @@ def register_chart_routes(app, bot_manager=None, exchange_client=None):
             timeframe = request.args.get('timeframe', '1h')
             limit = int(request.args.get('limit', 100))
             
+            # Реальные свечи из общего хранилища (догружаются только новые бары)
+            if get_candle_store and CORE_AVAILABLE:
+                ts, ohlcv = _get_stored_candles(symbol, timeframe, limit)
+                if len(ts):
+                    candles = [
+                        {
+                            'timestamp': int(t),
+                            'open': o, 'high': h, 'low': l, 'close': c, 'volume': v
+                        }
+                        for t, (o, h, l, c, v) in zip(ts.tolist(), ohlcv.tolist())
+                    ]
+                    return jsonify({
+                        'success': True,
+                        'symbol': symbol,
+                        'timeframe': timeframe,
+                        'candles': candles,
+                        'source': 'database'
+                    })
+            
             # Генерируем демо свечи (в реальности брать с биржи)
             candles = []
             base_price = 67800.0